@@ -86,6 +86,7 @@ from routes.health_api import (
     record_request_metrics as _record_request_metrics,
 )
 from routes.mqtt_api import mqtt_api_bp
+from routes.profiler_api import profiler_api_bp
 from routes.programs_api import programs_api_bp
 from routes.system_config_api import system_config_api_bp
 from routes.system_emergency_api import system_emergency_api_bp
@@ -100,9 +101,12 @@ try:
     from services.telegram_bot import subscribe_to_events as _tg_subscribe
 
     _tg_subscribe()
+    from services.leader import is_multi_worker as _is_multi_worker
     from services.telegram_bot import start_long_polling_if_needed as _tg_poll_start
 
-    _tg_poll_start()
+    # В многопроцессном режиме long polling запускает только лидер (services/app_init.py)
+    if not _is_multi_worker():
+        _tg_poll_start()
 except ImportError as e:
     logging.getLogger(__name__).debug("Telegram bot init skipped: %s", e)
 from services import sse_hub as _sse_hub
@@ -188,6 +192,7 @@ for _view in (
 #   system_config_api_bp except the three guest endpoints above
 #   system_status_api_bp except /api/status
 #   groups_api_bp       (admin group CRUD; control endpoints exempt above)
+#   profiler_api_bp     (admin profiler start/stop)
 
 _sse_hub.init(
     db=db,
@@ -222,19 +227,25 @@ from services.version import get_app_version as _get_app_version
 
 APP_VERSION = _get_app_version()
 
+# Static asset pipeline: hashed bundles from `python -m services.static_assets
+# build` when present, per-file `?v=<version>` URLs otherwise.
+from services import static_assets as _static_assets
+
 
 @app.context_processor
 def _inject_app_version():
-    try:
-        sys_name = db.get_setting_value("system_name") or ""
+    def asset(path):
+        return _static_assets.asset_url(path, APP_VERSION)
 
-        def asset(path):
-            return f"{path}?v={APP_VERSION}"
+    def bundle(name):
+        return _static_assets.bundle_urls(name, APP_VERSION)
 
-        return {"app_version": APP_VERSION, "system_name": sys_name, "asset": asset}
+    try:
+        sys_name = db.get_setting_value("system_name") or ""
+        return {"app_version": APP_VERSION, "system_name": sys_name, "asset": asset, "bundle": bundle}
     except (sqlite3.Error, OSError) as e:
         logger.debug("context processor fallback: %s", e)
-        return {"app_version": "1.0", "system_name": "", "asset": (lambda p: p)}
+        return {"app_version": "1.0", "system_name": "", "asset": asset, "bundle": bundle}
 
 
 # ── Middleware ──────────────────────────────────────────────────────────────
@@ -284,6 +295,40 @@ def _assign_correlation_id():
         logger.debug("correlation_id assign: %s", e)
 
 
+# Per-request profiling: an admin request with `X-Profile: 1` is sampled on
+# its own thread; the folded profile is kept under its X-Request-ID
+# (GET /api/profiler/requests/<id>.folded).
+from services import profiler as _profiler
+
+
+@app.before_request
+def _profile_request_start():
+    if request.headers.get(_profiler.REQUEST_HEADER) != "1":
+        return
+    if session.get("role") != "admin" and not app.config.get("TESTING"):
+        return
+    cid = getattr(request, "_correlation_id", None)
+    if cid and _profiler.begin_request(cid, request.method, request.path):
+        request._profiled = True
+
+
+@app.after_request
+def _profile_request_end(resp: Response):
+    if getattr(request, "_profiled", False):
+        request._profiled = False
+        summary = _profiler.end_request(request._correlation_id, resp.status_code)
+        if summary:
+            resp.headers["X-Profile-Samples"] = str(summary["samples"])
+    return resp
+
+
+@app.teardown_request
+def _profile_request_teardown(exc):
+    # view raised → after_request не вызывался; не оставляем сэмплер работать
+    if getattr(request, "_profiled", False):
+        _profiler.end_request(request._correlation_id, 500)
+
+
 @app.after_request
 def _perf_add_server_timing(resp: Response):
     try:
@@ -514,6 +559,7 @@ for bp in (
     weather_api_bp,
     audit_api_bp,
     zones_history_api_bp,
+    profiler_api_bp,
 ):
     app.register_blueprint(bp)
 
@@ -668,13 +714,15 @@ _WATCHDOG_STOP_EVENT = threading.Event()
 
 
 def _start_single_zone_watchdog():
-    global _WATCHDOG_STARTED
+    global _WATCHDOG_STARTED, _WATCHDOG_STOP_EVENT
     if _WATCHDOG_STARTED:
         return
     _WATCHDOG_STARTED = True
+    # свой Event на каждый запуск: поток прошлого лидерства не переживёт повторное избрание
+    stop_event = _WATCHDOG_STOP_EVENT = threading.Event()
 
     def _run():
-        while not _WATCHDOG_STOP_EVENT.is_set():
+        while not stop_event.is_set():
             try:
                 _enforce_group_exclusive_all_groups()
             except (
@@ -686,11 +734,18 @@ def _start_single_zone_watchdog():
                 RuntimeError,
             ) as e:  # catch-all: intentional
                 logger.exception("watchdog loop: %s", e)
-            _WATCHDOG_STOP_EVENT.wait(1.0)
+            stop_event.wait(1.0)
 
     threading.Thread(target=_run, daemon=True).start()
 
 
+def _stop_single_zone_watchdog():
+    """Multi-worker demotion: the new leader runs the watchdog."""
+    global _WATCHDOG_STARTED
+    _WATCHDOG_STOP_EVENT.set()
+    _WATCHDOG_STARTED = False
+
+
 import atexit
 
 atexit.register(lambda: _WATCHDOG_STOP_EVENT.set())
@@ -739,6 +794,18 @@ def _general_api_rate_limit():
         return resp
 
 
+# ── Multi-worker: scheduler-bound requests go to the leader ───────────────
+from services import leader as _leader
+
+
+@app.before_request
+def _forward_to_leader():
+    """Followers proxy mutations and scheduler GETs to the leader (WB_WORKERS > 1)."""
+    if app.config.get("TESTING"):
+        return None
+    return _leader.forward_to_leader(request)
+
+
 _mark_zone_stopped = _sse_hub.mark_zone_stopped
 _recently_stopped = _sse_hub.recently_stopped
 
@@ -759,8 +826,11 @@ def service_worker():
     # Sanitize: CACHE_NAME is a JS string literal — strip anything that could
     # break the quote or thrash cache between dev runs (e.g. spaces, '+dirty').
     safe_version = _re.sub(r"[^A-Za-z0-9._-]", "-", APP_VERSION)
+    # Hashed bundle URLs come from our own manifest (hex digests + fixed
+    # names) — json.dumps yields valid JS string literals.
+    precache = ", ".join(json.dumps(u) for u in _static_assets.precache_urls())
     with open(sw_path, encoding="utf-8") as f:
-        body = f.read().replace("__APP_VERSION__", safe_version)
+        body = f.read().replace("__APP_VERSION__", safe_version).replace("/*__PRECACHE_BUNDLES__*/", precache)
     resp = app.response_class(body, mimetype="application/javascript")
     resp.headers["Cache-Control"] = "no-cache, must-revalidate"
     return resp
@@ -782,7 +852,12 @@ def _publish_mqtt_async(server, topic, value, min_interval_sec=0.0):
         logger.warning("_publish_mqtt_async thread start: %s", e)
 
 
-_initialize_app(app, db, start_watchdog_fn=lambda: _start_single_zone_watchdog())
+_initialize_app(
+    app,
+    db,
+    start_watchdog_fn=lambda: _start_single_zone_watchdog(),
+    stop_watchdog_fn=lambda: _stop_single_zone_watchdog(),
+)
 
 # ── Main ───────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
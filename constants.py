@@ -10,6 +10,13 @@ ANTI_RESTART_WINDOW_SEC = 5
 ZONE_CAP_DEFAULT_MIN = 240
 MAX_CONCURRENT_ZONES = 4
 
+# ── Programs ───────────────────────────────────────────────────────────────
+# Groups of one program watered at the same time (settings: program_max_parallel_groups).
+# 1 = groups run one after another; values > 1 take effect only with a flow budget set.
+PROGRAM_MAX_PARALLEL_GROUPS = 1
+# Pump capacity shared by parallel groups, l/min; 0 = not configured (settings: program_flow_budget_lpm)
+PROGRAM_FLOW_BUDGET_LPM = 0.0
+
 # ── MQTT ───────────────────────────────────────────────────────────────────
 MQTT_CACHE_TTL_SEC = 300
 GROUP_DEBOUNCE_SEC = 0.8
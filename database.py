@@ -14,9 +14,12 @@ from db.logs import LogRepository
 from db.migrations import MigrationRunner
 from db.mqtt import MqttRepository
 from db.programs import ProgramRepository
+from db.retention import RetentionRepository
+from db.secrets import SecretsRepository
 from db.settings import SettingsRepository
 from db.telegram import TelegramRepository
 from db.zones import ZoneRepository
+from services import startup_timeline as _startup_timeline
 
 # Логирование: не вызываем logging.basicConfig() на import-time (CQ-012 / MASTER-C2).
 # До фикса этот вызов перебивал уровень root-логгера ДО того, как
@@ -49,10 +52,14 @@ class IrrigationDB:
         self.telegram = TelegramRepository(db_path)
         self.logs = LogRepository(db_path, self.backup_dir)
         self.audit = AuditRepository(db_path)
+        self.retention = RetentionRepository(db_path)
+        self.secrets = SecretsRepository(db_path)
 
         # Init schema + migrations
         self._migrations = MigrationRunner(db_path)
         self.init_database()
+        # файл БД мог быть пересоздан или восстановлен под тем же путём
+        self.secrets.invalidate_snapshot()
 
     def init_database(self):
         """Initialize database schema and run all migrations."""
@@ -102,6 +109,9 @@ class IrrigationDB:
     def set_group_scheduled_starts(self, group_id: int, schedule: dict[int, str]) -> None:
         return self.zones.set_group_scheduled_starts(group_id, schedule)
 
+    def set_zones_scheduled_starts(self, schedule: dict[int, str]) -> None:
+        return self.zones.set_zones_scheduled_starts(schedule)
+
     def clear_scheduled_for_zone_group_peers(self, zone_id: int, group_id: int) -> None:
         return self.zones.clear_scheduled_for_zone_group_peers(zone_id, group_id)
 
@@ -159,12 +169,19 @@ class IrrigationDB:
         """Most recent successful watering end-time for a zone (from zone_runs)."""
         return self.zones.get_last_watering_time(zone_id)
 
+    def check_zone_last_run(self, repair: bool = False) -> dict[str, Any]:
+        """Verify (and optionally rebuild) the zone_last_run summary against zone_runs."""
+        return self.zones.check_zone_last_run(repair=repair)
+
     def compute_next_run_for_zone(self, zone_id: int) -> str | None:
         return self.zones.compute_next_run_for_zone(zone_id, programs_getter=self.programs.get_programs)
 
     def reschedule_group_to_next_program(self, group_id: int) -> None:
         return self.zones.reschedule_group_to_next_program(group_id, programs_getter=self.programs.get_programs)
 
+    def reschedule_groups_to_next_program(self, group_ids) -> None:
+        return self.zones.reschedule_groups_to_next_program(group_ids, programs_getter=self.programs.get_programs)
+
     # --- Programs ---
     def get_programs(self) -> list[dict[str, Any]]:
         return self.programs.get_programs()
@@ -184,8 +201,14 @@ class IrrigationDB:
     def duplicate_program(self, program_id: int) -> dict[str, Any] | None:
         return self.programs.duplicate_program(program_id)
 
-    def check_program_conflicts(self, program_id=None, time=None, zones=None, days=None):
-        return self.programs.check_program_conflicts(program_id, time, zones, days)
+    def check_program_conflicts(self, program_id=None, time=None, zones=None, days=None, **kwargs):
+        return self.programs.check_program_conflicts(program_id, time, zones, days, **kwargs)
+
+    def check_zone_duration_conflicts(self, changes: list[tuple[int, int]]) -> dict[int, list[dict[str, Any]]]:
+        return self.programs.check_zone_duration_conflicts(changes)
+
+    def program_conflicts_report(self, weather_factor: int | None = None) -> dict[str, Any]:
+        return self.programs.program_conflicts_report(weather_factor)
 
     def cancel_program_run_for_group(self, program_id: int, run_date: str, group_id: int) -> bool:
         return self.programs.cancel_program_run_for_group(program_id, run_date, group_id)
@@ -244,6 +267,9 @@ class IrrigationDB:
     def _decrypt_mqtt_password(server: dict[str, Any]) -> dict[str, Any]:
         return MqttRepository._decrypt_mqtt_password(server)
 
+    def rotate_secret_key(self, new_key: bytes | None = None) -> dict[str, Any]:
+        return self.secrets.rotate_key(new_key)
+
     # --- Settings ---
     def get_setting_value(self, key: str) -> str | None:
         return self.settings.get_setting_value(key)
@@ -346,6 +372,16 @@ class IrrigationDB:
     def create_backup(self):
         return self.logs.create_backup()
 
+    # --- Retention ---
+    def run_retention(self, **kwargs):
+        return self.retention.run(**kwargs)
+
+    def get_retention_policies(self):
+        return self.retention.get_policies()
+
+    def get_zone_runs_daily(self, zone_ids, from_day, to_day):
+        return self.retention.get_zone_runs_daily(zone_ids, from_day, to_day)
+
     # --- Audit log ---
     def add_audit(
         self,
@@ -385,4 +421,5 @@ class IrrigationDB:
 
 
 # Глобальный экземпляр базы данных
-db = IrrigationDB()
+with _startup_timeline.phase("migrations"):
+    db = IrrigationDB()
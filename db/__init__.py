@@ -7,6 +7,8 @@ from db.logs import LogRepository
 from db.migrations import MigrationRunner
 from db.mqtt import MqttRepository
 from db.programs import ProgramRepository
+from db.retention import RetentionRepository
+from db.secrets import SecretsRepository
 from db.settings import SettingsRepository
 from db.telegram import TelegramRepository
 from db.zones import ZoneRepository
@@ -20,6 +22,8 @@ __all__ = [
     "MigrationRunner",
     "MqttRepository",
     "ProgramRepository",
+    "RetentionRepository",
+    "SecretsRepository",
     "SettingsRepository",
     "TelegramRepository",
     "ZoneRepository",
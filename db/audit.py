@@ -10,6 +10,7 @@ import sqlite3
 from typing import Any
 
 from db.base import BaseRepository, retry_on_busy
+from db.retention import delete_in_batches
 
 logger = logging.getLogger(__name__)
 
@@ -176,13 +177,12 @@ class AuditRepository(BaseRepository):
         """Delete audit rows older than ``older_than_days``.  Returns rows deleted."""
         try:
             days = max(1, int(older_than_days))
-            with self._connect() as conn:
-                cur = conn.execute("DELETE FROM audit_log WHERE ts < datetime('now', ?)", (f"-{days} days",))
-                deleted = cur.rowcount or 0
-                conn.commit()
-                if deleted:
-                    logger.info("audit_log cleanup: %d rows older than %d days deleted", deleted, days)
-                return int(deleted)
+            # in batches: short transactions keep the write lock brief
+            stats = delete_in_batches(self._connect, "audit_log", "ts < datetime('now', ?)", (f"-{days} days",))
+            deleted = stats["deleted"]
+            if deleted:
+                logger.info("audit_log cleanup: %d rows older than %d days deleted", deleted, days)
+            return int(deleted)
         except sqlite3.Error as e:
             logger.error("audit_log cleanup failed: %s", e)
             return 0
@@ -0,0 +1,363 @@
+"""Online database backup: paged copy, streaming gzip, verification, manifest, restore.
+
+The copy goes through the SQLite online-backup API ``BACKUP_PAGES`` pages at a
+time with a short sleep between steps, so each read transaction is brief and
+zone-state writes never queue behind a multi-megabyte copy. A writer touching
+the database mid-copy makes SQLite restart the copy; after ``MAX_RESTARTS``
+restarts the last attempt copies in a single step.
+
+Every copy is checked with ``PRAGMA integrity_check`` before it is compressed
+(gzip, streamed in chunks) next to ``manifest.json``, which records sizes,
+SHA-256 of the archive and of the database image, and the schema version.
+:meth:`BackupRepository.verify_backup` re-checks an archive against it and
+:meth:`BackupRepository.restore_backup` writes it back into the live database.
+
+CLI::
+
+    python -m db.backup create  [--db irrigation.db] [--dir backups]
+    python -m db.backup list    [--dir backups]
+    python -m db.backup verify  BACKUP [--dir backups]
+    python -m db.backup restore BACKUP [--db irrigation.db] [--dir backups] [--no-safety-copy]
+"""
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Any
+
+from db import secrets
+from db.base import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "irrigation_backup_"
+MANIFEST_NAME = "manifest.json"
+BACKUP_PAGES = 128
+BACKUP_SLEEP_SEC = 0.01
+MAX_RESTARTS = 5
+KEEP_COUNT = 7
+CHUNK_SIZE = 1 << 20
+GZIP_LEVEL = 6
+
+
+class BackupError(Exception):
+    """Backup could not be created, verified or restored."""
+
+
+class _CopyRestarted(Exception):
+    pass
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _integrity(path: str) -> str:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+        return "; ".join(str(r[0]) for r in rows)
+    finally:
+        conn.close()
+
+
+def _remove_quietly(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class BackupRepository(BaseRepository):
+    """Backups of ``db_path`` in ``backup_dir`` (compressed archives + manifest)."""
+
+    def __init__(self, db_path: str, backup_dir: str = "backups"):
+        super().__init__(db_path)
+        self.backup_dir = backup_dir
+
+    # --- copy ---------------------------------------------------------------
+
+    def _copy_online(self, dst_path: str, pages: int = BACKUP_PAGES, sleep: float = BACKUP_SLEEP_SEC) -> int:
+        """Copy the live database into ``dst_path``; returns the number of restarts."""
+        restarts = 0
+        for attempt_pages in (pages, -1):
+            _remove_quietly(dst_path)
+            state = {"remaining": None, "restarts": 0}
+
+            def progress(status, remaining, total, state=state):
+                # remaining растёт — источник изменился и SQLite начал копию заново
+                if state["remaining"] is not None and remaining > state["remaining"]:
+                    state["restarts"] += 1
+                    if state["restarts"] > MAX_RESTARTS:
+                        raise _CopyRestarted()
+                state["remaining"] = remaining
+
+            src = sqlite3.connect(self.db_path, timeout=5)
+            dst = sqlite3.connect(dst_path)
+            try:
+                src.backup(dst, pages=attempt_pages, progress=progress, sleep=sleep)
+                # копия — самостоятельный файл, без -wal/-shm рядом
+                dst.execute("PRAGMA journal_mode=DELETE")
+                return restarts + state["restarts"]
+            except _CopyRestarted:
+                restarts += state["restarts"]
+                logger.info("backup: source kept changing, copying in one step")
+            finally:
+                dst.close()
+                src.close()
+        raise BackupError("online copy did not complete")
+
+    # --- manifest -----------------------------------------------------------
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.backup_dir, MANIFEST_NAME)
+
+    def read_manifest(self) -> dict[str, Any]:
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("backups"), list):
+                return data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("backup manifest unreadable, starting a new one: %s", e)
+        return {"version": 1, "backups": []}
+
+    def _write_manifest(self, manifest: dict[str, Any]) -> None:
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path())
+
+    def _entry(self, name: str) -> dict[str, Any] | None:
+        name = os.path.basename(name)
+        return next((e for e in self.read_manifest()["backups"] if e.get("file") == name), None)
+
+    # --- create -------------------------------------------------------------
+
+    def create_backup(self) -> str | None:
+        """Paged online copy -> integrity check -> gzip -> manifest. Returns the archive path."""
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            name = f"{BACKUP_PREFIX}{stamp}.db.gz"
+            archive = os.path.join(self.backup_dir, name)
+            staging = os.path.join(self.backup_dir, f".{BACKUP_PREFIX}{stamp}.db.partial")
+            started = time.monotonic()
+            try:
+                try:
+                    restarts = self._copy_online(staging)
+                except (sqlite3.Error, BackupError) as e:
+                    logger.error("Ошибка копирования БД для бэкапа: %s", e)
+                    return None
+
+                prod_size = os.path.getsize(self.db_path)
+                db_size = os.path.getsize(staging)
+                if db_size < prod_size * 0.5:
+                    logger.error("Backup too small: %d bytes < 50%% of %d — removing", db_size, prod_size)
+                    return None
+                integrity = _integrity(staging)
+                if integrity != "ok":
+                    logger.error("Backup integrity_check failed: %s", integrity)
+                    return None
+
+                db_hash = hashlib.sha256()
+                with open(staging, "rb") as src, gzip.open(archive + ".tmp", "wb", compresslevel=GZIP_LEVEL) as gz:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        db_hash.update(chunk)
+                        gz.write(chunk)
+                os.replace(archive + ".tmp", archive)
+                schema = sqlite3.connect(f"file:{staging}?mode=ro", uri=True)
+                try:
+                    user_version = int(schema.execute("PRAGMA user_version").fetchone()[0])
+                finally:
+                    schema.close()
+            finally:
+                _remove_quietly(staging)
+                _remove_quietly(archive + ".tmp")
+
+            entry = {
+                "file": name,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "db_bytes": db_size,
+                "archive_bytes": os.path.getsize(archive),
+                "sha256": _sha256(archive),
+                "db_sha256": db_hash.hexdigest(),
+                "integrity": integrity,
+                "user_version": user_version,
+                "restarts": restarts,
+                "duration_sec": round(time.monotonic() - started, 3),
+            }
+            manifest = self.read_manifest()
+            manifest["backups"] = [e for e in manifest["backups"] if e.get("file") != name] + [entry]
+            self._write_manifest(manifest)
+            self._cleanup_old_backups()
+            logger.info(
+                "Резервная копия создана: %s (%d -> %d bytes, %.1fs)",
+                archive,
+                db_size,
+                entry["archive_bytes"],
+                entry["duration_sec"],
+            )
+            return archive
+        except (OSError, sqlite3.Error) as e:
+            logger.error("Ошибка создания резервной копии: %s", e)
+            return None
+
+    def list_backups(self) -> list[dict[str, Any]]:
+        """Backups on disk, oldest first; manifest data where available (legacy ``.db`` too)."""
+        try:
+            names = [
+                n
+                for n in os.listdir(self.backup_dir)
+                if n.startswith(BACKUP_PREFIX) and (n.endswith(".db") or n.endswith(".db.gz"))
+            ]
+        except FileNotFoundError:
+            return []
+        known = {e.get("file"): e for e in self.read_manifest()["backups"]}
+        out = []
+        for n in names:
+            path = os.path.join(self.backup_dir, n)
+            out.append({**known.get(n, {"file": n}), "path": path, "mtime": os.path.getmtime(path)})
+        out.sort(key=lambda e: e["mtime"])
+        return out
+
+    def _cleanup_old_backups(self, keep_count: int = KEEP_COUNT) -> None:
+        """Удалить старые резервные копии (и их записи в манифесте)."""
+        try:
+            backups = self.list_backups()
+            for entry in backups[:-keep_count]:
+                os.remove(entry["path"])
+                logger.info("Удалена старая резервная копия: %s", entry["path"])
+            on_disk = {e["file"] for e in backups[-keep_count:]}
+            manifest = self.read_manifest()
+            kept = [e for e in manifest["backups"] if e.get("file") in on_disk]
+            if len(kept) != len(manifest["backups"]):
+                manifest["backups"] = kept
+                self._write_manifest(manifest)
+        except OSError as e:
+            logger.error("Ошибка очистки старых резервных копий: %s", e)
+
+    # --- verify / restore ---------------------------------------------------
+
+    def _resolve(self, backup: str) -> str:
+        path = backup if os.path.exists(backup) else os.path.join(self.backup_dir, backup)
+        if not os.path.exists(path):
+            raise BackupError(f"backup not found: {backup}")
+        return path
+
+    def _unpack(self, path: str, dst_path: str) -> str:
+        """Decompress (or copy) ``path`` into ``dst_path``; returns SHA-256 of the database image."""
+        h = hashlib.sha256()
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as src, open(dst_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                dst.write(chunk)
+        return h.hexdigest()
+
+    def verify_backup(self, backup: str) -> dict[str, Any]:
+        """Check archive checksum against the manifest, then integrity of the unpacked image."""
+        path = self._resolve(backup)
+        entry = self._entry(path)
+        report: dict[str, Any] = {"file": os.path.basename(path), "in_manifest": entry is not None}
+        if entry is not None:
+            report["checksum_ok"] = _sha256(path) == entry.get("sha256")
+        staging = os.path.join(self.backup_dir, f".verify_{os.getpid()}.db")
+        try:
+            db_sha = self._unpack(path, staging)
+            report["integrity"] = _integrity(staging)
+            if entry is not None:
+                report["checksum_ok"] = report["checksum_ok"] and db_sha == entry.get("db_sha256")
+        except (OSError, EOFError, sqlite3.Error) as e:
+            report["integrity"] = f"unreadable: {e}"
+        finally:
+            _remove_quietly(staging)
+        report["ok"] = report["integrity"] == "ok" and report.get("checksum_ok", True)
+        return report
+
+    def restore_backup(self, backup: str, safety_copy: bool = True) -> dict[str, Any]:
+        """Replace the contents of the live database with ``backup``.
+
+        The archive is verified first; the current database is backed up
+        beforehand unless ``safety_copy`` is off. The image is written through
+        the backup API, so open connections see the restored data instead of
+        holding a replaced file.
+        """
+        report = self.verify_backup(backup)
+        if not report["ok"]:
+            raise BackupError(f"backup failed verification: {report}")
+        path = self._resolve(backup)
+        staging = os.path.join(self.backup_dir, f".restore_{os.getpid()}.db")
+        try:
+            # распаковка до страховочной копии: её ротация может удалить сам архив
+            self._unpack(path, staging)
+            safety = self.create_backup() if safety_copy and os.path.exists(self.db_path) else None
+            src = sqlite3.connect(staging)
+            dst = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
+        finally:
+            _remove_quietly(staging)
+        secrets.invalidate(self.db_path)
+        logger.warning("База данных восстановлена из %s (страховочная копия: %s)", path, safety)
+        return {"restored_from": path, "safety_copy": safety, "integrity": _integrity(self.db_path)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m db.backup", description="Irrigation DB backups")
+    parser.add_argument("--db", default="irrigation.db", help="path to the SQLite database")
+    parser.add_argument("--dir", default="backups", help="backup directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("create", help="create a verified compressed backup")
+    sub.add_parser("list", help="list backups with manifest data")
+    p_verify = sub.add_parser("verify", help="verify checksum and integrity of a backup")
+    p_verify.add_argument("backup")
+    p_restore = sub.add_parser("restore", help="restore a backup into --db")
+    p_restore.add_argument("backup")
+    p_restore.add_argument("--no-safety-copy", action="store_true", help="do not back up the current DB first")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    repo = BackupRepository(args.db, args.dir)
+    try:
+        if args.cmd == "create":
+            path = repo.create_backup()
+            print(path or "backup failed")
+            return 0 if path else 1
+        if args.cmd == "list":
+            for e in repo.list_backups():
+                print(
+                    f"{e['file']}\t{e.get('db_bytes', '-')}\t{e.get('archive_bytes', '-')}\t{e.get('integrity', '?')}"
+                )
+            return 0
+        if args.cmd == "verify":
+            report = repo.verify_backup(args.backup)
+            print(json.dumps(report, ensure_ascii=False))
+            return 0 if report["ok"] else 1
+        report = repo.restore_backup(args.backup, safety_copy=not args.no_safety_copy)
+        print(json.dumps(report, ensure_ascii=False))
+        return 0 if report["integrity"] == "ok" else 1
+    except BackupError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
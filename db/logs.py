@@ -1,10 +1,8 @@
 import logging
-import os
-import shutil
 import sqlite3
-from datetime import datetime
 from typing import Any
 
+from db.backup import BackupRepository
 from db.base import BaseRepository, retry_on_busy
 
 logger = logging.getLogger(__name__)
@@ -120,47 +118,62 @@ class LogRepository(BaseRepository):
             return False
 
     def get_water_statistics(self, days: int = 30) -> dict[str, Any]:
-        """Получить статистику расхода воды."""
+        """Получить статистику расхода воды.
+
+        Сырые строки water_usage складываются с агрегатами water_usage_daily /
+        water_usage_monthly, куда retention сворачивает удалённые строки
+        (месячный уровень учитывается целым месяцем).
+        """
         try:
             days = int(days)
             day_modifier = f"-{days} days"
             with self._connect() as conn:
-                cursor = conn.execute(
-                    """
-                    SELECT SUM(liters) as total_liters
-                    FROM water_usage
-                    WHERE timestamp >= datetime('now', ?)
-                """,
-                    (day_modifier,),
-                )
+                # (zone_id, day, liters) по всем уровням; месяц — одна строка с day = 'YYYY-MM'
+                tiers = """
+                    SELECT zone_id, DATE(timestamp) AS day, liters
+                    FROM water_usage WHERE timestamp >= datetime('now', :mod)
+                    UNION ALL
+                    SELECT zone_id, day, liters
+                    FROM water_usage_daily WHERE day >= date('now', :mod)
+                    UNION ALL
+                    SELECT zone_id, month, liters
+                    FROM water_usage_monthly WHERE month >= strftime('%Y-%m', 'now', :mod)
+                """
+                params = {"mod": day_modifier}
+                cursor = conn.execute(f"SELECT SUM(liters) FROM ({tiers})", params)
                 total_liters = cursor.fetchone()[0] or 0
 
                 cursor = conn.execute(
-                    """
+                    f"""
                     SELECT z.name, SUM(w.liters) as liters
-                    FROM water_usage w
+                    FROM ({tiers}) w
                     LEFT JOIN zones z ON w.zone_id = z.id
-                    WHERE w.timestamp >= datetime('now', ?)
                     GROUP BY w.zone_id, z.name
                     ORDER BY liters DESC
                 """,
-                    (day_modifier,),
+                    params,
                 )
                 zone_usage = [dict(row) for row in cursor.fetchall()]
 
+                # дни с расходом: по сырым и дневным — различные даты, по месячным — MAX(days)
                 cursor = conn.execute(
                     """
-                    SELECT AVG(daily_liters) as avg_daily
-                    FROM (
-                        SELECT DATE(timestamp) as date, SUM(liters) as daily_liters
-                        FROM water_usage
-                        WHERE timestamp >= datetime('now', ?)
-                        GROUP BY DATE(timestamp)
-                    )
+                    SELECT
+                      (SELECT COUNT(*) FROM (
+                          SELECT DATE(timestamp) AS day FROM water_usage
+                          WHERE timestamp >= datetime('now', :mod)
+                          UNION
+                          SELECT day FROM water_usage_daily WHERE day >= date('now', :mod)
+                      ))
+                      + (SELECT IFNULL(SUM(d), 0) FROM (
+                          SELECT MAX(days) AS d FROM water_usage_monthly
+                          WHERE month >= strftime('%Y-%m', 'now', :mod) GROUP BY month
+                      ))
                 """,
-                    (day_modifier,),
+                    params,
                 )
-                avg_daily = cursor.fetchone()[0] or 0
+                active_days = cursor.fetchone()[0] or 0
+                avg_daily = total_liters / active_days if active_days else 0
 
                 return {
                     "total_liters": round(total_liters, 2),
@@ -173,66 +186,5 @@ class LogRepository(BaseRepository):
             return {"total_liters": 0, "avg_daily": 0, "zone_usage": [], "period_days": days}
 
     def create_backup(self) -> str | None:
-        """Создать резервную копию базы данных."""
-        try:
-            if not os.path.exists(self.backup_dir):
-                os.makedirs(self.backup_dir)
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(self.backup_dir, f"irrigation_backup_{timestamp}.db")
-
-            try:
-                with sqlite3.connect(self.db_path) as src_conn:
-                    with sqlite3.connect(backup_path) as dst_conn:
-                        src_conn.backup(dst_conn)
-                try:
-                    with self._connect() as c:
-                        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
-                        c.commit()
-                except sqlite3.Error as e:
-                    logger.debug("WAL checkpoint after backup: %s", e)
-            except sqlite3.Error as e:
-                logger.debug("VACUUM backup failed, using copy: %s", e)
-                shutil.copy2(self.db_path, backup_path)
-
-            try:
-                prod_size = os.path.getsize(self.db_path)
-                bak_size = os.path.getsize(backup_path)
-            except OSError as e:
-                logger.error("Не удалось проверить размер бэкапа: %s", e)
-                return None
-            if bak_size < prod_size * 0.5:
-                logger.error(
-                    "Backup too small: %d bytes < 50%% of %d — removing",
-                    bak_size,
-                    prod_size,
-                )
-                try:
-                    os.remove(backup_path)
-                except OSError as e:
-                    logger.error("Не удалось удалить подозрительный бэкап %s: %s", backup_path, e)
-                return None
-
-            self._cleanup_old_backups()
-            logger.info("Резервная копия создана: %s", backup_path)
-            return backup_path
-        except OSError as e:
-            logger.error("Ошибка создания резервной копии: %s", e)
-            return None
-
-    def _cleanup_old_backups(self, keep_count: int = 7):
-        """Удалить старые резервные копии."""
-        try:
-            backup_files = []
-            for file in os.listdir(self.backup_dir):
-                if file.startswith("irrigation_backup_") and file.endswith(".db"):
-                    file_path = os.path.join(self.backup_dir, file)
-                    backup_files.append((file_path, os.path.getmtime(file_path)))
-
-            backup_files.sort(key=lambda x: x[1])
-
-            for file_path, _ in backup_files[:-keep_count]:
-                os.remove(file_path)
-                logger.info("Удалена старая резервная копия: %s", file_path)
-        except OSError as e:
-            logger.error("Ошибка очистки старых резервных копий: %s", e)
+        """Создать резервную копию базы данных (см. db/backup.py)."""
+        return BackupRepository(self.db_path, self.backup_dir).create_backup()
@@ -13,6 +13,94 @@ logger = logging.getLogger(__name__)
 class MigrationRunner:
     """Runs all named migrations for the irrigation database."""
 
+    # (name, method) in application order. SCHEMA_VERSION below is derived from
+    # this list: append new migrations at the end, never reorder or rename.
+    MIGRATIONS: tuple[tuple[str, str], ...] = (
+        ("days_format", "_migrate_days_format"),
+        ("zones_add_postpone_reason", "_migrate_add_postpone_reason"),
+        ("zones_add_watering_start_time", "_migrate_add_watering_start_time"),
+        ("zones_add_scheduled_start_time", "_migrate_add_scheduled_start_time"),
+        ("zones_add_last_watering_time", "_migrate_add_last_watering_time"),
+        ("create_mqtt_servers", "_migrate_add_mqtt_servers"),
+        ("zones_add_mqtt_server_id", "_migrate_add_zone_mqtt_server_id"),
+        ("ensure_group_999", "_migrate_ensure_special_group"),
+        ("zones_add_indexes", "_migrate_add_zones_indexes"),
+        ("groups_add_use_rain", "_migrate_add_group_rain_flag"),
+        ("zones_add_watering_start_source", "_migrate_add_watering_start_source"),
+        ("mqtt_add_tls_options", "_migrate_add_mqtt_tls_options"),
+        ("zones_add_control_fields", "_migrate_add_zone_control_fields"),
+        ("zones_add_commanded_observed", "_migrate_add_commanded_observed"),
+        ("groups_add_master_and_sensors", "_migrate_add_groups_master_and_sensors"),
+        ("groups_add_master_valve_observed", "_migrate_add_groups_master_valve_observed"),
+        ("groups_add_master_close_delay_sec", "_migrate_add_groups_master_close_delay_sec"),
+        ("groups_add_water_meter_extended", "_migrate_add_groups_water_meter_extended"),
+        ("zones_add_water_stats", "_migrate_add_zones_water_stats"),
+        ("create_zone_runs_v1", "_migrate_create_zone_runs"),
+        # Telegram bot migrations
+        ("telegram_add_settings_fields", "_migrate_add_telegram_settings"),
+        ("telegram_create_bot_users", "_migrate_create_bot_users"),
+        ("telegram_create_bot_subscriptions", "_migrate_create_bot_subscriptions"),
+        ("telegram_create_bot_audit", "_migrate_create_bot_audit"),
+        ("telegram_add_fsm_and_notif", "_migrate_add_fsm_and_notif"),
+        ("telegram_create_bot_idempotency", "_migrate_create_bot_idempotency"),
+        # Security: encrypt plaintext MQTT passwords
+        ("encrypt_mqtt_passwords", "_migrate_encrypt_mqtt_passwords"),
+        # Safety: fault tracking
+        ("zones_add_fault_tracking", "_migrate_add_fault_tracking"),
+        # Weather: tables and settings
+        ("weather_create_cache", "_migrate_create_weather_cache"),
+        ("weather_create_log", "_migrate_create_weather_log"),
+        ("weather_add_settings", "_migrate_add_weather_settings"),
+        # Weather v2: decisions table, extended settings, wind unit migration
+        ("weather_create_decisions", "_migrate_create_weather_decisions"),
+        ("weather_add_extended_settings", "_migrate_add_extended_weather_settings"),
+        ("weather_wind_kmh_to_ms", "_migrate_wind_kmh_to_ms"),
+        # Weather H2: virtual water balance (additive, default off)
+        ("weather_add_balance_settings", "_migrate_add_water_balance_settings"),
+        ("weather_create_balance_log", "_migrate_create_water_balance_log"),
+        # Queue & float support (spec v1.1)
+        ("queue_and_float_support", "_migrate_queue_and_float_support"),
+        # Programs v2: new fields (type, schedule_type, interval_days, even_odd, color, enabled, extra_times)
+        ("programs_v2_fields", "_migrate_programs_v2_fields"),
+        # Audit log (two-tier logging spec)
+        ("create_audit_log", "_migrate_create_audit_log"),
+        # Issue #2: backfill last_watering_time from zone_runs.end_utc
+        # for zones whose value is NULL after the bug-fix release.
+        ("backfill_last_watering_from_zone_runs", "_migrate_backfill_last_watering_from_zone_runs"),
+        # Single-source-of-truth refactor: drop the denormalised
+        # zones.last_watering_time column entirely. Reads now derive
+        # the value from zone_runs.end_utc via get_last_watering_time.
+        # IRREVERSIBLE — no downgrade registered.
+        ("zones_drop_last_watering_time", "_migrate_drop_last_watering_time"),
+        # Issue #11: add photo_thumb column for separate 400x400 thumb file.
+        ("zones_add_photo_thumb", "_migrate_add_photo_thumb"),
+        # Issue #35: add zone_runs.source ('program' / 'manual') + composite
+        # index, then backfill historical rows by matching start_utc to
+        # the active programs' schedules (±120s) — manual otherwise.
+        ("zone_runs_add_source", "_migrate_add_zone_runs_source"),
+        ("zone_runs_backfill_source", "_backfill_zone_runs_source"),
+        # History truth: track whether the relay's physical 'on' was
+        # ever confirmed (MQTT echo) during a run, so a run that never
+        # actually opened the valve is recorded as 'failed', not 'ok'.
+        ("zone_runs_add_confirmed", "_migrate_add_zone_runs_confirmed"),
+        # Last-run summary kept by triggers, so zone reads stop aggregating
+        # the whole zone_runs history.
+        ("create_zone_last_run", "_migrate_create_zone_last_run"),
+        # Retention: daily/monthly rollup tiers for zone_runs and water_usage
+        # (see db/retention.py) + ts index for the bot_audit purge.
+        ("create_retention_rollups", "_migrate_create_retention_rollups"),
+        # History cache: stamp bumped by triggers whenever data behind the
+        # zone history endpoints changes (services/history_query.py).
+        ("create_history_data_version", "_migrate_create_history_data_version"),
+        # Secrets snapshot: stamp bumped by triggers whenever MQTT servers or
+        # encrypted settings change (db/secrets.py).
+        ("create_secrets_version", "_migrate_create_secrets_version"),
+        # Weather: completed-day ET0/precip per location, so the nightly
+        # water-balance fetch asks only for missing days (services/weather/history.py).
+        ("weather_create_history_daily", "_migrate_create_weather_history_daily"),
+    )
+    SCHEMA_VERSION = len(MIGRATIONS)
+
     def __init__(self, db_path: str):
         self.db_path = db_path
 
@@ -22,6 +110,8 @@ class MigrationRunner:
             with sqlite3.connect(self.db_path, timeout=5) as conn:
                 # PRAGMA
                 try:
+                    # действует только для новой (пустой) БД; старые — `python -m db.retention convert-vacuum`
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
                     conn.execute("PRAGMA journal_mode=WAL")
                     conn.execute("PRAGMA foreign_keys=ON")
                     conn.execute("PRAGMA synchronous=NORMAL")
@@ -31,6 +121,11 @@ class MigrationRunner:
                 except sqlite3.Error as e:
                     logger.warning("PRAGMA setup warning: %s", e)
 
+                # Fast path: schema stamped current and every migration journalled
+                if self._schema_current(conn):
+                    logger.info("Схема БД актуальна (user_version=%d), миграции пропущены", self.SCHEMA_VERSION)
+                    return
+
                 # Create tables
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS zones (
@@ -117,120 +212,12 @@ class MigrationRunner:
                 # Initial data
                 self._insert_initial_data(conn)
 
-                # Named migrations
-                self._apply_named_migration(conn, "days_format", self._migrate_days_format)
-                self._apply_named_migration(conn, "zones_add_postpone_reason", self._migrate_add_postpone_reason)
-                self._apply_named_migration(
-                    conn, "zones_add_watering_start_time", self._migrate_add_watering_start_time
-                )
-                self._apply_named_migration(
-                    conn, "zones_add_scheduled_start_time", self._migrate_add_scheduled_start_time
-                )
-                self._apply_named_migration(conn, "zones_add_last_watering_time", self._migrate_add_last_watering_time)
-                self._apply_named_migration(conn, "create_mqtt_servers", self._migrate_add_mqtt_servers)
-                self._apply_named_migration(conn, "zones_add_mqtt_server_id", self._migrate_add_zone_mqtt_server_id)
-                self._apply_named_migration(conn, "ensure_group_999", self._migrate_ensure_special_group)
-                self._apply_named_migration(conn, "zones_add_indexes", self._migrate_add_zones_indexes)
-                self._apply_named_migration(conn, "groups_add_use_rain", self._migrate_add_group_rain_flag)
-                self._apply_named_migration(
-                    conn, "zones_add_watering_start_source", self._migrate_add_watering_start_source
-                )
-                self._apply_named_migration(conn, "mqtt_add_tls_options", self._migrate_add_mqtt_tls_options)
-                self._apply_named_migration(conn, "zones_add_control_fields", self._migrate_add_zone_control_fields)
-                self._apply_named_migration(conn, "zones_add_commanded_observed", self._migrate_add_commanded_observed)
-                self._apply_named_migration(
-                    conn, "groups_add_master_and_sensors", self._migrate_add_groups_master_and_sensors
-                )
-                self._apply_named_migration(
-                    conn, "groups_add_master_valve_observed", self._migrate_add_groups_master_valve_observed
-                )
-                self._apply_named_migration(
-                    conn, "groups_add_master_close_delay_sec", self._migrate_add_groups_master_close_delay_sec
-                )
-                self._apply_named_migration(
-                    conn, "groups_add_water_meter_extended", self._migrate_add_groups_water_meter_extended
-                )
-                self._apply_named_migration(conn, "zones_add_water_stats", self._migrate_add_zones_water_stats)
-                self._apply_named_migration(conn, "create_zone_runs_v1", self._migrate_create_zone_runs)
-                # Telegram bot migrations
-                self._apply_named_migration(conn, "telegram_add_settings_fields", self._migrate_add_telegram_settings)
-                self._apply_named_migration(conn, "telegram_create_bot_users", self._migrate_create_bot_users)
-                self._apply_named_migration(
-                    conn, "telegram_create_bot_subscriptions", self._migrate_create_bot_subscriptions
-                )
-                self._apply_named_migration(conn, "telegram_create_bot_audit", self._migrate_create_bot_audit)
-                self._apply_named_migration(conn, "telegram_add_fsm_and_notif", self._migrate_add_fsm_and_notif)
-                self._apply_named_migration(
-                    conn, "telegram_create_bot_idempotency", self._migrate_create_bot_idempotency
-                )
-                # Security: encrypt plaintext MQTT passwords
-                self._apply_named_migration(conn, "encrypt_mqtt_passwords", self._migrate_encrypt_mqtt_passwords)
-                # Safety: fault tracking
-                self._apply_named_migration(conn, "zones_add_fault_tracking", self._migrate_add_fault_tracking)
-                # Weather: tables and settings
-                self._apply_named_migration(conn, "weather_create_cache", self._migrate_create_weather_cache)
-                self._apply_named_migration(conn, "weather_create_log", self._migrate_create_weather_log)
-                self._apply_named_migration(conn, "weather_add_settings", self._migrate_add_weather_settings)
-                # Weather v2: decisions table, extended settings, wind unit migration
-                self._apply_named_migration(conn, "weather_create_decisions", self._migrate_create_weather_decisions)
-                self._apply_named_migration(
-                    conn, "weather_add_extended_settings", self._migrate_add_extended_weather_settings
-                )
-                self._apply_named_migration(conn, "weather_wind_kmh_to_ms", self._migrate_wind_kmh_to_ms)
-                # Weather H2: virtual water balance (additive, default off)
-                self._apply_named_migration(
-                    conn, "weather_add_balance_settings", self._migrate_add_water_balance_settings
-                )
-                self._apply_named_migration(conn, "weather_create_balance_log", self._migrate_create_water_balance_log)
-                # Queue & float support (spec v1.1)
-                self._apply_named_migration(conn, "queue_and_float_support", self._migrate_queue_and_float_support)
-                # Programs v2: new fields (type, schedule_type, interval_days, even_odd, color, enabled, extra_times)
-                self._apply_named_migration(conn, "programs_v2_fields", self._migrate_programs_v2_fields)
-                # Audit log (two-tier logging spec)
-                self._apply_named_migration(conn, "create_audit_log", self._migrate_create_audit_log)
-                # Issue #2: backfill last_watering_time from zone_runs.end_utc
-                # for zones whose value is NULL after the bug-fix release.
-                self._apply_named_migration(
-                    conn,
-                    "backfill_last_watering_from_zone_runs",
-                    self._migrate_backfill_last_watering_from_zone_runs,
-                )
-                # Single-source-of-truth refactor: drop the denormalised
-                # zones.last_watering_time column entirely. Reads now derive
-                # the value from zone_runs.end_utc via get_last_watering_time.
-                # IRREVERSIBLE — no downgrade registered.
-                self._apply_named_migration(
-                    conn,
-                    "zones_drop_last_watering_time",
-                    self._migrate_drop_last_watering_time,
-                )
-                # Issue #11: add photo_thumb column for separate 400x400 thumb file.
-                self._apply_named_migration(
-                    conn,
-                    "zones_add_photo_thumb",
-                    self._migrate_add_photo_thumb,
-                )
-                # Issue #35: add zone_runs.source ('program' / 'manual') + composite
-                # index, then backfill historical rows by matching start_utc to
-                # the active programs' schedules (±120s) — manual otherwise.
-                self._apply_named_migration(
-                    conn,
-                    "zone_runs_add_source",
-                    self._migrate_add_zone_runs_source,
-                )
-                self._apply_named_migration(
-                    conn,
-                    "zone_runs_backfill_source",
-                    self._backfill_zone_runs_source,
-                )
-                # History truth: track whether the relay's physical 'on' was
-                # ever confirmed (MQTT echo) during a run, so a run that never
-                # actually opened the valve is recorded as 'failed', not 'ok'.
-                self._apply_named_migration(
-                    conn,
-                    "zone_runs_add_confirmed",
-                    self._migrate_add_zone_runs_confirmed,
-                )
+                # Named migrations (one read of the journal instead of one per migration)
+                applied = {row[0] for row in conn.execute("SELECT name FROM migrations")}
+                for name, method in self.MIGRATIONS:
+                    if name not in applied:
+                        self._apply_named_migration(conn, name, getattr(self, method))
+                self._stamp_schema_version(conn)
 
                 logger.info("База данных инициализирована успешно")
 
@@ -265,6 +252,34 @@ class MigrationRunner:
         except sqlite3.Error as e:
             logger.error("Ошибка вставки начальных данных: %s", e)
 
+    def _schema_current(self, conn) -> bool:
+        """True when ``PRAGMA user_version`` matches and all migrations are in the journal.
+
+        Two cheap reads replace the full chain (~45 journal lookups and
+        commits) on every boot. Deleting a row from ``migrations`` still
+        forces that migration to run again.
+        """
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                return False
+            names = [name for name, _ in self.MIGRATIONS]
+            placeholders = ",".join("?" * len(names))
+            cur = conn.execute(f"SELECT COUNT(*) FROM migrations WHERE name IN ({placeholders})", names)
+            return cur.fetchone()[0] == len(names)
+        except sqlite3.Error as e:
+            logger.debug("schema version check failed: %s", e)
+            return False
+
+    def _stamp_schema_version(self, conn) -> None:
+        """Record SCHEMA_VERSION once every migration is journalled (a failed one leaves it unstamped)."""
+        try:
+            applied = {row[0] for row in conn.execute("SELECT name FROM migrations")}
+            version = self.SCHEMA_VERSION if all(name in applied for name, _ in self.MIGRATIONS) else 0
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Не удалось записать версию схемы: %s", e)
+
     def _apply_named_migration(self, conn, name: str, func):
         try:
             cur = conn.execute("SELECT name FROM migrations WHERE name = ? LIMIT 1", (name,))
@@ -300,6 +315,7 @@ class MigrationRunner:
                     return False
                 down_func(conn)
                 conn.execute("DELETE FROM migrations WHERE name = ?", (name,))
+                conn.execute("PRAGMA user_version = 0")
                 conn.execute("PRAGMA foreign_keys=ON")
                 conn.commit()
                 logger.info("Миграция %s откачена успешно", name)
@@ -356,8 +372,25 @@ class MigrationRunner:
         conn.execute(f"INSERT INTO {tmp} ({cols_csv}) SELECT {cols_csv} FROM {table}")
         conn.execute(f"DROP TABLE {table}")
         conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+        # Триггеры удалены вместе со старой таблицей
+        MigrationRunner._recreate_triggers(conn, table)
         conn.commit()
 
+    @staticmethod
+    def _recreate_triggers(conn, table: str):
+        """Reissue the summary/version triggers that live on ``table``."""
+
+        def exists(name: str) -> bool:
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+            return row is not None
+
+        if table == "zone_runs" and exists("zone_last_run"):
+            MigrationRunner._create_zone_last_run_triggers(conn)
+        if exists("history_data_version"):
+            MigrationRunner._create_history_version_triggers(conn)
+        if exists("secrets_version"):
+            MigrationRunner._create_secrets_version_triggers(conn)
+
     # --- All migration methods ---
 
     def _migrate_days_format(self, conn):
@@ -834,6 +867,21 @@ class MigrationRunner:
         except sqlite3.Error as e:
             logger.error("Ошибка миграции weather_create_cache: %s", e)
 
+    def _migrate_create_weather_history_daily(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS weather_history_daily (
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                day TEXT NOT NULL,
+                et0 REAL NOT NULL,
+                precip REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (latitude, longitude, day)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+        logger.info("Создана таблица weather_history_daily")
+
     def _migrate_create_weather_log(self, conn):
         try:
             conn.execute("""
@@ -1260,6 +1308,180 @@ class MigrationRunner:
         except sqlite3.Error as e:
             logger.error("Ошибка миграции zone_runs_add_confirmed: %s", e)
 
+    def _migrate_create_zone_last_run(self, conn):
+        """Create ``zone_last_run`` (zone_id -> last successful end_utc) and backfill it.
+
+        The value is exactly what ``get_last_watering_time`` used to aggregate:
+        ``MAX(end_utc)`` over runs with ``status='ok'`` and a non-NULL end.
+        Triggers on ``zone_runs`` keep it current inside the writer's own
+        transaction, whoever the writer is (finish_zone_run, boot-sync abort,
+        history edits). Each trigger recomputes one zone through
+        ``idx_zone_runs_active``, so the cost does not grow with history.
+        """
+        # без try/except: при ошибке миграция не попадёт в журнал и повторится
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS zone_last_run (
+                zone_id INTEGER PRIMARY KEY,
+                end_utc TEXT NOT NULL
+            )
+        """)
+        self._create_zone_last_run_triggers(conn)
+        conn.execute("DELETE FROM zone_last_run")
+        conn.execute(
+            "INSERT INTO zone_last_run(zone_id, end_utc) "
+            "SELECT zone_id, MAX(end_utc) FROM zone_runs "
+            "WHERE status = 'ok' AND end_utc IS NOT NULL GROUP BY zone_id"
+        )
+        conn.commit()
+        logger.info("Создана таблица zone_last_run")
+
+    @staticmethod
+    def _create_zone_last_run_triggers(conn):
+        def refresh(ref: str) -> str:
+            return (
+                f"DELETE FROM zone_last_run WHERE zone_id = {ref}.zone_id; "
+                f"INSERT INTO zone_last_run(zone_id, end_utc) "
+                f"SELECT zone_id, MAX(end_utc) FROM zone_runs "
+                f"WHERE zone_id = {ref}.zone_id AND status = 'ok' AND end_utc IS NOT NULL GROUP BY zone_id;"
+            )
+
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_zone_last_run_ins AFTER INSERT ON zone_runs
+            WHEN NEW.status = 'ok' AND NEW.end_utc IS NOT NULL
+            BEGIN {refresh("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_zone_last_run_upd AFTER UPDATE OF zone_id, status, end_utc ON zone_runs
+            BEGIN {refresh("OLD")} {refresh("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_zone_last_run_del AFTER DELETE ON zone_runs
+            WHEN OLD.status = 'ok' AND OLD.end_utc IS NOT NULL
+            BEGIN {refresh("OLD")} END
+        """)
+
+    def _migrate_create_retention_rollups(self, conn):
+        """Create the rollup tiers the retention pass folds old rows into.
+
+        Rows are additive: retention upserts ``x = x + excluded.x``, so a day
+        that is only partly purged is still counted exactly once when readers
+        add the tier to the remaining raw rows.
+        """
+        for tier, key in (("zone_runs_daily", "day"), ("zone_runs_monthly", "month")):
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {tier} (
+                    zone_id INTEGER NOT NULL,
+                    {key} TEXT NOT NULL,
+                    runs INTEGER NOT NULL DEFAULT 0,
+                    failed_runs INTEGER NOT NULL DEFAULT 0,
+                    minutes INTEGER NOT NULL DEFAULT 0,
+                    liters REAL,
+                    liters_missing INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (zone_id, {key})
+                )
+            """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS water_usage_daily (
+                zone_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                liters REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (zone_id, day)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS water_usage_monthly (
+                zone_id INTEGER NOT NULL,
+                month TEXT NOT NULL,
+                liters REAL NOT NULL DEFAULT 0,
+                days INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (zone_id, month)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_zone_runs_daily_day ON zone_runs_daily(day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_water_usage_daily_day ON water_usage_daily(day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bot_audit_ts ON bot_audit(ts)")
+        conn.commit()
+        logger.info("Созданы таблицы агрегатов для retention")
+
+    def _migrate_create_history_data_version(self, conn):
+        """Create the one-row ``history_data_version`` stamp and the triggers that bump it.
+
+        The stamp is a random token rather than a counter, so a restored
+        backup or a fresh database can never reproduce a stamp some process
+        already cached different data under.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS history_data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                stamp TEXT NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO history_data_version(id, stamp) VALUES (1, lower(hex(randomblob(8))))")
+        self._create_history_version_triggers(conn)
+        conn.commit()
+        logger.info("Создана таблица history_data_version")
+
+    # table -> events that change what the history endpoints return
+    # Таблицы, влияющие на историю полива; для UPDATE — столбцы, изменение которых
+    # меняет выдачу (None — любой UPDATE). Смена state у зоны штамп не трогает.
+    _HISTORY_VERSION_SOURCES = {
+        "zone_runs": ("zone_id", "group_id", "start_utc", "end_utc", "total_liters", "status", "source"),
+        "zone_runs_daily": None,
+        "programs": None,
+        "zones": ("name", "duration", "group_id"),
+    }
+
+    @staticmethod
+    def _create_history_version_triggers(conn):
+        bump = "BEGIN UPDATE history_data_version SET stamp = lower(hex(randomblob(8))) WHERE id = 1; END"
+        for table, columns in MigrationRunner._HISTORY_VERSION_SOURCES.items():
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                continue
+            if columns:
+                present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                columns = [c for c in columns if c in present]
+            when = f"WHEN {' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in columns)}" if columns else ""
+            for event, clause in (("insert", ""), ("delete", ""), ("update", when)):
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_history_version_{table}_{event} "
+                    f"AFTER {event.upper()} ON {table} {clause} {bump}"
+                )
+
+    def _migrate_create_secrets_version(self, conn):
+        """Create the one-row ``secrets_version`` stamp; see :mod:`db.secrets`."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS secrets_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                stamp TEXT NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO secrets_version(id, stamp) VALUES (1, lower(hex(randomblob(8))))")
+        self._create_secrets_version_triggers(conn)
+        conn.commit()
+        logger.info("Создана таблица secrets_version")
+
+    # table -> WHEN-условие (NEW/OLD) для строк, хранящих секреты
+    _SECRETS_VERSION_SOURCES = {
+        "mqtt_servers": {"insert": "", "update": "", "delete": ""},
+        "settings": {
+            "insert": "WHEN NEW.key LIKE '%\\_encrypted' ESCAPE '\\'",
+            "update": "WHEN NEW.key LIKE '%\\_encrypted' ESCAPE '\\' OR OLD.key LIKE '%\\_encrypted' ESCAPE '\\'",
+            "delete": "WHEN OLD.key LIKE '%\\_encrypted' ESCAPE '\\'",
+        },
+    }
+
+    @staticmethod
+    def _create_secrets_version_triggers(conn):
+        bump = "BEGIN UPDATE secrets_version SET stamp = lower(hex(randomblob(8))) WHERE id = 1; END"
+        for table, events in MigrationRunner._SECRETS_VERSION_SOURCES.items():
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                continue
+            for event, when in events.items():
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_secrets_version_{table}_{event} "
+                    f"AFTER {event.upper()} ON {table} {when} {bump}"
+                )
+
     def _backfill_zone_runs_source(self, conn):
         """Issue #35: backfill source on pre-existing zone_runs.
 
@@ -1503,6 +1725,11 @@ class MigrationRunner:
         "create_audit_log": "_down_create_audit_log",
         "zone_runs_add_source": "_down_add_zone_runs_source",
         "zone_runs_backfill_source": "_down_backfill_zone_runs_source",
+        "create_zone_last_run": "_down_create_zone_last_run",
+        "create_retention_rollups": "_down_create_retention_rollups",
+        "create_history_data_version": "_down_create_history_data_version",
+        "create_secrets_version": "_down_create_secrets_version",
+        "weather_create_history_daily": "_down_create_weather_history_daily",
     }
 
     def _down_add_zone_runs_source(self, conn):
@@ -1531,6 +1758,36 @@ class MigrationRunner:
         conn.commit()
         logger.info("Downgrade: удалена таблица audit_log")
 
+    def _down_create_zone_last_run(self, conn):
+        for trigger in ("trg_zone_last_run_ins", "trg_zone_last_run_upd", "trg_zone_last_run_del"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DROP TABLE IF EXISTS zone_last_run")
+        conn.commit()
+        logger.info("Downgrade: удалена таблица zone_last_run")
+
+    def _down_create_retention_rollups(self, conn):
+        for table in ("zone_runs_daily", "zone_runs_monthly", "water_usage_daily", "water_usage_monthly"):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute("DROP INDEX IF EXISTS idx_bot_audit_ts")
+        conn.commit()
+        logger.info("Downgrade: удалены таблицы агрегатов retention")
+
+    def _down_create_history_data_version(self, conn):
+        for table in self._HISTORY_VERSION_SOURCES:
+            for event in ("insert", "delete", "update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_history_version_{table}_{event}")
+        conn.execute("DROP TABLE IF EXISTS history_data_version")
+        conn.commit()
+        logger.info("Downgrade: удалена таблица history_data_version")
+
+    def _down_create_secrets_version(self, conn):
+        for table, events in self._SECRETS_VERSION_SOURCES.items():
+            for event in events:
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_secrets_version_{table}_{event}")
+        conn.execute("DROP TABLE IF EXISTS secrets_version")
+        conn.commit()
+        logger.info("Downgrade: удалена таблица secrets_version")
+
     def _down_create_bot_users(self, conn):
         conn.execute("DROP TABLE IF EXISTS bot_users")
         conn.commit()
@@ -1581,6 +1838,11 @@ class MigrationRunner:
         conn.commit()
         logger.info("Downgrade: удалена таблица weather_cache")
 
+    def _down_create_weather_history_daily(self, conn):
+        conn.execute("DROP TABLE IF EXISTS weather_history_daily")
+        conn.commit()
+        logger.info("Downgrade: удалена таблица weather_history_daily")
+
     def _down_create_weather_log(self, conn):
         conn.execute("DROP TABLE IF EXISTS weather_log")
         conn.commit()
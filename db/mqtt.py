@@ -2,6 +2,7 @@ import logging
 import sqlite3
 from typing import Any
 
+from db import secrets
 from db.base import BaseRepository, retry_on_busy
 from utils import decrypt_secret, encrypt_secret
 
@@ -30,6 +31,10 @@ class MqttRepository(BaseRepository):
             return []
 
     def get_mqtt_server(self, server_id: int) -> dict[str, Any] | None:
+        """Server by id with the password decrypted; served from the secrets snapshot (db/secrets.py)."""
+        return secrets.snapshot(self.db_path).get(int(server_id), self._load_mqtt_server)
+
+    def _load_mqtt_server(self, server_id: int) -> dict[str, Any] | None:
         try:
             with self._connect() as conn:
                 conn.row_factory = sqlite3.Row
@@ -44,6 +49,9 @@ class MqttRepository(BaseRepository):
     def create_mqtt_server(self, data: dict[str, Any]) -> dict[str, Any] | None:
         try:
             raw_password = data.get("password")
+            if raw_password:
+                # ключ мог смениться в другом воркере
+                secrets.snapshot(self.db_path).refresh()
             enc_password = ("ENC:" + encrypt_secret(raw_password)) if raw_password else raw_password
             with self._connect() as conn:
                 cur = conn.execute(
@@ -70,7 +78,8 @@ class MqttRepository(BaseRepository):
                 )
                 server_id = cur.lastrowid
                 conn.commit()
-                return self.get_mqtt_server(server_id)
+            secrets.invalidate(self.db_path)
+            return self.get_mqtt_server(server_id)
         except sqlite3.Error as e:
             logger.error("Ошибка создания MQTT сервера: %s", e)
             return None
@@ -79,6 +88,9 @@ class MqttRepository(BaseRepository):
     def update_mqtt_server(self, server_id: int, data: dict[str, Any]) -> bool:
         try:
             raw_password = data.get("password")
+            if raw_password:
+                # ключ мог смениться в другом воркере
+                secrets.snapshot(self.db_path).refresh()
             enc_password = ("ENC:" + encrypt_secret(raw_password)) if raw_password else raw_password
             with self._connect() as conn:
                 conn.execute(
@@ -107,7 +119,8 @@ class MqttRepository(BaseRepository):
                     ),
                 )
                 conn.commit()
-                return True
+            secrets.invalidate(self.db_path)
+            return True
         except sqlite3.Error as e:
             logger.error("Ошибка обновления MQTT сервера %s: %s", server_id, e)
             return False
@@ -118,7 +131,8 @@ class MqttRepository(BaseRepository):
             with self._connect() as conn:
                 conn.execute("DELETE FROM mqtt_servers WHERE id = ?", (server_id,))
                 conn.commit()
-                return True
+            secrets.invalidate(self.db_path)
+            return True
         except sqlite3.Error as e:
             logger.error("Ошибка удаления MQTT сервера %s: %s", server_id, e)
             return False
@@ -17,16 +17,7 @@ class ProgramRepository(BaseRepository):
             with self._connect() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("SELECT * FROM programs ORDER BY id")
-                programs = []
-                for row in cursor.fetchall():
-                    program = dict(row)
-                    program["days"] = [int(d) for d in json.loads(program["days"])]
-                    program["zones"] = json.loads(program["zones"])
-                    # v2 fields
-                    program["extra_times"] = json.loads(program.get("extra_times", "[]"))
-                    program["enabled"] = bool(program.get("enabled", 1))
-                    programs.append(program)
-                return programs
+                return [self._parse_program_row(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error("Ошибка получения программ: %s", e)
             return []
@@ -38,15 +29,7 @@ class ProgramRepository(BaseRepository):
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("SELECT * FROM programs WHERE id = ?", (program_id,))
                 row = cursor.fetchone()
-                if row:
-                    program = dict(row)
-                    program["days"] = [int(d) for d in json.loads(program["days"])]
-                    program["zones"] = json.loads(program["zones"])
-                    # v2 fields
-                    program["extra_times"] = json.loads(program.get("extra_times", "[]"))
-                    program["enabled"] = bool(program.get("enabled", 1))
-                    return program
-                return None
+                return self._parse_program_row(row) if row else None
         except sqlite3.Error as e:
             logger.error("Ошибка получения программы %s: %s", program_id, e)
             return None
@@ -188,6 +171,60 @@ class ProgramRepository(BaseRepository):
             logger.error("Ошибка дублирования программы %s: %s", program_id, e)
             return None
 
+    # === Conflicts (services.program_conflicts engine) ===
+    def _load_conflict_engine(
+        self,
+        conn: sqlite3.Connection,
+        weather_factor: int = 100,
+        zone_durations: dict[int, int] | None = None,
+    ) -> tuple[Any, dict[int, str]]:
+        """Build a ConflictEngine over all programs; returns (engine, group names)."""
+        from services.program_conflicts import ConflictEngine
+
+        conn.row_factory = sqlite3.Row
+        programs = [self._parse_program_row(row) for row in conn.execute("SELECT * FROM programs ORDER BY id")]
+        zones = [dict(row) for row in conn.execute("SELECT id, duration, group_id FROM zones")]
+        if zone_durations:
+            for z in zones:
+                if int(z["id"]) in zone_durations:
+                    z["duration"] = int(zone_durations[int(z["id"])])
+        group_names: dict[int, str] = {}
+        try:
+            group_names = {int(r["id"]): str(r["name"]) for r in conn.execute("SELECT id, name FROM groups")}
+        except sqlite3.Error as e:
+            logger.debug("conflict engine group names: %s", e)
+        # Как IrrigationScheduler._program_parallel_limit: группы идут параллельно
+        # только при program_max_parallel_groups > 1 и заданном бюджете насоса.
+        parallel = (self._setting_int(conn, "program_max_parallel_groups") or 1) > 1
+        budget = self._setting_float(conn, "program_flow_budget_lpm") or 0.0
+        sequential = not (parallel and budget > 0)
+        engine = ConflictEngine(programs, zones, weather_factor=weather_factor, sequential_groups=sequential)
+        return engine, group_names
+
+    @staticmethod
+    def _setting_int(conn: sqlite3.Connection, key: str) -> int | None:
+        value = ProgramRepository._setting_float(conn, key)
+        return int(value) if value is not None else None
+
+    @staticmethod
+    def _setting_float(conn: sqlite3.Connection, key: str) -> float | None:
+        try:
+            row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+            return float(row[0]) if row and row[0] not in (None, "") else None
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            logger.debug("settings[%s] read failed: %s", key, e)
+            return None
+
+    @staticmethod
+    def _parse_program_row(row: sqlite3.Row) -> dict[str, Any]:
+        """Row → program dict: JSON columns decoded, v2 fields defaulted."""
+        program = dict(row)
+        program["days"] = [int(d) for d in json.loads(program.get("days") or "[]")]
+        program["zones"] = json.loads(program.get("zones") or "[]")
+        program["extra_times"] = json.loads(program.get("extra_times") or "[]")
+        program["enabled"] = bool(program.get("enabled", 1))
+        return program
+
     def check_program_conflicts(
         self,
         program_id: int | None = None,
@@ -196,9 +233,14 @@ class ProgramRepository(BaseRepository):
         days: list[str] | None = None,
         weather_factor: int | None = None,
         include_weather: bool = False,
+        schedule: dict[str, Any] | None = None,
     ) -> Any:
         """Проверка пересечения программ полива.
 
+        ``schedule`` — optional v2 schedule fields of the candidate
+        (``schedule_type``, ``interval_days``, ``even_odd``, ``extra_times``);
+        without it the candidate is a weekdays program.
+
         Extended v2 API (when weather_factor or include_weather is used):
             Returns dict {"has_conflicts": bool, "conflicts": [...], "current_weather_coefficient": int}
             Each conflict has "level": "error" (base overlap) or "warning" (only with weather).
@@ -209,235 +251,166 @@ class ProgramRepository(BaseRepository):
         # Determine if caller wants the v2 dict response
         _v2 = weather_factor is not None or include_weather
 
+        # Get current weather coefficient
+        current_coeff = 100
         try:
-            with self._connect() as conn:
-                conn.row_factory = sqlite3.Row
-
-                query = "SELECT id, name, time, days, zones FROM programs"
-                if program_id:
-                    query += " WHERE id != ?"
-                    cursor = conn.execute(query, (program_id,))
-                else:
-                    cursor = conn.execute(query)
-
-                programs = cursor.fetchall()
-
-                # Get current weather coefficient
-                current_coeff = 100
-                try:
-                    from services.weather_adjustment import get_weather_adjustment
-
-                    wa = get_weather_adjustment(self.db_path)
-                    if wa and wa.is_enabled():
-                        current_coeff = wa.get_coefficient()
-                except Exception:
-                    pass
+            from services.weather_adjustment import get_weather_adjustment
+
+            wa = get_weather_adjustment(self.db_path)
+            if wa and wa.is_enabled():
+                current_coeff = wa.get_coefficient()
+        except Exception:
+            pass
+        empty_v2 = {"has_conflicts": False, "conflicts": [], "current_weather_coefficient": current_coeff}
+
+        candidate: dict[str, Any] = dict(schedule or {})
+        candidate.update({"id": program_id, "time": time, "zones": list(zones or []), "days": days or []})
+        candidate.setdefault("schedule_type", "weekdays")
+        if not time or not candidate["zones"]:
+            return empty_v2 if _v2 else []
+        if candidate["schedule_type"] == "weekdays" and not candidate["days"]:
+            return empty_v2 if _v2 else []
+        try:
+            candidate["days"] = [int(d) for d in candidate["days"]]
+            _hh, _mm = map(int, str(time).split(":"))
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.debug("check_conflicts candidate parse: %s", e)
+            return empty_v2 if _v2 else []
 
-                # Resolve effective weather_factor
+        try:
+            with self._connect() as conn:
                 if include_weather and weather_factor is None:
                     # Use max_weather_coefficient from settings
-                    try:
-                        cur = conn.execute("SELECT value FROM settings WHERE key = 'max_weather_coefficient'")
-                        row = cur.fetchone()
-                        if row and row["value"]:
-                            weather_factor = int(row["value"])
-                    except (sqlite3.Error, ValueError, TypeError):
-                        pass
-
-                empty_v2 = {
-                    "has_conflicts": False,
-                    "conflicts": [],
-                    "current_weather_coefficient": current_coeff,
+                    weather_factor = self._setting_int(conn, "max_weather_coefficient")
+                wf = max(100, int(weather_factor or 100)) if _v2 else 100
+                engine, group_names = self._load_conflict_engine(conn, weather_factor=wf)
+        except sqlite3.Error as e:
+            logger.error("Ошибка проверки пересечения программ: %s", e)
+            return {**empty_v2, "current_weather_coefficient": 100} if _v2 else []
+
+        found = engine.check(candidate, exclude_id=program_id)
+        if _v2:
+            conflicts_v2 = []
+            for c in found:
+                name = engine.programs[c.other_program_id].get("name", "")
+                error = c.level == "error"
+                conflicts_v2.append(
+                    {
+                        "program_id": c.other_program_id,
+                        "program_name": name,
+                        "level": c.level,
+                        "overlap_minutes": round(c.overlap_minutes, 1),
+                        "weather_factor": 100 if error else wf,
+                        "group_id": c.group_id,
+                        "group_name": group_names.get(c.group_id, ""),
+                        "message": (
+                            f'Конфликт при базовой длительности с программой "{name}"'
+                            if error
+                            else f'Конфликт при погодном коэфф. {wf}% с программой "{name}"'
+                        ),
+                    }
+                )
+            return {
+                "has_conflicts": len(conflicts_v2) > 0,
+                "conflicts": conflicts_v2,
+                "current_weather_coefficient": current_coeff,
+            }
+
+        # Legacy: one entry per conflicting program
+        by_program: dict[int, list] = {}
+        for c in found:
+            by_program.setdefault(c.other_program_id, []).append(c)
+        conflicts_legacy = []
+        for pid, items in by_program.items():
+            other = engine.programs[pid]
+            first = min(items, key=lambda c: c.first_start)
+            overlap_start = first.first_start.hour * 60 + first.first_start.minute
+            conflicts_legacy.append(
+                {
+                    "program_id": pid,
+                    "program_name": other.get("name", ""),
+                    "program_time": other.get("time"),
+                    "program_duration": sum(engine.durations.get(int(z), 0) for z in other.get("zones") or []),
+                    "common_zones": sorted(set(candidate["zones"]) & set(other.get("zones") or [])),
+                    "common_groups": sorted({c.group_id for c in items}),
+                    "common_days": sorted(set().union(*(c.days for c in items))),
+                    "overlap_start": overlap_start,
+                    "overlap_end": overlap_start + round(max(c.overlap_minutes for c in items)),
                 }
+            )
+        return conflicts_legacy
 
-                if not time or zones is None or not days:
-                    return empty_v2 if _v2 else []
-                if len(zones) == 0:
-                    return empty_v2 if _v2 else []
+    def check_zone_duration_conflicts(self, changes: list[tuple[int, int]]) -> dict[int, list[dict[str, Any]]]:
+        """Conflicts every program containing a zone would get if that zone's duration changed.
 
-                try:
-                    program_hour, program_minute = map(int, time.split(":"))
-                    program_minutes = program_hour * 60 + program_minute
-                except (ValueError, AttributeError) as e:
-                    logger.debug("check_conflicts time parse: %s", e)
-                    return empty_v2 if _v2 else []
-
-                try:
-                    norm_days = [int(d) for d in days]
-                except (TypeError, ValueError) as e:
-                    logger.debug("check_conflicts days parse: %s", e)
-                    norm_days = days
-
-                # Cache durations and groups
-                durations_cache = {}  # type: Dict[int, int]
-                groups_cache = {}  # type: Dict[int, int]
-                group_names_cache = {}  # type: Dict[int, str]
-                try:
-                    curz = conn.execute("SELECT id, duration, group_id FROM zones")
-                    for zid, dur, gid in curz.fetchall():
-                        durations_cache[int(zid)] = int(dur or 0)
-                        groups_cache[int(zid)] = int(gid or 0)
-                except sqlite3.Error:
-                    logger.debug("Не удалось загрузить кеш зон для проверки конфликтов")
-
-                try:
-                    curg = conn.execute("SELECT id, name FROM groups")
-                    for gid, gname in curg.fetchall():
-                        group_names_cache[int(gid)] = str(gname)
-                except sqlite3.Error:
-                    pass
-
-                def _get_dur(zid):
-                    # type: (int) -> int
-                    try:
-                        return int(durations_cache.get(int(zid), 0))
-                    except (TypeError, ValueError) as e:
-                        logger.debug("_get_dur parse for zone %s: %s", zid, e)
-                        return 0
-
-                def _get_gid(zid):
-                    # type: (int) -> int
-                    try:
-                        return int(groups_cache.get(int(zid), 0))
-                    except (TypeError, ValueError) as e:
-                        logger.debug("_get_gid parse for zone %s: %s", zid, e)
-                        return 0
-
-                # --- Group-based duration calculation ---
-                # Within the same group zones run sequentially; different groups run in parallel.
-                def _group_total_duration(zone_ids, factor=100):
-                    """Calculate total sequential duration per group, return max across groups."""
-                    by_group = {}  # type: Dict[int, float]
-                    for zid in zone_ids:
-                        gid = _get_gid(int(zid))
-                        dur = _get_dur(int(zid)) * factor / 100.0
-                        by_group[gid] = by_group.get(gid, 0) + dur
-                    return by_group
-
-                new_groups = _group_total_duration(zones, 100)
-                total_duration = sum(_get_dur(int(zone_id)) for zone_id in zones)
-                program_end_minutes = program_minutes + total_duration
-
-                conflicts_v2 = []
-                conflicts_legacy = []
-
-                for program in programs:
-                    program_data = dict(program)
-                    program_data["days"] = json.loads(program_data["days"])
-                    program_data["zones"] = json.loads(program_data["zones"])
-
-                    common_days = set(norm_days) & set(program_data["days"])
-                    if not common_days:
-                        continue
-
-                    # Check group overlap (same group = sequential = potential conflict)
-                    common_zones = set(zones) & set(program_data["zones"])
-                    zones_groups = {_get_gid(int(zid)) for zid in zones}
-                    existing_zones_groups = {_get_gid(int(zid)) for zid in program_data["zones"]}
-                    common_groups = zones_groups & existing_zones_groups
-
-                    if not common_zones and not common_groups:
-                        continue
-
-                    try:
-                        existing_hour, existing_minute = map(int, program_data["time"].split(":"))
-                        existing_minutes = existing_hour * 60 + existing_minute
-                    except (ValueError, AttributeError) as e:
-                        logger.debug("check_conflicts existing time parse: %s", e)
-                        continue
-
-                    existing_total_duration = sum(_get_dur(int(zid)) for zid in program_data["zones"])
-                    existing_end_minutes = existing_minutes + existing_total_duration
-
-                    # --- v2: check at base and weather factor ---
-                    if _v2 and weather_factor is not None:
-                        # Check per common group
-                        for gid in common_groups:
-                            # Existing program duration for this group
-                            ex_group_dur = sum(
-                                _get_dur(int(zid)) for zid in program_data["zones"] if _get_gid(int(zid)) == gid
-                            )
-                            # Base overlap check
-                            ex_end_base = existing_minutes + ex_group_dur
-                            base_overlap = program_minutes < ex_end_base and program_end_minutes > existing_minutes
-
-                            # Weather overlap check
-                            wf = max(100, weather_factor)
-                            ex_dur_weather = ex_group_dur * wf / 100.0
-                            ex_end_weather = existing_minutes + ex_dur_weather
-                            weather_overlap = (
-                                program_minutes < ex_end_weather and program_end_minutes > existing_minutes
-                            )
-
-                            if base_overlap:
-                                overlap_mins = min(ex_end_base, program_end_minutes) - max(
-                                    program_minutes, existing_minutes
-                                )
-                                conflicts_v2.append(
-                                    {
-                                        "program_id": program_data["id"],
-                                        "program_name": program_data["name"],
-                                        "level": "error",
-                                        "overlap_minutes": round(overlap_mins, 1),
-                                        "weather_factor": 100,
-                                        "group_id": gid,
-                                        "group_name": group_names_cache.get(gid, ""),
-                                        "message": 'Конфликт при базовой длительности с программой "{}"'.format(
-                                            program_data["name"]
-                                        ),
-                                    }
-                                )
-                            elif weather_overlap:
-                                overlap_mins = min(ex_end_weather, program_end_minutes) - max(
-                                    program_minutes, existing_minutes
-                                )
-                                conflicts_v2.append(
-                                    {
-                                        "program_id": program_data["id"],
-                                        "program_name": program_data["name"],
-                                        "level": "warning",
-                                        "overlap_minutes": round(overlap_mins, 1),
-                                        "weather_factor": wf,
-                                        "group_id": gid,
-                                        "group_name": group_names_cache.get(gid, ""),
-                                        "message": 'Конфликт при погодном коэфф. %d%% с программой "%s"'
-                                        % (wf, program_data["name"]),
-                                    }
-                                )
-                    else:
-                        # Legacy check
-                        if program_minutes < existing_end_minutes and program_end_minutes > existing_minutes:
-                            conflicts_legacy.append(
+        One engine per change (the new duration stretches every program with
+        the zone); returns ``{zone_id: [conflict, ...]}``.
+        """
+        results: dict[int, list[dict[str, Any]]] = {}
+        try:
+            with self._connect() as conn:
+                for zone_id, new_duration in changes:
+                    engine, _names = self._load_conflict_engine(conn, zone_durations={int(zone_id): int(new_duration)})
+                    conflicts = []
+                    for program in engine.programs.values():
+                        if int(zone_id) not in [int(z) for z in program["zones"]]:
+                            continue
+                        by_other: dict[int, list] = {}
+                        for c in engine.check(program, exclude_id=program["id"]):
+                            by_other.setdefault(c.other_program_id, []).append(c)
+                        for other_id, items in by_other.items():
+                            other = engine.programs[other_id]
+                            first = min(items, key=lambda c: c.first_start)
+                            start = first.first_start.hour * 60 + first.first_start.minute
+                            conflicts.append(
                                 {
-                                    "program_id": program_data["id"],
-                                    "program_name": program_data["name"],
-                                    "program_time": program_data["time"],
-                                    "program_duration": existing_total_duration,
-                                    "common_zones": list(common_zones),
-                                    "common_groups": list(common_groups),
-                                    "common_days": list(common_days),
-                                    "overlap_start": max(program_minutes, existing_minutes),
-                                    "overlap_end": min(program_end_minutes, existing_end_minutes),
+                                    "checked_program_id": program["id"],
+                                    "checked_program_name": program.get("name", ""),
+                                    "checked_program_time": program.get("time"),
+                                    "other_program_id": other_id,
+                                    "other_program_name": other.get("name", ""),
+                                    "other_program_time": other.get("time"),
+                                    "common_zones": sorted(set(program["zones"]) & set(other["zones"])),
+                                    "common_groups": sorted({c.group_id for c in items}),
+                                    "overlap_start": start,
+                                    "overlap_end": start + round(max(c.overlap_minutes for c in items)),
                                 }
                             )
+                    results[int(zone_id)] = conflicts
+        except sqlite3.Error as e:
+            logger.error("Ошибка проверки конфликтов длительности зон: %s", e)
+        return results
 
-                if _v2:
-                    return {
-                        "has_conflicts": len(conflicts_v2) > 0,
-                        "conflicts": conflicts_v2,
-                        "current_weather_coefficient": current_coeff,
-                    }
-                return conflicts_legacy
-
+    def program_conflicts_report(self, weather_factor: int | None = None) -> dict[str, Any]:
+        """All conflicts on the site (every pair of enabled programs, every schedule type)."""
+        try:
+            with self._connect() as conn:
+                if weather_factor is None:
+                    weather_factor = 100
+                wf = max(100, int(weather_factor))
+                engine, group_names = self._load_conflict_engine(conn, weather_factor=wf)
         except sqlite3.Error as e:
-            logger.error("Ошибка проверки пересечения программ: %s", e)
-            if _v2:
-                return {
-                    "has_conflicts": False,
-                    "conflicts": [],
-                    "current_weather_coefficient": 100,
+            logger.error("Ошибка отчёта о конфликтах программ: %s", e)
+            return {"programs": 0, "weather_factor": 100, "conflicts": []}
+        conflicts = []
+        for c in engine.site_report():
+            a, b = engine.programs[c.program_id], engine.programs[c.other_program_id]
+            conflicts.append(
+                {
+                    "program_id": c.program_id,
+                    "program_name": a.get("name", ""),
+                    "other_program_id": c.other_program_id,
+                    "other_program_name": b.get("name", ""),
+                    "group_id": c.group_id,
+                    "group_name": group_names.get(c.group_id, ""),
+                    "level": c.level,
+                    "overlap_minutes": round(c.overlap_minutes, 1),
+                    "first_overlap": c.first_start.isoformat(timespec="minutes"),
+                    "occurrences": c.occurrences,
+                    "days": sorted(c.days),
                 }
-            return []
+            )
+        return {"programs": len(engine.programs), "weather_factor": wf, "conflicts": conflicts}
 
     # === Program cancellations (per date) ===
     @retry_on_busy()
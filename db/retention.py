@@ -0,0 +1,391 @@
+"""Tiered retention for the append-only tables.
+
+Each :class:`RetentionPolicy` keeps ``keep_days`` of raw rows. Older rows are
+deleted in short batches (one small write transaction per batch, with a pause
+in between) so the nightly pass never holds the write lock long enough to
+delay a zone command. Tables with a rollup tier are folded into it inside the
+same transaction as the delete, so every row is counted exactly once across
+raw + daily + monthly:
+
+    zone_runs   -> zone_runs_daily   -> zone_runs_monthly
+    water_usage -> water_usage_daily -> water_usage_monthly
+
+Readers (``LogRepository.get_water_statistics``, the zone history API) add
+the rollup tiers to the raw rows, so shortening a policy does not change the
+totals they report. The zone_runs row referenced by ``zone_last_run`` is never
+deleted, otherwise the zone would lose its "last watering" time.
+
+Policies can be overridden through the ``retention.policies`` setting, a JSON
+object ``{"logs": 30, "zone_runs": {"keep_days": 200, "enabled": true}}``.
+
+After the purge, ``PRAGMA incremental_vacuum`` returns the freed pages to the
+filesystem in small steps; the report says how much space came back. Older
+databases still in auto_vacuum=NONE are switched once by hand, with the
+service stopped (the full ``VACUUM`` locks the whole file)::
+
+    python -m db.retention --db irrigation.db convert-vacuum
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from db.base import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+POLICIES_SETTING = "retention.policies"
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_PAUSE_SEC = 0.05
+DEFAULT_TIME_BUDGET_SEC = 300.0
+VACUUM_STEP_PAGES = 256
+# История зон читает до 30 дней, дневной уровень должен их покрывать
+MIN_DAILY_KEEP_DAYS = 62
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class RetentionError(Exception):
+    """A retention maintenance step cannot run."""
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    table: str
+    ts_column: str
+    keep_days: int
+    rollup: str | None = None
+    enabled: bool = True
+
+
+DEFAULT_POLICIES: tuple[RetentionPolicy, ...] = (
+    RetentionPolicy("zone_runs", "start_utc", 400, rollup="zone_runs_daily"),
+    RetentionPolicy("zone_runs_daily", "day", 730, rollup="zone_runs_monthly"),
+    RetentionPolicy("water_usage", "timestamp", 180, rollup="water_usage_daily"),
+    RetentionPolicy("water_usage_daily", "day", 730, rollup="water_usage_monthly"),
+    RetentionPolicy("logs", "timestamp", 90),
+    RetentionPolicy("weather_log", "created_at", 90),
+    # /api/weather/decisions читает не дальше 90 дней
+    RetentionPolicy("weather_decisions", "created_at", 90),
+    RetentionPolicy("weather_balance_log", "created_at", 365),
+    RetentionPolicy("bot_audit", "ts", 180),
+)
+
+# Candidate filter per table (beyond the age cut-off)
+_EXTRA_WHERE = {
+    # открытые прогоны не трогаем; строку, на которую ссылается zone_last_run, сохраняем
+    "zone_runs": (
+        "end_utc IS NOT NULL AND start_utc IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM zone_last_run l WHERE l.zone_id = zone_runs.zone_id AND l.end_utc = zone_runs.end_utc)"
+    ),
+}
+
+_RUN_TIER_UPSERT = (
+    "ON CONFLICT({key}) DO UPDATE SET runs = runs + excluded.runs, "
+    "failed_runs = failed_runs + excluded.failed_runs, minutes = minutes + excluded.minutes, "
+    "liters = CASE WHEN excluded.liters IS NULL THEN liters ELSE IFNULL(liters, 0) + excluded.liters END, "
+    "liters_missing = liters_missing + excluded.liters_missing"
+)
+
+# rollup table -> INSERT ... SELECT over the batch (``{ids}`` = rowid placeholders)
+_ROLLUP_SQL = {
+    "zone_runs_daily": (
+        "INSERT INTO zone_runs_daily(zone_id, day, runs, failed_runs, minutes, liters, liters_missing) "
+        "SELECT zone_id, date(start_utc, 'localtime'), "
+        "SUM(status IS NOT 'failed'), SUM(status IS 'failed'), "
+        "SUM(CASE WHEN status IS 'failed' THEN 0 "
+        "ELSE MAX(0, CAST(ROUND((julianday(end_utc) - julianday(start_utc)) * 1440) AS INTEGER)) END), "
+        "SUM(total_liters), SUM(total_liters IS NULL) "
+        "FROM zone_runs WHERE rowid IN ({ids}) GROUP BY 1, 2 " + _RUN_TIER_UPSERT.format(key="zone_id, day")
+    ),
+    "zone_runs_monthly": (
+        "INSERT INTO zone_runs_monthly(zone_id, month, runs, failed_runs, minutes, liters, liters_missing) "
+        "SELECT zone_id, substr(day, 1, 7), SUM(runs), SUM(failed_runs), SUM(minutes), SUM(liters), "
+        "SUM(liters_missing) FROM zone_runs_daily WHERE rowid IN ({ids}) GROUP BY 1, 2 "
+        + _RUN_TIER_UPSERT.format(key="zone_id, month")
+    ),
+    "water_usage_daily": (
+        "INSERT INTO water_usage_daily(zone_id, day, liters) "
+        "SELECT IFNULL(zone_id, 0), date(timestamp), SUM(IFNULL(liters, 0)) "
+        "FROM water_usage WHERE rowid IN ({ids}) GROUP BY 1, 2 "
+        "ON CONFLICT(zone_id, day) DO UPDATE SET liters = liters + excluded.liters"
+    ),
+    "water_usage_monthly": (
+        "INSERT INTO water_usage_monthly(zone_id, month, liters, days) "
+        "SELECT zone_id, substr(day, 1, 7), SUM(liters), COUNT(*) "
+        "FROM water_usage_daily WHERE rowid IN ({ids}) GROUP BY 1, 2 "
+        "ON CONFLICT(zone_id, month) DO UPDATE SET liters = liters + excluded.liters, days = days + excluded.days"
+    ),
+}
+
+
+def delete_in_batches(
+    connect: Callable[[], sqlite3.Connection],
+    table: str,
+    where: str,
+    params: tuple = (),
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pause: float = DEFAULT_BATCH_PAUSE_SEC,
+    rollup_sql: str | None = None,
+    deadline: float | None = None,
+) -> dict[str, int]:
+    """Delete ``table`` rows matching ``where`` a batch at a time.
+
+    Every batch is its own short transaction: pick up to ``batch_size``
+    rowids, fold them into the rollup tier (if any), delete them, commit.
+    Stops early once ``deadline`` (``time.monotonic()``) has passed.
+    """
+    deleted = batches = 0
+    select = f"SELECT rowid FROM {table} WHERE {where} ORDER BY rowid LIMIT ?"
+    while True:
+        with connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [r[0] for r in conn.execute(select, (*params, int(batch_size))).fetchall()]
+            if not ids:
+                conn.rollback()
+                break
+            marks = ",".join("?" * len(ids))
+            if rollup_sql:
+                conn.execute(rollup_sql.format(ids=marks), ids)
+            conn.execute(f"DELETE FROM {table} WHERE rowid IN ({marks})", ids)
+            conn.commit()
+        deleted += len(ids)
+        batches += 1
+        if len(ids) < batch_size or (deadline is not None and time.monotonic() >= deadline):
+            break
+        if pause:
+            time.sleep(pause)
+    return {"deleted": deleted, "batches": batches}
+
+
+class RetentionRepository(BaseRepository):
+    """Retention policies, batched purge with rollups, incremental vacuum."""
+
+    def get_policies(self) -> list[RetentionPolicy]:
+        """Default policies with the ``retention.policies`` overrides applied."""
+        overrides: dict[str, Any] = {}
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM settings WHERE key = ?", (POLICIES_SETTING,)).fetchone()
+            if row and row[0]:
+                overrides = json.loads(row[0])
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            logger.warning("retention: ignoring invalid %s: %s", POLICIES_SETTING, e)
+        policies = []
+        for policy in DEFAULT_POLICIES:
+            ov = overrides.get(policy.table) if isinstance(overrides, dict) else None
+            try:
+                if isinstance(ov, dict):
+                    policy = replace(
+                        policy,
+                        keep_days=int(ov.get("keep_days", policy.keep_days)),
+                        enabled=bool(ov.get("enabled", policy.enabled)),
+                    )
+                elif ov is not None:
+                    policy = replace(policy, keep_days=int(ov))
+            except (TypeError, ValueError) as e:
+                logger.warning("retention: bad override for %s: %s", policy.table, e)
+            floor = MIN_DAILY_KEEP_DAYS if policy.table.endswith("_daily") else 1
+            policies.append(replace(policy, keep_days=max(floor, policy.keep_days)))
+        return policies
+
+    def purge(
+        self,
+        policy: RetentionPolicy,
+        today: date | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        pause: float = DEFAULT_BATCH_PAUSE_SEC,
+        deadline: float | None = None,
+    ) -> dict[str, Any]:
+        """Apply one policy; rows dated before ``today - keep_days`` (whole UTC days) go."""
+        cutoff = ((today or datetime.now(UTC).date()) - timedelta(days=policy.keep_days)).isoformat()
+        where = f"{policy.ts_column} < ?"
+        if policy.table in _EXTRA_WHERE:
+            where += f" AND {_EXTRA_WHERE[policy.table]}"
+        stats = delete_in_batches(
+            self._connect,
+            policy.table,
+            where,
+            (cutoff,),
+            batch_size=batch_size,
+            pause=pause,
+            rollup_sql=_ROLLUP_SQL.get(policy.rollup or ""),
+            deadline=deadline,
+        )
+        if stats["deleted"]:
+            logger.info(
+                "retention: %s — %d rows before %s removed%s",
+                policy.table,
+                stats["deleted"],
+                cutoff,
+                f" (rolled up into {policy.rollup})" if policy.rollup else "",
+            )
+        return {"table": policy.table, "cutoff": cutoff, "rollup": policy.rollup, **stats}
+
+    def incremental_vacuum(self, step_pages: int = VACUUM_STEP_PAGES) -> dict[str, Any]:
+        """Return free pages to the filesystem and report how much space came back.
+
+        Only ``PRAGMA incremental_vacuum`` in small steps, each its own short
+        transaction. A database created before auto_vacuum=INCREMENTAL was
+        set is left alone (``needs_conversion``): switching mode takes a full
+        ``VACUUM`` that holds the write lock for the whole rewrite, so it is a
+        maintenance step (:meth:`convert_to_incremental`, ``python -m
+        db.retention convert-vacuum``), never part of the nightly pass.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            page_size = int(conn.execute("PRAGMA page_size").fetchone()[0])
+            pages_before = int(conn.execute("PRAGMA page_count").fetchone()[0])
+            freelist_before = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+            mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+            if mode == 2:
+                # маленькими шагами: каждый шаг — отдельная короткая транзакция
+                free = freelist_before
+                while free > 0:
+                    conn.execute(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+                    left = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+                    if left >= free:
+                        break
+                    free = left
+                # файл укорачивается при checkpoint
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            else:
+                logger.info(
+                    "retention: auto_vacuum is not INCREMENTAL, free pages stay in the file; "
+                    "run `python -m db.retention convert-vacuum` during maintenance"
+                )
+            pages_after = int(conn.execute("PRAGMA page_count").fetchone()[0])
+            return {
+                "auto_vacuum": _AUTO_VACUUM_MODES.get(mode, str(mode)),
+                "needs_conversion": mode != 2,
+                "page_size": page_size,
+                "freelist_before": freelist_before,
+                "freelist_after": int(conn.execute("PRAGMA freelist_count").fetchone()[0]),
+                "reclaimed_bytes": max(0, pages_before - pages_after) * page_size,
+                "size_bytes": pages_after * page_size,
+            }
+        finally:
+            conn.close()
+
+    def convert_to_incremental(self) -> dict[str, Any]:
+        """One-off switch to auto_vacuum=INCREMENTAL (full ``VACUUM``; run with the service stopped).
+
+        Raises :class:`RetentionError` when the filesystem has no room for the
+        temporary copy. A database that is already incremental is left as is.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+            page_size = int(conn.execute("PRAGMA page_size").fetchone()[0])
+            pages_before = int(conn.execute("PRAGMA page_count").fetchone()[0])
+            if mode == 2:
+                return {"auto_vacuum": "incremental", "converted": False, "size_bytes": pages_before * page_size}
+            if not self._room_for_vacuum(pages_before * page_size):
+                raise RetentionError("not enough free disk space for VACUUM (needs twice the database size)")
+            started = time.monotonic()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+            pages_after = int(conn.execute("PRAGMA page_count").fetchone()[0])
+            logger.info("retention: database switched to auto_vacuum=INCREMENTAL")
+            return {
+                "auto_vacuum": _AUTO_VACUUM_MODES.get(mode, str(mode)),
+                "converted": mode == 2,
+                "reclaimed_bytes": max(0, pages_before - pages_after) * page_size,
+                "size_bytes": pages_after * page_size,
+                "duration_sec": round(time.monotonic() - started, 3),
+            }
+        finally:
+            conn.close()
+
+    def _room_for_vacuum(self, db_bytes: int) -> bool:
+        try:
+            free = shutil.disk_usage(os.path.dirname(os.path.abspath(self.db_path)) or ".").free
+        except OSError as e:
+            logger.debug("retention: disk usage unavailable: %s", e)
+            return False
+        return free > 2 * db_bytes
+
+    def run(
+        self,
+        today: date | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        pause: float = DEFAULT_BATCH_PAUSE_SEC,
+        time_budget: float = DEFAULT_TIME_BUDGET_SEC,
+        vacuum: bool = True,
+    ) -> dict[str, Any]:
+        """Run every enabled policy within ``time_budget`` seconds, then vacuum."""
+        started = time.monotonic()
+        deadline = started + time_budget
+        tables = []
+        for policy in self.get_policies():
+            if not policy.enabled:
+                continue
+            if time.monotonic() >= deadline:
+                logger.info("retention: time budget exhausted before %s", policy.table)
+                break
+            try:
+                tables.append(self.purge(policy, today, batch_size, pause, deadline))
+            except sqlite3.Error as e:
+                # например, таблица ещё не создана миграцией
+                logger.warning("retention: %s skipped: %s", policy.table, e)
+                tables.append({"table": policy.table, "error": str(e), "deleted": 0, "batches": 0})
+        report: dict[str, Any] = {
+            "tables": tables,
+            "deleted": sum(t["deleted"] for t in tables),
+        }
+        if vacuum:
+            try:
+                report["vacuum"] = self.incremental_vacuum()
+            except sqlite3.Error as e:
+                logger.warning("retention: incremental vacuum failed: %s", e)
+                report["vacuum"] = {"error": str(e)}
+        report["duration_sec"] = round(time.monotonic() - started, 3)
+        return report
+
+    def get_zone_runs_daily(self, zone_ids: list[int], from_day: str, to_day: str) -> list[dict[str, Any]]:
+        """Rolled-up zone_runs days in ``[from_day, to_day]`` (local dates, inclusive)."""
+        if not zone_ids:
+            return []
+        marks = ",".join("?" * len(zone_ids))
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT zone_id, day, runs, failed_runs, minutes, liters, liters_missing "
+                    f"FROM zone_runs_daily WHERE zone_id IN ({marks}) AND day >= ? AND day <= ?",
+                    (*[int(z) for z in zone_ids], from_day, to_day),
+                ).fetchall()
+            return [dict(r) for r in rows]
+        except sqlite3.Error as e:
+            logger.debug("zone_runs_daily read failed: %s", e)
+            return []
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m db.retention", description="Irrigation database retention")
+    parser.add_argument("--db", default="irrigation.db", help="path to the SQLite database")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("convert-vacuum", help="one-off VACUUM to auto_vacuum=INCREMENTAL (stop the service first)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    try:
+        print(json.dumps(RetentionRepository(args.db).convert_to_incremental(), ensure_ascii=False))
+        return 0
+    except (RetentionError, sqlite3.Error) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
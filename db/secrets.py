@@ -0,0 +1,242 @@
+"""Secret material: in-memory decrypted MQTT server snapshot and online key rotation.
+
+``MqttRepository.get_mqtt_server`` runs on every relay command, and used to
+open a connection and AES-GCM-decrypt the password each time. Decrypted
+server rows are now kept in a per-process :class:`SecretSnapshot` (one per
+database file), so a lookup on the hot path is a dict access with no file
+I/O and no crypto. The key itself is loaded once per process by
+``utils._get_secret_key``.
+
+The snapshot is dropped
+
+  * right after ``create/update/delete_mqtt_server`` and a key rotation in
+    this process;
+  * when another worker changed the secrets: triggers on ``mqtt_servers``
+    and on the ``*_encrypted`` settings replace the stamp in the one-row
+    ``secrets_version`` table. The stamp is re-read at most every
+    ``RECHECK_SEC`` seconds; a change also makes the process re-read the key
+    files, so a rotation done by another worker is picked up.
+
+:meth:`SecretsRepository.rotate_key` re-encrypts every stored secret (MQTT
+passwords, ``*_encrypted`` settings) with a new key in one write transaction
+and swaps the key file before the commit. The replaced key stays in
+``.irrig_secret_key.prev`` and ``decrypt_secret`` falls back to it, so a crash
+between the file swap and the commit loses nothing.
+
+CLI::
+
+    python -m db.secrets rotate [--db irrigation.db]
+
+Hit/miss counters: :func:`snapshot_stats`, exported on ``/metrics``.
+"""
+
+import argparse
+import json
+import logging
+import secrets as _secrets
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import utils
+from db.base import BaseRepository
+
+logger = logging.getLogger(__name__)
+
+RECHECK_SEC = 2.0
+ENCRYPTED_PREFIX = "ENC:"
+ENCRYPTED_SETTING_PATTERN = "%\\_encrypted"
+
+_snapshots: dict[str, "SecretSnapshot"] = {}
+_snapshots_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "rotations": 0}
+
+
+class SecretsError(Exception):
+    """Key rotation could not be done."""
+
+
+def _read_stamp(db_path: str) -> str | None:
+    try:
+        conn = sqlite3.connect(db_path, timeout=5)
+        try:
+            row = conn.execute("SELECT stamp FROM secrets_version WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.debug("secrets_version недоступна: %s", e)
+        return None
+
+
+class SecretSnapshot:
+    """Decrypted MQTT server rows of one database, as of ``stamp``."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._servers: dict[int, dict[str, Any]] = {}
+        self._stamp: str | None = None
+        self._checked_at = float("-inf")
+
+    def _revalidate(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < RECHECK_SEC:
+            return
+        stamp = _read_stamp(self.db_path)
+        with self._lock:
+            self._checked_at = now
+            if stamp is not None and stamp == self._stamp:
+                return
+            if self._stamp is not None:
+                _stats["invalidations"] += 1
+                # Секреты менял другой процесс — возможно, с новым ключом
+                utils.reload_secret_key()
+            self._servers = {}
+            self._stamp = stamp
+
+    def get(self, server_id: int, load: Callable[[int], dict[str, Any] | None]) -> dict[str, Any] | None:
+        """Server row by id; ``load`` reads and decrypts it on a miss (misses are not cached)."""
+        self._revalidate()
+        server = self._servers.get(server_id)
+        if server is not None:
+            _stats["hits"] += 1
+            return dict(server)
+        _stats["misses"] += 1
+        stamp = self._stamp
+        server = load(server_id)
+        if server is not None and stamp is not None:
+            with self._lock:
+                # не кладём строку, прочитанную до чужого изменения
+                if self._stamp == stamp:
+                    self._servers[server_id] = dict(server)
+        return server
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._servers = {}
+            self._checked_at = float("-inf")
+            _stats["invalidations"] += 1
+
+    def refresh(self) -> None:
+        """Re-read the stamp now (before encrypting: picks up a key rotated elsewhere)."""
+        self._revalidate(force=True)
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+
+def snapshot(db_path: str) -> SecretSnapshot:
+    snap = _snapshots.get(db_path)
+    if snap is None:
+        with _snapshots_lock:
+            snap = _snapshots.setdefault(db_path, SecretSnapshot(db_path))
+    return snap
+
+
+def invalidate(db_path: str | None = None) -> None:
+    """Drop the snapshot of ``db_path`` (all databases when None)."""
+    for path, snap in list(_snapshots.items()):
+        if db_path is None or path == db_path:
+            snap.invalidate()
+
+
+def snapshot_stats() -> dict[str, int]:
+    return {**_stats, "entries": sum(len(s) for s in list(_snapshots.values()))}
+
+
+def reset_stats() -> None:
+    for k in _stats:
+        _stats[k] = 0
+
+
+class SecretsRepository(BaseRepository):
+    """Key rotation over every secret stored in the database."""
+
+    def invalidate_snapshot(self) -> None:
+        invalidate(self.db_path)
+
+    def rotate_key(self, new_key: bytes | None = None) -> dict[str, Any]:
+        """Re-encrypt all stored secrets with ``new_key`` (random when None).
+
+        Returns counts of re-encrypted rows. Raises :class:`SecretsError` when
+        the key comes from IRRIG_SECRET_KEY (it cannot be replaced from here)
+        or a stored secret does not decrypt with the current key.
+        """
+        if utils.secret_key_from_env():
+            raise SecretsError("ключ задан через IRRIG_SECRET_KEY — ротация выполняется сменой переменной")
+        new_key = new_key or _secrets.token_bytes(32)
+        if len(new_key) < 32:
+            raise SecretsError("ключ короче 32 байт")
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Ключ перечитываем внутри транзакции: другой процесс мог его уже сменить
+            utils.reload_secret_key()
+            servers = 0
+            for row in conn.execute(
+                "SELECT id, password FROM mqtt_servers WHERE password LIKE ?", (ENCRYPTED_PREFIX + "%",)
+            ).fetchall():
+                token = self._reencrypt(row["password"][len(ENCRYPTED_PREFIX) :], new_key, f"mqtt_servers.{row['id']}")
+                conn.execute("UPDATE mqtt_servers SET password = ? WHERE id = ?", (ENCRYPTED_PREFIX + token, row["id"]))
+                servers += 1
+            settings = 0
+            for row in conn.execute(
+                "SELECT key, value FROM settings WHERE key LIKE ? ESCAPE '\\' AND value IS NOT NULL AND value != ''",
+                (ENCRYPTED_SETTING_PATTERN,),
+            ).fetchall():
+                token = self._reencrypt(row["value"], new_key, f"settings.{row['key']}")
+                conn.execute("UPDATE settings SET value = ? WHERE key = ?", (token, row["key"]))
+                settings += 1
+            old_key = utils.store_secret_key(new_key)
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                utils.store_secret_key(old_key)
+                raise
+        except (sqlite3.Error, OSError) as e:
+            conn.rollback()
+            raise SecretsError(f"ротация ключа не выполнена: {e}") from e
+        except SecretsError:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        invalidate(self.db_path)
+        _stats["rotations"] += 1
+        logger.warning("Ключ шифрования заменён: перешифровано MQTT паролей %d, настроек %d", servers, settings)
+        return {"mqtt_servers": servers, "settings": settings}
+
+    @staticmethod
+    def _reencrypt(token: str, new_key: bytes, where: str) -> str:
+        try:
+            plain = utils.decrypt_secret(token)
+        except ValueError as e:
+            logger.debug("Handled exception in rotate_key: %s", e)
+            plain = None
+        if plain is None:
+            raise SecretsError(f"{where}: секрет не расшифровывается текущим ключом")
+        return utils.encrypt_secret(plain, key=new_key)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m db.secrets", description="Irrigation secret keys")
+    parser.add_argument("--db", default="irrigation.db", help="path to the SQLite database")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rotate", help="generate a new key and re-encrypt all stored secrets")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    try:
+        print(json.dumps(SecretsRepository(args.db).rotate_key(), ensure_ascii=False))
+        return 0
+    except SecretsError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,8 +16,8 @@ class ZoneRepository(BaseRepository):
     def get_zones(self) -> list[dict[str, Any]]:
         """Получить все зоны.
 
-        Injects ``last_watering_time`` (derived from ``zone_runs.end_utc``)
-        into each row so API/UI consumers keep working after the
+        Injects ``last_watering_time`` (from the ``zone_last_run`` summary of
+        ``zone_runs.end_utc``) into each row so API/UI consumers keep working after the
         ``zones_drop_last_watering_time`` migration.
         """
         try:
@@ -34,19 +34,14 @@ class ZoneRepository(BaseRepository):
                     zone = dict(row)
                     zone["group"] = zone["group_id"]
                     zones.append(zone)
-                # Single batched query — derive last_watering_time from
-                # zone_runs (idx_zone_runs_active covers it). Done after
-                # row.fetchall() so the cursor isn't held while we issue
-                # a second statement on the same connection.
+                # last_watering_time from the zone_last_run summary (one row
+                # per zone, kept by triggers) — size independent of history.
+                # Done after row.fetchall() so the cursor isn't held while we
+                # issue a second statement on the same connection.
                 try:
-                    cur2 = conn.execute(
-                        "SELECT zone_id, MAX(end_utc) FROM zone_runs "
-                        "WHERE status = 'ok' AND end_utc IS NOT NULL "
-                        "GROUP BY zone_id"
-                    )
-                    last_map = {int(r[0]): r[1] for r in cur2.fetchall()}
+                    last_map = {int(r[0]): r[1] for r in conn.execute("SELECT zone_id, end_utc FROM zone_last_run")}
                 except sqlite3.Error as e:
-                    logger.debug("get_zones: zone_runs aggregation failed: %s", e)
+                    logger.debug("get_zones: zone_last_run read failed: %s", e)
                     last_map = {}
                 for z in zones:
                     z["last_watering_time"] = last_map.get(int(z["id"]))
@@ -60,7 +55,8 @@ class ZoneRepository(BaseRepository):
 
         Injects ``last_watering_time`` derived from ``zone_runs.end_utc``
         (see :meth:`get_last_watering_time`) so consumers don't have to
-        know about the schema change.
+        know about the schema change. Same connection, one extra indexed
+        lookup in ``zone_last_run``.
         """
         try:
             with self._connect() as conn:
@@ -78,7 +74,10 @@ class ZoneRepository(BaseRepository):
                 if row:
                     zone = dict(row)
                     zone["group"] = zone["group_id"]
-                    zone["last_watering_time"] = self.get_last_watering_time(int(zone_id))
+                    last = conn.execute(
+                        "SELECT end_utc FROM zone_last_run WHERE zone_id = ?", (int(zone_id),)
+                    ).fetchone()
+                    zone["last_watering_time"] = last[0] if last else None
                     return zone
                 return None
         except sqlite3.Error as e:
@@ -158,11 +157,14 @@ class ZoneRepository(BaseRepository):
         """Обновить зону."""
         try:
             with self._connect() as conn:
-                current_zone = self.get_zone(zone_id)
-                if not current_zone:
+                # Pre-read on the same connection (get_zone would open a
+                # second one and also aggregate zone_runs we don't need).
+                row = conn.execute("SELECT * FROM zones WHERE id = ?", (zone_id,)).fetchone()
+                if not row:
                     return None
 
-                updated_data = current_zone.copy()
+                updated_data = dict(row)
+                updated_data["group"] = updated_data["group_id"]
                 updated_data.update(zone_data)
 
                 sql_fields = []
@@ -333,18 +335,18 @@ class ZoneRepository(BaseRepository):
             return {"updated": 0, "failed": []}
         try:
             with self._connect() as conn:
+                # One read for the whole batch instead of a SELECT per row.
+                current_rows = {int(r["id"]): dict(r) for r in conn.execute("SELECT * FROM zones")}
                 for upd in updates:
                     try:
                         zone_id = int(upd.get("id"))
                     except (TypeError, ValueError) as e:
                         logger.debug("batch_update zone id parse: %s", e)
                         continue
-                    cur = conn.execute("SELECT * FROM zones WHERE id = ?", (zone_id,))
-                    row = cur.fetchone()
-                    if not row:
+                    current = current_rows.get(zone_id)
+                    if current is None:
                         failed.append(zone_id)
                         continue
-                    current = dict(zip([d[0] for d in cur.description], row))
                     merged = current.copy()
                     merged.update(upd)
                     fields = []
@@ -389,6 +391,7 @@ class ZoneRepository(BaseRepository):
                     try:
                         conn.execute(sql, params)
                         updated += 1
+                        current_rows[zone_id] = merged
                     except sqlite3.Error as e:
                         logger.warning("Ошибка обновления зоны %s в bulk: %s", zone_id, e)
                         failed.append(zone_id)
@@ -400,129 +403,222 @@ class ZoneRepository(BaseRepository):
 
     @retry_on_busy()
     def bulk_upsert_zones(self, zones: list[dict[str, Any]]) -> dict[str, Any]:
-        """Импорт зон: upsert множества зон в одной транзакции."""
-        created = 0
-        updated = 0
-        failed = 0
+        """Импорт зон: upsert множества зон в одной транзакции.
+
+        The whole batch runs in one ``BEGIN IMMEDIATE`` transaction: existing
+        ids are read with a single SELECT, then rows are written with
+        ``executemany`` — one statement per distinct column set. Repeated ids
+        within the batch are merged in input order (last value wins). If a
+        batched statement fails it is replayed row by row, so one bad row
+        cannot sink the import.
+
+        Returns ``created``/``updated``/``failed`` counters plus:
+          * ``rows`` — one ``{"row", "id", "status"[, "error"]}`` per input
+            row, ``row`` being the 0-based index into *zones*;
+          * ``groups`` — group ids whose zones were added, moved or changed;
+          * ``programs_changed`` — True if zones moved to group 999 were
+            removed from programs (the scheduler must reload them).
+        """
+        # SEC-004: writes go through a strict column whitelist. Never
+        # interpolate a field name that wasn't preauthorized at import time —
+        # otherwise a future refactor that lets user data leak into the key
+        # side promotes this to a full SQL injection.
+        #
+        # B1 FIX: 'state' and other state-machine fields are deliberately
+        # EXCLUDED here — bulk-upsert must never bypass the state-machine
+        # guard, optimistic-lock, and audit trail in services.zones_state.
+        # Any caller that wants to change zone runtime state must use
+        # /api/zones/<id>/start|stop or services.zones_state.update_zone_state
+        # so a zone_state_change audit row is emitted.
+        _ALLOWED_UPDATE_COLUMNS = {
+            "name",
+            "icon",
+            "duration",
+            "group_id",
+            "topic",
+            "mqtt_server_id",
+        }
+        insert_defaults = {
+            "name": "Зона",
+            "icon": "🌿",
+            "duration": 10,
+            "group_id": 1,
+            "topic": "",
+            "mqtt_server_id": None,
+        }
+        insert_columns = ("id", "name", "icon", "duration", "group_id", "topic", "mqtt_server_id")
+
+        rows: list[dict[str, Any]] = [{"row": i, "id": None, "status": "failed"} for i in range(len(zones))]
+        result: dict[str, Any] = {
+            "created": 0,
+            "updated": 0,
+            "failed": 0,
+            "rows": rows,
+            "groups": [],
+            "programs_changed": False,
+        }
         if not zones:
-            return {"created": 0, "updated": 0, "failed": 0}
+            return result
+
+        def _set(changes: dict[str, Any], column: str, value) -> None:
+            if column not in _ALLOWED_UPDATE_COLUMNS:
+                # Defensive: only reachable if someone edits this function
+                # and passes a bad name.
+                raise ValueError(f"refusing to UPDATE unknown zones column: {column!r}")
+            changes[column] = value
+
+        # 1. Parse every row outside the transaction (no DB work yet).
+        parsed: list[tuple[int, int | None, dict[str, Any]]] = []
+        for i, z in enumerate(zones):
+            if not isinstance(z, dict):
+                rows[i]["error"] = "row is not an object"
+                continue
+            changes: dict[str, Any] = {}
+            try:
+                zid = int(z["id"]) if z.get("id") is not None else None
+                if "name" in z:
+                    _set(changes, "name", z["name"])
+                if "icon" in z:
+                    _set(changes, "icon", z["icon"])
+                if "duration" in z:
+                    _set(changes, "duration", int(z["duration"]))
+                if ("group_id" in z) or ("group" in z):
+                    _set(changes, "group_id", int(z.get("group_id", z.get("group", 1))))
+                if "topic" in z:
+                    _set(changes, "topic", (z.get("topic") or "").strip())
+                # B1 FIX: 'state' deliberately not handled — see
+                # _ALLOWED_UPDATE_COLUMNS comment above.
+                if "mqtt_server_id" in z:
+                    _set(changes, "mqtt_server_id", z.get("mqtt_server_id"))
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.debug("import_zones row %d parse: %s", i, e)
+                rows[i]["error"] = str(e)
+                continue
+            rows[i]["id"] = zid
+            parsed.append((i, zid, changes))
+
         try:
             with self._connect() as conn:
-                for z in zones:
-                    try:
-                        zid = int(z["id"]) if z.get("id") is not None else None
-                    except (TypeError, ValueError) as e:
-                        logger.debug("import_zones id parse: %s", e)
-                        zid = None
-                    try:
-                        if zid is not None:
-                            cur = conn.execute("SELECT id FROM zones WHERE id = ?", (zid,))
-                            row = cur.fetchone()
-                            if row:
-                                # SEC-004: build UPDATE via a strict column
-                                # whitelist. Never interpolate a field name
-                                # that wasn't preauthorized at import time —
-                                # otherwise a future refactor that lets user
-                                # data leak into the key side promotes this
-                                # to a full SQL injection.
-                                #
-                                # B1 FIX: 'state' and other state-machine
-                                # fields are deliberately EXCLUDED here —
-                                # bulk-upsert must never bypass the
-                                # state-machine guard, optimistic-lock, and
-                                # audit trail in services.zones_state.  Any
-                                # caller that wants to change zone runtime
-                                # state must use /api/zones/<id>/start|stop
-                                # or services.zones_state.update_zone_state
-                                # so a zone_state_change audit row is
-                                # emitted.
-                                _ALLOWED_UPDATE_COLUMNS = {
-                                    "name",
-                                    "icon",
-                                    "duration",
-                                    "group_id",
-                                    "topic",
-                                    "mqtt_server_id",
-                                }
-
-                                assignments = []
-                                params = []
-
-                                def _set(column: str, value):
-                                    if column not in _ALLOWED_UPDATE_COLUMNS:
-                                        # Defensive: this branch is only
-                                        # reachable if someone edits this
-                                        # function and passes a bad name.
-                                        raise ValueError(f"refusing to UPDATE unknown zones column: {column!r}")
-                                    assignments.append(f"{column} = ?")
-                                    params.append(value)
-
-                                if "name" in z:
-                                    _set("name", z["name"])
-                                if "icon" in z:
-                                    _set("icon", z["icon"])
-                                if "duration" in z:
-                                    _set("duration", int(z["duration"]))
-                                if ("group_id" in z) or ("group" in z):
-                                    _set("group_id", int(z.get("group_id", z.get("group", 1))))
-                                if "topic" in z:
-                                    _set("topic", (z.get("topic") or "").strip())
-                                # B1 FIX: 'state' deliberately not handled — see
-                                # _ALLOWED_UPDATE_COLUMNS comment above.
-                                if "mqtt_server_id" in z:
-                                    _set("mqtt_server_id", z.get("mqtt_server_id"))
-                                # updated_at is always set but uses SQL
-                                # CURRENT_TIMESTAMP — not a parameter, and
-                                # not user-controllable.
-                                assignments.append("updated_at = CURRENT_TIMESTAMP")
-                                params.append(zid)
-                                if assignments:
-                                    conn.execute(
-                                        f"UPDATE zones SET {', '.join(assignments)} WHERE id = ?",
-                                        params,
-                                    )
-                                    updated += 1
-                            else:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    existing = {int(r[0]): r[1] for r in conn.execute("SELECT id, group_id FROM zones")}
+                    # Ids for rows without one are taken above every id the
+                    # table or this batch mentions, so an explicit id later in
+                    # the batch never collides with an auto-assigned one.
+                    next_id = max([0, *existing, *(zid for _, zid, _ in parsed if zid is not None)]) + 1
+
+                    # 2. Merge rows per zone id, in input order.
+                    ops: dict[int, dict[str, Any]] = {}
+                    for i, zid, changes in parsed:
+                        if zid is None:
+                            zid, next_id = next_id, next_id + 1
+                            rows[i]["id"] = zid
+                        op = ops.get(zid)
+                        if op is None:
+                            op = ops[zid] = {"new": zid not in existing, "changes": {}, "rows": []}
+                            rows[i]["status"] = "created" if op["new"] else "updated"
+                        else:
+                            rows[i]["status"] = "updated"
+                        op["changes"].update(changes)
+                        op["rows"].append(i)
+
+                    failed_ids: dict[int, str] = {}
+
+                    def _run_many(sql: str, batch: list[tuple[int, tuple]]) -> None:
+                        conn.execute("SAVEPOINT bulk_zones")
+                        try:
+                            conn.executemany(sql, [params for _, params in batch])
+                            conn.execute("RELEASE bulk_zones")
+                            return
+                        except sqlite3.Error as e:
+                            logger.warning("bulk zones statement failed, replaying row by row: %s", e)
+                            conn.execute("ROLLBACK TO bulk_zones")
+                            conn.execute("RELEASE bulk_zones")
+                        for zid, params in batch:
+                            try:
+                                conn.execute(sql, params)
+                            except sqlite3.Error as e:
+                                logger.warning("Ошибка upsert зоны %s: %s", zid, e)
+                                failed_ids[zid] = str(e)
+
+                    # 3. Inserts: one executemany.
+                    inserts = []
+                    for zid, op in ops.items():
+                        if op["new"]:
+                            values = {**insert_defaults, **op["changes"], "id": zid}
+                            values["name"] = values["name"] or insert_defaults["name"]
+                            values["icon"] = values["icon"] or insert_defaults["icon"]
+                            inserts.append((zid, tuple(values[c] for c in insert_columns)))
+                    if inserts:
+                        _run_many(
+                            f"INSERT INTO zones ({', '.join(insert_columns)}) "
+                            f"VALUES ({', '.join('?' for _ in insert_columns)})",
+                            inserts,
+                        )
+
+                    # 4. Updates: one executemany per distinct column set.
+                    # Column names come from _ALLOWED_UPDATE_COLUMNS only; the
+                    # values are bound parameters. updated_at uses SQL
+                    # CURRENT_TIMESTAMP — not user-controllable.
+                    updates: dict[tuple[str, ...], list[tuple[int, tuple]]] = {}
+                    for zid, op in ops.items():
+                        if not op["new"]:
+                            cols = tuple(sorted(op["changes"]))
+                            updates.setdefault(cols, []).append((zid, (*(op["changes"][c] for c in cols), zid)))
+                    for cols, batch in updates.items():
+                        assignments = [f"{c} = ?" for c in cols] + ["updated_at = CURRENT_TIMESTAMP"]
+                        _run_many(f"UPDATE zones SET {', '.join(assignments)} WHERE id = ?", batch)
+
+                    # 5. Zones moved to group 999 leave every program — one pass.
+                    groups: set[int] = set()
+                    to_unassign: set[int] = set()
+                    for zid, op in ops.items():
+                        if zid in failed_ids:
+                            continue
+                        changes = op["changes"]
+                        if not op["new"] and existing.get(zid) is not None:
+                            if "group_id" in changes or "duration" in changes:
+                                groups.add(int(existing[zid]))
+                        new_group = changes.get("group_id", existing.get(zid, insert_defaults["group_id"]))
+                        if op["new"] or "group_id" in changes or "duration" in changes:
+                            groups.add(int(new_group))
+                        if "group_id" in changes and new_group == 999:
+                            to_unassign.add(zid)
+                    if to_unassign:
+                        for prog_id, zones_json in conn.execute("SELECT id, zones FROM programs").fetchall():
+                            try:
+                                zones_list = json.loads(zones_json)
+                            except (json.JSONDecodeError, TypeError) as e:
+                                logger.debug("zones list parse in program %s: %s", prog_id, e)
+                                continue
+                            kept = [z for z in zones_list if z not in to_unassign]
+                            if len(kept) != len(zones_list):
                                 conn.execute(
-                                    """
-                                    INSERT INTO zones (id, name, icon, duration, group_id, topic, mqtt_server_id)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                    (
-                                        zid,
-                                        z.get("name") or "Зона",
-                                        z.get("icon") or "🌿",
-                                        int(z.get("duration") or 10),
-                                        int(z.get("group_id", z.get("group", 1))),
-                                        (z.get("topic") or "").strip(),
-                                        z.get("mqtt_server_id"),
-                                    ),
+                                    "UPDATE programs SET zones = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                                    (json.dumps(kept), prog_id),
                                 )
-                                created += 1
-                        else:
-                            conn.execute(
-                                """
-                                INSERT INTO zones (name, icon, duration, group_id, topic, mqtt_server_id)
-                                VALUES (?, ?, ?, ?, ?, ?)
-                            """,
-                                (
-                                    z.get("name") or "Зона",
-                                    z.get("icon") or "🌿",
-                                    int(z.get("duration") or 10),
-                                    int(z.get("group_id", z.get("group", 1))),
-                                    (z.get("topic") or "").strip(),
-                                    z.get("mqtt_server_id"),
-                                ),
-                            )
-                            created += 1
-                    except sqlite3.Error as e:
-                        logger.warning("Ошибка upsert зоны: %s", e)
-                        failed += 1
-                conn.commit()
-            return {"created": created, "updated": updated, "failed": failed}
+                                result["programs_changed"] = True
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
         except sqlite3.Error as e:
             logger.error("Ошибка bulk-импорта зон: %s", e)
-            return {"created": created, "updated": updated, "failed": (failed or 0)}
+            for i, _, _ in parsed:
+                rows[i]["status"] = "failed"
+                rows[i]["error"] = str(e)
+            result["failed"] = len(rows)
+            result["created"] = result["updated"] = 0
+            return result
+
+        for zid, err in failed_ids.items():
+            for i in ops[zid]["rows"]:
+                rows[i]["status"] = "failed"
+                rows[i]["error"] = err
+        for r in rows:
+            result[r["status"]] += 1
+        result["groups"] = sorted(groups)
+        return result
 
     @retry_on_busy()
     def delete_zone(self, zone_id: int) -> bool:
@@ -562,13 +658,13 @@ class ZoneRepository(BaseRepository):
                     zones.append(zone)
                 try:
                     cur2 = conn.execute(
-                        "SELECT zone_id, MAX(end_utc) FROM zone_runs "
-                        "WHERE status = 'ok' AND end_utc IS NOT NULL "
-                        "GROUP BY zone_id"
+                        "SELECT l.zone_id, l.end_utc FROM zone_last_run l "
+                        "JOIN zones z ON z.id = l.zone_id WHERE z.group_id = ?",
+                        (group_id,),
                     )
                     last_map = {int(r[0]): r[1] for r in cur2.fetchall()}
                 except sqlite3.Error as e:
-                    logger.debug("get_zones_by_group: zone_runs aggregation failed: %s", e)
+                    logger.debug("get_zones_by_group: zone_last_run read failed: %s", e)
                     last_map = {}
                 for z in zones:
                     z["last_watering_time"] = last_map.get(int(z["id"]))
@@ -612,6 +708,19 @@ class ZoneRepository(BaseRepository):
         except sqlite3.Error as e:
             logger.error("Ошибка установки расписания scheduled_start_time для группы %s: %s", group_id, e)
 
+    @retry_on_busy()
+    def set_zones_scheduled_starts(self, schedule: dict[int, str]) -> None:
+        """Установить плановые времена старта по zone_id (без привязки к группе), одной транзакцией."""
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE zones SET scheduled_start_time = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [(ts, int(zone_id)) for zone_id, ts in schedule.items()],
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error("Ошибка установки scheduled_start_time для %d зон: %s", len(schedule), e)
+
     @retry_on_busy()
     def clear_scheduled_for_zone_group_peers(self, zone_id: int, group_id: int) -> None:
         """Очистить scheduled_start_time у всех зон группы, кроме указанной."""
@@ -826,28 +935,61 @@ class ZoneRepository(BaseRepository):
     def get_last_watering_time(self, zone_id: int) -> str | None:
         """Return the most recent successful watering end-time for a zone.
 
-        Single source of truth = ``zone_runs``. The denormalised
-        ``zones.last_watering_time`` column was dropped by migration
-        ``zones_drop_last_watering_time``; this helper computes the value
-        on-demand from ``MAX(end_utc)`` over rows with ``status='ok'`` and
-        a non-NULL ``end_utc`` (i.e. the run actually finished cleanly).
-
-        The covering index ``idx_zone_runs_active(zone_id, end_utc)`` keeps
-        this O(log n) per zone. Returns ``None`` for a zone that has never
-        been watered (or whose only runs are aborted / still open).
+        Single source of truth = ``zone_runs``: ``MAX(end_utc)`` over rows
+        with ``status='ok'`` and a non-NULL ``end_utc`` (the run actually
+        finished cleanly). The value is read from ``zone_last_run``, which
+        triggers on ``zone_runs`` keep equal to that aggregate (see
+        migration ``create_zone_last_run`` and :meth:`check_zone_last_run`),
+        so this is a primary-key lookup. Returns ``None`` for a zone that has
+        never been watered (or whose only runs are aborted / still open).
         """
         try:
             with self._connect() as conn:
-                cur = conn.execute(
-                    "SELECT MAX(end_utc) FROM zone_runs WHERE zone_id = ? AND status = 'ok' AND end_utc IS NOT NULL",
-                    (int(zone_id),),
-                )
-                row = cur.fetchone()
+                row = conn.execute("SELECT end_utc FROM zone_last_run WHERE zone_id = ?", (int(zone_id),)).fetchone()
                 return row[0] if row and row[0] else None
         except sqlite3.Error as e:
             logger.error("get_last_watering_time(%s): %s", zone_id, e)
             return None
 
+    def check_zone_last_run(self, repair: bool = False) -> dict[str, Any]:
+        """Compare ``zone_last_run`` with the full ``zone_runs`` aggregate.
+
+        Returns ``{"checked", "mismatches", "repaired"}``; each mismatch is
+        ``{"zone_id", "summary", "actual"}``. With ``repair=True`` the summary
+        is rebuilt from the aggregate in the same transaction. This is the
+        one place that still scans the whole history — run it at boot or on
+        demand, not per request.
+        """
+        try:
+            with self._connect() as conn:
+                actual = {
+                    int(r[0]): r[1]
+                    for r in conn.execute(
+                        "SELECT zone_id, MAX(end_utc) FROM zone_runs "
+                        "WHERE status = 'ok' AND end_utc IS NOT NULL GROUP BY zone_id"
+                    )
+                }
+                summary = {int(r[0]): r[1] for r in conn.execute("SELECT zone_id, end_utc FROM zone_last_run")}
+                mismatches = [
+                    {"zone_id": zid, "summary": summary.get(zid), "actual": actual.get(zid)}
+                    for zid in sorted(set(actual) | set(summary))
+                    if summary.get(zid) != actual.get(zid)
+                ]
+                repaired = False
+                if mismatches and repair:
+                    conn.execute("DELETE FROM zone_last_run")
+                    conn.executemany(
+                        "INSERT INTO zone_last_run(zone_id, end_utc) VALUES (?, ?)", sorted(actual.items())
+                    )
+                    conn.commit()
+                    repaired = True
+                if mismatches:
+                    logger.warning("zone_last_run: %d zone(s) out of sync (repaired=%s)", len(mismatches), repaired)
+                return {"checked": len(set(actual) | set(summary)), "mismatches": mismatches, "repaired": repaired}
+        except sqlite3.Error as e:
+            logger.error("check_zone_last_run: %s", e)
+            return {"checked": 0, "mismatches": [], "repaired": False, "error": str(e)}
+
     @staticmethod
     def _parse_postpone_dt(s: str | None) -> datetime | None:
         """Local datetime parser mirroring irrigation_scheduler._parse_dt.
@@ -880,38 +1022,43 @@ class ZoneRepository(BaseRepository):
             programs = programs_getter() if programs_getter else []
             if not programs:
                 return None
-            now = datetime.now()
-            postpone_dt = self._parse_postpone_dt(zone.get("postpone_until"))
-            if postpone_dt and postpone_dt > now:
-                now = postpone_dt
-            best_dt: datetime | None = None
-            for prog in programs:
-                if zone_id not in prog.get("zones", []):
-                    continue
-                for offset in range(0, 14):
-                    dt_candidate = now + timedelta(days=offset)
-                    if dt_candidate.weekday() in prog["days"]:
-                        hour, minute = map(int, prog["time"].split(":"))
-                        start_dt = dt_candidate.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                        if start_dt <= now:
-                            continue
-                        cum = 0
-                        for zid in sorted(prog["zones"]):
-                            dur = self.get_zone_duration(zid)
-                            if zid == zone_id:
-                                candidate = start_dt + timedelta(minutes=cum)
-                                if best_dt is None or candidate < best_dt:
-                                    best_dt = candidate
-                                break
-                            cum += dur
-                        break
-            if best_dt:
-                return best_dt.strftime("%Y-%m-%d %H:%M:%S")
-            return None
+            return self._next_run_from_programs(zone_id, zone.get("postpone_until"), programs, self.get_zone_duration)
         except (sqlite3.Error, OSError) as e:
             logger.exception("Ошибка расчета следующего запуска для зоны %s: %s", zone_id, e)
             return None
 
+    @classmethod
+    def _next_run_from_programs(cls, zone_id: int, postpone_until, programs, duration_of) -> str | None:
+        """Ближайший старт зоны по *programs*; ``duration_of(zid)`` — длительность зоны в минутах."""
+        now = datetime.now()
+        postpone_dt = cls._parse_postpone_dt(postpone_until)
+        if postpone_dt and postpone_dt > now:
+            now = postpone_dt
+        best_dt: datetime | None = None
+        for prog in programs:
+            if zone_id not in prog.get("zones", []):
+                continue
+            for offset in range(0, 14):
+                dt_candidate = now + timedelta(days=offset)
+                if dt_candidate.weekday() in prog["days"]:
+                    hour, minute = map(int, prog["time"].split(":"))
+                    start_dt = dt_candidate.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                    if start_dt <= now:
+                        continue
+                    cum = 0
+                    for zid in sorted(prog["zones"]):
+                        dur = duration_of(zid)
+                        if zid == zone_id:
+                            candidate = start_dt + timedelta(minutes=cum)
+                            if best_dt is None or candidate < best_dt:
+                                best_dt = candidate
+                            break
+                        cum += dur
+                    break
+        if best_dt:
+            return best_dt.strftime("%Y-%m-%d %H:%M:%S")
+        return None
+
     def reschedule_group_to_next_program(self, group_id: int, programs_getter=None) -> None:
         """Пересчитать и записать scheduled_start_time всем зонам группы."""
         try:
@@ -926,3 +1073,44 @@ class ZoneRepository(BaseRepository):
                 self.set_group_scheduled_starts(group_id, schedule)
         except (sqlite3.Error, OSError) as e:
             logger.exception("Ошибка перестройки расписания группы %s: %s", group_id, e)
+
+    @retry_on_busy()
+    def reschedule_groups_to_next_program(self, group_ids, programs_getter=None) -> None:
+        """Пакетный вариант :meth:`reschedule_group_to_next_program` для нескольких групп.
+
+        Reads zones and programs once and writes every group's
+        scheduled_start_time in a single transaction — used after bulk imports
+        where the per-zone variant would open a connection per zone.
+        """
+        group_ids = {int(g) for g in group_ids}
+        if not group_ids:
+            return
+        try:
+            programs = programs_getter() if programs_getter else []
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                zones = conn.execute("SELECT id, group_id, duration, postpone_until FROM zones").fetchall()
+                durations = {int(z["id"]): z["duration"] for z in zones}
+                schedule = []
+                if programs:
+                    for z in zones:
+                        if z["group_id"] not in group_ids:
+                            continue
+                        nxt = self._next_run_from_programs(
+                            int(z["id"]), z["postpone_until"], programs, lambda zid: durations.get(zid, 0)
+                        )
+                        if nxt:
+                            schedule.append((nxt, int(z["id"])))
+                marks = ", ".join("?" for _ in group_ids)
+                conn.execute(
+                    f"UPDATE zones SET scheduled_start_time = NULL, updated_at = CURRENT_TIMESTAMP "
+                    f"WHERE group_id IN ({marks})",
+                    tuple(group_ids),
+                )
+                conn.executemany(
+                    "UPDATE zones SET scheduled_start_time = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    schedule,
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.exception("Ошибка перестройки расписания групп %s: %s", sorted(group_ids), e)
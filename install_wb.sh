@@ -188,6 +188,12 @@ fi
 "${VENV_DIR}/bin/pip" install -q -r "${APP_DIR}/requirements.txt"
 ok "venv готов: $(${VENV_DIR}/bin/python -V)"
 
+# Сборка статики (static/dist: бандлы с хешем в имени + .gz/.br). Не фатально:
+# без manifest.json шаблоны отдают исходные файлы с ?v=<версия>.
+(cd "${APP_DIR}" && "${VENV_DIR}/bin/python" -m services.static_assets build >/dev/null) \
+  && ok "Статика собрана (static/dist)" \
+  || warn "Сборка статики не удалась — будут отдаваться несжатые исходники"
+
 # -----------------------------------------------------------------------------
 # Step 5: systemd unit
 # -----------------------------------------------------------------------------
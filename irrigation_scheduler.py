@@ -7,7 +7,6 @@
 import logging
 import sqlite3
 import threading
-import time
 from datetime import datetime, timedelta
 from typing import Any
 
@@ -18,7 +17,19 @@ import json
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from config import TESTING
+from constants import PROGRAM_FLOW_BUDGET_LPM, PROGRAM_MAX_PARALLEL_GROUPS
 from database import IrrigationDB
+from scheduler.timeline import (
+    DISPATCH_CURSOR_STEP,
+    PROGRAM_DISPATCH_JOB_ID,
+    PROGRAM_MISFIRE_GRACE_SEC,
+    ProgramTimeline,
+    compile_program_slots,
+)
+from scheduler.timers import TIMERS_DB_NAME, TimerStore
+from services import clock
+from services.multiwait import Signal
+from services.program_queue import ProgramCompletionTracker
 from utils import normalize_topic
 
 try:
@@ -116,6 +127,18 @@ def job_run_program(program_id: int, zones: list, program_name: str, manual: boo
         logger.exception("job_run_program failed (program_id=%s)", program_id)
 
 
+def job_dispatch_programs(cursor: str | None = None):
+    """Single persistent job: run due program starts, then re-arm itself."""
+    try:
+        from irrigation_scheduler import get_scheduler
+
+        s = get_scheduler()
+        if s is not None:
+            s.dispatch_programs(cursor)
+    except (sqlite3.Error, OSError, ValueError, TypeError):
+        logger.exception("job_dispatch_programs failed")
+
+
 def job_run_group_sequence(
     group_id: int,
     zone_ids: list,
@@ -225,20 +248,21 @@ def job_clear_expired_postpones():
 def job_dispatch_bot_subscriptions():
     try:
         from database import db
-        from services.reports import build_report_text
+        from services.reports import cached_report_text
         from services.telegram_bot import notifier
 
-        now = datetime.now()
+        now = clock.now()
         due = db.get_due_bot_subscriptions(now)
         for sub in due:
             try:
-                fmt = str(sub.get("format") or "brief")
+                fmt = "full" if str(sub.get("format") or "brief") == "full" else "brief"
                 ptype = str(sub.get("type") or "daily")
                 period = "today" if ptype == "daily" else "7"
-                txt = build_report_text(period=period, fmt="brief" if fmt != "full" else "full")
+                # Отчёт строится один раз на (период, формат) и переиспользуется между запусками
+                txt = cached_report_text(period=period, fmt=fmt)
                 chat_id = int(sub.get("chat_id"))
                 if chat_id:
-                    notifier.send_text(chat_id, txt)
+                    notifier.notify(chat_id, txt)
             except (ValueError, TypeError, KeyError) as e:
                 logger.debug("Handled exception in job_dispatch_bot_subscriptions: %s", e)
     except (sqlite3.Error, OSError, ValueError, TypeError) as e:
@@ -335,7 +359,7 @@ class IrrigationScheduler:
                 jobstore_backend = "memory-fallback"
                 logger.warning(
                     "APScheduler: SQLAlchemy unavailable, falling back to MemoryJobStore — "
-                    "one-shot zone_stop/master_close jobs WILL be lost on restart (PHYS-2 risk)."
+                    "the program_dispatch cursor WILL be lost on restart (PHYS-2 risk)."
                 )
             if MemoryJobStore is not None:
                 jobstores["volatile"] = MemoryJobStore()  # эфемерные задачи (не требуют persist)
@@ -368,8 +392,23 @@ class IrrigationScheduler:
             logger.debug("Exception in line_195: %s", e)
             self.has_default_jobstore = False
             self.has_volatile_jobstore = False
+        # Одноразовые таймеры зон / мастер-клапана — в своём журнале timers.db,
+        # мимо APScheduler (arm/cancel на каждом старте/стопе зоны)
+        self.timers = TimerStore(
+            os.path.join(os.path.dirname(os.path.abspath(self.db.db_path)) or ".", TIMERS_DB_NAME),
+            {"stop_zone": job_stop_zone, "close_master_valve": job_close_master_valve},
+        )
+        try:
+            self.timers.open()
+        except sqlite3.Error as e:
+            logger.error("Timer store init failed: %s", e)
         self.active_zones: dict[int, datetime] = {}
-        self.program_jobs: dict[int, list[str]] = {}  # program_id -> list(job_id)
+        self.program_jobs: dict[int, list[str]] = {}  # program_id -> list(slot key)
+        # Скомпилированное расписание всех программ; APScheduler держит одну задачу program_dispatch
+        self.program_timeline = ProgramTimeline()
+        self._program_runs: dict[int, tuple[list[int], str]] = {}  # program_id -> (zones, name)
+        self._timeline_lock = threading.RLock()
+        self._timeline_ready = False
         self.is_running = False
         self.group_cancel_events: dict[int, threading.Event] = {}
         # Per-group "skip current zone" events. Lifetime mirrors group_cancel_events:
@@ -384,12 +423,17 @@ class IrrigationScheduler:
         self._last_skip_ts: dict[int, float] = {}
         self._skip_debounce_seconds: float = 1.0
         # Shutdown event: set to interrupt all sleeping threads for graceful stop
-        self._shutdown_event = threading.Event()
+        self._shutdown_event = Signal()
+        # Параллельный запуск групп одной программы (очередь создаётся лениво)
+        self.program_tracker = ProgramCompletionTracker()
+        self.program_queue = None
+        self._program_queue_lock = threading.Lock()
 
     def start(self):
         if self.is_running:
             return
         self.scheduler.start()
+        self.timers.start()
         self.is_running = True
         try:
             backend = getattr(self, "jobstore_backend", "unknown")
@@ -406,6 +450,7 @@ class IrrigationScheduler:
                 logger.info("Восстановлено из persistent jobstore: %d задач", restored)
             except (AttributeError, KeyError, ValueError) as _e:
                 logger.debug("restored jobs count failed: %s", _e)
+            logger.info("Восстановлено таймеров из timers.db: %d", len(self.timers.timers()))
         except (ValueError, TypeError, KeyError):
             logger.info("Планировщик полива (APScheduler) запущен")
         # Плановый джоб: регулярная очистка истекших отложек
@@ -418,6 +463,11 @@ class IrrigationScheduler:
             self.schedule_audit_cleanup()
         except (OSError, ValueError) as e:
             logger.error(f"Не удалось запланировать очистку audit_log: {e}")
+        # Плановый джоб: ночная очистка/свёртка истории (02:40)
+        try:
+            self.schedule_retention()
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось запланировать retention: {e}")
         # Плановый джоб: ежедневный бэкап БД (03:15)
         try:
             self.schedule_daily_backup()
@@ -435,6 +485,9 @@ class IrrigationScheduler:
         # Signal all sleeping threads to wake up immediately
         self._shutdown_event.set()
         self.scheduler.shutdown(wait=False)
+        self.timers.close()
+        if self.program_queue is not None:
+            self.program_queue.shutdown(timeout=2.0)
         self.is_running = False
         logger.info("Планировщик полива остановлен")
 
@@ -455,7 +508,7 @@ class IrrigationScheduler:
         """Сбрасывает отложенный полив для зон, у которых срок истек."""
         try:
             zones = self.db.get_zones()
-            now = datetime.now()
+            now = clock.now()
             expired: list[int] = []
             for z in zones:
                 pu = z.get("postpone_until")
@@ -489,7 +542,7 @@ class IrrigationScheduler:
                 replace_existing=True,
                 coalesce=False,
                 max_instances=1,
-                next_run_time=datetime.now(),
+                next_run_time=clock.now(),
             )
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Не удалось добавить джоб postpone_sweeper: {e}")
@@ -501,7 +554,7 @@ class IrrigationScheduler:
                 replace_existing=True,
                 coalesce=False,
                 max_instances=1,
-                next_run_time=datetime.now(),
+                next_run_time=clock.now(),
             )
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Не удалось добавить джоб bot_sub_dispatcher: {e}")
@@ -521,8 +574,26 @@ class IrrigationScheduler:
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Не удалось добавить джоб audit_cleanup: {e}")
 
+    def schedule_retention(self) -> None:
+        """Plan nightly retention at 02:40 (batched purge + rollups, then incremental vacuum)."""
+        try:
+            from scheduler.jobs import job_retention
+
+            self.scheduler.add_job(
+                job_retention,
+                trigger=CronTrigger(hour=2, minute=40),
+                id="retention",
+                name="nightly retention",
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1,
+            )
+            logger.info("retention job scheduled: daily at 02:40")
+        except (ValueError, TypeError, KeyError, ImportError) as e:
+            logger.error(f"Не удалось добавить джоб retention: {e}")
+
     def schedule_daily_backup(self) -> None:
-        """Plan daily DB backup at 03:15 (sanity-checked, see LogRepository.create_backup)."""
+        """Plan daily DB backup at 03:15 (paged online copy, verified and compressed, see db/backup.py)."""
         try:
             self.scheduler.add_job(
                 job_daily_backup,
@@ -638,7 +709,7 @@ class IrrigationScheduler:
                     if chat_id:
                         skip_type = skip_info.get("details", {}).get("type", "weather")
                         emoji = {"rain": "🌧", "rain_forecast": "🌧", "freeze": "❄️", "wind": "💨"}.get(skip_type, "⛅")
-                        notifier.send_text(int(chat_id), f"{emoji} Полив пропущен: {reason}")
+                        notifier.notify(int(chat_id), f"{emoji} Полив пропущен: {reason}")
                 except (ImportError, OSError, ValueError, TypeError) as e:
                     logger.debug("Weather skip telegram: %s", e)
                 # Log to weather_log
@@ -681,6 +752,43 @@ class IrrigationScheduler:
             logger.debug("Weather adjustment error: %s", e)
             return base_duration
 
+    def _record_program_plan(self, program_id: int, program_name: str, weather) -> None:
+        """Записать в лог рекомендацию планировщика полива (irrigation_plan) для программы.
+
+        Рекомендация информационная: пропуск и длительность по-прежнему решает
+        WeatherAdjustment, план лишь фиксирует решение/время по зонам для
+        сравнения (те же данные отдаёт GET /api/weather/plan).
+        """
+        try:
+            from services.irrigation_plan import current_plan
+
+            plan = current_plan(self.db, weather)
+            rows = plan.where(program_id=program_id)
+            total = plan.program_total_min(program_id)
+            self.db.add_log(
+                "program_plan",
+                json.dumps(
+                    {
+                        "program_id": program_id,
+                        "program_name": program_name,
+                        "total_min": total,
+                        "zones": [
+                            {
+                                "zone_id": r["zone_id"],
+                                "decision": r["decision"],
+                                "rule_id": r["rule_id"],
+                                "runtime_min": r["runtime_min"],
+                                "cycles": len(r["cycles"]),
+                            }
+                            for r in rows
+                        ],
+                    }
+                ),
+            )
+            logger.info(f"План полива программы {program_id}: {len(rows)} зон, {total} мин с учётом пауз")
+        except (sqlite3.Error, OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.debug("Program plan error: %s", e)
+
     def _run_program_threaded(self, program_id: int, zones: list[int], program_name: str, manual: bool = False):
         """Последовательный запуск зон в отдельном потоке, чтобы не блокировать APScheduler.
 
@@ -710,6 +818,7 @@ class IrrigationScheduler:
         # scheduled guard (must run BEFORE pre-register so it doesn't see
         # our own planted events) and by the pre-register block.
         program_gids: set = set()
+        zone_groups: dict[int, int] = {}
         try:
             for z in zones:
                 try:
@@ -717,6 +826,7 @@ class IrrigationScheduler:
                     if not zd:
                         continue
                     g = int(zd.get("group_id") or 0)
+                    zone_groups[int(z)] = g
                     # Skip the "no group" sentinels (gid==0 unset, gid==999
                     # is the legacy "ungrouped" bucket per project convention).
                     if g and g != 999:
@@ -747,7 +857,7 @@ class IrrigationScheduler:
                                     "program_id": program_id,
                                     "program_name": program_name,
                                     "blocking_gids": blocking_gids,
-                                    "scheduled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                    "scheduled_at": clock.now().strftime("%Y-%m-%d %H:%M:%S"),
                                 }
                             ),
                         )
@@ -807,6 +917,8 @@ class IrrigationScheduler:
                         _w = _adj._get_weather()
                         _coeff = _adj.get_coefficient()
                         _adj.log_decision(_w, _coeff, bool(skip_info.get("skip")), skip_info.get("reason", ""))
+                        if _w is not None and not skip_info.get("skip"):
+                            self._record_program_plan(program_id, program_name, _w)
                 except Exception as e:
                     logger.debug("log_decision error: %s", e)
                 if skip_info.get("skip"):
@@ -828,279 +940,12 @@ class IrrigationScheduler:
                         logger.debug("Program weather skip log error: %s", e)
                     return
 
-            for _i, zone_id in enumerate(zones):
-                zone = self.db.get_zone(zone_id)
-                if not zone:
-                    logger.warning(f"Зона {zone_id} не найдена")
-                    continue
-
-                # Если для группы зоны установлена отмена, пропускаем её
-                group_id = int(zone.get("group_id") or 0)
-                # Проверяем отмену текущего запуска программы для этой группы на сегодня
-                try:
-                    today = datetime.now().strftime("%Y-%m-%d")
-                    from database import db as _db
-
-                    if _db.is_program_run_cancelled_for_group(int(program_id), today, int(group_id)):
-                        logger.info(
-                            f"Программа {program_id}: отменена для группы {group_id} на {today}, зона {zone_id} пропущена"
-                        )
-                        continue
-                except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                    logger.debug("Handled exception in _run_program_threaded: %s", e)
-                cancel_event = self.group_cancel_events.get(group_id)
-                if cancel_event and cancel_event.is_set():
-                    logger.info(f"Программа {program_id}: группа {group_id} отменена, зона {zone_id} пропущена")
-                    continue
-                # Drop a stale skip event from a previous zone — see _run_group_sequence comment.
-                _stale_skip = self.group_skip_current_events.get(group_id)
-                if _stale_skip and _stale_skip.is_set():
-                    _stale_skip.clear()
-                skipped_this_zone = False
-
-                # Проверяем отложенный полив
-                postpone_until = zone.get("postpone_until")
-                if postpone_until:
-                    postpone_dt = self._parse_dt(postpone_until)
-                    if postpone_dt is None or datetime.now() >= postpone_dt:
-                        # истекло или непарсибельно — сбрасываем
-                        self.db.update_zone_postpone(zone_id, None, None)
-                    else:
-                        logger.info(f"Зона {zone_id} отложена до {postpone_until}")
-                        continue
-
-                # Issue #31: manual runs use full zone duration without weather coefficient.
-                if manual:
-                    duration = int(zone["duration"])
-                else:
-                    duration = self._get_weather_adjusted_duration(zone_id, int(zone["duration"]))
-                if duration <= 0:
-                    logger.info(
-                        f"Программа {program_id}: зона {zone_id} имеет нулевую длительность (weather coef=0), пропуск"
-                    )
-                    continue
-
-                # БЕЗУСЛОВНО выключаем все зоны этой группы перед стартом текущей
-                try:
-                    all_zones = self.db.get_zones()
-                    group_peers = [z for z in all_zones if z["group_id"] == group_id and int(z["id"]) != int(zone_id)]
-                    for gz in group_peers:
-                        try:
-                            topic = (gz.get("topic") or "").strip()
-                            sid = gz.get("mqtt_server_id")
-                            if mqtt and topic and sid:
-                                t = normalize_topic(topic)
-                                server = self.db.get_mqtt_server(int(sid))
-                                if server:
-                                    logger.debug(f"SCHED publish OFF peer zone={gz['id']} topic={t}")
-                                    from services.mqtt_pub import publish_mqtt_value as _pub
-
-                                    _pub(server, t, "0", min_interval_sec=0.0, qos=2, retain=True)
-                        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                            logger.debug("Handled exception in line_383: %s", e)
-                        try:
-                            from services.zones_state import update_zone_state as _uzs
-
-                            _uzs(
-                                int(gz["id"]),
-                                {"state": "off", "watering_start_time": None},
-                                audit_reason="peer_off_scheduled",
-                                db=self.db,
-                            )
-                        except (sqlite3.Error, OSError, ImportError) as e:
-                            logger.debug("Handled exception in line_387: %s", e)
-                except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                    logger.debug("Handled exception in line_389: %s", e)
-                # Старт зоны: фиксируем время начала, чтобы таймер в UI работал
-                try:
-                    start_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    okv = False
-                    try:
-                        # update_zone_versioned now returns (ok, prev_zone) —
-                        # legacy ``okv`` boolean is the first element only.
-                        okv, _prev = self.db.update_zone_versioned(
-                            zone_id,
-                            {
-                                "state": "on",
-                                "watering_start_time": start_ts,
-                                "watering_start_source": "schedule",
-                                "commanded_state": "on",
-                            },
-                        )
-                        # Emit zone_state_change for the scheduled start so triage
-                        # can see the program-driven transition (analogous to
-                        # what services.zones_state.update_zone_state does, but
-                        # we keep the explicit versioned call here because the
-                        # caller checks `okv` to decide on the fallback).
-                        if okv and _prev is not None and str(_prev.get("state") or "").lower() != "on":
-                            try:
-                                from services.audit import record_audit
-
-                                record_audit(
-                                    action_type="zone_state_change",
-                                    source="irrigation_scheduler",
-                                    target=f"zone:{int(zone_id)}",
-                                    payload={
-                                        "from": _prev.get("state"),
-                                        "to": "on",
-                                        "reason": "scheduled_start",
-                                        "commanded_state": "on",
-                                    },
-                                    actor="system",
-                                )
-                            except Exception:
-                                logger.exception(
-                                    "irrigation_scheduler: audit emit (scheduled_start) failed zone=%s",
-                                    zone_id,
-                                )
-                    except (sqlite3.Error, OSError) as e:
-                        logger.debug("Exception in line_397: %s", e)
-                        okv = False
-                    if not okv:
-                        try:
-                            from services.zones_state import update_zone_state as _uzs
-
-                            _uzs(
-                                zone_id,
-                                {
-                                    "state": "on",
-                                    "watering_start_time": start_ts,
-                                    "watering_start_source": "schedule",
-                                    "commanded_state": "on",
-                                },
-                                audit_reason="scheduled_start_fallback",
-                                db=self.db,
-                            )
-                        except (sqlite3.Error, OSError, ImportError):
-                            logger.exception(
-                                "irrigation_scheduler: scheduled_start fallback failed zone=%s",
-                                zone_id,
-                            )
-                            self.db.update_zone(
-                                zone_id,
-                                {
-                                    "state": "on",
-                                    "watering_start_time": start_ts,
-                                    "watering_start_source": "schedule",
-                                    "commanded_state": "on",
-                                },
-                            )
-                    # Centralized start to ensure MV logic
-                    try:
-                        from services.zone_control import exclusive_start_zone as _start_central
-
-                        _start_central(int(zone_id), source="program")
-                    except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                        logger.debug("Handled exception in line_406: %s", e)
-                    end_time = datetime.now() + timedelta(minutes=duration)
-                    self.active_zones[zone_id] = end_time
-                    # write planned_end_time for watchdogs/diagnostics
-                    try:
-                        planned_str = end_time.strftime("%Y-%m-%d %H:%M:%S")
-                        self.db.update_zone(zone_id, {"planned_end_time": planned_str})
-                    except (sqlite3.Error, OSError) as e:
-                        logger.debug("Handled exception in line_413: %s", e)
-                    # Watchdog job
-                    try:
-                        self.schedule_zone_hard_stop(zone_id, end_time)
-                    except (ValueError, KeyError, RuntimeError) as e:
-                        logger.debug("Handled exception in line_418: %s", e)
-                    self.db.add_log(
-                        "zone_auto_start",
-                        json.dumps(
-                            {
-                                "zone_id": zone_id,
-                                "zone_name": zone["name"],
-                                "program_id": program_id,
-                                "program_name": program_name,
-                                "duration": duration,
-                                "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                            }
-                        ),
-                    )
-                except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
-                    logger.error(f"Ошибка запуска зоны {zone_id}: {e}")
-                    continue
-
-                # Ждем окончания текущей зоны с ранним выключением, проверяя отмену группы каждую секунду
-                # Раннее выключение настраивается в settings (0..15 сек)
-                try:
-                    from database import db as _db
-
-                    early = int(_db.get_early_off_seconds())
-                except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                    logger.debug("Exception in line_437: %s", e)
-                    early = 3
-                early = 0 if early < 0 else (15 if early > 15 else early)
-                total_seconds = duration * 60
-                if TESTING:
-                    total_seconds = min(6, max(1, duration))
-                    early = 0  # в тестовом режиме не усложняем тайминги
-                remaining = max(0, total_seconds - early)
-                while remaining > 0:
-                    cancel_event = self.group_cancel_events.get(group_id)
-                    if cancel_event and cancel_event.is_set():
-                        logger.info(
-                            f"Программа {program_id}: отмена группы {group_id}, досрочно останавливаем зону {zone_id}"
-                        )
-                        break
-                    skip_event = self.group_skip_current_events.get(group_id)
-                    if skip_event and skip_event.is_set():
-                        skip_event.clear()
-                        skipped_this_zone = True
-                        logger.info(f"Программа {program_id}: skip current zone {zone_id} (group {group_id})")
-                        break
-                    if self._shutdown_event.wait(timeout=1):
-                        logger.info(f"Программа {program_id}: shutdown, досрочно останавливаем зону {zone_id}")
-                        break
-                    remaining -= 1
-
-                # Centralized stop to ensure MV delayed close
-                try:
-                    from services.zone_control import stop_zone as _stop_central
-
-                    _stop_central(int(zone_id), reason="auto", force=False)
-                except (sqlite3.Error, OSError, ValueError, TypeError) as e:
-                    logger.debug("Exception in line_458: %s", e)
-                    self._stop_zone(zone_id)
-                self.active_zones.pop(zone_id, None)
-
-                if skipped_this_zone:
-                    try:
-                        self.db.add_log(
-                            "zone_skip",
-                            json.dumps(
-                                {
-                                    "program_id": program_id,
-                                    "group_id": group_id,
-                                    "zone_id": zone_id,
-                                    "zone_name": zone.get("name"),
-                                    "reason": "manual_skip",
-                                }
-                            ),
-                        )
-                    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
-                        logger.debug("zone_skip log error: %s", e)
-                    continue
-
-                # Дождёмся оставшиеся ранние секунды до «номинального» конца зоны, чтобы старт следующей был вовремя
-                if early > 0:
-                    waited = 0
-                    while waited < early:
-                        cancel_event = self.group_cancel_events.get(group_id)
-                        if cancel_event and cancel_event.is_set():
-                            break
-                        if self._shutdown_event.wait(timeout=1):
-                            break
-                        waited += 1
-
-                # Если отмена — пропускаем оставшиеся зоны этой группы, но не мешаем другим группам
-                cancel_event = self.group_cancel_events.get(group_id)
-                if cancel_event and cancel_event.is_set():
-                    logger.info(
-                        f"Программа {program_id}: отменена для группы {group_id}, продолжаем с другими группами (если есть)"
-                    )
-                    continue
+            slices = self._program_group_slices(zones, zone_groups)
+            if len(slices) > 1 and self._program_parallel_limit() != 1:
+                self._run_program_parallel(program_id, program_name, slices, manual)
+            else:
+                for zone_id in zones:
+                    self._run_program_zone(program_id, program_name, zone_id, manual)
 
             logger.info(f"Программа {program_id} ({program_name}) завершена")
             try:
@@ -1133,13 +978,384 @@ class IrrigationScheduler:
                 except (KeyError, TypeError, ValueError) as e:
                     logger.debug("_run_program_threaded skip-cleanup gid=%s: %s", gid, e)
 
+    def _run_program_zone(self, program_id: int, program_name: str, zone_id: int, manual: bool = False):
+        """Полив одной зоны программы: проверки отмены/отложки, старт, ожидание, стоп.
+
+        Вызывается последовательно из ``_run_program_threaded`` либо из воркера
+        очереди группы (``ProgramQueueManager``) при параллельном запуске групп.
+        """
+        zone = self.db.get_zone(zone_id)
+        if not zone:
+            logger.warning(f"Зона {zone_id} не найдена")
+            return
+
+        # Если для группы зоны установлена отмена, пропускаем её
+        group_id = int(zone.get("group_id") or 0)
+        # Проверяем отмену текущего запуска программы для этой группы на сегодня
+        try:
+            today = clock.now().strftime("%Y-%m-%d")
+            from database import db as _db
+
+            if _db.is_program_run_cancelled_for_group(int(program_id), today, int(group_id)):
+                logger.info(
+                    f"Программа {program_id}: отменена для группы {group_id} на {today}, зона {zone_id} пропущена"
+                )
+                return
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("Handled exception in _run_program_threaded: %s", e)
+        cancel_event = self.group_cancel_events.get(group_id)
+        if cancel_event and cancel_event.is_set():
+            logger.info(f"Программа {program_id}: группа {group_id} отменена, зона {zone_id} пропущена")
+            return
+        # Drop a stale skip event from a previous zone — see _run_group_sequence comment.
+        _stale_skip = self.group_skip_current_events.get(group_id)
+        if _stale_skip and _stale_skip.is_set():
+            _stale_skip.clear()
+        skipped_this_zone = False
+
+        # Проверяем отложенный полив
+        postpone_until = zone.get("postpone_until")
+        if postpone_until:
+            postpone_dt = self._parse_dt(postpone_until)
+            if postpone_dt is None or clock.now() >= postpone_dt:
+                # истекло или непарсибельно — сбрасываем
+                self.db.update_zone_postpone(zone_id, None, None)
+            else:
+                logger.info(f"Зона {zone_id} отложена до {postpone_until}")
+                return
+
+        # Issue #31: manual runs use full zone duration without weather coefficient.
+        if manual:
+            duration = int(zone["duration"])
+        else:
+            duration = self._get_weather_adjusted_duration(zone_id, int(zone["duration"]))
+        if duration <= 0:
+            logger.info(f"Программа {program_id}: зона {zone_id} имеет нулевую длительность (weather coef=0), пропуск")
+            return
+
+        # БЕЗУСЛОВНО выключаем все зоны этой группы перед стартом текущей
+        try:
+            all_zones = self.db.get_zones()
+            group_peers = [z for z in all_zones if z["group_id"] == group_id and int(z["id"]) != int(zone_id)]
+            for gz in group_peers:
+                try:
+                    topic = (gz.get("topic") or "").strip()
+                    sid = gz.get("mqtt_server_id")
+                    if mqtt and topic and sid:
+                        t = normalize_topic(topic)
+                        server = self.db.get_mqtt_server(int(sid))
+                        if server:
+                            logger.debug(f"SCHED publish OFF peer zone={gz['id']} topic={t}")
+                            from services.mqtt_pub import publish_mqtt_value as _pub
+
+                            _pub(server, t, "0", min_interval_sec=0.0, qos=2, retain=True)
+                except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+                    logger.debug("Handled exception in line_383: %s", e)
+                try:
+                    from services.zones_state import update_zone_state as _uzs
+
+                    _uzs(
+                        int(gz["id"]),
+                        {"state": "off", "watering_start_time": None},
+                        audit_reason="peer_off_scheduled",
+                        db=self.db,
+                    )
+                except (sqlite3.Error, OSError, ImportError) as e:
+                    logger.debug("Handled exception in line_387: %s", e)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("Handled exception in line_389: %s", e)
+        # Старт зоны: фиксируем время начала, чтобы таймер в UI работал
+        try:
+            start_ts = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+            okv = False
+            try:
+                # update_zone_versioned now returns (ok, prev_zone) —
+                # legacy ``okv`` boolean is the first element only.
+                okv, _prev = self.db.update_zone_versioned(
+                    zone_id,
+                    {
+                        "state": "on",
+                        "watering_start_time": start_ts,
+                        "watering_start_source": "schedule",
+                        "commanded_state": "on",
+                    },
+                )
+                # Emit zone_state_change for the scheduled start so triage
+                # can see the program-driven transition (analogous to
+                # what services.zones_state.update_zone_state does, but
+                # we keep the explicit versioned call here because the
+                # caller checks `okv` to decide on the fallback).
+                if okv and _prev is not None and str(_prev.get("state") or "").lower() != "on":
+                    try:
+                        from services.audit import record_audit
+
+                        record_audit(
+                            action_type="zone_state_change",
+                            source="irrigation_scheduler",
+                            target=f"zone:{int(zone_id)}",
+                            payload={
+                                "from": _prev.get("state"),
+                                "to": "on",
+                                "reason": "scheduled_start",
+                                "commanded_state": "on",
+                            },
+                            actor="system",
+                        )
+                    except Exception:
+                        logger.exception(
+                            "irrigation_scheduler: audit emit (scheduled_start) failed zone=%s",
+                            zone_id,
+                        )
+            except (sqlite3.Error, OSError) as e:
+                logger.debug("Exception in line_397: %s", e)
+                okv = False
+            if not okv:
+                try:
+                    from services.zones_state import update_zone_state as _uzs
+
+                    _uzs(
+                        zone_id,
+                        {
+                            "state": "on",
+                            "watering_start_time": start_ts,
+                            "watering_start_source": "schedule",
+                            "commanded_state": "on",
+                        },
+                        audit_reason="scheduled_start_fallback",
+                        db=self.db,
+                    )
+                except (sqlite3.Error, OSError, ImportError):
+                    logger.exception(
+                        "irrigation_scheduler: scheduled_start fallback failed zone=%s",
+                        zone_id,
+                    )
+                    self.db.update_zone(
+                        zone_id,
+                        {
+                            "state": "on",
+                            "watering_start_time": start_ts,
+                            "watering_start_source": "schedule",
+                            "commanded_state": "on",
+                        },
+                    )
+            # Centralized start to ensure MV logic
+            try:
+                from services.zone_control import exclusive_start_zone as _start_central
+
+                _start_central(int(zone_id), source="program")
+            except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+                logger.debug("Handled exception in line_406: %s", e)
+            end_time = clock.now() + timedelta(minutes=duration)
+            self.active_zones[zone_id] = end_time
+            # write planned_end_time for watchdogs/diagnostics
+            try:
+                planned_str = end_time.strftime("%Y-%m-%d %H:%M:%S")
+                self.db.update_zone(zone_id, {"planned_end_time": planned_str})
+            except (sqlite3.Error, OSError) as e:
+                logger.debug("Handled exception in line_413: %s", e)
+            # Watchdog job
+            try:
+                self.schedule_zone_hard_stop(zone_id, end_time)
+            except (ValueError, KeyError, RuntimeError) as e:
+                logger.debug("Handled exception in line_418: %s", e)
+            self.db.add_log(
+                "zone_auto_start",
+                json.dumps(
+                    {
+                        "zone_id": zone_id,
+                        "zone_name": zone["name"],
+                        "program_id": program_id,
+                        "program_name": program_name,
+                        "duration": duration,
+                        "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                    }
+                ),
+            )
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"Ошибка запуска зоны {zone_id}: {e}")
+            return
+
+        # Ждем окончания текущей зоны с ранним выключением, проверяя отмену группы каждую секунду
+        # Раннее выключение настраивается в settings (0..15 сек)
+        try:
+            from database import db as _db
+
+            early = int(_db.get_early_off_seconds())
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("Exception in line_437: %s", e)
+            early = 3
+        early = 0 if early < 0 else (15 if early > 15 else early)
+        total_seconds = duration * 60
+        if TESTING:
+            total_seconds = min(6, max(1, duration))
+            early = 0  # в тестовом режиме не усложняем тайминги
+        remaining = max(0, total_seconds - early)
+        while remaining > 0:
+            cancel_event = self.group_cancel_events.get(group_id)
+            if cancel_event and cancel_event.is_set():
+                logger.info(f"Программа {program_id}: отмена группы {group_id}, досрочно останавливаем зону {zone_id}")
+                break
+            skip_event = self.group_skip_current_events.get(group_id)
+            if skip_event and skip_event.is_set():
+                skip_event.clear()
+                skipped_this_zone = True
+                logger.info(f"Программа {program_id}: skip current zone {zone_id} (group {group_id})")
+                break
+            if clock.wait(self._shutdown_event, 1):
+                logger.info(f"Программа {program_id}: shutdown, досрочно останавливаем зону {zone_id}")
+                break
+            remaining -= 1
+
+        # Centralized stop to ensure MV delayed close
+        try:
+            from services.zone_control import stop_zone as _stop_central
+
+            _stop_central(int(zone_id), reason="auto", force=False)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("Exception in line_458: %s", e)
+            self._stop_zone(zone_id)
+        self.active_zones.pop(zone_id, None)
+
+        if skipped_this_zone:
+            try:
+                self.db.add_log(
+                    "zone_skip",
+                    json.dumps(
+                        {
+                            "program_id": program_id,
+                            "group_id": group_id,
+                            "zone_id": zone_id,
+                            "zone_name": zone.get("name"),
+                            "reason": "manual_skip",
+                        }
+                    ),
+                )
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                logger.debug("zone_skip log error: %s", e)
+            return
+
+        # Дождёмся оставшиеся ранние секунды до «номинального» конца зоны, чтобы старт следующей был вовремя
+        if early > 0:
+            waited = 0
+            while waited < early:
+                cancel_event = self.group_cancel_events.get(group_id)
+                if cancel_event and cancel_event.is_set():
+                    break
+                if clock.wait(self._shutdown_event, 1):
+                    break
+                waited += 1
+
+        # Если отмена — пропускаем оставшиеся зоны этой группы, но не мешаем другим группам
+        cancel_event = self.group_cancel_events.get(group_id)
+        if cancel_event and cancel_event.is_set():
+            logger.info(
+                f"Программа {program_id}: отменена для группы {group_id}, продолжаем с другими группами (если есть)"
+            )
+
+    # --- Параллельный запуск групп программы ---
+    @staticmethod
+    def _program_group_slices(zones: list[int], zone_groups: dict[int, int]) -> list[tuple[int, list[int]]]:
+        """Разбивает зоны программы по группам, сохраняя порядок зон внутри группы."""
+        slices: dict[int, list[int]] = {}
+        for zid in zones:
+            slices.setdefault(zone_groups.get(int(zid), 0), []).append(zid)
+        return list(slices.items())
+
+    def _program_setting(self, key: str, default: float) -> float:
+        try:
+            raw = self.db.get_setting_value(key)
+            return float(raw) if raw not in (None, "") else default
+        except (sqlite3.Error, OSError, ValueError, TypeError, AttributeError) as e:
+            logger.debug("settings[%s] read failed: %s", key, e)
+            return default
+
+    def _program_parallel_limit(self) -> int:
+        """Сколько групп программы поливаются одновременно (1 = последовательно, как раньше).
+
+        program_max_parallel_groups > 1 действует только при заданном
+        program_flow_budget_lpm: без бюджета несколько групп на одном насосе
+        просаживают давление, поэтому остаёмся на последовательном поливе.
+        """
+        limit = max(1, int(self._program_setting("program_max_parallel_groups", PROGRAM_MAX_PARALLEL_GROUPS)))
+        if limit > 1 and self._program_setting("program_flow_budget_lpm", PROGRAM_FLOW_BUDGET_LPM) <= 0:
+            logger.debug("program_max_parallel_groups=%s ignored: program_flow_budget_lpm not set", limit)
+            return 1
+        return limit
+
+    def _program_zone_demand(self, zone_id: int) -> float:
+        """Ожидаемый расход зоны (л/мин) по последнему поливу — для бюджета насоса."""
+        try:
+            zone = self.db.get_zone(zone_id) or {}
+            return float(zone.get("last_avg_flow_lpm") or 0.0)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("zone %s flow lookup failed: %s", zone_id, e)
+            return 0.0
+
+    def _get_program_queue(self):
+        """Ленивая инициализация очереди групп (воркер на группу)."""
+        with self._program_queue_lock:
+            if self.program_queue is None:
+                from services.program_queue import ProgramQueueManager
+
+                self.program_queue = ProgramQueueManager(
+                    db=self.db,
+                    shutdown_event=self._shutdown_event,
+                    zone_runner=lambda entry, zone_id, _coeff: self._run_program_zone(
+                        entry.program_id, entry.program_name, zone_id, entry.manual
+                    ),
+                    zone_demand=self._program_zone_demand,
+                    completion_tracker=self.program_tracker,
+                )
+            return self.program_queue
+
+    def _run_program_parallel(
+        self, program_id: int, program_name: str, slices: list[tuple[int, list[int]]], manual: bool
+    ) -> None:
+        """Запускает группы программы параллельно и ждёт самую длинную.
+
+        Каждая группа — отдельная запись в очереди своей группы; общий
+        program_run_id отслеживается ProgramCompletionTracker. Лимиты
+        (число одновременно поливаемых групп, бюджет насоса л/мин) читаются
+        из settings при каждом запуске.
+        """
+        queue = self._get_program_queue()
+        queue.set_limits(
+            max_parallel=self._program_parallel_limit(),
+            flow_budget_lpm=self._program_setting("program_flow_budget_lpm", PROGRAM_FLOW_BUDGET_LPM),
+        )
+        run_id, entries = queue.enqueue_program(
+            program_id, program_name, slices, scheduled_time=clock.now(), manual=manual
+        )
+        logger.info("Программа %s: параллельный запуск %d групп (run=%s)", program_id, len(entries), run_id)
+        while not self.program_tracker.wait(run_id, timeout=1.0):
+            if self._shutdown_event.is_set():
+                logger.info("Программа %s: shutdown, не ждём завершения групп", program_id)
+                return
+
     def schedule_program(self, program_id: int, program_data: dict[str, Any]):
+        """(Пере)компилировать одну программу в общий timeline и перевзвести диспетчер."""
+        with self._timeline_lock:
+            starts = self._schedule_program(program_id, program_data, since=clock.now())
+            if starts is None:
+                return
+            self._timeline_ready = True
+            self._arm_program_dispatch()
+        self._write_scheduled_starts(starts)
+
+    def _schedule_program(
+        self, program_id: int, program_data: dict[str, Any], since: datetime, zones_by_id: dict | None = None
+    ) -> dict[int, str] | None:
+        """Compile *program_data* into the timeline (``_timeline_lock`` held).
+
+        Returns the zones' planned start times for today (to be written by
+        the caller) or None if the program was skipped.
+        """
         try:
             # Проверка enabled — если выключена, отменяем и выходим
             if not program_data.get("enabled", True):
                 logger.info(f"Программа {program_id} выключена (enabled=0), отменяем расписание")
                 self.cancel_program(program_id)
-                return
+                return None
 
             time_str = program_data["time"]  # 'HH:MM'
             hours, minutes = map(int, time_str.split(":"))
@@ -1148,7 +1364,7 @@ class IrrigationScheduler:
 
             if not zones:
                 logger.warning(f"Программа {program_id} имеет пустые зоны, пропуск")
-                return
+                return None
 
             schedule_type = program_data.get("schedule_type", "weekdays")
             days: list[int] = program_data.get("days", [])  # 0-6, где 0=Пн
@@ -1156,160 +1372,179 @@ class IrrigationScheduler:
             # Для weekdays нужны дни, для interval/even-odd — нет
             if schedule_type == "weekdays" and not days:
                 logger.warning(f"Программа {program_id} имеет schedule_type=weekdays но пустые дни, пропуск")
-                return
-
-            # Удаляем прежние задания программы
-            self.cancel_program(program_id)
+                return None
 
             # Предварительно рассчитанные плановые старты зон в рамках программы (на каждый день одинаковый порядок)
-            try:
-                now = datetime.now()
-                cumulative = 0
-                schedule_map: dict[int, str] = {}
-                for zid in zones:
-                    zone = self.db.get_zone(zid)
-                    if not zone:
-                        continue
-                    start_dt = datetime(now.year, now.month, now.day, hours, minutes) + timedelta(minutes=cumulative)
-                    schedule_map[zid] = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    cumulative += int(zone.get("duration") or 0)
-                # Записываем плановые старты для всех затронутых зон (без привязки к группе)
-                # Программы могут включать зоны из разных групп — пишем напрямую по zone_id
-                for zid, ts in schedule_map.items():
-                    self.db.update_zone(zid, {"scheduled_start_time": ts})
-            except (sqlite3.Error, OSError) as e:
-                logger.error(f"Ошибка расчета плановых стартов для программы {program_id}: {e}")
-
-            job_ids: list[str] = []
-
-            # Основное время старта
-            self._schedule_single_time(program_id, program_data, time_str, "main", job_ids)
-
-            # Дополнительные времена (extra_times)
-            extra_times = program_data.get("extra_times", [])
-            if isinstance(extra_times, str):
-                try:
-                    extra_times = json.loads(extra_times)
-                except (json.JSONDecodeError, TypeError):
-                    extra_times = []
-
-            for idx, extra_time in enumerate(extra_times):
-                self._schedule_single_time(program_id, program_data, extra_time, f"extra:{idx}", job_ids)
+            if zones_by_id is None:
+                zones_by_id = {int(z["id"]): z for z in self.db.get_zones()}
+            now = clock.now()
+            cumulative = 0
+            schedule_map: dict[int, str] = {}
+            for zid in zones:
+                zone = zones_by_id.get(int(zid))
+                if not zone:
+                    continue
+                start_dt = datetime(now.year, now.month, now.day, hours, minutes) + timedelta(minutes=cumulative)
+                schedule_map[zid] = start_dt.strftime("%Y-%m-%d %H:%M:%S")
+                cumulative += int(zone.get("duration") or 0)
 
+            slots = compile_program_slots(program_id, program_data, now)
+            job_ids = self.program_timeline.set_program(program_id, slots, since)
+            self._program_runs[program_id] = (zones, str(program_data["name"]))
             self.program_jobs[program_id] = job_ids
             logger.info(
                 f"Программа {program_id} ({program_data['name']}) запланирована: {schedule_type}, {len(job_ids)} jobs"
             )
+            return schedule_map
         except (sqlite3.Error, OSError, KeyError, ValueError) as e:
             logger.error(f"Ошибка планирования программы {program_id}: {e}")
+            return None
 
-    def _schedule_single_time(
-        self, program_id: int, program_data: dict[str, Any], time_str: str, suffix: str, job_ids: list[str]
-    ):
-        """Создать jobs для одного времени старта (main или extra_times)."""
+    def _write_scheduled_starts(self, schedule: dict[int, str]) -> None:
+        # Программы могут включать зоны из разных групп — пишем напрямую по zone_id, одним UPDATE
+        if not schedule:
+            return
         try:
-            hours, minutes = map(int, time_str.split(":"))
-            zones: list[int] = list(program_data["zones"])
-            zones.sort()
-            schedule_type = program_data.get("schedule_type", "weekdays")
-            days: list[int] = program_data.get("days", [])
-
-            if schedule_type == "weekdays":
-                # Текущая логика: CronTrigger для каждого дня
-                for day in days:
-                    trigger = CronTrigger(day_of_week=day, hour=hours, minute=minutes)
-                    _kwargs = dict(
-                        args=[program_id, zones, program_data["name"]],
-                        id=f"program:{program_id}:{suffix}:d{day}",
-                        replace_existing=True,
-                        misfire_grace_time=3600,
-                        coalesce=False,
-                        max_instances=1,
-                    )
-                    if getattr(self, "has_default_jobstore", False):
-                        _kwargs["jobstore"] = "default"
-                    job = self.scheduler.add_job(
-                        job_run_program,
-                        trigger,
-                        **_kwargs,
-                    )
-                    job_ids.append(job.id)
-
-            elif schedule_type == "interval":
-                # IntervalTrigger: каждые N дней
-                interval_days = int(program_data.get("interval_days", 1))
-                # Первый запуск — сегодня в указанное время (если ещё не прошло) или завтра
-                now = datetime.now()
-                start_date = datetime(now.year, now.month, now.day, hours, minutes, 0, 0)
-                if start_date <= now:
-                    # Если время уже прошло сегодня — первый запуск завтра
-                    start_date += timedelta(days=1)
-
-                trigger = IntervalTrigger(days=interval_days, start_date=start_date)
-                _kwargs = dict(
-                    args=[program_id, zones, program_data["name"]],
-                    id=f"program:{program_id}:{suffix}",
-                    replace_existing=True,
-                    misfire_grace_time=3600,
-                    coalesce=False,
-                    max_instances=1,
-                )
-                if getattr(self, "has_default_jobstore", False):
-                    _kwargs["jobstore"] = "default"
-                job = self.scheduler.add_job(
-                    job_run_program,
-                    trigger,
-                    **_kwargs,
-                )
-                job_ids.append(job.id)
-
-            elif schedule_type == "even-odd":
-                # CronTrigger с днями месяца (чётные/нечётные)
-                even_odd = program_data.get("even_odd", "even")
-                if even_odd == "even":
-                    day_str = "2,4,6,8,10,12,14,16,18,20,22,24,26,28,30"
-                else:
-                    day_str = "1,3,5,7,9,11,13,15,17,19,21,23,25,27,29,31"
-
-                trigger = CronTrigger(day=day_str, hour=hours, minute=minutes)
-                _kwargs = dict(
-                    args=[program_id, zones, program_data["name"]],
-                    id=f"program:{program_id}:{suffix}",
-                    replace_existing=True,
-                    misfire_grace_time=3600,
-                    coalesce=False,
-                    max_instances=1,
-                )
-                if getattr(self, "has_default_jobstore", False):
-                    _kwargs["jobstore"] = "default"
-                job = self.scheduler.add_job(
-                    job_run_program,
-                    trigger,
-                    **_kwargs,
-                )
-                job_ids.append(job.id)
-
-        except (ValueError, KeyError, TypeError) as e:
-            logger.error(f"Ошибка планирования времени {time_str} для программы {program_id}: {e}")
+            self.db.set_zones_scheduled_starts(schedule)
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Ошибка записи плановых стартов: {e}")
 
     def cancel_program(self, program_id: int):
         try:
-            job_ids = self.program_jobs.get(program_id, [])
+            with self._timeline_lock:
+                job_ids = self.program_jobs.get(program_id, [])
+                self.program_timeline.remove_program(program_id)
+                self._program_runs.pop(program_id, None)
+                self.program_jobs[program_id] = []
+                self._arm_program_dispatch()
             for job_id in job_ids:
-                try:
-                    self.scheduler.remove_job(job_id)
-                    self._emit_timer_audit(
-                        "scheduler_timer_cancel",
-                        f"program:{int(program_id)}",
-                        {"job_id": job_id},
-                    )
-                except (ValueError, KeyError, RuntimeError) as e:
-                    logger.debug("Handled exception in cancel_program: %s", e)
-            self.program_jobs[program_id] = []
+                self._emit_timer_audit(
+                    "scheduler_timer_cancel",
+                    f"program:{int(program_id)}",
+                    {"job_id": job_id},
+                )
             logger.info(f"Программа {program_id} отменена")
         except (KeyError, TypeError, ValueError) as e:
             logger.error(f"Ошибка отмены программы {program_id}: {e}")
 
+    # --- Диспетчер программ: одна персистентная задача на ближайший старт ---
+    def _arm_program_dispatch(self, now: datetime | None = None) -> None:
+        """(Пере)взвести задачу ``program_dispatch`` на ближайший старт (``_timeline_lock`` held).
+
+        Аргумент задачи — курсор с точностью до микросекунд: всё, что не
+        позже курсора, уже обработано, старты строго после него ещё не
+        запускались. После рестарта по нему догоняются пропущенные старты
+        (в пределах PROGRAM_MISFIRE_GRACE_SEC), как раньше у cron-задач, а
+        только что отработавший старт не запускается повторно.
+        """
+        next_at = self.program_timeline.peek()
+        try:
+            if next_at is None:
+                self.scheduler.remove_job(PROGRAM_DISPATCH_JOB_ID)
+                return
+        except (KeyError, ValueError, RuntimeError) as e:
+            logger.debug("program_dispatch remove: %s", e)
+            return
+        now = now or clock.now()
+        # Если ближайший старт уже наступил, но ещё не разослан — курсор прямо перед ним
+        cursor = min(now, next_at - DISPATCH_CURSOR_STEP)
+        _kwargs = dict(
+            args=[cursor.isoformat(sep=" ", timespec="microseconds")],
+            id=PROGRAM_DISPATCH_JOB_ID,
+            replace_existing=True,
+            misfire_grace_time=PROGRAM_MISFIRE_GRACE_SEC,
+            coalesce=True,
+            max_instances=1,
+        )
+        if getattr(self, "has_default_jobstore", False):
+            _kwargs["jobstore"] = "default"
+        try:
+            self.scheduler.add_job(job_dispatch_programs, DateTrigger(run_date=next_at), **_kwargs)
+        except (ValueError, KeyError, TypeError, RuntimeError) as e:
+            logger.error(f"Не удалось взвести диспетчер программ: {e}")
+
+    def _dispatch_resume_point(self, cursor: str | None = None) -> datetime:
+        """С какого момента компилировать timeline на старте: строго после курсора сохранённой задачи, но не старше grace."""
+        now = clock.now()
+        if cursor is None:
+            try:
+                job = self.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID)
+                cursor = job.args[0] if job is not None and job.args else None
+            except (AttributeError, KeyError, ValueError, TypeError, LookupError) as e:
+                logger.debug("program_dispatch lookup: %s", e)
+        since = None
+        if cursor:
+            try:
+                since = datetime.fromisoformat(str(cursor)) + DISPATCH_CURSOR_STEP
+            except ValueError as e:
+                logger.debug("program_dispatch cursor %r: %s", cursor, e)
+        if since is None or since > now or (now - since).total_seconds() > PROGRAM_MISFIRE_GRACE_SEC:
+            return now
+        return since
+
+    def _remove_legacy_program_jobs(self) -> None:
+        """Убрать per-slot cron-задачи ``program:*`` из jobs.db (до перехода на диспетчер)."""
+        try:
+            for job in self.scheduler.get_jobs():
+                if str(job.id).startswith("program:"):
+                    self.scheduler.remove_job(job.id)
+        except (AttributeError, KeyError, ValueError, RuntimeError) as e:
+            logger.debug("legacy program jobs cleanup: %s", e)
+
+    def dispatch_programs(self, cursor: str | None = None) -> int:
+        """Запустить все наступившие старты программ и перевзвести диспетчер.
+
+        Returns number of program runs started.
+        """
+        now = clock.now()
+        with self._timeline_lock:
+            if not self._timeline_ready:
+                # APScheduler поднял сохранённую задачу раньше load_programs (boot)
+                self._load_timeline(self._dispatch_resume_point(cursor))
+            due = self.program_timeline.pop_due(now)
+            runs = [(fire_at, slot, self._program_runs.get(slot.program_id)) for fire_at, slot in due]
+            self._arm_program_dispatch(now)
+
+        started = 0
+        for fire_at, slot, run in runs:
+            if run is None:
+                continue
+            late = (now - fire_at).total_seconds()
+            if late > PROGRAM_MISFIRE_GRACE_SEC:
+                logger.warning(f"Программа {slot.program_id}: старт {fire_at} пропущен (опоздание {int(late)} с)")
+                continue
+            zones, name = run
+            _kwargs = dict(
+                args=[slot.program_id, list(zones), name],
+                id=f"{slot.key}@{fire_at.strftime('%Y%m%d%H%M')}",
+                replace_existing=True,
+                misfire_grace_time=PROGRAM_MISFIRE_GRACE_SEC,
+                coalesce=False,
+                max_instances=1,
+            )
+            if getattr(self, "has_volatile_jobstore", False):
+                _kwargs["jobstore"] = "volatile"
+            try:
+                self.scheduler.add_job(job_run_program, DateTrigger(run_date=now), **_kwargs)
+                started += 1
+            except (ValueError, KeyError, TypeError, RuntimeError) as e:
+                logger.error(f"Не удалось запустить программу {slot.program_id}: {e}")
+        return started
+
+    def _load_timeline(self, since: datetime) -> None:
+        """Скомпилировать все программы из БД (``_timeline_lock`` held)."""
+        programs = self.db.get_programs()
+        zones_by_id = {int(z["id"]): z for z in self.db.get_zones()}
+        self.program_timeline.clear()
+        self._program_runs.clear()
+        starts: dict[int, str] = {}
+        for program in programs:
+            starts.update(self._schedule_program(program["id"], program, since, zones_by_id) or {})
+        self._timeline_ready = True
+        self._arm_program_dispatch()
+        self._write_scheduled_starts(starts)
+        logger.info(f"Загружено {len(programs)} программ ({len(self.program_timeline)} стартов в timeline)")
+
     @staticmethod
     def _emit_timer_audit(action: str, target: str, payload: dict) -> None:
         """Best-effort debug emit for scheduler timer plant/cancel events."""
@@ -1346,38 +1581,27 @@ class IrrigationScheduler:
             if TESTING:
                 total_seconds = min(6, max(1, int(duration_minutes)))
                 early = 0
-                run_at = datetime.now() + timedelta(seconds=total_seconds)
+                run_at = clock.now() + timedelta(seconds=total_seconds)
             else:
-                run_at = datetime.now() + timedelta(minutes=int(duration_minutes)) - timedelta(seconds=early)
+                run_at = clock.now() + timedelta(minutes=int(duration_minutes)) - timedelta(seconds=early)
             # Гарантируем, что время в будущем (минимум +1 сек)
-            now = datetime.now()
+            now = clock.now()
             if run_at <= now:
                 run_at = now + timedelta(seconds=1)
             # Стандартизованный ID (используем command_id при наличии)
-            _kwargs = dict(
-                args=[zone_id],
-                id=(
-                    f"zone_stop:{int(zone_id)}:{command_id!s}"
-                    if command_id
-                    else f"zone_stop:{int(zone_id)}:{int(run_at.timestamp())}"
-                ),
-                replace_existing=False,
-                misfire_grace_time=120,
-            )
-            if getattr(self, "has_volatile_jobstore", False):
-                _kwargs["jobstore"] = "volatile"
-            self.scheduler.add_job(
-                job_stop_zone,
-                DateTrigger(run_date=run_at),
-                **_kwargs,
+            timer_id = (
+                f"zone_stop:{int(zone_id)}:{command_id!s}"
+                if command_id
+                else f"zone_stop:{int(zone_id)}:{int(run_at.timestamp())}"
             )
+            self.timers.arm(timer_id, "stop_zone", zone_id, run_at, misfire_grace=120)
             self.active_zones[zone_id] = run_at
             self._emit_timer_audit(
                 "scheduler_timer_plant",
                 f"zone:{int(zone_id)}",
                 {
                     "job": "zone_stop",
-                    "job_id": _kwargs.get("id"),
+                    "job_id": timer_id,
                     "duration_minutes": int(duration_minutes),
                     "run_at": run_at.isoformat(timespec="seconds"),
                 },
@@ -1389,28 +1613,15 @@ class IrrigationScheduler:
     def schedule_zone_hard_stop(self, zone_id: int, run_at: datetime):
         """Жёсткий watchdog-стоп зоны на точное время run_at (доп. страховка)."""
         try:
-            now = datetime.now()
+            now = clock.now()
             if run_at <= now:
                 run_at = now + timedelta(seconds=1)
-            _kwargs = dict(
-                args=[zone_id],
-                id=f"zone_hard_stop:{int(zone_id)}",
-                replace_existing=True,
-                misfire_grace_time=60,
-                coalesce=False,
-                max_instances=1,
-            )
-            if getattr(self, "has_volatile_jobstore", False):
-                _kwargs["jobstore"] = "volatile"
-            self.scheduler.add_job(
-                job_stop_zone,
-                DateTrigger(run_date=run_at),
-                **_kwargs,
-            )
+            timer_id = f"zone_hard_stop:{int(zone_id)}"
+            self.timers.arm(timer_id, "stop_zone", zone_id, run_at, misfire_grace=60)
             self._emit_timer_audit(
                 "scheduler_timer_plant",
                 f"zone:{int(zone_id)}",
-                {"job": "zone_hard_stop", "job_id": _kwargs.get("id"), "run_at": run_at.isoformat(timespec="seconds")},
+                {"job": "zone_hard_stop", "job_id": timer_id, "run_at": run_at.isoformat(timespec="seconds")},
             )
             logger.info(f"Watchdog: zone {zone_id} hard-stop at {run_at}")
         except (ValueError, TypeError, KeyError) as e:
@@ -1419,20 +1630,10 @@ class IrrigationScheduler:
     def schedule_zone_cap(self, zone_id: int, cap_minutes: int = 240):
         """Абсолютный лимит работы зоны: форс-стоп через cap_minutes от текущего момента."""
         try:
-            run_at = datetime.now() + timedelta(minutes=int(cap_minutes))
+            run_at = clock.now() + timedelta(minutes=int(cap_minutes))
             # Уникальный job id для капа
             job_id = f"zone_cap_stop:{int(zone_id)}"
-            _kwargs = dict(
-                args=[zone_id],
-                id=job_id,
-                replace_existing=True,
-                misfire_grace_time=300,
-                coalesce=False,
-                max_instances=1,
-            )
-            if getattr(self, "has_volatile_jobstore", False):
-                _kwargs["jobstore"] = "volatile"
-            self.scheduler.add_job(job_stop_zone, DateTrigger(run_date=run_at), **_kwargs)
+            self.timers.arm(job_id, "stop_zone", zone_id, run_at, misfire_grace=300)
             self._emit_timer_audit(
                 "scheduler_timer_plant",
                 f"zone:{int(zone_id)}",
@@ -1450,15 +1651,12 @@ class IrrigationScheduler:
     def cancel_zone_cap(self, zone_id: int):
         try:
             job_id = f"zone_cap_stop:{int(zone_id)}"
-            try:
-                self.scheduler.remove_job(job_id)
+            if self.timers.cancel(job_id):
                 self._emit_timer_audit(
                     "scheduler_timer_cancel",
                     f"zone:{int(zone_id)}",
                     {"job": "zone_cap_stop", "job_id": job_id},
                 )
-            except (ValueError, KeyError, RuntimeError) as e:
-                logger.debug("Handled exception in cancel_zone_cap: %s", e)
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Ошибка отмены cap-стопа зоны {zone_id}: {e}")
 
@@ -1467,19 +1665,9 @@ class IrrigationScheduler:
         Перепланируется при повторных вызовах.
         """
         try:
-            run_at = datetime.now() + timedelta(hours=int(hours))
+            run_at = clock.now() + timedelta(hours=int(hours))
             job_id = f"master_cap_close:{int(group_id)}"
-            _kwargs = dict(
-                args=[group_id],
-                id=job_id,
-                replace_existing=True,
-                misfire_grace_time=600,
-                coalesce=False,
-                max_instances=1,
-            )
-            if getattr(self, "has_volatile_jobstore", False):
-                _kwargs["jobstore"] = "volatile"
-            self.scheduler.add_job(job_close_master_valve, DateTrigger(run_date=run_at), **_kwargs)
+            self.timers.arm(job_id, "close_master_valve", group_id, run_at, misfire_grace=600)
             self._emit_timer_audit(
                 "scheduler_timer_plant",
                 f"group:{int(group_id)}",
@@ -1497,15 +1685,12 @@ class IrrigationScheduler:
     def cancel_master_valve_cap(self, group_id: int):
         try:
             job_id = f"master_cap_close:{int(group_id)}"
-            try:
-                self.scheduler.remove_job(job_id)
+            if self.timers.cancel(job_id):
                 self._emit_timer_audit(
                     "scheduler_timer_cancel",
                     f"group:{int(group_id)}",
                     {"job": "master_cap_close", "job_id": job_id},
                 )
-            except (ValueError, KeyError, RuntimeError) as e:
-                logger.debug("Handled exception in cancel_master_valve_cap: %s", e)
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Ошибка отмены cap-закрытия мастер-клапана для группы {group_id}: {e}")
 
@@ -1566,7 +1751,7 @@ class IrrigationScheduler:
             try:
                 from services.zone_control import per_zone_dur as _per_zone_dur
 
-                start_base = datetime.now()
+                start_base = clock.now()
                 cumulative = 0
                 schedule_map: dict[int, str] = {}
                 for z in group_zones:
@@ -1645,7 +1830,7 @@ class IrrigationScheduler:
                         "ad_hoc_program_name": ad_hoc_program_name,
                         "manual": manual,
                     },
-                    id=f"group_seq:{group_id}:{int(datetime.now().timestamp())}",
+                    id=f"group_seq:{group_id}:{int(clock.now().timestamp())}",
                     replace_existing=False,
                     misfire_grace_time=120,
                     coalesce=False,
@@ -1655,7 +1840,7 @@ class IrrigationScheduler:
                     _kwargs["jobstore"] = "volatile"
                 self.scheduler.add_job(
                     job_run_group_sequence,
-                    DateTrigger(run_date=datetime.now()),
+                    DateTrigger(run_date=clock.now()),
                     **_kwargs,
                 )
             try:
@@ -1708,8 +1893,8 @@ class IrrigationScheduler:
                 duration, _ = _per_zone_dur(zone, override_duration, override_percent)
                 if duration <= 0:
                     continue
-                start_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                planned_end = (datetime.now() + timedelta(minutes=duration)).strftime("%Y-%m-%d %H:%M:%S")
+                start_ts = clock.now().strftime("%Y-%m-%d %H:%M:%S")
+                planned_end = (clock.now() + timedelta(minutes=duration)).strftime("%Y-%m-%d %H:%M:%S")
                 # TESTING-mode start — flagged via audit_reason so any audit
                 # log scrub on prod can filter these synthetic transitions out.
                 try:
@@ -1801,9 +1986,9 @@ class IrrigationScheduler:
                 skipped_this_zone = False
 
                 # Старт текущей зоны
-                start_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                start_ts = clock.now().strftime("%Y-%m-%d %H:%M:%S")
                 try:
-                    planned_end = (datetime.now() + timedelta(minutes=duration)).strftime("%Y-%m-%d %H:%M:%S")
+                    planned_end = (clock.now() + timedelta(minutes=duration)).strftime("%Y-%m-%d %H:%M:%S")
                     from services.zones_state import update_zone_state as _uzs
 
                     _uzs(
@@ -1830,7 +2015,7 @@ class IrrigationScheduler:
                         )
                         self.db.update_zone(zone_id, {"state": "on", "watering_start_time": start_ts})
                 try:
-                    self.schedule_zone_hard_stop(int(zone_id), datetime.now() + timedelta(minutes=duration))
+                    self.schedule_zone_hard_stop(int(zone_id), clock.now() + timedelta(minutes=duration))
                 except (ValueError, TypeError, KeyError) as e:
                     logger.debug("Handled exception in _run_group_sequence: %s", e)
                 # MQTT publish: pre-open master valve for the group (idempotent), then zone ON
@@ -1919,7 +2104,7 @@ class IrrigationScheduler:
                             try:
                                 from services import water_monitor as _wm
 
-                                raw_pulses = _wm.get_pulses_at_or_before(gid_for_run, time.time())
+                                raw_pulses = _wm.get_pulses_at_or_before(gid_for_run, clock.timestamp())
                                 pulse = str(g_for_run.get("water_pulse_size") or "1l")
                                 liters_per_pulse = 100 if pulse == "100l" else 10 if pulse == "10l" else 1
                                 base_m3 = float(g_for_run.get("water_base_value_m3") or 0.0)
@@ -1929,7 +2114,7 @@ class IrrigationScheduler:
                             int(zone_id),
                             gid_for_run,
                             start_ts,
-                            time.monotonic(),
+                            clock.monotonic(),
                             raw_pulses,
                             liters_per_pulse,
                             base_m3,
@@ -1988,7 +2173,7 @@ class IrrigationScheduler:
                         skipped_this_zone = True
                         logger.info(f"Группа {group_id}: skip current zone {zone_id}")
                         break
-                    if self._shutdown_event.wait(timeout=1):
+                    if clock.wait(self._shutdown_event, 1):
                         logger.info(f"Группа {group_id}: shutdown, досрочно останавливаем зону {zone_id}")
                         break
                     remaining -= 1
@@ -2025,7 +2210,7 @@ class IrrigationScheduler:
                     continue
                 # Добираем ранние секунды, чтобы следующий старт был вовремя
                 if early > 0 and not (cancel_event and cancel_event.is_set()):
-                    self._shutdown_event.wait(timeout=early)
+                    clock.wait(self._shutdown_event, early)
                 # Если отменено — выходим из последовательности
                 if cancel_event and cancel_event.is_set():
                     break
@@ -2070,8 +2255,12 @@ class IrrigationScheduler:
                 logger.debug("group_skip_current_events cleanup: %s", e)
 
     def get_active_programs(self) -> dict[int, dict[str, Any]]:
-        # Возвращаем список запланированных программ и их job_ids
-        return {pid: {"job_ids": jobs} for pid, jobs in self.program_jobs.items()}
+        # Возвращаем список запланированных программ, их слоты и ближайший старт
+        with self._timeline_lock:
+            return {
+                pid: {"job_ids": jobs, "next_run": self.program_timeline.next_for_program(pid)}
+                for pid, jobs in self.program_jobs.items()
+            }
 
     def get_active_zones(self) -> dict[int, datetime]:
         return self.active_zones.copy()
@@ -2111,7 +2300,7 @@ class IrrigationScheduler:
         if not self.is_group_session_active(gid):
             return "no_session"
         # Issue #14 C2: server-side per-group debounce.
-        now = time.monotonic()
+        now = clock.monotonic()
         last = self._last_skip_ts.get(gid, 0.0)
         if (now - last) < self._skip_debounce_seconds:
             return "debounced"
@@ -2187,25 +2376,23 @@ class IrrigationScheduler:
         except (sqlite3.Error, OSError) as e:
             logger.error(f"Ошибка отмены задач группы {group_id}: {e}")
 
+    def cancel_zone_stop_timers(self, zone_id: int) -> list[str]:
+        """Снять таймеры zone_stop/zone_hard_stop зоны (active_zones не трогает)."""
+        removed = self.timers.cancel_prefix(f"zone_stop:{int(zone_id)}:")
+        if self.timers.cancel(f"zone_hard_stop:{int(zone_id)}"):
+            removed.append(f"zone_hard_stop:{int(zone_id)}")
+        for job_id in removed:
+            self._emit_timer_audit(
+                "scheduler_timer_cancel",
+                f"zone:{int(zone_id)}",
+                {"job_id": job_id},
+            )
+        return removed
+
     def cancel_zone_jobs(self, zone_id: int):
         """Отменяет все задачи автоостановки для зоны и убирает её из active_zones."""
         try:
-            job_ids_to_remove = []
-            for job in self.scheduler.get_jobs():
-                if job.id.startswith(f"zone_stop:{int(zone_id)}:"):
-                    job_ids_to_remove.append(job.id)
-                if job.id == f"zone_hard_stop:{int(zone_id)}":
-                    job_ids_to_remove.append(job.id)
-            for job_id in job_ids_to_remove:
-                try:
-                    self.scheduler.remove_job(job_id)
-                    self._emit_timer_audit(
-                        "scheduler_timer_cancel",
-                        f"zone:{int(zone_id)}",
-                        {"job_id": job_id},
-                    )
-                except (ValueError, KeyError, RuntimeError) as e:
-                    logger.debug("Handled exception in cancel_zone_jobs: %s", e)
+            self.cancel_zone_stop_timers(zone_id)
             self.active_zones.pop(int(zone_id), None)
             logger.info(f"Отменены задачи автоостановки для зоны {zone_id}")
         except (ValueError, TypeError, KeyError) as e:
@@ -2213,10 +2400,9 @@ class IrrigationScheduler:
 
     def load_programs(self):
         try:
-            programs = self.db.get_programs()
-            for program in programs:
-                self.schedule_program(program["id"], program)
-            logger.info(f"Загружено {len(programs)} программ")
+            self._remove_legacy_program_jobs()
+            with self._timeline_lock:
+                self._load_timeline(self._dispatch_resume_point())
         except (sqlite3.Error, OSError) as e:
             logger.error(f"Ошибка загрузки программ: {e}")
 
@@ -2224,7 +2410,7 @@ class IrrigationScheduler:
         """Догоняем пропущенный старт сегодняшней программы, если сервис перезапустился между стартом и окончанием."""
         try:
             programs = self.db.get_programs()
-            now = datetime.now()
+            now = clock.now()
             zones_all = self.db.get_zones()
             zones_by_id = {int(z["id"]): z for z in zones_all}
             for p in programs:
@@ -2267,7 +2453,7 @@ class IrrigationScheduler:
                             zones[start_idx:],
                             str(p.get("name") or f"program_{p.get('id')}") + " (recovered)",
                         ],
-                        id=f"program_{int(p['id'])}_recover_{int(time.time())}",
+                        id=f"program_{int(p['id'])}_recover_{int(clock.timestamp())}",
                         replace_existing=False,
                         misfire_grace_time=300,
                         coalesce=False,
@@ -2277,7 +2463,7 @@ class IrrigationScheduler:
                         _kwargs["jobstore"] = "volatile"
                     self.scheduler.add_job(
                         job_run_program,
-                        DateTrigger(run_date=datetime.now()),
+                        DateTrigger(run_date=clock.now()),
                         **_kwargs,
                     )
                     logger.info(f"Recovery: программа {p['id']} — запущены оставшиеся зоны с индекса {start_idx}")
@@ -2289,6 +2475,9 @@ class IrrigationScheduler:
     # === Boot-time remediation ===
     def cleanup_jobs_on_boot(self) -> None:
         try:
+            # Зоны всё равно принудительно выключаются (stop_on_boot_active_zones) — автостопы
+            # прошлого запуска не нужны. Капы зон и мастер-клапана остаются в силе.
+            stale_timers = self.timers.cancel_prefix("zone_stop:") + self.timers.cancel_prefix("zone_hard_stop:")
             job_ids_to_remove = []
             for job in self.scheduler.get_jobs():
                 jid = str(job.id)
@@ -2299,7 +2488,7 @@ class IrrigationScheduler:
                     self.scheduler.remove_job(jid)
                 except (ValueError, KeyError, RuntimeError) as e:
                     logger.debug("Handled exception in cleanup_jobs_on_boot: %s", e)
-            logger.info(f"Boot cleanup: removed {len(job_ids_to_remove)} jobs")
+            logger.info(f"Boot cleanup: removed {len(job_ids_to_remove)} jobs, {len(stale_timers)} zone stop timers")
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"Boot cleanup failed: {e}")
 
@@ -2356,3 +2545,14 @@ def init_scheduler(db: IrrigationDB):
 
 def get_scheduler() -> IrrigationScheduler | None:
     return scheduler
+
+
+def stop_scheduler() -> None:
+    """Остановить и сбросить глобальный планировщик (воркер потерял лидерство).
+
+    Следующий init_scheduler() создаст новый экземпляр и заново загрузит программы.
+    """
+    global scheduler
+    sched, scheduler = scheduler, None
+    if sched is not None:
+        sched.stop()
@@ -1,5 +1,10 @@
-from flask import Blueprint, render_template
+import mimetypes
+import os
 
+from flask import Blueprint, abort, render_template, request, send_file
+from werkzeug.security import safe_join
+
+from services import static_assets
 from services.security import user_required
 
 files_bp = Blueprint("files_bp", __name__)
@@ -15,3 +20,27 @@ def map_page():
 @user_required
 def water_page():
     return render_template("water.html")
+
+
+@files_bp.route("/static/dist/<path:filename>")
+def static_bundle(filename):
+    """Serve a content-hashed bundle, precompressed per Accept-Encoding.
+
+    More specific than Flask's `/static/<path>` rule, so it wins routing.
+    The name carries the content hash — responses are `immutable` and the
+    browser never revalidates.
+    """
+    dist = str(static_assets.STATIC_ROOT / static_assets.DIST_DIRNAME)
+    path = safe_join(dist, filename)
+    if path is None or filename.endswith((".gz", ".br")) or not os.path.isfile(path):
+        abort(404)
+    available = {enc for enc, ext in (("br", ".br"), ("gzip", ".gz")) if os.path.isfile(path + ext)}
+    encoding = static_assets.negotiate_encoding(request.headers.get("Accept-Encoding", ""), available)
+    send_path = path + {"br": ".br", "gzip": ".gz"}[encoding] if encoding else path
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    resp = send_file(send_path, mimetype=mimetype, conditional=False, etag=False)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = static_assets.IMMUTABLE_CACHE_CONTROL
+    return resp
@@ -33,6 +33,7 @@ from prometheus_client import (
     Histogram,
     generate_latest,
 )
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
 
 from services.version import get_app_version as _get_app_version
 
@@ -154,6 +155,81 @@ WB_ZONE_STOP = Counter(
     registry=REGISTRY,
 )
 
+WB_RATE_LIMITED = Counter(
+    "wb_rate_limited_total",
+    "Requests rejected by a rate limiter, labelled by limiter (api/login) and endpoint group",
+    ["limiter", "group"],
+    registry=REGISTRY,
+)
+
+WB_RATE_LIMITER_KEYS = Gauge(
+    "wb_rate_limiter_keys",
+    "Client keys currently tracked by the API rate limiter (LRU-bounded)",
+    registry=REGISTRY,
+)
+
+
+# ── Lock contention: read from services.locks at scrape time ───────────────
+class _LockContentionCollector:
+    """Exports the per-kind wait/hold histograms kept by services.locks.
+
+    The locks count into plain lists (a prometheus_client observe() per
+    acquire would blow the < 1 µs budget); this collector converts them to
+    cumulative buckets only when /metrics is scraped.
+    """
+
+    def collect(self):
+        from services.locks import contention_stats
+
+        wait = HistogramMetricFamily(
+            "wb_lock_wait_seconds", "Time spent waiting for a zone/group lock", labels=["lock"]
+        )
+        hold = HistogramMetricFamily("wb_lock_hold_seconds", "Time a zone/group lock was held", labels=["lock"])
+        slow = CounterMetricFamily(
+            "wb_lock_slow_holds", "Lock holds longer than the slow-hold threshold", labels=["lock"]
+        )
+        for kind, st in sorted(contention_stats().items()):
+            for family, key in ((wait, "wait"), (hold, "hold")):
+                h = st[key]
+                cumulative, buckets = 0, []
+                for bound, n in zip([*h["buckets"], float("inf")], h["counts"]):
+                    cumulative += n
+                    buckets.append(("+Inf" if bound == float("inf") else str(bound), cumulative))
+                family.add_metric([kind], buckets, h["sum"])
+            slow.add_metric([kind], st["slow_holds"])
+        yield wait
+        yield hold
+        yield slow
+
+
+REGISTRY.register(_LockContentionCollector())
+
+
+class _SecretsSnapshotCollector:
+    """Hit/miss/invalidation counters of the decrypted MQTT server snapshot (db/secrets.py)."""
+
+    def collect(self):
+        from db.secrets import snapshot_stats
+
+        st = snapshot_stats()
+        lookups = CounterMetricFamily(
+            "wb_secrets_snapshot_lookups", "MQTT server lookups served by the secrets snapshot", labels=["result"]
+        )
+        lookups.add_metric(["hit"], st["hits"])
+        lookups.add_metric(["miss"], st["misses"])
+        yield lookups
+        yield CounterMetricFamily(
+            "wb_secrets_snapshot_invalidations",
+            "Secrets snapshot drops (local writes, stamp changes)",
+            value=st["invalidations"],
+        )
+        yield CounterMetricFamily(
+            "wb_secrets_key_rotations", "Secret key rotations done by this process", value=st["rotations"]
+        )
+
+
+REGISTRY.register(_SecretsSnapshotCollector())
+
 
 # ── Log-count handler: feeds wb_logging_records_total ──────────────────────
 class _LogCountHandler(logging.Handler):
@@ -447,6 +523,14 @@ def metrics() -> Response:
     except Exception as e:
         logger.debug("metrics mqtt snapshot: %s", e)
 
+    # Rate limiter key count
+    try:
+        from services.api_rate_limiter import tracked_keys
+
+        WB_RATE_LIMITER_KEYS.set(tracked_keys())
+    except Exception as e:
+        logger.debug("metrics rate limiter snapshot: %s", e)
+
     body = generate_latest(REGISTRY)
     return Response(body, status=200, content_type=CONTENT_TYPE_LATEST)
 
@@ -2,12 +2,13 @@
 
 import json
 import logging
-import queue
 import threading
+import time
 
 from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 from database import db
+from services import mqtt_discovery
 from services.audit import audit_log
 from services.helpers import api_error, api_soft
 from services.security import admin_required
@@ -25,6 +26,9 @@ except ImportError as e:
 _scan_sse_connections: dict[str, int] = {}  # {ip: active_count}
 _scan_sse_lock = threading.Lock()
 MAX_SCAN_SSE_PER_IP = 2
+MAX_PROBE_DURATION_SEC = 10.0
+MAX_PROBE_ITEMS = 1000
+SCAN_SSE_MAX_SEC = 300
 
 mqtt_api_bp = Blueprint("mqtt_api", __name__)
 
@@ -95,6 +99,7 @@ def api_mqtt_server_update(server_id: int):
         ok = db.update_mqtt_server(server_id, data)
         if not ok:
             return jsonify({"success": False, "message": "Не удалось обновить"}), 400
+        mqtt_discovery.stop(server_id)  # переподключится с новыми настройками
         return jsonify({"success": True, "server": db.get_mqtt_server(server_id)})
     except (ConnectionError, TimeoutError, OSError) as e:
         logger.error(f"Ошибка обновления MQTT сервера {server_id}: {e}")
@@ -111,6 +116,7 @@ def api_mqtt_server_delete(server_id: int):
         ok = db.delete_mqtt_server(server_id)
         if not ok:
             return jsonify({"success": False, "message": "Не удалось удалить"}), 400
+        mqtt_discovery.stop(server_id)
         return ("", 204)
     except (ConnectionError, TimeoutError, OSError) as e:
         logger.error(f"Ошибка удаления MQTT сервера {server_id}: {e}")
@@ -146,61 +152,27 @@ def api_mqtt_probe(server_id: int):
             )
 
         data = request.get_json() or {}
-        topic_filter = data.get("filter", "#")
-        duration = float(data.get("duration", 3))
+        topic_filter = data.get("filter", "#") or "#"
+        duration = min(max(float(data.get("duration", 3)), 0.0), MAX_PROBE_DURATION_SEC)
 
-        received = []
+        # Shared discovery: one '#' subscription per server for all probes and
+        # scan tabs; a warm one answers without waiting.
+        disc = mqtt_discovery.get_discovery(server_id, server)
         events = [
-            f"probe: connecting to {server.get('host')}:{server.get('port')} filter={topic_filter} duration={duration}s"
+            f"probe: shared discovery on {server.get('host')}:{server.get('port')} "
+            f"filter={topic_filter} duration={duration}s running={disc.running}"
         ]
-        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=(server.get("client_id") or None))
-        if server.get("username"):
-            client.username_pw_set(server.get("username"), server.get("password") or None)
-
-        def on_connect(cl, userdata, flags, reason_code, properties=None):
-            try:
-                cl.subscribe(topic_filter, qos=0)
-                events.append(f"connected rc={reason_code}, subscribed to {topic_filter}")
-            except (ConnectionError, TimeoutError, OSError) as e:
-                logger.debug("Exception in on_connect: %s", e)
-                events.append("subscribe failed")
-
-        def on_message(cl, userdata, msg):
-            try:
-                topic = msg.topic
-            except (AttributeError, ValueError) as e:
-                logger.debug("Exception in on_message: %s", e)
-                topic = getattr(msg, "topic", "")
-            if len(received) < 1000:
-                try:
-                    payload = msg.payload.decode("utf-8", errors="ignore")
-                except (UnicodeDecodeError, AttributeError) as e:
-                    logger.debug("Exception in on_message: %s", e)
-                    payload = str(msg.payload)
-                received.append({"topic": topic, "payload": payload})
-
-        client.on_connect = on_connect
-        client.on_message = on_message
         try:
-            client.connect(server.get("host") or "127.0.0.1", int(server.get("port") or 1883), 5)
+            items = disc.probe(topic_filter, duration, limit=MAX_PROBE_ITEMS)
         except (ConnectionError, TimeoutError, OSError) as ce:
-            logger.debug("Exception in on_message: %s", ce)
+            logger.debug("Exception in api_mqtt_probe: %s", ce)
             events.append(f"connect error: {ce}")
             return api_soft("MQTT_CONNECT_FAILED", "connect failed", {"items": [], "events": events})
-        client.loop_start()
-        import time as _t
-
-        start = _t.time()
-        while _t.time() - start < duration and len(received) < 5000:
-            _t.sleep(0.1)
-        client.loop_stop()
-        try:
-            client.disconnect()
-        except (ConnectionError, TimeoutError, OSError) as e:
-            logger.debug("Handled exception in line_142: %s", e)
-        if not received:
+        st = disc.stats()
+        events.append(f"topics known={st['topics']} messages={st['messages']} viewers={st['viewers']}")
+        if not items:
             events.append("no messages received")
-        return jsonify({"success": True, "items": received, "events": events})
+        return jsonify({"success": True, "items": items, "events": events})
     except (ConnectionError, TimeoutError, OSError) as e:
         logger.error(f"MQTT probe error: {e}")
         return api_soft("PROBE_FAILED", "probe failed", {"items": [], "events": [str(e)]})
@@ -289,79 +261,33 @@ def api_mqtt_scan_sse(server_id: int):
             return Response(mock_gen(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
         sub_filter = request.args.get("filter", "/devices/#") or "/devices/#"
-        msg_queue: queue.Queue[str] = queue.Queue(maxsize=10000)
-        stop_event = threading.Event()
-
-        def _run_client():
-            try:
-                client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=(server.get("client_id") or None))
-                if server.get("username"):
-                    client.username_pw_set(server.get("username"), server.get("password") or None)
-
-                def on_connect(cl, userdata, flags, reason_code, properties=None):
-                    try:
-                        cl.subscribe(sub_filter, qos=0)
-                    except (ConnectionError, TimeoutError, OSError) as e:
-                        logger.debug("Handled exception in on_connect: %s", e)
-
-                def on_message(cl, userdata, msg):
-                    try:
-                        topic = msg.topic
-                    except (AttributeError, ValueError) as e:
-                        logger.debug("Exception in on_message: %s", e)
-                        topic = getattr(msg, "topic", "")
-                    try:
-                        payload = msg.payload.decode("utf-8", errors="ignore")
-                    except (UnicodeDecodeError, AttributeError) as e:
-                        logger.debug("Exception in on_message: %s", e)
-                        payload = str(msg.payload)
-                    data = json.dumps({"topic": normalize_topic(topic), "payload": payload})
-                    try:
-                        msg_queue.put_nowait(data)
-                    except queue.Full:
-                        logger.debug("scan-sse msg_queue full, dropping message for topic %s", topic)
-
-                client.on_connect = on_connect
-                client.on_message = on_message
-                client.connect(server.get("host") or "127.0.0.1", int(server.get("port") or 1883), 5)
-                client.loop_start()
-                import time as _t
-
-                _start_ts = _t.time()
-                while not stop_event.is_set():
-                    stop_event.wait(0.2)
-                    if _t.time() - _start_ts > 300:
-                        break
-                client.loop_stop()
-                try:
-                    client.disconnect()
-                except (ConnectionError, TimeoutError, OSError) as e:
-                    logger.debug("Handled exception in line_240: %s", e)
-            except queue.Full as e:
-                logger.error(f"MQTT SSE thread error: {e}")
-
-        th = threading.Thread(target=_run_client, daemon=True)
-        th.start()
+        try:
+            viewer = mqtt_discovery.get_discovery(server_id, server).open_viewer(sub_filter)
+        except (ConnectionError, TimeoutError, OSError) as e:
+            logger.info(f"MQTT scan SSE connect failed for server {server_id}: {e}")
+            _decrement_sse(ip)
+            return api_error("MQTT_CONNECT_FAILED", "connect failed", 502)
 
         @stream_with_context
         def _gen():
             try:
                 yield "event: open\n" + 'data: {"success": true}\n\n'
-                last_ping = 0
-                import time as _t
-
-                while True:
-                    try:
-                        data = msg_queue.get(timeout=0.5)
-                        yield f"data: {data}\n\n"
-                    except queue.Empty:
-                        pass  # Expected: poll timeout, no data yet
-                    now = int(_t.time())
-                    if now != last_ping:
+                started = time.monotonic()
+                last_ping = 0.0
+                while not viewer.closed and time.monotonic() - started < SCAN_SSE_MAX_SEC:
+                    # Coalesced: each changed topic once per batch with its
+                    # latest value, batches at most every DELTA_INTERVAL_SEC.
+                    items = viewer.next_delta(timeout=1.0)
+                    for it in items:
+                        it["topic"] = normalize_topic(it["topic"])
+                    if items:
+                        yield "event: delta\n" + f"data: {json.dumps({'items': items})}\n\n"
+                    now = time.monotonic()
+                    if now - last_ping >= 1.0:
                         last_ping = now
                         yield "event: ping\n" + "data: {}\n\n"
             finally:
-                stop_event.set()
+                viewer.close()
                 _decrement_sse(ip)
 
         return Response(
@@ -371,3 +297,25 @@ def api_mqtt_scan_sse(server_id: int):
         logger.error(f"MQTT scan SSE error: {e}")
         _decrement_sse(ip)
         return api_error("SSE_FAILED", "sse init failed", 500)
+
+
+# ===== MQTT Topic Snapshot =====
+
+
+@mqtt_api_bp.route("/api/mqtt/<int:server_id>/topics", methods=["GET"])
+@admin_required
+def api_mqtt_topics(server_id: int):
+    """Topics seen by the running shared discovery (does not start one).
+
+    Query: ``filter`` (MQTT filter, default ``#``), ``q`` (substring),
+    ``limit`` (default and cap MAX_PROBE_ITEMS).
+    """
+    disc = mqtt_discovery.peek(server_id)
+    if disc is None or not disc.running:
+        return jsonify({"success": True, "running": False, "items": []})
+    try:
+        limit = min(int(request.args.get("limit", MAX_PROBE_ITEMS)), MAX_PROBE_ITEMS)
+    except (TypeError, ValueError):
+        limit = MAX_PROBE_ITEMS
+    items = disc.snapshot(request.args.get("filter", "#") or "#", search=request.args.get("q", ""), limit=limit)
+    return jsonify({"success": True, "running": True, "items": items, "stats": disc.stats()})
@@ -0,0 +1,84 @@
+"""Profiler API — on-demand sampling captures and per-request profiles (admin only).
+
+Endpoints:
+  POST /api/profiler/start                    — start a capture {duration_s, hz}
+  POST /api/profiler/stop                     — stop the running capture early
+  GET  /api/profiler/status                   — capture summary + recent request profiles
+  GET  /api/profiler/profile.folded           — folded stacks of the last capture
+  GET  /api/profiler/requests/<id>.folded     — profile of one request (see below)
+
+Per-request mode: an admin request sent with ``X-Profile: 1`` is sampled on
+its own thread (hooks in ``app.py``); the profile is stored under the
+request's ``X-Request-ID`` and listed in /status.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from flask import Blueprint, Response, jsonify, request
+
+from services import profiler
+from services.helpers import api_error
+from services.security import admin_required
+
+logger = logging.getLogger(__name__)
+
+profiler_api_bp = Blueprint("profiler_api", __name__)
+
+
+def _folded_response(text: str, filename: str) -> Response:
+    resp = Response(text, mimetype="text/plain")
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
+
+
+@profiler_api_bp.route("/api/profiler/start", methods=["POST"])
+@admin_required
+def api_profiler_start():
+    data = request.get_json(silent=True) or {}
+    try:
+        duration = float(data.get("duration_s", profiler.DEFAULT_DURATION_S))
+        hz = int(data.get("hz", profiler.DEFAULT_HZ))
+    except (TypeError, ValueError):
+        return api_error("invalid_params", "duration_s and hz must be numbers")
+    if duration <= 0 or hz <= 0:
+        return api_error("invalid_params", "duration_s and hz must be positive")
+    cap = profiler.start(duration_s=duration, hz=hz)
+    if cap is None:
+        return api_error("profiler_busy", "a capture is already running", 409)
+    return jsonify({"success": True, "capture": cap.summary()}), 202
+
+
+@profiler_api_bp.route("/api/profiler/stop", methods=["POST"])
+@admin_required
+def api_profiler_stop():
+    cap = profiler.stop()
+    if cap is None:
+        return api_error("no_capture", "no capture has been started", 404)
+    return jsonify({"success": True, "capture": cap.summary()})
+
+
+@profiler_api_bp.route("/api/profiler/status", methods=["GET"])
+@admin_required
+def api_profiler_status():
+    return jsonify({"success": True, **profiler.status()})
+
+
+@profiler_api_bp.route("/api/profiler/profile.folded", methods=["GET"])
+@admin_required
+def api_profiler_folded():
+    cap = profiler.current()
+    if cap is None:
+        return api_error("no_capture", "no capture has been started", 404)
+    stamp = int(cap.started_at)
+    return _folded_response(cap.folded(), f"irrigation-profile-{stamp}.folded")
+
+
+@profiler_api_bp.route("/api/profiler/requests/<request_id>.folded", methods=["GET"])
+@admin_required
+def api_profiler_request_folded(request_id: str):
+    text = profiler.request_profile(request_id)
+    if text is None:
+        return api_error("not_found", "no profile for this request id", 404)
+    return _folded_response(text, f"irrigation-request-{request_id}.folded")
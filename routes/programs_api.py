@@ -15,6 +15,13 @@ logger = logging.getLogger(__name__)
 
 programs_api_bp = Blueprint("programs_api", __name__)
 
+_SCHEDULE_FIELDS = ("schedule_type", "interval_days", "even_odd", "extra_times")
+
+
+def _schedule_fields(data):
+    """v2 schedule fields of a program payload (for conflict checks of non-weekday programs)."""
+    return {k: data[k] for k in _SCHEDULE_FIELDS if data.get(k) is not None}
+
 
 @programs_api_bp.route("/api/programs")
 def api_programs():
@@ -39,7 +46,11 @@ def api_program(prog_id):
             logger.debug("Handled exception in api_program: %s", e)
         try:
             conflicts = db.check_program_conflicts(
-                program_id=prog_id, time=data["time"], zones=data["zones"], days=data["days"]
+                program_id=prog_id,
+                time=data["time"],
+                zones=data["zones"],
+                days=data.get("days", []),
+                schedule=_schedule_fields(data),
             )
             if conflicts:
                 return jsonify(
@@ -93,7 +104,11 @@ def api_create_program():
         logger.debug("Handled exception in api_create_program: %s", e)
     try:
         conflicts = db.check_program_conflicts(
-            program_id=None, time=data["time"], zones=data["zones"], days=data.get("days", [])
+            program_id=None,
+            time=data["time"],
+            zones=data["zones"],
+            days=data.get("days", []),
+            schedule=_schedule_fields(data),
         )
         if conflicts:
             return jsonify(
@@ -129,7 +144,8 @@ def check_program_conflicts():
         zones = data.get("zones", [])
         days = data.get("days", [])
 
-        if not time_val or not zones or not days:
+        schedule = _schedule_fields(data)
+        if not time_val or not zones or (not days and schedule.get("schedule_type", "weekdays") == "weekdays"):
             # Best-effort debug trace of UI intent — only when debug logging is on.
             try:
                 debug_audit(
@@ -142,7 +158,7 @@ def check_program_conflicts():
                 logger.debug("check_program_conflicts: debug_audit failed", exc_info=True)
             return jsonify({"success": False, "message": "Необходимо указать время, дни и зоны"}), 400
 
-        conflicts = db.check_program_conflicts(program_id, time_val, zones, days)
+        conflicts = db.check_program_conflicts(program_id, time_val, zones, days, schedule=schedule)
         # Debug-level trace — this is read-only intent, useful for triaging
         # "why did the UI block save" without flooding audit_log in prod.
         try:
@@ -166,6 +182,27 @@ def check_program_conflicts():
         return jsonify({"success": False, "message": "Ошибка проверки конфликтов"}), 500
 
 
+@programs_api_bp.route("/api/programs/conflicts")
+def api_programs_conflicts_report():
+    """All program conflicts on the site.
+
+    ``?weather_factor=N`` stretches durations by N %; ``?include_weather=1``
+    uses the ``max_weather_coefficient`` setting.
+    """
+    try:
+        weather_factor = request.args.get("weather_factor", type=int)
+        if weather_factor is None and request.args.get("include_weather") in ("1", "true"):
+            try:
+                weather_factor = int(db.get_setting_value("max_weather_coefficient") or 100)
+            except (ValueError, TypeError) as e:
+                logger.debug("max_weather_coefficient parse: %s", e)
+        report = db.program_conflicts_report(weather_factor)
+        return jsonify({"success": True, "has_conflicts": bool(report["conflicts"]), **report})
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Ошибка отчёта о конфликтах программ: {e}")
+        return jsonify({"success": False, "message": "Ошибка проверки конфликтов"}), 500
+
+
 @programs_api_bp.route("/api/programs/<int:prog_id>/duplicate", methods=["POST"])
 @rate_limit("programs", max_requests=10, window_sec=60)
 @audit_log("program_duplicate", target_extractor=lambda *a, **kw: f"program:{kw.get('prog_id', a[0] if a else '?')}")
@@ -12,8 +12,10 @@ from config import TESTING
 from database import db
 from irrigation_scheduler import get_scheduler
 from services import sse_hub as _sse_hub
+from services import startup_timeline as _startup_timeline
 from services.audit import audit_log
 from services.helpers import api_error, parse_dt
+from services.locks import lock_diagnostics as _lock_diagnostics
 from services.locks import snapshot_all_locks as _locks_snapshot
 from services.monitors import env_monitor, rain_monitor, water_monitor
 from services.security import admin_required
@@ -43,7 +45,7 @@ def api_health_details():
                     try:
                         nrt = getattr(j, "next_run_time", None)
                         jid = str(j.id)
-                        jstore = "default" if jid.startswith("program:") else "volatile"
+                        jstore = str(getattr(j, "_jobstore_alias", None) or "volatile")
                         trig = str(getattr(j, "trigger", ""))
                         jobs.append(
                             {
@@ -57,7 +59,17 @@ def api_health_details():
                     except (ValueError, TypeError, KeyError) as e:
                         logger.debug("Exception in api_health_details: %s", e)
                         continue
-            except (ValueError, TypeError, KeyError) as e:
+                for t in sched.timers.timers():
+                    jobs.append(
+                        {
+                            "id": t.timer_id,
+                            "name": t.kind,
+                            "next_run_time": t.run_at_dt.isoformat(),
+                            "jobstore": "timers",
+                            "trigger": "date",
+                        }
+                    )
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
                 logger.debug("Handled exception in api_health_details: %s", e)
         zones = []
         try:
@@ -101,14 +113,24 @@ def api_health_details():
         except (OSError, ValueError, RuntimeError) as e:
             logger.debug("Exception in line_103: %s", e)
             meta_tail = []
+        try:
+            from services import events as _events
+
+            event_bus = _events.stats()
+        except ImportError as e:
+            logger.debug("Exception in health-details events: %s", e)
+            event_bus = {}
         payload = {
             "now": datetime.now().isoformat(timespec="seconds"),
             "scheduler_running": bool(sched and sched.is_running),
             "jobs": jobs,
             "zones": zones,
             "locks": locks,
+            "lock_diagnostics": _lock_diagnostics(),
             "group_cancels": group_cancels,
             "meta_tail": meta_tail,
+            "event_bus": event_bus,
+            "startup": _startup_timeline.report(),
         }
         return jsonify(payload)
     except (sqlite3.Error, OSError) as e:
@@ -239,6 +261,8 @@ def api_scheduler_jobs():
             except (ValueError, TypeError, KeyError) as e:
                 logger.debug("Exception in api_scheduler_jobs: %s", e)
                 continue
+        for t in sched.timers.timers():
+            jobs.append({"id": t.timer_id, "next_run_time": t.run_at_dt.strftime("%Y-%m-%d %H:%M:%S"), "name": t.kind})
         return jsonify({"success": True, "jobs": jobs})
     except (ValueError, TypeError, KeyError) as e:
         logger.error(f"scheduler jobs list failed: {e}")
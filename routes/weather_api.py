@@ -3,6 +3,7 @@
 Endpoints:
 - GET  /api/weather          — current weather summary (extended in v2)
 - GET  /api/weather/decisions — weather decision history (NEW in v2)
+- GET  /api/weather/plan     — per-zone irrigation plan for the current weather
 - GET  /api/settings/weather — weather adjustment settings
 - PUT  /api/settings/weather — update weather adjustment settings (extended in v2)
 - GET  /api/settings/location — get location (lat/lon)
@@ -128,6 +129,31 @@ def api_get_weather_decisions():
         return jsonify({"decisions": [], "total": 0, "stats": {}})
 
 
+@weather_api_bp.route("/api/weather/plan", methods=["GET"])
+def api_get_weather_plan():
+    """Irrigation plan (decision, runtime, cycle-soak) of every zone for the current weather.
+
+    Query params:
+    - program_id (int, optional): only the zones of this program
+    """
+    try:
+        from services.irrigation_plan import current_plan
+
+        program_id = request.args.get("program_id", type=int)
+        plan = current_plan(db)
+        if plan is None:
+            return jsonify({"available": False, "zones": [], "programs": {}})
+        data = plan.to_dict()
+        if program_id is not None:
+            data["zones"] = plan.where(program_id=program_id)
+            data["programs"] = {k: v for k, v in data["programs"].items() if k == str(program_id)}
+        data["available"] = True
+        return jsonify(data)
+    except (ImportError, OSError, ValueError, TypeError, KeyError, sqlite3.Error) as e:
+        logger.debug("Weather plan error: %s", e)
+        return jsonify({"available": False, "zones": [], "programs": {}, "error": str(e)})
+
+
 @weather_api_bp.route("/api/settings/weather", methods=["GET"])
 @admin_required
 def api_get_weather_settings():
@@ -313,12 +339,12 @@ def api_put_location():
 def api_refresh_weather():
     """Force refresh weather data from API."""
     try:
-        from services.weather import get_weather_service
+        from services.weather import get_weather_service, transport
 
         svc = get_weather_service(db.db_path)
         weather = svc.get_weather(force_refresh=True)
         if weather:
-            return jsonify({"success": True, "data": weather.to_dict()})
+            return jsonify({"success": True, "data": weather.to_dict(), "transport": transport.stats()})
         return jsonify({"success": False, "message": "Не удалось получить данные. Проверьте координаты."}), 400
     except (ImportError, OSError, ValueError) as e:
         logger.debug("Weather refresh error: %s", e)
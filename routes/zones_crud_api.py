@@ -5,10 +5,12 @@ import logging
 import sqlite3
 from datetime import datetime, timedelta
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 
 from database import db
-from services.audit import audit_log, debug_audit
+from irrigation_scheduler import get_scheduler
+from services import zones_bulk as _zones_bulk
+from services.audit import audit_log, debug_audit, set_audit_payload
 from services.helpers import parse_dt
 from utils import to_iso_with_tz
 
@@ -211,25 +213,15 @@ def api_create_zone():
     return ("Error creating zone", 400)
 
 
-@zones_crud_api_bp.route("/api/zones/import", methods=["POST"])
-@audit_log("zones_import_bulk")
-def api_import_zones_bulk():
-    """Import/bulk apply zone changes in one transaction."""
-    try:
-        body = request.get_json(silent=True) or {}
-        zones = body.get("zones") or []
-        if not isinstance(zones, list) or not zones:
-            return jsonify({"success": False, "message": "Нет данных для импорта"}), 400
-        # B1 FIX: defence-in-depth — strip state-machine fields from the payload
-        # BEFORE handing it to bulk_upsert_zones.  The DB-layer whitelist
-        # (db/zones.py::_ALLOWED_UPDATE_COLUMNS) is the primary guard, but
-        # filtering here keeps the audit log honest: even if a caller smuggled
-        # such fields, they never reach SQL nor the audit context.
-        sanitised = []
-        for z in zones:
-            if not isinstance(z, dict):
-                sanitised.append(z)
-                continue
+def _strip_state_machine_fields(rows):
+    """B1 FIX: defence-in-depth — drop state-machine fields before the import engine.
+
+    The DB-layer whitelist (db/zones.py::_ALLOWED_UPDATE_COLUMNS) is the
+    primary guard, but filtering here keeps the audit log honest: even if a
+    caller smuggled such fields, they never reach SQL nor the audit context.
+    """
+    for z in rows:
+        if isinstance(z, dict):
             stripped = {k: v for k, v in z.items() if k not in _STATE_MACHINE_FIELDS}
             if len(stripped) != len(z):
                 logger.warning(
@@ -237,16 +229,63 @@ def api_import_zones_bulk():
                     sorted(set(z.keys()) & _STATE_MACHINE_FIELDS),
                     z.get("id"),
                 )
-            sanitised.append(stripped)
-        stats = db.bulk_upsert_zones(sanitised)
-        try:
-            db.add_log("zones_import", json.dumps({"counts": stats}))
-        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
-            logger.debug("Handled exception in api_import_zones_bulk: %s", e)
-        return jsonify({"success": True, **stats})
-    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            z = stripped
+        yield z
+
+
+@zones_crud_api_bp.route("/api/zones/import", methods=["POST"])
+@audit_log("zones_import_bulk", capture_payload=False)
+def api_import_zones_bulk():
+    """Import/bulk apply zone changes in one transaction.
+
+    Body: JSON (``{"zones": [...]}`` or a bare array) or CSV (``Content-Type:
+    text/csv``, header row with the export columns). Both are parsed
+    incrementally — the audit row records only the counters, never the body.
+    Response carries created/updated/failed counters and a per-row report in
+    ``rows``.
+    """
+    try:
+        if request.mimetype in ("text/csv", "application/csv"):
+            rows = _zones_bulk.iter_csv_rows(request.stream)
+        else:
+            rows = _zones_bulk.iter_json_rows(request.stream)
+        stats = _zones_bulk.import_zones(_strip_state_machine_fields(rows), db, scheduler=get_scheduler())
+    except _zones_bulk.ImportFormatError as e:
+        return jsonify({"success": False, "message": f"Ошибка формата: {e}"}), 400
+    except _zones_bulk.ImportTooLargeError as e:
+        return jsonify({"success": False, "message": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Некорректные данные: {e}"}), 400
+    except sqlite3.Error as e:
         logger.error(f"Ошибка импорта зон: {e}")
         return jsonify({"success": False, "message": "Ошибка импорта"}), 500
+    if not stats["rows"]:
+        return jsonify({"success": False, "message": "Нет данных для импорта"}), 400
+    counts = {k: stats[k] for k in ("created", "updated", "failed")}
+    set_audit_payload({"rows": len(stats["rows"]), **counts})
+    try:
+        db.add_log("zones_import", json.dumps({"counts": counts}))
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.debug("Handled exception in api_import_zones_bulk: %s", e)
+    return jsonify({"success": True, **stats})
+
+
+@zones_crud_api_bp.route("/api/zones/export")
+def api_export_zones():
+    """Stream all zones as CSV (default) or JSON (``?format=json``) — re-importable."""
+    fmt = (request.args.get("format") or "csv").lower()
+    zones = db.get_zones()
+    stamp = datetime.now().strftime("%Y-%m-%d")
+    if fmt == "json":
+        body, mimetype, ext = _zones_bulk.export_json(zones), "application/json", "json"
+    elif fmt == "csv":
+        body, mimetype, ext = _zones_bulk.export_csv(zones), "text/csv", "csv"
+    else:
+        return jsonify({"success": False, "message": "format must be csv or json"}), 400
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="zones_export_{stamp}.{ext}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 
 # ---- Next watering ----
@@ -565,72 +604,7 @@ def api_check_zone_duration_conflicts():
         if not zone:
             return jsonify({"success": False, "message": "Зона не найдена"}), 404
 
-        programs = db.get_programs()
-        conflicts = []
-
-        def get_zone_group(zid: int):
-            z = db.get_zone(zid)
-            return z["group_id"] if z else None
-
-        for program in programs:
-            prog_days = program["days"] if isinstance(program["days"], list) else json.loads(program["days"])
-            prog_zones = program["zones"] if isinstance(program["zones"], list) else json.loads(program["zones"])
-            if zone_id not in prog_zones:
-                continue
-            try:
-                p_hour, p_min = map(int, program["time"].split(":"))
-            except (ValueError, TypeError, KeyError) as e:
-                logger.debug("Exception in get_zone_group: %s", e)
-                continue
-            start_a = p_hour * 60 + p_min
-            total_duration_a = 0
-            for zid in prog_zones:
-                if zid == zone_id:
-                    total_duration_a += int(new_duration)
-                else:
-                    total_duration_a += int(db.get_zone_duration(zid))
-            end_a = start_a + total_duration_a
-            groups_a = set(filter(lambda g: g is not None, [get_zone_group(zid) for zid in prog_zones]))
-
-            for other in programs:
-                if other["id"] == program["id"]:
-                    continue
-                other_days = other["days"] if isinstance(other["days"], list) else json.loads(other["days"])
-                common_days = set(prog_days) & set(other_days)
-                if not common_days:
-                    continue
-                other_zones = other["zones"] if isinstance(other["zones"], list) else json.loads(other["zones"])
-                common_zones = set(prog_zones) & set(other_zones)
-                groups_b = set(filter(lambda g: g is not None, [get_zone_group(zid) for zid in other_zones]))
-                common_groups = groups_a & groups_b
-                if not common_zones and not common_groups:
-                    continue
-                try:
-                    oh, om = map(int, other["time"].split(":"))
-                except (ValueError, TypeError, KeyError) as e:
-                    logger.debug("Exception in line_481: %s", e)
-                    continue
-                start_b = oh * 60 + om
-                total_duration_b = 0
-                for zid in other_zones:
-                    total_duration_b += int(db.get_zone_duration(zid))
-                end_b = start_b + total_duration_b
-                if start_a < end_b and end_a > start_b:
-                    conflicts.append(
-                        {
-                            "checked_program_id": program["id"],
-                            "checked_program_name": program["name"],
-                            "checked_program_time": program["time"],
-                            "other_program_id": other["id"],
-                            "other_program_name": other["name"],
-                            "other_program_time": other["time"],
-                            "common_zones": list(common_zones),
-                            "common_groups": list(common_groups),
-                            "overlap_start": max(start_a, start_b),
-                            "overlap_end": min(end_a, end_b),
-                        }
-                    )
-
+        conflicts = db.check_zone_duration_conflicts([(zone_id, new_duration)]).get(zone_id, [])
         return jsonify({"success": True, "has_conflicts": len(conflicts) > 0, "conflicts": conflicts})
     except (sqlite3.Error, OSError) as e:
         logger.error(f"Ошибка проверки конфликтов длительности зоны: {e}")
@@ -667,78 +641,10 @@ def api_check_zone_duration_conflicts_bulk():
         if not normalized:
             return jsonify({"success": False, "message": "Нет валидных изменений"}), 400
 
-        all_programs = db.get_programs()
-        zones_cache = {z["id"]: z for z in db.get_zones()}
-
-        def get_zone_group(zid: int):
-            z = zones_cache.get(zid)
-            return z["group_id"] if z else None
-
-        def get_zone_duration(zid: int):
-            z = zones_cache.get(zid)
-            if not z:
-                return 0
-            try:
-                return int(z.get("duration") or 0)
-            except (ValueError, TypeError, KeyError) as e:
-                logger.debug("Exception in get_zone_duration: %s", e)
-                return 0
-
+        found = db.check_zone_duration_conflicts(normalized)
         results = {}
-        for zone_id, new_duration in normalized:
-            conflicts = []
-            for program in all_programs:
-                prog_days = program["days"] if isinstance(program["days"], list) else json.loads(program["days"])
-                prog_zones = program["zones"] if isinstance(program["zones"], list) else json.loads(program["zones"])
-                if zone_id not in prog_zones:
-                    continue
-                try:
-                    p_hour, p_min = map(int, program["time"].split(":"))
-                except (ValueError, TypeError, KeyError) as e:
-                    logger.debug("Exception in get_zone_duration: %s", e)
-                    continue
-                start_a = p_hour * 60 + p_min
-                total_duration_a = 0
-                for zid in prog_zones:
-                    total_duration_a += new_duration if zid == zone_id else get_zone_duration(zid)
-                end_a = start_a + total_duration_a
-                groups_a = set(filter(lambda g: g is not None, [get_zone_group(zid) for zid in prog_zones]))
-                for other in all_programs:
-                    if other["id"] == program["id"]:
-                        continue
-                    other_days = other["days"] if isinstance(other["days"], list) else json.loads(other["days"])
-                    if not (set(prog_days) & set(other_days)):
-                        continue
-                    other_zones = other["zones"] if isinstance(other["zones"], list) else json.loads(other["zones"])
-                    common_zones = set(prog_zones) & set(other_zones)
-                    groups_b = set(filter(lambda g: g is not None, [get_zone_group(zid) for zid in other_zones]))
-                    if not common_zones and not (groups_a & groups_b):
-                        continue
-                    try:
-                        oh, om = map(int, other["time"].split(":"))
-                    except (ValueError, TypeError, KeyError) as e:
-                        logger.debug("Exception in line_576: %s", e)
-                        continue
-                    start_b = oh * 60 + om
-                    total_duration_b = 0
-                    for zid in other_zones:
-                        total_duration_b += get_zone_duration(zid)
-                    end_b = start_b + total_duration_b
-                    if start_a < end_b and end_a > start_b:
-                        conflicts.append(
-                            {
-                                "checked_program_id": program["id"],
-                                "checked_program_name": program["name"],
-                                "checked_program_time": program["time"],
-                                "other_program_id": other["id"],
-                                "other_program_name": other["name"],
-                                "other_program_time": other["time"],
-                                "common_zones": list(common_zones),
-                                "common_groups": list(groups_a & groups_b),
-                                "overlap_start": max(start_a, start_b),
-                                "overlap_end": min(end_a, end_b),
-                            }
-                        )
+        for zone_id, _new_duration in normalized:
+            conflicts = found.get(zone_id, [])
             results[str(zone_id)] = {"has_conflicts": len(conflicts) > 0, "conflicts": conflicts}
 
         return jsonify({"success": True, "results": results})
@@ -1,9 +1,11 @@
 """Zones Photo API — upload, delete, rotate, get zone photos."""
 
+import hashlib
 import io
 import json
 import logging
 import os
+import re
 import sqlite3
 
 from flask import Blueprint, current_app, jsonify, request, send_file
@@ -20,12 +22,7 @@ from services.helpers import (
     safe_zone_photo_path,
 )
 from services.image_pipeline import ImageTooLargeError, encode_webp, load_safe_image
-
-try:
-    from PIL import Image, ImageOps
-except ImportError:
-    Image = None
-    ImageOps = None
+from services.static_assets import IMMUTABLE_CACHE_CONTROL
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +51,8 @@ def render_two_variants(image_bytes):
     Raises ImageTooLargeError if input exceeds the pixel safety cap.
     Other Pillow/IO errors propagate to caller.
     """
+    from PIL import Image
+
     img = load_safe_image(image_bytes)
 
     # Main: long edge <= 1920, preserve aspect.
@@ -86,8 +85,72 @@ def _atomic_write(path, data):
     os.replace(tmp, path)
 
 
+# ---- Content-addressed storage ----
+# Every variant is stored as ZONE_<id>[_thumb].<sha256[:10]>.webp and served
+# from /api/zones/<id>/photo/<hash>.webp with an immutable Cache-Control. The
+# URL changes whenever the bytes do, so browsers never revalidate — the ETag /
+# Last-Modified stripped by app._strip_conditional_revalidation are not needed.
+# Files of the previous hash are removed as soon as the DB points elsewhere.
+
+PHOTO_HASH_LEN = 10
+
+_STORED_NAME_RE = re.compile(
+    r"^ZONE_(\d+)(_thumb)?(?:\.([0-9a-f]{10}))?\.(?:png|jpg|jpeg|gif|webp)$",
+    re.IGNORECASE,
+)
+
+
+def photo_digest(rel_path):
+    """Content hash embedded in a stored photo path, or None for legacy names."""
+    m = _STORED_NAME_RE.match(os.path.basename(rel_path or ""))
+    return m.group(3) if m else None
+
+
+def photo_url(zone_id, rel_path):
+    """Immutable URL of a stored variant; None for legacy (unhashed) files."""
+    digest = photo_digest(rel_path)
+    return f"/api/zones/{zone_id}/photo/{digest}.webp" if digest else None
+
+
+def _store_variants(zone_id, main_bytes, thumb_bytes=None):
+    """Write variants under their content-hashed names; return DB-relative paths."""
+    rels = []
+    for suffix, data in (("", main_bytes), ("_thumb", thumb_bytes)):
+        if data is None:
+            rels.append(None)
+            continue
+        name = f"ZONE_{zone_id}{suffix}.{hashlib.sha256(data).hexdigest()[:PHOTO_HASH_LEN]}.webp"
+        path = os.path.join(UPLOAD_FOLDER, name)
+        if not os.path.exists(path):
+            # Atomic writes: tmp file -> os.replace, a reader never sees a
+            # partial file under a hash it was promised.
+            _atomic_write(path, data)
+        rels.append(f"media/{ZONE_MEDIA_SUBDIR}/{name}")
+    return rels[0], rels[1]
+
+
+def _gc_zone_files(zone_id, keep=()):
+    """Remove stored variants of ``zone_id`` whose names are not in ``keep``."""
+    keep = {os.path.basename(k) for k in keep if k}
+    try:
+        names = os.listdir(UPLOAD_FOLDER)
+    except OSError as e:
+        logger.debug("gc_zone_files: listdir failed: %s", e)
+        return
+    for name in names:
+        m = _STORED_NAME_RE.match(name)
+        if not m or int(m.group(1)) != zone_id or name in keep:
+            continue
+        try:
+            os.remove(os.path.join(UPLOAD_FOLDER, name))
+        except OSError as e:
+            logger.debug("gc_zone_files: remove %s failed: %s", name, e)
+
+
 def normalize_image(image_data, max_long_side=1024, fmt="WEBP", quality=90, lossless=False, target_size=None):
     """Normalize image: auto-rotate by EXIF, convert to RGB, scale and save in chosen format."""
+    from PIL import Image, ImageOps
+
     try:
         img = Image.open(io.BytesIO(image_data))
         try:
@@ -152,7 +215,11 @@ def _archive_old_zone_file(zone_id, old_rel, label):
         if os.path.exists(old_abs):
             old_dir = os.path.join(UPLOAD_FOLDER, "OLD")
             os.makedirs(old_dir, exist_ok=True)
-            os.replace(old_abs, os.path.join(old_dir, os.path.basename(old_abs)))
+            # Archived under the unhashed name: OLD/ keeps one previous photo
+            # per zone and variant instead of one per content hash.
+            m = _STORED_NAME_RE.match(os.path.basename(old_abs))
+            name = f"ZONE_{m.group(1)}{m.group(2) or ''}{os.path.splitext(old_abs)[1]}"
+            os.replace(old_abs, os.path.join(old_dir, name))
     except OSError as e:
         logger.debug("archive_old: %s move failed for zone %s: %s", label, zone_id, e)
 
@@ -160,7 +227,7 @@ def _archive_old_zone_file(zone_id, old_rel, label):
 @zones_photo_api_bp.route("/api/zones/<int:zone_id>/photo", methods=["POST"])
 @audit_log("photo_upload", target_extractor=lambda *a, **kw: f"zone:{kw.get('zone_id', a[0] if a else '?')}")
 def upload_zone_photo(zone_id):
-    """Upload photo for a zone (issue #11: writes main + thumb)."""
+    """Upload photo for a zone (issue #11: writes main + thumb, content-hashed)."""
     try:
         if "photo" not in request.files:
             return jsonify({"success": False, "message": "Файл не найден"}), 400
@@ -208,7 +275,6 @@ def upload_zone_photo(zone_id):
                 # test behaviour for the `b'not an image'` style cases.
                 main_bytes = file_data
                 thumb_bytes = file_data
-            ext = ".webp"
         else:
             try:
                 main_bytes, thumb_bytes = render_two_variants(file_data)
@@ -229,7 +295,6 @@ def upload_zone_photo(zone_id):
                         "error_code": "IMAGE_PROCESSING_FAILED",
                     }
                 ), 400
-            ext = ".webp"
 
         # Archive old files (main + thumb) before overwrite — both flow.
         try:
@@ -239,25 +304,18 @@ def upload_zone_photo(zone_id):
         except (sqlite3.Error, OSError) as e:
             logger.debug("upload_zone_photo: archive step warning: %s", e)
 
-        main_name = f"ZONE_{zone_id}{ext}"
-        thumb_name = f"ZONE_{zone_id}_thumb{ext}"
-        main_path = os.path.join(UPLOAD_FOLDER, main_name)
-        thumb_path = os.path.join(UPLOAD_FOLDER, thumb_name)
-        # Atomic writes: tmp file -> os.replace, prevents readers seeing a
-        # partial main while thumb is still being written.
-        _atomic_write(main_path, main_bytes)
-        _atomic_write(thumb_path, thumb_bytes)
-
-        db_main = f"media/{ZONE_MEDIA_SUBDIR}/{main_name}"
-        db_thumb = f"media/{ZONE_MEDIA_SUBDIR}/{thumb_name}"
+        db_main, db_thumb = _store_variants(zone_id, main_bytes, thumb_bytes)
         db.update_zone_photo(zone_id, db_main, photo_thumb=db_thumb, update_thumb=True)
-        db.add_log("photo_upload", json.dumps({"zone": zone_id, "filename": main_name}))
+        _gc_zone_files(zone_id, keep=(db_main, db_thumb))
+        db.add_log("photo_upload", json.dumps({"zone": zone_id, "filename": os.path.basename(db_main)}))
         return jsonify(
             {
                 "success": True,
                 "message": "Фотография загружена",
                 "photo_path": db_main,
                 "photo_thumb": db_thumb,
+                "photo_url": photo_url(zone_id, db_main),
+                "photo_thumb_url": photo_url(zone_id, db_thumb),
             }
         )
     except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
@@ -307,6 +365,7 @@ def delete_zone_photo(zone_id):
 
         # Always clear both DB columns so admin UI stops pointing at them.
         db.update_zone_photo(zone_id, None, photo_thumb=None, update_thumb=True)
+        _gc_zone_files(zone_id)
 
         if bad_path:
             return jsonify(
@@ -328,6 +387,8 @@ def delete_zone_photo(zone_id):
 @audit_log("photo_rotate", target_extractor=lambda *a, **kw: f"zone:{kw.get('zone_id', a[0] if a else '?')}")
 def rotate_zone_photo(zone_id):
     """Rotate zone photo by a multiple of 90 degrees."""
+    from PIL import Image
+
     try:
         zone = db.get_zone(zone_id)
         if not zone:
@@ -361,10 +422,13 @@ def rotate_zone_photo(zone_id):
             return jsonify({"success": False, "message": "Фото отсутствует"}), 404
 
         # Rotate every available variant. SEC-009: each path validated.
+        # Rotated bytes get new content-hashed names; the old files are
+        # collected once the DB points at the new ones.
         targets = [("main", photo_path)]
         if photo_thumb:
             targets.append(("thumb", photo_thumb))
 
+        rotated = {}
         for label, rel in targets:
             try:
                 filepath = safe_zone_photo_path(rel)
@@ -390,12 +454,24 @@ def rotate_zone_photo(zone_id):
             try:
                 with Image.open(filepath) as img:
                     img = img.rotate(-angle, expand=True)
-                    fmt = img.format or "JPEG"
-                    img.save(filepath, format=fmt)
+                    if img.mode != "RGB":
+                        img = img.convert("RGB")
+                    rotated[label] = encode_webp(img, quality=92 if label == "main" else 90)
             except (OSError, PermissionError) as e:
                 logger.error(f"rotate failed ({label}): {e}")
                 return jsonify({"success": False, "message": "Ошибка обработки изображения"}), 500
 
+        try:
+            db_main, db_thumb = _store_variants(zone_id, rotated["main"], rotated.get("thumb"))
+        except OSError as e:
+            logger.error(f"rotate failed (write): {e}")
+            return jsonify({"success": False, "message": "Ошибка обработки изображения"}), 500
+        if "thumb" not in rotated:
+            # legacy zone without a thumb file: keep the thumb column as is
+            db_thumb = photo_thumb
+        db.update_zone_photo(zone_id, db_main, photo_thumb=db_thumb, update_thumb=True)
+        _gc_zone_files(zone_id, keep=(db_main, db_thumb))
+
         try:
             db.add_log("photo_rotate", json.dumps({"zone": zone_id, "angle": angle}))
         except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
@@ -412,6 +488,8 @@ def get_zone_photo(zone_id):
 
     Issue #11: ``?variant=thumb`` returns the 400x400 thumb. Default = main.
     Lazy migration: legacy zones with NULL photo_thumb fall back to photo_path.
+    The UI uses the immutable ``photo_url`` / ``photo_thumb_url`` instead
+    (see :func:`get_zone_photo_by_hash`); this URL stays for old clients.
     """
     try:
         zone = db.get_zone(zone_id)
@@ -464,8 +542,50 @@ def get_zone_photo(zone_id):
                     "has_photo": has_photo,
                     "photo_path": zone.get("photo_path"),
                     "photo_thumb": zone.get("photo_thumb"),
+                    "photo_url": photo_url(zone_id, zone.get("photo_path")),
+                    "photo_thumb_url": photo_url(zone_id, zone.get("photo_thumb")),
                 }
             )
     except (sqlite3.Error, OSError) as e:
         logger.error(f"Ошибка получения фото зоны {zone_id}: {e}")
         return jsonify({"success": False, "message": "Ошибка получения фото"}), 500
+
+
+@zones_photo_api_bp.route("/api/zones/<int:zone_id>/photo/<digest>.webp", methods=["GET"])
+def get_zone_photo_by_hash(zone_id, digest):
+    """Serve a content-hashed variant with ``Cache-Control: immutable``.
+
+    The hash must match the zone's current main or thumb; a stale hash is a
+    404 (its file has been collected). Range requests are answered with 206
+    by Werkzeug; the file is streamed through ``wsgi.file_wrapper`` so servers
+    that implement it send it with sendfile().
+    """
+    try:
+        zone = db.get_zone(zone_id)
+        if not zone:
+            return jsonify({"success": False, "message": "Зона не найдена"}), 404
+        rel = next(
+            (p for p in (zone.get("photo_path"), zone.get("photo_thumb")) if p and photo_digest(p) == digest),
+            None,
+        )
+        if rel is None:
+            return jsonify({"success": False, "message": "Фотография не найдена"}), 404
+        try:
+            filepath = safe_zone_photo_path(rel)
+        except UnsafePathError as e:
+            logger.error("get_zone_photo_by_hash: refused unsafe photo_path for zone %s: %s", zone_id, e)
+            return jsonify(
+                {
+                    "success": False,
+                    "message": "Некорректный путь к фото",
+                    "error_code": "INVALID_PHOTO_PATH",
+                }
+            ), 400
+        if not os.path.exists(filepath):
+            return jsonify({"success": False, "message": "Файл не найден"}), 404
+        resp = send_file(filepath, mimetype="image/webp", conditional=True, etag=False)
+        resp.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return resp
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Ошибка получения фото зоны {zone_id}: {e}")
+        return jsonify({"success": False, "message": "Ошибка получения фото"}), 500
@@ -439,9 +439,7 @@ def api_zone_mqtt_start(zone_id: int):
                         # Remove existing stop jobs for THIS zone only —
                         # cancel_group_jobs would stop running peers.
                         try:
-                            for job in sched.scheduler.get_jobs():
-                                if f"zone_stop:{zone_id}:" in str(job.id) or f"zone_hard_stop:{zone_id}" in str(job.id):
-                                    job.remove()
+                            sched.cancel_zone_stop_timers(int(zone_id))
                         except (RuntimeError, AttributeError, ValueError) as e:
                             logger.debug("remove old stop jobs: %s", e)
                         if not current_app.config.get("TESTING", False):
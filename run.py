@@ -8,8 +8,6 @@ import os
 import signal
 import sys
 
-from app import app
-
 logger = logging.getLogger(__name__)
 
 
@@ -59,9 +57,54 @@ def _get_asgi_app(flask_app):
     raise ImportError("Cannot find WSGI-to-ASGI middleware in hypercorn")
 
 
+def _http_threads() -> int:
+    """Size of the executor that runs sync (WSGI) requests under Hypercorn.
+
+    Every open /api/mqtt/zones-sse stream pins one thread for its lifetime;
+    asyncio's default executor has only min(32, cpu+4) threads, so a handful
+    of browser tabs would starve all other requests.
+    """
+    from services.sse_hub import MAX_SSE_CLIENTS
+
+    default = MAX_SSE_CLIENTS + 8
+    try:
+        return max(4, int(os.environ.get("WB_HTTP_THREADS", default)))
+    except ValueError:
+        return default
+
+
+def _run_workers(port: int, workers: int) -> None:
+    """Multi-worker mode: Hypercorn spawns ``workers`` processes, each imports ``app:app``.
+
+    The master process never imports the app; the workers elect a leader
+    among themselves (see services/leader.py). Hypercorn does not respawn
+    workers — any worker exit ends ``run()`` — so a leader that loses its
+    lease demotes itself in-process instead of exiting.
+    """
+    from hypercorn.config import Config
+    from hypercorn.run import run
+
+    cfg = Config()
+    cfg.bind = [f"0.0.0.0:{port}"]
+    cfg.application_path = "app:app"
+    cfg.workers = workers
+    logger.info("Starting %d Hypercorn workers", workers)
+    sys.exit(run(cfg))
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "8080"))
 
+    from services.leader import configured_workers
+
+    workers = configured_workers()
+    if workers > 1:
+        # SIGINT/SIGTERM обрабатывает сам Hypercorn: воркеры завершаются штатно,
+        # лидер выключает зоны в своих atexit-хуках
+        _run_workers(port, workers)
+
+    from app import app
+
     # Register signal handlers before starting the server
     signal.signal(signal.SIGTERM, _graceful_shutdown)
     signal.signal(signal.SIGINT, _graceful_shutdown)
@@ -75,7 +118,17 @@ if __name__ == "__main__":
         cfg = Config()
         cfg.bind = [f"0.0.0.0:{port}"]
         asgi_app = _get_asgi_app(app)
-        asyncio.run(serve(asgi_app, cfg))
+
+        async def _serve():
+            from concurrent.futures import ThreadPoolExecutor
+
+            threads = _http_threads()
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+            )
+            await serve(asgi_app, cfg)
+
+        asyncio.run(_serve())
     except ImportError:
         # Fallback to Flask dev server
         logger.info("Hypercorn not available, using Flask dev server")
@@ -138,10 +138,44 @@ def job_recalc_water_balance():
         logger.debug("Handled exception in job_recalc_water_balance: %s", e)
 
 
+def job_retention():
+    """Nightly APScheduler job: tiered retention + incremental vacuum (db/retention.py).
+
+    Runs off-peak (02:40, before backup and morning programs); deletes go in
+    small batches, so a zone command arriving meanwhile waits at most one batch.
+    """
+    try:
+        from database import db
+
+        report = db.run_retention()
+        vac = report.get("vacuum") or {}
+        logger.info(
+            "retention job: %d rows purged in %.1fs, %d bytes reclaimed",
+            int(report.get("deleted") or 0),
+            float(report.get("duration_sec") or 0),
+            int(vac.get("reclaimed_bytes") or 0),
+        )
+        try:
+            from services.audit import record_audit
+
+            record_audit(
+                action_type="retention",
+                source="scheduler",
+                actor="system",
+                target="database",
+                payload=report,
+                result="success",
+            )
+        except (ImportError, sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.debug("retention self-audit failed: %s", e)
+    except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+        logger.error("job_retention failed: %s", e)
+
+
 def job_dispatch_bot_subscriptions():
     try:
         from database import db
-        from services.reports import build_report_text
+        from services.reports import cached_report_text
         from services.telegram_bot import notifier
 
         now = datetime.now()
@@ -151,7 +185,7 @@ def job_dispatch_bot_subscriptions():
                 fmt = str(sub.get("format") or "brief")
                 ptype = str(sub.get("type") or "daily")
                 period = "today" if ptype == "daily" else "7"
-                txt = build_report_text(period=period, fmt="brief" if fmt != "full" else "full")
+                txt = cached_report_text(period=period, fmt="brief" if fmt != "full" else "full")
                 chat_id = int(sub.get("chat_id"))
                 if chat_id:
                     notifier.send_text(chat_id, txt)
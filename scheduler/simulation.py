@@ -0,0 +1,622 @@
+"""Time-accelerated season simulation: the real scheduler on a virtual clock.
+
+Replays a season of program starts through ``IrrigationScheduler`` — the
+production path from the compiled program timeline through weather skip /
+adjustment, zone_control and the MQTT publish — with
+:class:`services.clock.SimClock` installed, so the one-second waits of a
+zone run advance virtual time instead of sleeping: a simulated day costs
+one to two CPU seconds.
+
+Model:
+  * runs execute one at a time in timeline order, each from its own fire
+    time (the clock is set back when runs overlap); overlapping runs are not
+    interleaved, an overlap on one group is reported as a conflict instead;
+  * groups of one program run one after another
+    (``program_max_parallel_groups = 1``): the parallel path hands zones to
+    worker threads, which a single virtual clock cannot replay deterministically;
+  * MQTT goes to :class:`RelayModel`, an in-process client that switches
+    relays on publish; observed-state verification is off;
+  * the timer store (hard stops) and the zone watchdog run as clock tickers
+    while virtual time moves, not on their own threads;
+  * weather is a recorded Open-Meteo hourly archive (``--weather``) or a
+    seeded synthetic season, served through the regular ``WeatherAdjustment``.
+
+Report (JSON): zone start drift against the run's plan (fire time plus the
+adjusted durations of the zones before it), database write statements and
+CPU seconds per simulated day, and conflicts — predicted by
+:class:`services.program_conflicts.ConflictEngine` vs observed group overlaps.
+
+CLI::
+
+    python -m scheduler.simulation [--days 92] [--start 2026-05-01] [--db irrigation.db]
+                                   [--weather archive.json] [--seed 1] [--out report.json]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any
+
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS = 92
+DEFAULT_START = "2026-05-01"
+WEATHER_PAST_H = 48  # часов истории в одном «ответе API» (precipitation_24h и т.п.)
+WEATHER_AHEAD_H = 24
+TIMER_TICK_SEC = 1.0
+_PROJECT_MODULES = ("database", "irrigation_scheduler", "app", "services", "routes", "scheduler", "db")
+_WRITE_RE = re.compile(
+    r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b(?:\s+OR\s+\w+)?\s+(?:INTO\s+|FROM\s+)?[\"`\[]?(\w+)", re.IGNORECASE
+)
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Linear-interpolated percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = math.floor(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _stats(values: list[float], digits: int = 3) -> dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), digits),
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "max": round(max(values), digits),
+        "min": round(min(values), digits),
+    }
+
+
+# ---- weather ----
+
+
+def synthetic_weather(start: datetime, days: int, seed: int = 1) -> dict[str, list]:
+    """Seeded hourly season in Open-Meteo's ``hourly`` shape (mid-latitude, summer peak in July)."""
+    rng = random.Random(seed)
+    hourly: dict[str, list] = {
+        "time": [],
+        "temperature_2m": [],
+        "relative_humidity_2m": [],
+        "precipitation": [],
+        "wind_speed_10m": [],
+        "weather_code": [],
+        "et0_fao_evapotranspiration": [],
+    }
+    first = start.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(hours=WEATHER_PAST_H)
+    for d in range(days + 4):
+        day = first + timedelta(days=d)
+        season = math.sin(math.pi * day.timetuple().tm_yday / 366)
+        mean_t = 6 + 16 * season + rng.uniform(-4, 4)
+        swing = rng.uniform(4, 8)
+        wet = rng.random() < 0.25
+        rain_hours = set(rng.sample(range(24), rng.randint(2, 9))) if wet else set()
+        wind = rng.uniform(1, 4.5) + (rng.uniform(3, 7) if rng.random() < 0.06 else 0.0)  # м/с, как в client.py
+        for h in range(24):
+            temp = mean_t + swing * math.sin((h - 9) * math.pi / 12)
+            rain = round(rng.uniform(0.2, 4.0), 1) if h in rain_hours else 0.0
+            sun = max(0.0, math.sin((h - 5) * math.pi / 15)) if 5 <= h <= 20 else 0.0
+            hourly["time"].append((day + timedelta(hours=h)).strftime("%Y-%m-%dT%H:00"))
+            hourly["temperature_2m"].append(round(temp, 1))
+            hourly["relative_humidity_2m"].append(round(min(98.0, 55 - 1.2 * (temp - mean_t) + (30 if rain else 0))))
+            hourly["precipitation"].append(rain)
+            hourly["wind_speed_10m"].append(round(max(0.0, wind + rng.uniform(-1, 1)), 1))
+            hourly["weather_code"].append(61 if rain else (1 if sun else 0))
+            hourly["et0_fao_evapotranspiration"].append(round(0.012 * max(temp, 0.0) * sun * (0.3 if rain else 1.0), 3))
+    return hourly
+
+
+def load_weather(path: str) -> dict[str, list]:
+    """Hourly arrays from an Open-Meteo forecast/archive JSON (the ``hourly`` object or the whole response)."""
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    hourly = raw.get("hourly", raw)
+    if not isinstance(hourly, dict) or not hourly.get("time"):
+        raise ValueError(f"{path}: no hourly.time array")
+    return hourly
+
+
+class ReplayWeatherService:
+    """Stands in for ``WeatherService``: answers from the season's hourly arrays at virtual now."""
+
+    def __init__(self, hourly: dict[str, list]):
+        self.hourly = {k: v for k, v in hourly.items() if isinstance(v, list)}
+        self._index = {t: i for i, t in enumerate(self.hourly["time"])}
+        self._hour: str | None = None
+        self._weather = None
+        self.misses = 0
+
+    def get_weather(self, force_refresh: bool = False):
+        from services.weather.models import WeatherData
+
+        now = clock.now()
+        hour = now.strftime("%Y-%m-%dT%H:00")
+        if hour == self._hour:
+            return self._weather
+        i = self._index.get(hour)
+        if i is None:
+            self.misses += 1
+            return None
+        lo = max(0, i - WEATHER_PAST_H)
+        hourly = {k: v[lo : i + WEATHER_AHEAD_H + 1] for k, v in self.hourly.items()}
+        today = [j for j, t in enumerate(hourly["time"]) if t.startswith(hour[:10])]
+
+        def _day(key: str, fn):
+            vals = [hourly[key][j] for j in today if key in hourly and hourly[key][j] is not None]
+            return [round(fn(vals), 2)] if vals else []
+
+        raw = {
+            "hourly": hourly,
+            "daily": {
+                "time": [hour[:10]],
+                "precipitation_sum": _day("precipitation", sum),
+                "et0_fao_evapotranspiration": _day("et0_fao_evapotranspiration", sum),
+                "temperature_2m_min": _day("temperature_2m", min),
+                "temperature_2m_max": _day("temperature_2m", max),
+            },
+            # наивное локальное «сейчас» − UTC: WeatherData ищет текущий час по этому смещению
+            "utc_offset_seconds": round((now - datetime(1970, 1, 1)).total_seconds() - clock.timestamp()),
+            "_fetched_at": clock.timestamp(),
+        }
+        self._hour, self._weather = hour, WeatherData(raw)
+        return self._weather
+
+
+# ---- relays ----
+
+
+class _Delivered:
+    rc = 0
+
+    def wait_for_publish(self, timeout: float | None = None) -> None:
+        return None
+
+    def is_published(self) -> bool:
+        return True
+
+
+class RelayModel:
+    """In-process MQTT client + relays: a publish to ``<zone topic>/on`` switches the relay at once.
+
+    Installed into ``services.mqtt_pub._MQTT_CLIENTS`` for every server id,
+    so the publish path (dedupe, retries, ``/on`` companion) runs unchanged.
+    """
+
+    def __init__(self, zones: list[dict]):
+        from utils import normalize_topic
+
+        self._lock = threading.Lock()
+        self.zones: dict[str, tuple[int, int]] = {}
+        for z in zones:
+            if z.get("topic"):
+                self.zones[normalize_topic(z["topic"])] = (int(z["id"]), int(z.get("group_id") or 0))
+        self.group_of = dict(self.zones.values())
+        self.on: dict[int, datetime] = {}
+        self.starts: list[tuple[datetime, int]] = []
+        self.spans: list[tuple[int, int, datetime, datetime]] = []  # (zone, group, on, off)
+        self.publishes = 0
+        self.group_overlaps = 0  # две зоны одной группы включены одновременно
+
+    # paho-совместимая часть, которой пользуется services.mqtt_pub
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False) -> _Delivered:
+        with self._lock:
+            self.publishes += 1
+            if topic.endswith("/on"):
+                self._switch(topic[:-3], str(payload) == "1")
+        return _Delivered()
+
+    def is_connected(self) -> bool:
+        return True
+
+    def reconnect(self) -> None:
+        return None
+
+    def loop_stop(self) -> None:
+        return None
+
+    def disconnect(self) -> None:
+        return None
+
+    def _switch(self, topic: str, on: bool) -> None:
+        hit = self.zones.get(topic)
+        if hit is None:
+            return
+        zone_id, group_id = hit
+        now = clock.now()
+        if on and zone_id not in self.on:
+            if group_id and any(self.group_of.get(z) == group_id for z in self.on):
+                self.group_overlaps += 1
+            self.on[zone_id] = now
+            self.starts.append((now, zone_id))
+        elif not on and zone_id in self.on:
+            self.spans.append((zone_id, group_id, self.on.pop(zone_id), now))
+
+
+# ---- database write accounting ----
+
+
+class WriteCounter:
+    """``sqlite3`` trace callback: counts INSERT/UPDATE/DELETE/REPLACE statements per table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.by_table: Counter = Counter()
+
+    def __call__(self, statement: str) -> None:
+        m = _WRITE_RE.match(statement)
+        if m:
+            with self._lock:
+                self.total += 1
+                self.by_table[m.group(1).lower()] += 1
+
+
+@contextlib.contextmanager
+def _count_writes(counter: WriteCounter):
+    real_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(counter)
+        return conn
+
+    sqlite3.connect = connect
+    try:
+        yield counter
+    finally:
+        sqlite3.connect = real_connect
+
+
+@contextlib.contextmanager
+def _swap(obj, attr: str, value):
+    missing = object()
+    old = obj.__dict__.get(attr, missing) if hasattr(obj, "__dict__") else getattr(obj, attr)
+    setattr(obj, attr, value)
+    try:
+        yield
+    finally:
+        if old is missing:
+            delattr(obj, attr)
+        else:
+            setattr(obj, attr, old)
+
+
+@contextlib.contextmanager
+def _bind_db(sim_db):
+    """Point ``database.db`` and every module-level copy of it (``db`` / ``_db``) at ``sim_db``."""
+    import database
+
+    old = database.db
+    swapped = []
+    for name, mod in list(sys.modules.items()):
+        if mod is None or not name.startswith(_PROJECT_MODULES):
+            continue
+        for attr in ("db", "_db"):
+            if getattr(mod, attr, None) is old:
+                setattr(mod, attr, sim_db)
+                swapped.append((mod, attr))
+    database.db = sim_db
+    try:
+        yield
+    finally:
+        database.db = old
+        for mod, attr in swapped:
+            setattr(mod, attr, old)
+
+
+# ---- sample site ----
+
+
+def seed_site(db) -> None:
+    """Four relays × four zones and five programs, two of which collide on one group."""
+    server = db.create_mqtt_server({"name": "sim", "host": "127.0.0.1", "port": 1883, "enabled": True})
+    groups = []
+    for g in range(4):
+        group = db.create_group(f"Контур {g + 1}")
+        zones = []
+        for ch in range(1, 5):
+            zone = db.create_zone(
+                {
+                    "name": f"Зона {g + 1}.{ch}",
+                    "icon": "🌿",
+                    "duration": 10 + 5 * ((g + ch) % 3),
+                    "group_id": group["id"],
+                    "topic": f"/devices/wb-mr6cv3_{101 + g}/controls/K{ch}",
+                    "mqtt_server_id": server["id"],
+                }
+            )
+            zones.append(int(zone["id"]))
+        groups.append(zones)
+    every_day = [0, 1, 2, 3, 4, 5, 6]
+    programs = [
+        {"name": "Газон утро", "time": "05:00", "days": every_day, "zones": groups[0]},
+        {"name": "Цветник", "time": "05:30", "days": [0, 2, 4], "zones": groups[1] + groups[2][:2]},
+        {"name": "Капельный", "time": "05:40", "days": every_day, "zones": groups[0][:1]},
+        {"name": "Вечер", "time": "20:00", "days": every_day, "zones": groups[3], "extra_times": ["22:30"]},
+        {"name": "Каждые 3 дня", "time": "06:15", "schedule_type": "interval", "interval_days": 3, "zones": groups[2]},
+    ]
+    for p in programs:
+        db.create_program({"enabled": 1, "days": [], **p})
+    db.set_setting_value("weather.enabled", "1")
+
+
+# ---- driver ----
+
+
+class SeasonSimulation:
+    """One simulated season in ``workdir``; :meth:`run` returns the report dict."""
+
+    def __init__(
+        self,
+        workdir: str,
+        start: datetime,
+        days: int,
+        weather: dict[str, list] | None = None,
+        source_db: str | None = None,
+        seed: int = 1,
+    ):
+        self.workdir = workdir
+        self.start = start
+        self.days = int(days)
+        self.weather = weather if weather is not None else synthetic_weather(start, self.days, seed)
+        self.source_db = source_db
+        self.db_path = os.path.join(workdir, "irrigation.db")
+
+    def _prepare_db(self):
+        from database import IrrigationDB
+
+        if self.source_db:
+            src = sqlite3.connect(self.source_db)
+            dst = sqlite3.connect(self.db_path)
+            with dst:
+                src.backup(dst)
+            src.close()
+            # копия не должна никому писать в Telegram
+            dst.execute("DELETE FROM settings WHERE key LIKE 'telegram%'")
+            dst.commit()
+            dst.close()
+            db = IrrigationDB(self.db_path)
+        else:
+            db = IrrigationDB(self.db_path)
+            seed_site(db)
+        # с чистого листа: все зоны выключены, без отложек
+        for z in db.get_zones():
+            db.update_zone(
+                int(z["id"]),
+                {"state": "off", "watering_start_time": None, "postpone_until": None, "commanded_state": "off"},
+            )
+        return db
+
+    def run(self) -> dict[str, Any]:
+        import irrigation_scheduler
+        from services import mqtt_pub, zone_control
+        from services.observed_state import state_verifier
+        from services.program_conflicts import ConflictEngine
+        from services.watchdog import ZoneWatchdog
+        from services.weather import singletons
+        from services.weather.adjustment import WeatherAdjustment
+
+        db = self._prepare_db()
+        zones = db.get_zones()
+        programs = db.get_programs()
+        relay = RelayModel(zones)
+        weather = ReplayWeatherService(self.weather)
+        writes = WriteCounter()
+        sim = clock.SimClock(self.start)
+        end = self.start + timedelta(days=self.days)
+        server_ids = {int(s["id"]) for s in db.get_mqtt_servers()} | {0}
+
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(clock.use_clock(sim))
+            stack.enter_context(_bind_db(db))
+            stack.enter_context(_swap(irrigation_scheduler, "TESTING", False))
+            stack.enter_context(_swap(zone_control, "TESTING", False))
+            stack.enter_context(_swap(state_verifier, "verify_async", lambda zone_id, expected: None))
+            stack.enter_context(_swap(singletons, "_weather_service", weather))
+            stack.enter_context(_swap(singletons, "_adjustment", WeatherAdjustment(self.db_path)))
+            stack.enter_context(_swap(mqtt_pub, "_MQTT_CLIENTS", dict.fromkeys(server_ids, relay)))
+            stack.enter_context(_swap(mqtt_pub, "_TOPIC_LAST_SEND", {}))
+            stack.enter_context(_swap(mqtt_pub, "_SERVER_CACHE", {}))
+
+            sched = irrigation_scheduler.IrrigationScheduler(db)
+            stack.callback(sched.timers.close)
+            stack.callback(_cancel_master_timers, zone_control)
+            stack.enter_context(_swap(irrigation_scheduler, "scheduler", sched))
+            stack.enter_context(_swap(sched, "_program_parallel_limit", lambda: 1))
+            durations: dict[int, int] = {}
+            real_adjusted = sched._get_weather_adjusted_duration
+
+            def _adjusted(zone_id: int, base: int) -> int:
+                durations[int(zone_id)] = value = real_adjusted(zone_id, base)
+                return value
+
+            stack.enter_context(_swap(sched, "_get_weather_adjusted_duration", _adjusted))
+            watchdog = ZoneWatchdog(db, zone_control)
+            sim.every(TIMER_TICK_SEC, sched.timers.fire_due)
+            sim.every(watchdog.interval, watchdog._check_zones)
+
+            engine = ConflictEngine(programs, zones, now=self.start, horizon_days=self.days, sequential_groups=True)
+            predicted = engine.site_report()
+
+            with _count_writes(writes):
+                with sched._timeline_lock:
+                    sched._load_timeline(self.start)
+                result = self._loop(sched, sim, end, relay, writes, durations)
+            result["skipped_no_weather"] = weather.misses
+
+        result["conflicts"] = {
+            "predicted": sum(c.occurrences for c in predicted),
+            "predicted_pairs": [
+                {"program_id": c.program_id, "other_program_id": c.other_program_id, "group_id": c.group_id}
+                for c in predicted
+            ],
+            **_observed_overlaps(result.pop("_group_spans")),
+            "relay_group_overlaps": relay.group_overlaps,
+        }
+        result["relay_publishes"] = relay.publishes
+        result["db_writes_by_table"] = dict(writes.by_table.most_common())
+        result["db_size_kb"] = round(os.path.getsize(self.db_path) / 1024, 1)
+        return result
+
+    def _loop(self, sched, sim, end: datetime, relay: RelayModel, writes: WriteCounter, durations: dict) -> dict:
+        from scheduler.jobs import job_run_program
+
+        drift: list[float] = []
+        end_overrun: list[float] = []
+        per_day_cpu: dict[str, float] = defaultdict(float)
+        per_day_writes: dict[str, int] = defaultdict(int)
+        group_spans: list[tuple[int, int, datetime, datetime]] = []  # (group, run, start, end)
+        runs = zone_runs = overlapped_starts = 0
+        wall0 = time.perf_counter()
+        while True:
+            fire_at = sched.program_timeline.peek()
+            if fire_at is None or fire_at >= end:
+                break
+            if fire_at < sim.now():
+                overlapped_starts += 1  # предыдущий запуск ещё «идёт» — прогоняем с его собственного старта
+                sim.set(fire_at)
+            else:
+                sim.advance_to(fire_at)
+            with sched._timeline_lock:
+                due = sched.program_timeline.pop_due(fire_at)
+            for slot_at, slot in due:
+                run = sched._program_runs.get(slot.program_id)
+                if run is None:
+                    continue
+                program_zones, name = run
+                sim.set(slot_at)
+                day = slot_at.strftime("%Y-%m-%d")
+                cpu0, writes0 = time.process_time(), writes.total
+                starts0, spans0 = len(relay.starts), len(relay.spans)
+                durations.clear()
+                job_run_program(slot.program_id, list(program_zones), name)
+                sched.timers.fire_due()
+                per_day_cpu[day] += time.process_time() - cpu0
+                per_day_writes[day] += writes.total - writes0
+                runs += 1
+
+                started: dict[int, datetime] = {}
+                for at, zid in relay.starts[starts0:]:
+                    started.setdefault(zid, at)
+                zone_runs += len(started)
+                planned = slot_at
+                for zid in program_zones:
+                    at = started.get(int(zid))
+                    if at is None:
+                        continue
+                    drift.append((at - planned).total_seconds())
+                    planned += timedelta(minutes=durations.get(int(zid), 0))
+                if started:
+                    end_overrun.append((sim.now() - planned).total_seconds())
+                by_group: dict[int, list[datetime]] = {}
+                for zid, gid, on_at, off_at in relay.spans[spans0:]:
+                    if zid in started:
+                        span = by_group.setdefault(gid, [on_at, off_at])
+                        span[0], span[1] = min(span[0], on_at), max(span[1], off_at)
+                group_spans.extend((gid, runs, s, e) for gid, (s, e) in by_group.items())
+
+        all_days = [(self.start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(self.days)]
+        return {
+            "start": self.start.isoformat(timespec="minutes"),
+            "days": self.days,
+            "wall_s": round(time.perf_counter() - wall0, 2),
+            "runs": runs,
+            "zone_runs": zone_runs,
+            "overlapped_starts": overlapped_starts,
+            "drift_s": _stats(drift),
+            "run_end_overrun_s": _stats(end_overrun),
+            "cpu_s_per_day": _stats([per_day_cpu.get(d, 0.0) for d in all_days], 4),
+            "db_writes_per_day": _stats([float(per_day_writes.get(d, 0)) for d in all_days], 1),
+            "db_writes": writes.total,
+            "_group_spans": group_spans,
+        }
+
+
+def _observed_overlaps(spans: list[tuple[int, int, datetime, datetime]]) -> dict[str, Any]:
+    """Pairs of runs holding one group at the same time (sweep per group)."""
+    count, minutes, groups = 0, 0.0, Counter()
+    by_group: dict[int, list] = defaultdict(list)
+    for gid, run, s, e in spans:
+        by_group[gid].append((s, e, run))
+    for gid, items in by_group.items():
+        items.sort()
+        active: list[tuple[datetime, datetime, int]] = []
+        for s, e, run in items:
+            active = [a for a in active if a[1] > s]
+            for _as, ae, arun in active:
+                if arun != run:
+                    count += 1
+                    groups[gid] += 1
+                    minutes += (min(ae, e) - s).total_seconds() / 60.0
+            active.append((s, e, run))
+    return {"observed": count, "observed_minutes": round(minutes, 1), "observed_by_group": dict(groups)}
+
+
+def _cancel_master_timers(zone_control) -> None:
+    with zone_control._PENDING_CLOSE_LOCK:
+        pending = list(zone_control._PENDING_CLOSE_TIMERS.values())
+        zone_control._PENDING_CLOSE_TIMERS.clear()
+    for timer in pending:
+        timer.cancel()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m scheduler.simulation", description="Season simulation")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--start", default=DEFAULT_START, help="YYYY-MM-DD[THH:MM]")
+    parser.add_argument("--db", help="replay the programs/zones of this database (a copy is used)")
+    parser.add_argument("--weather", help="Open-Meteo hourly JSON; synthetic season when omitted")
+    parser.add_argument("--seed", type=int, default=1, help="synthetic weather seed")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    args = parser.parse_args(argv)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+    start = datetime.fromisoformat(args.start)
+    source_db = os.path.abspath(args.db) if args.db else None
+    weather = load_weather(args.weather) if args.weather else None
+    out = os.path.abspath(args.out) if args.out else None
+    workdir = tempfile.mkdtemp(prefix="irrig-sim-")
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    # глобальный database.db создаётся при импорте в текущем каталоге — пусть это будет рабочий
+    os.chdir(workdir)
+    try:
+        report = SeasonSimulation(workdir, start, args.days, weather, source_db, args.seed).run()
+    finally:
+        if args.keep:
+            print(f"work directory: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Compiled program timeline: start slots of all enabled programs in one heap.
+
+Each program compiles to a list of :class:`Slot` (one per weekday × start
+time, or one per start time for interval / even-odd programs — the same
+granularity and ids the per-slot APScheduler jobs used to have). The
+:class:`ProgramTimeline` keeps the next firing of every slot in a min-heap;
+the scheduler arms a single persistent "program_dispatch" job at
+``peek()`` and, when it fires, takes everything due with ``pop_due()``.
+
+Recompiling one program only replaces that program's slots: stale heap
+entries are skipped lazily (version check) and compacted when they pile up.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+# Misfire window of the former per-slot cron jobs: a firing missed by more
+# than this (service down, suspend) is dropped rather than run late.
+PROGRAM_MISFIRE_GRACE_SEC = 3600
+PROGRAM_DISPATCH_JOB_ID = "program_dispatch"
+# Resolution of the dispatch cursor: resuming at ``cursor + step`` makes it
+# strictly-after, so a start that fired at the cursor is never dispatched again.
+DISPATCH_CURSOR_STEP = timedelta(microseconds=1)
+
+_ONE_SECOND = timedelta(seconds=1)
+
+
+@dataclass(frozen=True)
+class Slot:
+    """One recurring start of a program."""
+
+    key: str  # e.g. "program:3:main:d0" / "program:3:extra:1"
+    program_id: int
+    hour: int
+    minute: int
+    kind: str  # "weekdays" | "interval" | "even-odd"
+    day: int | None = None  # weekdays: 0=Пн
+    parity: int | None = None  # even-odd: 0 = чётные дни, 1 = нечётные
+    anchor: datetime | None = None  # interval: первый запуск
+    interval_days: int = 1
+
+    def first_at_or_after(self, t: datetime) -> datetime:
+        """Earliest firing of this slot that is ``>= t``."""
+        at_time = t.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if self.kind == "weekdays":
+            cand = at_time + timedelta(days=(self.day - t.weekday()) % 7)
+            return cand if cand >= t else cand + timedelta(days=7)
+        if self.kind == "even-odd":
+            cand = at_time if at_time >= t else at_time + timedelta(days=1)
+            # Самый длинный разрыв — 31 → 1 → 2 для чётных: не больше 3 дней.
+            while cand.day % 2 != self.parity:
+                cand += timedelta(days=1)
+            return cand
+        # interval
+        if t <= self.anchor:
+            return self.anchor
+        period = timedelta(days=max(1, self.interval_days))
+        periods = -(-(t - self.anchor) // period)  # ceil
+        return self.anchor + periods * period
+
+
+def _parse_hhmm(time_str: str) -> tuple[int, int]:
+    hours, minutes = map(int, str(time_str).split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"time out of range: {time_str}")
+    return hours, minutes
+
+
+def compile_program_slots(program_id: int, program_data: dict[str, Any], now: datetime | None = None) -> list[Slot]:
+    """Compile one program (main time + extra_times) into slots.
+
+    Validation of ``enabled`` / zones / days is the caller's job; a start
+    time that cannot be parsed is logged and skipped, like before.
+    """
+    now = now or clock.now()
+    schedule_type = program_data.get("schedule_type", "weekdays")
+    extra_times = program_data.get("extra_times", [])
+    if isinstance(extra_times, str):
+        try:
+            extra_times = json.loads(extra_times)
+        except (json.JSONDecodeError, TypeError):
+            extra_times = []
+    times = [("main", program_data["time"])] + [(f"extra:{i}", t) for i, t in enumerate(extra_times or [])]
+
+    slots: list[Slot] = []
+    for suffix, time_str in times:
+        try:
+            hours, minutes = _parse_hhmm(time_str)
+            base = f"program:{program_id}:{suffix}"
+            if schedule_type == "weekdays":
+                for day in program_data.get("days", []):
+                    slots.append(Slot(f"{base}:d{int(day)}", program_id, hours, minutes, "weekdays", day=int(day) % 7))
+            elif schedule_type == "interval":
+                # Первый запуск — сегодня в указанное время (если ещё не прошло) или завтра
+                anchor = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+                if anchor <= now:
+                    anchor += timedelta(days=1)
+                interval_days = int(program_data.get("interval_days", 1))
+                slots.append(
+                    Slot(base, program_id, hours, minutes, "interval", anchor=anchor, interval_days=interval_days)
+                )
+            elif schedule_type == "even-odd":
+                parity = 0 if program_data.get("even_odd", "even") == "even" else 1
+                slots.append(Slot(base, program_id, hours, minutes, "even-odd", parity=parity))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ошибка планирования времени {time_str} для программы {program_id}: {e}")
+    return slots
+
+
+class ProgramTimeline:
+    """Min-heap of next firings across all compiled programs. Not thread-safe."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[datetime, int, str]] = []  # (fire_at, version, slot key)
+        self._slots: dict[str, tuple[Slot, int]] = {}  # key -> (slot, live version)
+        self._by_program: dict[int, list[str]] = {}
+        self._versions = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def set_program(self, program_id: int, slots: list[Slot], since: datetime) -> list[str]:
+        """Replace a program's slots; first firings are ``>= since``. Returns slot keys."""
+        self.remove_program(program_id)
+        keys = []
+        for slot in slots:
+            self._push(slot, slot.first_at_or_after(since))
+            keys.append(slot.key)
+        self._by_program[program_id] = keys
+        self._maybe_compact()
+        return keys
+
+    def remove_program(self, program_id: int) -> list[str]:
+        keys = self._by_program.pop(program_id, [])
+        for key in keys:
+            self._slots.pop(key, None)
+        return keys
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._slots.clear()
+        self._by_program.clear()
+
+    def peek(self) -> datetime | None:
+        """Earliest pending firing, or None when nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[tuple[datetime, Slot]]:
+        """Take every firing ``<= now`` (in time order) and re-arm those slots."""
+        due: list[tuple[datetime, Slot]] = []
+        while self.peek() is not None and self._heap[0][0] <= now:
+            fire_at, _version, key = heapq.heappop(self._heap)
+            slot = self._slots[key][0]
+            due.append((fire_at, slot))
+            self._push(slot, slot.first_at_or_after(fire_at + _ONE_SECOND))
+        return due
+
+    def next_for_program(self, program_id: int) -> datetime | None:
+        keys = set(self._by_program.get(program_id, ()))
+        live = [at for at, version, key in self._heap if key in keys and self._slots.get(key, (None, -1))[1] == version]
+        return min(live) if live else None
+
+    def _push(self, slot: Slot, fire_at: datetime) -> None:
+        version = next(self._versions)
+        self._slots[slot.key] = (slot, version)
+        heapq.heappush(self._heap, (fire_at, version, slot.key))
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            _at, version, key = self._heap[0]
+            live = self._slots.get(key)
+            if live is not None and live[1] == version:
+                return
+            heapq.heappop(self._heap)
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) > 2 * len(self._slots) + 64:
+            self._heap = [e for e in self._heap if self._slots.get(e[2], (None, -1))[1] == e[1]]
+            heapq.heapify(self._heap)
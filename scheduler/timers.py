@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Durable one-shot timers: zone_stop / zone_hard_stop / zone_cap_stop / master_cap_close.
+
+These fire once per manual start and are armed/cancelled on every zone
+start/stop, so they bypass APScheduler (job pickling + SQLAlchemy round
+trip per call). State lives in memory — a dict of live timers plus a
+deadline min-heap — and every arm/cancel is appended to ``timer_log`` in a
+dedicated SQLite file (``timers.db``, sibling of ``jobs.db``).
+
+Durability: appends are buffered and committed by the worker thread in one
+transaction every ``flush_interval`` seconds (one fsync per batch instead of
+per timer). ``flush()`` forces a commit; ``close()`` flushes. On open the log
+is replayed (last record per timer id wins) and compacted to the live set.
+
+Firing follows the old DateTrigger jobs: a timer late by more than its
+``misfire_grace`` seconds is dropped with a warning; otherwise its handler
+(looked up by ``kind``) runs in a short-lived daemon thread.
+"""
+
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+TIMERS_DB_NAME = "timers.db"
+TIMER_FLUSH_INTERVAL_SEC = 0.05
+# Сжатие журнала, когда мёртвых записей заметно больше живых таймеров
+_COMPACT_MIN_ROWS = 256
+_MAX_SLEEP_SEC = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timer_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    timer_id TEXT NOT NULL,
+    kind TEXT,
+    target INTEGER,
+    run_at REAL,
+    misfire_grace INTEGER
+)
+"""
+
+
+@dataclass(frozen=True)
+class Timer:
+    timer_id: str  # e.g. "zone_stop:3:1718000000" / "master_cap_close:1"
+    kind: str  # handler key
+    target: int  # zone_id / group_id passed to the handler
+    run_at: float  # epoch seconds
+    misfire_grace: int = 300
+
+    @property
+    def run_at_dt(self) -> datetime:
+        return datetime.fromtimestamp(self.run_at)
+
+
+class TimerStore:
+    """In-memory deadline heap backed by an append-only SQLite log."""
+
+    def __init__(
+        self,
+        db_path: str,
+        handlers: dict[str, Callable[[int], None]],
+        flush_interval: float = TIMER_FLUSH_INTERVAL_SEC,
+    ):
+        self.db_path = db_path
+        self.handlers = dict(handlers)
+        self.flush_interval = float(flush_interval)
+        self._cond = threading.Condition()
+        self._live: dict[str, tuple[Timer, int]] = {}  # timer_id -> (timer, version)
+        self._heap: list[tuple[float, int, str]] = []  # (run_at, version, timer_id)
+        self._versions = itertools.count()
+        self._pending: list[tuple] = []  # log rows not yet committed
+        self._pending_since: float | None = None
+        self._log_rows = 0  # records in timer_log (committed + pending)
+        self._rewrite = False  # next flush rewrites the log to the live set
+        self._io_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    # --- lifecycle ---
+    def open(self) -> int:
+        """Open the log, replay it and compact it to the live set. Returns live timer count."""
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(_SCHEMA)
+        rows = conn.execute(
+            "SELECT op, timer_id, kind, target, run_at, misfire_grace FROM timer_log ORDER BY seq"
+        ).fetchall()
+        replayed: dict[str, Timer] = {}
+        for op, timer_id, kind, target, run_at, grace in rows:
+            if op == "arm":
+                replayed[timer_id] = Timer(timer_id, kind, int(target), float(run_at), int(grace))
+            else:
+                replayed.pop(timer_id, None)
+        with self._cond:
+            self._conn = conn
+            self._stopping = False
+            for timer in replayed.values():
+                if timer.timer_id not in self._live:
+                    self._push(timer)
+            self._log_rows = len(rows)
+            self._rewrite = True
+            self._cond.notify_all()
+            live = len(self._live)
+        self.flush()
+        return live
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="timer-store", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self._thread = None
+        self.flush()
+        with self._io_lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.debug("timer store close: %s", e)
+
+    # --- API ---
+    def arm(self, timer_id: str, kind: str, target: int, run_at: datetime, misfire_grace: int = 300) -> Timer:
+        """Arm (or re-arm, replacing) a timer."""
+        timer = Timer(str(timer_id), str(kind), int(target), run_at.timestamp(), int(misfire_grace))
+        with self._cond:
+            self._push(timer)
+            self._append(("arm", timer.timer_id, timer.kind, timer.target, timer.run_at, timer.misfire_grace))
+            self._cond.notify_all()
+        self._flush_if_idle()
+        return timer
+
+    def cancel(self, timer_id: str) -> bool:
+        with self._cond:
+            found = self._drop(timer_id)
+            if found:
+                self._cond.notify_all()
+        if found:
+            self._flush_if_idle()
+        return found
+
+    def cancel_prefix(self, prefix: str) -> list[str]:
+        with self._cond:
+            ids = [tid for tid in self._live if tid.startswith(prefix)]
+            for tid in ids:
+                self._drop(tid)
+            if ids:
+                self._cond.notify_all()
+        if ids:
+            self._flush_if_idle()
+        return ids
+
+    def get(self, timer_id: str) -> Timer | None:
+        with self._cond:
+            live = self._live.get(timer_id)
+            return live[0] if live else None
+
+    def timers(self, prefix: str = "") -> list[Timer]:
+        with self._cond:
+            found = [t for t, _v in self._live.values() if t.timer_id.startswith(prefix)]
+        return sorted(found, key=lambda t: (t.run_at, t.timer_id))
+
+    def flush(self) -> None:
+        """Commit buffered log records (one transaction, one fsync)."""
+        # _io_lock → _cond: батч берётся под _io_lock, поэтому батчи пишутся в порядке появления
+        with self._io_lock:
+            conn = self._conn
+            if conn is None:
+                return
+            with self._cond:
+                batch, self._pending = self._pending, []
+                self._pending_since = None
+                compact = self._rewrite or self._log_rows > max(_COMPACT_MIN_ROWS, 4 * len(self._live))
+                self._rewrite = False
+                snapshot = [t for t, _v in self._live.values()] if compact else None
+            if snapshot is not None:
+                rows = [("arm", t.timer_id, t.kind, t.target, t.run_at, t.misfire_grace) for t in snapshot]
+            elif batch:
+                rows = batch
+            else:
+                return
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if snapshot is not None:
+                    conn.execute("DELETE FROM timer_log")
+                conn.executemany(
+                    "INSERT INTO timer_log(op, timer_id, kind, target, run_at, misfire_grace) VALUES (?,?,?,?,?,?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"Не удалось записать журнал таймеров: {e}")
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error as re:
+                    logger.debug("timer log rollback: %s", re)
+                with self._cond:
+                    # повторим следующим flush
+                    self._pending[:0] = batch
+                    self._rewrite = self._rewrite or snapshot is not None
+                    if self._pending and self._pending_since is None:
+                        self._pending_since = time.monotonic()
+                return
+            if snapshot is not None:
+                with self._cond:
+                    self._log_rows = len(rows) + len(self._pending)
+
+    # --- internals (``_cond`` held) ---
+    def _push(self, timer: Timer) -> None:
+        version = next(self._versions)
+        self._live[timer.timer_id] = (timer, version)
+        heapq.heappush(self._heap, (timer.run_at, version, timer.timer_id))
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [e for e in self._heap if self._live.get(e[2], (None, -1))[1] == e[1]]
+            heapq.heapify(self._heap)
+
+    def _drop(self, timer_id: str, op: str = "cancel") -> bool:
+        if self._live.pop(timer_id, None) is None:
+            return False
+        self._append((op, timer_id, None, None, None, None))
+        return True
+
+    def _append(self, row: tuple) -> None:
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        self._pending.append(row)
+        self._log_rows += 1
+
+    def _pop_due(self, now: float) -> list[Timer]:
+        due: list[Timer] = []
+        while self._heap:
+            run_at, version, timer_id = self._heap[0]
+            live = self._live.get(timer_id)
+            if live is None or live[1] != version:
+                heapq.heappop(self._heap)
+                continue
+            if run_at > now:
+                break
+            heapq.heappop(self._heap)
+            due.append(live[0])
+            self._drop(timer_id, op="fire")
+        return due
+
+    def _next_wakeup(self, now: float) -> float | None:
+        waits = []
+        if self._heap:
+            waits.append(self._heap[0][0] - now)
+        if self._pending_since is not None:
+            waits.append(self._pending_since + self.flush_interval - time.monotonic())
+        # не спим дольше _MAX_SLEEP_SEC: дедлайны в wall-clock, часы могут переставить
+        return max(0.0, min(min(waits), _MAX_SLEEP_SEC)) if waits else None
+
+    def _flush_if_idle(self) -> None:
+        # Без рабочего потока (до start()/после close()) пишем синхронно
+        if self._thread is None or not self._thread.is_alive():
+            self.flush()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                due = self._pop_due(clock.timestamp())
+                if not due:
+                    flush_due = (
+                        self._pending_since is not None
+                        and time.monotonic() - self._pending_since >= self.flush_interval
+                    )
+                    if not flush_due:
+                        self._cond.wait(self._next_wakeup(clock.timestamp()))
+                        continue
+            for timer in due:
+                self._fire(timer)
+            self.flush()
+
+    def fire_due(self, now: float | None = None) -> int:
+        """Fire every timer due at ``now`` in the calling thread; returns how many fired.
+
+        For drivers that own the clock (``scheduler/simulation.py``) and run
+        the store without its worker thread.
+        """
+        with self._cond:
+            due = self._pop_due(clock.timestamp() if now is None else now)
+        for timer in due:
+            self._fire(timer, inline=True)
+        self._flush_if_idle()
+        return len(due)
+
+    def _fire(self, timer: Timer, inline: bool = False) -> None:
+        late = clock.timestamp() - timer.run_at
+        if late > timer.misfire_grace:
+            logger.warning(f"Таймер {timer.timer_id} пропущен: опоздание {int(late)} с > {timer.misfire_grace} с")
+            return
+        handler = self.handlers.get(timer.kind)
+        if handler is None:
+            logger.error(f"Таймер {timer.timer_id}: нет обработчика для '{timer.kind}'")
+            return
+        if inline:
+            self._run_handler(handler, timer)
+            return
+        threading.Thread(
+            target=self._run_handler, args=(handler, timer), name=f"timer-{timer.kind}", daemon=True
+        ).start()
+
+    @staticmethod
+    def _run_handler(handler: Callable[[int], None], timer: Timer) -> None:
+        try:
+            handler(timer.target)
+        except Exception:
+            logger.exception("timer handler failed (timer=%s)", timer.timer_id)
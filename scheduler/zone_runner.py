@@ -11,6 +11,7 @@ from apscheduler.triggers.date import DateTrigger
 
 from config import TESTING
 from scheduler.jobs import job_close_master_valve, job_stop_zone
+from services import clock
 
 logger = logging.getLogger(__name__)
 
@@ -75,10 +76,10 @@ class ZoneRunnerMixin:
             if TESTING:
                 total_seconds = min(6, max(1, int(duration_minutes)))
                 early = 0
-                run_at = datetime.now() + timedelta(seconds=total_seconds)
+                run_at = clock.now() + timedelta(seconds=total_seconds)
             else:
-                run_at = datetime.now() + timedelta(minutes=int(duration_minutes)) - timedelta(seconds=early)
-            now = datetime.now()
+                run_at = clock.now() + timedelta(minutes=int(duration_minutes)) - timedelta(seconds=early)
+            now = clock.now()
             if run_at <= now:
                 run_at = now + timedelta(seconds=1)
             _kwargs = dict(
@@ -106,7 +107,7 @@ class ZoneRunnerMixin:
     def schedule_zone_hard_stop(self, zone_id: int, run_at: datetime):
         """Жёсткий watchdog-стоп зоны на точное время run_at (доп. страховка)."""
         try:
-            now = datetime.now()
+            now = clock.now()
             if run_at <= now:
                 run_at = now + timedelta(seconds=1)
             _kwargs = dict(
@@ -131,7 +132,7 @@ class ZoneRunnerMixin:
     def schedule_zone_cap(self, zone_id: int, cap_minutes: int = 240):
         """Абсолютный лимит работы зоны: форс-стоп через cap_minutes от текущего момента."""
         try:
-            run_at = datetime.now() + timedelta(minutes=int(cap_minutes))
+            run_at = clock.now() + timedelta(minutes=int(cap_minutes))
             job_id = f"zone_cap_stop:{int(zone_id)}"
             _kwargs = dict(
                 args=[zone_id],
@@ -180,7 +181,7 @@ class ZoneRunnerMixin:
     def schedule_master_valve_cap(self, group_id: int, hours: int = 24):
         """Абсолютный лимит открытого мастер-клапана — закрыть через hours часов."""
         try:
-            run_at = datetime.now() + timedelta(hours=int(hours))
+            run_at = clock.now() + timedelta(hours=int(hours))
             job_id = f"master_cap_close:{int(group_id)}"
             _kwargs = dict(
                 args=[group_id],
@@ -3,38 +3,23 @@
 Provides a Flask decorator that returns 429 when a client exceeds the
 configured request rate for a given endpoint group.
 
-The existing ``rate_limiter.py`` handles login-specific lockout logic;
-this module covers all other mutating API endpoints.
+Counting is delegated to the shared :class:`services.rate_limiter.SlidingWindowLimiter`
+(O(1) sliding-window counter, sharded locks, LRU-bounded key set); the
+login-specific lockout logic in ``rate_limiter.py`` runs on the same engine.
 """
 
 import functools
 import logging
-import threading
-import time
 
 from flask import jsonify, request
 
-logger = logging.getLogger(__name__)
-
-# {(ip, group_name): [timestamp, ...]}
-_REQUESTS: dict[tuple[str, str], list[float]] = {}
-_LOCK = threading.Lock()
-
-# Prune old entries every N calls to avoid unbounded memory growth
-_CALL_COUNT = 0
-_PRUNE_EVERY = 500
+from services.rate_limiter import SlidingWindowLimiter, record_throttled
 
+logger = logging.getLogger(__name__)
 
-def _prune_old(now: float, window: float = 120.0) -> None:
-    """Remove entries older than *window* seconds."""
-    cutoff = now - window
-    keys_to_delete = []
-    for key, timestamps in _REQUESTS.items():
-        _REQUESTS[key] = [ts for ts in timestamps if ts > cutoff]
-        if not _REQUESTS[key]:
-            keys_to_delete.append(key)
-    for k in keys_to_delete:
-        del _REQUESTS[k]
+# Keyed by (ip, group_name). Fixed memory per key; at most _MAX_KEYS keys.
+_MAX_KEYS = 16384
+_LIMITER = SlidingWindowLimiter("api", shards=16, max_keys=_MAX_KEYS)
 
 
 def _is_allowed(ip: str, group: str, max_requests: int, window_sec: int) -> tuple[bool, int]:
@@ -42,28 +27,15 @@ def _is_allowed(ip: str, group: str, max_requests: int, window_sec: int) -> tupl
 
     Returns (allowed, retry_after_seconds).
     """
-    global _CALL_COUNT
-    now = time.time()
-    key = (ip, group)
-
-    with _LOCK:
-        _CALL_COUNT += 1
-        if _CALL_COUNT % _PRUNE_EVERY == 0:
-            _prune_old(now)
-
-        timestamps = _REQUESTS.get(key, [])
-        cutoff = now - window_sec
-        recent = [ts for ts in timestamps if ts > cutoff]
+    allowed, retry_after = _LIMITER.hit((ip, group), max_requests, window_sec)
+    if not allowed:
+        record_throttled("api", group)
+    return allowed, retry_after
 
-        if len(recent) >= max_requests:
-            # Calculate when the oldest relevant request will expire
-            retry_after = int(recent[0] - cutoff) + 1
-            _REQUESTS[key] = recent
-            return False, max(1, retry_after)
 
-        recent.append(now)
-        _REQUESTS[key] = recent
-        return True, 0
+def tracked_keys() -> int:
+    """Number of (ip, group) keys currently held — for /metrics."""
+    return len(_LIMITER)
 
 
 def rate_limit(group: str, max_requests: int = 30, window_sec: int = 60):
@@ -115,5 +87,4 @@ def rate_limit(group: str, max_requests: int = 30, window_sec: int = 60):
 
 def reset_all() -> None:
     """Clear all rate limit state (useful in tests)."""
-    with _LOCK:
-        _REQUESTS.clear()
+    _LIMITER.clear()
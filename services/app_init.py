@@ -10,6 +10,8 @@ import logging
 import sqlite3
 import time
 
+from services import startup_timeline
+
 logger = logging.getLogger(__name__)
 
 _INIT_DONE = False
@@ -20,6 +22,7 @@ _INIT_DONE = False
 # module-level bool (not a threading primitive) because /readyz is a simple
 # read-only check.
 _boot_sync_done = False
+_shutdown_handlers_registered = False
 
 
 def reset_init():
@@ -29,7 +32,7 @@ def reset_init():
     _boot_sync_done = False
 
 
-def initialize_app(app, db, *, start_watchdog_fn=None):
+def initialize_app(app, db, *, start_watchdog_fn=None, stop_watchdog_fn=None):
     """Run once at boot: scheduler, watchdogs, boot-sync, monitors, MQTT warm-up.
 
     Args:
@@ -37,6 +40,8 @@ def initialize_app(app, db, *, start_watchdog_fn=None):
         db: database handle.
         start_watchdog_fn: callable to start the single-zone exclusivity
             watchdog.  Injected from app.py to avoid circular import.
+        stop_watchdog_fn: its counterpart, used when a multi-worker leader
+            is demoted.
 
     Safe to call multiple times — only the first invocation does real work.
     Skipped entirely when ``app.config['TESTING']`` is truthy.
@@ -49,11 +54,53 @@ def initialize_app(app, db, *, start_watchdog_fn=None):
     if app.config.get("TESTING"):
         return
 
+    # всё до этой точки — старт интерпретатора и импорт app.py (включая миграции)
+    startup_timeline.mark("imports")
+
+    from services import leader as _leader
+
+    if _leader.is_multi_worker():
+        _init_worker(app, db, start_watchdog_fn, stop_watchdog_fn)
+        return
+
+    _start_core_services(app, db, start_watchdog_fn)
+
+    # ── 8. Observability metrics (F2) ───────────────────────────────
+    try:
+        from routes.health_api import init_metrics as _init_metrics
+
+        _init_metrics(app, db)
+    except ImportError as e:
+        logger.warning("init_metrics not available: %s", e)
+    except Exception:
+        logger.exception("init_metrics failed")
+
+    # ── 9. systemd sd_notify: watchdog heartbeat + READY=1 ──────────
+    # Must run LAST so that /readyz reflects true readiness before systemd
+    # marks the unit active (Type=notify).
+    try:
+        from services.systemd_notify import notify_ready, start_heartbeat
+
+        start_heartbeat()  # start BEFORE notify_ready to close the gap
+        zone_count = 0
+        with contextlib.suppress(Exception):
+            zone_count = len(db.get_zones() or [])
+        notify_ready(status=f"boot_sync done, {zone_count} zones loaded")
+    except Exception:
+        logger.exception("systemd_notify wiring failed (non-fatal)")
+
+    startup_timeline.mark_ready()
+    logger.info("Application initialisation complete")
+
+
+def _start_core_services(app, db, start_watchdog_fn=None, monitors_running=False):
+    """Steps that must run in exactly one process: scheduler, watchdogs, boot sync, monitors."""
     # ── 1. Scheduler ────────────────────────────────────────────────
     try:
         from irrigation_scheduler import init_scheduler
 
-        init_scheduler(db)
+        with startup_timeline.phase("scheduler_load"):
+            init_scheduler(db)
         logger.info("Scheduler initialised")
     except ImportError as e:
         logger.error(f"Scheduler init failed: {e}")
@@ -77,18 +124,74 @@ def initialize_app(app, db, *, start_watchdog_fn=None):
         logger.exception("cap-time watchdog start failed")
 
     # ── 4. Boot sync: turn OFF all zones + master valves ────────────
-    _boot_sync(app, db)
+    with startup_timeline.phase("boot_sync"):
+        _boot_sync(app, db)
 
     # ── 5. Monitors (water, rain, env) ──────────────────────────────
-    _start_monitors(app, db)
+    if monitors_running:
+        # воркер уже слушал датчики пассивно (ведомым) — включаем действия по дождю
+        from services.monitors import rain_monitor
+
+        rain_monitor.passive = False
+    else:
+        with startup_timeline.phase("monitor_start"):
+            _start_monitors(app, db)
 
     # ── 6. MQTT publisher warm-up ───────────────────────────────────
-    _warm_mqtt_clients(db)
+    with startup_timeline.phase("mqtt_warmup"):
+        _warm_mqtt_clients(db)
 
     # ── 7. Graceful shutdown handlers ───────────────────────────────
     _register_shutdown_handlers(db)
 
-    # ── 8. Observability metrics (F2) ───────────────────────────────
+
+def _stop_core_services(stop_watchdog_fn=None):
+    """Undo :func:`_start_core_services` on a demoted leader.
+
+    Sensor monitors keep running passively like in any follower; shutdown
+    handlers stay registered and leave the zones alone while not leader.
+    """
+    try:
+        from irrigation_scheduler import stop_scheduler
+
+        stop_scheduler()
+    except ImportError as e:
+        logger.error(f"Scheduler stop failed: {e}")
+    if stop_watchdog_fn is not None:
+        try:
+            stop_watchdog_fn()
+        except Exception:
+            logger.exception("single-zone watchdog stop failed")
+    try:
+        from services.watchdog import stop_watchdog as _stop_cap_watchdog
+
+        _stop_cap_watchdog()
+    except ImportError:
+        logger.exception("cap-time watchdog stop failed")
+    try:
+        from services.monitors import rain_monitor
+
+        rain_monitor.passive = True
+    except ImportError:
+        logger.exception("Failed to import monitors")
+
+
+def _init_worker(app, db, start_watchdog_fn=None, stop_watchdog_fn=None):
+    """Multi-worker mode (``WB_WORKERS`` > 1), see services/leader.py.
+
+    Every worker gets the SSE relay and passive sensor monitors for its read
+    endpoints; the core services start in whichever worker wins the leader
+    lease (and again in its successor on failover). A leader that loses the
+    lease stops them again and carries on as a follower.
+    """
+    from services import leader, sse_hub
+
+    relay_dir = os.path.join(os.path.dirname(os.path.abspath(db.db_path)) or ".", ".sse-relay")
+    try:
+        sse_hub.start_relay(relay_dir, follower=True)
+    except OSError:
+        logger.exception("SSE relay start failed")
+    _start_monitors(app, db, passive=True)
     try:
         from routes.health_api import init_metrics as _init_metrics
 
@@ -98,21 +201,41 @@ def initialize_app(app, db, *, start_watchdog_fn=None):
     except Exception:
         logger.exception("init_metrics failed")
 
-    # ── 9. systemd sd_notify: watchdog heartbeat + READY=1 ──────────
-    # Must run LAST so that /readyz reflects true readiness before systemd
-    # marks the unit active (Type=notify).
-    try:
-        from services.systemd_notify import notify_ready, start_heartbeat
+    def _on_elected():
+        sse_hub.set_relay_leader()
+        leader.serve_leader_endpoint(app)
+        _start_core_services(app, db, start_watchdog_fn, monitors_running=True)
+        sse_hub.ensure_hub_started()
+        try:
+            from services.telegram_bot import start_long_polling_if_needed
 
-        start_heartbeat()  # start BEFORE notify_ready to close the gap
-        zone_count = 0
-        with contextlib.suppress(Exception):
-            zone_count = len(db.get_zones() or [])
-        notify_ready(status=f"boot_sync done, {zone_count} zones loaded")
-    except Exception:
-        logger.exception("systemd_notify wiring failed (non-fatal)")
+            start_long_polling_if_needed()
+        except ImportError as e:
+            logger.debug("Telegram polling not started: %s", e)
+        try:
+            from services.systemd_notify import notify_ready, start_heartbeat
 
-    logger.info("Application initialisation complete")
+            start_heartbeat()
+            notify_ready(status=f"leader pid={os.getpid()}")
+        except Exception:
+            logger.exception("systemd_notify wiring failed (non-fatal)")
+        startup_timeline.mark_ready()
+        logger.info("Leader services started (pid=%s)", os.getpid())
+
+    def _on_lost():
+        leader.stop_leader_endpoint()
+        sse_hub.set_relay_follower()
+        _stop_core_services(stop_watchdog_fn)
+        try:
+            from services.telegram_bot import stop_long_polling
+
+            stop_long_polling()
+        except ImportError as e:
+            logger.debug("Telegram polling not stopped: %s", e)
+        logger.warning("Leader services stopped, worker demoted to follower (pid=%s)", os.getpid())
+
+    leader.start_election(db.db_path, _on_elected, _on_lost)
+    logger.info("Worker initialised (pid=%s), waiting for leader election", os.getpid())
 
 
 # ---------------------------------------------------------------------------
@@ -160,6 +283,13 @@ def _boot_sync(app, db):
         except (sqlite3.Error, OSError) as e:
             logger.warning("boot_sync: aborted-run cleanup failed: %s", e)
 
+        # zone_last_run is trigger-maintained; a boot-time check catches
+        # drift from manual DB edits or a restored backup.
+        try:
+            db.check_zone_last_run(repair=True)
+        except AttributeError as e:
+            logger.debug("boot_sync: zone_last_run check skipped: %s", e)
+
         # Close master-valves (mode-aware, retain)
         try:
             seen: set = set()
@@ -278,8 +408,11 @@ def _boot_sync(app, db):
         logger.error(f"Boot sync failed: {e}")
 
 
-def _start_monitors(app, db):
-    """Start water, rain, and environment monitors."""
+def _start_monitors(app, db, passive=False):
+    """Start water, rain, and environment monitors.
+
+    ``passive``: the rain monitor only tracks ``is_rain`` (follower workers).
+    """
     try:
         from services.monitors import (
             env_monitor,
@@ -300,6 +433,7 @@ def _start_monitors(app, db):
     # Rain monitor
     try:
         cfg = db.get_rain_config()
+        rain_monitor.passive = bool(passive)
         rain_monitor.start(cfg)
     except (sqlite3.Error, OSError):
         logger.exception("RainMonitor start failed")
@@ -356,10 +490,13 @@ def _register_shutdown_handlers(db=None):
     Must be called AFTER app init so that MQTT clients are already warm.
     Not registered in TESTING mode.
     """
+    global _shutdown_handlers_registered
     from config import TESTING
 
-    if TESTING:
+    # повторное избрание того же воркера не должно дублировать atexit-хук
+    if TESTING or _shutdown_handlers_registered:
         return
+    _shutdown_handlers_registered = True
 
     def _signal_handler(signum, frame):
         logger.info("Shutdown: received signal %s", signum)
@@ -19,6 +19,9 @@ Behaviour:
     decorator to multi-method routes is safe).
   - Best-effort: a failure to write the audit row never breaks the handler.
   - Strips secrets from payload via key blacklist.
+  - ``capture_payload=False`` leaves the request body untouched (bulk/streaming
+    endpoints); the handler may attach a small summary via
+    :func:`set_audit_payload` instead.
 """
 
 from __future__ import annotations
@@ -238,12 +241,37 @@ def _safe_status_code(resp: Any) -> int | None:
         return None
 
 
+def set_audit_payload(payload: dict[str, Any]) -> None:
+    """Attach *payload* to the audit row of the current request.
+
+    For handlers decorated with ``capture_payload=False``: the decorator
+    records this dict (redacted) instead of the request body.
+    """
+    try:
+        from flask import g  # local import — no Flask dep at module load
+
+        g.audit_payload = payload
+    except (ImportError, RuntimeError) as e:
+        logger.debug("set_audit_payload outside request context: %s", e)
+
+
+def _handler_payload() -> dict[str, Any] | None:
+    try:
+        from flask import g
+
+        payload = g.pop("audit_payload", None)
+    except (ImportError, RuntimeError):
+        return None
+    return _redact(payload) if isinstance(payload, dict) else None
+
+
 def audit_log(
     action_type: str,
     target_extractor: Callable[..., str] | None = None,
     payload_filter: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
     source: str = "api",
     skip_methods: Iterable[str] = ("GET", "HEAD", "OPTIONS"),
+    capture_payload: bool = True,
 ):
     """Return a decorator that records a row in ``audit_log`` per call.
 
@@ -255,6 +283,8 @@ def audit_log(
             dict — e.g. to drop additional fields or whitelist specific ones.
         source: ``'api'`` (default), ``'ui'``, ``'scheduler'`` etc.
         skip_methods: HTTP methods that should NOT be recorded (default: read-only).
+        capture_payload: when False the request body/form is never read —
+            the payload comes from :func:`set_audit_payload` (or stays empty).
     """
     skip_set = {m.upper() for m in skip_methods}
 
@@ -285,7 +315,7 @@ def audit_log(
                     logger.debug("audit target_extractor failed: %s", e)
                     target = None
 
-            payload = _extract_payload(request)
+            payload = _extract_payload(request) if capture_payload else None
             if payload is not None and payload_filter is not None:
                 try:
                     payload = payload_filter(payload)
@@ -337,6 +367,8 @@ def audit_log(
                 raise
             finally:
                 duration_ms = int((time.time() - t0) * 1000)
+                if not capture_payload:
+                    payload = _handler_payload()
                 # Best-effort write — never raise from inside the audit hook
                 try:
                     from database import db as _db  # local — avoid circular import
@@ -0,0 +1,172 @@
+"""Injectable time source for the scheduler and the services around it.
+
+The scheduler, zone control, watchdog, float monitor and weather code read
+the time and sleep through this module instead of calling ``datetime.now()``
+/ ``time.time()`` / ``time.sleep()`` directly. In production the active
+clock is :class:`SystemClock`, a thin pass-through. A season simulation
+(``scheduler/simulation.py``) or a test swaps in :class:`SimClock` with
+:func:`use_clock`, so a 30-minute zone run takes microseconds.
+
+Waits on events go through :func:`wait` as well: with a virtual clock a
+wait that times out moves time forward by the timeout instead of blocking.
+"""
+
+import contextlib
+import logging
+import threading
+import time as _time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class SystemClock:
+    """Wall clock: the default."""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def timestamp(self) -> float:
+        return _time.time()
+
+    def monotonic(self) -> float:
+        return _time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            _time.sleep(seconds)
+
+    def wait(self, event: threading.Event, timeout: float | None) -> bool:
+        return event.wait(timeout)
+
+
+class SimClock:
+    """Virtual clock for simulations: sleeps and timed-out waits advance time instantly.
+
+    Meant for a single driving thread (the simulation runs program after
+    program in one thread); other threads see time jump but never block on it.
+    Periodic work that runs on its own thread in production (watchdog, timer
+    store) is registered with :meth:`every` and runs from whichever thread
+    advances the clock.
+    """
+
+    def __init__(self, start: datetime):
+        self._t = start.timestamp()
+        self._mono = 0.0
+        self._lock = threading.Lock()
+        self._tick_lock = threading.Lock()
+        self._tickers: list[list] = []  # [interval, next_due, callback]
+        self.slept = 0.0  # суммарное «проспанное» виртуальное время, с
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._t)
+
+    def timestamp(self) -> float:
+        return self._t
+
+    def monotonic(self) -> float:
+        return self._mono
+
+    def advance(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._t += seconds
+            self._mono += seconds
+        self._run_tickers()
+
+    def advance_to(self, when: datetime) -> None:
+        """Jump forward to ``when``; never moves backwards."""
+        self.advance(when.timestamp() - self._t)
+
+    def set(self, when: datetime) -> None:
+        """Put wall time at ``when``, backwards too; monotonic time is not touched."""
+        with self._lock:
+            self._t = when.timestamp()
+            for ticker in self._tickers:
+                ticker[1] = self._t + ticker[0]
+
+    def every(self, interval: float, callback) -> None:
+        """Call ``callback()`` every ``interval`` virtual seconds.
+
+        A jump over several periods runs it once (like APScheduler's
+        ``coalesce``); a callback that itself sleeps does not re-enter.
+        """
+        self._tickers.append([float(interval), self._t + float(interval), callback])
+
+    def _run_tickers(self) -> None:
+        if not self._tickers or not self._tick_lock.acquire(False):
+            return
+        try:
+            for ticker in self._tickers:
+                if self._t >= ticker[1]:
+                    ticker[1] = self._t + ticker[0]
+                    try:
+                        ticker[2]()
+                    except Exception:
+                        logger.exception("clock ticker %r failed", ticker[2])
+        finally:
+            self._tick_lock.release()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.slept += seconds
+            self.advance(seconds)
+
+    def wait(self, event: threading.Event, timeout: float | None) -> bool:
+        if event.is_set():
+            return True
+        if timeout is None:
+            # некому выставить событие в виртуальном времени — как у Event.wait(0)
+            return False
+        self.sleep(timeout)
+        return event.is_set()
+
+
+_clock: SystemClock | SimClock = SystemClock()
+
+
+def get_clock() -> SystemClock | SimClock:
+    return _clock
+
+
+def set_clock(clock: SystemClock | SimClock) -> SystemClock | SimClock:
+    """Install ``clock`` process-wide; returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextlib.contextmanager
+def use_clock(clock: SystemClock | SimClock):
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
+
+
+def now() -> datetime:
+    return _clock.now()
+
+
+def timestamp() -> float:
+    return _clock.timestamp()
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    _clock.sleep(seconds)
+
+
+def wait(event: threading.Event, timeout: float | None) -> bool:
+    """``event.wait(timeout)`` on the active clock."""
+    return _clock.wait(event, timeout)
+
+
+def utcnow_local(offset_seconds: int) -> datetime:
+    """Naive local time at a fixed UTC offset (what Open-Meteo's hourly grid uses)."""
+    return datetime(1970, 1, 1) + timedelta(seconds=_clock.timestamp() + int(offset_seconds))
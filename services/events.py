@@ -1,43 +1,244 @@
+"""In-process event bus.
+
+``publish()`` never runs subscribers on the publisher's thread (zone start/stop,
+emergency API, state verifier): each subscription has its own bounded queue
+and a small worker pool drains the queues. A subscription is served by at most
+one worker at a time, so it sees events in publish order; a slow subscriber
+(e.g. the Telegram notifier) only backs up its own queue. When a queue is full
+the oldest event is dropped and counted.
+
+Subscriptions filter by topic (the event ``type``): exact names or ``prefix*``
+patterns; no topics means every event.
+
+Dedup: an event with the same ``type`` and ``id`` / ``event_id`` / ``ts`` as
+one published less than ``DEDUP_TTL_SEC`` ago is ignored. Keys live in an
+ordered map (insertion order == expiry order) pruned from the front; at
+``DEDUP_SET_MAX_SIZE`` the oldest keys are evicted.
+
+In synchronous mode (on under TESTING, see :func:`set_sync`) subscribers run
+inline, which keeps tests deterministic.
+"""
+
 import logging
 import threading
 import time
-from typing import Any, Callable
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable
+from typing import Any, TypedDict
 
 from constants import DEDUP_SET_MAX_SIZE, DEDUP_TTL_SEC
 
 logger = logging.getLogger(__name__)
 
-_BUS_LOCK = threading.Lock()
-_SUBS = []  # list[Callable[[dict], None]]
-_DEDUP = set()
+EVENT_WORKERS = 2
+SUBSCRIBER_QUEUE_MAX = 256
+
+
+class Event(TypedDict, total=False):
+    """Payload carried by the bus: ``type`` is the topic, the rest is optional."""
+
+    type: str  # topic: zone_start, zone_stop, emergency_on, emergency_off, critical_error, error, ...
+    id: int | str
+    event_id: str
+    ts: float
+    by: str
+    code: str
+    name: str
+    message: str
+
+
+class Subscription:
+    """One subscriber: callback, topic filter and its bounded queue."""
+
+    def __init__(
+        self,
+        callback: Callable[[Event], None],
+        topics: Iterable[str] | None = None,
+        maxsize: int = SUBSCRIBER_QUEUE_MAX,
+        name: str | None = None,
+    ):
+        self.callback = callback
+        self.name = name or getattr(callback, "__qualname__", None) or repr(callback)
+        self.topics = tuple(topics or ())
+        self._exact = frozenset(t for t in self.topics if not t.endswith("*"))
+        self._prefixes = tuple(t[:-1] for t in self.topics if t.endswith("*"))
+        self.maxsize = max(1, int(maxsize))
+        self.queue: deque[tuple[float, Event]] = deque()
+        self.scheduled = False  # стоит в очереди готовых или обрабатывается воркером
+        self.active = True
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.high_water = 0
+        self.max_lag = 0.0  # секунды от publish до вызова
+
+    def matches(self, topic: str) -> bool:
+        if not self.topics:
+            return True
+        return topic in self._exact or any(topic.startswith(p) for p in self._prefixes)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "topics": list(self.topics),
+            "queued": len(self.queue),
+            "high_water": self.high_water,
+            "maxsize": self.maxsize,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+_BUS_LOCK = threading.Condition()
+_SUBS: list[Subscription] = []
+_DEDUP: OrderedDict[str, float] = OrderedDict()  # key -> expiry (time.monotonic)
 _DEDUP_TTL = float(DEDUP_TTL_SEC)
+_READY: deque[Subscription] = deque()
+_WORKERS: list[threading.Thread] = []
+_COUNTERS = {"published": 0, "deduplicated": 0}
 
+try:
+    from config import TESTING as _SYNC
+except ImportError as e:
+    logger.debug("Exception in events config import: %s", e)
+    _SYNC = False
 
-def publish(event: dict[str, Any]) -> None:
+
+def set_sync(enabled: bool) -> None:
+    """Run subscribers inline on the publisher's thread (test mode) or on the worker pool."""
+    global _SYNC
+    _SYNC = bool(enabled)
+
+
+def publish(event: Event) -> None:
     try:
-        key = f"{event.get('type')}:{event.get('id') or event.get('event_id') or event.get('ts')}"
-        now = time.time()
+        topic = str(event.get("type"))
+        key = f"{topic}:{event.get('id') or event.get('event_id') or event.get('ts')}"
+        now = time.monotonic()
         with _BUS_LOCK:
-            # Simple TTL-based dedup
             _cleanup(now)
-            if key in _DEDUP:
+            if _DEDUP.get(key, 0.0) > now:
+                _COUNTERS["deduplicated"] += 1
                 return
-            _DEDUP.add(key)
-            subs = list(_SUBS)
-        for cb in subs:
-            try:
-                cb(dict(event))
-            except (KeyError, TypeError, ValueError) as e:
-                logger.debug("Handled exception in publish: %s", e)
+            _DEDUP.pop(key, None)
+            _DEDUP[key] = now + _DEDUP_TTL
+            _COUNTERS["published"] += 1
+            subs = [s for s in _SUBS if s.matches(topic)]
+            if not _SYNC:
+                for sub in subs:
+                    _enqueue(sub, now, event)
+                if subs:
+                    _ensure_workers()
+                    _BUS_LOCK.notify_all()
+                return
+        for sub in subs:
+            _deliver(sub, now, event.copy())
     except (ConnectionError, TimeoutError, OSError) as e:
         logger.debug("Handled exception in publish: %s", e)
 
 
-def subscribe(callback: Callable[[dict[str, Any]], None]) -> None:
+def subscribe(
+    callback: Callable[[Event], None],
+    topics: Iterable[str] | None = None,
+    maxsize: int = SUBSCRIBER_QUEUE_MAX,
+    name: str | None = None,
+) -> Subscription:
+    sub = Subscription(callback, topics=topics, maxsize=maxsize, name=name)
     with _BUS_LOCK:
-        _SUBS.append(callback)
+        _SUBS.append(sub)
+    return sub
 
 
+def unsubscribe(sub: Subscription) -> None:
+    with _BUS_LOCK:
+        sub.active = False
+        sub.queue.clear()
+        if sub in _SUBS:
+            _SUBS.remove(sub)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Wait until every subscriber queue is drained (for tests and shutdown)."""
+    deadline = time.monotonic() + timeout
+    with _BUS_LOCK:
+        while any(s.queue or s.scheduled for s in _SUBS):
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            _BUS_LOCK.wait(min(left, 0.05))
+    return True
+
+
+def stats() -> dict[str, Any]:
+    """Backpressure metrics: per-subscriber queue depth, high-water mark, drops, lag."""
+    with _BUS_LOCK:
+        return {
+            "published": _COUNTERS["published"],
+            "deduplicated": _COUNTERS["deduplicated"],
+            "dedup_keys": len(_DEDUP),
+            "sync": _SYNC,
+            "workers": sum(1 for t in _WORKERS if t.is_alive()),
+            "subscribers": [s.stats() for s in _SUBS],
+        }
+
+
+# --- internals (``_BUS_LOCK`` held unless noted) ---
 def _cleanup(now: float) -> None:
-    if len(_DEDUP) > DEDUP_SET_MAX_SIZE:
-        _DEDUP.clear()
+    # ключи упорядочены по времени истечения — снимаем просроченные с головы
+    while _DEDUP:
+        key, expires = next(iter(_DEDUP.items()))
+        if expires > now and len(_DEDUP) <= DEDUP_SET_MAX_SIZE:
+            break
+        _DEDUP.popitem(last=False)
+
+
+def _enqueue(sub: Subscription, now: float, event: Event) -> None:
+    if len(sub.queue) >= sub.maxsize:
+        sub.queue.popleft()
+        sub.dropped += 1
+        if sub.dropped == 1 or sub.dropped % 100 == 0:
+            logger.warning("event subscriber %s is falling behind: %d event(s) dropped", sub.name, sub.dropped)
+    sub.queue.append((now, event.copy()))
+    sub.high_water = max(sub.high_water, len(sub.queue))
+    if not sub.scheduled:
+        sub.scheduled = True
+        _READY.append(sub)
+
+
+def _ensure_workers() -> None:
+    alive = [t for t in _WORKERS if t.is_alive()]
+    _WORKERS[:] = alive
+    for i in range(len(alive), EVENT_WORKERS):
+        t = threading.Thread(target=_worker, name=f"event-bus-{i}", daemon=True)
+        _WORKERS.append(t)
+        t.start()
+
+
+def _worker() -> None:
+    while True:
+        with _BUS_LOCK:
+            while not _READY:
+                _BUS_LOCK.wait()
+            sub = _READY.popleft()
+            item = sub.queue.popleft() if sub.queue and sub.active else None
+        if item is not None:
+            _deliver(sub, item[0], item[1])
+        with _BUS_LOCK:
+            if sub.queue and sub.active:
+                _READY.append(sub)
+            else:
+                sub.scheduled = False
+            _BUS_LOCK.notify_all()
+
+
+def _deliver(sub: Subscription, published_at: float, event: Event) -> None:
+    # без _BUS_LOCK: подписчик может сам публиковать события
+    sub.max_lag = max(sub.max_lag, time.monotonic() - published_at)
+    try:
+        sub.callback(event)
+        sub.delivered += 1
+    except Exception:  # subscriber bug must not kill a pool worker
+        sub.errors += 1
+        logger.exception("event subscriber %s failed on %s", sub.name, event.get("type"))
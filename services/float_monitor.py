@@ -7,14 +7,22 @@ Key principles:
   K6: Signals queue manager about pause (for excluded_wait_seconds)
   S5: wb-rules tripped lifecycle
   S6: Hysteresis — min_run_time=60s, 3 trips in 5min → emergency stop
+
+Waiting is event-driven: resume/timeout events are :class:`Signal` objects,
+so :meth:`FloatMonitor.wait_for_resume_or_cancel` wakes immediately on
+resume, cancel, shutdown or float timeout. Float timeouts are kept in a
+min-heap served by a single timer thread (started on the first pause), so
+``_check_timeouts`` no longer has to be driven from outside.
 """
 
+import heapq
 import logging
 import threading
-import time
-from datetime import datetime
+from collections import deque
 
 from db.base import BaseRepository
+from services import clock
+from services.multiwait import Signal, wait_any
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +30,7 @@ logger = logging.getLogger(__name__)
 FLOAT_MIN_RUN_TIME = 60  # seconds — min run time after resume before re-pause
 FLOAT_MAX_TRIPS = 3  # max trips within window
 FLOAT_TRIP_WINDOW = 300  # seconds (5 min)
+FLOAT_HISTORY_SIZE = 32  # state transitions kept per group (get_all_states)
 
 
 class _GroupState:
@@ -37,8 +46,10 @@ class _GroupState:
         self.timeout_at = None  # type: Optional[float]  # monotonic
         self.timeout_minutes = 30
         self.paused_zones = []  # type: List[int]
-        self.resume_event = threading.Event()
+        self.resume_event = Signal()
+        self.timeout_event = Signal()  # set when the float timeout fires
         self.emergency_stopped = False
+        self.history = deque(maxlen=FLOAT_HISTORY_SIZE)  # type: Deque[dict]
 
         # Debounce
         self.debounce_seconds = 5
@@ -84,6 +95,12 @@ class FloatMonitor:
         self._started = False
         self._original_on_message = {}  # type: Dict[int, Any]  # server_id -> original callback
 
+        # Float timeouts: heap of (timeout_at_monotonic, group_id), one timer thread
+        self._timer_cond = threading.Condition()
+        self._timeouts = []  # type: List[Tuple[float, int]]
+        self._timer_thread = None  # type: Optional[threading.Thread]
+        self._timer_stop = False
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
@@ -92,10 +109,20 @@ class FloatMonitor:
         """Subscribe to MQTT topics for all float_enabled groups."""
         with self._lock:
             self._started = True
+        with self._timer_cond:
+            self._timer_stop = False
         self._load_all_groups()
 
     def stop(self):
         """Unsubscribe from all float MQTT topics."""
+        with self._timer_cond:
+            self._timer_stop = True
+            self._timeouts = []
+            self._timer_cond.notify_all()
+            timer = self._timer_thread
+            self._timer_thread = None
+        if timer is not None and timer is not threading.current_thread():
+            timer.join(timeout=2.0)
         with self._lock:
             self._started = False
             for group_id in list(self._subscriptions.keys()):
@@ -134,9 +161,9 @@ class FloatMonitor:
             timeout_at_str = None
             if gs.timeout_at is not None:
                 try:
-                    remaining_timeout = gs.timeout_at - time.monotonic()
+                    remaining_timeout = gs.timeout_at - clock.monotonic()
                     if remaining_timeout > 0:
-                        timeout_at_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        timeout_at_str = clock.now().strftime("%Y-%m-%d %H:%M:%S")
                 except Exception:
                     pass
             return {
@@ -154,10 +181,17 @@ class FloatMonitor:
 
     def get_all_states(self):
         # type: () -> Dict[int, dict]
-        """Get float states for all monitored groups."""
+        """Get float states for all monitored groups, with recent transitions (oldest first)."""
         with self._lock:
             group_ids = list(self._states.keys())
-        return {gid: self.get_state(gid) for gid in group_ids}
+        result = {}
+        for gid in group_ids:
+            state = self.get_state(gid)
+            with self._lock:
+                gs = self._states.get(gid)
+                state["history"] = [dict(h) for h in gs.history] if gs is not None else []
+            result[gid] = state
+        return result
 
     def is_paused(self, group_id):
         # type: (int) -> bool
@@ -183,21 +217,21 @@ class FloatMonitor:
         """Wait for resume, cancel, shutdown, or timeout.
 
         Returns: 'resumed' | 'cancelled' | 'shutdown' | 'timeout'
+        ('timeout' = *timeout* elapsed or the group's float timeout fired)
         """
         resume_event = self.get_resume_event(group_id)
-        deadline = time.monotonic() + timeout
+        with self._lock:
+            gs = self._states.get(group_id)
+            float_timeout = gs.timeout_event if gs is not None else None
 
-        while True:
-            if resume_event.is_set():
-                return "resumed"
-            if cancel_event and cancel_event.is_set():
-                return "cancelled"
-            if shutdown_event and shutdown_event.is_set():
-                return "shutdown"
-            if time.monotonic() >= deadline:
-                return "timeout"
-            # Wait with short timeout for responsive checking
-            resume_event.wait(timeout=1.0)
+        fired = wait_any([resume_event, cancel_event, shutdown_event, float_timeout], timeout=timeout)
+        if fired is resume_event:
+            return "resumed"
+        if fired is not None and fired is cancel_event:
+            return "cancelled"
+        if fired is not None and fired is shutdown_event:
+            return "shutdown"
+        return "timeout"
 
     # ------------------------------------------------------------------
     # MQTT message handling
@@ -233,7 +267,7 @@ class FloatMonitor:
 
             # Debounce logic
             debounce_sec = gs.debounce_seconds
-            now = time.monotonic()
+            now = clock.monotonic()
 
             if debounce_sec <= 0:
                 # No debounce — apply immediately
@@ -283,9 +317,10 @@ class FloatMonitor:
         if len(gs.trip_times) >= FLOAT_MAX_TRIPS:
             gs.emergency_stopped = True
             gs.paused = True
-            gs.paused_since = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            gs.paused_since = clock.now().strftime("%Y-%m-%d %H:%M:%S")
             gs.paused_since_mono = now
             gs.resume_event.clear()
+            self._record(gs, "emergency_stop", trips=len(gs.trip_times))
 
             group_name = self._subscriptions.get(gs.group_id, {}).get("name", "Группа %d" % gs.group_id)
             trip_count = len(gs.trip_times)
@@ -320,14 +355,16 @@ class FloatMonitor:
 
         # Set pause state
         gs.paused = True
-        gs.paused_since = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        gs.paused_since = clock.now().strftime("%Y-%m-%d %H:%M:%S")
         gs.paused_since_mono = now
         gs.timeout_at = now + gs.timeout_minutes * 60
         gs.resume_event.clear()
+        self._schedule_timeout(gs.timeout_at, gs.group_id)
 
         # Pause active zones in DB (K4)
         paused_zones = self._pause_active_zones_in_db(gs.group_id)
         gs.paused_zones = paused_zones
+        self._record(gs, "pause", paused_zones=list(paused_zones))
 
         # Log float event
         self._log_float_event(gs.group_id, "float_pause", paused_zones)
@@ -359,8 +396,9 @@ class FloatMonitor:
 
         # Clear pause state
         gs.paused = False
-        gs.timeout_at = None
+        gs.timeout_at = None  # a pending heap entry for this pause becomes a no-op
         gs.resume_event.set()
+        self._record(gs, "resume", paused_seconds=round(now - (gs.paused_since_mono or now), 1))
 
         # Log float event
         self._log_float_event(gs.group_id, "float_resume", gs.paused_zones)
@@ -384,7 +422,7 @@ class FloatMonitor:
 
     def _check_timeouts(self):
         """Check all groups for float timeout → emergency stop."""
-        now = time.monotonic()
+        now = clock.monotonic()
         timed_out = []
 
         with self._lock:
@@ -392,6 +430,8 @@ class FloatMonitor:
                 if gs.paused and gs.timeout_at is not None and now >= gs.timeout_at:
                     gs.timeout_at = None  # prevent re-trigger
                     gs.emergency_stopped = True
+                    gs.timeout_event.set()
+                    self._record(gs, "timeout")
                     timed_out.append(group_id)
 
         # Process timeouts outside lock
@@ -416,6 +456,57 @@ class FloatMonitor:
                 except Exception:
                     logger.exception("FloatMonitor: telegram_notify failed")
 
+    def _schedule_timeout(self, timeout_at, group_id):
+        # type: (float, int) -> None
+        """Push a float deadline onto the heap, starting the timer thread if needed."""
+        with self._timer_cond:
+            if self._timer_stop:
+                return
+            heapq.heappush(self._timeouts, (timeout_at, group_id))
+            if self._timer_thread is None or not self._timer_thread.is_alive():
+                self._timer_thread = threading.Thread(target=self._timer_loop, name="float-timeouts", daemon=True)
+                self._timer_thread.start()
+            self._timer_cond.notify_all()
+
+    def _timer_loop(self):
+        """Sleep until the earliest float deadline, then run _check_timeouts.
+
+        Stale heap entries (the group resumed meanwhile) are harmless:
+        _check_timeouts re-validates every group under the lock.
+        """
+        while True:
+            with self._timer_cond:
+                while not self._timer_stop:
+                    if not self._timeouts:
+                        self._timer_cond.wait()
+                        continue
+                    delay = self._timeouts[0][0] - clock.monotonic()
+                    if delay <= 0:
+                        break
+                    self._timer_cond.wait(delay)
+                if self._timer_stop:
+                    return
+                now = clock.monotonic()
+                while self._timeouts and self._timeouts[0][0] <= now:
+                    heapq.heappop(self._timeouts)
+            try:
+                self._check_timeouts()
+            except Exception:
+                logger.exception("FloatMonitor: timeout check failed")
+
+    @staticmethod
+    def _record(gs, event, **extra):
+        # type: (_GroupState, str, Any) -> None
+        """Append a state transition to the group's history ring (lock held)."""
+        item = {
+            "at": clock.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "event": event,
+            "level_ok": gs.level_ok,
+            "paused": gs.paused,
+        }
+        item.update(extra)
+        gs.history.append(item)
+
     # ------------------------------------------------------------------
     # MQTT reconnect handler
     # ------------------------------------------------------------------
@@ -24,12 +24,13 @@ class UnsafePathError(ValueError):
 
 
 # Whitelist: legal zone photo filename pattern.
-# Matches what upload_zone_photo writes: "ZONE_<id>.<ext>" or "ZONE_<id>_thumb.<ext>".
-# Issue #11 added the optional `_thumb` suffix; the parenthesised group is the
-# only widening — anything else (e.g. ZONE_5_thumbb.webp, ZONE_5_thumb_evil.webp)
-# still fails the anchored match.
+# Matches what upload_zone_photo writes: "ZONE_<id>.<hash>.webp" or
+# "ZONE_<id>_thumb.<hash>.webp", plus the legacy unhashed "ZONE_<id>.<ext>".
+# Issue #11 added the optional `_thumb` suffix, content addressing the optional
+# 10-hex-digit hash; anything else (e.g. ZONE_5_thumbb.webp,
+# ZONE_5_thumb_evil.webp, ZONE_5.abc.webp) still fails the anchored match.
 _ZONE_PHOTO_FILENAME_RE = re.compile(
-    r"^ZONE_\d+(_thumb)?\.(png|jpg|jpeg|gif|webp)$",
+    r"^ZONE_\d+(_thumb)?(\.[0-9a-f]{10})?\.(png|jpg|jpeg|gif|webp)$",
     re.IGNORECASE,
 )
 
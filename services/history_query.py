@@ -0,0 +1,399 @@
+"""Zone history query layer: cached plan/actual payloads and streamed CSV rows.
+
+The JSON endpoints in ``routes/zones_history_api.py`` build their payload
+here. Results are cached per process, keyed by (database, selection, days,
+local date, data stamp). The stamp lives in the one-row
+``history_data_version`` table; triggers on zone_runs, zone_runs_daily,
+programs and zones replace it on every change that can alter a history
+payload. A repeat dashboard load therefore costs one primary-key read on a
+reused connection. Every worker in multi-worker mode sees the same stamp.
+
+The CSV export iterates a cursor over zone_runs and yields one line at a
+time, so memory use does not grow with the exported range.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import io
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from services.history_calc import (
+    calculate_actual_for_zone,
+    calculate_plan_for_zone,
+    calculate_summary,
+    date_range,
+    zone_has_active_program,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_ENTRIES = 64
+# Зоны этой группы («без полива») не входят в глобальную историю по умолчанию
+NO_IRRIGATION_GROUP_ID = 999
+CSV_HEADER = ("date", "start_time", "end_time", "zone_id", "zone_name", "duration_min", "liters", "source", "status")
+
+_cache: OrderedDict[tuple, Any] = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_local = threading.local()
+
+
+# ---- connection / data version ----
+
+
+def _conn(db_path: str) -> sqlite3.Connection:
+    """Per-thread read connection, reused across requests."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conns[db_path] = conn
+    return conn
+
+
+def data_version(db_path: str) -> str | None:
+    """Current history stamp, or None when it is unavailable (no caching then)."""
+    try:
+        row = _conn(db_path).execute("SELECT stamp FROM history_data_version WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.debug("history data version unavailable: %s", e)
+        return None
+
+
+def _cached(db_path: str, key: tuple, compute: Callable[[], Any]) -> Any:
+    version = data_version(db_path)
+    if version is None:
+        return compute()
+    full_key = (db_path, version, *key)
+    with _cache_lock:
+        if full_key in _cache:
+            _cache.move_to_end(full_key)
+            _stats["hits"] += 1
+            return _cache[full_key]
+    value = compute()
+    with _cache_lock:
+        _stats["misses"] += 1
+        _cache[full_key] = value
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return value
+
+
+def cache_stats() -> dict[str, int]:
+    with _cache_lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+        _stats.update(hits=0, misses=0)
+
+
+# ---- raw data ----
+
+
+def _utc_window(from_local: date, to_local: date) -> tuple[str, str]:
+    """Half-open UTC window covering [from_local 00:00 local, to_local+1 00:00 local]."""
+    start_local = datetime.combine(from_local, datetime.min.time()).astimezone()
+    end_local = datetime.combine(to_local + timedelta(days=1), datetime.min.time()).astimezone()
+    start_iso = start_local.astimezone(UTC).isoformat().replace("+00:00", "Z")
+    end_iso = end_local.astimezone(UTC).isoformat().replace("+00:00", "Z")
+    return start_iso, end_iso
+
+
+def _runs_sql(n_zones: int) -> str:
+    placeholders = ",".join("?" * n_zones)
+    return (
+        f"SELECT id, zone_id, group_id, start_utc, end_utc, total_liters, status, source "
+        f"FROM zone_runs "
+        f"WHERE zone_id IN ({placeholders}) "
+        f"  AND start_utc IS NOT NULL "
+        f"  AND start_utc >= ? AND start_utc < ? "
+        f"ORDER BY start_utc DESC"
+    )
+
+
+def fetch_runs_for_zones(db_path: str, zone_ids: list[int], from_local: date, to_local: date) -> list[dict[str, Any]]:
+    """Return zone_runs rows for ``zone_ids`` whose start_utc falls in the
+    [from_local, to_local] local-date range (inclusive on both ends).
+    """
+    if not zone_ids:
+        return []
+    start_iso, end_iso = _utc_window(from_local, to_local)
+    try:
+        rows = _conn(db_path).execute(_runs_sql(len(zone_ids)), [*zone_ids, start_iso, end_iso]).fetchall()
+        return [dict(r) for r in rows]
+    except sqlite3.Error:
+        return []
+
+
+def iter_runs_for_zone(db_path: str, zone_id: int, from_local: date, to_local: date) -> Iterator[sqlite3.Row]:
+    """Stream zone_runs rows of one zone (newest first) without materialising them."""
+    start_iso, end_iso = _utc_window(from_local, to_local)
+    # своё соединение: генератор живёт, пока клиент читает ответ
+    conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield from conn.execute(_runs_sql(1), (zone_id, start_iso, end_iso))
+    except sqlite3.Error as e:
+        logger.warning("history CSV export aborted: %s", e)
+    finally:
+        conn.close()
+
+
+def _fetch_rolled_up_days(db, zone_ids: list[int], from_local: date, to_local: date) -> list[dict[str, Any]]:
+    """zone_runs_daily rows for the range: runs that retention already purged.
+
+    Only the per-day totals survive a purge, so these days add to the daily
+    breakdown and the summary but not to the ``runs`` list.
+    """
+    try:
+        return db.get_zone_runs_daily(zone_ids, from_local.isoformat(), to_local.isoformat())
+    except (sqlite3.Error, AttributeError):
+        return []
+
+
+# ---- payload pieces ----
+
+
+def _add_rolled_up_days(rolled: list[dict[str, Any]], actual_min: dict[date, int], runs_count: dict[date, int]) -> None:
+    for r in rolled:
+        try:
+            d = date.fromisoformat(str(r.get("day")))
+        except ValueError:
+            continue
+        if d in actual_min:
+            actual_min[d] += int(r.get("minutes") or 0)
+            runs_count[d] += int(r.get("runs") or 0)
+
+
+def _build_daily(
+    dates: list[date],
+    actual_min: dict[date, int],
+    runs_count: dict[date, int],
+    plan_min: dict[date, int],
+    has_plan: bool,
+) -> list[dict[str, Any]]:
+    out = []
+    for d in dates:
+        item = {
+            "date": d.isoformat(),
+            "actual_minutes": int(actual_min.get(d, 0)),
+            "runs": int(runs_count.get(d, 0)),
+            "plan_minutes": int(plan_min.get(d, 0)) if has_plan else None,
+        }
+        out.append(item)
+    return out
+
+
+def _parse_utc(raw) -> datetime | None:
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _duration_min(sdt: datetime | None, edt: datetime | None) -> int:
+    if not sdt or not edt:
+        return 0
+    try:
+        dsec = (edt - sdt).total_seconds()
+    except TypeError:
+        return 0
+    return round(dsec / 60.0) if dsec > 0 else 0
+
+
+def _serialize_run(run: dict[str, Any], zone_lookup: dict[int, dict[str, Any]]) -> dict[str, Any]:
+    z = zone_lookup.get(int(run.get("zone_id") or 0)) or {}
+    return {
+        "id": int(run.get("id")) if run.get("id") is not None else None,
+        "zone_id": int(run.get("zone_id") or 0),
+        "zone_name": z.get("name"),
+        "group_id": int(run.get("group_id") or 0),
+        "start_utc": run.get("start_utc"),
+        "end_utc": run.get("end_utc"),
+        "duration_min": _duration_min(_parse_utc(run.get("start_utc")), _parse_utc(run.get("end_utc"))),
+        "liters": run.get("total_liters"),
+        "status": run.get("status"),
+        "source": run.get("source"),
+    }
+
+
+def _aggregate_liters(runs: list[dict[str, Any]], rolled: list[dict[str, Any]] = ()) -> tuple[float | None, bool, bool]:
+    """Return (total_liters_or_none, partial_flag, any_data_flag).
+
+    - any_data_flag = at least one run has a non-NULL total_liters
+    - partial_flag = some rows have liters, some don't
+    - total = sum of available liters or None when no data
+
+    ``rolled`` are zone_runs_daily rows (see ``_fetch_rolled_up_days``).
+    """
+    has_any = False
+    has_missing = False
+    total = 0.0
+    for r in runs:
+        v = r.get("total_liters")
+        if v is None:
+            has_missing = True
+        else:
+            has_any = True
+            with contextlib.suppress(TypeError, ValueError):
+                total += float(v)
+    for r in rolled:
+        if r.get("liters_missing"):
+            has_missing = True
+        if r.get("liters") is not None:
+            has_any = True
+            with contextlib.suppress(TypeError, ValueError):
+                total += float(r["liters"])
+    if not has_any:
+        return None, False, False
+    return total, has_missing, True
+
+
+def _actual_and_summary(db, zone_ids, dates, plan_by_date, has_plan):
+    from_d, to_d = dates[0], dates[-1]
+    raw_runs = fetch_runs_for_zones(db.db_path, zone_ids, from_d, to_d)
+    actual_min, runs_count = calculate_actual_for_zone(raw_runs, dates)
+    rolled = _fetch_rolled_up_days(db, zone_ids, from_d, to_d)
+    _add_rolled_up_days(rolled, actual_min, runs_count)
+
+    daily = _build_daily(dates, actual_min, runs_count, plan_by_date, has_plan)
+    total_actual = sum(actual_min.values())
+    total_plan = sum(plan_by_date.values()) if has_plan else 0
+    summary = calculate_summary(total_actual, total_plan, has_plan)
+    total_liters, liters_partial, has_liters = _aggregate_liters(raw_runs, rolled)
+    summary.update(
+        {
+            "total_minutes": int(total_actual),
+            "total_runs": int(sum(runs_count.values())),
+            "total_liters": total_liters,
+            "liters_partial": bool(liters_partial),
+            "has_liters": bool(has_liters),
+        }
+    )
+    return raw_runs, daily, summary
+
+
+# ---- public queries ----
+
+
+def zone_history(db, zone_id: int, days: int, today: date) -> dict[str, Any] | None:
+    """Per-zone payload (None when the zone does not exist)."""
+
+    def compute():
+        zone = db.get_zone(zone_id)
+        if not zone:
+            return None
+        dates = date_range(today, days)
+        programs = db.get_programs() or []
+        plan_by_date = calculate_plan_for_zone(zone_id, int(zone.get("duration") or 0), dates, programs)
+        has_plan = zone_has_active_program(zone_id, programs)
+        raw_runs, daily, summary = _actual_and_summary(db, [zone_id], dates, plan_by_date, has_plan)
+        zone_lookup = {int(zone["id"]): zone}
+        return {
+            "success": True,
+            "zone": {
+                "id": int(zone["id"]),
+                "name": zone.get("name"),
+                "duration": int(zone.get("duration") or 0),
+                "group_id": int(zone.get("group_id") or 0),
+            },
+            "period": {"from": dates[0].isoformat(), "to": dates[-1].isoformat(), "days": days},
+            "summary": summary,
+            "daily": daily,
+            "runs": [_serialize_run(r, zone_lookup) for r in raw_runs],
+        }
+
+    return _cached(db.db_path, ("zone", int(zone_id), days, today), compute)
+
+
+def global_history(
+    db, days: int, today: date, group_id: int | None = None, zone_id: int | None = None
+) -> dict[str, Any]:
+    """Global payload, optionally narrowed to one zone or one group."""
+
+    def compute():
+        all_zones = db.get_zones() or []
+        # Drop the special "no irrigation" group from defaults.
+        zones = [z for z in all_zones if int(z.get("group_id") or 0) != NO_IRRIGATION_GROUP_ID]
+        if zone_id is not None:
+            zones = [z for z in zones if int(z["id"]) == zone_id]
+        elif group_id is not None:
+            zones = [z for z in zones if int(z.get("group_id") or 0) == group_id]
+
+        dates = date_range(today, days)
+        programs = db.get_programs() or []
+        # Per-zone plan, summed across the selection.
+        plan_agg: dict[date, int] = {d: 0 for d in dates}
+        has_plan_any = False
+        for z in zones:
+            zid = int(z["id"])
+            if zone_has_active_program(zid, programs):
+                has_plan_any = True
+            # Decision Q2: zones without programs contribute 0 (not NULL).
+            zplan = calculate_plan_for_zone(zid, int(z.get("duration") or 0), dates, programs)
+            for d in dates:
+                plan_agg[d] += int(zplan.get(d, 0))
+
+        zone_ids = [int(z["id"]) for z in zones]
+        raw_runs, daily, summary = _actual_and_summary(db, zone_ids, dates, plan_agg, has_plan_any)
+        zone_lookup = {int(z["id"]): z for z in all_zones}
+        return {
+            "success": True,
+            "period": {"from": dates[0].isoformat(), "to": dates[-1].isoformat(), "days": days},
+            "filters": {"group_id": group_id, "zone_id": zone_id},
+            "zone_count": len(zones),
+            "summary": summary,
+            "daily": daily,
+            "runs": [_serialize_run(r, zone_lookup) for r in raw_runs],
+        }
+
+    return _cached(db.db_path, ("global", group_id, zone_id, days, today), compute)
+
+
+def iter_zone_csv(db_path: str, zone: dict[str, Any], from_local: date, to_local: date) -> Iterator[str]:
+    """CSV export of one zone, one line per yielded chunk (UTF-8 BOM first)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def line(row) -> str:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(row)
+        return buf.getvalue()
+
+    # BOM so Excel opens UTF-8 cleanly.
+    yield "\ufeff" + line(CSV_HEADER)
+    zone_name = zone.get("name") or ""
+    for r in iter_runs_for_zone(db_path, int(zone["id"]), from_local, to_local):
+        sdt = _parse_utc(r["start_utc"])
+        edt = _parse_utc(r["end_utc"])
+        yield line(
+            [
+                sdt.astimezone().date().isoformat() if sdt else "",
+                sdt.astimezone().strftime("%H:%M:%S") if sdt else "",
+                edt.astimezone().strftime("%H:%M:%S") if edt else "",
+                r["zone_id"],
+                zone_name,
+                _duration_min(sdt, edt),
+                "" if r["total_liters"] is None else r["total_liters"],
+                r["source"] or "",
+                r["status"] or "",
+            ]
+        )
@@ -19,8 +19,11 @@ from __future__ import annotations
 
 import io
 import logging
+from typing import TYPE_CHECKING
 
-from PIL import Image, ImageOps
+# Pillow is imported on first upload, not at app start-up.
+if TYPE_CHECKING:
+    from PIL import Image
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,8 @@ def load_safe_image(file_data: bytes) -> Image.Image:
     the input would exceed MAX_INPUT_PIXELS pixels. Other Pillow/IO
     errors propagate to the caller.
     """
+    from PIL import Image, ImageOps
+
     img = Image.open(io.BytesIO(file_data))
     img.load()  # force decode so PIL raises here, not later
     w0, h0 = img.size
@@ -85,6 +90,8 @@ def optimize_uploaded_image(
     the canonical extension. Raises ImageTooLargeError on >50 MP input;
     other Pillow/IO errors propagate.
     """
+    from PIL import Image
+
     img = load_safe_image(file_data)
     w, h = img.size
     if max(w, h) > max_dim:
@@ -0,0 +1,414 @@
+"""Irrigation Planner — decisions, runtimes and cycle-soak for all zones at once.
+
+``irrigation_decision.evaluate_decision`` and the ``et_calculator`` helpers
+work on one zone at a time, so a caller planning N zones re-evaluated the same
+site-level rules (season, frost, wind, rain) and the same irrigation need N
+times. :func:`build_plan` takes one weather snapshot and plans every zone and
+program in a single pass:
+
+  * site-level rules (1-5) and the irrigation need are evaluated once;
+  * per-zone rules (6-7, soil moisture) once per distinct sensor value;
+  * runtime / cycle-soak once per distinct (Pr, infiltration, depth).
+
+Zone results are memoised by (snapshot id, zone parameters), so re-planning
+with the same snapshot (another program, the UI refreshing) only does dict
+lookups. The result is a column-oriented :class:`IrrigationPlan` table.
+
+:func:`current_plan` is the glue for the app: it turns the current
+``WeatherData`` into a snapshot and plans the zones/programs of a Database
+facade. It backs ``GET /api/weather/plan`` and the per-program
+recommendation the scheduler records at dispatch. Everything else is pure
+logic, no DB/MQTT dependencies. Python 3.9 compatible.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+from services import clock
+from services.et_calculator import (
+    ALTITUDE_CORRECTION,
+    DEFAULT_MAX_INFILTRATION_MM_H,
+    MIN_IRRIGATION_MM,
+    NOZZLE_PR,
+    calc_cycle_soak,
+    calc_irrigation_need,
+    calc_zone_runtime,
+)
+from services.irrigation_decision import (
+    DECISION_EMERGENCY,
+    DECISION_IRRIGATE,
+    evaluate_decision,
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+
+# Fields of a weather snapshot, in evaluate_decision() argument order
+SNAPSHOT_FIELDS = (
+    "site_id",
+    "month",
+    "day",
+    "t_avg",
+    "t_current",
+    "precip_24h",
+    "precip_48h",
+    "precip_forecast_12h",
+    "wind_speed_kmh",
+)
+
+# Nozzle assumed for zones without nozzle / Pr configuration
+DEFAULT_NOZZLE = "mp_rotator"
+
+# Site (et_calculator corrections) used when the setting is unset or unknown
+SITE_SETTING_KEY = "irrigation.site_id"
+DEFAULT_SITE_ID = "orsk"
+
+# Decisions that produce a runtime
+WATERING_DECISIONS = (DECISION_IRRIGATE, DECISION_EMERGENCY)
+
+PLAN_COLUMNS = (
+    "zone_id",
+    "decision",
+    "reason",
+    "rule_id",
+    "coefficient",
+    "syringe",
+    "syringe_time",
+    "need_mm",
+    "pr_mm_h",
+    "runtime_min",
+    "cycles",
+    "total_min",
+    "program_ids",
+)
+
+# Memo: (snapshot_id, zone_params) -> zone result tuple
+MEMO_MAX_ENTRIES = 4096
+
+_memo = OrderedDict()  # type: OrderedDict
+_memo_lock = threading.Lock()
+_memo_stats = {"hits": 0, "misses": 0}
+
+
+# ---------------------------------------------------------------------------
+# Snapshot / zone parameters
+# ---------------------------------------------------------------------------
+
+
+def snapshot_id(snapshot):
+    # type: (Dict[str, Any]) -> Any
+    """Identity of a weather snapshot: its ``id`` or, without one, its values."""
+    sid = snapshot.get("id")
+    if sid is not None:
+        return sid
+    return tuple(snapshot.get(f) for f in SNAPSHOT_FIELDS)
+
+
+def zone_params(zone):
+    # type: (Dict[str, Any]) -> Tuple[float, float, Optional[float]]
+    """(Pr mm/h, max infiltration mm/h, soil moisture %) of a zone dict.
+
+    Pr is taken from ``pr_mm_h`` or looked up by ``nozzle`` in NOZZLE_PR;
+    unknown or missing values fall back to DEFAULT_NOZZLE.
+    """
+    pr = zone.get("pr_mm_h")
+    if pr is None:
+        pr = NOZZLE_PR.get(zone.get("nozzle") or DEFAULT_NOZZLE, NOZZLE_PR[DEFAULT_NOZZLE])
+    infiltration = zone.get("max_infiltration_mm_h")
+    if infiltration is None:
+        infiltration = DEFAULT_MAX_INFILTRATION_MM_H
+    soil = zone.get("soil_moisture_pct")
+    return float(pr), float(infiltration), None if soil is None else float(soil)
+
+
+# ---------------------------------------------------------------------------
+# Memo
+# ---------------------------------------------------------------------------
+
+
+def memo_stats():
+    # type: () -> Dict[str, int]
+    with _memo_lock:
+        out = dict(_memo_stats)
+        out["entries"] = len(_memo)
+    return out
+
+
+def reset_memo():
+    # type: () -> None
+    with _memo_lock:
+        _memo.clear()
+        _memo_stats["hits"] = 0
+        _memo_stats["misses"] = 0
+
+
+# ---------------------------------------------------------------------------
+# Plan table
+# ---------------------------------------------------------------------------
+
+
+class IrrigationPlan:
+    """Column-oriented plan: one row per zone, columns from PLAN_COLUMNS.
+
+    ``cycles`` holds the calc_cycle_soak() split, ``total_min`` the wall-clock
+    time of the zone including soak pauses, ``program_ids`` the programs the
+    zone belongs to. Rows are returned as fresh dicts; the table is read-only.
+    """
+
+    def __init__(self, snapshot_id, site_id, columns):
+        # type: (Any, str, Dict[str, List[Any]]) -> None
+        self.snapshot_id = snapshot_id
+        self.site_id = site_id
+        self.columns = columns
+        self._index = {zid: i for i, zid in enumerate(columns["zone_id"])}
+
+    def __len__(self):
+        return len(self.columns["zone_id"])
+
+    def _row(self, i):
+        # type: (int) -> Dict[str, Any]
+        row = {name: self.columns[name][i] for name in PLAN_COLUMNS}
+        row["cycles"] = [dict(c) for c in row["cycles"]]
+        row["program_ids"] = list(row["program_ids"])
+        return row
+
+    def rows(self):
+        # type: () -> List[Dict[str, Any]]
+        return [self._row(i) for i in range(len(self))]
+
+    def get(self, zone_id):
+        # type: (int) -> Optional[Dict[str, Any]]
+        i = self._index.get(zone_id)
+        return None if i is None else self._row(i)
+
+    def where(self, program_id=None, decision=None, watering=None):
+        # type: (Optional[int], Optional[str], Optional[bool]) -> List[Dict[str, Any]]
+        """Rows filtered by program membership, decision and/or "gets water"."""
+        cols = self.columns
+        out = []
+        for i in range(len(self)):
+            if program_id is not None and program_id not in cols["program_ids"][i]:
+                continue
+            if decision is not None and cols["decision"][i] != decision:
+                continue
+            if watering is not None and (cols["decision"][i] in WATERING_DECISIONS) != watering:
+                continue
+            out.append(self._row(i))
+        return out
+
+    def program_total_min(self, program_id):
+        # type: (int) -> float
+        """Wall-clock minutes of a program run: sum of its zones' total_min."""
+        cols = self.columns
+        return round(
+            sum(cols["total_min"][i] for i in range(len(self)) if program_id in cols["program_ids"][i]),
+            1,
+        )
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        program_ids = sorted({pid for pids in self.columns["program_ids"] for pid in pids})
+        return {
+            "snapshot_id": self.snapshot_id if isinstance(self.snapshot_id, (int, str)) else None,
+            "site_id": self.site_id,
+            "zones": self.rows(),
+            "programs": {str(pid): {"total_min": self.program_total_min(pid)} for pid in program_ids},
+        }
+
+
+# ---------------------------------------------------------------------------
+# Planner
+# ---------------------------------------------------------------------------
+
+
+def _decision_tuple(decision):
+    # type: (IrrigationDecision) -> Tuple[str, str, int, int, bool, Optional[str]]
+    return (
+        decision.decision,
+        decision.reason,
+        decision.rule_id,
+        decision.coefficient,
+        decision.syringe,
+        decision.syringe_time,
+    )
+
+
+def _zone_need_mm(decision_t, base_need_mm):
+    # type: (Tuple, float) -> float
+    """Irrigation depth for a zone: the site need scaled by the coefficient.
+
+    Emergency (rule 7) is decided before the below-minimum check, so its
+    depth is at least MIN_IRRIGATION_MM before the boost.
+    """
+    decision, coefficient = decision_t[0], decision_t[3]
+    if decision == DECISION_EMERGENCY:
+        return max(base_need_mm, MIN_IRRIGATION_MM) * coefficient / 100.0
+    if decision == DECISION_IRRIGATE:
+        return base_need_mm * coefficient / 100.0
+    return 0.0
+
+
+def build_plan(snapshot, zones, programs=None):
+    # type: (Dict[str, Any], List[Dict[str, Any]], Optional[List[Dict[str, Any]]]) -> IrrigationPlan
+    """Plan every zone for one weather snapshot.
+
+    Args:
+        snapshot: dict with SNAPSHOT_FIELDS (and optionally ``id``)
+        zones: zone dicts with ``id`` and optional ``nozzle`` / ``pr_mm_h``,
+            ``max_infiltration_mm_h``, ``soil_moisture_pct``
+        programs: program dicts with ``id`` and ``zones`` (list of zone ids)
+
+    Returns:
+        IrrigationPlan with one row per zone, in input order.
+    """
+    sid = snapshot_id(snapshot)
+    site_id = snapshot["site_id"]
+    args = [snapshot[f] for f in SNAPSHOT_FIELDS]
+
+    membership = {}  # type: Dict[int, List[int]]
+    for prog in programs or ():
+        for zid in prog.get("zones") or ():
+            membership.setdefault(zid, []).append(prog["id"])
+
+    params = [zone_params(z) for z in zones]
+    keys = [(sid, p) for p in params]
+
+    results = [None] * len(zones)  # type: List[Optional[Tuple]]
+    missing = []  # type: List[int]
+    with _memo_lock:
+        for i, key in enumerate(keys):
+            res = _memo.get(key)
+            if res is None:
+                missing.append(i)
+            else:
+                _memo.move_to_end(key)
+                results[i] = res
+        _memo_stats["hits"] += len(zones) - len(missing)
+        _memo_stats["misses"] += len(missing)
+
+    if missing:
+        # Site-level rules once; soil rules once per distinct sensor value
+        site = _decision_tuple(evaluate_decision(*args))
+        site_wide = site[2] <= 5
+        base_need = calc_irrigation_need(snapshot["t_avg"], snapshot["precip_48h"], site_id)
+        by_soil = {None: site}  # type: Dict[Optional[float], Tuple]
+        by_runtime = {}  # type: Dict[Tuple[float, float, float], Tuple[float, Tuple, float]]
+        computed = {}  # type: Dict[Tuple, Tuple]
+        for i in missing:
+            key = keys[i]
+            res = computed.get(key)
+            if res is None:
+                pr, infiltration, soil = key[1]
+                dec = site if site_wide else by_soil.get(soil)
+                if dec is None:
+                    dec = by_soil[soil] = _decision_tuple(evaluate_decision(*args, soil_moisture_pct=soil))
+                need = round(_zone_need_mm(dec, base_need), 2)
+                rkey = (pr, infiltration, need)
+                runtime = by_runtime.get(rkey)
+                if runtime is None:
+                    minutes = calc_zone_runtime(need, pr)
+                    cycles = tuple(calc_cycle_soak(minutes, pr, infiltration)) if minutes > 0 else ()
+                    total = round(sum(c["run_min"] + c["soak_min"] for c in cycles), 1)
+                    runtime = by_runtime[rkey] = (minutes, cycles, total)
+                res = computed[key] = (*dec, need, pr, *runtime)
+            results[i] = res
+        with _memo_lock:
+            for key, res in computed.items():
+                _memo[key] = res
+            while len(_memo) > MEMO_MAX_ENTRIES:
+                _memo.popitem(last=False)
+
+    columns = {name: [] for name in PLAN_COLUMNS}  # type: Dict[str, List[Any]]
+    (
+        c_zone,
+        c_decision,
+        c_reason,
+        c_rule,
+        c_coef,
+        c_syringe,
+        c_syringe_time,
+        c_need,
+        c_pr,
+        c_runtime,
+        c_cycles,
+        c_total,
+        c_programs,
+    ) = (columns[name] for name in PLAN_COLUMNS)
+    for zone, res in zip(zones, results):
+        zid = zone["id"]
+        c_zone.append(zid)
+        c_decision.append(res[0])
+        c_reason.append(res[1])
+        c_rule.append(res[2])
+        c_coef.append(res[3])
+        c_syringe.append(res[4])
+        c_syringe_time.append(res[5])
+        c_need.append(res[6])
+        c_pr.append(res[7])
+        c_runtime.append(res[8])
+        c_cycles.append(res[9])
+        c_total.append(res[10])
+        c_programs.append(tuple(membership.get(zid, ())))
+    return IrrigationPlan(sid, site_id, columns)
+
+
+# ---------------------------------------------------------------------------
+# App glue
+# ---------------------------------------------------------------------------
+
+
+def snapshot_from_weather(weather, site_id, now=None):
+    # type: (Any, str, Optional[datetime]) -> Dict[str, Any]
+    """Planner snapshot from a ``WeatherData``.
+
+    The forecast payload has no hourly history before today, so
+    ``precip_48h`` is the 24h sum; t_avg is the mean of today's min/max.
+    Wind comes in m/s (``wind_speed_unit=ms``) and is converted to km/h.
+    No ``id``: sensor data may replace API values under the same fetch
+    timestamp, so the memo keys on the values themselves.
+    """
+    now = now or clock.now()
+    t_current = weather.temperature
+    t_min, t_max = weather.temperature_min, weather.temperature_max
+    t_avg = (t_min + t_max) / 2.0 if t_min is not None and t_max is not None else t_current
+    precip_24h = weather.precipitation_24h or 0.0
+    wind = weather.wind_speed
+    return {
+        "site_id": site_id,
+        "month": now.month,
+        "day": now.day,
+        "t_avg": t_avg if t_avg is not None else 0.0,
+        "t_current": t_current if t_current is not None else t_avg or 0.0,
+        "precip_24h": precip_24h,
+        "precip_48h": precip_24h,
+        "precip_forecast_12h": getattr(weather, "precipitation_forecast_12h", 0.0) or 0.0,
+        "wind_speed_kmh": round(wind * 3.6, 1) if wind is not None else 0.0,
+    }
+
+
+def site_id_for(db):
+    # type: (Any) -> str
+    """Configured site (``irrigation.site_id`` setting), DEFAULT_SITE_ID otherwise."""
+    site = db.get_setting_value(SITE_SETTING_KEY)
+    return site if site in ALTITUDE_CORRECTION else DEFAULT_SITE_ID
+
+
+def current_plan(db, weather=None):
+    # type: (Any, Any) -> Optional[IrrigationPlan]
+    """Plan of all zones/programs of ``db`` for the current weather.
+
+    ``weather`` defaults to what WeatherAdjustment uses (API data with
+    sensor overrides). Returns None when no weather data is available.
+    """
+    if weather is None:
+        from services.weather import get_weather_adjustment
+
+        weather = get_weather_adjustment(db.db_path)._get_weather()
+        if weather is None:
+            return None
+    snapshot = snapshot_from_weather(weather, site_id_for(db))
+    return build_plan(snapshot, db.get_zones(), db.get_programs())
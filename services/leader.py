@@ -0,0 +1,325 @@
+"""Multi-worker mode: leader lease, leader endpoint and request forwarding.
+
+With ``WB_WORKERS`` > 1 ``run.py`` starts several Hypercorn worker processes.
+Everything that must exist exactly once — IrrigationScheduler, boot sync, the
+watchdogs, the acting rain monitor, Telegram polling — runs only in the
+*leader*, elected through a lease row in ``leader.db`` (sibling of the main
+database):
+
+- the holder renews the lease every ``ttl / 3`` seconds (heartbeat);
+- other workers poll at the same rate and take the lease once it has expired,
+  so a crashed leader is replaced within ``ttl`` seconds;
+- a leader that fails to renew (it stalled past ``ttl`` and someone else took
+  over) demotes itself in-process: ``on_lost`` stops the leader-only services
+  so it can never double-fire programs, and the worker keeps serving as a
+  follower. Exiting instead is not an option — Hypercorn's ``run()`` shuts
+  the master and every worker down on any non-zero worker exit.
+
+Followers serve reads themselves. Requests that touch scheduler state
+(mutations and a few scheduler/health GETs) are forwarded over loopback to
+the leader's internal HTTP listener, whose address is published in the lease
+row. Zone-state broadcasts reach every worker's SSE clients through the relay
+in :mod:`services.sse_hub`.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+LEADER_DB_NAME = "leader.db"
+LEASE_NAME = "scheduler"
+LEASE_TTL_SEC = 15.0
+FORWARD_TIMEOUT_SEC = 30.0
+FORWARDED_HEADER = "X-WB-Forwarded"
+# GET-запросы, которым нужно состояние планировщика лидера
+LEADER_GET_PREFIXES = ("/api/scheduler/", "/api/health-details", "/health", "/readyz", "/metrics")
+_HOP_BY_HOP = frozenset(
+    ("connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "content-length", "content-encoding")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leader_lease (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    endpoint TEXT,
+    expires_at REAL NOT NULL,
+    renewed_at REAL NOT NULL
+)
+"""
+
+
+def configured_workers() -> int:
+    try:
+        return max(1, int(os.environ.get("WB_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+
+def is_multi_worker() -> bool:
+    return configured_workers() > 1
+
+
+class LeaderLease:
+    """Lease row in SQLite; ``BEGIN IMMEDIATE`` serialises competing workers."""
+
+    def __init__(self, db_path: str, name: str = LEASE_NAME, ttl: float = LEASE_TTL_SEC, holder: str | None = None):
+        self.db_path = db_path
+        self.name = name
+        self.ttl = float(ttl)
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def try_acquire(self, endpoint: str | None = None) -> bool:
+        """Take the lease if it is free, expired or already ours; renews it in the last case."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, expires_at FROM leader_lease WHERE name=?", (self.name,)).fetchone()
+            if row is not None and row[0] != self.holder and float(row[1]) > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO leader_lease(name, holder, endpoint, expires_at, renewed_at) VALUES (?,?,?,?,?) "
+                "ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, "
+                "endpoint=COALESCE(excluded.endpoint, leader_lease.endpoint), "
+                "expires_at=excluded.expires_at, renewed_at=excluded.renewed_at",
+                (self.name, self.holder, endpoint, now + self.ttl, now),
+            )
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            logger.warning("leader lease acquire failed: %s", e)
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error as re:
+                logger.debug("leader lease rollback: %s", re)
+            return False
+        finally:
+            conn.close()
+
+    def renew(self) -> bool:
+        """Extend our lease. False when it is no longer ours."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cur = conn.execute(
+                    "UPDATE leader_lease SET expires_at=?, renewed_at=? WHERE name=? AND holder=?",
+                    (now + self.ttl, now, self.name, self.holder),
+                )
+                return cur.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning("leader lease renew failed: %s", e)
+            # Временная ошибка БД: лидерство сохраняем, пока срок аренды не истёк
+            return self._still_ours(now)
+
+    def _still_ours(self, now: float) -> bool:
+        try:
+            current = self.current()
+        except sqlite3.Error:
+            return False
+        return bool(current and current["holder"] == self.holder and current["expires_at"] > now)
+
+    def set_endpoint(self, endpoint: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE leader_lease SET endpoint=? WHERE name=? AND holder=?", (endpoint, self.name, self.holder)
+            )
+
+    def release(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM leader_lease WHERE name=? AND holder=?", (self.name, self.holder))
+        except sqlite3.Error as e:
+            logger.debug("leader lease release: %s", e)
+
+    def current(self) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT holder, endpoint, expires_at, renewed_at FROM leader_lease WHERE name=?", (self.name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"holder": row[0], "endpoint": row[1], "expires_at": float(row[2]), "renewed_at": float(row[3])}
+
+
+class LeaderElector(threading.Thread):
+    """Heartbeat / failover loop around a :class:`LeaderLease`."""
+
+    daemon = True
+
+    def __init__(
+        self,
+        lease: LeaderLease,
+        on_elected: Callable[[], None],
+        on_lost: Callable[[], None] | None = None,
+        interval: float | None = None,
+    ):
+        super().__init__(name="leader-elector")
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_lost = on_lost
+        self.interval = float(interval if interval is not None else lease.ttl / 3.0)
+        self.is_leader = threading.Event()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            if self.is_leader.is_set():
+                if not self.lease.renew():
+                    # сначала снимаем флаг: запросы этого воркера сразу уходят новому лидеру
+                    logger.critical("Leader lease lost (holder=%s), demoting to follower", self.lease.holder)
+                    self.is_leader.clear()
+                    if self.on_lost is not None:
+                        try:
+                            self.on_lost()
+                        except Exception:
+                            logger.exception("leader demotion failed")
+            elif self.lease.try_acquire():
+                logger.info("Elected leader (holder=%s)", self.lease.holder)
+                self.is_leader.set()
+                try:
+                    self.on_elected()
+                except Exception:
+                    logger.exception("leader start failed")
+            self._stop_event.wait(self.interval)
+
+    def stop(self, release: bool = True) -> None:
+        self._stop_event.set()
+        if release and self.is_leader.is_set():
+            self.lease.release()
+            self.is_leader.clear()
+
+
+# --- process-wide state ---------------------------------------------------
+_elector: LeaderElector | None = None
+_endpoint_server = None
+_forward_session = None
+_forward_lock = threading.Lock()
+
+
+def leader_db_path(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)) or ".", LEADER_DB_NAME)
+
+
+def start_election(
+    db_path: str,
+    on_elected: Callable[[], None],
+    on_lost: Callable[[], None] | None = None,
+    ttl: float = LEASE_TTL_SEC,
+) -> LeaderElector:
+    """Start the elector thread of this worker (idempotent)."""
+    global _elector
+    if _elector is None:
+        _elector = LeaderElector(LeaderLease(leader_db_path(db_path), ttl=ttl), on_elected, on_lost)
+        _elector.start()
+    return _elector
+
+
+def is_leader() -> bool:
+    """True in single-process mode and in the elected worker."""
+    if _elector is None:
+        return not is_multi_worker()
+    return _elector.is_leader.is_set()
+
+
+def serve_leader_endpoint(app) -> str:
+    """Start the leader's loopback HTTP listener and publish its address in the lease."""
+    global _endpoint_server
+    from werkzeug.serving import make_server
+
+    if _endpoint_server is None:
+        _endpoint_server = make_server("127.0.0.1", 0, _loopback_app(app), threaded=True)
+        threading.Thread(target=_endpoint_server.serve_forever, name="leader-endpoint", daemon=True).start()
+    endpoint = f"http://127.0.0.1:{_endpoint_server.server_port}"
+    if _elector is not None:
+        _elector.lease.set_endpoint(endpoint)
+    logger.info("Leader endpoint listening on %s", endpoint)
+    return endpoint
+
+
+def stop_leader_endpoint() -> None:
+    """Shut the loopback listener down (demotion); followers forward to the new leader's."""
+    global _endpoint_server
+    server, _endpoint_server = _endpoint_server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        logger.info("Leader endpoint stopped")
+
+
+def _loopback_app(wsgi_app):
+    """Restore the client address of forwarded requests (the listener is loopback-only)."""
+
+    def app(environ, start_response):
+        client = environ.get("HTTP_X_FORWARDED_FOR")
+        if environ.get("HTTP_X_WB_FORWARDED") and client:
+            environ["REMOTE_ADDR"] = client.split(",")[0].strip()
+        return wsgi_app(environ, start_response)
+
+    return app
+
+
+def needs_leader(method: str, path: str) -> bool:
+    if not path.startswith("/api/") and not path.startswith(LEADER_GET_PREFIXES):
+        return False
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return path.startswith(LEADER_GET_PREFIXES)
+    return True
+
+
+def forward_to_leader(request):
+    """Flask ``before_request`` hook for followers: proxy scheduler-bound requests to the leader.
+
+    Returns a Flask response, or None to handle the request locally.
+    """
+    if _elector is None or is_leader() or request.headers.get(FORWARDED_HEADER):
+        return None
+    if not needs_leader(request.method, request.path):
+        return None
+    import requests
+    from flask import Response, jsonify
+
+    try:
+        current = _elector.lease.current()
+    except sqlite3.Error as e:
+        logger.warning("leader lookup failed: %s", e)
+        current = None
+    endpoint = (current or {}).get("endpoint")
+    if not endpoint or (current or {}).get("expires_at", 0) < time.time():
+        return jsonify({"success": False, "message": "leader unavailable", "error_code": "LEADER_UNAVAILABLE"}), 503
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP and k.lower() != "host"}
+    headers[FORWARDED_HEADER] = "1"
+    headers["X-Forwarded-For"] = request.remote_addr or ""
+    global _forward_session
+    with _forward_lock:
+        if _forward_session is None:
+            _forward_session = requests.Session()
+        session = _forward_session
+    try:
+        resp = session.request(
+            request.method,
+            endpoint + request.full_path.rstrip("?"),
+            headers=headers,
+            data=request.get_data(),
+            allow_redirects=False,
+            timeout=FORWARD_TIMEOUT_SEC,
+        )
+    except requests.RequestException as e:
+        logger.warning("forward to leader failed: %s", e)
+        return jsonify({"success": False, "message": "leader unavailable", "error_code": "LEADER_UNAVAILABLE"}), 503
+    out_headers = [(k, v) for k, v in resp.raw.headers.items() if k.lower() not in _HOP_BY_HOP]
+    return Response(resp.content, status=resp.status_code, headers=out_headers)
@@ -1,35 +1,318 @@
+"""Per-group / per-zone locks with contention instrumentation.
+
+``group_lock`` / ``zone_lock`` hand out one reentrant lock per id. Each lock
+is an :class:`InstrumentedLock`: a thin wrapper over ``threading.RLock`` that
+records
+
+  * wait and hold time histograms (aggregated per lock kind for /metrics),
+  * the current owner — thread, call site, correlation id,
+  * the threads currently blocked on it,
+  * the order in which locks are nested (``group:1 -> zone:3``), so that
+    lock-order inversions show up before they turn into a deadlock.
+
+The uncontended path is a non-blocking ``acquire`` plus a handful of
+attribute writes; only callers that actually have to wait pay for timing,
+waiter bookkeeping and call-site capture (everyone does while
+:func:`set_diagnostics` is on). Holds longer than ``SLOW_HOLD_SECONDS`` are
+logged.
+"""
+
+import bisect
+import contextlib
 import logging
+import os
+import sys
 import threading
+import time
+
+from services.correlation import correlation_id_var
 
 # CQ-001..004 (MASTER-C2 extension): logger.debug(...) was used below without
 # `import logging`. Those branches (RuntimeError from lock acquire/release) are
 # rare in practice but if hit would raise NameError and crash the caller.
 logger = logging.getLogger(__name__)
 
-_group_locks: dict[int, threading.RLock] = {}
-_zone_locks: dict[int, threading.RLock] = {}
+# Границы корзин гистограмм (секунды); последняя корзина — +Inf
+WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+HOLD_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 30.0)
+SLOW_HOLD_SECONDS = float(os.environ.get("WB_LOCK_SLOW_HOLD_SECONDS", "2.0"))
+
+_perf = time.perf_counter
+_get_ident = threading.get_ident
+_getframe = sys._getframe
+_bisect = bisect.bisect_left
+_tls = threading.local()
+_diagnostics = os.environ.get("WB_LOCK_DIAGNOSTICS", "") == "1"
+# Наблюдавшиеся вложения «держу A — беру B», по именам блокировок
+_order_edges: set[tuple[str, str]] = set()
+
+
+class _Histogram:
+    """Bucket counts + sum; mutated only by the thread holding the lock."""
+
+    __slots__ = ("bounds", "counts", "total")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[_bisect(self.bounds, value)] += 1
+        self.total += value
+
+
+def _site(code, lineno: int) -> str:
+    return f"{os.path.basename(code.co_filename)}:{lineno} {code.co_name}"
+
+
+class InstrumentedLock:
+    """``threading.RLock`` drop-in that keeps contention statistics.
+
+    Bookkeeping fields are written only by the thread that holds the inner
+    lock, so they need no extra synchronisation; readers (diagnostics) take
+    a racy but harmless snapshot.
+
+    The uncontended acquire/release records only owner, depth and hold
+    time. Call site, correlation id and nesting order are captured on
+    contention, or on every acquire while :func:`set_diagnostics` is on.
+    """
+
+    __slots__ = (
+        "_depth",
+        "_lock",
+        "_owner",
+        "_release",
+        "_since",
+        "_try_acquire",
+        "_waiters",
+        "_where",
+        "contended",
+        "hold_hist",
+        "kind",
+        "name",
+        "slow_holds",
+        "waited_hist",
+    )
+
+    def __init__(self, kind: str, key):
+        self.kind = kind
+        self.name = f"{kind}:{key}"
+        self._lock = threading.RLock()
+        # связанные методы — на быстром пути без лишнего поиска атрибутов
+        self._try_acquire = self._lock.acquire
+        self._release = self._lock.release
+        self._depth = 0
+        self._owner = None
+        self._where = None  # (code, lineno, correlation_id) внешнего захвата, если известен
+        self._since = 0.0
+        self._waiters: dict[int, tuple[str, float, str | None]] = {}
+        self.waited_hist = _Histogram(WAIT_BUCKETS)  # только захваты с ожиданием
+        self.hold_hist = _Histogram(HOLD_BUCKETS)
+        self.contended = 0
+        self.slow_holds = 0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._try_acquire(False):
+            if self._depth:
+                self._depth += 1
+                return True
+            self._depth = 1
+            self._owner = _get_ident()
+            if _diagnostics:
+                self._track(_getframe(1))
+            self._since = _perf()
+            return True
+        if not blocking:
+            return False
+        frame = _getframe(1)
+        waited = self._wait(frame, timeout)
+        if waited is None:
+            return False
+        # чужой поток держал блокировку — значит, это внешний захват
+        self.waited_hist.observe(waited)
+        self._depth = 1
+        self._owner = _get_ident()
+        self._track(frame)
+        self._since = _perf()
+        return True
+
+    # как у RLock: __enter__ — это acquire() (и возвращает True)
+    __enter__ = acquire
+
+    def _track(self, frame) -> None:
+        """Remember the call site and nesting of an outer acquire (slow path only)."""
+        self._where = (frame.f_code, frame.f_lineno, correlation_id_var.get())
+        try:
+            held = _tls.held
+        except AttributeError:
+            held = _tls.held = []
+        if held:
+            _order_edges.add((held[-1].name, self.name))
+        held.append(self)
+
+    def _wait(self, frame, timeout) -> float | None:
+        """Contended path: register as a waiter, block, return seconds waited."""
+        ident = _get_ident()
+        # порядок фиксируем уже при ожидании: при взаимной блокировке захвата не будет
+        for other in _all_locks():
+            if other._owner == ident and other is not self:
+                _order_edges.add((other.name, self.name))
+        self._waiters[ident] = (_site(frame.f_code, frame.f_lineno), time.time(), correlation_id_var.get())
+        t0 = _perf()
+        try:
+            if not self._lock.acquire(True, timeout):
+                return None
+        finally:
+            self._waiters.pop(ident, None)
+        self.contended += 1
+        return _perf() - t0
+
+    def release(self, *_exc) -> None:
+        if self._owner != _get_ident():
+            self._lock.release()  # RuntimeError, как у обычного RLock
+            return
+        if self._depth > 1:
+            self._depth -= 1
+            self._lock.release()
+            return
+        hold = _perf() - self._since
+        hist = self.hold_hist
+        hist.counts[_bisect(HOLD_BUCKETS, hold)] += 1
+        hist.total += hold
+        if self._where is not None or hold >= SLOW_HOLD_SECONDS:
+            if hold >= SLOW_HOLD_SECONDS:
+                self._log_slow_hold(hold, _getframe(1))
+            self._untrack()
+        self._owner = None
+        self._depth = 0
+        self._release()
+
+    __exit__ = release
+
+    def _untrack(self) -> None:
+        self._where = None
+        held = getattr(_tls, "held", None)
+        if not held:
+            return
+        if held[-1] is self:
+            held.pop()
+        else:
+            with contextlib.suppress(ValueError):
+                held.remove(self)
+
+    def _log_slow_hold(self, hold: float, release_frame) -> None:
+        self.slow_holds += 1
+        if self._where is not None:
+            code, lineno, cid = self._where
+            logger.warning(
+                "lock %s held for %.2fs at %s (correlation_id=%s)", self.name, hold, _site(code, lineno), cid
+            )
+        else:
+            logger.warning(
+                "lock %s held for %.2fs, released at %s (correlation_id=%s)",
+                self.name,
+                hold,
+                _site(release_frame.f_code, release_frame.f_lineno),
+                correlation_id_var.get(),
+            )
+
+    # ---- diagnostics ----
+
+    @property
+    def wait_hist(self) -> _Histogram:
+        """Wait-time histogram; uncontended outer acquires land in the first bucket."""
+        waited = self.waited_hist
+        hist = _Histogram(WAIT_BUCKETS)
+        hist.counts = list(waited.counts)
+        hist.total = waited.total
+        acquires = self.hold_hist.count + (1 if self._owner is not None else 0)
+        hist.counts[0] += max(0, acquires - waited.count)
+        return hist
+
+    def owner(self) -> dict | None:
+        ident, where = self._owner, self._where
+        if ident is None:
+            return None
+        if where is not None:
+            code, lineno, cid = where
+            site = _site(code, lineno)
+        else:
+            # место захвата не запоминали (быстрый путь) — показываем, где владелец сейчас
+            frame = sys._current_frames().get(ident)
+            site = _site(frame.f_code, frame.f_lineno) if frame is not None else None
+            cid = None
+        return {
+            "thread": _thread_name(ident),
+            "thread_id": ident,
+            "site": site,
+            "correlation_id": cid,
+            "held_s": round(_perf() - self._since, 4),
+            "depth": self._depth,
+        }
+
+    def waiters(self) -> list[dict]:
+        now = time.time()
+        return [
+            {
+                "thread": _thread_name(ident),
+                "thread_id": ident,
+                "site": site,
+                "correlation_id": cid,
+                "waiting_s": round(now - since, 4),
+            }
+            for ident, (site, since, cid) in dict(self._waiters).items()
+        ]
+
+
+def set_diagnostics(enabled: bool) -> None:
+    """Capture call site, correlation id and nesting order on every acquire.
+
+    Off by default (env ``WB_LOCK_DIAGNOSTICS=1`` turns it on at start):
+    the uncontended path then stays within its overhead budget and these
+    details are collected only for contended acquires.
+    """
+    global _diagnostics
+    _diagnostics = bool(enabled)
+
+
+def _thread_name(ident: int) -> str:
+    for t in threading.enumerate():
+        if t.ident == ident:
+            return t.name
+    return str(ident)
+
+
+_group_locks: dict[int, InstrumentedLock] = {}
+_zone_locks: dict[int, InstrumentedLock] = {}
 _gl_lock = threading.Lock()
 
 
-def group_lock(group_id: int) -> threading.RLock:
+def group_lock(group_id: int) -> InstrumentedLock:
     with _gl_lock:
         lk = _group_locks.get(int(group_id))
         if lk is None:
-            lk = threading.RLock()
+            lk = InstrumentedLock("group", int(group_id))
             _group_locks[int(group_id)] = lk
         return lk
 
 
-def zone_lock(zone_id: int) -> threading.RLock:
+def zone_lock(zone_id: int) -> InstrumentedLock:
     with _gl_lock:
         lk = _zone_locks.get(int(zone_id))
         if lk is None:
-            lk = threading.RLock()
+            lk = InstrumentedLock("zone", int(zone_id))
             _zone_locks[int(zone_id)] = lk
         return lk
 
 
-def _is_locked(lock: threading.RLock) -> bool:
+def _is_locked(lock) -> bool:
+    # Проверяем «сырой» RLock, чтобы опрос не попадал в статистику
+    lock = getattr(lock, "_lock", lock)
     try:
         # Если не удаётся захватить немедленно — значит, удерживается другим потоком
         acquired = lock.acquire(blocking=False)
@@ -63,3 +346,74 @@ def snapshot_all_locks() -> dict[str, dict[int, bool]]:
         "groups": snapshot_group_locks(),
         "zones": snapshot_zone_locks(),
     }
+
+
+def _all_locks() -> list[InstrumentedLock]:
+    with _gl_lock:
+        return [*_group_locks.values(), *_zone_locks.values()]
+
+
+def _find_cycles(edges) -> list[list]:
+    """Elementary cycles of a small directed graph, each reported once."""
+    graph: dict = {}
+    for a, b in edges:
+        graph.setdefault(a, set()).add(b)
+    cycles, seen = [], set()
+
+    def walk(start, node, path):
+        for nxt in sorted(graph.get(node, ()), key=str):
+            if nxt == start:
+                key = frozenset(path)
+                if key not in seen:
+                    seen.add(key)
+                    cycles.append([*path, start])
+            elif nxt not in path and str(nxt) > str(start):
+                walk(start, nxt, [*path, nxt])
+
+    for node in sorted(graph, key=str):
+        walk(node, node, [node])
+    return cycles
+
+
+def contention_stats() -> dict[str, dict]:
+    """Histograms aggregated per lock kind: {kind: {"wait": ..., "hold": ...}}."""
+    out: dict[str, dict] = {}
+    for lk in _all_locks():
+        agg = out.setdefault(
+            lk.kind,
+            {
+                "wait": {"buckets": WAIT_BUCKETS, "counts": [0] * (len(WAIT_BUCKETS) + 1), "sum": 0.0, "count": 0},
+                "hold": {"buckets": HOLD_BUCKETS, "counts": [0] * (len(HOLD_BUCKETS) + 1), "sum": 0.0, "count": 0},
+                "contended": 0,
+                "slow_holds": 0,
+            },
+        )
+        for key, hist in (("wait", lk.wait_hist), ("hold", lk.hold_hist)):
+            agg[key]["counts"] = [a + b for a, b in zip(agg[key]["counts"], hist.counts)]
+            agg[key]["sum"] += hist.total
+            agg[key]["count"] += hist.count
+        agg["contended"] += lk.contended
+        agg["slow_holds"] += lk.slow_holds
+    return out
+
+
+def lock_diagnostics() -> dict:
+    """Owners, waiters, live deadlocks and lock-order cycles for /api/health-details."""
+    held, waiting, waits_for = [], [], set()
+    for lk in _all_locks():
+        owner = lk.owner()
+        waiters = lk.waiters()
+        if owner:
+            held.append({"lock": lk.name, **owner})
+        for w in waiters:
+            waiting.append({"lock": lk.name, **w})
+            if owner:
+                waits_for.add((w["thread_id"], owner["thread_id"]))
+    return {
+        "held": held,
+        "waiters": waiting,
+        # поток ждёт поток, который (транзитивно) ждёт его самого
+        "deadlocks": [[_thread_name(t) for t in cycle] for cycle in _find_cycles(waits_for)],
+        "order_cycles": _find_cycles(set(_order_edges)),
+        "slow_hold_threshold_s": SLOW_HOLD_SECONDS,
+    }
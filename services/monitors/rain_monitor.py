@@ -20,6 +20,8 @@ class RainMonitor:
         self.server_id: int | None = None
         self.is_rain: bool | None = None
         self._cfg: dict | None = None
+        # passive: только отслеживать is_rain (ведомый воркер); действия выполняет лидер
+        self.passive = False
 
     def stop(self):
         try:
@@ -99,6 +101,8 @@ class RainMonitor:
         if sensor_type == "NC":
             logical_rain = not logical_rain
         self.is_rain = logical_rain
+        if self.passive:
+            return
         if self.is_rain:
             self._on_rain_start()
         else:
@@ -0,0 +1,487 @@
+"""Shared MQTT topic discovery for the admin scan / probe endpoints.
+
+Before: every ``/api/mqtt/<id>/scan-sse`` tab started its own paho client with
+a wildcard subscription and a 10 000-message queue forwarding every raw
+message, and every ``/probe`` call connected yet another client. On a busy
+Wirenboard bus that meant N full copies of the bus stream per server.
+
+Now there is one :class:`TopicDiscovery` per MQTT server:
+
+* a single ``#`` subscription, started on the first viewer/probe and
+  reference counted; ``IDLE_STOP_SEC`` after the last one leaves the client
+  disconnects and the state is dropped;
+* a :class:`TopicTrie` keyed by topic levels holding the last payload,
+  message count, first/last seen and a decaying message rate per topic;
+* viewers (:class:`Viewer`) register an MQTT topic filter and receive
+  coalesced deltas — each changed topic once, with its latest value — no
+  more often than every ``DELTA_INTERVAL_SEC`` and at most
+  ``MAX_DELTA_BATCH`` topics per batch;
+* :meth:`TopicDiscovery.snapshot` answers filterable snapshots (MQTT filter
+  plus substring) straight from the trie.
+
+Any number of admin tabs therefore costs one subscription per server.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Any
+
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError as e:
+    logger.debug("Exception in line_37: %s", e)
+    mqtt = None
+
+SUBSCRIBE_FILTER = "#"
+IDLE_STOP_SEC = 30.0
+DELTA_INTERVAL_SEC = 0.5
+MAX_DELTA_BATCH = 500
+MAX_TOPICS = 50_000
+MAX_PAYLOAD_CHARS = 1024
+RATE_TAU_SEC = 10.0  # постоянная времени скользящей оценки msg/s
+CONNECT_TIMEOUT_SEC = 5
+
+
+# ---------------------------------------------------------------------------
+# Topic trie
+# ---------------------------------------------------------------------------
+
+
+class _Node:
+    __slots__ = ("_rate", "_rate_at", "children", "count", "first_seen", "last_seen", "payload", "topic")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.topic: str | None = None  # set on nodes that received a message
+        self.payload = ""
+        self.count = 0
+        self.first_seen = 0.0
+        self.last_seen = 0.0
+        self._rate = 0.0
+        self._rate_at = 0.0
+
+    def rate(self, now_mono: float) -> float:
+        """Messages per second, exponentially decayed to ``now_mono``."""
+        if not self.count:
+            return 0.0
+        return self._rate * math.exp(-(now_mono - self._rate_at) / RATE_TAU_SEC)
+
+    def entry(self, now_mono: float) -> dict[str, Any]:
+        return {
+            "topic": self.topic,
+            "payload": self.payload,
+            "count": self.count,
+            "rate": round(self.rate(now_mono), 3),
+            "first_seen": round(self.first_seen, 3),
+            "last_seen": round(self.last_seen, 3),
+        }
+
+
+def _levels(topic_or_filter: str) -> list[str]:
+    return topic_or_filter.split("/")
+
+
+def filter_matches(filter_levels: list[str], topic_levels: list[str]) -> bool:
+    """MQTT 3.1.1 filter matching (``+`` one level, trailing ``#`` the rest)."""
+    n = len(filter_levels)
+    for i, f in enumerate(filter_levels):
+        if f == "#":
+            return i == n - 1
+        if i >= len(topic_levels):
+            return False
+        if f != "+" and f != topic_levels[i]:
+            return False
+    return len(topic_levels) == n
+
+
+class TopicTrie:
+    """Topics by level; not thread-safe on its own (guarded by the owner)."""
+
+    def __init__(self, max_topics: int = MAX_TOPICS):
+        self.root = _Node()
+        self.size = 0
+        self.dropped = 0
+        self.max_topics = max_topics
+
+    def update(self, topic: str, payload: str, now: float, now_mono: float) -> _Node | None:
+        node = self.root
+        for level in _levels(topic):
+            child = node.children.get(level)
+            if child is None:
+                if self.size >= self.max_topics:
+                    self.dropped += 1
+                    return None
+                child = node.children[level] = _Node()
+            node = child
+        if node.topic is None:
+            if self.size >= self.max_topics:
+                self.dropped += 1
+                return None
+            node.topic = topic
+            node.first_seen = now
+            self.size += 1
+        node.payload = payload
+        node.count += 1
+        node.last_seen = now
+        node._rate = node.rate(now_mono) + 1.0 / RATE_TAU_SEC
+        node._rate_at = now_mono
+        return node
+
+    def get(self, topic: str) -> _Node | None:
+        node = self.root
+        for level in _levels(topic):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node if node.topic is not None else None
+
+    def match(self, topic_filter: str = "#"):
+        """Yield nodes whose topic matches the MQTT ``topic_filter``."""
+        stack = [(self.root, _levels(topic_filter or "#"), 0)]
+        while stack:
+            node, flt, i = stack.pop()
+            if i == len(flt):
+                if node.topic is not None:
+                    yield node
+                continue
+            f = flt[i]
+            if f == "#":
+                yield from self._all(node)
+            elif f == "+":
+                for child in node.children.values():
+                    stack.append((child, flt, i + 1))
+            else:
+                child = node.children.get(f)
+                if child is not None:
+                    stack.append((child, flt, i + 1))
+
+    @staticmethod
+    def _all(node: _Node):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.topic is not None:
+                yield n
+            stack.extend(n.children.values())
+
+
+# ---------------------------------------------------------------------------
+# Viewers
+# ---------------------------------------------------------------------------
+
+
+class Viewer:
+    """One subscriber of a discovery: topic filter + set of changed topics."""
+
+    def __init__(self, discovery: TopicDiscovery, topic_filter: str):
+        self.discovery = discovery
+        self.topic_filter = topic_filter or "#"
+        self._filter_levels = _levels(self.topic_filter)
+        self._dirty: dict[str, None] = {}  # ordered set
+        self._cond = threading.Condition()
+        self._last_flush = 0.0
+        self.closed = False
+
+    def wants(self, topic_levels: list[str]) -> bool:
+        return filter_matches(self._filter_levels, topic_levels)
+
+    def _mark(self, topic: str) -> None:
+        with self._cond:
+            self._dirty[topic] = None
+            self._cond.notify()
+
+    def next_delta(self, timeout: float) -> list[dict[str, Any]]:
+        """Changed topics since the previous call (latest values), or [] on timeout.
+
+        Waits at least DELTA_INTERVAL_SEC after the previous batch, so a busy
+        bus produces one batch per interval instead of one event per message.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._dirty and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            flush_at = self._last_flush + DELTA_INTERVAL_SEC
+            if flush_at > deadline:
+                return []
+            # new messages keep coalescing into _dirty meanwhile
+            while not self.closed:
+                wait = flush_at - time.monotonic()
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            topics = []
+            for topic in self._dirty:
+                topics.append(topic)
+                if len(topics) >= MAX_DELTA_BATCH:
+                    break
+            for topic in topics:
+                del self._dirty[topic]
+            self._last_flush = time.monotonic()
+        return self.discovery.entries(topics)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self.discovery.release(self)
+
+
+# ---------------------------------------------------------------------------
+# Per-server discovery
+# ---------------------------------------------------------------------------
+
+
+def _client_factory(server: dict[str, Any]):
+    client_id = server.get("client_id")
+    # Своё имя клиента: общий client_id выбил бы основное подключение sse_hub
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"{client_id}-discovery" if client_id else None)
+    if server.get("username"):
+        client.username_pw_set(server.get("username"), server.get("password") or None)
+    return client
+
+
+class TopicDiscovery:
+    """Shared wildcard subscription of one MQTT server, reference counted."""
+
+    def __init__(self, server_id: int, server: dict[str, Any], client_factory=None):
+        self.server_id = server_id
+        self.server = server
+        self._client_factory = client_factory or _client_factory
+        self._lock = threading.Lock()
+        self._client = None
+        self._viewers: list[Viewer] = []
+        self._holds = 0
+        self._idle_timer: threading.Timer | None = None
+        self.trie = TopicTrie()
+        self.started_at: float | None = None  # monotonic
+        self.messages = 0
+        self.subscriptions = 0
+
+    # -- lifecycle ---------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._client is not None
+
+    @property
+    def refcount(self) -> int:
+        return len(self._viewers) + self._holds
+
+    def _ensure_started(self) -> None:
+        """Connect and subscribe if not running. Caller holds ``_lock``."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._client is not None:
+            return
+        client = self._client_factory(self.server)
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        client.connect(
+            self.server.get("host") or "127.0.0.1", int(self.server.get("port") or 1883), CONNECT_TIMEOUT_SEC
+        )
+        client.loop_start()
+        self._client = client
+        self.trie = TopicTrie()
+        self.started_at = time.monotonic()
+        logger.info("mqtt discovery started for server %s", self.server_id)
+
+    def _on_connect(self, cl, userdata, flags, reason_code, properties=None):
+        try:
+            cl.subscribe(SUBSCRIBE_FILTER, qos=0)
+            self.subscriptions += 1
+        except (ConnectionError, TimeoutError, OSError) as e:
+            logger.debug("Handled exception in discovery on_connect: %s", e)
+
+    def _on_message(self, cl, userdata, msg):
+        topic = str(getattr(msg, "topic", "") or "")
+        try:
+            payload = msg.payload.decode("utf-8", errors="ignore")
+        except (UnicodeDecodeError, AttributeError) as e:
+            logger.debug("Exception in discovery on_message: %s", e)
+            payload = str(getattr(msg, "payload", ""))
+        if len(payload) > MAX_PAYLOAD_CHARS:
+            payload = payload[:MAX_PAYLOAD_CHARS]
+        levels = _levels(topic)
+        with self._lock:
+            self.messages += 1
+            node = self.trie.update(topic, payload, clock.timestamp(), time.monotonic())
+            viewers = list(self._viewers) if node is not None else ()
+        for v in viewers:
+            if v.wants(levels):
+                v._mark(topic)
+
+    def _stop_if_idle(self) -> None:
+        with self._lock:
+            if self.refcount or self._client is None:
+                return
+            client, self._client = self._client, None
+            self._idle_timer = None
+            self.trie = TopicTrie()
+            self.started_at = None
+        _shutdown_client(client)
+        logger.info("mqtt discovery stopped for server %s (idle)", self.server_id)
+
+    def _schedule_idle_stop(self) -> None:
+        """Caller holds ``_lock``."""
+        if self.refcount or self._client is None:
+            return
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(IDLE_STOP_SEC, self._stop_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def stop(self) -> None:
+        """Disconnect now regardless of viewers (server edited/deleted)."""
+        with self._lock:
+            client, self._client = self._client, None
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            viewers, self._viewers = self._viewers, []
+            self._holds = 0
+            self.started_at = None
+        for v in viewers:
+            with v._cond:
+                v.closed = True
+                v._cond.notify_all()
+        if client is not None:
+            _shutdown_client(client)
+
+    # -- viewers / holds ---------------------------------------------------
+
+    def open_viewer(self, topic_filter: str = "#") -> Viewer:
+        """Register a viewer; its first delta carries the current matching topics."""
+        viewer = Viewer(self, topic_filter)
+        with self._lock:
+            self._ensure_started()
+            self._viewers.append(viewer)
+            for node in self.trie.match(viewer.topic_filter):
+                viewer._dirty[node.topic] = None
+        return viewer
+
+    def release(self, viewer: Viewer) -> None:
+        with self._lock:
+            if viewer in self._viewers:
+                self._viewers.remove(viewer)
+            self._schedule_idle_stop()
+
+    def probe(self, topic_filter: str, duration: float, limit: int = 1000) -> list[dict[str, Any]]:
+        """Snapshot after the subscription has been running ``duration`` seconds.
+
+        A warm discovery (already running that long) answers immediately.
+        """
+        with self._lock:
+            self._ensure_started()
+            self._holds += 1
+            started_at = self.started_at or time.monotonic()
+        try:
+            remaining = started_at + duration - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            return self.snapshot(topic_filter, limit=limit)
+        finally:
+            with self._lock:
+                self._holds = max(0, self._holds - 1)
+                self._schedule_idle_stop()
+
+    # -- queries -----------------------------------------------------------
+
+    def entries(self, topics: list[str]) -> list[dict[str, Any]]:
+        now_mono = time.monotonic()
+        out = []
+        with self._lock:
+            for topic in topics:
+                node = self.trie.get(topic)
+                if node is not None:
+                    out.append(node.entry(now_mono))
+        return out
+
+    def snapshot(self, topic_filter: str = "#", search: str = "", limit: int = 1000) -> list[dict[str, Any]]:
+        """Known topics matching the MQTT filter and containing ``search``, sorted."""
+        now_mono = time.monotonic()
+        needle = (search or "").lower()
+        with self._lock:
+            nodes = [n for n in self.trie.match(topic_filter) if not needle or needle in n.topic.lower()]
+            nodes.sort(key=lambda n: n.topic)
+            return [n.entry(now_mono) for n in nodes[: max(0, int(limit))]]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "server_id": self.server_id,
+                "running": self._client is not None,
+                "viewers": len(self._viewers),
+                "probes": self._holds,
+                "topics": self.trie.size,
+                "dropped_topics": self.trie.dropped,
+                "messages": self.messages,
+                "subscriptions": self.subscriptions,
+                "uptime_sec": round(time.monotonic() - self.started_at, 1) if self.started_at else 0.0,
+            }
+
+
+def _shutdown_client(client) -> None:
+    try:
+        client.loop_stop()
+        client.disconnect()
+    except (ConnectionError, TimeoutError, OSError, RuntimeError) as e:
+        logger.debug("Handled exception in discovery shutdown: %s", e)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+_discoveries: dict[int, TopicDiscovery] = {}
+_registry_lock = threading.Lock()
+
+
+def get_discovery(server_id: int, server: dict[str, Any], client_factory=None) -> TopicDiscovery:
+    """The shared discovery of ``server_id`` (created on first use)."""
+    with _registry_lock:
+        disc = _discoveries.get(int(server_id))
+        if disc is None:
+            disc = _discoveries[int(server_id)] = TopicDiscovery(int(server_id), server, client_factory)
+        return disc
+
+
+def peek(server_id: int) -> TopicDiscovery | None:
+    with _registry_lock:
+        return _discoveries.get(int(server_id))
+
+
+def stop(server_id: int) -> None:
+    """Drop the discovery of a server whose settings changed or that was deleted."""
+    with _registry_lock:
+        disc = _discoveries.pop(int(server_id), None)
+    if disc is not None:
+        disc.stop()
+
+
+def stop_all() -> None:
+    with _registry_lock:
+        discs = list(_discoveries.values())
+        _discoveries.clear()
+    for disc in discs:
+        disc.stop()
+
+
+def stats() -> list[dict[str, Any]]:
+    with _registry_lock:
+        discs = list(_discoveries.values())
+    return [d.stats() for d in discs]
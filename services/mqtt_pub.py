@@ -11,6 +11,7 @@ except ImportError as e:
     logger.debug("Exception in line_8: %s", e)
     mqtt = None
 
+from services import clock
 from utils import normalize_topic
 
 try:
@@ -310,7 +311,7 @@ def publish_mqtt_value(
         # normalize server via TTL cache
         if sid is not None and _db is not None:
             try:
-                now_ts = time.time()
+                now_ts = clock.timestamp()
                 cached = _SERVER_CACHE.get(sid)
                 srv = None
                 if cached and (now_ts - cached[1]) < _SERVER_CACHE_TTL:
@@ -324,7 +325,7 @@ def publish_mqtt_value(
             except (ConnectionError, TimeoutError, OSError) as e:
                 logger.debug("Handled exception in publish_mqtt_value: %s", e)
         key = (sid or 0, t)
-        now = time.time()
+        now = clock.timestamp()
         with _TOPIC_LOCK:
             last = _TOPIC_LAST_SEND.get(key)
             if last and last[0] == value and (now - last[1]) < min_interval_sec:
@@ -367,7 +368,7 @@ def publish_mqtt_value(
         # base topic and propagate failure to the caller.
         t_on = t + "/on"
         on_key = (sid or 0, t_on)
-        now2 = time.time()
+        now2 = clock.timestamp()
         with _TOPIC_LOCK:
             last2 = _TOPIC_LAST_SEND.get(on_key)
             if last2 and last2[0] == value and (now2 - last2[1]) < min_interval_sec:
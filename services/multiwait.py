@@ -0,0 +1,86 @@
+"""Wait on several events at once without polling.
+
+``threading.Event`` can only be waited on one at a time, so code that must
+react to "resume OR cancel OR shutdown" used to loop over short timeouts.
+:class:`Signal` is a drop-in ``threading.Event`` that also notifies any
+:func:`wait_any` callers currently watching it, so the waiter wakes up the
+moment any of its events is set.
+
+Plain ``threading.Event`` objects are still accepted by :func:`wait_any`
+(e.g. events handed in by tests or third-party code); if any watched event
+is not a :class:`Signal`, the wait falls back to re-checking every ``poll``
+seconds.
+"""
+
+import threading
+import time
+
+
+class Signal(threading.Event):
+    """``threading.Event`` that wakes :func:`wait_any` waiters on ``set()``."""
+
+    def __init__(self):
+        super().__init__()
+        self._listeners_lock = threading.Lock()
+        self._listeners = set()  # type: Set[threading.Condition]
+
+    def set(self):
+        super().set()
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for cond in listeners:
+            with cond:
+                cond.notify_all()
+
+    def _add_listener(self, cond):
+        with self._listeners_lock:
+            self._listeners.add(cond)
+
+    def _remove_listener(self, cond):
+        with self._listeners_lock:
+            self._listeners.discard(cond)
+
+
+def wait_any(events, timeout=None, poll=0.5):
+    # type: (Iterable[Optional[threading.Event]], Optional[float], float) -> Optional[threading.Event]
+    """Block until one of *events* is set; return it (first set, in argument order).
+
+    ``None`` entries are ignored. Returns ``None`` if *timeout* seconds pass
+    with no event set.
+    """
+    events = [e for e in events if e is not None]
+
+    def _first():
+        for e in events:
+            if e.is_set():
+                return e
+        return None
+
+    hit = _first()
+    if hit is not None or (timeout is not None and timeout <= 0):
+        return hit
+
+    cond = threading.Condition()
+    signals = [e for e in events if isinstance(e, Signal)]
+    step = None if len(signals) == len(events) else poll
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for s in signals:
+        s._add_listener(cond)
+    try:
+        with cond:
+            while True:
+                # Checked under ``cond``: Signal.set() notifies while holding it,
+                # so a set() between this check and wait() cannot be lost.
+                hit = _first()
+                if hit is not None:
+                    return hit
+                wait = step
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                cond.wait(wait)
+    finally:
+        for s in signals:
+            s._remove_listener(cond)
@@ -0,0 +1,290 @@
+"""Outbound Telegram notification queue.
+
+Alerts and reports used to be sent inline: every ``notifier.send_text`` did a
+blocking ``requests.post`` on a fresh connection from the caller's thread
+(watchdog, state verifier, scheduler jobs). Here callers only enqueue;
+one worker thread drains a bounded queue over a pooled ``requests.Session``.
+
+- Rate limits: at most one message per ``per_chat_interval`` seconds per chat
+  and ``global_rate`` messages per second overall (Telegram allows ~1/s per
+  chat and ~30/s per bot). A 429 reply pauses the chat for ``retry_after``.
+- Retries: 5xx / network errors are retried with backoff up to
+  ``max_attempts``; retries also spend a shared budget refilled by successful
+  sends, so an outage does not turn into a retry storm.
+- Coalescing: alerts (``alert()``) for one chat arriving within
+  ``coalesce_window`` seconds are merged into a single digest message.
+- Overflow: when the queue is full new messages are dropped (and counted).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+OUTBOUND_QUEUE_MAX = 500
+PER_CHAT_INTERVAL_SEC = 1.0
+GLOBAL_RATE_PER_SEC = 25.0
+ALERT_COALESCE_SEC = 3.0
+MAX_ATTEMPTS = 4
+RETRY_BUDGET_MAX = 10.0
+RETRY_BUDGET_PER_SEND = 0.2  # каждый успешный запрос возвращает 0.2 попытки в бюджет
+MAX_BACKOFF_SEC = 30.0
+MESSAGE_MAX_LEN = 4096  # лимит Telegram на текст сообщения
+
+
+@dataclass
+class Outbound:
+    chat_id: int
+    method: str
+    payload: dict[str, Any]
+    attempts: int = 0
+    not_before: float = 0.0  # monotonic
+    alerts: int = 0  # сколько алертов свёрнуто в это сообщение
+
+
+@dataclass
+class _AlertBuffer:
+    first_at: float
+    texts: list[str] = field(default_factory=list)
+
+
+class NotificationQueue:
+    """Bounded outbound queue with one sender thread."""
+
+    def __init__(
+        self,
+        token_provider: Callable[[], str | None],
+        api_base: str = TELEGRAM_API_BASE,
+        maxsize: int = OUTBOUND_QUEUE_MAX,
+        per_chat_interval: float = PER_CHAT_INTERVAL_SEC,
+        global_rate: float = GLOBAL_RATE_PER_SEC,
+        coalesce_window: float = ALERT_COALESCE_SEC,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_budget: float = RETRY_BUDGET_MAX,
+        timeout: float = 10.0,
+    ):
+        self.token_provider = token_provider
+        self.api_base = api_base.rstrip("/")
+        self.maxsize = int(maxsize)
+        self.per_chat_interval = float(per_chat_interval)
+        self.global_rate = float(global_rate)
+        self.coalesce_window = float(coalesce_window)
+        self.max_attempts = int(max_attempts)
+        self.retry_budget_max = float(retry_budget)
+        self.timeout = float(timeout)
+        self._cond = threading.Condition()
+        self._queue: deque[Outbound] = deque()
+        self._alerts: dict[int, _AlertBuffer] = {}
+        self._chat_ready: dict[int, float] = {}  # chat_id -> monotonic time of the next allowed send
+        self._tokens = max(1.0, self.global_rate)
+        self._tokens_at = time.monotonic()
+        self._retry_budget = self.retry_budget_max
+        self._in_flight = 0
+        self._stats = {"sent": 0, "failed": 0, "dropped": 0, "retried": 0, "coalesced": 0}
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    # --- lifecycle ---
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="telegram-outbox", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Try to drain the queue for up to ``timeout`` seconds, then stop the worker."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self._thread = None
+        self._session.close()
+
+    # --- API ---
+    def submit(self, chat_id: int, text: str, reply_markup: dict | None = None) -> bool:
+        """Queue a message. Returns False when the queue is full."""
+        payload: dict[str, Any] = {"chat_id": int(chat_id), "text": str(text)[:MESSAGE_MAX_LEN]}
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup
+        with self._cond:
+            if self._size() >= self.maxsize:
+                self._stats["dropped"] += 1
+                logger.warning("telegram outbox full (%d), message to %s dropped", self.maxsize, chat_id)
+                return False
+            self._queue.append(Outbound(int(chat_id), "sendMessage", payload))
+            self._cond.notify_all()
+        return True
+
+    def alert(self, chat_id: int, text: str) -> bool:
+        """Queue an alert; alerts to one chat within the coalescing window go out as one digest."""
+        with self._cond:
+            if self._size() >= self.maxsize:
+                self._stats["dropped"] += 1
+                logger.warning("telegram outbox full (%d), alert to %s dropped", self.maxsize, chat_id)
+                return False
+            buf = self._alerts.get(int(chat_id))
+            if buf is None:
+                buf = self._alerts[int(chat_id)] = _AlertBuffer(time.monotonic())
+            buf.texts.append(str(text))
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued (incl. pending alerts) has been sent or given up on."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._alerts or self._in_flight:
+                left = deadline - time.monotonic()
+                if left <= 0 or self._thread is None or not self._thread.is_alive():
+                    return False
+                self._cond.wait(min(left, 0.1))
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            out = dict(self._stats)
+            out["queued"] = self._size()
+            out["retry_budget"] = round(self._retry_budget, 2)
+        return out
+
+    # --- internals (``_cond`` held) ---
+    def _size(self) -> int:
+        return len(self._queue) + sum(len(b.texts) for b in self._alerts.values())
+
+    def _promote_alerts(self, now: float) -> None:
+        """Turn alert buffers whose window has elapsed into queued messages."""
+        for chat_id in [cid for cid, b in self._alerts.items() if now - b.first_at >= self.coalesce_window]:
+            texts = self._alerts.pop(chat_id).texts
+            if len(texts) == 1:
+                text = texts[0]
+            else:
+                self._stats["coalesced"] += len(texts) - 1
+                text = f"⚠️ {len(texts)} уведомлений:\n" + "\n".join(f"• {t}" for t in texts)
+                if len(text) > MESSAGE_MAX_LEN:
+                    text = text[: MESSAGE_MAX_LEN - 1] + "…"
+            self._queue.append(Outbound(chat_id, "sendMessage", {"chat_id": chat_id, "text": text}, alerts=len(texts)))
+
+    def _refill(self, now: float) -> None:
+        cap = max(1.0, self.global_rate)
+        self._tokens = min(cap, self._tokens + (now - self._tokens_at) * self.global_rate)
+        self._tokens_at = now
+
+    def _take_next(self, now: float) -> tuple[Outbound | None, float | None]:
+        """Next sendable message (FIFO per chat) or the time to wait for one."""
+        self._promote_alerts(now)
+        waits = [b.first_at + self.coalesce_window - now for b in self._alerts.values()]
+        self._refill(now)
+        if self._tokens < 1.0 and self._queue:
+            waits.append((1.0 - self._tokens) / self.global_rate)
+            return None, max(0.0, min(waits))
+        blocked: set[int] = set()
+        for i, item in enumerate(self._queue):
+            if item.chat_id in blocked:
+                continue
+            ready = max(item.not_before, self._chat_ready.get(item.chat_id, 0.0))
+            if ready > now:
+                blocked.add(item.chat_id)
+                waits.append(ready - now)
+                continue
+            del self._queue[i]
+            self._tokens -= 1.0
+            self._chat_ready[item.chat_id] = now + self.per_chat_interval
+            return item, None
+        return None, (max(0.0, min(waits)) if waits else None)
+
+    # --- worker ---
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                item, wait = self._take_next(time.monotonic())
+                if item is None:
+                    self._cond.wait(wait)
+                    continue
+                self._in_flight += 1
+            try:
+                self._deliver(item)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _deliver(self, item: Outbound) -> None:
+        token = self.token_provider()
+        if not token:
+            self._give_up(item, "no bot token")
+            return
+        url = f"{self.api_base}/bot{token}/{item.method}"
+        logger.debug("telegram outbox %s chat_id=%s payload=%s", item.method, item.chat_id, item.payload)
+        item.attempts += 1
+        try:
+            resp = self._session.post(url, json=item.payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._retry(item, f"{type(e).__name__}: {e}")
+            return
+        if resp.status_code == 200:
+            with self._cond:
+                self._stats["sent"] += 1
+                self._retry_budget = min(self.retry_budget_max, self._retry_budget + RETRY_BUDGET_PER_SEND)
+            return
+        if resp.status_code == 429:
+            try:
+                retry_after = float(((resp.json() or {}).get("parameters") or {}).get("retry_after") or 1)
+            except (ValueError, TypeError, AttributeError):
+                retry_after = 1.0
+            self._retry(item, "429 Too Many Requests", retry_after=retry_after)
+            return
+        if resp.status_code >= 500:
+            self._retry(item, f"HTTP {resp.status_code}")
+            return
+        # 4xx кроме 429 — повторять бессмысленно (чат не найден, бот заблокирован и т.п.)
+        self._give_up(item, f"HTTP {resp.status_code}: {resp.text[:200]}")
+
+    def _retry(self, item: Outbound, reason: str, retry_after: float | None = None) -> None:
+        with self._cond:
+            requeue = item.attempts < self.max_attempts
+            if requeue and retry_after is not None:
+                # 429: Telegram сам говорит, сколько ждать — бюджет не тратим
+                ready = time.monotonic() + retry_after
+                self._chat_ready[item.chat_id] = max(self._chat_ready.get(item.chat_id, 0.0), ready)
+            elif requeue and self._retry_budget >= 1.0:
+                self._retry_budget -= 1.0
+                item.not_before = time.monotonic() + min(MAX_BACKOFF_SEC, 0.5 * 2 ** (item.attempts - 1))
+            else:
+                requeue = False
+            if requeue:
+                # в начало очереди: порядок сообщений в чате сохраняется
+                self._queue.appendleft(item)
+                self._stats["retried"] += 1
+                return
+        self._give_up(item, reason)
+
+    def _give_up(self, item: Outbound, reason: str) -> None:
+        with self._cond:
+            self._stats["failed"] += 1
+        logger.warning(
+            "telegram outbox: %s to %s failed after %d attempt(s): %s",
+            item.method,
+            item.chat_id,
+            item.attempts,
+            reason,
+        )
@@ -321,7 +321,7 @@ class StateVerifier:
             if notifier and db:
                 admin_chat = db.get_setting_value("telegram_admin_chat_id")
                 if admin_chat:
-                    notifier.send_text(int(admin_chat), alert_text)
+                    notifier.alert(int(admin_chat), alert_text)
         except (sqlite3.Error, OSError):
             logger.exception("StateVerifier: Telegram alert failed")
 
@@ -0,0 +1,288 @@
+"""Built-in sampling profiler: where the CPU goes, without py-spy on the box.
+
+A sampler thread reads ``sys._current_frames()`` at a fixed rate for a
+bounded window and counts collapsed stacks per thread. The result is
+"folded" text (``role;thread;outer;...;inner count`` per line), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Each thread is labelled with the app worker it belongs to: scheduler,
+sse-hub, monitor:rain / monitor:water / monitor:env, mqtt, http, event-bus
+and so on. Pool and paho network threads have generic names, so the label
+comes from the stack or from the MQTT client's ``on_message`` module.
+
+Two modes:
+  * global capture — :func:`start` / :func:`stop`, one at a time, exposed
+    admin-only by ``routes/profiler_api.py``;
+  * per-request — an admin request carrying ``X-Profile: 1`` is sampled on
+    its own thread only; the profile is kept under its ``X-Request-ID``
+    (see :func:`begin_request` / :func:`end_request`).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HZ = 97  # не кратно 100 Гц, чтобы не синхронизироваться с периодическими задачами
+MAX_HZ = 250
+DEFAULT_DURATION_S = 30
+MAX_DURATION_S = 300
+MAX_DEPTH = 64
+REQUEST_HEADER = "X-Profile"
+REQUEST_HZ = 200
+MAX_REQUEST_PROFILES = 20
+MAX_ACTIVE_REQUEST_CAPTURES = 4
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Имена потоков приложения → роль
+_NAME_ROLES = (
+    ("MainThread", "main"),
+    ("http_", "http"),  # пул синхронных запросов Hypercorn, см. run.py
+    ("sse-", "sse-hub"),
+    ("event-bus-", "event-bus"),
+    ("timer-store", "scheduler"),
+    ("telegram-", "telegram"),
+    ("float-timeouts", "monitor:float"),
+    ("leader-", "leader"),
+    ("systemd-", "watchdog"),
+    ("profiler", "profiler"),
+)
+# Модуль обработчика on_message у paho-клиента → роль сетевого потока
+_MQTT_OWNER_ROLES = {
+    "services.sse_hub": "sse-hub",
+    "services.monitors.rain_monitor": "monitor:rain",
+    "services.monitors.water_monitor": "monitor:water",
+    "services.monitors.env_monitor": "monitor:env",
+    "services.observed_state": "mqtt:verifier",
+}
+
+
+def _short_path(filename: str) -> str:
+    if "site-packages" in filename:
+        return filename.split("site-packages" + os.sep, 1)[-1]
+    if filename.startswith(_BASE_DIR + os.sep):
+        return os.path.relpath(filename, _BASE_DIR)
+    return os.path.basename(filename)
+
+
+_labels: dict = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        # ';' разделяет кадры в folded-формате
+        label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+        if len(_labels) < 50_000:
+            _labels[code] = label
+    return label
+
+
+def _mqtt_role(frame) -> str:
+    while frame is not None:
+        if frame.f_code.co_name == "_thread_main" and "paho" in frame.f_code.co_filename:
+            client = frame.f_locals.get("self")
+            module = getattr(getattr(client, "on_message", None), "__module__", "") or ""
+            return _MQTT_OWNER_ROLES.get(module, "mqtt")
+        frame = frame.f_back
+    return "mqtt"
+
+
+def thread_role(name: str, frame, stack: tuple[str, ...] = ()) -> str | None:
+    """Worker label for a thread, or None while it cannot be told yet (idle pool)."""
+    for prefix, role in _NAME_ROLES:
+        if name.startswith(prefix):
+            return role
+    if name.startswith("paho-mqtt-client-"):
+        return _mqtt_role(frame)
+    for label in stack:
+        if "apscheduler" in label:
+            return "scheduler"
+        if "wsgi_app (flask" in label or "hypercorn" in label or "werkzeug/serving" in label:
+            return "http"
+    return None
+
+
+class Capture:
+    """One sampling window; ``thread_ids`` narrows it to the given threads."""
+
+    def __init__(self, hz: int, duration_s: float, thread_ids: set[int] | None = None, label: str = ""):
+        self.hz = max(1, min(int(hz), MAX_HZ))
+        self.duration_s = max(0.1, min(float(duration_s), MAX_DURATION_S))
+        self.thread_ids = thread_ids
+        self.label = label
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self._stop = threading.Event()
+        self._roles: dict[int, str] = {}
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> Capture:
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if wait and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(2)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        interval = 1.0 / self.hz
+        deadline = time.monotonic() + self.duration_s
+        own = threading.get_ident()
+        names: dict[int, str] = {}
+        names_at = 0.0
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                now = time.monotonic()
+                if now - names_at > 1.0:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    names_at = now
+                self._sample(own, names)
+                self._stop.wait(interval)
+        except Exception:
+            logger.exception("profiler capture failed")
+        finally:
+            self.finished_at = time.time()
+
+    def _sample(self, own: int, names: dict[int, str]) -> None:
+        wanted = self.thread_ids
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (wanted is not None and ident not in wanted):
+                continue
+            stack = []
+            f = frame
+            while f is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(f.f_code))
+                f = f.f_back
+            stack.reverse()
+            stack = tuple(stack)
+            name = names.get(ident) or str(ident)
+            role = self._roles.get(ident)
+            if role is None:
+                role = thread_role(name, frame, stack)
+                if role is None:
+                    role = "other"
+                else:
+                    self._roles[ident] = role
+            self.counts[(role, name, stack)] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        lines = [
+            ";".join((role, name.replace(";", ":"), *stack)) + f" {n}"
+            for (role, name, stack), n in self.counts.copy().most_common()
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self) -> dict:
+        ended = self.finished_at or time.time()
+        per_role: Counter = Counter()
+        for (role, _name, _stack), n in self.counts.copy().items():
+            per_role[role] += n
+        return {
+            "label": self.label,
+            "running": self.running,
+            "hz": self.hz,
+            "duration_s": self.duration_s,
+            "elapsed_s": round(ended - self.started_at, 3),
+            "samples": self.samples,
+            "stacks": len(self.counts),
+            "by_role": dict(per_role.most_common()),
+        }
+
+
+# ---- global capture ----
+
+_lock = threading.Lock()
+_current: Capture | None = None
+
+
+def start(duration_s: float = DEFAULT_DURATION_S, hz: int = DEFAULT_HZ) -> Capture | None:
+    """Start a whole-process capture; None when one is already running."""
+    global _current
+    with _lock:
+        if _current is not None and _current.running:
+            return None
+        _current = Capture(hz, duration_s, label="global").start()
+        logger.info("profiler: capture started (%s Hz, %.0f s)", _current.hz, _current.duration_s)
+        return _current
+
+
+def stop() -> Capture | None:
+    with _lock:
+        cap = _current
+    if cap is not None:
+        cap.stop()
+    return cap
+
+
+def current() -> Capture | None:
+    return _current
+
+
+def status() -> dict:
+    cap = _current
+    return {
+        "capture": cap.summary() if cap else None,
+        "requests": list_request_profiles(),
+        "limits": {"max_hz": MAX_HZ, "max_duration_s": MAX_DURATION_S},
+    }
+
+
+# ---- per-request capture ----
+
+_request_profiles: OrderedDict[str, dict] = OrderedDict()
+_active_requests: dict[str, Capture] = {}
+
+
+def begin_request(request_id: str, method: str, path: str) -> bool:
+    """Start sampling the calling (request) thread; False when over the limit."""
+    with _lock:
+        if len(_active_requests) >= MAX_ACTIVE_REQUEST_CAPTURES or request_id in _active_requests:
+            return False
+        cap = Capture(REQUEST_HZ, MAX_DURATION_S, {threading.get_ident()}, label=f"{method} {path}")
+        _active_requests[request_id] = cap
+    cap.start()
+    return True
+
+
+def end_request(request_id: str, status_code: int | None = None) -> dict | None:
+    """Stop the request's capture and keep its profile; returns the summary."""
+    with _lock:
+        cap = _active_requests.pop(request_id, None)
+    if cap is None:
+        return None
+    cap.stop()
+    summary = {**cap.summary(), "request_id": request_id, "status_code": status_code}
+    with _lock:
+        _request_profiles[request_id] = {"summary": summary, "folded": cap.folded()}
+        _request_profiles.move_to_end(request_id)
+        while len(_request_profiles) > MAX_REQUEST_PROFILES:
+            _request_profiles.popitem(last=False)
+    logger.info("profiler: request %s %s — %d samples", request_id, cap.label, cap.samples)
+    return summary
+
+
+def list_request_profiles() -> list[dict]:
+    with _lock:
+        return [p["summary"] for p in reversed(_request_profiles.values())]
+
+
+def request_profile(request_id: str) -> str | None:
+    with _lock:
+        p = _request_profiles.get(request_id)
+    return p["folded"] if p else None
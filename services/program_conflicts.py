@@ -0,0 +1,238 @@
+"""Program conflict engine: per-group occupied intervals in an interval tree.
+
+Every program (all schedule types, main time + ``extra_times``) is expanded
+over a rolling horizon into occupied intervals per group — zones of one
+group run one after another, different groups run in parallel only when
+``program_max_parallel_groups`` > 1 and a ``program_flow_budget_lpm`` is
+set; otherwise ``sequential_groups`` puts them one after another (the
+default). Intervals of each group go into a static :class:`IntervalIndex`,
+so a candidate program costs ``O((n + k) log n)`` and the whole-site report
+is one sweep per group instead of comparing every pair of programs.
+
+With ``weather_factor > 100`` intervals are stretched by that factor; a hit
+that also overlaps at base durations is an ``"error"``, a hit that appears
+only when stretched is a ``"warning"``.
+"""
+
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from scheduler.timeline import compile_program_slots
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_HORIZON_DAYS = 14
+_ONE_SECOND = timedelta(seconds=1)
+
+
+class IntervalIndex:
+    """Static interval tree over half-open ``[start, end)`` intervals.
+
+    Implicit balanced BST over the intervals sorted by start; every node keeps
+    the max end of its subtree, so subtrees that end before the query start are
+    skipped and the walk stops at the first start past the query end.
+    """
+
+    def __init__(self, items: Iterable[tuple[float, float, Any]]):
+        ordered = sorted(items, key=lambda it: (it[0], it[1]))
+        self._starts = [it[0] for it in ordered]
+        self._ends = [it[1] for it in ordered]
+        self._items = [it[2] for it in ordered]
+        self._max_end = [0.0] * len(ordered)
+        self._build(0, len(ordered))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def _build(self, lo: int, hi: int) -> float:
+        if lo >= hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        m = max(self._ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_end[mid] = m
+        return m
+
+    def overlapping(self, start: float, end: float) -> list[Any]:
+        """Payloads of intervals intersecting ``[start, end)``, in start order."""
+        out: list[Any] = []
+        self._query(0, len(self._items), start, end, out)
+        return out
+
+    def _query(self, lo: int, hi: int, start: float, end: float, out: list[Any]) -> None:
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._query(lo, mid, start, end, out)
+        if self._starts[mid] >= end:
+            return
+        if self._ends[mid] > start:
+            out.append(self._items[mid])
+        self._query(mid + 1, hi, start, end, out)
+
+
+@dataclass(frozen=True)
+class Occupancy:
+    """One program firing holding one group."""
+
+    program_id: int
+    group_id: int
+    fire_at: datetime
+    start: float  # minutes from engine origin, at the engine weather factor
+    end: float
+    base_start: float  # at 100 % (differs from start only for sequential groups)
+    base_end: float
+
+
+@dataclass
+class Conflict:
+    """Aggregated overlap of two programs in one group over the horizon."""
+
+    program_id: int
+    other_program_id: int
+    group_id: int
+    level: str  # "error" | "warning"
+    first_start: datetime  # earliest overlap
+    base_overlap: float = 0.0  # worst single overlap at 100 %
+    weather_overlap: float = 0.0  # worst single overlap at the weather factor
+    occurrences: int = 0
+    days: set[int] = field(default_factory=set)  # weekdays (of program_id firings) with an overlap
+
+    @property
+    def overlap_minutes(self) -> float:
+        return self.base_overlap if self.level == "error" else self.weather_overlap
+
+
+class ConflictEngine:
+    """Expands programs into per-group intervals and answers overlap queries."""
+
+    def __init__(
+        self,
+        programs: Iterable[dict[str, Any]],
+        zones: Iterable[dict[str, Any]],
+        now: datetime | None = None,
+        horizon_days: int = CONFLICT_HORIZON_DAYS,
+        weather_factor: int = 100,
+        sequential_groups: bool = False,
+    ):
+        now = now or clock.now()
+        self.origin = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.horizon_end = self.origin + timedelta(days=max(1, int(horizon_days)))
+        self.factor = max(100, int(weather_factor or 100))
+        self.sequential_groups = bool(sequential_groups)
+        self.durations: dict[int, int] = {}
+        self.zone_groups: dict[int, int] = {}
+        for z in zones:
+            try:
+                self.durations[int(z["id"])] = int(z.get("duration") or 0)
+                self.zone_groups[int(z["id"])] = int(z.get("group_id") or 0)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.debug("conflict engine zone skipped: %s", e)
+        self.programs: dict[int, dict[str, Any]] = {}
+        by_group: dict[int, list[tuple[float, float, Occupancy]]] = {}
+        for program in programs:
+            if not program.get("enabled", True):
+                continue
+            pid = int(program["id"])
+            self.programs[pid] = program
+            for occ in self.expand(program):
+                by_group.setdefault(occ.group_id, []).append((occ.start, occ.end, occ))
+        self.index = {gid: IntervalIndex(items) for gid, items in by_group.items()}
+
+    # --- expansion ---
+    def group_minutes(self, zone_ids: Iterable[int]) -> list[tuple[int, int]]:
+        """``[(group_id, base minutes)]`` in the order groups first appear (like the scheduler's slices)."""
+        totals: dict[int, int] = {}
+        for zid in zone_ids:
+            try:
+                zid = int(zid)
+            except (TypeError, ValueError):
+                continue
+            gid = self.zone_groups.get(zid, 0)
+            totals[gid] = totals.get(gid, 0) + self.durations.get(zid, 0)
+        return list(totals.items())
+
+    def firings(self, program: dict[str, Any]) -> list[datetime]:
+        if not program.get("time"):
+            return []
+        slots = compile_program_slots(int(program.get("id") or 0), program, now=self.origin)
+        out: list[datetime] = []
+        for slot in slots:
+            at = slot.first_at_or_after(self.origin)
+            while at < self.horizon_end:
+                out.append(at)
+                at = slot.first_at_or_after(at + _ONE_SECOND)
+        out.sort()
+        return out
+
+    def expand(self, program: dict[str, Any]) -> list[Occupancy]:
+        pid = int(program.get("id") or 0)
+        groups = [(gid, mins) for gid, mins in self.group_minutes(program.get("zones") or []) if mins > 0]
+        if not groups:
+            return []
+        scale = self.factor / 100.0
+        out: list[Occupancy] = []
+        for fire_at in self.firings(program):
+            t0 = (fire_at - self.origin).total_seconds() / 60.0
+            offset_base = offset = 0.0
+            for gid, mins in groups:
+                start = t0 + (offset if self.sequential_groups else 0.0)
+                base_start = t0 + (offset_base if self.sequential_groups else 0.0)
+                out.append(Occupancy(pid, gid, fire_at, start, start + mins * scale, base_start, base_start + mins))
+                offset_base += mins
+                offset += mins * scale
+        return out
+
+    # --- queries ---
+    def check(self, candidate: dict[str, Any], exclude_id: int | None = None) -> list[Conflict]:
+        """Conflicts of ``candidate`` (a program dict, not necessarily saved) with indexed programs."""
+        found: dict[tuple[int, int], Conflict] = {}
+        skip = candidate.get("id") if exclude_id is None else exclude_id
+        for occ in self.expand(candidate):
+            index = self.index.get(occ.group_id)
+            if index is None:
+                continue
+            for other in index.overlapping(occ.start, occ.end):
+                if skip is not None and other.program_id == int(skip):
+                    continue
+                self._record(found, occ, other, key=(other.program_id, occ.group_id))
+        return sorted(found.values(), key=lambda c: (c.first_start, c.other_program_id, c.group_id))
+
+    def site_report(self) -> list[Conflict]:
+        """Every overlapping pair of indexed programs (incl. a program with itself)."""
+        found: dict[tuple[int, int, int], Conflict] = {}
+        for gid, index in self.index.items():
+            for occ in index:
+                for other in index.overlapping(occ.start, occ.end):
+                    # каждую пару один раз: other стартует позже (или раньше по id при равном старте)
+                    if (other.start, other.program_id, other.fire_at) <= (occ.start, occ.program_id, occ.fire_at):
+                        continue
+                    a, b = (occ, other) if occ.program_id <= other.program_id else (other, occ)
+                    self._record(found, a, b, key=(a.program_id, b.program_id, gid))
+        return sorted(found.values(), key=lambda c: (c.first_start, c.program_id, c.other_program_id))
+
+    def _record(self, found: dict, occ: Occupancy, other: Occupancy, key: tuple) -> None:
+        start = max(occ.start, other.start)
+        overlap = min(occ.end, other.end) - start
+        if overlap <= 0:
+            return
+        base = min(occ.base_end, other.base_end) - max(occ.base_start, other.base_start)
+        at = self.origin + timedelta(minutes=start)
+        c = found.get(key)
+        if c is None:
+            c = found[key] = Conflict(occ.program_id, other.program_id, occ.group_id, "warning", at)
+        if base > 0 or self.factor == 100:
+            c.level = "error"
+            c.base_overlap = max(c.base_overlap, base if base > 0 else overlap)
+        c.weather_overlap = max(c.weather_overlap, overlap)
+        c.occurrences += 1
+        c.days.add(occ.fire_at.weekday())
+        c.first_start = min(c.first_start, at)
@@ -2,6 +2,13 @@
 
 Per-group FIFO queue with dedicated worker threads.
 Python 3.9 compatible.
+
+Multi-group programs are fanned out with :meth:`ProgramQueueManager.enqueue_program`:
+one entry per group, all sharing a ``program_run_id`` registered with the
+:class:`ProgramCompletionTracker`, so groups water in parallel and the caller
+waits for the slowest one. Parallelism is bounded by ``max_parallel`` (entries
+running at once, across all groups) and by :class:`FlowBudget` (pump capacity
+shared by the zones that are open at the same time).
 """
 
 import contextlib
@@ -13,6 +20,8 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
+from services.multiwait import Signal, wait_any
+
 logger = logging.getLogger(__name__)
 
 MAX_QUEUE_SIZE = 20
@@ -96,7 +105,8 @@ class QueueEntry:
     enqueued_at: datetime = field(default_factory=datetime.now)
     excluded_wait_seconds: float = 0.0
     program_run_id: str | None = None
-    cancel_event: threading.Event = field(default_factory=threading.Event)
+    cancel_event: threading.Event = field(default_factory=Signal)
+    manual: bool = False
 
 
 @dataclass
@@ -106,10 +116,61 @@ class GroupQueue:
     queue: deque[QueueEntry] = field(default_factory=deque)
     current: QueueEntry | None = None
     worker_thread: threading.Thread | None = None
-    cancel_event: threading.Event = field(default_factory=threading.Event)
+    cancel_event: threading.Event = field(default_factory=Signal)
     new_item_event: threading.Event = field(default_factory=threading.Event)
 
 
+class FlowBudget:
+    """Shared pump/flow capacity (l/min) for zones opened by parallel groups.
+
+    ``capacity <= 0`` disables the budget. A zone with unknown demand (0)
+    always fits, and any zone fits when nothing else is open — an oversized
+    zone runs alone instead of deadlocking.
+    """
+
+    def __init__(self, capacity=0.0):
+        # type: (float) -> None
+        self._cond = threading.Condition()
+        self.capacity = float(capacity or 0.0)
+        self._used = 0.0
+        self._holders = 0
+
+    @property
+    def in_use(self):
+        # type: () -> float
+        with self._cond:
+            return self._used
+
+    def set_capacity(self, capacity):
+        # type: (float) -> None
+        with self._cond:
+            self.capacity = float(capacity or 0.0)
+            self._cond.notify_all()
+
+    def acquire(self, demand, cancel_event=None, shutdown_event=None, poll=0.5):
+        # type: (float, Optional[threading.Event], Optional[threading.Event], float) -> bool
+        """Block until *demand* fits. Returns False if cancelled/shut down while waiting."""
+        demand = max(0.0, float(demand or 0.0))
+        with self._cond:
+            while self.capacity > 0 and demand > 0 and self._holders > 0 and self._used + demand > self.capacity:
+                if (cancel_event is not None and cancel_event.is_set()) or (
+                    shutdown_event is not None and shutdown_event.is_set()
+                ):
+                    return False
+                self._cond.wait(timeout=poll)
+            self._used += demand
+            self._holders += 1
+            return True
+
+    def release(self, demand):
+        # type: (float) -> None
+        demand = max(0.0, float(demand or 0.0))
+        with self._cond:
+            self._used = max(0.0, self._used - demand)
+            self._holders = max(0, self._holders - 1)
+            self._cond.notify_all()
+
+
 class ProgramQueueManager:
     """Per-group FIFO queue manager with worker threads."""
 
@@ -122,14 +183,37 @@ class ProgramQueueManager:
         telegram_notify=None,
         max_wait_minutes=0,
         max_queue_size=MAX_QUEUE_SIZE,
+        zone_runner=None,
+        zone_demand=None,
+        max_parallel=0,
+        flow_budget_lpm=0.0,
+        completion_tracker=None,
     ):
+        """
+        Args:
+            zone_runner: ``(entry, zone_id, coeff) -> None`` — waters one zone;
+                blocks for the zone's duration. None = entries complete
+                immediately (unit tests).
+            zone_demand: ``(zone_id) -> float`` — expected flow, l/min.
+            max_parallel: Entries running at once across all groups (0 = no limit).
+            flow_budget_lpm: Pump capacity shared by open zones (0 = no limit).
+            completion_tracker: Notified when an entry with a program_run_id
+                reaches a terminal state.
+        """
         self._db = db
-        self._shutdown_event = shutdown_event or threading.Event()
+        self._shutdown_event = shutdown_event or Signal()
         self._float_monitor = float_monitor
         self._get_weather_coefficient = get_weather_coefficient or (lambda: 100)
         self._telegram_notify = telegram_notify
         self._max_wait_minutes = max_wait_minutes
         self._max_queue_size = max_queue_size
+        self._zone_runner = zone_runner
+        self._zone_demand = zone_demand
+        self._tracker = completion_tracker
+        self._flow = FlowBudget(flow_budget_lpm)
+        self._run_cond = threading.Condition()
+        self._max_parallel = max(0, int(max_parallel or 0))
+        self._running = 0
 
         self._global_lock = threading.Lock()  # protects _queues dict
         self._queues = {}  # type: Dict[int, GroupQueue]
@@ -158,7 +242,66 @@ class ProgramQueueManager:
             scheduled_time=scheduled_time,
             program_run_id=program_run_id,
         )
+        return entry if self._push(entry) else None
 
+    def enqueue_program(
+        self,
+        program_id,  # type: int
+        program_name,  # type: str
+        slices,  # type: List[Tuple[int, List[int]]]
+        scheduled_time=None,  # type: Optional[datetime]
+        program_run_id=None,  # type: Optional[str]
+        manual=False,  # type: bool
+    ):
+        # type: (...) -> Tuple[str, List[QueueEntry]]
+        """Fan a multi-group program out: one entry per ``(group_id, zone_ids)`` slice.
+
+        All entries share ``program_run_id`` and are registered with the
+        completion tracker *before* any worker can pick them up. Slices
+        rejected by a full queue are reported finished immediately (state
+        FAILED). Returns ``(program_run_id, accepted_entries)``.
+        """
+        run_id = program_run_id or str(uuid.uuid4())
+        entries = [
+            QueueEntry(
+                entry_id=str(uuid.uuid4()),
+                program_id=program_id,
+                program_name=program_name,
+                group_id=int(gid),
+                zone_ids=list(zids),
+                scheduled_time=scheduled_time,
+                program_run_id=run_id,
+                manual=bool(manual),
+            )
+            for gid, zids in slices
+        ]
+        if self._tracker is not None:
+            self._tracker.register(run_id, [e.entry_id for e in entries], program_id, program_name)
+        accepted = []
+        for entry in entries:
+            if self._push(entry):
+                accepted.append(entry)
+                continue
+            entry.state = QueueEntryState.FAILED
+            logger.warning(
+                "Program %s: group %s queue full, slice %s dropped", program_id, entry.group_id, entry.zone_ids
+            )
+            self._entry_done(entry)
+        return run_id, accepted
+
+    def set_limits(self, max_parallel=None, flow_budget_lpm=None):
+        # type: (Optional[int], Optional[float]) -> None
+        """Change the concurrency / flow limits at runtime (settings reload)."""
+        if max_parallel is not None:
+            with self._run_cond:
+                self._max_parallel = max(0, int(max_parallel))
+                self._run_cond.notify_all()
+        if flow_budget_lpm is not None:
+            self._flow.set_capacity(flow_budget_lpm)
+
+    def _push(self, entry):
+        # type: (QueueEntry) -> bool
+        group_id = entry.group_id
         with self._global_lock:
             gq = self._queues.get(group_id)
             if gq is None:
@@ -174,7 +317,7 @@ class ProgramQueueManager:
                         self._telegram_notify(
                             "Очередь группы %d переполнена (макс %d)" % (group_id, self._max_queue_size)
                         )
-                return None
+                return False
 
             gq.queue.append(entry)
             gq.new_item_event.set()
@@ -191,7 +334,7 @@ class ProgramQueueManager:
                 gq.worker_thread = t
                 t.start()
 
-        return entry
+        return True
 
     def get_queue_state(self, group_id):
         # type: (int) -> dict
@@ -215,7 +358,7 @@ class ProgramQueueManager:
         float_paused = False
         if self._float_monitor:
             with contextlib.suppress(Exception):
-                float_paused = self._float_monitor.is_paused()
+                float_paused = self._float_monitor.is_paused(group_id)
 
         return {
             "group_id": group_id,
@@ -295,7 +438,7 @@ class ProgramQueueManager:
                     resume_ev = None
                     if self._float_monitor:
                         with contextlib.suppress(Exception):
-                            resume_ev = self._float_monitor.get_resume_event()
+                            resume_ev = self._float_monitor.get_resume_event(gq.group_id)
                     if resume_ev:
                         resume_ev.set()
                     return True
@@ -404,6 +547,7 @@ class ProgramQueueManager:
                     candidate = gq.queue[0]
                     if candidate.state == QueueEntryState.CANCELLED:
                         gq.queue.popleft()
+                        self._entry_done(candidate)
                         continue
                     break
 
@@ -437,10 +581,19 @@ class ProgramQueueManager:
                         extra={"effective_wait_sec": int(effective_wait)},
                     )
                     logger.info("Entry %s expired (waited %.0fs)", entry.entry_id, effective_wait)
+                    self._entry_done(entry)
                     continue
 
             # Check if cancelled while waiting
             if entry.state == QueueEntryState.CANCELLED:
+                self._entry_done(entry)
+                continue
+
+            # Global concurrency slot (stays WAITING while other groups run)
+            if not self._acquire_slot(entry, gq):
+                if entry.state == QueueEntryState.WAITING:
+                    entry.state = QueueEntryState.CANCELLED
+                self._entry_done(entry)
                 continue
 
             # Set as current and RUNNING
@@ -474,17 +627,50 @@ class ProgramQueueManager:
                         "program_run_completed", entry, extra={"final_state": "failed", "error": str(exc)[:256]}
                     )
             finally:
+                self._release_slot()
                 with gq.lock:
                     if gq.current is entry:
                         gq.current = None
+                self._entry_done(entry)
 
         # Shutdown/cancel path: mark remaining as cancelled
+        drained = []
         with gq.lock:
             while gq.queue:
                 e = gq.queue.popleft()
                 if e.state == QueueEntryState.WAITING:
                     e.state = QueueEntryState.CANCELLED
+                drained.append(e)
             gq.current = None
+        for e in drained:
+            self._entry_done(e)
+
+    def _acquire_slot(self, entry, gq):
+        # type: (QueueEntry, GroupQueue) -> bool
+        """Wait for a global running slot; False if cancelled/shut down meanwhile."""
+        with self._run_cond:
+            while self._max_parallel > 0 and self._running >= self._max_parallel:
+                if entry.cancel_event.is_set() or gq.cancel_event.is_set() or self._shutdown_event.is_set():
+                    return False
+                self._run_cond.wait(timeout=0.5)
+            self._running += 1
+            return True
+
+    def _release_slot(self):
+        # type: () -> None
+        with self._run_cond:
+            self._running = max(0, self._running - 1)
+            self._run_cond.notify()
+
+    def _entry_done(self, entry):
+        # type: (QueueEntry) -> None
+        """Report a terminal entry to the completion tracker (idempotent)."""
+        if self._tracker is None or not entry.program_run_id:
+            return
+        try:
+            self._tracker.entry_finished(entry.program_run_id, entry.entry_id)
+        except Exception:
+            logger.exception("completion tracker update failed for entry %s", entry.entry_id)
 
     def _run_entry(self, entry):
         # type: (QueueEntry) -> None
@@ -493,16 +679,13 @@ class ProgramQueueManager:
             if entry.cancel_event.is_set() or self._shutdown_event.is_set():
                 return
 
-            # K3: Float pause — worker waits for resume
+            # K3: Float pause — worker sleeps until resume, cancel or shutdown
             if self._float_monitor:
-                while self._float_monitor.is_paused():
-                    if entry.cancel_event.is_set() or self._shutdown_event.is_set():
-                        return
-                    resume_event = self._float_monitor.get_resume_event()
-                    # Wait on resume_event OR cancel_event
-                    # Poll with short timeout to check cancel
-                    entry.cancel_event.wait(timeout=0.5)
-                    if entry.cancel_event.is_set():
+                while self._float_monitor.is_paused(entry.group_id):
+                    resume_event = self._float_monitor.get_resume_event(entry.group_id)
+                    # cancel/shutdown listed first: they win over a simultaneous resume
+                    fired = wait_any([entry.cancel_event, self._shutdown_event, resume_event])
+                    if fired is not resume_event:
                         return
 
             # K5: get weather coefficient at zone start time
@@ -511,14 +694,25 @@ class ProgramQueueManager:
                 with contextlib.suppress(Exception):
                     coeff = self._get_weather_coefficient()
 
-            # TODO: actual zone control integration
-            # For now, entry completes immediately (mocked in tests)
             logger.debug(
                 "Running zone %d for entry %s (coeff=%d)",
                 zone_id,
                 entry.entry_id,
                 coeff,
             )
+            if self._zone_runner is None:
+                continue
+
+            demand = 0.0
+            if self._zone_demand:
+                with contextlib.suppress(Exception):
+                    demand = float(self._zone_demand(zone_id) or 0.0)
+            if not self._flow.acquire(demand, entry.cancel_event, self._shutdown_event):
+                return
+            try:
+                self._zone_runner(entry, zone_id, coeff)
+            finally:
+                self._flow.release(demand)
 
 
 # ------------------------------------------------------------------
@@ -534,6 +728,7 @@ class ProgramCompletionTracker:
 
     def __init__(self):
         self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
         # run_id -> {program_id, program_name, entry_ids: set, finished: set}
         self._runs = {}  # type: Dict[str, Dict]
 
@@ -561,9 +756,16 @@ class ProgramCompletionTracker:
 
             if all_done:
                 del self._runs[program_run_id]
+                self._done.notify_all()
 
             return all_done
 
+    def wait(self, program_run_id, timeout=None):
+        # type: (str, Optional[float]) -> bool
+        """Block until the run is complete. Returns False on timeout."""
+        with self._done:
+            return self._done.wait_for(lambda: program_run_id not in self._runs, timeout=timeout)
+
     def is_program_complete(self, program_run_id):
         # type: (str) -> bool
         """Check if a program run is complete (or unknown)."""
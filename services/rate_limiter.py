@@ -1,15 +1,171 @@
-"""IP-based login rate limiter (TASK-009).
+"""Rate limiting core + IP-based login rate limiter (TASK-009).
 
-Tracks failed login attempts per IP address and enforces lockout
-after too many failures within a sliding time window.
+:class:`SlidingWindowLimiter` is the single rate-limiting engine shared by
+the login lockout (:class:`LoginRateLimiter`, below) and the general API
+limiter (``services/api_rate_limiter.py``).
+
+Algorithm — sliding-window counter: each key keeps only the count of the
+current fixed window and the previous one. The sliding estimate is
+``prev * (1 - elapsed / window) + curr`` — O(1) time and fixed memory per
+key, instead of a list of raw timestamps rebuilt on every call.
+
+Concurrency — keys are spread over ``shards`` independent
+``OrderedDict`` + ``Lock`` pairs, so concurrent requests from different
+clients rarely contend. Each shard is an LRU: touched keys move to the end;
+idle keys (no hit for two windows, so their estimate is 0) are evicted
+lazily from the front, and a shard never holds more than
+``max_keys // shards`` keys.
+
+Throttled requests are counted in ``wb_rate_limited_total{limiter,group}``
+(``routes/health_api.py``).
 """
 
+import math
 import threading
 import time
+import zlib
+from collections import OrderedDict
 
 from constants import LOGIN_LOCKOUT_SEC, LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW_SEC
 
 
+class _Window:
+    """Per-key counter state: two integers and two timestamps."""
+
+    __slots__ = ("curr", "last_seen", "prev", "start", "window")
+
+    def __init__(self, now: float, window: float) -> None:
+        self.window = window
+        self.start = now - (now % window)
+        self.prev = 0
+        self.curr = 0
+        self.last_seen = now
+
+    def roll(self, now: float) -> None:
+        """Advance to the fixed window that contains *now*."""
+        elapsed = now - self.start
+        if elapsed < self.window:
+            return
+        if elapsed < 2 * self.window:
+            self.prev = self.curr
+        else:
+            self.prev = 0
+        self.curr = 0
+        self.start = now - (now % self.window)
+
+    def estimate(self, now: float) -> float:
+        weight = 1.0 - (now - self.start) / self.window
+        return self.prev * max(0.0, weight) + self.curr
+
+    def retry_after(self, now: float, limit: int) -> int:
+        """Seconds until one more hit fits under *limit* (assuming no further hits)."""
+        w = self.window
+        if self.curr >= limit and self.curr > 0:
+            # Must wait for the window to roll, then for curr (as prev) to decay.
+            wait = (self.start + w - now) + w * (1.0 - (limit - 1) / self.curr)
+        elif self.prev > 0:
+            wait = self.start + w * (1.0 - (limit - 1 - self.curr) / self.prev) - now
+        else:
+            wait = 0.0
+        return max(1, math.ceil(wait))
+
+
+class SlidingWindowLimiter:
+    """Thread-safe, memory-bounded, lock-sharded sliding-window counter."""
+
+    def __init__(self, name: str, shards: int = 16, max_keys: int = 16384) -> None:
+        """
+        Args:
+            name: Limiter label for metrics (``api`` / ``login``).
+            shards: Number of independent lock + LRU partitions.
+            max_keys: Upper bound on tracked keys across all shards.
+        """
+        self.name = name
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(max(1, shards))]
+        self._max_per_shard = max(1, max_keys // len(self._shards))
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(repr(key).encode("utf-8")) % len(self._shards)]
+
+    def _touch(self, entries: OrderedDict, key, window: float, now: float) -> _Window:
+        """Fetch-or-create *key*, mark it most recently used, evict idle/excess keys."""
+        win = entries.get(key)
+        if win is None or win.window != window:
+            win = _Window(now, window)
+            entries[key] = win
+        else:
+            entries.move_to_end(key)
+        win.last_seen = now
+        win.roll(now)
+        # Front of the OrderedDict = least recently used.
+        while len(entries) > self._max_per_shard:
+            entries.popitem(last=False)
+        for _ in range(2):
+            oldest_key = next(iter(entries))
+            oldest = entries[oldest_key]
+            if oldest is win or now - oldest.last_seen < 2 * oldest.window:
+                break
+            del entries[oldest_key]
+        return win
+
+    def hit(self, key, limit: int, window: float, now: float | None = None) -> tuple[bool, int]:
+        """Count one request for *key* unless it would exceed *limit* per *window*.
+
+        Rejected requests are not counted. Returns ``(allowed, retry_after_seconds)``.
+        """
+        now = time.time() if now is None else now
+        lock, entries = self._shard(key)
+        with lock:
+            win = self._touch(entries, key, window, now)
+            if win.estimate(now) + 1 > limit:
+                return False, win.retry_after(now, limit)
+            win.curr += 1
+            return True, 0
+
+    def add(self, key, window: float, now: float | None = None) -> float:
+        """Unconditionally count one event for *key*; return the new estimate."""
+        now = time.time() if now is None else now
+        lock, entries = self._shard(key)
+        with lock:
+            win = self._touch(entries, key, window, now)
+            win.curr += 1
+            return win.estimate(now)
+
+    def count(self, key, window: float, now: float | None = None) -> float:
+        """Current sliding estimate for *key* (0 if untracked). Does not count."""
+        now = time.time() if now is None else now
+        lock, entries = self._shard(key)
+        with lock:
+            win = entries.get(key)
+            if win is None or win.window != window:
+                return 0.0
+            win.roll(now)
+            return win.estimate(now)
+
+    def reset(self, key) -> None:
+        lock, entries = self._shard(key)
+        with lock:
+            entries.pop(key, None)
+
+    def clear(self) -> None:
+        for lock, entries in self._shards:
+            with lock:
+                entries.clear()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for _, entries in self._shards)
+
+
+def record_throttled(limiter: str, group: str) -> None:
+    """Increment ``wb_rate_limited_total``; never raises."""
+    try:
+        from routes.health_api import WB_RATE_LIMITED
+
+        WB_RATE_LIMITED.labels(limiter=limiter, group=group).inc()
+    except Exception:
+        pass
+
+
 class LoginRateLimiter:
     """Thread-safe IP-based rate limiter for login attempts."""
 
@@ -26,7 +182,7 @@ class LoginRateLimiter:
             lockout_sec: How long (seconds) to lock out an IP after exceeding max_attempts.
         """
         self._lock = threading.Lock()
-        self._attempts: dict[str, list[float]] = {}  # {ip: [timestamps of failures]}
+        self._failures = SlidingWindowLimiter("login", shards=4, max_keys=4096)
         self._lockouts: dict[str, float] = {}  # {ip: lockout_expiry_timestamp}
         self.max_attempts = max_attempts
         self.window_sec = window_sec
@@ -46,41 +202,32 @@ class LoginRateLimiter:
             lockout_expiry = self._lockouts.get(ip)
             if lockout_expiry is not None:
                 if now < lockout_expiry:
+                    record_throttled("login", "login")
                     return False, int(lockout_expiry - now) + 1
                 else:
                     # Lockout expired — clear it
                     del self._lockouts[ip]
-                    self._attempts.pop(ip, None)
+                    self._failures.reset(ip)
 
-            # Count recent failures within window
-            timestamps = self._attempts.get(ip, [])
-            cutoff = now - self.window_sec
-            recent = [ts for ts in timestamps if ts > cutoff]
-            self._attempts[ip] = recent
+        if self._failures.count(ip, self.window_sec, now) >= self.max_attempts:
+            with self._lock:
+                # Impose lockout; drop expired ones so the dict stays bounded.
+                for stale in [k for k, exp in self._lockouts.items() if exp <= now]:
+                    del self._lockouts[stale]
+                self._lockouts[ip] = now + self.lockout_sec
+            record_throttled("login", "login")
+            return False, self.lockout_sec
 
-            if len(recent) >= self.max_attempts:
-                # Impose lockout
-                expiry = now + self.lockout_sec
-                self._lockouts[ip] = expiry
-                return False, self.lockout_sec
-
-            return True, 0
+        return True, 0
 
     def record_failure(self, ip: str) -> None:
         """Record a failed login attempt for the given IP."""
-        now = time.time()
-        with self._lock:
-            if ip not in self._attempts:
-                self._attempts[ip] = []
-            self._attempts[ip].append(now)
-            # Prune old entries
-            cutoff = now - self.window_sec
-            self._attempts[ip] = [ts for ts in self._attempts[ip] if ts > cutoff]
+        self._failures.add(ip, self.window_sec)
 
     def reset(self, ip: str) -> None:
         """Reset failure count and lockout for the given IP (e.g., after successful login)."""
+        self._failures.reset(ip)
         with self._lock:
-            self._attempts.pop(ip, None)
             self._lockouts.pop(ip, None)
 
 
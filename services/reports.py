@@ -1,7 +1,17 @@
+import threading
 from datetime import datetime, timedelta
 from typing import Literal
 
 from database import db
+from services import clock
+
+# Сколько живёт готовый текст отчёта для рассылки подписок (секунды). «today»
+# меняется с каждым поливом — держим недолго; скользящие 7/30 дней почти не
+# меняются за час; «yesterday» неизменен до полуночи. Любая запись истекает в
+# полночь: границы периода сдвигаются.
+REPORT_CACHE_TTL_SEC = {"today": 15 * 60, "yesterday": 24 * 3600, "7": 3600, "30": 3600}
+_report_cache: dict[tuple[str, str], tuple[datetime, str]] = {}
+_report_cache_lock = threading.Lock()
 
 
 def _period_to_range(period: str) -> tuple:
@@ -37,3 +47,24 @@ def build_report_text(period: str = "today", fmt: Literal["brief", "full"] = "br
         for it in stats["zone_usage"]:
             lines.append(f"- {it['name']}: {round(it['liters'] or 0, 2)} л")
     return "\n".join(lines)
+
+
+def cached_report_text(period: str = "today", fmt: Literal["brief", "full"] = "brief") -> str:
+    """build_report_text, reused across dispatch runs while the period's data is fresh."""
+    now = clock.now()
+    key = (period, fmt)
+    with _report_cache_lock:
+        hit = _report_cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+    txt = build_report_text(period=period, fmt=fmt)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    expires = min(now + timedelta(seconds=REPORT_CACHE_TTL_SEC.get(period, 3600)), midnight)
+    with _report_cache_lock:
+        _report_cache[key] = (expires, txt)
+    return txt
+
+
+def reset_report_cache() -> None:
+    with _report_cache_lock:
+        _report_cache.clear()
@@ -31,6 +31,16 @@ def shutdown_all_zones_off(timeout_sec: float = 10, db=None) -> None:
             return
         _shutdown_done = True
 
+    # Multi-worker mode: zones belong to the leader; a follower exiting must not touch them
+    try:
+        from services.leader import is_leader
+
+        if not is_leader():
+            logger.info("Shutdown: follower worker, leaving zones to the leader")
+            return
+    except ImportError as e:
+        logger.debug("Shutdown: leader check skipped: %s", e)
+
     # ── imports (late, to avoid circular) ───────────────────────────
     try:
         if db is None:
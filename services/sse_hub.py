@@ -7,9 +7,12 @@ as function arguments so that circular imports are impossible.
 """
 
 import contextlib
+import glob
 import json
 import logging
+import os
 import queue
+import socket
 import sqlite3
 import threading
 import time
@@ -32,11 +35,22 @@ _SSE_HUB_CLIENTS: list = []  # list[queue.Queue]
 _SSE_HUB_MQTT: dict = {}  # sid → paho client
 _SSE_META_BUFFER: deque = deque(maxlen=100)
 _SSE_CLEANER_STARTED: bool = False
+# sid → {topic: [zone_id, ...]} / sid → {topic: [group_id, ...]}; swapped
+# wholesale by ensure_hub_started() and refresh_subscriptions().
+_ZONE_TOPICS: dict = {}
+_MV_TOPICS: dict = {}
 
 # Anti-restart: remember manual stops so we can ignore instant ON bounces
 _LAST_MANUAL_STOP: dict[int, float] = {}
 _LAST_STOP_LOCK: threading.Lock = threading.Lock()
 
+# Multi-worker relay (see start_relay): leader → followers over unix datagram sockets
+_RELAY_SOCK: socket.socket | None = None
+_RELAY_DIR: str | None = None
+_RELAY_PATH: str | None = None
+_RELAY_FOLLOWER: bool = False
+_RELAY_MAX_DATAGRAM = 64 * 1024
+
 # Injected dependencies (set via init())
 _db = None  # database instance
 _mqtt = None  # paho.mqtt.client module
@@ -77,6 +91,11 @@ def broadcast(data_json: str) -> None:
 
     Clients whose queues are full are considered dead and removed.
     """
+    _deliver_local(data_json)
+    _relay_to_peers(data_json)
+
+
+def _deliver_local(data_json: str) -> None:
     dead: list = []
     try:
         with _SSE_HUB_LOCK:
@@ -94,6 +113,106 @@ def broadcast(data_json: str) -> None:
         logger.info("Removed %d dead SSE clients (queue full)", len(dead))
 
 
+# ---------------------------------------------------------------------------
+# Multi-worker relay
+# ---------------------------------------------------------------------------
+
+
+def start_relay(relay_dir: str, follower: bool = True) -> str:
+    """Bind this worker's relay socket (``<relay_dir>/<pid>.sock``).
+
+    In multi-worker mode only the leader runs the MQTT side of the hub (it
+    updates zone state in the DB and arms stop timers, which must happen once).
+    Everything the leader pushes to its own SSE clients is also sent to every
+    peer socket; followers feed what they receive to their local clients and
+    never connect the hub to MQTT themselves.
+    """
+    global _RELAY_SOCK, _RELAY_DIR, _RELAY_PATH, _RELAY_FOLLOWER
+    _RELAY_FOLLOWER = bool(follower)
+    if _RELAY_SOCK is not None:
+        return _RELAY_PATH or ""
+    os.makedirs(relay_dir, exist_ok=True)
+    path = os.path.join(relay_dir, f"{os.getpid()}.sock")
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    _RELAY_SOCK, _RELAY_DIR, _RELAY_PATH = sock, relay_dir, path
+    threading.Thread(target=_relay_recv_loop, args=(sock,), daemon=True, name="sse-relay").start()
+    logger.info("SSE relay bound at %s (%s)", path, "follower" if follower else "leader")
+    return path
+
+
+def set_relay_leader() -> None:
+    """This worker was elected: relay to peers and run the MQTT side of the hub."""
+    global _RELAY_FOLLOWER
+    _RELAY_FOLLOWER = False
+
+
+def set_relay_follower() -> None:
+    """This worker was demoted: stop relaying and disconnect the MQTT side of the hub.
+
+    The new leader's hub takes over; local SSE clients keep receiving its
+    broadcasts through the relay socket.
+    """
+    global _RELAY_FOLLOWER, _SSE_HUB_STARTED
+    with _SSE_HUB_LOCK:
+        _RELAY_FOLLOWER = True
+        clients = list(_SSE_HUB_MQTT.values())
+        _SSE_HUB_MQTT.clear()
+        _SSE_HUB_STARTED = False
+    for client in clients:
+        try:
+            client.loop_stop()
+            client.disconnect()
+        except (ConnectionError, TimeoutError, OSError) as e:
+            logger.debug("SSE hub MQTT client stop failed: %s", e)
+    if clients:
+        logger.info("SSE hub MQTT side stopped (%d clients)", len(clients))
+
+
+def stop_relay() -> None:
+    global _RELAY_SOCK, _RELAY_PATH
+    sock, path = _RELAY_SOCK, _RELAY_PATH
+    _RELAY_SOCK = _RELAY_PATH = None
+    if sock is not None:
+        with contextlib.suppress(OSError):
+            sock.close()
+    if path:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+def _relay_recv_loop(sock: socket.socket) -> None:
+    while True:
+        try:
+            data = sock.recv(_RELAY_MAX_DATAGRAM)
+        except OSError as e:
+            logger.debug("SSE relay receive stopped: %s", e)
+            return
+        if data:
+            _deliver_local(data.decode("utf-8", errors="replace"))
+
+
+def _relay_to_peers(data_json: str) -> None:
+    sock, own = _RELAY_SOCK, _RELAY_PATH
+    if sock is None or _RELAY_FOLLOWER or not _RELAY_DIR:
+        return
+    payload = data_json.encode("utf-8")
+    for peer in glob.glob(os.path.join(_RELAY_DIR, "*.sock")):
+        if peer == own:
+            continue
+        try:
+            # неблокирующая отправка: медленный ведомый не задерживает лидера
+            sock.sendto(payload, socket.MSG_DONTWAIT, peer)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # процесс-владелец сокета умер — убираем файл
+            with contextlib.suppress(OSError):
+                os.unlink(peer)
+        except OSError as e:
+            logger.debug("SSE relay send to %s failed: %s", peer, e)
+
+
 def mark_zone_stopped(zone_id: int) -> None:
     """Record a manual stop timestamp for anti-restart window."""
     try:
@@ -150,9 +269,9 @@ def _rebuild_subscriptions():
 
 def ensure_hub_started() -> None:
     """Idempotently start MQTT subscriptions that fan-out to SSE clients."""
-    global _SSE_HUB_STARTED, _SSE_HUB_CLIENTS, _SSE_HUB_MQTT, _SSE_META_BUFFER
+    global _SSE_HUB_STARTED, _SSE_HUB_CLIENTS, _SSE_HUB_MQTT, _SSE_META_BUFFER, _ZONE_TOPICS, _MV_TOPICS
 
-    if _mqtt is None:
+    if _mqtt is None or _RELAY_FOLLOWER:
         return
 
     # Skip real MQTT connections in tests
@@ -164,240 +283,298 @@ def ensure_hub_started() -> None:
     with _SSE_HUB_LOCK:
         if _SSE_HUB_STARTED:
             return
-        zone_topics, mv_topics = _rebuild_subscriptions()
-        for sid, topics in zone_topics.items():
-            server = _db.get_mqtt_server(int(sid))
-            if not server:
-                continue
+        _ZONE_TOPICS, _MV_TOPICS = _rebuild_subscriptions()
+        for sid in _ZONE_TOPICS:
+            client = _start_server_client(int(sid))
+            if client is not None:
+                _SSE_HUB_MQTT[int(sid)] = client
+        _SSE_HUB_STARTED = True
+
+
+def _start_server_client(sid: int):
+    """Connect a paho client to MQTT server *sid* and subscribe its zone/mv topics.
+
+    Topic → zone/group maps are read from the module-level ``_ZONE_TOPICS`` /
+    ``_MV_TOPICS`` at message time, so :func:`refresh_subscriptions` can swap
+    them without restarting the client.
+    """
+    topics = _ZONE_TOPICS.get(int(sid), {})
+    server = _db.get_mqtt_server(int(sid))
+    if not server:
+        return None
+    try:
+        client = _mqtt.Client(_mqtt.CallbackAPIVersion.VERSION2, client_id=(server.get("client_id") or None))
+        if server.get("username"):
+            client.username_pw_set(server.get("username"), server.get("password") or None)
+
+        def _on_message(cl, userdata, msg, sid_local=int(sid)):
+            t = str(getattr(msg, "topic", "") or "")
+            if not t.startswith("/"):
+                t = "/" + t
             try:
-                client = _mqtt.Client(_mqtt.CallbackAPIVersion.VERSION2, client_id=(server.get("client_id") or None))
-                if server.get("username"):
-                    client.username_pw_set(server.get("username"), server.get("password") or None)
-
-                def _on_message(cl, userdata, msg, sid_local=int(sid)):
-                    t = str(getattr(msg, "topic", "") or "")
-                    if not t.startswith("/"):
-                        t = "/" + t
+                payload = msg.payload.decode("utf-8", errors="ignore").strip()
+            except (ValueError, TypeError, KeyError) as e:
+                logger.debug("Exception in _on_message: %s", e)
+                payload = str(msg.payload)
+
+            # Meta topic → buffer only
+            if t.endswith("/meta"):
+                try:
+                    _SSE_META_BUFFER.append(
+                        {
+                            "topic": t,
+                            "payload": payload,
+                            "ts": datetime.now().strftime("%H:%M:%S"),
+                        }
+                    )
+                except (ValueError, TypeError, KeyError) as e:
+                    logger.debug("Handled exception in _on_message: %s", e)
+                return
+
+            zone_ids = _ZONE_TOPICS.get(sid_local, {}).get(t) or []
+            mv_group_ids = _MV_TOPICS.get(sid_local, {}).get(t) or []
+
+            # Master-valve event
+            if mv_group_ids:
+                mv_state = "open" if payload in ("1", "true", "ON", "on") else "closed"
+                for gid in mv_group_ids:
                     try:
-                        payload = msg.payload.decode("utf-8", errors="ignore").strip()
-                    except (ValueError, TypeError, KeyError) as e:
-                        logger.debug("Exception in _on_message: %s", e)
-                        payload = str(msg.payload)
+                        _db.update_group_fields(int(gid), {"master_valve_observed": mv_state})
+                    except (sqlite3.Error, OSError) as e:
+                        logger.debug("Handled exception in line_184: %s", e)
+                    data_mv = json.dumps({"mv_group_id": int(gid), "mv_state": mv_state})
+                    with _SSE_HUB_LOCK:
+                        for q in list(_SSE_HUB_CLIENTS):
+                            try:
+                                q.put_nowait(data_mv)
+                            except queue.Full as e:
+                                logger.debug("Handled exception in line_191: %s", e)
+                    _relay_to_peers(data_mv)
+                return
 
-                    # Meta topic → buffer only
-                    if t.endswith("/meta"):
-                        try:
-                            _SSE_META_BUFFER.append(
-                                {
-                                    "topic": t,
-                                    "payload": payload,
-                                    "ts": datetime.now().strftime("%H:%M:%S"),
-                                }
-                            )
-                        except (ValueError, TypeError, KeyError) as e:
-                            logger.debug("Handled exception in _on_message: %s", e)
-                        return
+            new_state = "on" if payload in ("1", "true", "ON", "on") else "off"
 
-                    zone_ids = zone_topics.get(sid_local, {}).get(t) or []
-                    mv_group_ids = mv_topics.get(sid_local, {}).get(t) or []
+            # Emergency stop override
+            if _app_config.get("EMERGENCY_STOP") and new_state == "on":
+                new_state = "off"
+                try:
+                    srv = _db.get_mqtt_server(int(sid_local))
+                    if srv:
+                        _publish_mqtt_value_fn(srv, t, "0")
+                except (ConnectionError, TimeoutError, OSError) as e:
+                    logger.debug("Handled exception in line_204: %s", e)
 
-                    # Master-valve event
-                    if mv_group_ids:
-                        mv_state = "open" if payload in ("1", "true", "ON", "on") else "closed"
-                        for gid in mv_group_ids:
-                            try:
-                                _db.update_group_fields(int(gid), {"master_valve_observed": mv_state})
-                            except (sqlite3.Error, OSError) as e:
-                                logger.debug("Handled exception in line_184: %s", e)
-                            data_mv = json.dumps({"mv_group_id": int(gid), "mv_state": mv_state})
-                            with _SSE_HUB_LOCK:
-                                for q in list(_SSE_HUB_CLIENTS):
-                                    try:
-                                        q.put_nowait(data_mv)
-                                    except queue.Full as e:
-                                        logger.debug("Handled exception in line_191: %s", e)
-                        return
-
-                    new_state = "on" if payload in ("1", "true", "ON", "on") else "off"
-
-                    # Emergency stop override
-                    if _app_config.get("EMERGENCY_STOP") and new_state == "on":
+            # Anti-restart window
+            try:
+                for zid in list(zone_ids):
+                    if new_state == "on" and recently_stopped(int(zid), window_sec=5):
                         new_state = "off"
                         try:
-                            srv = _db.get_mqtt_server(int(sid_local))
-                            if srv:
-                                _publish_mqtt_value_fn(srv, t, "0")
+                            srv2 = _db.get_mqtt_server(int(sid_local))
+                            if srv2:
+                                _publish_mqtt_value_fn(srv2, t, "0")
                         except (ConnectionError, TimeoutError, OSError) as e:
-                            logger.debug("Handled exception in line_204: %s", e)
+                            logger.debug("Handled exception in line_216: %s", e)
+            except (ConnectionError, TimeoutError, OSError) as e:
+                logger.debug("Handled exception in line_218: %s", e)
 
-                    # Anti-restart window
-                    try:
-                        for zid in list(zone_ids):
-                            if new_state == "on" and recently_stopped(int(zid), window_sec=5):
-                                new_state = "off"
-                                try:
-                                    srv2 = _db.get_mqtt_server(int(sid_local))
-                                    if srv2:
-                                        _publish_mqtt_value_fn(srv2, t, "0")
-                                except (ConnectionError, TimeoutError, OSError) as e:
-                                    logger.debug("Handled exception in line_216: %s", e)
-                    except (ConnectionError, TimeoutError, OSError) as e:
-                        logger.debug("Handled exception in line_218: %s", e)
-
-                    # DB + scheduler update
-                    for zid in zone_ids:
+            # DB + scheduler update
+            for zid in zone_ids:
+                try:
+                    z = _db.get_zone(int(zid)) or {}
+                    updates = {"state": new_state}
+                    if new_state == "on":
+                        # Real relay-on echo — flag the open run as
+                        # physically confirmed so finish_zone_run records
+                        # a genuine watering, not a phantom 'ok'.
                         try:
-                            z = _db.get_zone(int(zid)) or {}
-                            updates = {"state": new_state}
-                            if new_state == "on":
-                                # Real relay-on echo — flag the open run as
-                                # physically confirmed so finish_zone_run records
-                                # a genuine watering, not a phantom 'ok'.
-                                try:
-                                    _db.mark_zone_run_confirmed(int(zid))
-                                except (sqlite3.Error, OSError) as e:
-                                    logger.debug("mark_zone_run_confirmed zid=%s: %s", zid, e)
-                                if not z.get("watering_start_time"):
-                                    updates["watering_start_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    updates["watering_start_source"] = "remote"
-                                try:
-                                    sched = _get_scheduler_fn()
-                                    if sched:
-                                        dur = int(z.get("duration") or 0)
-                                        if dur > 0:
-                                            sched.cancel_zone_jobs(int(zid))
-                                            sched.schedule_zone_stop(int(zid), dur, command_id=str(int(time.time())))
-                                except (ValueError, TypeError, KeyError) as e:
-                                    logger.debug("Handled exception in line_238: %s", e)
-                            else:
-                                # last_watering_time is no longer a column —
-                                # we close the open zone_run here so the
-                                # MQTT-observed off (e.g. someone hit the
-                                # physical valve, or a retained '0' arrived)
-                                # is reflected in get_last_watering_time().
-                                # Gate on watering_start_time so an
-                                # idempotent off->off transition doesn't
-                                # try to find/close a non-existent open run.
-                                if z.get("watering_start_time"):
-                                    try:
-                                        run = _db.get_open_zone_run(int(zid))
-                                        if run:
-                                            _db.finish_zone_run(
-                                                int(run["id"]),
-                                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                                time.monotonic(),
-                                                None,
-                                                None,
-                                                None,
-                                                status="ok",
-                                            )
-                                    except (sqlite3.Error, OSError):
-                                        logger.exception(
-                                            "sse_hub: finish_zone_run on observed off failed zid=%s",
-                                            zid,
-                                        )
-                                updates["watering_start_time"] = None
-                                try:
-                                    sched = _get_scheduler_fn()
-                                    if sched:
-                                        sched.cancel_zone_jobs(int(zid))
-                                except (ValueError, TypeError, KeyError) as e:
-                                    logger.debug("Handled exception in line_248: %s", e)
-                            try:
-                                updates2 = updates.copy()
-                            except (TypeError, AttributeError) as e:
-                                logger.debug("Exception in line_252: %s", e)
-                                updates2 = dict(updates)
-                            updates2["observed_state"] = new_state
-                            # Externally-driven state change (MQTT observation
-                            # of the relay coming on/off) — CRITICAL audit
-                            # path because this can flip a zone to 'on' even
-                            # when the app didn't command it (manual valve
-                            # actuation, retained MQTT message, etc.).
-                            # Without zone_state_change here, post-incident
-                            # triage can't tell "did the system start the
-                            # zone or did the relay flip externally?"
+                            _db.mark_zone_run_confirmed(int(zid))
+                        except (sqlite3.Error, OSError) as e:
+                            logger.debug("mark_zone_run_confirmed zid=%s: %s", zid, e)
+                        if not z.get("watering_start_time"):
+                            updates["watering_start_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                            updates["watering_start_source"] = "remote"
+                        try:
+                            sched = _get_scheduler_fn()
+                            if sched:
+                                dur = int(z.get("duration") or 0)
+                                if dur > 0:
+                                    sched.cancel_zone_jobs(int(zid))
+                                    sched.schedule_zone_stop(int(zid), dur, command_id=str(int(time.time())))
+                        except (ValueError, TypeError, KeyError) as e:
+                            logger.debug("Handled exception in line_238: %s", e)
+                    else:
+                        # last_watering_time is no longer a column —
+                        # we close the open zone_run here so the
+                        # MQTT-observed off (e.g. someone hit the
+                        # physical valve, or a retained '0' arrived)
+                        # is reflected in get_last_watering_time().
+                        # Gate on watering_start_time so an
+                        # idempotent off->off transition doesn't
+                        # try to find/close a non-existent open run.
+                        if z.get("watering_start_time"):
                             try:
-                                from services.zones_state import update_zone_state as _uzs
-
-                                # Pass _db explicitly so the audited write goes
-                                # to the same instance whose state we just observed.
-                                _uzs(int(zid), updates2, audit_reason="mqtt_observed_change", db=_db)
-                            except (sqlite3.Error, OSError, ImportError):
+                                run = _db.get_open_zone_run(int(zid))
+                                if run:
+                                    _db.finish_zone_run(
+                                        int(run["id"]),
+                                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                        time.monotonic(),
+                                        None,
+                                        None,
+                                        None,
+                                        status="ok",
+                                    )
+                            except (sqlite3.Error, OSError):
                                 logger.exception(
-                                    "sse_hub: audited mqtt_observed_change failed zone=%s — doing raw update_zone",
+                                    "sse_hub: finish_zone_run on observed off failed zid=%s",
                                     zid,
                                 )
-                                _db.update_zone(int(zid), updates2)
-                        except (sqlite3.Error, OSError) as e:
-                            logger.debug("Handled exception in line_257: %s", e)
-
-                        data = json.dumps(
-                            {
-                                "zone_id": int(zid),
-                                "topic": t,
-                                "payload": payload,
-                                "state": new_state,
-                            }
-                        )
-                        # Fan-out to all SSE subscribers
-                        with _SSE_HUB_LOCK:
-                            for q in list(_SSE_HUB_CLIENTS):
-                                try:
-                                    q.put_nowait(data)
-                                except queue.Full as e:
-                                    logger.debug("Handled exception in line_271: %s", e)
-
-                client.on_message = _on_message
-
-                # Re-subscribe on every (re)connect. Without this, a dropped
-                # MQTT link silently loses the zone/mv subscriptions: paho
-                # auto-reconnects but a clean session starts with no subs, so
-                # the hub stops seeing relay echoes — observed_state stops
-                # updating and runs never get confirmed (history then records
-                # real waterings as 'failed'). Mirrors float_monitor's
-                # _on_mqtt_connect. Bound topic lists via defaults so the
-                # closure isn't affected by the outer per-server loop.
-                _zone_topics = list(topics)
-                _mv_topics_list = list(mv_topics.get(int(sid), {}))
-
-                def _on_connect(cl, userdata, flags, reason_code, properties=None, _zt=_zone_topics, _mv=_mv_topics_list, _sid=int(sid)):
-                    try:
-                        for _t in _zt:
-                            cl.subscribe(_t, qos=1)
-                        for _t in _mv:
-                            cl.subscribe(_t, qos=1)
-                        logger.info(
-                            "sse_hub: (re)subscribed %d zone + %d mv topics on connect (sid=%s)",
-                            len(_zt), len(_mv), _sid,
-                        )
-                    except (ConnectionError, TimeoutError, OSError):
-                        logger.exception("sse_hub: resubscribe on connect failed sid=%s", _sid)
-
-                client.on_connect = _on_connect
-                try:
-                    client.reconnect_delay_set(min_delay=1, max_delay=30)
-                except (ValueError, AttributeError, OSError) as e:
-                    logger.debug("sse_hub reconnect_delay_set failed: %s", e)
-                client.connect(server.get("host") or "127.0.0.1", int(server.get("port") or 1883), 5)
-                # Initial subscribe (on_connect also re-subscribes on reconnect)
-                for t in topics:
+                        updates["watering_start_time"] = None
+                        try:
+                            sched = _get_scheduler_fn()
+                            if sched:
+                                sched.cancel_zone_jobs(int(zid))
+                        except (ValueError, TypeError, KeyError) as e:
+                            logger.debug("Handled exception in line_248: %s", e)
                     try:
-                        client.subscribe(t, qos=1)
-                    except (ConnectionError, TimeoutError, OSError) as e:
-                        logger.debug("Handled exception in line_281: %s", e)
-                # Subscribe to master-valve topics for this server
-                for t_mv in mv_topics.get(int(sid), {}):
+                        updates2 = updates.copy()
+                    except (TypeError, AttributeError) as e:
+                        logger.debug("Exception in line_252: %s", e)
+                        updates2 = dict(updates)
+                    updates2["observed_state"] = new_state
+                    # Externally-driven state change (MQTT observation
+                    # of the relay coming on/off) — CRITICAL audit
+                    # path because this can flip a zone to 'on' even
+                    # when the app didn't command it (manual valve
+                    # actuation, retained MQTT message, etc.).
+                    # Without zone_state_change here, post-incident
+                    # triage can't tell "did the system start the
+                    # zone or did the relay flip externally?"
                     try:
-                        client.subscribe(t_mv, qos=1)
-                    except (ConnectionError, TimeoutError, OSError) as e:
-                        logger.debug("Handled exception in line_287: %s", e)
-                client.loop_start()
-                _SSE_HUB_MQTT[int(sid)] = client
+                        from services.zones_state import update_zone_state as _uzs
+
+                        # Pass _db explicitly so the audited write goes
+                        # to the same instance whose state we just observed.
+                        _uzs(int(zid), updates2, audit_reason="mqtt_observed_change", db=_db)
+                    except (sqlite3.Error, OSError, ImportError):
+                        logger.exception(
+                            "sse_hub: audited mqtt_observed_change failed zone=%s — doing raw update_zone",
+                            zid,
+                        )
+                        _db.update_zone(int(zid), updates2)
+                except (sqlite3.Error, OSError) as e:
+                    logger.debug("Handled exception in line_257: %s", e)
+
+                data = json.dumps(
+                    {
+                        "zone_id": int(zid),
+                        "topic": t,
+                        "payload": payload,
+                        "state": new_state,
+                    }
+                )
+                # Fan-out to all SSE subscribers
+                with _SSE_HUB_LOCK:
+                    for q in list(_SSE_HUB_CLIENTS):
+                        try:
+                            q.put_nowait(data)
+                        except queue.Full as e:
+                            logger.debug("Handled exception in line_271: %s", e)
+                _relay_to_peers(data)
+
+        client.on_message = _on_message
+
+        # Re-subscribe on every (re)connect. Without this, a dropped
+        # MQTT link silently loses the zone/mv subscriptions: paho
+        # auto-reconnects but a clean session starts with no subs, so
+        # the hub stops seeing relay echoes — observed_state stops
+        # updating and runs never get confirmed (history then records
+        # real waterings as 'failed'). Mirrors float_monitor's
+        # _on_mqtt_connect. Topic lists are read from the module-level
+        # maps on every connect, so refresh_subscriptions() changes
+        # survive a reconnect.
+        def _on_connect(cl, userdata, flags, reason_code, properties=None, _sid=int(sid)):
+            _zt = list(_ZONE_TOPICS.get(_sid, {}))
+            _mv = list(_MV_TOPICS.get(_sid, {}))
+            try:
+                for _t in _zt:
+                    cl.subscribe(_t, qos=1)
+                for _t in _mv:
+                    cl.subscribe(_t, qos=1)
+                logger.info(
+                    "sse_hub: (re)subscribed %d zone + %d mv topics on connect (sid=%s)",
+                    len(_zt), len(_mv), _sid,
+                )
+            except (ConnectionError, TimeoutError, OSError):
+                logger.exception("sse_hub: resubscribe on connect failed sid=%s", _sid)
+
+        client.on_connect = _on_connect
+        try:
+            client.reconnect_delay_set(min_delay=1, max_delay=30)
+        except (ValueError, AttributeError, OSError) as e:
+            logger.debug("sse_hub reconnect_delay_set failed: %s", e)
+        client.connect(server.get("host") or "127.0.0.1", int(server.get("port") or 1883), 5)
+        # Initial subscribe (on_connect also re-subscribes on reconnect)
+        for t in topics:
+            try:
+                client.subscribe(t, qos=1)
             except (ConnectionError, TimeoutError, OSError) as e:
-                logger.warning("SSE hub MQTT client setup failed for server %s: %s", sid, e)
-                continue
-        _SSE_HUB_STARTED = True
+                logger.debug("Handled exception in line_281: %s", e)
+        # Subscribe to master-valve topics for this server
+        for t_mv in _MV_TOPICS.get(int(sid), {}):
+            try:
+                client.subscribe(t_mv, qos=1)
+            except (ConnectionError, TimeoutError, OSError) as e:
+                logger.debug("Handled exception in line_287: %s", e)
+        client.loop_start()
+        return client
+    except (ConnectionError, TimeoutError, OSError) as e:
+        logger.warning("SSE hub MQTT client setup failed for server %s: %s", sid, e)
+        return None
+
+
+def refresh_subscriptions() -> dict:
+    """Re-read zone/master-valve topics and diff the live MQTT subscriptions.
+
+    Meant to be called once after a batch of zone changes (bulk import)
+    rather than per zone: topics that appeared are subscribed, topics that
+    vanished are unsubscribed, and a client is started for any MQTT server
+    that had no subscribed topics before. No-op until the hub has started.
+
+    Returns ``{"subscribed": n, "unsubscribed": m}``.
+    """
+    global _ZONE_TOPICS, _MV_TOPICS
+    stats = {"subscribed": 0, "unsubscribed": 0}
+    if _db is None:
+        return stats
+    zone_topics, mv_topics = _rebuild_subscriptions()
+    with _SSE_HUB_LOCK:
+        old_zone, old_mv = _ZONE_TOPICS, _MV_TOPICS
+        _ZONE_TOPICS, _MV_TOPICS = zone_topics, mv_topics
+        if not _SSE_HUB_STARTED:
+            return stats
+        clients = dict(_SSE_HUB_MQTT)
+        live = _mqtt is not None and not (_app_config and _app_config.get("TESTING"))
+        for sid in zone_topics:
+            if int(sid) not in clients and live:
+                client = _start_server_client(int(sid))
+                if client is not None:
+                    _SSE_HUB_MQTT[int(sid)] = client
+                    stats["subscribed"] += len(zone_topics[sid]) + len(mv_topics.get(sid, {}))
+    for sid, client in clients.items():
+        before = set(old_zone.get(sid, {})) | set(old_mv.get(sid, {}))
+        after = set(zone_topics.get(sid, {})) | set(mv_topics.get(sid, {}))
+        try:
+            for t in sorted(after - before):
+                client.subscribe(t, qos=1)
+                stats["subscribed"] += 1
+            for t in sorted(before - after):
+                client.unsubscribe(t)
+                stats["unsubscribed"] += 1
+        except (ConnectionError, TimeoutError, OSError) as e:
+            logger.warning("sse_hub: refresh subscriptions failed sid=%s: %s", sid, e)
+    return stats
 
 
 def _ensure_cleaner_started() -> None:
@@ -0,0 +1,92 @@
+"""Startup timeline: where the time between process start and readiness goes.
+
+``app.py`` imports this module first, so the ``imports`` phase covers
+interpreter start-up plus the import of every blueprint and service. The
+remaining phases (migrations, scheduler load, boot sync, monitor start, ...)
+are recorded with :func:`phase` around the matching steps of
+``services.app_init``; :func:`mark_ready` closes the timeline once the app
+reports READY. :func:`report` is exposed on ``/api/health-details``.
+
+Offsets are measured from the process start as reported by ``/proc`` (so
+they line up with ``systemctl start`` → ``/readyz`` OK); elsewhere the
+import of this module is the zero point.
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def _seconds_since_process_start() -> float:
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            # поле 22 (starttime) идёт после "(comm)", где могут быть пробелы
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError) as e:
+        logger.debug("process start time unavailable: %s", e)
+        return 0.0
+
+
+_T0 = time.monotonic() - _seconds_since_process_start()
+_LOCK = threading.Lock()
+_PHASES: list[dict] = []
+_READY_AT: float | None = None
+
+
+def _record(name: str, started: float, ended: float) -> None:
+    with _LOCK:
+        _PHASES.append(
+            {
+                "name": name,
+                "start_ms": round((started - _T0) * 1000, 1),
+                "duration_ms": round((ended - started) * 1000, 1),
+            }
+        )
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as one timeline phase (also on error)."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        _record(name, started, time.monotonic())
+
+
+def mark(name: str, started: float | None = None) -> None:
+    """Record a phase that ends now; ``started`` defaults to process start."""
+    _record(name, _T0 if started is None else started, time.monotonic())
+
+
+def mark_ready() -> None:
+    global _READY_AT
+    with _LOCK:
+        if _READY_AT is None:
+            _READY_AT = time.monotonic()
+    logger.info("Startup complete in %.0f ms", (_READY_AT - _T0) * 1000)
+
+
+def report() -> dict:
+    with _LOCK:
+        return {
+            "phases": [dict(p) for p in _PHASES],
+            "ready_ms": round((_READY_AT - _T0) * 1000, 1) if _READY_AT is not None else None,
+            "uptime_s": round(time.monotonic() - _T0, 1),
+        }
+
+
+def reset() -> None:
+    """Forget recorded phases (tests)."""
+    global _READY_AT
+    with _LOCK:
+        _PHASES.clear()
+        _READY_AT = None
@@ -0,0 +1,499 @@
+"""Static asset pipeline: per-page bundles, content hashing, precompression.
+
+Build step (run once per deploy, see update_server.sh / install_wb.sh)::
+
+    python -m services.static_assets build
+
+What it does:
+
+1. Concatenates the source files of every bundle in :data:`BUNDLES`
+   (``static/js``, ``static/css``, ``static/vendor``) in declaration order.
+2. Minifies them with a conservative, dependency-free pass: comments,
+   indentation and blank lines are dropped, but newlines are kept so JS
+   automatic semicolon insertion behaves exactly as in the source. Files
+   already named ``*.min.js`` / ``*.min.css`` are passed through verbatim.
+3. Writes ``static/dist/<name>.<sha256[:10]>.<ext>`` plus precompressed
+   ``.gz`` (always) and ``.br`` (when the optional ``brotli`` package is
+   installed) siblings.
+4. Writes ``static/dist/manifest.json`` mapping logical bundle names to
+   hashed files. Files from the previous build are kept one generation so
+   pages that an open tab or the service worker still references resolve.
+
+Runtime side:
+
+- :func:`bundle_urls` / :func:`asset_url` are exposed to Jinja via the
+  ``app.py`` context processor as ``bundle()`` / ``asset()``. With a
+  manifest present they return the hashed URLs; without one (dev checkout,
+  tests) they fall back to the individual source files with ``?v=<version>``,
+  so templates work identically in both modes.
+- ``routes/files.py`` serves ``/static/dist/*`` with ``Accept-Encoding``
+  negotiation (:func:`negotiate_encoding`) and
+  ``Cache-Control: public, max-age=31536000, immutable``. Hashed names never
+  change content, so browsers never revalidate — which also sidesteps the
+  hypercorn 304 bug that ``_strip_conditional_revalidation`` works around.
+- ``/sw.js`` precaches :func:`precache_urls`.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Repo root is the parent of the ``services`` package directory.
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+STATIC_ROOT: Path = REPO_ROOT / "static"
+DIST_DIRNAME: str = "dist"
+MANIFEST_NAME: str = "manifest.json"
+
+# Hashed bundles never change content — cache for a year, never revalidate.
+IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+
+# Logical bundle name → ordered source files (relative to ``static/``).
+# ``base.js`` is loaded synchronously (app.js installs the CSRF fetch
+# interceptor before any inline page script runs); everything else from
+# base.html was already ``defer`` and keeps that order in ``base-deferred.js``.
+BUNDLES: dict[str, list[str]] = {
+    "base.css": ["css/base.css", "css/history.css"],
+    "base.js": ["js/app.js"],
+    "base-deferred.js": [
+        "js/audit.js",
+        "vendor/chart.umd.min.js",
+        "js/history.js",
+        "js/system_health.js",
+    ],
+    "status.css": ["css/status.css"],
+    "status.js": ["js/status.js"],
+    "zones.css": ["css/zones.css"],
+    "zones.js": ["js/zones.js"],
+    "programs.css": ["css/programs.css"],
+    "logs.css": ["css/logs.css"],
+    "mqtt.css": ["css/mqtt.css"],
+    "settings.css": ["css/settings.css"],
+}
+
+# Module-level manifest cache. ``None`` means "not yet loaded";
+# an empty dict means "loaded, no manifest on disk".
+_MANIFEST: dict | None = None
+
+
+# ── Minification ────────────────────────────────────────────────────────────
+
+# Characters after which a ``/`` starts a regex literal rather than a division
+# (JSMin's rule set plus the remaining binary operators).
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = frozenset(
+    ("return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await")
+)
+_IDENT_RE = re.compile(r"[A-Za-z0-9_$]")
+
+
+def minify_js(src: str) -> str:
+    """Strip comments, indentation and blank lines from JavaScript.
+
+    A small state machine that understands string, template-literal (with
+    nested ``${...}``) and regex-literal syntax, so comment markers inside
+    them are left alone. Newlines are preserved (collapsed to one) to keep
+    ASI semantics; template-literal bodies are copied byte-for-byte.
+    ``/*! ... */`` licence comments are kept.
+    """
+    out: list[str] = []
+    i, n = 0, len(src)
+    # One entry per open ``${`` — brace depth inside that expression.
+    tpl_stack: list[int] = []
+    last_sig = ""  # last non-whitespace char emitted in code mode
+    last_word = ""  # identifier/keyword immediately before last_sig
+    at_line_start = True
+
+    def _emit(s: str) -> None:
+        nonlocal last_sig, last_word, at_line_start
+        out.append(s)
+        at_line_start = False
+        stripped = s.rstrip()
+        if stripped:
+            last_sig = stripped[-1]
+            m = re.search(r"[A-Za-z0-9_$]+$", stripped)
+            last_word = m.group(0) if m else ""
+
+    def _newline() -> None:
+        nonlocal at_line_start
+        while out and out[-1] in (" ", "\t"):
+            out.pop()
+        if out and out[-1] != "\n":
+            out.append("\n")
+        at_line_start = True
+
+    def _copy_template(j: int) -> int:
+        """Copy template literal text starting after a backtick or ``}``.
+
+        Returns the index after the closing backtick, or after ``${`` (with a
+        new entry pushed on ``tpl_stack``).
+        """
+        start = j
+        while j < n:
+            ch = src[j]
+            if ch == "\\":
+                j += 2
+                continue
+            if ch == "`":
+                out.append(src[start : j + 1])
+                return j + 1
+            if ch == "$" and j + 1 < n and src[j + 1] == "{":
+                out.append(src[start : j + 2])
+                tpl_stack.append(0)
+                return j + 2
+            j += 1
+        out.append(src[start:])
+        return n
+
+    while i < n:
+        c = src[i]
+        nxt = src[i + 1] if i + 1 < n else ""
+        if c == "\n" or c == "\r":
+            _newline()
+            i += 1
+            continue
+        if c in " \t":
+            if not at_line_start and out and out[-1] not in (" ", "\n"):
+                out.append(" ")
+            i += 1
+            continue
+        if c == "/" and nxt == "/":
+            j = src.find("\n", i)
+            i = n if j == -1 else j
+            continue
+        if c == "/" and nxt == "*":
+            j = src.find("*/", i + 2)
+            end = n if j == -1 else j + 2
+            body = src[i:end]
+            if body.startswith("/*!"):
+                _emit(body)
+            elif "\n" in body:
+                _newline()
+            elif out and out[-1] not in (" ", "\n"):
+                out.append(" ")
+            i = end
+            continue
+        if c in ("'", '"'):
+            j = i + 1
+            while j < n and src[j] != c and src[j] != "\n":
+                j += 2 if src[j] == "\\" else 1
+            _emit(src[i : j + 1])
+            i = j + 1
+            continue
+        if c == "`":
+            out.append("`")
+            at_line_start = False
+            i = _copy_template(i + 1)
+            last_sig, last_word = "`", ""
+            continue
+        if c == "/" and (not last_sig or last_sig in _REGEX_PRECEDERS or last_word in _REGEX_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < n and src[j] != "\n":
+                ch = src[j]
+                if ch == "\\":
+                    j += 2
+                    continue
+                if ch == "[":
+                    in_class = True
+                elif ch == "]":
+                    in_class = False
+                elif ch == "/" and not in_class:
+                    break
+                j += 1
+            _emit(src[i : j + 1])
+            i = j + 1
+            continue
+        if tpl_stack:
+            if c == "{":
+                tpl_stack[-1] += 1
+            elif c == "}":
+                if tpl_stack[-1] == 0:
+                    tpl_stack.pop()
+                    out.append("}")
+                    i = _copy_template(i + 1)
+                    last_sig, last_word = "`", ""
+                    continue
+                tpl_stack[-1] -= 1
+        if _IDENT_RE.match(c):
+            j = i + 1
+            while j < n and _IDENT_RE.match(src[j]):
+                j += 1
+            _emit(src[i:j])
+            i = j
+            continue
+        _emit(c)
+        i += 1
+
+    text = "".join(out).strip("\n")
+    return text + "\n" if text else ""
+
+
+def minify_css(src: str) -> str:
+    """Strip comments and collapse whitespace in CSS.
+
+    Strings (``content: "..."``, ``url("...")``) are copied verbatim. Spaces
+    are only removed around ``{ } ; ,`` and after ``:`` — never before ``:``
+    (``a :hover`` ≠ ``a:hover``) and never around ``+``/``-`` (``calc()``).
+    """
+    out: list[str] = []
+    i, n = 0, len(src)
+    while i < n:
+        c = src[i]
+        if c == "/" and i + 1 < n and src[i + 1] == "*":
+            j = src.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            if out and out[-1] != " ":
+                out.append(" ")
+            continue
+        if c in ("'", '"'):
+            j = i + 1
+            while j < n and src[j] != c:
+                j += 2 if src[j] == "\\" else 1
+            out.append(src[i : j + 1])
+            i = j + 1
+            continue
+        if c.isspace():
+            if out and out[-1] != " ":
+                out.append(" ")
+            i += 1
+            continue
+        if c in "{};,":
+            while out and out[-1] == " ":
+                out.pop()
+            if c == "}" and out and out[-1] == ";":
+                out.pop()
+            out.append(c)
+            i += 1
+            while i < n and src[i].isspace():
+                i += 1
+            continue
+        out.append(c)
+        if c == ":":
+            i += 1
+            while i < n and src[i] in " \t":
+                i += 1
+            continue
+        i += 1
+    return "".join(out).strip() + "\n"
+
+
+def _minify(name: str, text: str) -> str:
+    if ".min." in name:
+        return text
+    if name.endswith(".js"):
+        return minify_js(text)
+    if name.endswith(".css"):
+        return minify_css(text)
+    return text
+
+
+# ── Build ───────────────────────────────────────────────────────────────────
+
+
+def _hashed_name(logical: str, content: bytes) -> str:
+    stem, ext = os.path.splitext(logical)
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    return f"{stem}.{digest}{ext}"
+
+
+def _write_if_changed(path: Path, data: bytes) -> None:
+    try:
+        if path.read_bytes() == data:
+            return
+    except OSError:
+        pass
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def build(static_root: Path | None = None, bundles: dict[str, list[str]] | None = None) -> dict:
+    """Build all bundles into ``<static_root>/dist`` and write the manifest.
+
+    Idempotent: unchanged sources produce identical hashed names and the
+    files are not rewritten. Returns the manifest dict.
+    """
+    root = Path(static_root) if static_root is not None else STATIC_ROOT
+    bundles = bundles if bundles is not None else BUNDLES
+    dist = root / DIST_DIRNAME
+    dist.mkdir(parents=True, exist_ok=True)
+
+    previous = _read_manifest(dist / MANIFEST_NAME)
+    entries: dict[str, dict] = {}
+    for logical, sources in bundles.items():
+        parts = []
+        for rel in sources:
+            text = (root / rel).read_text(encoding="utf-8")
+            parts.append(_minify(rel, text).rstrip("\n"))
+        # ';' guards against a file ending without a semicolon followed by an
+        # IIFE in the next one — `a\n(function(){})()` would call `a`.
+        joiner = "\n;\n" if logical.endswith(".js") else "\n"
+        content = (joiner.join(parts) + "\n").encode("utf-8")
+        hashed = _hashed_name(logical, content)
+        _write_if_changed(dist / hashed, content)
+        entry = {"file": hashed, "sources": list(sources), "size": len(content)}
+        gz = gzip.compress(content, compresslevel=9, mtime=0)
+        _write_if_changed(dist / (hashed + ".gz"), gz)
+        entry["gz"] = len(gz)
+        if brotli is not None:
+            br = brotli.compress(content, quality=11)
+            _write_if_changed(dist / (hashed + ".br"), br)
+            entry["br"] = len(br)
+        entries[logical] = entry
+
+    manifest = {"version": 1, "bundles": entries}
+    _prune(dist, manifest, previous)
+    _write_if_changed(dist / MANIFEST_NAME, (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode("utf-8"))
+    reset_cache()
+    return manifest
+
+
+def _referenced_files(manifest: dict | None) -> set[str]:
+    names: set[str] = set()
+    for entry in ((manifest or {}).get("bundles") or {}).values():
+        f = entry.get("file")
+        if f:
+            names.update((f, f + ".gz", f + ".br"))
+    return names
+
+
+def _prune(dist: Path, manifest: dict, previous: dict | None) -> None:
+    """Delete hashed files referenced by neither this nor the previous build."""
+    keep = _referenced_files(manifest) | _referenced_files(previous) | {MANIFEST_NAME}
+    for p in dist.iterdir():
+        if p.is_file() and p.name not in keep:
+            try:
+                p.unlink()
+            except OSError as e:
+                logger.debug("static_assets prune %s: %s", p, e)
+
+
+# ── Runtime ─────────────────────────────────────────────────────────────────
+
+
+def _read_manifest(path: Path) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("static asset manifest unreadable (%s): %s", path, e)
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def get_manifest() -> dict:
+    """Return the built manifest (cached), or ``{}`` when no build exists."""
+    global _MANIFEST
+    if _MANIFEST is None:
+        _MANIFEST = _read_manifest(STATIC_ROOT / DIST_DIRNAME / MANIFEST_NAME) or {}
+    return _MANIFEST
+
+
+def reset_cache() -> None:
+    """Forget the cached manifest. Intended for tests and the build step."""
+    global _MANIFEST
+    _MANIFEST = None
+
+
+def _normalize(path: str) -> str:
+    """``'/static/js/app.js'`` / ``'static/js/app.js'`` → ``'js/app.js'``."""
+    p = path.lstrip("/")
+    return p[len("static/") :] if p.startswith("static/") else p
+
+
+def bundle_urls(name: str, version: str) -> list[str]:
+    """URLs to include for bundle ``name``.
+
+    One hashed URL when the bundle is built; otherwise every source file
+    with ``?v=<version>`` (dev checkout / tests).
+    """
+    entry = (get_manifest().get("bundles") or {}).get(name)
+    if entry and entry.get("file"):
+        return [f"/static/{DIST_DIRNAME}/{entry['file']}"]
+    return [f"/static/{src}?v={version}" for src in BUNDLES.get(name, [])]
+
+
+def asset_url(path: str, version: str) -> str:
+    """URL for a single static file.
+
+    Resolves to the hashed file when a built bundle consists of exactly this
+    source; otherwise returns ``path?v=<version>`` unchanged in shape.
+    """
+    rel = _normalize(path)
+    for entry in (get_manifest().get("bundles") or {}).values():
+        if entry.get("sources") == [rel] and entry.get("file"):
+            return f"/static/{DIST_DIRNAME}/{entry['file']}"
+    return f"{path}?v={version}"
+
+
+def precache_urls() -> list[str]:
+    """Hashed bundle URLs for the service worker to precache."""
+    bundles = get_manifest().get("bundles") or {}
+    return [f"/static/{DIST_DIRNAME}/{e['file']}" for _, e in sorted(bundles.items()) if e.get("file")]
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str, available: set[str]) -> str | None:
+    """Pick ``'br'`` / ``'gzip'`` from ``available`` per ``Accept-Encoding``.
+
+    Prefers brotli on ties; honours ``q=0`` and the ``*`` wildcard.
+    Returns ``None`` for identity.
+    """
+    accepted = _parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for enc in ("br", "gzip"):
+        if enc not in available:
+            continue
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def _main(argv: list[str]) -> int:
+    if len(argv) < 2 or argv[1] != "build":
+        print("usage: python -m services.static_assets build", file=sys.stderr)
+        return 2
+    manifest = build()
+    for name, e in sorted(manifest["bundles"].items()):
+        print(f"{name:20s} {e['file']:32s} {e['size']:>8d}  gz={e.get('gz', '-')!s:>7}  br={e.get('br', '-')!s:>7}")
+    if brotli is None:
+        print("note: brotli not installed — only .gz siblings written", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv))
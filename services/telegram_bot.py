@@ -9,6 +9,7 @@ import time
 import requests
 
 from database import db
+from services.notifications import NotificationQueue
 from utils import decrypt_secret
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))  # .../irrigation/services
@@ -43,21 +44,45 @@ def _load_routes_module():
 
 logger = logging.getLogger("TELEGRAM")
 
-try:
-    # aiogram v3
-    from aiogram import Bot, Dispatcher, F
-    from aiogram.types import CallbackQuery, Message
-    from aiogram.types import InlineKeyboardButton as _AInlineKeyboardButton
-    from aiogram.types import InlineKeyboardMarkup as _AInlineKeyboardMarkup
-except ImportError as e:
-    logger.debug("Exception in _load_routes_module: %s", e)
-    Bot = None
-    Dispatcher = None
-    F = None
-    Message = None
-    CallbackQuery = None
-    _AInlineKeyboardMarkup = None
-    _AInlineKeyboardButton = None
+# aiogram v3 грузится лениво (_load_aiogram): импорт aiogram.types занимает
+# секунды, а нужен он только запущенному polling-раннеру. До загрузки имена
+# равны None, и отправка идёт через HTTP Bot API.
+Bot = None
+Dispatcher = None
+F = None
+Message = None
+CallbackQuery = None
+_AInlineKeyboardMarkup = None
+_AInlineKeyboardButton = None
+_AIOGRAM_LOCK = threading.Lock()
+
+
+def _aiogram_installed() -> bool:
+    return importlib.util.find_spec("aiogram") is not None
+
+
+def _load_aiogram() -> bool:
+    """Import aiogram on first use; False when it is not installed."""
+    global Bot, Dispatcher, F, Message, CallbackQuery, _AInlineKeyboardMarkup, _AInlineKeyboardButton
+    with _AIOGRAM_LOCK:
+        if Bot is not None:
+            return True
+        try:
+            from aiogram import Bot as _Bot
+            from aiogram import Dispatcher as _Dispatcher
+            from aiogram import F as _F
+            from aiogram.types import CallbackQuery as _CallbackQuery
+            from aiogram.types import InlineKeyboardButton as _Button
+            from aiogram.types import InlineKeyboardMarkup as _Markup
+            from aiogram.types import Message as _Message
+        except ImportError as e:
+            logger.debug("aiogram not available: %s", e)
+            return False
+        Dispatcher, F, Message, CallbackQuery = _Dispatcher, _F, _Message, _CallbackQuery
+        _AInlineKeyboardMarkup, _AInlineKeyboardButton = _Markup, _Button
+        Bot = _Bot
+        return True
+
 
 try:
     if not getattr(logger, "_telegram_configured", False):
@@ -97,6 +122,41 @@ class TelegramNotifier:
     def __init__(self):
         self._token: str | None = None
         self._lock = threading.Lock()
+        self._session: requests.Session | None = None
+        self._outbox: NotificationQueue | None = None
+
+    def _http(self) -> requests.Session:
+        # Одна keep-alive сессия вместо нового соединения на каждый запрос
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+            return self._session
+
+    def outbox(self) -> NotificationQueue:
+        """Outbound queue for fire-and-forget notifications (started on first use)."""
+        with self._lock:
+            if self._outbox is None:
+                self._outbox = NotificationQueue(self._ensure_token)
+                self._outbox.start()
+            return self._outbox
+
+    def notify(self, chat_id: int, text: str, reply_markup=None) -> bool:
+        """Queue a message without blocking the caller. False when the queue is full."""
+        from config import TESTING
+
+        if TESTING:
+            logger.debug(f"TESTING mode: skipping notify to {chat_id}")
+            return True
+        return self.outbox().submit(int(chat_id), str(text), reply_markup=reply_markup)
+
+    def alert(self, chat_id: int, text: str) -> bool:
+        """Queue an alert; bursts of alerts to one chat are sent as a single digest."""
+        from config import TESTING
+
+        if TESTING:
+            logger.debug(f"TESTING mode: skipping alert to {chat_id}")
+            return True
+        return self.outbox().alert(int(chat_id), str(text))
 
     def _ensure_token(self) -> str | None:
         try:
@@ -155,9 +215,9 @@ class TelegramNotifier:
                 return False
             url = f"https://api.telegram.org/bot{token}/sendMessage"
             payload = {"chat_id": int(chat_id), "text": str(text)}
-            logger.info(f"http POST {_redact_url(url)} payload={payload}")
-            resp = requests.post(url, json=payload, timeout=10)
-            logger.info(f"http RESP status={resp.status_code} body={resp.text[:200]}")
+            logger.debug(f"http POST {_redact_url(url)} payload={payload}")
+            resp = self._http().post(url, json=payload, timeout=10)
+            logger.debug(f"http RESP status={resp.status_code} body={resp.text[:200]}")
             data = resp.json() if resp.ok else {}
             return bool(data.get("ok"))
         except (ValueError, TypeError, KeyError) as e:
@@ -200,9 +260,9 @@ class TelegramNotifier:
             if reply_markup is not None:
                 payload["reply_markup"] = reply_markup
             url = f"https://api.telegram.org/bot{token}/sendMessage"
-            logger.info(f"http POST {_redact_url(url)} payload_keys={list(payload.keys())}")
-            resp = requests.post(url, json=payload, timeout=10)
-            logger.info(f"http RESP status={resp.status_code} body={resp.text[:200]}")
+            logger.debug(f"http POST {_redact_url(url)} payload_keys={list(payload.keys())}")
+            resp = self._http().post(url, json=payload, timeout=10)
+            logger.debug(f"http RESP status={resp.status_code} body={resp.text[:200]}")
             data = resp.json() if resp.ok else {}
             return bool(data.get("ok"))
         except (ValueError, TypeError, KeyError) as e:
@@ -242,9 +302,9 @@ class TelegramNotifier:
             if reply_markup is not None:
                 payload["reply_markup"] = reply_markup
             url = f"https://api.telegram.org/bot{token}/editMessageText"
-            logger.info(f"http POST {_redact_url(url)} payload_keys={list(payload.keys())}")
-            resp = requests.post(url, json=payload, timeout=10)
-            logger.info(f"http RESP status={resp.status_code} body={resp.text[:200]}")
+            logger.debug(f"http POST {_redact_url(url)} payload_keys={list(payload.keys())}")
+            resp = self._http().post(url, json=payload, timeout=10)
+            logger.debug(f"http RESP status={resp.status_code} body={resp.text[:200]}")
             data = resp.json() if resp.ok else {}
             return bool(data.get("ok"))
         except (ValueError, TypeError, KeyError) as e:
@@ -278,7 +338,7 @@ class TelegramNotifier:
             if text is not None:
                 payload["text"] = str(text)
                 payload["show_alert"] = bool(show_alert)
-            requests.post(url, json=payload, timeout=10)
+            self._http().post(url, json=payload, timeout=10)
         except (ValueError, TypeError, KeyError) as e:
             logger.error(f"TelegramNotifier answer_callback failed: {e}")
 
@@ -407,7 +467,7 @@ class AiogramBotRunner:
     async def _main(self):
         try:
             token = notifier._ensure_token()
-            if not token or Bot is None or Dispatcher is None:
+            if not token or not _load_aiogram():
                 logger.error("Aiogram _main: missing token or aiogram is not available")
                 return
             logger.info("[telegram] Starting aiogram v3 polling runner")
@@ -437,6 +497,11 @@ class AiogramBotRunner:
         self._thread = threading.Thread(target=self._thread_target, daemon=True)
         self._thread.start()
 
+    def stop(self):
+        loop, dp = self._loop, self._dp
+        if loop is not None and dp is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(dp.stop_polling(), loop)
+
 
 class SimpleHTTPPoller:
     def __init__(self):
@@ -552,6 +617,10 @@ class SimpleHTTPPoller:
         self._thr = threading.Thread(target=self._run, daemon=True)
         self._thr.start()
 
+    def stop(self):
+        # выход после текущего getUpdates (long poll до 50 с)
+        self._running = False
+
 
 _poller = None
 _aiogram_runner: AiogramBotRunner | None = None
@@ -588,7 +657,7 @@ def start_long_polling_if_needed():
             return
         started = False
         try:
-            if Bot is not None and Dispatcher is not None:
+            if _aiogram_installed():
                 if _aiogram_runner is None:
                     _aiogram_runner = AiogramBotRunner()
                     _aiogram_runner.start()
@@ -605,6 +674,20 @@ def start_long_polling_if_needed():
         logger.exception(f"start_long_polling_if_needed error: {e}")
 
 
+def stop_long_polling():
+    """Stop Telegram polling (the worker lost leadership; only one process may poll a token)."""
+    global _aiogram_runner, _http_poller
+    runner, poller = _aiogram_runner, _http_poller
+    _aiogram_runner = _http_poller = None
+    try:
+        if runner is not None:
+            runner.stop()
+        if poller is not None:
+            poller.stop()
+    except (RuntimeError, OSError) as e:
+        logger.warning("stop_long_polling error: %s", e)
+
+
 def subscribe_to_events():
     try:
         from services import events as evt
@@ -612,7 +695,7 @@ def subscribe_to_events():
         logger.debug("Exception in subscribe_to_events: %s", e)
         return
 
-    def _on_event(ev: dict):
+    def _on_event(ev: evt.Event):
         try:
             admin_chat = db.get_setting_value("telegram_admin_chat_id")
             if not admin_chat:
@@ -628,13 +711,13 @@ def subscribe_to_events():
                     msg = ev.get("message") or ""
                     txt = f"❗️Критическая ошибка: {code}\n{msg}".strip()
                 try:
-                    notifier.send_text(int(admin_chat), txt)
+                    notifier.alert(int(admin_chat), txt)
                 except (ValueError, TypeError, KeyError) as e:
                     logger.debug("Handled exception in _on_event: %s", e)
         except (sqlite3.Error, OSError) as e:
             logger.debug("Handled exception in _on_event: %s", e)
 
     try:
-        evt.subscribe(_on_event)
+        evt.subscribe(_on_event, topics=("emergency_on", "emergency_off", "critical_error", "error"), name="telegram")
     except (ConnectionError, TimeoutError, OSError) as e:
         logger.debug("Handled exception in _on_event: %s", e)
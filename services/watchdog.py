@@ -15,6 +15,7 @@ from constants import (
     WATCHDOG_INTERVAL_SEC,
     ZONE_CAP_DEFAULT_MIN,
 )
+from services import clock
 
 logger = logging.getLogger(__name__)
 
@@ -77,7 +78,7 @@ class ZoneWatchdog(threading.Thread):
         """Main watchdog check: enforce time cap and monitor concurrency."""
         zones = self.db.get_zones() or []
         cap_minutes = self._get_zone_cap_minutes()
-        now = datetime.now()
+        now = clock.now()
 
         on_zones = []
         for z in zones:
@@ -151,7 +152,7 @@ class ZoneWatchdog(threading.Thread):
             from services.telegram_bot import notifier
 
             if notifier:
-                notifier.send_message(int(admin_chat), message)
+                notifier.alert(int(admin_chat), message)
         except ImportError:
             logger.exception("Watchdog: Telegram alert failed")
 
@@ -171,3 +172,12 @@ def start_watchdog(db, zone_control_module, interval: int = WATCHDOG_INTERVAL_SE
         wd.start()
         _watchdog_instance = wd
         return wd
+
+
+def stop_watchdog() -> None:
+    """Stop the watchdog singleton; the next start_watchdog() starts a fresh one."""
+    global _watchdog_instance
+    with _watchdog_lock:
+        wd, _watchdog_instance = _watchdog_instance, None
+    if wd is not None:
+        wd.stop()
@@ -11,7 +11,9 @@ Public API (stable — callers MUST use these names):
 
 Package layout (Wave 4 refactor):
     models.py     — WeatherData parser + module constants
-    client.py     — Open-Meteo HTTP fetch (requests + urllib fallback)
+    client.py     — request builders for Open-Meteo forecast/history and the relay
+    transport.py  — pooled session, single-flight, conditional GET (+ urllib fallback)
+    history.py    — weather_history_daily: incremental completed-day ET₀/precip
     cache.py      — SQLite weather_cache read/write/stale-fallback
     service.py    — WeatherService orchestrator
     adjustment.py — WeatherAdjustment (Zimmerman + ET₀ + skip rules)
@@ -19,9 +19,9 @@ import copy
 import json
 import logging
 import sqlite3
-import time
 from typing import Any
 
+from services import clock
 from services.weather.singletons import get_weather_service
 
 logger = logging.getLogger(__name__)
@@ -125,7 +125,7 @@ class WeatherAdjustment:
             try:
                 ts = getattr(weather, "timestamp", None)
                 if ts:
-                    age = time.time() - float(ts)
+                    age = clock.timestamp() - float(ts)
                     if age > 7200:
                         self._maybe_alert_api_down(f"cache stale {int(age / 60)}min")
             except (TypeError, ValueError):
@@ -165,7 +165,7 @@ class WeatherAdjustment:
         soft = float(settings.get("sensor_mismatch_soft_c", self.DEFAULT_SENSOR_MISMATCH_SOFT_C))
         hard = float(settings.get("sensor_mismatch_hard_c", self.DEFAULT_SENSOR_MISMATCH_HARD_C))
 
-        env = _get_env_state(time.time())
+        env = _get_env_state(clock.timestamp())
         api_t = getattr(api_weather, "temperature", None)
         api_h = getattr(api_weather, "humidity", None)
 
@@ -535,10 +535,10 @@ class WeatherAdjustment:
                 if srow and srow["value"] is not None:
                     with contextlib.suppress(ValueError, TypeError):
                         stale_days = int(float(srow["value"]))
-                from datetime import date, datetime
+                from datetime import datetime
 
                 last = datetime.strptime(str(row["value"]), "%Y-%m-%d").date()
-                age_days = (date.today() - last).days
+                age_days = (clock.now().date() - last).days
                 return age_days <= stale_days
         except (sqlite3.Error, OSError, ValueError, TypeError) as e:
             logger.debug("balance freshness check failed: %s", e)
@@ -739,9 +739,9 @@ class WeatherAdjustment:
         else:
             decision = "adjust"
 
-        now = time.localtime()
-        date_str = time.strftime("%Y-%m-%d", now)
-        time_str = time.strftime("%H:%M:%S", now)
+        now = clock.now()
+        date_str = now.strftime("%Y-%m-%d")
+        time_str = now.strftime("%H:%M:%S")
 
         def _safe(attr):
             try:
@@ -794,7 +794,7 @@ class WeatherAdjustment:
     def _should_alert_now(self) -> bool:
         """Throttle: 1 alert / 30 min via weather.last_alert_at setting."""
         try:
-            now = time.time()
+            now = clock.timestamp()
             with sqlite3.connect(self.db_path, timeout=5) as conn:
                 cur = conn.execute("SELECT value FROM settings WHERE key = 'weather.last_alert_at'")
                 row = cur.fetchone()
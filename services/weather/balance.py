@@ -1,7 +1,8 @@
 """Virtual water-balance coefficient (H2) — normalised rolling ET-deficit.
 
 Single responsibility: once per night, pull the last few *completed* days of
-Open-Meteo history, compute a daily ET₀ deficit (need − effective rain), keep a
+Open-Meteo history (only the days not yet in ``weather_history_daily``, see
+``history.py``), compute a daily ET₀ deficit (need − effective rain), keep a
 short rolling window of it, maintain a long-horizon EMA "climate norm" of ET₀,
 and turn the window/norm ratio into a watering multiplier (``coef``) cached in
 ``settings``. The irrigation path reads only the cached integer — no maths runs
@@ -33,7 +34,9 @@ in place (graceful degradation) and never propagates to the scheduler.
 import json
 import logging
 import sqlite3
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+
+from services import clock
 
 logger = logging.getLogger(__name__)
 
@@ -73,8 +76,7 @@ _HISTORY_FETCH_DAYS = 35
 def _read_settings(conn) -> dict:
     """Read all balance params from ``settings`` with typed defaults.
 
-    A single connection is reused for the whole recalc so the read is cheap and
-    consistent with the write that follows.
+    One ``IN (...)`` query for all keys.
     """
     keys = [
         _K_WINDOW_DAYS,
@@ -88,13 +90,8 @@ def _read_settings(conn) -> dict:
         _K_ET0_NORM_DAILY,
         _K_NORM_LAST_DAY,
     ]
-    raw: dict[str, str] = {}
-    conn.row_factory = sqlite3.Row
-    for key in keys:
-        cur = conn.execute("SELECT value FROM settings WHERE key = ? LIMIT 1", (key,))
-        row = cur.fetchone()
-        if row and row["value"] is not None:
-            raw[key] = str(row["value"])
+    cur = conn.execute(f"SELECT key, value FROM settings WHERE key IN ({','.join('?' * len(keys))})", keys)
+    raw: dict[str, str] = {key: str(value) for key, value in cur.fetchall() if value is not None}
 
     def _as_int(key: str, default: int) -> int:
         try:
@@ -272,10 +269,11 @@ def recalc_balance(db_path: str) -> dict | None:
     write settings (``coef_cached`` LAST for consistency) + audit-log row.
     """
     try:
+        from services.weather import history as weather_history
         from services.weather.cache import get_location
         from services.weather.client import fetch_history
 
-        today = date.today()
+        today = clock.now().date()
         today_str = today.isoformat()
 
         with sqlite3.connect(db_path, timeout=5) as conn:
@@ -291,18 +289,33 @@ def recalc_balance(db_path: str) -> dict | None:
             logger.debug("water-balance: location not configured, skipping")
             return None
 
-        payload = fetch_history(loc["latitude"], loc["longitude"], past_days=_HISTORY_FETCH_DAYS)
-        if not payload:
-            logger.info("water-balance: history fetch returned nothing, keeping previous coef")
-            return None
+        lat, lon = loc["latitude"], loc["longitude"]
+        first_day, last_day = today - timedelta(days=_HISTORY_FETCH_DAYS), today - timedelta(days=1)
+        stored = weather_history.load_days(db_path, lat, lon, first_day, last_day)
+        missing = weather_history.missing_days(stored, first_day, last_day) if stored is not None else None
+        if missing == []:
+            history_rows = list(stored.values())
+        else:
+            # Без хранилища — всё окно; иначе только от самого раннего недостающего дня
+            past_days = (today - missing[0]).days if missing else _HISTORY_FETCH_DAYS
+            payload = fetch_history(lat, lon, past_days=past_days)
+            if not payload:
+                logger.info("water-balance: history fetch returned nothing, keeping previous coef")
+                return None
 
-        daily = payload.get("daily", {}) if isinstance(payload, dict) else {}
-        history_rows = _build_history_rows(
-            daily.get("et0_fao_evapotranspiration", []),
-            daily.get("precipitation_sum", []),
-            daily.get("time", []),
-            today,
-        )
+            daily = payload.get("daily", {}) if isinstance(payload, dict) else {}
+            fetched = _build_history_rows(
+                daily.get("et0_fao_evapotranspiration", []),
+                daily.get("precipitation_sum", []),
+                daily.get("time", []),
+                today,
+            )
+            if stored is None:
+                history_rows = fetched
+            else:
+                weather_history.save_days(db_path, lat, lon, fetched)
+                merged = {**stored, **{r["date"]: r for r in fetched if r["date"] >= first_day.isoformat()}}
+                history_rows = [merged[d] for d in sorted(merged)]
 
         window_days = cfg["window_days"]
         norm_window_days = cfg["norm_window_days"]
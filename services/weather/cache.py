@@ -20,9 +20,9 @@ risky by the Wave 4 scope owner.
 import json
 import logging
 import sqlite3
-import time
 from typing import Any
 
+from services import clock
 from services.weather.models import _CACHE_TTL_SEC, WeatherData
 
 logger = logging.getLogger(__name__)
@@ -79,7 +79,7 @@ def read_fresh(db_path: str, lat: float, lon: float) -> WeatherData | None:
             row = cur.fetchone()
             if row:
                 fetched_at = float(row["fetched_at"])
-                if time.time() - fetched_at < _CACHE_TTL_SEC:
+                if clock.timestamp() - fetched_at < _CACHE_TTL_SEC:
                     data = json.loads(row["data"])
                     data["_fetched_at"] = fetched_at
                     return WeatherData(data)
@@ -141,7 +141,7 @@ def save(db_path: str, lat: float, lon: float, data: dict[str, Any]) -> None:
     """
     try:
         with sqlite3.connect(db_path, timeout=5) as conn:
-            now = time.time()
+            now = clock.timestamp()
             conn.execute(
                 "INSERT OR REPLACE INTO weather_cache (latitude, longitude, data, fetched_at) VALUES (?, ?, ?, ?)",
                 (round(lat, 4), round(lon, 4), json.dumps(data), now),
@@ -1,11 +1,14 @@
 """HTTP client for the Open-Meteo forecast API.
 
-Single responsibility: perform a single GET request against Open-Meteo and
-return the decoded JSON payload (``dict``) — or ``None`` on any error.
-No caching, no parsing, no business logic.
-
-Two transport paths, in order of preference:
-    1. ``requests`` (if installed) — standard, pools connections.
+Single responsibility: build the request for each upstream (Open-Meteo
+forecast, Open-Meteo history, GitHub relay) and return the decoded JSON
+payload (``dict``) — or ``None`` on any error. No caching, no parsing, no
+business logic.
+
+The network round trip is done by ``services.weather.transport``:
+    1. ``requests`` (if installed) — one pooled keep-alive session,
+       single-flight for identical concurrent calls, conditional requests
+       (ETag / Last-Modified) where the upstream supports them.
        Retries once with 1s backoff on transient errors (timeout, connection
        reset, HTTP 429/5xx). Worst-case wall clock: ~21s
        (timeout + sleep + timeout), well under the 60s scheduler tick.
@@ -14,22 +17,14 @@ Two transport paths, in order of preference:
        (last-resort path; cache fallback handles failure).
 """
 
-import json
 import logging
-import time
 from typing import Any
 
-from services.weather.models import (
-    _OPEN_METEO_URL,
-    _REQUEST_TIMEOUT,
-)
+from services.weather import transport
+from services.weather.models import _OPEN_METEO_URL
 
 logger = logging.getLogger(__name__)
 
-_RETRY_BACKOFF_SEC = 1.0
-_RETRY_MAX_ATTEMPTS = 2  # total attempts (1 retry)
-_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
-
 
 def fetch_api(lat: float, lon: float) -> dict[str, Any] | None:
     """Fetch raw weather data from Open-Meteo for the given coordinates.
@@ -64,32 +59,6 @@ def fetch_api(lat: float, lon: float) -> dict[str, Any] | None:
         ]
     )
 
-    try:
-        import requests
-    except ImportError:
-        try:
-            import urllib.parse
-            import urllib.request
-
-            params = urllib.parse.urlencode(
-                {
-                    "latitude": lat,
-                    "longitude": lon,
-                    "hourly": hourly_params,
-                    "daily": daily_params,
-                    "timezone": "auto",
-                    "forecast_days": 3,
-                    "wind_speed_unit": "ms",
-                }
-            )
-            url = f"{_OPEN_METEO_URL}?{params}"
-            req = urllib.request.Request(url, headers={"User-Agent": "WB-Irrigation/2.0"})
-            with urllib.request.urlopen(req, timeout=_REQUEST_TIMEOUT) as resp:
-                return json.loads(resp.read().decode("utf-8"))
-        except Exception as e:
-            logger.warning("Weather API fetch (urllib) failed: %s", e)
-            return None
-
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -99,48 +68,7 @@ def fetch_api(lat: float, lon: float) -> dict[str, Any] | None:
         "forecast_days": 3,
         "wind_speed_unit": "ms",
     }
-    headers = {"User-Agent": "WB-Irrigation/2.0"}
-
-    for attempt in range(1, _RETRY_MAX_ATTEMPTS + 1):
-        try:
-            resp = requests.get(
-                _OPEN_METEO_URL,
-                params=params,
-                timeout=_REQUEST_TIMEOUT,
-                headers=headers,
-            )
-            resp.raise_for_status()
-            return resp.json()
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-            logger.warning(
-                "Weather API fetch attempt %d/%d failed (transient): %s",
-                attempt,
-                _RETRY_MAX_ATTEMPTS,
-                e,
-            )
-            if attempt >= _RETRY_MAX_ATTEMPTS:
-                return None
-            time.sleep(_RETRY_BACKOFF_SEC)
-        except requests.exceptions.HTTPError as e:
-            status = getattr(e.response, "status_code", None)
-            if status in _RETRYABLE_STATUS:
-                logger.warning(
-                    "Weather API fetch attempt %d/%d failed (HTTP %s): %s",
-                    attempt,
-                    _RETRY_MAX_ATTEMPTS,
-                    status,
-                    e,
-                )
-                if attempt >= _RETRY_MAX_ATTEMPTS:
-                    return None
-                time.sleep(_RETRY_BACKOFF_SEC)
-            else:
-                logger.warning("Weather API fetch failed (HTTP %s): %s", status, e)
-                return None
-        except Exception as e:
-            logger.warning("Weather API fetch failed: %s", e)
-            return None
-    return None
+    return transport.get_json(_OPEN_METEO_URL, params=params, label="Weather API fetch")
 
 
 def fetch_history(lat: float, lon: float, past_days: int) -> dict[str, Any] | None:
@@ -162,7 +90,8 @@ def fetch_history(lat: float, lon: float, past_days: int) -> dict[str, Any] | No
         lat: Latitude (decimal degrees).
         lon: Longitude (decimal degrees).
         past_days: Number of completed past days to include (Open-Meteo caps
-            this at 92; the caller passes ~35).
+            this at 92; the caller asks only for the days missing from
+            ``weather_history_daily``, at most ~35).
 
     Returns:
         Raw JSON payload as a dict, or ``None`` on any network / decode error.
@@ -176,46 +105,7 @@ def fetch_history(lat: float, lon: float, past_days: int) -> dict[str, Any] | No
         "past_days": int(past_days),
         "forecast_days": 1,
     }
-
-    try:
-        import requests
-    except ImportError:
-        try:
-            import urllib.parse
-            import urllib.request
-
-            params = urllib.parse.urlencode(query)
-            url = f"{_OPEN_METEO_URL}?{params}"
-            req = urllib.request.Request(url, headers={"User-Agent": "WB-Irrigation/2.0"})
-            with urllib.request.urlopen(req, timeout=_REQUEST_TIMEOUT) as resp:
-                return json.loads(resp.read().decode("utf-8"))
-        except Exception as e:
-            logger.warning("Weather history fetch (urllib) failed: %s", e)
-            return None
-
-    headers = {"User-Agent": "WB-Irrigation/2.0"}
-    for attempt in range(1, _RETRY_MAX_ATTEMPTS + 1):
-        try:
-            resp = requests.get(_OPEN_METEO_URL, params=query, timeout=_REQUEST_TIMEOUT, headers=headers)
-            resp.raise_for_status()
-            return resp.json()
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-            logger.warning("Weather history fetch attempt %d/%d failed (transient): %s", attempt, _RETRY_MAX_ATTEMPTS, e)
-            if attempt >= _RETRY_MAX_ATTEMPTS:
-                return None
-            time.sleep(_RETRY_BACKOFF_SEC)
-        except requests.exceptions.HTTPError as e:
-            status = getattr(e.response, "status_code", None)
-            if status in _RETRYABLE_STATUS and attempt < _RETRY_MAX_ATTEMPTS:
-                logger.warning("Weather history fetch attempt %d/%d failed (HTTP %s)", attempt, _RETRY_MAX_ATTEMPTS, status)
-                time.sleep(_RETRY_BACKOFF_SEC)
-            else:
-                logger.warning("Weather history fetch failed (HTTP %s): %s", status, e)
-                return None
-        except Exception as e:
-            logger.warning("Weather history fetch failed: %s", e)
-            return None
-    return None
+    return transport.get_json(_OPEN_METEO_URL, params=query, label="Weather history fetch")
 
 
 def fetch_relay(url: str, token: str = "") -> dict[str, Any] | None:
@@ -246,44 +136,9 @@ def fetch_relay(url: str, token: str = "") -> dict[str, Any] | None:
     Returns:
         Raw JSON payload as a dict, or ``None`` on any network / decode error.
     """
-    headers = {"User-Agent": "WB-Irrigation/2.0"}
+    headers = {}
     if token:
         headers["Authorization"] = f"Bearer {token}"
         headers["Accept"] = "application/vnd.github.raw"
         headers["X-GitHub-Api-Version"] = "2022-11-28"
-
-    try:
-        import requests
-    except ImportError:
-        try:
-            import urllib.request
-
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=_REQUEST_TIMEOUT) as resp:
-                return json.loads(resp.read().decode("utf-8"))
-        except Exception as e:
-            logger.warning("Weather relay fetch (urllib) failed: %s", e)
-            return None
-
-    for attempt in range(1, _RETRY_MAX_ATTEMPTS + 1):
-        try:
-            resp = requests.get(url, timeout=_REQUEST_TIMEOUT, headers=headers)
-            resp.raise_for_status()
-            return resp.json()
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-            logger.warning("Weather relay fetch attempt %d/%d failed (transient): %s", attempt, _RETRY_MAX_ATTEMPTS, e)
-            if attempt >= _RETRY_MAX_ATTEMPTS:
-                return None
-            time.sleep(_RETRY_BACKOFF_SEC)
-        except requests.exceptions.HTTPError as e:
-            status = getattr(e.response, "status_code", None)
-            if status in _RETRYABLE_STATUS and attempt < _RETRY_MAX_ATTEMPTS:
-                logger.warning("Weather relay fetch attempt %d/%d failed (HTTP %s)", attempt, _RETRY_MAX_ATTEMPTS, status)
-                time.sleep(_RETRY_BACKOFF_SEC)
-            else:
-                logger.warning("Weather relay fetch failed (HTTP %s): %s", status, e)
-                return None
-        except Exception as e:
-            logger.warning("Weather relay fetch failed: %s", e)
-            return None
-    return None
+    return transport.get_json(url, headers=headers, label="Weather relay fetch")
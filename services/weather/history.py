@@ -0,0 +1,73 @@
+"""Incremental store of completed-day ET₀ / precipitation per location.
+
+The water-balance job (``balance.py``) needs the last ``_HISTORY_FETCH_DAYS``
+completed days every night. Days already fetched are kept in
+``weather_history_daily`` keyed by (latitude, longitude, day), so the nightly
+request asks Open-Meteo only for the days that are missing — normally just
+yesterday (``past_days=1``) instead of the whole 35-day window.
+
+Rows older than ``KEEP_DAYS`` are pruned on every save. On a database without
+the table (old schema, minimal test DBs) :func:`load_days` returns ``None`` and
+the caller falls back to fetching the full window.
+"""
+
+import logging
+import sqlite3
+from datetime import date, timedelta
+
+from services import clock
+
+logger = logging.getLogger(__name__)
+
+KEEP_DAYS = 120
+
+
+def _loc(lat: float, lon: float) -> tuple[float, float]:
+    return round(float(lat), 4), round(float(lon), 4)
+
+
+def load_days(db_path: str, lat: float, lon: float, first: date, last: date) -> dict[str, dict] | None:
+    """Stored rows ``{day: {"date", "et0", "precip"}}`` in ``[first, last]``; None without the table."""
+    try:
+        with sqlite3.connect(db_path, timeout=5) as conn:
+            cur = conn.execute(
+                "SELECT day, et0, precip FROM weather_history_daily "
+                "WHERE latitude = ? AND longitude = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (*_loc(lat, lon), first.isoformat(), last.isoformat()),
+            )
+            return {day: {"date": day, "et0": et0, "precip": precip} for day, et0, precip in cur.fetchall()}
+    except sqlite3.Error as e:
+        logger.debug("weather history store unavailable: %s", e)
+        return None
+
+
+def missing_days(stored: dict[str, dict], first: date, last: date) -> list[date]:
+    out = []
+    d = first
+    while d <= last:
+        if d.isoformat() not in stored:
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def save_days(db_path: str, lat: float, lon: float, rows: list[dict]) -> int:
+    """Upsert completed-day rows and prune the old ones; returns rows written."""
+    if not rows:
+        return 0
+    la, lo = _loc(lat, lon)
+    now = clock.timestamp()
+    cutoff = (clock.now().date() - timedelta(days=KEEP_DAYS)).isoformat()
+    try:
+        with sqlite3.connect(db_path, timeout=5) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO weather_history_daily (latitude, longitude, day, et0, precip, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(la, lo, r["date"], r["et0"], r["precip"], now) for r in rows],
+            )
+            conn.execute("DELETE FROM weather_history_daily WHERE day < ?", (cutoff,))
+            conn.commit()
+        return len(rows)
+    except sqlite3.Error as e:
+        logger.debug("weather history store save failed: %s", e)
+        return 0
@@ -14,10 +14,9 @@ name at the package level.
 """
 
 import logging
-import time
-from datetime import datetime
 from typing import Any
 
+from services import clock
 from services.weather.models import SENSOR_STALE_TIMEOUT
 from services.weather.singletons import get_weather_service
 
@@ -31,7 +30,7 @@ def get_merged_weather(db_path: str) -> dict[str, Any]:
     they are enabled and have fresh data (< ``SENSOR_STALE_TIMEOUT`` seconds old).
     Otherwise, API data is used with appropriate source annotation.
     """
-    now = time.time()
+    now = clock.timestamp()
 
     api_weather = _get_api_weather(db_path)
     if api_weather is None:
@@ -232,7 +231,7 @@ def _get_weather_code(api_weather):
         if not codes or not times:
             return None
 
-        current_hour = datetime.now().strftime("%Y-%m-%dT%H:00")
+        current_hour = clock.now().strftime("%Y-%m-%dT%H:00")
         for i, t in enumerate(times):
             if t == current_hour and i < len(codes):
                 val = codes[i]
@@ -260,7 +259,7 @@ def _build_forecast_24h(api_weather):
         if not times:
             return result
 
-        now_str = datetime.now().strftime("%Y-%m-%dT%H:00")
+        now_str = clock.now().strftime("%Y-%m-%dT%H:00")
 
         start_idx = 0
         for i, t in enumerate(times):
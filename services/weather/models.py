@@ -11,9 +11,10 @@ ten-line constants module would add import churn without clarity.
 
 import contextlib
 import logging
-import time
 from datetime import datetime
 
+from services import clock
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,7 +45,7 @@ class WeatherData:
     def __init__(self, raw):
         # type: (Dict[str, Any]) -> None
         self.raw = raw
-        self.timestamp = raw.get("_fetched_at", time.time())
+        self.timestamp = raw.get("_fetched_at", clock.timestamp())
         self._parse()
 
     def _parse(self):
@@ -56,10 +57,10 @@ class WeatherData:
         # the wrong hour and precipitation_24h sums the wrong window.
         utc_offset = self.raw.get("utc_offset_seconds")
         if utc_offset is not None:
-            now = datetime.utcfromtimestamp(time.time() + int(utc_offset))
+            now = clock.utcnow_local(utc_offset)
         else:
             logger.warning("WeatherData: utc_offset_seconds missing, falling back to server-local time")
-            now = datetime.now()
+            now = clock.now()
         current_hour = now.strftime("%Y-%m-%dT%H:00")
 
         # Find current hour index
@@ -139,16 +140,19 @@ class WeatherData:
                 except (IndexError, ValueError, TypeError):
                     pass
 
-        # Calculate precipitation forecast for next 6h
+        # Calculate precipitation forecast for next 6h / 12h (12h feeds the irrigation planner)
         self.precipitation_forecast_6h = 0.0
+        self.precipitation_forecast_12h = 0.0
         if idx is not None:
             precip_arr = hourly.get("precipitation", [])
-            end_idx = min(len(precip_arr), idx + 7)
+            end_idx = min(len(precip_arr), idx + 13)
             for i in range(idx + 1, end_idx):
                 try:
                     val = precip_arr[i]
                     if val is not None:
-                        self.precipitation_forecast_6h += float(val)
+                        self.precipitation_forecast_12h += float(val)
+                        if i <= idx + 6:
+                            self.precipitation_forecast_6h += float(val)
                 except (IndexError, ValueError, TypeError):
                     pass
 
@@ -12,10 +12,9 @@ via ``@patch('services.weather.WeatherService._fetch_api')`` and we committed
 """
 
 import logging
-import time
-from datetime import datetime
 from typing import Any
 
+from services import clock
 from services.weather import cache as _cache
 from services.weather.client import fetch_api as _fetch_api_impl
 from services.weather.client import fetch_relay as _fetch_relay_impl
@@ -39,7 +38,7 @@ def _relay_payload_is_current(raw: dict[str, Any]) -> bool:
     offset = raw.get("utc_offset_seconds")
     if not times or offset is None:
         return False
-    now_local = datetime.utcfromtimestamp(time.time() + int(offset))
+    now_local = clock.utcnow_local(offset)
     return now_local.strftime("%Y-%m-%dT%H:00") in times
 
 
@@ -134,7 +133,7 @@ class WeatherService:
 
         raw = self._fetch_api(lat, lon)
         if raw:
-            raw["_fetched_at"] = time.time()
+            raw["_fetched_at"] = clock.timestamp()
             self._save_cache(lat, lon, raw)
             return WeatherData(raw)
 
@@ -258,7 +257,7 @@ class WeatherService:
             "sunset": weather.sunset,
         }
 
-        cache_age_sec = time.time() - weather.timestamp if weather.timestamp else 0
+        cache_age_sec = clock.timestamp() - weather.timestamp if weather.timestamp else 0
 
         result = {
             "available": True,
@@ -0,0 +1,247 @@
+"""Shared HTTP transport for the weather clients.
+
+Single responsibility: perform a JSON GET with the retry policy of
+``client.py`` and make repeated calls cheap:
+
+    * one keep-alive ``requests.Session`` per process with a bounded pool
+      (``POOL_MAXSIZE``) and (connect, read) timeouts, so a refresh reuses
+      the TCP/TLS connection instead of paying the handshake every time;
+    * single-flight: concurrent identical requests (same URL, parameters and
+      auth) share one upstream call — the followers wait for the leader's
+      result instead of opening their own connections;
+    * conditional requests: when the upstream sent ``ETag`` /
+      ``Last-Modified`` (GitHub raw and contents API do, Open-Meteo does not),
+      the next call sends ``If-None-Match`` / ``If-Modified-Since`` and a
+      ``304 Not Modified`` is answered from the remembered payload.
+
+Without ``requests`` the urllib fallback keeps the old behaviour: one
+attempt, no pooling, no validators.
+
+Counters (requests, bytes, 304s, coalesced calls, upstream time) are
+available from :func:`stats`.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from services.weather.models import _REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "WB-Irrigation/2.0"
+CONNECT_TIMEOUT = 5.0
+POOL_CONNECTIONS = 4  # хостов: open-meteo, raw.githubusercontent, api.github
+POOL_MAXSIZE = 2
+SINGLE_FLIGHT_WAIT_SEC = 2 * _REQUEST_TIMEOUT + 5
+MAX_VALIDATORS = 16
+
+RETRY_BACKOFF_SEC = 1.0
+RETRY_MAX_ATTEMPTS = 2  # total attempts (1 retry)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+_inflight: dict[tuple, _Call] = {}
+_inflight_lock = threading.Lock()
+
+# key -> (etag, last_modified, payload)
+_validators: OrderedDict[tuple, tuple[str | None, str | None, Any]] = OrderedDict()
+_validators_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "bytes": 0, "not_modified": 0, "coalesced": 0, "failures": 0, "upstream_ms": 0.0}
+
+
+class _Call:
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+
+
+def _count(**deltas) -> None:
+    with _stats_lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        out = dict(_stats)
+    out["upstream_ms"] = round(out["upstream_ms"], 1)
+    return out
+
+
+def reset() -> None:
+    """Drop the session, remembered validators and counters (tests, config reload)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception as e:
+                logger.debug("Handled exception in transport.reset: %s", e)
+        _session = None
+    with _validators_lock:
+        _validators.clear()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0.0 if k == "upstream_ms" else 0
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers["User-Agent"] = USER_AGENT
+                _session = s
+    return _session
+
+
+def _key(url: str, params: dict[str, Any] | None, headers: dict[str, str] | None) -> tuple:
+    return (
+        url,
+        tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+        tuple(sorted((headers or {}).items())),
+    )
+
+
+def get_json(
+    url: str,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, str] | None = None,
+    label: str = "Weather API fetch",
+) -> dict[str, Any] | None:
+    """GET ``url`` and return the decoded JSON, or ``None`` on any error.
+
+    Identical concurrent calls are coalesced; every caller gets its own copy
+    of the payload (callers annotate it, e.g. ``_fetched_at``).
+    """
+    key = _key(url, params, headers)
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+    if not leader:
+        _count(coalesced=1)
+        if not call.done.wait(SINGLE_FLIGHT_WAIT_SEC):
+            logger.warning("%s: shared request did not finish in %ss", label, SINGLE_FLIGHT_WAIT_SEC)
+            return None
+        return copy.deepcopy(call.result)
+    try:
+        call.result = _fetch(key, url, params, headers, label)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+    return copy.deepcopy(call.result)
+
+
+def _fetch(key: tuple, url: str, params, headers, label: str) -> dict[str, Any] | None:
+    try:
+        import requests
+    except ImportError:
+        return _fetch_urllib(url, params, headers, label)
+
+    req_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+    with _validators_lock:
+        known = _validators.get(key)
+    if known is not None:
+        etag, last_modified, _payload = known
+        if etag:
+            req_headers["If-None-Match"] = etag
+        if last_modified:
+            req_headers["If-Modified-Since"] = last_modified
+
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        started = time.monotonic()
+        try:
+            resp = _get_session().get(
+                url, params=params, timeout=(CONNECT_TIMEOUT, _REQUEST_TIMEOUT), headers=req_headers
+            )
+            _count(requests=1, upstream_ms=(time.monotonic() - started) * 1000.0)
+            if resp.status_code == 304 and known is not None:
+                _count(not_modified=1)
+                with _validators_lock:
+                    if key in _validators:
+                        _validators.move_to_end(key)
+                return known[2]
+            resp.raise_for_status()
+            payload = resp.json()
+            _remember(key, resp, payload)
+            return payload
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            logger.warning("%s attempt %d/%d failed (transient): %s", label, attempt, RETRY_MAX_ATTEMPTS, e)
+            if attempt >= RETRY_MAX_ATTEMPTS:
+                break
+            time.sleep(RETRY_BACKOFF_SEC)
+        except requests.exceptions.HTTPError as e:
+            status = getattr(e.response, "status_code", None)
+            if status in RETRYABLE_STATUS:
+                logger.warning("%s attempt %d/%d failed (HTTP %s): %s", label, attempt, RETRY_MAX_ATTEMPTS, status, e)
+                if attempt >= RETRY_MAX_ATTEMPTS:
+                    break
+                time.sleep(RETRY_BACKOFF_SEC)
+            else:
+                logger.warning("%s failed (HTTP %s): %s", label, status, e)
+                break
+        except Exception as e:
+            logger.warning("%s failed: %s", label, e)
+            break
+    _count(failures=1)
+    return None
+
+
+def _remember(key: tuple, resp, payload: Any) -> None:
+    content = getattr(resp, "content", None)
+    if isinstance(content, bytes):
+        _count(bytes=len(content))
+    resp_headers = getattr(resp, "headers", None) or {}
+    etag = resp_headers.get("ETag") if hasattr(resp_headers, "get") else None
+    last_modified = resp_headers.get("Last-Modified") if hasattr(resp_headers, "get") else None
+    etag = etag if isinstance(etag, str) else None
+    last_modified = last_modified if isinstance(last_modified, str) else None
+    with _validators_lock:
+        if etag or last_modified:
+            _validators[key] = (etag, last_modified, payload)
+            _validators.move_to_end(key)
+            while len(_validators) > MAX_VALIDATORS:
+                _validators.popitem(last=False)
+        else:
+            _validators.pop(key, None)
+
+
+def _fetch_urllib(url: str, params, headers, label: str) -> dict[str, Any] | None:
+    try:
+        import urllib.parse
+        import urllib.request
+
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+        with urllib.request.urlopen(req, timeout=_REQUEST_TIMEOUT) as resp:
+            body = resp.read()
+        _count(requests=1, bytes=len(body))
+        return json.loads(body.decode("utf-8"))
+    except Exception as e:
+        logger.warning("%s (urllib) failed: %s", label, e)
+        _count(failures=1)
+        return None
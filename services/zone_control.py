@@ -2,12 +2,11 @@ import logging
 import math
 import sqlite3
 import threading
-import time
-from datetime import datetime
 
 from config import TESTING
 from constants import MASTER_VALVE_CLOSE_DELAY_SEC, MAX_MANUAL_WATERING_MIN
 from database import db
+from services import clock
 from services.locks import group_lock, zone_lock
 from services.monitors import water_monitor
 from services.mqtt_pub import publish_mqtt_value
@@ -291,7 +290,7 @@ def exclusive_start_zone(zone_id: int, source: str = "manual") -> bool:
         # Serialize on group
         with group_lock(group_id):
             group_zones = db.get_zones_by_group(group_id) if group_id else []
-            start_ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            start_ts = clock.now().strftime("%Y-%m-%d %H:%M:%S")
             # Start current with state-machine: off/stopping -> starting -> on
             with zone_lock(zone_id):
                 cur_state = str((db.get_zone(zone_id) or {}).get("state") or "").lower()
@@ -327,7 +326,7 @@ def exclusive_start_zone(zone_id: int, source: str = "manual") -> bool:
                     base_m3: float | None = None
                     if g and int(g.get("use_water_meter") or 0) == 1:
                         try:
-                            raw = water_monitor.get_pulses_at_or_before(gid, time.time())
+                            raw = water_monitor.get_pulses_at_or_before(gid, clock.timestamp())
                             pulse = str(g.get("water_pulse_size") or "1l")
                             liters = 100 if pulse == "100l" else 10 if pulse == "10l" else 1
                             base_m3 = float(g.get("water_base_value_m3") or 0.0)
@@ -335,7 +334,7 @@ def exclusive_start_zone(zone_id: int, source: str = "manual") -> bool:
                             logger.exception("start meter snapshot failed (continuing without)")
                     try:
                         db.create_zone_run(
-                            int(zone_id), gid, start_ts, time.monotonic(), raw, liters, base_m3, source=source
+                            int(zone_id), gid, start_ts, clock.monotonic(), raw, liters, base_m3, source=source
                         )
                     except (sqlite3.Error, OSError):
                         logger.exception("start: create_zone_run failed (zone=%s gid=%s)", zone_id, gid)
@@ -451,8 +450,8 @@ def exclusive_start_zone(zone_id: int, source: str = "manual") -> bool:
                                         if _run:
                                             db.finish_zone_run(
                                                 int(_run["id"]),
-                                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                                time.monotonic(),
+                                                clock.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                                clock.monotonic(),
                                                 None,
                                                 None,
                                                 None,
@@ -509,8 +508,8 @@ def exclusive_start_zone(zone_id: int, source: str = "manual") -> bool:
                                         if _run:
                                             db.finish_zone_run(
                                                 int(_run["id"]),
-                                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                                time.monotonic(),
+                                                clock.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                                clock.monotonic(),
                                                 None,
                                                 None,
                                                 None,
@@ -587,14 +586,14 @@ def stop_zone(
                         run = None
                     if run:
                         try:
-                            end_raw = water_monitor.get_pulses_at_or_after(gid, time.time())
+                            end_raw = water_monitor.get_pulses_at_or_after(gid, clock.timestamp())
                         except (ValueError, TypeError, AttributeError, OSError) as e:
                             logger.debug("Exception in stop_zone: %s", e)
                             end_raw = None
                         try:
                             start_raw = run.get("start_raw_pulses")
                             liters_per_pulse = int(run.get("pulse_liters_at_start") or 1)
-                            end_mono = time.monotonic()
+                            end_mono = clock.monotonic()
                             start_mono = float(run.get("start_monotonic") or 0.0)
                             dp = (
                                 None
@@ -607,7 +606,7 @@ def stop_zone(
                                 avg_lpm = round(total_liters / (dur_sec / 60.0), 2)
                             db.finish_zone_run(
                                 int(run["id"]),
-                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                clock.now().strftime("%Y-%m-%d %H:%M:%S"),
                                 end_mono,
                                 end_raw,
                                 total_liters,
@@ -720,14 +719,14 @@ def stop_zone(
                 if run:
                     try:
                         # Берём пульсы на/после момента стопа, чтобы избежать лагов
-                        end_raw = water_monitor.get_pulses_at_or_after(gid, time.time())
+                        end_raw = water_monitor.get_pulses_at_or_after(gid, clock.timestamp())
                     except (ValueError, TypeError, AttributeError, OSError) as e:
                         logger.debug("Exception in line_312: %s", e)
                         end_raw = None
                     try:
                         start_raw = run.get("start_raw_pulses")
                         liters_per_pulse = int(run.get("pulse_liters_at_start") or 1)
-                        end_mono = time.monotonic()
+                        end_mono = clock.monotonic()
                         start_mono = float(run.get("start_monotonic") or 0.0)
                         dp = None if (end_raw is None or start_raw is None) else max(0, int(end_raw) - int(start_raw))
                         if dp is not None:
@@ -736,7 +735,7 @@ def stop_zone(
                             avg_lpm = round(total_liters / (dur_sec / 60.0), 2)
                         db.finish_zone_run(
                             int(run["id"]),
-                            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            clock.now().strftime("%Y-%m-%d %H:%M:%S"),
                             end_mono,
                             end_raw,
                             total_liters,
@@ -806,7 +805,7 @@ def stop_all_in_group(
                 # Небольшая пауза, чтобы избежать всплесков при публикации на слабом железе (пропускаем в тестах)
                 try:
                     if not TESTING:
-                        time.sleep(0.05)
+                        clock.sleep(0.05)
                 except (KeyError, TypeError, ValueError) as e:
                     logger.debug("Handled exception in stop_all_in_group: %s", e)
             except (ValueError, TypeError, KeyError):
@@ -870,15 +869,15 @@ def emergency_stop_all(reason: str = "emergency_stop") -> dict:
                 )
                 stats["zones_stopped"] += 1
                 if not TESTING:
-                    time.sleep(0.02)
+                    clock.sleep(0.02)
             except (ValueError, TypeError, KeyError, sqlite3.Error, OSError):
                 logger.exception("emergency_stop_all: stop_zone failed (zone_id=%s)", z.get("id"))
 
     # Phase B: wait up to 2s for all zones to reach state='off' (or 'stopping' is also OK
     # — we treat 'stopping' as in-flight-but-OFF-published; only on/starting are blockers).
     if not TESTING:
-        deadline = time.monotonic() + 2.0
-        while time.monotonic() < deadline:
+        deadline = clock.monotonic() + 2.0
+        while clock.monotonic() < deadline:
             still_active = 0
             try:
                 for g in groups:
@@ -897,7 +896,7 @@ def emergency_stop_all(reason: str = "emergency_stop") -> dict:
                 break
             if still_active == 0:
                 break
-            time.sleep(0.1)
+            clock.sleep(0.1)
         # Re-issue stop_zone(force=True) for any zone STILL in on/starting at deadline.
         try:
             stuck_zones = []
@@ -928,7 +927,7 @@ def emergency_stop_all(reason: str = "emergency_stop") -> dict:
                         )
                         stats["zones_force_retried"] += 1
                         if not TESTING:
-                            time.sleep(0.02)
+                            clock.sleep(0.02)
                     except (ValueError, TypeError, KeyError, sqlite3.Error, OSError):
                         logger.exception("emergency_stop_all: force-retry failed (zone_id=%s)", zid)
             stats["zones_still_active_after_wait"] = len(stuck_zones)
@@ -1034,7 +1033,7 @@ def emergency_stop_all(reason: str = "emergency_stop") -> dict:
             except (sqlite3.Error, OSError, ImportError, ValueError, TypeError) as e:
                 logger.debug("emergency_stop_all: master_valve_observed update failed (gid=%s): %s", gid, e)
             if not TESTING:
-                time.sleep(0.05)
+                clock.sleep(0.05)
         except Exception:
             stats["masters_failed_publish"] += 1
             logger.exception("emergency_stop_all: publish failed group=%s topic=%s", gid, t_norm)
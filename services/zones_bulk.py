@@ -0,0 +1,333 @@
+"""Bulk zone import/export engine (commissioning of large sites).
+
+Import pipeline::
+
+    request stream ─► iter_csv_rows / iter_json_rows   (incremental parse)
+                   ─► validate_row                     (per-row, no DB)
+                   ─► db.bulk_upsert_zones             (one BEGIN IMMEDIATE,
+                                                        executemany)
+                   ─► _after_batch                     (once per batch:
+                                                        scheduled starts,
+                                                        scheduler programs,
+                                                        SSE hub subscriptions)
+
+The parsers never hold the raw body in memory: CSV is decoded line by line,
+JSON is decoded one array element at a time. Every input row gets an entry
+in the result report (``row`` is 1-based, header line excluded for CSV).
+
+Export streams the same columns back (``export_csv`` / ``export_json``), so
+an exported file can be edited and re-imported as is.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import logging
+import re
+import sqlite3
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Columns written by export; ``state`` is informational — import ignores it.
+EXPORT_COLUMNS = ("id", "name", "icon", "duration", "group_id", "state", "topic", "mqtt_server_id")
+
+MAX_IMPORT_ROWS = 20000
+DURATION_MIN, DURATION_MAX = 1, 3600
+
+_CHUNK = 64 * 1024
+_ZONES_WRAPPER = re.compile(r'\s*\{\s*"zones"\s*:\s*\[')
+
+
+class ImportFormatError(ValueError):
+    """The request body is not parseable as the declared format."""
+
+
+class ImportTooLargeError(ValueError):
+    """The batch exceeds :data:`MAX_IMPORT_ROWS`."""
+
+
+# ---------------------------------------------------------------------------
+# Incremental parsers
+# ---------------------------------------------------------------------------
+
+
+def _iter_text(stream, chunk_size: int = _CHUNK) -> Iterator[str]:
+    """Decode a binary stream chunk by chunk (UTF-8, optional BOM)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="strict")
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+                return
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"body is not valid UTF-8: {e}") from e
+
+
+def _iter_lines(stream) -> Iterator[str]:
+    """Split decoded chunks into lines (newline kept, as csv.reader expects)."""
+    buf = ""
+    for chunk in _iter_text(stream):
+        buf += chunk
+        start = 0
+        while (nl := buf.find("\n", start)) >= 0:
+            yield buf[start : nl + 1]
+            start = nl + 1
+        buf = buf[start:]
+    if buf:
+        yield buf
+
+
+def iter_csv_rows(stream) -> Iterator[dict[str, str]]:
+    """Yield CSV data rows as dicts; empty cells are dropped (= "not set")."""
+    try:
+        reader = csv.DictReader(_iter_lines(stream))
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [(h or "").strip().lower() for h in reader.fieldnames]
+        if "id" not in reader.fieldnames and "name" not in reader.fieldnames:
+            raise ImportFormatError("CSV header must contain an 'id' or 'name' column")
+        for raw in reader:
+            yield {k: v.strip() for k, v in raw.items() if k and isinstance(v, str) and v.strip() != ""}
+    except csv.Error as e:
+        raise ImportFormatError(f"malformed CSV: {e}") from e
+
+
+def iter_json_rows(stream) -> Iterator[Any]:
+    """Yield elements of a JSON array body, one at a time.
+
+    Accepts a bare array (``[{...}, ...]``) or the ``{"zones": [...]}``
+    wrapper the UI sends. Any other document falls back to ``json.loads``.
+    """
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(stream)
+    buf = ""
+    eof = False
+
+    def _more() -> bool:
+        nonlocal buf, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buf += chunk
+        return True
+
+    while len(buf.lstrip()) < 64 and _more():
+        pass
+    if buf.lstrip().startswith("["):
+        pos = buf.index("[") + 1
+    else:
+        m = _ZONES_WRAPPER.match(buf)
+        if not m:
+            while _more():
+                pass
+            try:
+                body = json.loads(buf) if buf.strip() else None
+            except json.JSONDecodeError as e:
+                raise ImportFormatError(f"malformed JSON: {e}") from e
+            zones = body.get("zones") if isinstance(body, dict) else None
+            if not isinstance(zones, list):
+                raise ImportFormatError('JSON body must be an array or {"zones": [...]}')
+            yield from zones
+            return
+        pos = m.end()
+
+    first = True
+    expect_value = True
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos >= len(buf):
+            if not _more():
+                raise ImportFormatError("unexpected end of JSON body")
+            continue
+        ch = buf[pos]
+        if not expect_value:
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ImportFormatError(f"expected ',' or ']' in JSON array, got {ch!r}")
+            pos += 1
+            expect_value = True
+            continue
+        if ch == "]" and first:
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if _more():
+                continue
+            raise ImportFormatError(f"malformed JSON: {e}") from e
+        if end >= len(buf) and _more():
+            # A number or literal may continue in the next chunk — re-decode.
+            continue
+        yield obj
+        first = expect_value = False
+        # Drop consumed text so the buffer holds about one element.
+        buf, pos = buf[end:], 0
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+
+def _as_int(value, field: str) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be an integer")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{field} must be an integer")
+    try:
+        return int(str(value).strip()) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer") from None
+
+
+def validate_row(raw: Any) -> dict[str, Any]:
+    """Normalise one import row to the whitelisted zone columns.
+
+    Raises ``ValueError`` with a human-readable message for invalid rows.
+    Unknown keys (including state-machine fields) are dropped; ``null``
+    means "not set" except for ``topic`` / ``mqtt_server_id``, where it clears.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("row must be an object")
+    raw = {k: v for k, v in raw.items() if v is not None or k in ("topic", "mqtt_server_id")}
+    row: dict[str, Any] = {}
+    if raw.get("id") not in (None, ""):
+        zid = _as_int(raw["id"], "id")
+        if zid < 1:
+            raise ValueError("id must be positive")
+        row["id"] = zid
+    if "name" in raw:
+        name = str(raw["name"] or "").strip()
+        if not name:
+            raise ValueError("name must be non-empty")
+        row["name"] = name
+    if "icon" in raw and raw["icon"] not in (None, ""):
+        row["icon"] = str(raw["icon"])
+    if "duration" in raw:
+        duration = _as_int(raw["duration"], "duration")
+        if not DURATION_MIN <= duration <= DURATION_MAX:
+            raise ValueError(f"duration must be {DURATION_MIN}..{DURATION_MAX}")
+        row["duration"] = duration
+    if "group_id" in raw or "group" in raw:
+        row["group_id"] = _as_int(raw.get("group_id", raw.get("group")), "group_id")
+    if "topic" in raw:
+        row["topic"] = str(raw["topic"] or "").strip()
+    if "mqtt_server_id" in raw:
+        sid = raw["mqtt_server_id"]
+        row["mqtt_server_id"] = None if sid in (None, "") else _as_int(sid, "mqtt_server_id")
+    if "id" not in row and "name" not in row:
+        raise ValueError("row needs an id (update) or a name (create)")
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+
+def import_zones(rows: Iterable[Any], db, scheduler=None) -> dict[str, Any]:
+    """Validate and upsert *rows* as one batch; return the per-row report.
+
+    Returns ``{"created", "updated", "failed", "rows"}`` where each report
+    entry is ``{"row": n, "id": zone_id, "status": ..., ["error": msg]}``.
+    Raises :class:`ImportFormatError` on unparseable input and
+    :class:`ImportTooLargeError` when the batch exceeds :data:`MAX_IMPORT_ROWS`.
+    """
+    report: list[dict[str, Any]] = []
+    valid: list[dict[str, Any]] = []
+    valid_pos: list[int] = []
+    for n, raw in enumerate(rows, start=1):
+        if n > MAX_IMPORT_ROWS:
+            raise ImportTooLargeError(f"too many rows (max {MAX_IMPORT_ROWS})")
+        try:
+            clean = validate_row(raw)
+        except ValueError as e:
+            zid = raw.get("id") if isinstance(raw, dict) else None
+            report.append({"row": n, "id": zid, "status": "failed", "error": str(e)})
+            continue
+        report.append({"row": n, "id": clean.get("id"), "status": "pending"})
+        valid.append(clean)
+        valid_pos.append(len(report) - 1)
+
+    stats: dict[str, Any] = {"rows": [], "groups": [], "programs_changed": False}
+    if valid:
+        stats = db.bulk_upsert_zones(valid)
+        for entry, res in zip((report[i] for i in valid_pos), stats["rows"]):
+            entry["id"] = res["id"]
+            entry["status"] = res["status"]
+            if "error" in res:
+                entry["error"] = res["error"]
+
+    counts = {"created": 0, "updated": 0, "failed": 0}
+    for entry in report:
+        counts[entry["status"]] += 1
+    if counts["created"] or counts["updated"]:
+        _after_batch(db, stats, scheduler)
+    return {**counts, "rows": report}
+
+
+def _after_batch(db, stats: dict[str, Any], scheduler=None) -> None:
+    """Propagate one import batch to derived state — once, not per zone."""
+    try:
+        if stats.get("groups"):
+            db.reschedule_groups_to_next_program(stats["groups"])
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("zones import: reschedule of groups %s failed: %s", stats.get("groups"), e)
+    if stats.get("programs_changed") and scheduler is not None:
+        # Zones moved to group 999 were dropped from programs — reload jobs.
+        try:
+            scheduler.load_programs()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning("zones import: scheduler reload failed: %s", e)
+    try:
+        from services import sse_hub
+
+        sse_hub.refresh_subscriptions()
+    except (sqlite3.Error, OSError, ImportError) as e:
+        logger.warning("zones import: SSE subscription refresh failed: %s", e)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+def _export_values(zone: dict[str, Any]) -> list[Any]:
+    return [zone.get(c) if zone.get(c) is not None else "" for c in EXPORT_COLUMNS]
+
+
+def export_csv(zones: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Yield a CSV document (header first) one line at a time."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    yield out.getvalue()
+    for zone in zones:
+        out.seek(0)
+        out.truncate()
+        writer.writerow(_export_values(zone))
+        yield out.getvalue()
+
+
+def export_json(zones: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Yield ``{"zones": [...]}`` element by element — re-importable as is."""
+    yield '{"zones": ['
+    sep = ""
+    for zone in zones:
+        yield sep + json.dumps({c: zone.get(c) for c in EXPORT_COLUMNS}, ensure_ascii=False)
+        sep = ","
+    yield "]}\n"
@@ -13,6 +13,24 @@ function escapeHtml(str) {
         .replace(/'/g, '&#039;');
 }
 
+/**
+ * URL of a zone photo variant. Content-hashed files (ZONE_<id>.<hash>.webp)
+ * map to the immutable /api/zones/<id>/photo/<hash>.webp, cached for a year;
+ * legacy unhashed files use ?variant= with the optional ?ts= cache-buster.
+ * @param {Object} zone - Zone with id, photo_path, photo_thumb, _photoTs
+ * @param {string} [variant] - 'thumb' or main (default)
+ * @returns {string}
+ */
+function zonePhotoUrl(zone, variant) {
+    var rel = (variant === 'thumb' ? (zone.photo_thumb || zone.photo_path) : zone.photo_path) || '';
+    var m = /\.([0-9a-f]{10})\.webp$/i.exec(rel);
+    if (m) return '/api/zones/' + zone.id + '/photo/' + m[1] + '.webp';
+    var q = [];
+    if (variant === 'thumb') q.push('variant=thumb');
+    if (zone._photoTs) q.push('ts=' + zone._photoTs);
+    return '/api/zones/' + zone.id + '/photo' + (q.length ? '?' + q.join('&') : '');
+}
+
         // CSRF token interceptor: attach token to all non-GET fetch requests
         (function() {
             var csrfMeta = document.querySelector('meta[name="csrf-token"]');
@@ -750,7 +750,7 @@
                  <td class="col-photo" data-label="Фото">
                      <div class="zone-photo">
                          ${zone.photo_path ?
-                             `<img src="/api/zones/${zone.id}/photo?variant=thumb" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('/api/zones/${zone.id}/photo')" title="Нажмите для просмотра">` :
+                             `<img src="${zonePhotoUrl(zone, 'thumb')}" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('${zonePhotoUrl(zone)}')" title="Нажмите для просмотра">` :
                              `<div class="no-photo" title="Нет фото">📷</div>`
                          }
                      </div>
@@ -1911,10 +1911,9 @@
             html += '<div class="zone-card-main" onclick="toggleZoneCard(' + z.id + ')">';
             // Photo thumbnail if exists, otherwise icon (issue #6 + #11)
             if (z.photo_path) {
-                var _ts = z._photoTs || '';
-                // Issue #11: list shows the small thumb (?variant=thumb), lightbox opens the full main file.
-                var _thumbUrl = '/api/zones/' + z.id + '/photo?variant=thumb' + (_ts ? '&ts=' + _ts : '');
-                var _fullUrl = '/api/zones/' + z.id + '/photo' + (_ts ? '?ts=' + _ts : '');
+                // Issue #11: list shows the small thumb, lightbox opens the full main file.
+                var _thumbUrl = zonePhotoUrl(z, 'thumb');
+                var _fullUrl = zonePhotoUrl(z);
                 html += '<div class="zc-photo" onclick="event.stopPropagation();showPhotoModal(\'' + _fullUrl + '\')" title="Открыть фото">';
                 // alt is escaped (XSS); src is server-controlled URL (no user input).
                 // onerror falls back to hiding the img (parent gets default grey background).
@@ -2230,8 +2229,7 @@
         var uploadBtn = document.getElementById('sheetPhotoUploadBtn');
         if (!preview) return;
         if (z && z.photo_path) {
-            var ts = z._photoTs || '';
-            var url = '/api/zones/' + z.id + '/photo' + (ts ? '?ts=' + ts : '');
+            var url = zonePhotoUrl(z);
             // Build via DOM (no string interpolation of arbitrary attributes — XSS-safe).
             preview.innerHTML = '';
             var img = document.createElement('img');
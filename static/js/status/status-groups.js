@@ -297,7 +297,7 @@
                  <td class="col-photo" data-label="Фото">
                      <div class="zone-photo">
                          ${zone.photo_path ?
-                             `<img src="/api/zones/${zone.id}/photo?variant=thumb" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('/api/zones/${zone.id}/photo')" title="Нажмите для просмотра">` :
+                             `<img src="${zonePhotoUrl(zone, 'thumb')}" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('${zonePhotoUrl(zone)}')" title="Нажмите для просмотра">` :
                              `<div class="no-photo" title="Нет фото">📷</div>`
                          }
                      </div>
@@ -73,7 +73,7 @@ function renderZonesTable() {
             <td>
                 <div class="zone-photo">
                     ${zone.photo_path ?
-                        `<img src="/api/zones/${zone.id}/photo?variant=thumb" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('/api/zones/${zone.id}/photo')">` :
+                        `<img src="${zonePhotoUrl(zone, 'thumb')}" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('${zonePhotoUrl(zone)}')">` :
                         `<div class="no-photo" onclick="uploadPhoto(${zone.id})">📷</div>`
                     }
                     ${zone.photo_path ? 
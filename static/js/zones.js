@@ -106,7 +106,7 @@
                 <td>
                     <div class="zone-photo">
                         ${zone.photo_path ?
-                            `<img src="/api/zones/${zone.id}/photo?variant=thumb" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('/api/zones/${zone.id}/photo')">` :
+                            `<img src="${zonePhotoUrl(zone, 'thumb')}" alt="Фото зоны ${zone.id}" onclick="showPhotoModal('${zonePhotoUrl(zone)}')">` :
                             `<div class="no-photo" onclick="uploadPhoto(${zone.id})">📷</div>`
                         }
                         ${zone.photo_path ? 
@@ -1843,25 +1843,9 @@
             return;
         }
         
-        // Экспортируем существующие зоны
-        const headers = ['id', 'name', 'icon', 'duration', 'group_id', 'state', 'topic', 'mqtt_server_id'];
-        const csvData = [
-            headers,
-            ...zonesData.map(zone => [
-                zone.id,
-                zone.name,
-                zone.icon,
-                zone.duration,
-                zone.group_id,
-                zone.state,
-                zone.topic || '',
-                (zone.mqtt_server_id==null?'':zone.mqtt_server_id)
-            ])
-        ];
-        
-        const csv = csvData.map(row => row.join(',')).join('\n');
-        downloadCSV(csv, `zones_export_${new Date().toISOString().slice(0, 10)}.csv`);
-        showNotification(`Экспортировано ${zonesData.length} зон`, 'success');
+        // Экспорт существующих зон формирует сервер (корректное экранирование CSV)
+        window.location.href = '/api/zones/export?format=csv';
+        showNotification(`Экспорт ${zonesData.length} зон`, 'success');
     }
     
     // Импорт зон из CSV
@@ -1875,46 +1859,16 @@
         if (!file) return;
         
         try {
+            // Файл разбирает и проверяет сервер (потоково, с отчётом по строкам)
             const text = await file.text();
-            const lines = text.split('\n').filter(line => line.trim());
-            const headers = lines[0].split(',').map(h=>h.trim());
-            
-            // Проверяем заголовки
-            // Для импорта обязательно только поле id. Остальные — опциональны
-            if (!headers.includes('id')) {
-                showNotification('Неверный формат файла. Должен быть столбец id', 'error');
-                return;
-            }
-            
-            const zonesToImport = [];
-            for (let i = 1; i < lines.length; i++) {
-                const values = lines[i].split(',');
-                const get = (key) => {
-                    const idx = headers.indexOf(key);
-                    return idx >= 0 ? (values[idx] ?? '').trim() : '';
-                };
-                const idStr = get('id');
-                if (!idStr) continue;
-                const zone = { id: parseInt(idStr,10) };
-                const name = get('name'); if (name) zone.name = name;
-                const icon = get('icon'); if (icon) zone.icon = icon;
-                const dur = get('duration'); if (dur) zone.duration = parseInt(dur,10);
-                const gid = get('group_id'); if (gid) zone.group_id = parseInt(gid,10);
-                const state = get('state'); if (state) zone.state = state;
-                const topic = get('topic'); if (topic) zone.topic = topic;
-                const mqtt = get('mqtt_server_id'); if (mqtt) zone.mqtt_server_id = parseInt(mqtt,10);
-                zonesToImport.push(zone);
-            }
-            
-            if (zonesToImport.length === 0) {
+            const rowsCount = text.split('\n').filter(line => line.trim()).length - 1;
+            if (rowsCount <= 0) {
                 showNotification('Файл не содержит данных для импорта', 'warning');
                 return;
             }
-            
-            if (confirm(`Импортировать ${zonesToImport.length} зон?`)) {
-                await importZones(zonesToImport);
+            if (confirm(`Импортировать ${rowsCount} зон?`)) {
+                await importZones(text, 'text/csv');
             }
-            
         } catch (error) {
             console.error('Ошибка импорта CSV:', error);
             showNotification('Ошибка чтения CSV файла', 'error');
@@ -1925,13 +1879,12 @@
     }
     
     // Импорт зон в базу данных
-    async function importZones(zonesToImport) {
+    async function importZones(body, contentType) {
         try {
             showNotification('Импорт зон...', 'info');
             
             // Отправляем одним запросом
-            const payload = { zones: zonesToImport };
-            const resp = await fetch('/api/zones/import', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
+            const resp = await fetch('/api/zones/import', { method: 'POST', headers: { 'Content-Type': contentType }, body });
             if (resp.status === 401 || resp.status === 403) {
                 const err = await resp.json().catch(() => ({}));
                 const msg = err.error_code === 'PASSWORD_MUST_CHANGE'
@@ -1945,7 +1898,9 @@
             // Перезагружаем данные
             await loadData();
             if (j && j.success) {
-                showNotification(`Импорт: создано ${j.created}, обновлено ${j.updated}, ошибок ${j.failed}`, 'success');
+                const bad = (j.rows || []).filter(r => r.status === 'failed').slice(0, 3)
+                    .map(r => `строка ${r.row}: ${r.error}`).join('; ');
+                showNotification(`Импорт: создано ${j.created}, обновлено ${j.updated}, ошибок ${j.failed}` + (bad ? ` (${bad})` : ''), j.failed ? 'warning' : 'success');
             } else {
                 showNotification(j.message || 'Импорт завершился с ошибкой', 'error');
             }
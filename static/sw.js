@@ -8,13 +8,17 @@ const urlsToCache = [
     '/static/icons/icon-512.png',
     '/static/icons/icon-512-maskable.png',
 ];
+// Content-hashed JS/CSS bundles from static/dist/manifest.json, injected by
+// the /sw.js route. Immutable URLs: a new build means new names, and the
+// CACHE_NAME bump on deploy drops the previous generation in 'activate'.
+const bundleUrls = [/*__PRECACHE_BUNDLES__*/];
 
 // Install event
 self.addEventListener('install', event => {
     event.waitUntil((async () => {
         const cache = await caches.open(CACHE_NAME);
         console.log('Opened cache');
-        await Promise.all(urlsToCache.map(u => fetch(u, {cache: 'no-store'}).then(r=>{
+        await Promise.all(urlsToCache.concat(bundleUrls).map(u => fetch(u, {cache: 'no-store'}).then(r=>{
             if(!r.ok) throw new Error('bad response');
             return cache.put(u, r.clone());
         }).catch(()=>{})));
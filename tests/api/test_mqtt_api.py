@@ -108,3 +108,53 @@ class TestMqttProbeStatus:
         )
         resp = admin_client.get(f"/api/mqtt/{server['id']}/status")
         assert resp.status_code == 200
+
+
+class _FakeDiscoveryClient:
+    def __init__(self, server):
+        self.on_connect = None
+        self.on_message = None
+
+    def connect(self, host, port, keepalive):
+        self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topic, qos=0):
+        pass
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+class TestMqttTopicsSnapshot:
+    def test_topics_without_discovery(self, admin_client):
+        resp = admin_client.get("/api/mqtt/99999/topics")
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["running"] is False
+        assert data["items"] == []
+
+    def test_topics_from_running_discovery(self, admin_client):
+        from types import SimpleNamespace
+
+        from services import mqtt_discovery
+
+        try:
+            disc = mqtt_discovery.get_discovery(4242, {"host": "h"}, client_factory=_FakeDiscoveryClient)
+            viewer = disc.open_viewer()
+            client = disc._client
+            for topic in ("/devices/a/controls/K1", "/devices/b/controls/K1", "/devices/b/meta"):
+                client.on_message(client, None, SimpleNamespace(topic=topic, payload=b"1"))
+            resp = admin_client.get("/api/mqtt/4242/topics?filter=/devices/%2B/controls/%23&q=b")
+            data = resp.get_json()
+            assert data["running"] is True
+            assert [it["topic"] for it in data["items"]] == ["/devices/b/controls/K1"]
+            assert data["stats"]["topics"] == 3
+            viewer.close()
+        finally:
+            mqtt_discovery.stop_all()
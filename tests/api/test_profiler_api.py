@@ -0,0 +1,46 @@
+"""Profiler API: captures, folded downloads, per-request profiling via X-Profile."""
+
+import os
+import re
+import time
+
+os.environ["TESTING"] = "1"
+
+
+class TestProfilerApi:
+    def test_capture_lifecycle(self, admin_client):
+        resp = admin_client.post("/api/profiler/start", json={"duration_s": 5, "hz": 50})
+        assert resp.status_code == 202
+        assert admin_client.post("/api/profiler/start", json={}).status_code == 409
+        time.sleep(0.2)
+        assert admin_client.post("/api/profiler/stop").status_code == 200
+        resp = admin_client.get("/api/profiler/profile.folded")
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/plain"
+        assert ".folded" in resp.headers["Content-Disposition"]
+        lines = resp.get_data(as_text=True).splitlines()
+        assert lines
+        # role;thread;frame;... count
+        assert all(re.match(r"^[^;]+;[^;]+;.+ \d+$", line) for line in lines)
+        status = admin_client.get("/api/profiler/status").get_json()
+        assert status["capture"]["samples"] > 0
+
+    def test_bad_params(self, admin_client):
+        assert admin_client.post("/api/profiler/start", json={"hz": "fast"}).status_code == 400
+        assert admin_client.post("/api/profiler/start", json={"duration_s": -1}).status_code == 400
+
+    def test_request_profile_by_request_id(self, admin_client):
+        rid = "profile-me-0001"
+        resp = admin_client.get("/api/zones", headers={"X-Profile": "1", "X-Request-ID": rid})
+        assert resp.status_code == 200
+        assert "X-Profile-Samples" in resp.headers
+        folded = admin_client.get(f"/api/profiler/requests/{rid}.folded")
+        assert folded.status_code == 200
+        listed = admin_client.get("/api/profiler/status").get_json()["requests"]
+        assert listed[0]["request_id"] == rid
+        assert listed[0]["label"] == "GET /api/zones"
+
+    def test_unprofiled_request_and_unknown_id(self, admin_client):
+        resp = admin_client.get("/api/zones", headers={"X-Request-ID": "plain-request-01"})
+        assert "X-Profile-Samples" not in resp.headers
+        assert admin_client.get("/api/profiler/requests/plain-request-01.folded").status_code == 404
@@ -0,0 +1,60 @@
+"""/api/programs/conflicts site report and conflict checks for non-weekday schedules."""
+
+import json
+import os
+
+os.environ["TESTING"] = "1"
+
+
+def _zone(app, name, duration=30, group_id=1):
+    return app.db.create_zone({"name": name, "duration": duration, "group_id": group_id})["id"]
+
+
+class TestConflictReport:
+    def test_report_lists_overlapping_pairs(self, admin_client, app):
+        z1, z2, z3 = _zone(app, "A"), _zone(app, "B"), _zone(app, "C", group_id=2)
+        a = app.db.create_program({"name": "Утро", "time": "06:00", "days": [0, 2], "zones": [z1, z2]})
+        b = app.db.create_program({"name": "Доп", "time": "06:30", "days": [0, 3], "zones": [z1]})
+        app.db.create_program({"name": "Другая группа", "time": "06:00", "days": [0, 1], "zones": [z3]})
+        resp = admin_client.get("/api/programs/conflicts")
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body["success"] is True and body["has_conflicts"] is True
+        pairs = [(c["program_id"], c["other_program_id"], c["level"]) for c in body["conflicts"]]
+        assert pairs == [(a["id"], b["id"], "error")]
+        assert body["conflicts"][0]["days"] == [0]
+
+    def test_weather_factor_adds_warnings(self, admin_client, app):
+        z1 = _zone(app, "A", duration=60)
+        app.db.create_program({"name": "P1", "time": "06:00", "days": [0], "zones": [z1]})
+        app.db.create_program({"name": "P2", "time": "07:05", "days": [0], "zones": [z1]})
+        assert admin_client.get("/api/programs/conflicts").get_json()["conflicts"] == []
+        body = admin_client.get("/api/programs/conflicts?weather_factor=150").get_json()
+        assert [c["level"] for c in body["conflicts"]] == ["warning"]
+        assert body["weather_factor"] == 150
+
+
+class TestScheduleTypesInCheck:
+    def test_even_odd_candidate_is_checked(self, admin_client, app):
+        z1 = _zone(app, "A")
+        existing = app.db.create_program({"name": "Ежедн", "time": "06:00", "days": list(range(7)), "zones": [z1]})
+        payload = {"time": "06:10", "zones": [z1], "days": [], "schedule_type": "even-odd", "even_odd": "odd"}
+        resp = admin_client.post(
+            "/api/programs/check-conflicts", data=json.dumps(payload), content_type="application/json"
+        )
+        body = resp.get_json()
+        assert body["has_conflicts"] is True
+        assert body["conflicts"][0]["program_id"] == existing["id"]
+
+    def test_zone_duration_change_detects_new_overlap(self, admin_client, app):
+        z1, z2 = _zone(app, "A", duration=20), _zone(app, "B", duration=20)
+        app.db.create_program({"name": "P1", "time": "06:00", "days": [2], "zones": [z1]})
+        app.db.create_program({"name": "P2", "time": "06:30", "days": [2], "zones": [z2]})
+        payload = {"changes": [{"zone_id": z1, "new_duration": 45}, {"zone_id": z2, "new_duration": 10}]}
+        resp = admin_client.post(
+            "/api/zones/check-duration-conflicts-bulk", data=json.dumps(payload), content_type="application/json"
+        )
+        results = resp.get_json()["results"]
+        assert results[str(z1)]["has_conflicts"] is True
+        assert results[str(z1)]["conflicts"][0]["overlap_start"] == 6 * 60 + 30
+        assert results[str(z2)]["has_conflicts"] is False
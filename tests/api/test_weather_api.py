@@ -23,6 +23,37 @@ class TestWeatherAPI:
             resp = admin_client.get("/api/weather")
         assert resp.status_code == 200
 
+    def test_get_weather_plan(self, admin_client, app):
+        """GET /api/weather/plan plans every zone; program_id narrows it to one program."""
+        z1 = app.db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"]
+        z2 = app.db.create_zone({"name": "B", "duration": 10, "group_id": 1})["id"]
+        prog = app.db.create_program({"name": "P", "time": "06:00", "days": [0], "zones": [z2]})
+        adj = MagicMock()
+        adj._get_weather.return_value = MagicMock(
+            temperature=30.0,
+            temperature_min=20.0,
+            temperature_max=34.0,
+            precipitation_24h=0.0,
+            precipitation_forecast_12h=0.0,
+            wind_speed=1.0,
+        )
+        with patch("services.weather.get_weather_adjustment", return_value=adj):
+            data = admin_client.get("/api/weather/plan").get_json()
+            only = admin_client.get("/api/weather/plan?program_id=%d" % prog["id"]).get_json()
+        assert data["available"] is True
+        assert [z["zone_id"] for z in data["zones"]] == [z1, z2]
+        assert {"decision", "runtime_min", "cycles", "total_min"} <= set(data["zones"][0])
+        assert [z["zone_id"] for z in only["zones"]] == [z2]
+        assert list(only["programs"]) == [str(prog["id"])]
+
+    def test_get_weather_plan_no_weather(self, admin_client):
+        """GET /api/weather/plan without weather data reports unavailable."""
+        adj = MagicMock()
+        adj._get_weather.return_value = None
+        with patch("services.weather.get_weather_adjustment", return_value=adj):
+            data = admin_client.get("/api/weather/plan").get_json()
+        assert data["available"] is False
+
     def test_get_weather_settings(self, admin_client):
         """GET /api/settings/weather returns settings."""
         resp = admin_client.get("/api/settings/weather")
@@ -0,0 +1,122 @@
+"""/api/zones/import (JSON + CSV, per-row report) and /api/zones/export."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+os.environ["TESTING"] = "1"
+
+
+def _post_json(client, payload):
+    return client.post("/api/zones/import", data=json.dumps(payload), content_type="application/json")
+
+
+class TestZonesImport:
+    def test_json_import_returns_per_row_report(self, admin_client, app):
+        zone = app.db.create_zone({"name": "Keep", "duration": 5, "group_id": 1})
+        resp = _post_json(
+            admin_client,
+            {"zones": [{"id": zone["id"], "duration": 20}, {"name": "Fresh", "duration": 4}, {"id": 1, "duration": 0}]},
+        )
+        assert resp.status_code == 200, resp.data
+        body = resp.get_json()
+        assert body["success"] is True
+        assert (body["created"], body["updated"], body["failed"]) == (1, 1, 1)
+        assert [r["row"] for r in body["rows"]] == [1, 2, 3]
+        assert body["rows"][2]["status"] == "failed"
+        assert "duration" in body["rows"][2]["error"]
+        assert app.db.get_zone(zone["id"])["duration"] == 20
+        assert app.db.get_zone(body["rows"][1]["id"])["name"] == "Fresh"
+
+    def test_bare_array_body_accepted(self, admin_client):
+        resp = _post_json(admin_client, [{"name": "Arr"}])
+        assert resp.status_code == 200
+        assert resp.get_json()["created"] == 1
+
+    def test_csv_import(self, admin_client, app):
+        csv_body = 'id,name,duration,group_id,state\n,"Газон, север",15,1,on\n'.encode()
+        resp = admin_client.post("/api/zones/import", data=csv_body, content_type="text/csv")
+        assert resp.status_code == 200, resp.data
+        row = resp.get_json()["rows"][0]
+        assert row["status"] == "created"
+        zone = app.db.get_zone(row["id"])
+        assert zone["name"] == "Газон, север"
+        assert zone["state"] == "off"  # state column never imported
+
+    def test_empty_and_malformed_bodies(self, admin_client):
+        assert _post_json(admin_client, {"zones": []}).status_code == 400
+        resp = admin_client.post("/api/zones/import", data=b"[{", content_type="application/json")
+        assert resp.status_code == 400
+
+    def test_batch_side_effects_run_once(self, admin_client, monkeypatch):
+        from services import sse_hub
+
+        calls = []
+        monkeypatch.setattr(sse_hub, "refresh_subscriptions", lambda: calls.append(1) or {})
+        resp = _post_json(admin_client, {"zones": [{"name": f"S{i}", "topic": f"/t/{i}"} for i in range(20)]})
+        assert resp.status_code == 200
+        assert calls == [1]
+
+    def test_500_zones_import_is_fast(self, admin_client, app):
+        zones = [
+            {"name": f"Зона {i}", "duration": 10, "group_id": 1, "topic": f"/devices/wb/controls/K{i}"}
+            for i in range(500)
+        ]
+        started = time.perf_counter()
+        resp = _post_json(admin_client, {"zones": zones})
+        elapsed = time.perf_counter() - started
+        assert resp.status_code == 200
+        assert resp.get_json()["created"] == 500
+        assert elapsed < 1.0, f"500-zone import took {elapsed:.3f}s"
+        # Second pass updates every row in place.
+        ids = [r["id"] for r in resp.get_json()["rows"]]
+        resp2 = _post_json(admin_client, {"zones": [{"id": zid, "duration": 12} for zid in ids]})
+        assert resp2.get_json()["updated"] == 500
+
+    def test_audit_records_counts_not_body(self, admin_client, app):
+        resp = _post_json(admin_client, {"zones": [{"name": "Audited", "icon": "x" * 5000}, {"id": 1, "duration": 0}]})
+        assert resp.status_code == 200
+        rows = app.db.get_audit_logs(action_type="zones_import_bulk")
+        payload = json.loads(rows[0]["payload_json"])
+        assert payload == {"rows": 2, "created": 1, "updated": 0, "failed": 1}
+
+    def test_too_many_rows_is_413(self, admin_client, monkeypatch):
+        from services import zones_bulk
+
+        monkeypatch.setattr(zones_bulk, "MAX_IMPORT_ROWS", 2)
+        resp = _post_json(admin_client, [{"name": f"T{i}"} for i in range(3)])
+        assert resp.status_code == 413
+
+    def test_other_value_error_is_400(self, admin_client, monkeypatch):
+        from services import zones_bulk
+
+        def _bad(rows, db, scheduler=None):
+            raise ValueError("bad value")
+
+        monkeypatch.setattr(zones_bulk, "import_zones", _bad)
+        resp = _post_json(admin_client, [{"name": "X"}])
+        assert resp.status_code == 400
+
+
+class TestZonesExport:
+    def test_csv_export_round_trip(self, admin_client, app):
+        app.db.create_zone({"name": "Export, me", "duration": 9, "group_id": 1, "topic": "/x/1"})
+        resp = admin_client.get("/api/zones/export")
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/csv"
+        assert "attachment" in resp.headers["Content-Disposition"]
+        text = resp.get_data(as_text=True)
+        assert text.startswith("id,name,icon,duration,group_id,state,topic,mqtt_server_id\n")
+        assert '"Export, me"' in text
+        back = admin_client.post("/api/zones/import", data=text.encode("utf-8"), content_type="text/csv")
+        body = back.get_json()
+        assert body["failed"] == 0 and body["created"] == 0
+
+    def test_json_export(self, admin_client, app):
+        app.db.create_zone({"name": "J", "duration": 9, "group_id": 1})
+        resp = admin_client.get("/api/zones/export?format=json")
+        assert resp.status_code == 200
+        assert any(z["name"] == "J" for z in json.loads(resp.get_data(as_text=True))["zones"])
+        assert admin_client.get("/api/zones/export?format=xml").status_code == 400
@@ -7,12 +7,14 @@ Covers:
 * GET ?variant=thumb returns 400x400; default returns main
 * DELETE removes both files and clears both DB columns
 * POST /rotate rotates both files (h<->w swap on 90deg)
+* content-hashed names: immutable URL, Range, stale hashes collected
 """
 
 from __future__ import annotations
 
 import io
 import os
+import re
 
 from PIL import Image
 
@@ -53,14 +55,34 @@ def _exif_rotate6_jpeg(width, height):
     return buf.getvalue()
 
 
-def _zone_photo_paths(zone_id, ext=".webp"):
-    base = UPLOAD_FOLDER
-    return (
-        os.path.join(base, f"ZONE_{zone_id}{ext}"),
-        os.path.join(base, f"ZONE_{zone_id}_thumb{ext}"),
+def _zone_photo_paths(app, zone_id):
+    """Filesystem paths of the zone's current main and thumb (from the DB)."""
+    z = app.db.get_zone(zone_id)
+    return tuple(
+        os.path.join(UPLOAD_FOLDER, os.path.basename(z[col])) if z.get(col) else None
+        for col in ("photo_path", "photo_thumb")
     )
 
 
+def _hashed(zone_id, thumb=False):
+    return re.compile(rf"ZONE_{zone_id}{'_thumb' if thumb else ''}\.[0-9a-f]{{10}}\.webp$")
+
+
+def _upload(admin_client, zone_id, size=(600, 400), color="red"):
+    resp = admin_client.post(
+        f"/api/zones/{zone_id}/photo",
+        data={"photo": (io.BytesIO(_png_bytes(size, color)), "p.png")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200, resp.data
+    return resp.get_json()
+
+
+def _zone_files(zone_id):
+    pat = re.compile(rf"^ZONE_{zone_id}(_thumb)?(\.[0-9a-f]{{10}})?\.webp$")
+    return sorted(n for n in os.listdir(UPLOAD_FOLDER) if pat.match(n))
+
+
 class TestUploadProducesTwoVariants:
     def test_upload_produces_main_and_thumb(self, admin_client, app):
         zone = app.db.create_zone({"name": "Two", "duration": 10, "group_id": 1})
@@ -73,10 +95,10 @@ class TestUploadProducesTwoVariants:
         assert resp.status_code == 200, resp.data
         body = resp.get_json()
         assert body["success"] is True
-        assert body["photo_path"].endswith(f"ZONE_{zone['id']}.webp")
-        assert body["photo_thumb"].endswith(f"ZONE_{zone['id']}_thumb.webp")
+        assert _hashed(zone["id"]).search(body["photo_path"])
+        assert _hashed(zone["id"], thumb=True).search(body["photo_thumb"])
 
-        main_fs, thumb_fs = _zone_photo_paths(zone["id"])
+        main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
         assert os.path.exists(main_fs), "main file missing"
         assert os.path.exists(thumb_fs), "thumb file missing"
 
@@ -91,8 +113,8 @@ class TestUploadProducesTwoVariants:
 
         # DB has both columns set.
         z = app.db.get_zone(zone["id"])
-        assert z["photo_path"].endswith(f"ZONE_{zone['id']}.webp")
-        assert z["photo_thumb"].endswith(f"ZONE_{zone['id']}_thumb.webp")
+        assert z["photo_path"] == body["photo_path"]
+        assert z["photo_thumb"] == body["photo_thumb"]
 
 
 class TestUploadSizeLimit:
@@ -142,7 +164,7 @@ class TestExifOrientation:
             content_type="multipart/form-data",
         )
         assert resp.status_code == 200, resp.data
-        _main_fs, thumb_fs = _zone_photo_paths(zone["id"])
+        _main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
         with Image.open(thumb_fs) as t:
             assert t.size == (400, 400)
 
@@ -186,6 +208,7 @@ class TestThumbVariantEndpoint:
             content_type="multipart/form-data",
         )
         # Simulate legacy: clear photo_thumb but keep photo_path.
+        _main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
         z = app.db.get_zone(zone["id"])
         app.db.update_zone_photo(
             zone["id"],
@@ -194,7 +217,6 @@ class TestThumbVariantEndpoint:
             update_thumb=True,
         )
         # Also delete the thumb file so the fallback has to work.
-        _main_fs, thumb_fs = _zone_photo_paths(zone["id"])
         if os.path.exists(thumb_fs):
             os.remove(thumb_fs)
         resp = admin_client.get(
@@ -217,7 +239,7 @@ class TestDeleteRemovesBothVariants:
             data={"photo": (io.BytesIO(png), "d.png")},
             content_type="multipart/form-data",
         )
-        main_fs, thumb_fs = _zone_photo_paths(zone["id"])
+        main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
         assert os.path.exists(main_fs) and os.path.exists(thumb_fs)
 
         # Delete (archives main+thumb to OLD/ on next upload, but DELETE removes outright).
@@ -241,7 +263,7 @@ class TestRotateRotatesBothVariants:
             data={"photo": (io.BytesIO(png), "r.png")},
             content_type="multipart/form-data",
         )
-        main_fs, thumb_fs = _zone_photo_paths(zone["id"])
+        main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
         with Image.open(main_fs) as m:
             mw_before, mh_before = m.size
         with Image.open(thumb_fs) as t:
@@ -254,6 +276,13 @@ class TestRotateRotatesBothVariants:
             json={"angle": 90},
         )
         assert resp.status_code == 200, resp.data
+        # Rotated main lives under a new hash and the old file is gone (the
+        # solid-colour square thumb rotates to identical bytes, same hash).
+        old_main_fs = main_fs
+        main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
+        assert main_fs != old_main_fs
+        assert not os.path.exists(old_main_fs)
+        assert _zone_files(zone["id"]) == sorted([os.path.basename(main_fs), os.path.basename(thumb_fs)])
 
         # Main: width/height swapped.
         with Image.open(main_fs) as m:
@@ -265,3 +294,50 @@ class TestRotateRotatesBothVariants:
         # the file is still a readable image — proves the rotate didn't skip it).
         with Image.open(thumb_fs) as t:
             assert t.size == (400, 400)
+
+
+class TestContentAddressedDelivery:
+    def test_hashed_url_is_immutable(self, admin_client, app):
+        zone = app.db.create_zone({"name": "Hash", "duration": 10, "group_id": 1})
+        body = _upload(admin_client, zone["id"])
+        main_fs, thumb_fs = _zone_photo_paths(app, zone["id"])
+
+        info = admin_client.get(f"/api/zones/{zone['id']}/photo").get_json()
+        assert info["photo_thumb_url"] == body["photo_thumb_url"]
+        assert info["photo_thumb_url"].startswith(f"/api/zones/{zone['id']}/photo/")
+
+        resp = admin_client.get(body["photo_thumb_url"])
+        assert resp.status_code == 200
+        assert resp.mimetype == "image/webp"
+        assert "immutable" in resp.headers["Cache-Control"]
+        assert "max-age=31536000" in resp.headers["Cache-Control"]
+        with open(thumb_fs, "rb") as f:
+            assert resp.data == f.read()
+        with open(main_fs, "rb") as f:
+            assert admin_client.get(body["photo_url"]).data == f.read()
+
+    def test_range_request(self, admin_client, app):
+        zone = app.db.create_zone({"name": "Range", "duration": 10, "group_id": 1})
+        body = _upload(admin_client, zone["id"])
+        main_fs, _thumb_fs = _zone_photo_paths(app, zone["id"])
+        resp = admin_client.get(body["photo_url"], headers={"Range": "bytes=0-9"})
+        assert resp.status_code == 206
+        with open(main_fs, "rb") as f:
+            assert resp.data == f.read(10)
+        assert resp.headers["Content-Range"].startswith("bytes 0-9/")
+
+    def test_reupload_collects_old_hashes(self, admin_client, app):
+        zone = app.db.create_zone({"name": "GC", "duration": 10, "group_id": 1})
+        first = _upload(admin_client, zone["id"], color="red")
+        second = _upload(admin_client, zone["id"], color="blue")
+        assert first["photo_path"] != second["photo_path"]
+        assert _zone_files(zone["id"]) == sorted(os.path.basename(second[k]) for k in ("photo_path", "photo_thumb"))
+        # a stale hash is not served any more
+        assert admin_client.get(first["photo_url"]).status_code == 404
+        assert admin_client.get(second["photo_url"]).status_code == 200
+
+    def test_delete_collects_all_files(self, admin_client, app):
+        zone = app.db.create_zone({"name": "GC2", "duration": 10, "group_id": 1})
+        _upload(admin_client, zone["id"])
+        assert admin_client.delete(f"/api/zones/{zone['id']}/photo").status_code == 200
+        assert _zone_files(zone["id"]) == []
@@ -0,0 +1,157 @@
+"""Online backup: paged copy, gzip archive + manifest, verification, restore, CLI (db/backup.py)."""
+
+import gzip
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+os.environ["TESTING"] = "1"
+
+from db import backup as backup_mod
+from db.backup import BackupRepository
+
+
+def _zone_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(r[0] for r in conn.execute("SELECT name FROM zones"))
+    finally:
+        conn.close()
+
+
+def _repo(test_db, tmp_path):
+    return BackupRepository(test_db.db_path, str(tmp_path / "bak"))
+
+
+class TestCreate:
+    def test_archive_manifest_and_contents(self, test_db, tmp_path):
+        test_db.create_zone({"name": "Газон", "duration": 10, "group_id": 1})
+        repo = _repo(test_db, tmp_path)
+
+        path = repo.create_backup()
+
+        assert path.endswith(".db.gz")
+        [entry] = repo.read_manifest()["backups"]
+        assert entry["file"] == os.path.basename(path)
+        assert entry["integrity"] == "ok"
+        assert entry["sha256"] == backup_mod._sha256(path)
+        assert entry["archive_bytes"] < entry["db_bytes"]
+        assert entry["user_version"] == test_db._migrations.SCHEMA_VERSION
+        # только архив и манифест, без промежуточных файлов
+        assert sorted(os.listdir(repo.backup_dir)) == sorted([os.path.basename(path), "manifest.json"])
+        unpacked = tmp_path / "unpacked.db"
+        unpacked.write_bytes(gzip.decompress(Path(path).read_bytes()))
+        assert _zone_names(str(unpacked)) == _zone_names(test_db.db_path)
+
+    def test_facade_still_returns_path(self, test_db, tmp_path):
+        test_db.logs.backup_dir = str(tmp_path / "bak")
+        assert test_db.create_backup().endswith(".db.gz")
+
+    def test_rotation_prunes_files_and_manifest(self, test_db, tmp_path):
+        repo = _repo(test_db, tmp_path)
+        paths = []
+        for i in range(4):
+            with patch.object(backup_mod, "datetime") as dt:
+                dt.now.return_value.strftime.return_value = f"20260101_00000{i}"
+                dt.now.return_value.isoformat.return_value = "2026-01-01T00:00:00"
+                paths.append(repo.create_backup())
+            os.utime(paths[-1], (i, i))
+        repo._cleanup_old_backups(keep_count=2)
+        assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+        assert [e["file"] for e in repo.read_manifest()["backups"]] == [os.path.basename(p) for p in paths[2:]]
+
+    def test_copy_falls_back_to_single_step_under_constant_writes(self, test_db, tmp_path, monkeypatch):
+        conn = sqlite3.connect(test_db.db_path)
+        conn.executemany("INSERT INTO logs(type, details) VALUES ('t', ?)", [("x" * 1000,)] * 2000)
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(backup_mod, "MAX_RESTARTS", 1)
+        stop = threading.Event()
+
+        def writer():
+            w = sqlite3.connect(test_db.db_path, timeout=5)
+            while not stop.is_set():
+                w.execute("INSERT INTO logs(type, details) VALUES ('w', 'x')")
+                w.commit()
+            w.close()
+
+        t = threading.Thread(target=writer)
+        t.start()
+        try:
+            dst = str(tmp_path / "copy.db")
+            restarts = _repo(test_db, tmp_path)._copy_online(dst, pages=1, sleep=0.001)
+        finally:
+            stop.set()
+            t.join(5)
+        assert restarts >= 1
+        assert backup_mod._integrity(dst) == "ok"
+
+
+class TestVerifyAndRestore:
+    def test_verify_detects_corrupted_archive(self, test_db, tmp_path):
+        repo = _repo(test_db, tmp_path)
+        path = repo.create_backup()
+        assert repo.verify_backup(path)["ok"] is True
+        data = bytearray(Path(path).read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        Path(path).write_bytes(bytes(data))
+        report = repo.verify_backup(os.path.basename(path))
+        assert report["ok"] is False
+
+    def test_legacy_uncompressed_backup_is_listed_and_verifiable(self, test_db, tmp_path):
+        repo = _repo(test_db, tmp_path)
+        os.makedirs(repo.backup_dir)
+        legacy = os.path.join(repo.backup_dir, "irrigation_backup_20250101_000000.db")
+        src, dst = sqlite3.connect(test_db.db_path), sqlite3.connect(legacy)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        assert [e["file"] for e in repo.list_backups()] == [os.path.basename(legacy)]
+        assert repo.verify_backup(legacy) == {
+            "file": os.path.basename(legacy),
+            "in_manifest": False,
+            "integrity": "ok",
+            "ok": True,
+        }
+
+    def test_restore_replaces_live_data_and_keeps_safety_copy(self, test_db, tmp_path):
+        test_db.create_zone({"name": "До бэкапа", "duration": 10, "group_id": 1})
+        repo = _repo(test_db, tmp_path)
+        path = repo.create_backup()
+        test_db.create_zone({"name": "После бэкапа", "duration": 10, "group_id": 1})
+        live = sqlite3.connect(test_db.db_path)  # открытое соединение видит восстановленные данные
+
+        report = repo.restore_backup(path)
+
+        assert report["integrity"] == "ok"
+        assert report["safety_copy"] and os.path.exists(report["safety_copy"])
+        assert [r[0] for r in live.execute("SELECT name FROM zones")] == ["До бэкапа"]
+        live.close()
+        assert [z["name"] for z in test_db.get_zones()] == ["До бэкапа"]
+
+    def test_restore_refuses_bad_archive(self, test_db, tmp_path):
+        repo = _repo(test_db, tmp_path)
+        os.makedirs(repo.backup_dir)
+        bad = os.path.join(repo.backup_dir, "irrigation_backup_20250101_000000.db.gz")
+        with gzip.open(bad, "wb") as f:
+            f.write(b"not a database" * 100)
+        try:
+            repo.restore_backup(bad)
+        except backup_mod.BackupError:
+            pass
+        else:
+            raise AssertionError("corrupted archive was restored")
+        assert _zone_names(test_db.db_path) == []
+
+
+class TestCli:
+    def test_create_list_verify(self, test_db, tmp_path, capsys):
+        args = ["--db", test_db.db_path, "--dir", str(tmp_path / "bak")]
+        assert backup_mod.main([*args, "create"]) == 0
+        path = capsys.readouterr().out.strip().splitlines()[-1]
+        assert backup_mod.main([*args, "list"]) == 0
+        assert os.path.basename(path) in capsys.readouterr().out
+        assert backup_mod.main([*args, "verify", os.path.basename(path)]) == 0
+        assert backup_mod.main([*args, "verify", "missing.db.gz"]) == 1
@@ -131,3 +131,58 @@ class TestMigrations:
         assert "last_watering_time" not in cols, (
             "last_watering_time column should have been dropped by the zones_drop_last_watering_time migration"
         )
+
+
+class TestSchemaVersionFastPath:
+    def _user_version(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_fresh_db_is_stamped(self, test_db_path):
+        from database import IrrigationDB
+        from db.migrations import MigrationRunner
+
+        IrrigationDB(db_path=test_db_path)
+        assert self._user_version(test_db_path) == MigrationRunner.SCHEMA_VERSION == len(MigrationRunner.MIGRATIONS)
+
+    def test_current_schema_skips_migration_chain(self, test_db_path):
+        from unittest.mock import patch
+
+        from database import IrrigationDB
+        from db.migrations import MigrationRunner
+
+        db = IrrigationDB(db_path=test_db_path)
+        with patch.object(MigrationRunner, "_apply_named_migration") as apply:
+            db.init_database()
+        apply.assert_not_called()
+
+    def test_missing_journal_row_forces_that_migration(self, test_db_path):
+        from unittest.mock import patch
+
+        from database import IrrigationDB
+        from db.migrations import MigrationRunner
+
+        db = IrrigationDB(db_path=test_db_path)
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("DELETE FROM migrations WHERE name = 'create_audit_log'")
+        conn.commit()
+        conn.close()
+        with patch.object(MigrationRunner, "_apply_named_migration", autospec=True) as apply:
+            db.init_database()
+        assert [c.args[2] for c in apply.call_args_list] == ["create_audit_log"]
+
+    def test_rollback_clears_stamp_and_next_boot_reapplies(self, test_db_path):
+        from database import IrrigationDB
+
+        db = IrrigationDB(db_path=test_db_path)
+        assert db._migrations.rollback_migration("telegram_create_bot_idempotency")
+        assert self._user_version(test_db_path) == 0
+        db.init_database()
+        conn = sqlite3.connect(test_db_path)
+        row = conn.execute("SELECT 1 FROM migrations WHERE name = 'telegram_create_bot_idempotency'").fetchone()
+        conn.close()
+        assert row is not None
+        assert self._user_version(test_db_path) == db._migrations.SCHEMA_VERSION
@@ -0,0 +1,212 @@
+"""Retention: batched purge, rollup tiers, policy overrides, incremental vacuum (db/retention.py)."""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from db.retention import DEFAULT_POLICIES, RetentionPolicy, RetentionRepository, delete_in_batches
+
+TODAY = date(2026, 6, 30)
+
+
+def _exec(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _run(path, zone_id, start, end, liters=None, status="ok"):
+    _exec(
+        path,
+        "INSERT INTO zone_runs(zone_id, group_id, start_utc, end_utc, start_monotonic, total_liters, status) "
+        "VALUES (?, 1, ?, ?, 0, ?, ?)",
+        (zone_id, start, end, liters, status),
+    )
+
+
+def _policy(repo, table):
+    return next(p for p in repo.get_policies() if p.table == table)
+
+
+class TestZoneRunsRollup:
+    def test_purged_runs_land_in_daily_tier_and_last_run_is_kept(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        _run(test_db_path, zid, "2026-01-10T12:00:00Z", "2026-01-10T12:15:00Z", liters=10.0)
+        _run(test_db_path, zid, "2026-01-10T13:00:00Z", "2026-01-10T13:05:00Z")
+        _run(test_db_path, zid, "2026-01-10T14:00:00Z", "2026-01-10T14:20:00Z", status="failed")
+        _run(test_db_path, zid, "2026-01-11T12:00:00Z", "2026-01-11T12:10:00Z", liters=4.0)
+        _run(test_db_path, zid, "2026-01-12T12:00:00Z", None)  # открытый прогон
+        repo = test_db.retention
+        policy = RetentionPolicy("zone_runs", "start_utc", 30, rollup="zone_runs_daily")
+
+        stats = repo.purge(policy, today=TODAY)
+
+        assert stats["deleted"] == 3
+        # последний успешный прогон (11.01) и открытый остаются
+        remaining = _exec(test_db_path, "SELECT start_utc FROM zone_runs ORDER BY start_utc")
+        assert [r[0] for r in remaining] == ["2026-01-11T12:00:00Z", "2026-01-12T12:00:00Z"]
+        assert test_db.get_last_watering_time(zid) == "2026-01-11T12:10:00Z"
+        [day] = test_db.get_zone_runs_daily([zid], "2026-01-01", "2026-01-31")
+        assert (day["runs"], day["failed_runs"], day["minutes"]) == (2, 1, 20)
+        assert (day["liters"], day["liters_missing"]) == (10.0, 2)
+
+    def test_repeated_purges_add_up(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        policy = RetentionPolicy("zone_runs", "start_utc", 30, rollup="zone_runs_daily")
+        _run(test_db_path, zid, "2026-02-01T12:00:00Z", "2026-02-01T12:10:00Z", liters=1.0)
+        _run(test_db_path, zid, "2026-05-01T12:00:00Z", "2026-05-01T12:10:00Z")
+        test_db.retention.purge(policy, today=TODAY)
+        _run(test_db_path, zid, "2026-02-01T15:00:00Z", "2026-02-01T15:10:00Z", liters=2.0)
+        test_db.retention.purge(policy, today=TODAY)
+        [day] = test_db.get_zone_runs_daily([zid], "2026-02-01", "2026-02-01")
+        assert (day["runs"], day["minutes"], day["liters"]) == (2, 20, 3.0)
+
+    def test_daily_tier_folds_into_monthly(self, test_db, test_db_path):
+        for day, minutes in (("2024-03-01", 10), ("2024-03-02", 5), ("2024-04-01", 7)):
+            _exec(
+                test_db_path,
+                "INSERT INTO zone_runs_daily(zone_id, day, runs, minutes, liters) VALUES (1, ?, 1, ?, NULL)",
+                (day, minutes),
+            )
+        stats = test_db.retention.purge(_policy(test_db.retention, "zone_runs_daily"), today=TODAY)
+        assert stats["deleted"] == 3
+        rows = _exec(test_db_path, "SELECT month, runs, minutes, liters FROM zone_runs_monthly ORDER BY month")
+        assert rows == [("2024-03", 2, 15, None), ("2024-04", 1, 7, None)]
+
+
+class TestWaterUsage:
+    def test_statistics_unchanged_after_purge(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        for days_ago, liters in ((2, 5.0), (10, 7.5), (10, 2.5), (20, 4.0)):
+            _exec(
+                test_db_path,
+                "INSERT INTO water_usage(zone_id, liters, timestamp) VALUES (?, ?, datetime('now', ?))",
+                (zid, liters, f"-{days_ago} days"),
+            )
+        before = test_db.get_water_statistics(days=30)
+        test_db.set_setting_value("retention.policies", '{"water_usage": 5}')
+
+        report = test_db.run_retention(vacuum=False)
+
+        assert next(t for t in report["tables"] if t["table"] == "water_usage")["deleted"] == 3
+        assert _exec(test_db_path, "SELECT COUNT(*) FROM water_usage")[0][0] == 1
+        after = test_db.get_water_statistics(days=30)
+        assert after["total_liters"] == before["total_liters"] == 19.0
+        assert after["avg_daily"] == before["avg_daily"]
+        assert after["zone_usage"] == before["zone_usage"]
+
+    def test_monthly_tier_counts_in_statistics(self, test_db, test_db_path):
+        _exec(
+            test_db_path,
+            "INSERT INTO water_usage_monthly(zone_id, month, liters, days) VALUES (1, strftime('%Y-%m', 'now'), 30, 3)",
+        )
+        stats = test_db.get_water_statistics(days=30)
+        assert stats["total_liters"] == 30.0
+        assert stats["avg_daily"] == 10.0
+
+
+class TestPolicies:
+    def test_overrides_and_floors(self, test_db):
+        test_db.set_setting_value(
+            "retention.policies",
+            json.dumps({"logs": 30, "bot_audit": {"enabled": False}, "zone_runs_daily": 5, "weather_log": "x"}),
+        )
+        policies = {p.table: p for p in test_db.get_retention_policies()}
+        assert policies["logs"].keep_days == 30
+        assert policies["bot_audit"].enabled is False
+        assert policies["zone_runs_daily"].keep_days == 62  # история читает 30 дней из дневного уровня
+        assert policies["weather_log"].keep_days == 90  # некорректное значение игнорируется
+
+    def test_invalid_json_falls_back_to_defaults(self, test_db):
+        test_db.set_setting_value("retention.policies", "{not json")
+        assert test_db.get_retention_policies() == list(DEFAULT_POLICIES)
+
+
+class TestBatching:
+    def test_small_batches_and_deadline(self, test_db, test_db_path):
+        for i in range(10):
+            _exec(test_db_path, "INSERT INTO logs(type, details, timestamp) VALUES ('t', ?, '2020-01-01')", (str(i),))
+        connect = test_db.retention._connect
+        stats = delete_in_batches(connect, "logs", "timestamp < ?", ("2021-01-01",), batch_size=3, pause=0)
+        assert stats == {"deleted": 10, "batches": 4}
+        for i in range(10):
+            _exec(test_db_path, "INSERT INTO logs(type, details, timestamp) VALUES ('t', ?, '2020-01-01')", (str(i),))
+        stats = delete_in_batches(
+            connect, "logs", "timestamp < ?", ("2021-01-01",), batch_size=3, pause=0, deadline=time.monotonic()
+        )
+        assert stats == {"deleted": 3, "batches": 1}
+
+    def test_missing_table_is_reported_not_raised(self, test_db, test_db_path):
+        _exec(test_db_path, "DROP TABLE weather_balance_log")
+        report = test_db.run_retention(vacuum=False)
+        entry = next(t for t in report["tables"] if t["table"] == "weather_balance_log")
+        assert "error" in entry
+
+
+class TestIncrementalVacuum:
+    def test_purge_reclaims_space(self, test_db, test_db_path):
+        payload = "x" * 2000
+        conn = sqlite3.connect(test_db_path)
+        conn.executemany("INSERT INTO logs(type, details, timestamp) VALUES ('t', ?, '2020-01-01')", [(payload,)] * 500)
+        conn.commit()
+        conn.close()
+        report = test_db.run_retention(pause=0)
+        vac = report["vacuum"]
+        assert vac["auto_vacuum"] == "incremental"
+        assert vac["freelist_before"] > 0
+        assert vac["freelist_after"] == 0
+        assert vac["reclaimed_bytes"] >= 500 * 2000
+
+    def test_nightly_pass_never_converts_legacy_database(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "legacy.db")
+        _exec(path, "CREATE TABLE t (x TEXT)")
+        statements = []
+        real_connect = sqlite3.connect
+
+        def connect(*a, **kw):
+            conn = real_connect(*a, **kw)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        monkeypatch.setattr(sqlite3, "connect", connect)
+        vac = RetentionRepository(path).incremental_vacuum()
+        assert vac["auto_vacuum"] == "none"
+        assert vac["needs_conversion"] is True
+        assert not any(s.strip().upper().startswith("VACUUM") for s in statements)
+
+    def test_legacy_database_is_converted_by_maintenance_step(self, tmp_path):
+        path = str(tmp_path / "legacy.db")
+        _exec(path, "CREATE TABLE t (x TEXT)")
+        repo = RetentionRepository(path)
+        assert repo.convert_to_incremental()["converted"] is True
+        assert repo.convert_to_incremental()["converted"] is False
+        vac = repo.incremental_vacuum()
+        assert (vac["auto_vacuum"], vac["needs_conversion"]) == ("incremental", False)
+
+    def test_conversion_refused_without_disk_room(self, tmp_path, monkeypatch):
+        from db.retention import RetentionError
+
+        path = str(tmp_path / "legacy.db")
+        _exec(path, "CREATE TABLE t (x TEXT)")
+        repo = RetentionRepository(path)
+        monkeypatch.setattr(repo, "_room_for_vacuum", lambda _bytes: False)
+        with pytest.raises(RetentionError):
+            repo.convert_to_incremental()
+
+    def test_cli_converts(self, tmp_path, capsys):
+        from db.retention import main
+
+        path = str(tmp_path / "legacy.db")
+        _exec(path, "CREATE TABLE t (x TEXT)")
+        assert main(["--db", path, "convert-vacuum"]) == 0
+        assert json.loads(capsys.readouterr().out)["auto_vacuum"] == "incremental"
@@ -0,0 +1,129 @@
+"""Tests for the secrets snapshot and key rotation (db/secrets.py)."""
+
+import os
+import sqlite3
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+import utils
+from db import secrets
+from db.secrets import SecretsError
+
+
+@pytest.fixture
+def key_dir(tmp_path, monkeypatch):
+    """Key files in a temp directory, keys reloaded before and after."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("IRRIG_SECRET_KEY", raising=False)
+    utils.reload_secret_key()
+    yield tmp_path
+    utils.reload_secret_key()
+
+
+def _stored_password(db_path, server_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT password FROM mqtt_servers WHERE id = ?", (server_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestSnapshot:
+    def test_repeat_lookup_is_served_without_decrypt(self, test_db, key_dir, monkeypatch):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883, "password": "pw"})
+        assert test_db.get_mqtt_server(server["id"])["password"] == "pw"
+
+        calls = []
+        monkeypatch.setattr("db.mqtt.decrypt_secret", lambda *a: calls.append(a))
+        before = secrets.snapshot_stats()
+        for _ in range(5):
+            assert test_db.get_mqtt_server(server["id"])["password"] == "pw"
+        after = secrets.snapshot_stats()
+        assert calls == []
+        assert after["hits"] - before["hits"] == 5
+        assert after["misses"] == before["misses"]
+
+    def test_returned_rows_are_copies(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883})
+        test_db.get_mqtt_server(server["id"])["host"] = "mutated"
+        assert test_db.get_mqtt_server(server["id"])["host"] == "h"
+
+    def test_update_invalidates(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883, "password": "a"})
+        test_db.get_mqtt_server(server["id"])
+        assert test_db.update_mqtt_server(server["id"], {"name": "S", "host": "h2", "port": 1883, "password": "b"})
+        fetched = test_db.get_mqtt_server(server["id"])
+        assert (fetched["host"], fetched["password"]) == ("h2", "b")
+
+    def test_delete_invalidates(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883})
+        test_db.get_mqtt_server(server["id"])
+        assert test_db.delete_mqtt_server(server["id"])
+        assert test_db.get_mqtt_server(server["id"]) is None
+
+    def test_write_from_another_process_is_seen_after_recheck(self, test_db, key_dir, monkeypatch):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883})
+        test_db.get_mqtt_server(server["id"])
+        conn = sqlite3.connect(test_db.db_path)
+        conn.execute("UPDATE mqtt_servers SET host = 'other' WHERE id = ?", (server["id"],))
+        conn.commit()
+        conn.close()
+        # в пределах RECHECK_SEC ещё старое значение, после — новое
+        assert test_db.get_mqtt_server(server["id"])["host"] == "h"
+        monkeypatch.setattr(secrets, "RECHECK_SEC", 0.0)
+        assert test_db.get_mqtt_server(server["id"])["host"] == "other"
+
+
+class TestRotation:
+    def test_rotate_reencrypts_everything(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883, "password": "pw"})
+        test_db.set_setting_value("telegram_bot_token_encrypted", utils.encrypt_secret("tok"))
+        old_key = utils._get_secret_key()
+        old_stored = _stored_password(test_db.db_path, server["id"])
+
+        report = test_db.rotate_secret_key()
+
+        assert report == {"mqtt_servers": 1, "settings": 1}
+        new_key = (key_dir / ".irrig_secret_key").read_bytes()
+        assert new_key != old_key
+        assert (key_dir / ".irrig_secret_key.prev").read_bytes() == old_key
+        stored = _stored_password(test_db.db_path, server["id"])
+        assert stored != old_stored
+        assert utils.decrypt_secret(stored[4:], key=new_key) == "pw"
+        assert utils.decrypt_secret(test_db.get_setting_value("telegram_bot_token_encrypted"), key=new_key) == "tok"
+        assert test_db.get_mqtt_server(server["id"])["password"] == "pw"
+
+    def test_stale_key_in_memory_is_reloaded(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883, "password": "pw"})
+        old_key = utils._get_secret_key()
+        test_db.rotate_secret_key()
+        # другой воркер: в памяти ещё ключ до ротации
+        utils._keys.update(current=old_key, previous=None)
+        assert utils.decrypt_secret(_stored_password(test_db.db_path, server["id"])[4:]) == "pw"
+        assert utils._get_secret_key() != old_key
+
+    def test_secret_written_with_previous_key_still_decrypts(self, key_dir):
+        token = utils.encrypt_secret("pw")
+        utils.store_secret_key(os.urandom(32))
+        assert utils.decrypt_secret(token) == "pw"
+
+    def test_undecryptable_secret_aborts_rotation(self, test_db, key_dir):
+        server = test_db.create_mqtt_server({"name": "S", "host": "h", "port": 1883, "password": "pw"})
+        foreign = utils.encrypt_secret("x", key=os.urandom(32))
+        test_db.set_setting_value("other_encrypted", foreign)
+        old_key = utils._get_secret_key()
+        before = _stored_password(test_db.db_path, server["id"])
+
+        with pytest.raises(SecretsError):
+            test_db.rotate_secret_key()
+
+        assert utils._get_secret_key() == old_key
+        assert (key_dir / ".irrig_secret_key").read_bytes() == old_key
+        assert _stored_password(test_db.db_path, server["id"]) == before
+
+    def test_env_key_cannot_be_rotated(self, test_db, key_dir, monkeypatch):
+        monkeypatch.setenv("IRRIG_SECRET_KEY", "a" * 44)
+        with pytest.raises(SecretsError):
+            test_db.rotate_secret_key()
@@ -0,0 +1,116 @@
+"""zone_last_run summary: trigger maintenance, backfill, consistency checker."""
+
+import os
+import sqlite3
+
+os.environ["TESTING"] = "1"
+
+
+def _aggregate(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(
+            conn.execute(
+                "SELECT zone_id, MAX(end_utc) FROM zone_runs "
+                "WHERE status = 'ok' AND end_utc IS NOT NULL GROUP BY zone_id"
+            ).fetchall()
+        )
+    finally:
+        conn.close()
+
+
+def _summary(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT zone_id, end_utc FROM zone_last_run").fetchall())
+    finally:
+        conn.close()
+
+
+def _finished_run(db, zone_id, end_utc, status="ok"):
+    run_id = db.create_zone_run(zone_id, 1, "2026-04-01 10:00:00", 0.0, None, 1, None)
+    db.zones.mark_zone_run_confirmed(zone_id)
+    db.finish_zone_run(run_id, end_utc, 1.0, None, None, None, status)
+    return run_id
+
+
+class TestTriggers:
+    def test_finish_updates_summary_and_reads_use_it(self, test_db, test_db_path):
+        z1 = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        z2 = int(test_db.create_zone({"name": "B", "duration": 10, "group_id": 1})["id"])
+        _finished_run(test_db, z1, "2026-04-01 10:10:00")
+        _finished_run(test_db, z1, "2026-04-02 10:10:00")
+        _finished_run(test_db, z2, "2026-04-03 10:10:00", status="aborted")
+        assert _summary(test_db_path) == {z1: "2026-04-02 10:10:00"}
+        assert test_db.get_last_watering_time(z1) == "2026-04-02 10:10:00"
+        assert test_db.get_zone(z1)["last_watering_time"] == "2026-04-02 10:10:00"
+        by_id = {z["id"]: z["last_watering_time"] for z in test_db.get_zones()}
+        assert by_id == {z1: "2026-04-02 10:10:00", z2: None}
+        by_group = {z["id"]: z["last_watering_time"] for z in test_db.get_zones_by_group(1)}
+        assert by_group[z1] == "2026-04-02 10:10:00"
+
+    def test_status_change_and_delete_fall_back_to_previous_run(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        _finished_run(test_db, zid, "2026-04-01 10:10:00")
+        latest = _finished_run(test_db, zid, "2026-04-05 10:10:00")
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE zone_runs SET status = 'aborted' WHERE id = ?", (latest,))
+        conn.commit()
+        assert _summary(test_db_path) == {zid: "2026-04-01 10:10:00"}
+        conn.execute("DELETE FROM zone_runs WHERE zone_id = ?", (zid,))
+        conn.commit()
+        conn.close()
+        assert _summary(test_db_path) == {}
+        assert test_db.get_last_watering_time(zid) is None
+
+    def test_summary_matches_aggregate_after_mixed_history(self, test_db, test_db_path):
+        zones = [int(test_db.create_zone({"name": f"Z{i}", "duration": 10, "group_id": 1})["id"]) for i in range(3)]
+        for day in range(1, 20):
+            zid = zones[day % 3]
+            _finished_run(test_db, zid, f"2026-05-{day:02d} 06:00:00", status="ok" if day % 4 else "failed")
+        assert _summary(test_db_path) == _aggregate(test_db_path)
+
+
+class TestBackfillAndChecker:
+    def test_migration_backfills_existing_history(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        _finished_run(test_db, zid, "2026-04-01 10:10:00")
+        assert test_db._migrations.rollback_migration("create_zone_last_run")
+        conn = sqlite3.connect(test_db_path)
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'zone_last_run'").fetchone() is None
+        conn.execute(
+            "INSERT INTO zone_runs(zone_id, group_id, start_utc, end_utc, start_monotonic, status) "
+            "VALUES (?, 1, '2026-04-07 09:00:00', '2026-04-07 09:10:00', 0, 'ok')",
+            (zid,),
+        )
+        conn.commit()
+        conn.close()
+        test_db.init_database()
+        assert _summary(test_db_path) == {zid: "2026-04-07 09:10:00"}
+
+    def test_checker_reports_and_repairs_drift(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        _finished_run(test_db, zid, "2026-04-01 10:10:00")
+        assert test_db.check_zone_last_run() == {"checked": 1, "mismatches": [], "repaired": False}
+        conn = sqlite3.connect(test_db_path)
+        conn.execute("UPDATE zone_last_run SET end_utc = '1999-01-01 00:00:00'")
+        conn.execute("INSERT INTO zone_last_run(zone_id, end_utc) VALUES (9999, '2026-01-01 00:00:00')")
+        conn.commit()
+        conn.close()
+        report = test_db.check_zone_last_run(repair=True)
+        assert report["repaired"] is True
+        assert {m["zone_id"] for m in report["mismatches"]} == {zid, 9999}
+        assert _summary(test_db_path) == _aggregate(test_db_path) == {zid: "2026-04-01 10:10:00"}
+
+    def test_triggers_survive_zone_runs_table_rebuild(self, test_db, test_db_path):
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        assert test_db._migrations.rollback_migration("zone_runs_add_source")
+        conn = sqlite3.connect(test_db_path)
+        conn.execute(
+            "INSERT INTO zone_runs(zone_id, group_id, start_utc, start_monotonic) VALUES (?, 1, '2026-04-01', 0)",
+            (zid,),
+        )
+        conn.execute("UPDATE zone_runs SET end_utc = '2026-04-01 10:10:00', status = 'ok' WHERE zone_id = ?", (zid,))
+        conn.commit()
+        conn.close()
+        assert _summary(test_db_path) == {zid: "2026-04-01 10:10:00"}
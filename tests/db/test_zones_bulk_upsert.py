@@ -0,0 +1,108 @@
+"""ZoneRepository.bulk_upsert_zones — single-transaction batch engine."""
+
+import json
+import os
+import sqlite3
+
+os.environ["TESTING"] = "1"
+
+
+class TestBulkUpsertEngine:
+    def test_per_row_report_and_counters(self, test_db):
+        existing = test_db.create_zone({"name": "Old", "duration": 5, "group_id": 1})
+        result = test_db.bulk_upsert_zones(
+            [
+                {"id": existing["id"], "name": "Renamed"},
+                {"name": "New auto id", "duration": 7},
+                {"id": 500, "name": "Explicit"},
+                {"id": "bad"},
+            ]
+        )
+        assert (result["created"], result["updated"], result["failed"]) == (2, 1, 1)
+        statuses = [(r["row"], r["status"]) for r in result["rows"]]
+        assert statuses == [(0, "updated"), (1, "created"), (2, "created"), (3, "failed")]
+        auto_id = result["rows"][1]["id"]
+        # Auto ids are allocated above every explicit id in the batch.
+        assert auto_id > 500
+        assert test_db.get_zone(auto_id)["duration"] == 7
+        assert test_db.get_zone(500)["name"] == "Explicit"
+        assert test_db.get_zone(existing["id"])["name"] == "Renamed"
+
+    def test_repeated_id_merges_in_input_order(self, test_db):
+        result = test_db.bulk_upsert_zones(
+            [
+                {"id": 10, "name": "A", "duration": 3},
+                {"id": 10, "name": "B"},
+                {"id": 10, "duration": 9},
+            ]
+        )
+        assert [r["status"] for r in result["rows"]] == ["created", "updated", "updated"]
+        zone = test_db.get_zone(10)
+        assert (zone["name"], zone["duration"]) == ("B", 9)
+
+    def test_uses_single_write_transaction(self, test_db, monkeypatch):
+        statements = []
+        real_connect = test_db.zones._connect
+
+        def _traced():
+            conn = real_connect()
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        monkeypatch.setattr(test_db.zones, "_connect", _traced)
+        test_db.bulk_upsert_zones([{"name": f"Z{i}", "group_id": 1} for i in range(50)])
+        begins = [s for s in statements if s.startswith("BEGIN")]
+        assert begins == ["BEGIN IMMEDIATE"]
+        assert len([s for s in statements if s.lstrip().startswith("SELECT")]) == 1
+
+    def test_failed_statement_replayed_row_by_row(self, test_db):
+        with sqlite3.connect(test_db.db_path) as conn:
+            conn.execute(
+                "CREATE TRIGGER reject_bad BEFORE INSERT ON zones WHEN NEW.name = 'bad' "
+                "BEGIN SELECT RAISE(ABORT, 'bad zone'); END"
+            )
+        result = test_db.bulk_upsert_zones([{"name": "ok1"}, {"name": "bad"}, {"name": "ok2"}])
+        assert [r["status"] for r in result["rows"]] == ["created", "failed", "created"]
+        assert "bad zone" in result["rows"][1]["error"]
+        names = {z["name"] for z in test_db.get_zones()}
+        assert {"ok1", "ok2"} <= names and "bad" not in names
+
+    def test_move_to_group_999_removes_zone_from_programs(self, test_db):
+        z1 = test_db.create_zone({"name": "P1", "duration": 5, "group_id": 1})
+        z2 = test_db.create_zone({"name": "P2", "duration": 5, "group_id": 1})
+        prog = test_db.create_program(
+            {"name": "Morning", "time": "06:00", "days": [0, 1], "zones": [z1["id"], z2["id"]]}
+        )
+        result = test_db.bulk_upsert_zones([{"id": z1["id"], "group_id": 999}])
+        assert result["programs_changed"] is True
+        assert sorted(result["groups"]) == [1, 999]
+        assert test_db.get_program(prog["id"])["zones"] == [z2["id"]]
+
+    def test_state_is_never_written(self, test_db):
+        z = test_db.create_zone({"name": "S", "duration": 5, "group_id": 1})
+        test_db.bulk_upsert_zones([{"id": z["id"], "state": "on", "name": "S2"}])
+        after = test_db.get_zone(z["id"])
+        assert after["state"] == "off" and after["name"] == "S2"
+
+
+class TestBatchReschedule:
+    def test_reschedule_groups_matches_per_group_variant(self, test_db):
+        zones = [test_db.create_zone({"name": f"R{i}", "duration": 10, "group_id": 1}) for i in range(3)]
+        test_db.create_program(
+            {"name": "Daily", "time": "05:00", "days": list(range(7)), "zones": [z["id"] for z in zones]}
+        )
+        test_db.reschedule_group_to_next_program(1)
+        expected = {z["id"]: test_db.get_zone(z["id"])["scheduled_start_time"] for z in zones}
+        with sqlite3.connect(test_db.db_path) as conn:
+            conn.execute("UPDATE zones SET scheduled_start_time = NULL")
+        test_db.reschedule_groups_to_next_program([1])
+        got = {z["id"]: test_db.get_zone(z["id"])["scheduled_start_time"] for z in zones}
+        assert got == expected
+        assert all(got.values())
+
+    def test_update_zone_returns_merged_row(self, test_db):
+        z = test_db.create_zone({"name": "U", "duration": 5, "group_id": 1})
+        updated = test_db.update_zone(z["id"], {"duration": 8})
+        assert updated["duration"] == 8 and updated["name"] == "U"
+        assert test_db.update_zone(987654, {"duration": 8}) is None
+        assert json.dumps(updated)  # still a plain serialisable dict
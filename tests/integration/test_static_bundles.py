@@ -0,0 +1,50 @@
+"""/static/dist/* — hashed bundles with immutable caching + precompression."""
+
+import gzip
+
+import pytest
+
+from services import static_assets
+
+
+@pytest.fixture
+def built_dist(monkeypatch, tmp_path):
+    root = tmp_path / "static"
+    (root / "js").mkdir(parents=True)
+    (root / "js" / "a.js").write_text("var a = 1;\n" * 50, encoding="utf-8")
+    monkeypatch.setattr(static_assets, "STATIC_ROOT", root)
+    monkeypatch.setattr(static_assets, "BUNDLES", {"base.js": ["js/a.js"]})
+    manifest = static_assets.build(root, {"base.js": ["js/a.js"]})
+    yield manifest["bundles"]["base.js"]["file"]
+    static_assets.reset_cache()
+
+
+def test_bundle_served_gzip_with_immutable_cache(client, built_dist):
+    r = client.get(f"/static/dist/{built_dist}", headers={"Accept-Encoding": "gzip, deflate"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Vary"] == "Accept-Encoding"
+    assert "immutable" in r.headers["Cache-Control"]
+    assert "javascript" in r.headers["Content-Type"]
+    assert gzip.decompress(r.data).startswith(b"var a = 1;")
+    assert "Set-Cookie" not in r.headers
+    assert "ETag" not in r.headers
+
+
+def test_bundle_served_identity_without_accept_encoding(client, built_dist):
+    r = client.get(f"/static/dist/{built_dist}")
+    assert r.status_code == 200
+    assert "Content-Encoding" not in r.headers
+    assert r.data.startswith(b"var a = 1;")
+
+
+def test_precompressed_sibling_not_directly_addressable(client, built_dist):
+    assert client.get(f"/static/dist/{built_dist}.gz").status_code == 404
+    assert client.get("/static/dist/../css/base.css").status_code == 404
+
+
+def test_pages_and_sw_use_hashed_bundles(client, built_dist):
+    page = client.get("/").data.decode("utf-8")
+    assert f"/static/dist/{built_dist}" in page
+    sw = client.get("/sw.js").data.decode("utf-8")
+    assert f'"/static/dist/{built_dist}"' in sw
@@ -116,6 +116,21 @@ class TestPerZoneJson:
         assert data["summary"]["has_liters"] is True
         assert data["summary"]["liters_partial"] is True
 
+    def test_runs_purged_by_retention_still_count_in_daily_and_summary(self, app, client, seeded_zone):
+        from db.retention import RetentionPolicy
+
+        three_days = 3 * 24 * 60
+        _create_run(app, seeded_zone["id"], 1, three_days + 20, three_days + 5, liters=10.0)
+        _create_run(app, seeded_zone["id"], 1, three_days + 60, three_days + 50, liters=5.0)
+        _create_run(app, seeded_zone["id"], 1, 45, 30, liters=1.0)
+        before = client.get(f"/api/zones/{seeded_zone['id']}/history?days=7").get_json()
+        policy = RetentionPolicy("zone_runs", "start_utc", 1, rollup="zone_runs_daily")
+        assert app.db.retention.purge(policy)["deleted"] == 2
+        after = client.get(f"/api/zones/{seeded_zone['id']}/history?days=7").get_json()
+        assert after["daily"] == before["daily"]
+        assert after["summary"] == before["summary"]
+        assert len(after["runs"]) == 1
+
     def test_has_plan_false_when_no_active_program(self, app, client, seeded_zone):
         data = client.get(f"/api/zones/{seeded_zone['id']}/history?days=7").get_json()
         assert data["summary"]["has_plan"] is False
@@ -184,3 +199,67 @@ class TestCsv:
         cd = resp.headers.get("Content-Disposition", "")
         assert f"zone-{seeded_zone['id']}" in cd
         assert ".csv" in cd
+
+    def test_csv_streams_long_range(self, app, client, seeded_zone):
+        five_months = 150 * 24 * 60
+        _create_run(app, seeded_zone["id"], 1, five_months, five_months - 10, liters=3.0)
+        _create_run(app, seeded_zone["id"], 1, 60, 45)
+        resp = client.get(f"/api/zones/{seeded_zone['id']}/history.csv?days=180")
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        lines = resp.get_data(as_text=True).lstrip("﻿").splitlines()
+        assert len(lines) == 3
+        assert lines[2].split(",")[5:7] == ["10", "3.0"]
+        assert client.get(f"/api/zones/{seeded_zone['id']}/history.csv?days=14").status_code == 400
+        assert client.get(f"/api/zones/{seeded_zone['id']}/history?days=180").status_code == 400
+
+
+class TestResultCache:
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        from services import history_query
+
+        history_query.clear_cache()
+        yield
+        history_query.clear_cache()
+
+    def _stats(self):
+        from services import history_query
+
+        return history_query.cache_stats()
+
+    def test_repeat_load_is_served_from_cache(self, app, client, seeded_zone):
+        url = f"/api/zones/{seeded_zone['id']}/history?days=7"
+        first = client.get(url).get_json()
+        second = client.get(url).get_json()
+        assert first == second
+        assert self._stats()["hits"] == 1
+        client.get("/api/zones/history?days=7")
+        client.get("/api/zones/history?days=7")
+        assert self._stats() == {"hits": 2, "misses": 2, "entries": 2}
+
+    def test_new_run_invalidates(self, app, client, seeded_zone):
+        url = f"/api/zones/{seeded_zone['id']}/history?days=7"
+        assert client.get(url).get_json()["summary"]["total_runs"] == 0
+        _create_run(app, seeded_zone["id"], 1, 60, 45, liters=5.0)
+        assert client.get(url).get_json()["summary"]["total_runs"] == 1
+        assert self._stats()["hits"] == 0
+
+    def test_program_and_zone_edits_invalidate(self, app, client, seeded_zone):
+        url = f"/api/zones/{seeded_zone['id']}/history?days=7"
+        assert client.get(url).get_json()["summary"]["has_plan"] is False
+        app.db.create_program(
+            {"name": "P", "time": "07:00", "days": [0, 1, 2, 3, 4, 5, 6], "zones": [seeded_zone["id"]]}
+        )
+        assert client.get(url).get_json()["summary"]["plan_minutes"] == 15 * 7
+        app.db.update_zone(seeded_zone["id"], {"duration": 20})
+        assert client.get(url).get_json()["summary"]["plan_minutes"] == 20 * 7
+
+    def test_zone_state_changes_keep_cache(self, app, client, seeded_zone):
+        from services import history_query
+
+        stamp = history_query.data_version(app.db.db_path)
+        app.db.update_zone(seeded_zone["id"], {"state": "on"})
+        assert history_query.data_version(app.db.db_path) == stamp
+        app.db.update_zone(seeded_zone["id"], {"name": "Новое имя"})
+        assert history_query.data_version(app.db.db_path) != stamp
@@ -0,0 +1,59 @@
+"""Performance tests: end-to-end actuation latency (tools/bench_actuation.py).
+
+The full run needs a mosquitto binary and takes about a minute; the
+statistics helpers are checked without it.
+"""
+
+import importlib.util
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.slow
+
+_TOOL = Path(__file__).resolve().parents[2] / "tools" / "bench_actuation.py"
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_actuation", _TOOL)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBenchHelpers:
+    def test_percentiles(self, bench):
+        values = [i / 1000 for i in range(1, 101)]
+        assert bench.percentile([], 50) is None
+        assert bench.percentile(values, 50) == pytest.approx(0.0505)
+        s = bench.summarize(values, wall_s=2.0, timeouts=1, fanout_s=[0.001, 0.003])
+        assert s["count"] == 100 and s["timeouts"] == 1
+        assert s["p99_ms"] == pytest.approx(99.01)
+        assert s["max_ms"] == 100.0
+        assert s["throughput_per_s"] == 50.0
+        assert s["fanout_p50_ms"] == 2.0
+
+    def test_compare(self, bench):
+        old = {"git_rev": "aaa", "scenarios": {"manual": {"p50_ms": 100.0, "p99_ms": 200.0}}}
+        new = {"git_rev": "bbb", "scenarios": {"manual": {"p50_ms": 80.0, "p99_ms": 200.0}, "group": {}}}
+        lines = bench.compare(old, new)
+        p50 = next(line for line in lines if line.startswith("manual") and "p50_ms" in line)
+        assert p50.rstrip().endswith("-20.0")
+        assert any(line.startswith("group") for line in lines)
+
+
+@pytest.mark.skipif(shutil.which("mosquitto") is None, reason="mosquitto not installed")
+def test_end_to_end_manual_and_emergency(bench, tmp_path):
+    out = tmp_path / "bench.json"
+    args = ["--relays", "1", "--sse-clients", "5", "--iterations", "3", "--scenarios", "manual", "emergency"]
+    rc = bench.main([*args, "--out", str(out)])
+    assert rc == 0
+    result = json.loads(out.read_text())
+    print(json.dumps(result["scenarios"], indent=2))
+    manual = result["scenarios"]["manual"]
+    assert manual["timeouts"] == 0 and manual["count"] == 6
+    assert manual["p99_ms"] < 5000
+    assert result["scenarios"]["emergency"]["timeouts"] == 0
@@ -0,0 +1,64 @@
+"""Performance tests: zone-state writes stay fast while a large DB is being backed up."""
+
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+pytestmark = pytest.mark.slow
+
+
+def _fill(path, megabytes):
+    conn = sqlite3.connect(path)
+    blob = "x" * 4000
+    conn.executemany("INSERT INTO logs(type, details) VALUES ('bulk', ?)", [(blob,)] * (megabytes * 256))
+    conn.commit()
+    conn.close()
+
+
+class TestBackupLatency:
+    def test_zone_writes_during_backup(self, test_db, tmp_path):
+        from db.backup import BackupRepository
+
+        _fill(test_db.db_path, 40)
+        zid = int(test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"])
+        repo = BackupRepository(test_db.db_path, str(tmp_path / "bak"))
+        latencies: list[float] = []
+        done = threading.Event()
+
+        def zone_writer():
+            conn = sqlite3.connect(test_db.db_path, timeout=30)
+            state = "on"
+            while not done.is_set():
+                t0 = time.perf_counter()
+                conn.execute("UPDATE zones SET state = ? WHERE id = ?", (state, zid))
+                conn.commit()
+                latencies.append(time.perf_counter() - t0)
+                state = "off" if state == "on" else "on"
+                time.sleep(0.005)
+            conn.close()
+
+        t = threading.Thread(target=zone_writer)
+        t.start()
+        t0 = time.perf_counter()
+        try:
+            path = repo.create_backup()
+        finally:
+            done.set()
+            t.join(10)
+        elapsed = time.perf_counter() - t0
+
+        assert path is not None
+        assert repo.verify_backup(path)["ok"]
+        worst = max(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) >= 100 else worst
+        print(
+            f"\nbackup 40 MB: {elapsed:.1f}s, {len(latencies)} zone writes, "
+            f"p99 {p99 * 1000:.1f} ms, max {worst * 1000:.1f} ms"
+        )
+        assert worst < 0.25, f"zone write blocked for {worst * 1000:.0f} ms during backup"
@@ -0,0 +1,58 @@
+"""Performance tests: batch planning of 200 zones (services/irrigation_plan.py)."""
+
+import os
+import timeit
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+pytestmark = pytest.mark.slow
+
+
+def _inputs(n_zones=200):
+    nozzles = ["mp_rotator", "pgp_ultra", "pro_fixed", "i20"]
+    zones = [
+        {"id": i, "nozzle": nozzles[i % 4], "soil_moisture_pct": None if i % 3 else 30.0 + i % 40}
+        for i in range(1, n_zones + 1)
+    ]
+    programs = [{"id": p, "zones": list(range(p, n_zones + 1, 10))} for p in range(1, 11)]
+    snapshot = {
+        "site_id": "orsk",
+        "month": 7,
+        "day": 15,
+        "t_avg": 31.0,
+        "t_current": 33.0,
+        "precip_24h": 0.0,
+        "precip_48h": 1.0,
+        "precip_forecast_12h": 0.0,
+        "wind_speed_kmh": 5.0,
+    }
+    return snapshot, zones, programs
+
+
+class TestPlanSpeed:
+    def test_cold_plan_200_zones(self):
+        from services import irrigation_plan as ip
+
+        snapshot, zones, programs = _inputs()
+
+        def cold():
+            ip.reset_memo()
+            ip.build_plan(snapshot, zones, programs)
+
+        t = min(timeit.repeat(cold, number=20, repeat=5)) / 20
+        print(f"\ncold plan, 200 zones: {t * 1e3:.2f} ms")
+        # single-digit ms; запас на медленные CI-машины
+        assert t < 0.010
+
+    def test_warm_plan_200_zones(self):
+        from services import irrigation_plan as ip
+
+        snapshot, zones, programs = _inputs()
+        ip.reset_memo()
+        ip.build_plan(snapshot, zones, programs)
+        t = min(timeit.repeat(lambda: ip.build_plan(snapshot, zones, programs), number=50, repeat=5)) / 50
+        print(f"\nmemoised plan, 200 zones: {t * 1e3:.2f} ms")
+        assert t < 0.005
+        ip.reset_memo()
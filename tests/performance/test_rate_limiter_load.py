@@ -0,0 +1,57 @@
+"""Performance tests: shared rate limiter under many threads."""
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+pytestmark = pytest.mark.slow
+
+
+class TestRateLimiterLoad:
+    def test_16_threads_hammer_distinct_and_shared_keys(self):
+        """16 threads × 5000 checks: correct totals, bounded memory, fast."""
+        from services.rate_limiter import SlidingWindowLimiter
+
+        rl = SlidingWindowLimiter("bench", shards=16, max_keys=2048)
+        n_threads, per_thread = 16, 5000
+        allowed_shared = [0] * n_threads
+        start = threading.Barrier(n_threads)
+
+        def worker(idx):
+            start.wait()
+            for i in range(per_thread):
+                # Distinct clients (LRU churn) interleaved with one hot shared key.
+                rl.hit((f"10.{idx}.{i % 251}.{i % 7}", "general_mutation"), 30, 60)
+                if rl.hit(("10.255.255.255", "shared"), 1000, 60)[0]:
+                    allowed_shared[idx] += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        total_checks = n_threads * per_thread * 2
+        # Exactly `limit` hits admitted on the shared key, no matter the interleaving.
+        assert sum(allowed_shared) == 1000
+        assert len(rl) <= 2048
+        per_check_us = elapsed / total_checks * 1e6
+        print(f"\nrate limiter: {total_checks} checks in {elapsed:.2f}s ({per_check_us:.1f} µs/check)")
+        assert per_check_us < 100, f"{per_check_us:.1f} µs per check"
+
+    def test_api_limiter_throughput_single_key(self):
+        from services.api_rate_limiter import _is_allowed, reset_all
+
+        reset_all()
+        t0 = time.perf_counter()
+        for _ in range(20000):
+            _is_allowed("10.0.0.1", "bench", 10**9, 60)
+        elapsed = time.perf_counter() - t0
+        reset_all()
+        assert elapsed < 1.0, f"20k checks took {elapsed:.2f}s"
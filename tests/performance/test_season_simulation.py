@@ -0,0 +1,50 @@
+"""Performance tests: time-accelerated season simulation (scheduler/simulation.py)."""
+
+import os
+from datetime import datetime
+
+import pytest
+
+pytestmark = pytest.mark.slow
+
+os.environ["TESTING"] = "1"
+
+from scheduler.simulation import SeasonSimulation, percentile, synthetic_weather
+from services import clock
+
+START = datetime(2026, 6, 1)
+DAYS = 4
+
+
+def _run(tmp_path, name):
+    workdir = tmp_path / name
+    workdir.mkdir()
+    return SeasonSimulation(str(workdir), START, DAYS, synthetic_weather(START, DAYS, seed=7)).run()
+
+
+def test_synthetic_weather_is_seeded():
+    a = synthetic_weather(START, 3, seed=7)
+    b = synthetic_weather(START, 3, seed=7)
+    assert a == b
+    assert len(a["time"]) == len(a["precipitation"]) == (3 + 4) * 24
+    assert synthetic_weather(START, 3, seed=8)["precipitation"] != a["precipitation"]
+    assert percentile([1.0, 2.0, 3.0], 50) == 2.0
+
+
+def test_season_is_deterministic_and_reports_metrics(tmp_path):
+    first = _run(tmp_path, "a")
+    second = _run(tmp_path, "b")
+    print({k: v for k, v in first.items() if k != "conflicts"})
+    assert isinstance(clock.get_clock(), clock.SystemClock)
+
+    stable = ("runs", "zone_runs", "overlapped_starts", "drift_s", "db_writes", "db_writes_by_table", "conflicts")
+    assert {k: first[k] for k in stable} == {k: second[k] for k in stable}
+    # 5 программ, из них ежедневные — 4 старта в день
+    assert first["runs"] >= 4 * DAYS
+    assert first["zone_runs"] > 0
+    assert first["drift_s"]["max"] < 60
+    assert first["cpu_s_per_day"]["count"] == DAYS
+    assert first["db_writes"] > 0 and "zones" in first["db_writes_by_table"]
+    # «Газон утро» и «Капельный» делят контур 1 — конфликт предсказан
+    assert first["conflicts"]["predicted"] >= DAYS
+    assert first["conflicts"]["relay_group_overlaps"] == 0
@@ -0,0 +1,54 @@
+"""Performance tests: cold start of ``app`` in a fresh interpreter (release benchmark)."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+pytestmark = pytest.mark.slow
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+import_s = time.perf_counter() - t0
+from db.migrations import MigrationRunner
+t1 = time.perf_counter()
+MigrationRunner(app.db.db_path).init_database()
+reinit_s = time.perf_counter() - t1
+print(json.dumps({
+    "import_s": import_s,
+    "reinit_s": reinit_s,
+    "heavy": sorted(m for m in ("aiogram", "PIL") if m in sys.modules),
+}))
+"""
+
+
+def _boot(cwd):
+    env = dict(os.environ, TESTING="1", PYTHONPATH=REPO_ROOT)
+    env.pop("PYTEST_CURRENT_TEST", None)
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=cwd, env=env, capture_output=True, text=True, timeout=120, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class TestStartupTime:
+    def test_cold_import_and_migration_fast_path(self, tmp_path):
+        first = _boot(tmp_path)  # creates and migrates irrigation.db
+        second = _boot(tmp_path)  # schema already current
+        print(
+            f"\nstartup: import {first['import_s'] * 1000:.0f} ms (fresh DB), "
+            f"{second['import_s'] * 1000:.0f} ms (current schema); "
+            f"re-init {second['reinit_s'] * 1000:.1f} ms"
+        )
+        # Telegram/aiogram и Pillow грузятся при первом использовании, не при старте
+        assert first["heavy"] == []
+        assert second["reinit_s"] < 0.05, f"migration fast path took {second['reinit_s'] * 1000:.1f} ms"
+        assert second["import_s"] < 5.0, f"import app took {second['import_s']:.2f}s"
@@ -0,0 +1,63 @@
+"""Injectable clock (services/clock.py)."""
+
+import threading
+from datetime import datetime, timedelta
+
+from services import clock
+from services.clock import SimClock, SystemClock, use_clock
+
+START = datetime(2026, 5, 1, 5, 0)
+
+
+class TestSimClock:
+    def test_sleep_and_timed_out_wait_advance_time(self):
+        sim = SimClock(START)
+        sim.sleep(90)
+        assert sim.now() == START + timedelta(seconds=90)
+        assert sim.monotonic() == 90
+        ev = threading.Event()
+        assert sim.wait(ev, 30) is False
+        assert sim.now() == START + timedelta(seconds=120)
+        ev.set()
+        assert sim.wait(ev, 30) is True
+        assert sim.now() == START + timedelta(seconds=120)
+
+    def test_advance_to_never_goes_back_but_set_does(self):
+        sim = SimClock(START)
+        sim.advance_to(START - timedelta(hours=1))
+        assert sim.now() == START
+        sim.advance(600)
+        sim.set(START)
+        assert sim.now() == START
+        assert sim.monotonic() == 600
+
+    def test_tickers_coalesce_and_do_not_reenter(self):
+        sim = SimClock(START)
+        calls = []
+
+        def tick():
+            calls.append(sim.now())
+            sim.sleep(5)  # не должен вызвать тикер повторно
+
+        sim.every(30, tick)
+        for _ in range(60):
+            sim.advance(1)
+        assert len(calls) == 2
+        sim.advance(3600)
+        assert len(calls) == 3
+
+
+class TestActiveClock:
+    def test_use_clock_swaps_module_functions_and_restores(self):
+        sim = SimClock(START)
+        with use_clock(sim):
+            assert clock.now() == START
+            assert clock.timestamp() == START.timestamp()
+            clock.sleep(60)
+            assert clock.now() == START + timedelta(minutes=1)
+        assert isinstance(clock.get_clock(), SystemClock)
+        assert abs((clock.now() - datetime.now()).total_seconds()) < 5
+
+    def test_utcnow_local_matches_offset(self):
+        with use_clock(SimClock(datetime.fromtimestamp(0))):
+            assert clock.utcnow_local(3 * 3600) == datetime(1970, 1, 1, 3, 0)
@@ -1,11 +1,31 @@
 """Comprehensive tests for services/events.py."""
 
 import os
+import threading
+import time
 from unittest.mock import MagicMock
 
+import pytest
+
 os.environ["TESTING"] = "1"
 
 
+@pytest.fixture
+def async_bus():
+    from services import events
+
+    events.set_sync(False)
+    subs_before = list(events._SUBS)
+    try:
+        yield events
+    finally:
+        events.flush(2.0)
+        for sub in list(events._SUBS):
+            if sub not in subs_before:
+                events.unsubscribe(sub)
+        events.set_sync(True)
+
+
 class TestEventBus:
     def test_publish(self):
         from services.events import publish
@@ -31,19 +51,100 @@ class TestEventBus:
         from services.events import subscribe
 
         cb = MagicMock()
-        subscribe(cb)
+        sub = subscribe(cb)
         from services import events
 
-        assert cb in events._SUBS
-        events._SUBS.remove(cb)
+        assert sub in events._SUBS and sub.callback is cb
+        events.unsubscribe(sub)
+        assert sub not in events._SUBS
 
-    def test_cleanup_large_dedup(self):
+    def test_cleanup_large_dedup_evicts_oldest(self):
         from services import events
 
-        # Fill dedup beyond max
         old = events._DEDUP.copy()
-        for i in range(5000):
-            events._DEDUP.add(f"key_{i}")
-        events._cleanup(0)
-        assert len(events._DEDUP) == 0
-        events._DEDUP = old
+        try:
+            events._DEDUP.clear()
+            for i in range(events.DEDUP_SET_MAX_SIZE + 10):
+                events._DEDUP[f"key_{i}"] = float("inf")
+            events._cleanup(0)
+            assert len(events._DEDUP) == events.DEDUP_SET_MAX_SIZE
+            assert "key_0" not in events._DEDUP and f"key_{events.DEDUP_SET_MAX_SIZE + 9}" in events._DEDUP
+        finally:
+            events._DEDUP = old
+
+    def test_dedup_key_expires_after_ttl(self, monkeypatch):
+        from services import events
+
+        monkeypatch.setattr(events, "_DEDUP_TTL", 0.05)
+        cb = MagicMock()
+        sub = events.subscribe(cb, topics=["ttl_test"])
+        try:
+            events.publish({"type": "ttl_test", "id": 1})
+            events.publish({"type": "ttl_test", "id": 1})
+            time.sleep(0.08)
+            events.publish({"type": "ttl_test", "id": 1})
+            assert cb.call_count == 2
+        finally:
+            events.unsubscribe(sub)
+
+    def test_topic_filter(self):
+        from services import events
+
+        got = []
+        sub = events.subscribe(lambda ev: got.append(ev["type"]), topics=["zone_*", "emergency_on"])
+        try:
+            for t in ("zone_start", "zone_stop", "emergency_on", "emergency_off"):
+                events.publish({"type": t, "id": f"topic-{time.monotonic()}"})
+            assert got == ["zone_start", "zone_stop", "emergency_on"]
+        finally:
+            events.unsubscribe(sub)
+
+
+@pytest.mark.timeout(10)
+class TestAsyncDelivery:
+    def test_slow_subscriber_does_not_block_publisher(self, async_bus):
+        release = threading.Event()
+        fast = []
+        async_bus.subscribe(lambda ev: release.wait(2.0), topics=["async_slow"], name="slow")
+        async_bus.subscribe(lambda ev: fast.append(ev["id"]), topics=["async_slow"], name="fast")
+        started = time.perf_counter()
+        for i in range(5):
+            async_bus.publish({"type": "async_slow", "id": i})
+        elapsed = time.perf_counter() - started
+        deadline = time.monotonic() + 2.0
+        while len(fast) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        assert async_bus.flush(3.0)
+        assert elapsed < 0.05
+        assert fast == [0, 1, 2, 3, 4]  # порядок для подписчика сохраняется
+
+    def test_full_queue_drops_oldest_and_reports_backpressure(self, async_bus):
+        release = threading.Event()
+        got = []
+
+        def slow(ev):
+            release.wait(2.0)
+            got.append(ev["id"])
+
+        sub = async_bus.subscribe(slow, topics=["async_bp"], maxsize=3, name="bp")
+        for i in range(10):
+            async_bus.publish({"type": "async_bp", "id": i})
+        release.set()
+        assert async_bus.flush(3.0)
+        stats = next(s for s in async_bus.stats()["subscribers"] if s["name"] == "bp")
+        assert stats["dropped"] == sub.dropped > 0
+        assert stats["high_water"] == 3
+        assert got[-3:] == [7, 8, 9]
+        assert stats["delivered"] == len(got)
+
+    def test_failing_subscriber_keeps_workers_alive(self, async_bus):
+        got = []
+        async_bus.subscribe(MagicMock(side_effect=RuntimeError("boom")), topics=["async_err"], name="bad")
+        async_bus.subscribe(lambda ev: got.append(ev["id"]), topics=["async_err"])
+        async_bus.publish({"type": "async_err", "id": 1})
+        async_bus.publish({"type": "async_err", "id": 2})
+        assert async_bus.flush(3.0)
+        assert got == [1, 2]
+        bad = next(s for s in async_bus.stats()["subscribers"] if s["name"] == "bad")
+        assert bad["errors"] == 2
@@ -0,0 +1,135 @@
+"""FloatMonitor event-driven waits, timeout heap and transition history."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.float_monitor import FLOAT_HISTORY_SIZE, FloatMonitor
+from services.multiwait import Signal
+
+
+class _FakeRepo:
+    def __init__(self, timeout_minutes=30):
+        self.timeout_minutes = timeout_minutes
+        self.events = []
+
+    def get_float_enabled_groups(self):
+        return [
+            {
+                "id": gid,
+                "name": f"G{gid}",
+                "float_enabled": 1,
+                "float_mqtt_topic": f"/float/{gid}",
+                "float_mqtt_server_id": 1,
+                "float_mode": "NO",
+                "float_timeout_minutes": self.timeout_minutes,
+                "float_debounce_seconds": 0,
+            }
+            for gid in (1, 2)
+        ]
+
+    def pause_active_zones(self, group_id):
+        return [group_id * 10]
+
+    def log_event(self, group_id, event_type, paused_zones):
+        self.events.append((group_id, event_type))
+
+
+@pytest.fixture
+def monitor():
+    qm = MagicMock()
+    fm = FloatMonitor("unused.db", {1: MagicMock()}, qm, repo=_FakeRepo())
+    fm.start()
+    yield fm
+    fm.stop()
+
+
+def _wait_in_thread(fm, group_id, **kwargs):
+    out = []
+    t = threading.Thread(target=lambda: out.append(fm.wait_for_resume_or_cancel(group_id, **kwargs)))
+    t.start()
+    time.sleep(0.05)
+    return t, out
+
+
+@pytest.mark.timeout(10)
+def test_resume_wakes_waiter_without_polling(monitor):
+    monitor._on_float_message(1, "0")
+    t, out = _wait_in_thread(monitor, 1, cancel_event=Signal(), shutdown_event=Signal(), timeout=30)
+    started = time.monotonic()
+    monitor._on_float_message(1, "1")
+    t.join(timeout=2)
+    assert out == ["resumed"]
+    assert time.monotonic() - started < 0.3
+
+
+@pytest.mark.timeout(10)
+def test_cancel_and_shutdown_wake_waiter(monitor):
+    monitor._on_float_message(1, "0")
+    cancel, shutdown = Signal(), Signal()
+    t, out = _wait_in_thread(monitor, 1, cancel_event=cancel, shutdown_event=shutdown, timeout=30)
+    cancel.set()
+    t.join(timeout=2)
+    assert out == ["cancelled"]
+
+    t, out = _wait_in_thread(monitor, 1, cancel_event=Signal(), shutdown_event=shutdown, timeout=30)
+    shutdown.set()
+    t.join(timeout=2)
+    assert out == ["shutdown"]
+
+
+@pytest.mark.timeout(10)
+def test_float_timeout_fired_by_heap_thread(monitor):
+    with monitor._lock:
+        for gs in monitor._states.values():
+            gs.timeout_minutes = 0.002  # ~0.12 s
+    monitor._on_float_message(1, "0")
+    t, out = _wait_in_thread(monitor, 1, cancel_event=Signal(), shutdown_event=Signal(), timeout=30)
+    t.join(timeout=3)
+    assert out == ["timeout"]
+    monitor.queue_manager.cancel_group.assert_called_once_with(1)
+    assert monitor.get_state(1)["hysteresis"]["emergency_stopped"] is True
+
+
+@pytest.mark.timeout(10)
+def test_resume_before_deadline_cancels_timeout(monitor):
+    with monitor._lock:
+        monitor._states[1].timeout_minutes = 0.002
+    monitor._on_float_message(1, "0")
+    monitor._on_float_message(1, "1")
+    time.sleep(0.3)
+    monitor.queue_manager.cancel_group.assert_not_called()
+
+
+def test_history_ring_in_get_all_states(monitor):
+    monitor._on_float_message(1, "0")
+    monitor._on_float_message(1, "1")
+    states = monitor.get_all_states()
+    events = [h["event"] for h in states[1]["history"]]
+    assert events == ["pause", "resume"]
+    assert states[1]["history"][0]["paused_zones"] == [10]
+    assert states[2]["history"] == []
+    # get_state keeps the spec §6.3 shape
+    assert "history" not in monitor.get_state(1)
+
+
+def test_history_ring_is_bounded(monitor):
+    with monitor._lock:
+        gs = monitor._states[2]
+    for _ in range(FLOAT_HISTORY_SIZE):
+        gs.trip_times = []  # keep hysteresis out of the way
+        monitor._on_float_message(2, "0")
+        monitor._on_float_message(2, "1")
+    history = monitor.get_all_states()[2]["history"]
+    assert len(history) == FLOAT_HISTORY_SIZE
+    assert history[-1]["event"] == "resume"
+
+
+def test_stop_joins_timer_thread(monitor):
+    monitor._on_float_message(1, "0")
+    timer = monitor._timer_thread
+    assert timer is not None and timer.is_alive()
+    monitor.stop()
+    assert not timer.is_alive()
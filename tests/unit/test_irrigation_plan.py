@@ -0,0 +1,248 @@
+"""Tests for the batch Irrigation Planner (services/irrigation_plan.py).
+
+The plan must match the single-zone path (evaluate_decision + et_calculator)
+row for row; memoisation and the table queries are covered separately.
+"""
+
+import itertools
+import json
+import os
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services import irrigation_plan as ip
+from services.et_calculator import NOZZLE_PR, calc_cycle_soak, calc_irrigation_need, calc_zone_runtime
+from services.irrigation_decision import (
+    DECISION_EMERGENCY,
+    DECISION_IRRIGATE,
+    DECISION_SKIP,
+    DECISION_STOP,
+    evaluate_decision,
+)
+
+
+def _snapshot(**overrides):
+    snap = {
+        "site_id": "orsk",
+        "month": 7,
+        "day": 15,
+        "t_avg": 25.0,
+        "t_current": 25.0,
+        "precip_24h": 0.0,
+        "precip_48h": 0.0,
+        "precip_forecast_12h": 0.0,
+        "wind_speed_kmh": 5.0,
+    }
+    snap.update(overrides)
+    return snap
+
+
+def _zones():
+    nozzles = [*NOZZLE_PR, None]
+    soils = [None, 20.0, 40.0, 60.0]
+    return [
+        {"id": i + 1, "nozzle": nozzle, "soil_moisture_pct": soil}
+        for i, (nozzle, soil) in enumerate(itertools.product(nozzles, soils))
+    ]
+
+
+@pytest.fixture(autouse=True)
+def _clean_memo():
+    ip.reset_memo()
+    yield
+    ip.reset_memo()
+
+
+def _single_zone(snapshot, zone):
+    """Reference: the per-zone path the planner replaces."""
+    pr, infiltration, soil = ip.zone_params(zone)
+    args = {f: snapshot[f] for f in ip.SNAPSHOT_FIELDS}
+    dec = evaluate_decision(soil_moisture_pct=soil, **args)
+    need = calc_irrigation_need(snapshot["t_avg"], snapshot["precip_48h"], snapshot["site_id"])
+    if dec.decision == DECISION_EMERGENCY:
+        need = max(need, 2.0) * dec.coefficient / 100.0
+    elif dec.decision != DECISION_IRRIGATE:
+        need = 0.0
+    runtime = calc_zone_runtime(round(need, 2), pr)
+    cycles = calc_cycle_soak(runtime, pr, infiltration) if runtime > 0 else []
+    return dec, runtime, cycles
+
+
+class TestMatchesSingleZonePath:
+    @pytest.mark.parametrize(
+        "overrides",
+        [
+            {},
+            {"t_avg": 33.0, "t_current": 37.0},
+            {"month": 2},
+            {"t_current": 1.0},
+            {"wind_speed_kmh": 40.0},
+            {"precip_24h": 8.0},
+            {"precip_48h": 3.0},
+            {"t_avg": 12.0, "precip_48h": 2.0},
+            {"site_id": "cholpon_ata", "t_avg": 29.0, "t_current": 30.0},
+        ],
+    )
+    def test_rows_match(self, overrides):
+        snap = _snapshot(**overrides)
+        zones = _zones()
+        plan = ip.build_plan(snap, zones)
+        assert len(plan) == len(zones)
+        for zone in zones:
+            row = plan.get(zone["id"])
+            dec, runtime, cycles = _single_zone(snap, zone)
+            assert (row["decision"], row["reason"], row["rule_id"]) == (dec.decision, dec.reason, dec.rule_id)
+            assert row["coefficient"] == dec.coefficient
+            assert row["syringe"] == dec.syringe
+            assert row["runtime_min"] == runtime
+            assert row["cycles"] == cycles
+
+    def test_high_pr_nozzle_is_split(self):
+        plan = ip.build_plan(_snapshot(t_avg=33.0), [{"id": 1, "nozzle": "pro_fixed"}])
+        row = plan.get(1)
+        assert len(row["cycles"]) > 1
+        assert row["total_min"] == pytest.approx(sum(c["run_min"] + c["soak_min"] for c in row["cycles"]))
+
+    def test_explicit_pr_overrides_nozzle(self):
+        plan = ip.build_plan(_snapshot(), [{"id": 1, "nozzle": "pro_fixed", "pr_mm_h": 10.0}])
+        assert plan.get(1)["pr_mm_h"] == 10.0
+
+
+class TestMemo:
+    def test_same_snapshot_is_served_from_memo(self):
+        snap = _snapshot(id="s1")
+        zones = _zones()
+        ip.build_plan(snap, zones)
+        misses = ip.memo_stats()["misses"]
+        ip.build_plan(snap, zones)
+        st = ip.memo_stats()
+        assert st["misses"] == misses
+        assert st["hits"] == len(zones)
+
+    def test_new_snapshot_id_is_planned_again(self):
+        zones = _zones()
+        ip.build_plan(_snapshot(id="s1"), zones)
+        plan = ip.build_plan(_snapshot(id="s2", precip_24h=8.0), zones)
+        assert {r["decision"] for r in plan.rows()} == {DECISION_SKIP}
+
+    def test_snapshot_without_id_keys_by_values(self):
+        zones = _zones()
+        ip.build_plan(_snapshot(), zones)
+        plan = ip.build_plan(_snapshot(month=1), zones)
+        assert {r["decision"] for r in plan.rows()} == {DECISION_STOP}
+
+    def test_memo_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(ip, "MEMO_MAX_ENTRIES", 10)
+        ip.build_plan(_snapshot(), _zones())
+        assert ip.memo_stats()["entries"] == 10
+
+    def test_rows_are_copies(self):
+        plan = ip.build_plan(_snapshot(t_avg=33.0), [{"id": 1, "nozzle": "pro_fixed"}])
+        plan.get(1)["cycles"][0]["run_min"] = 999
+        again = ip.build_plan(_snapshot(t_avg=33.0), [{"id": 1, "nozzle": "pro_fixed"}])
+        assert again.get(1)["cycles"][0]["run_min"] != 999
+
+
+class TestQueries:
+    def test_program_membership_and_totals(self):
+        zones = [{"id": 1}, {"id": 2, "nozzle": "pro_fixed"}, {"id": 3, "soil_moisture_pct": 70.0}]
+        programs = [{"id": 10, "zones": [1, 2]}, {"id": 20, "zones": [2, 3]}]
+        plan = ip.build_plan(_snapshot(), zones, programs)
+
+        assert [r["zone_id"] for r in plan.where(program_id=10)] == [1, 2]
+        assert plan.get(2)["program_ids"] == [10, 20]
+        assert [r["zone_id"] for r in plan.where(program_id=20, watering=True)] == [2]
+        assert [r["zone_id"] for r in plan.where(decision=DECISION_SKIP)] == [3]
+        assert plan.program_total_min(10) == round(plan.get(1)["total_min"] + plan.get(2)["total_min"], 1)
+        assert plan.program_total_min(20) == plan.get(2)["total_min"]
+
+    def test_to_dict(self):
+        plan = ip.build_plan(_snapshot(id="s1"), [{"id": 1}], [{"id": 5, "zones": [1]}])
+        d = plan.to_dict()
+        assert d["snapshot_id"] == "s1"
+        assert d["zones"][0]["zone_id"] == 1
+        assert d["programs"]["5"]["total_min"] == plan.get(1)["total_min"]
+
+    def test_unknown_zone(self):
+        assert ip.build_plan(_snapshot(), []).get(1) is None
+
+
+def _weather(**overrides):
+    """WeatherData stand-in: the attributes snapshot_from_weather reads."""
+    values = {
+        "temperature": 28.0,
+        "temperature_min": 18.0,
+        "temperature_max": 32.0,
+        "precipitation_24h": 1.5,
+        "precipitation_forecast_12h": 0.4,
+        "wind_speed": 2.5,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestAppGlue:
+    def test_snapshot_from_weather(self):
+        snap = ip.snapshot_from_weather(_weather(), "cholpon_ata", now=datetime(2026, 7, 3, 5, 0))
+        assert snap == {
+            "site_id": "cholpon_ata",
+            "month": 7,
+            "day": 3,
+            "t_avg": 25.0,
+            "t_current": 28.0,
+            "precip_24h": 1.5,
+            "precip_48h": 1.5,
+            "precip_forecast_12h": 0.4,
+            "wind_speed_kmh": 9.0,
+        }
+
+    def test_snapshot_without_daily_range_uses_current_temperature(self):
+        snap = ip.snapshot_from_weather(_weather(temperature_min=None), "orsk", now=datetime(2026, 7, 3))
+        assert snap["t_avg"] == 28.0
+
+    def test_site_setting(self, test_db):
+        assert ip.site_id_for(test_db) == ip.DEFAULT_SITE_ID
+        test_db.set_setting_value(ip.SITE_SETTING_KEY, "cholpon_ata")
+        assert ip.site_id_for(test_db) == "cholpon_ata"
+        test_db.set_setting_value(ip.SITE_SETTING_KEY, "mars")
+        assert ip.site_id_for(test_db) == ip.DEFAULT_SITE_ID
+
+    def test_current_plan_covers_db_zones_and_programs(self, test_db):
+        z1 = test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"]
+        z2 = test_db.create_zone({"name": "B", "duration": 10, "group_id": 1})["id"]
+        prog = test_db.create_program({"name": "P", "time": "06:00", "days": [0], "zones": [z2]})
+        plan = ip.current_plan(test_db, _weather())
+        assert [r["zone_id"] for r in plan.rows()] == [z1, z2]
+        assert [r["zone_id"] for r in plan.where(program_id=prog["id"])] == [z2]
+
+    def test_current_plan_without_weather(self, test_db):
+        adj = MagicMock()
+        adj._get_weather.return_value = None
+        with patch("services.weather.get_weather_adjustment", return_value=adj):
+            assert ip.current_plan(test_db) is None
+
+    def test_scheduled_program_records_plan(self, test_db, monkeypatch):
+        from irrigation_scheduler import IrrigationScheduler
+
+        zone = test_db.create_zone({"name": "A", "duration": 10, "group_id": 1})["id"]
+        prog = test_db.create_program({"name": "P", "time": "06:00", "days": [0], "zones": [zone]})
+        adj = MagicMock()
+        adj.is_enabled.return_value = True
+        adj._get_weather.return_value = _weather()
+        adj.get_coefficient.return_value = 100
+        adj.should_skip.return_value = {"skip": False}
+        sched = IrrigationScheduler(test_db)
+        monkeypatch.setattr(sched, "_run_program_zone", lambda *a, **kw: None)
+        with patch("services.weather_adjustment.get_weather_adjustment", return_value=adj):
+            sched._run_program_threaded(prog["id"], [zone], "P")
+        logs = test_db.get_logs("program_plan")
+        assert len(logs) == 1
+        details = json.loads(logs[0]["details"])
+        assert details["program_id"] == prog["id"]
+        assert [z["zone_id"] for z in details["zones"]] == [zone]
+        assert details["total_min"] == ip.current_plan(test_db, _weather()).program_total_min(prog["id"])
@@ -0,0 +1,318 @@
+"""Multi-worker mode: leader lease, elector, forwarding policy, SSE relay (services/leader.py)."""
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services import leader
+from services.leader import LeaderElector, LeaderLease
+
+
+@pytest.fixture
+def lease_db(tmp_path):
+    return str(tmp_path / leader.LEADER_DB_NAME)
+
+
+class TestLeaderLease:
+    def test_only_one_holder_until_expiry(self, lease_db):
+        a = LeaderLease(lease_db, ttl=0.3, holder="a")
+        b = LeaderLease(lease_db, ttl=0.3, holder="b")
+        assert a.try_acquire()
+        assert not b.try_acquire()
+        assert a.renew()
+        assert b.current()["holder"] == "a"
+
+    def test_failover_after_missed_heartbeats(self, lease_db):
+        a = LeaderLease(lease_db, ttl=0.2, holder="a")
+        b = LeaderLease(lease_db, ttl=0.2, holder="b")
+        assert a.try_acquire()
+        time.sleep(0.25)
+        assert b.try_acquire()
+        # старый лидер узнаёт о потере аренды при следующем продлении
+        assert not a.renew()
+        assert b.current()["holder"] == "b"
+
+    def test_endpoint_survives_renewal_and_release_frees_lease(self, lease_db):
+        a = LeaderLease(lease_db, ttl=5, holder="a")
+        b = LeaderLease(lease_db, ttl=5, holder="b")
+        assert a.try_acquire()
+        a.set_endpoint("http://127.0.0.1:1234")
+        assert a.try_acquire()
+        assert a.current()["endpoint"] == "http://127.0.0.1:1234"
+        a.release()
+        assert a.current() is None
+        assert b.try_acquire()
+
+    def test_concurrent_acquire_elects_single_holder(self, lease_db):
+        leases = [LeaderLease(lease_db, ttl=5, holder=f"w{i}") for i in range(4)]
+        results = []
+        barrier = threading.Barrier(len(leases))
+
+        def race(lease):
+            barrier.wait()
+            results.append(lease.try_acquire())
+
+        threads = [threading.Thread(target=race, args=(lease,)) for lease in leases]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert results.count(True) == 1
+
+
+@pytest.mark.timeout(10)
+class TestLeaderElector:
+    def _wait(self, cond, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while not cond() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return cond()
+
+    def test_standby_takes_over_when_leader_stops_renewing(self, lease_db):
+        elected_a, elected_b = MagicMock(), MagicMock()
+        a = LeaderElector(LeaderLease(lease_db, ttl=0.3, holder="a"), elected_a, on_lost=MagicMock(), interval=0.05)
+        b = LeaderElector(LeaderLease(lease_db, ttl=0.3, holder="b"), elected_b, on_lost=MagicMock(), interval=0.05)
+        a.start()
+        assert self._wait(a.is_leader.is_set)
+        b.start()
+        time.sleep(0.2)
+        assert not b.is_leader.is_set() and elected_b.call_count == 0
+        a.stop(release=False)  # лидер «завис»: аренда истекает сама
+        assert self._wait(b.is_leader.is_set)
+        elected_a.assert_called_once()
+        elected_b.assert_called_once()
+        b.stop()
+
+    def test_lost_lease_calls_on_lost(self, lease_db):
+        lost = threading.Event()
+        a = LeaderElector(LeaderLease(lease_db, ttl=5, holder="a"), MagicMock(), on_lost=lost.set, interval=0.05)
+        a.start()
+        assert self._wait(a.is_leader.is_set)
+        # другой воркер перехватил аренду
+        LeaderLease(lease_db, ttl=5, holder="a").release()
+        assert LeaderLease(lease_db, ttl=5, holder="b").try_acquire()
+        assert lost.wait(2.0)
+        assert not a.is_leader.is_set()
+
+    def test_demoted_leader_stays_in_election(self, lease_db):
+        elected = MagicMock()
+        a = LeaderElector(LeaderLease(lease_db, ttl=5, holder="a"), elected, on_lost=MagicMock(), interval=0.05)
+        a.start()
+        assert self._wait(a.is_leader.is_set)
+        LeaderLease(lease_db, ttl=5, holder="a").release()
+        b = LeaderLease(lease_db, ttl=5, holder="b")
+        assert b.try_acquire()
+        assert self._wait(lambda: a.on_lost.called)
+        assert a.is_alive()  # ведомый, а не завершённый процесс/поток
+        b.release()
+        assert self._wait(lambda: elected.call_count == 2)
+        assert a.is_leader.is_set()
+        a.stop()
+
+
+class TestForwardingPolicy:
+    @pytest.mark.parametrize(
+        "method,path,expected",
+        [
+            ("POST", "/api/zones/1/start", True),
+            ("DELETE", "/api/programs/3", True),
+            ("GET", "/api/scheduler/jobs", True),
+            ("GET", "/api/health-details", True),
+            ("GET", "/metrics", True),
+            ("GET", "/api/zones", False),
+            ("GET", "/api/history", False),
+            ("POST", "/login", False),
+            ("GET", "/static/css/app.css", False),
+        ],
+    )
+    def test_needs_leader(self, method, path, expected):
+        assert leader.needs_leader(method, path) is expected
+
+    def test_single_process_is_always_leader(self, monkeypatch):
+        monkeypatch.delenv("WB_WORKERS", raising=False)
+        monkeypatch.setattr(leader, "_elector", None)
+        assert leader.is_leader()
+        monkeypatch.setenv("WB_WORKERS", "3")
+        assert leader.configured_workers() == 3
+        assert not leader.is_leader()
+
+    def test_loopback_app_restores_client_address(self):
+        seen = {}
+        wrapped = leader._loopback_app(lambda environ, start_response: seen.update(environ))
+        wrapped({"REMOTE_ADDR": "127.0.0.1", "HTTP_X_FORWARDED_FOR": "10.0.0.7"}, None)
+        assert seen["REMOTE_ADDR"] == "127.0.0.1"  # без маркера пересылки заголовку не верим
+        wrapped({"REMOTE_ADDR": "127.0.0.1", "HTTP_X_FORWARDED_FOR": "10.0.0.7", "HTTP_X_WB_FORWARDED": "1"}, None)
+        assert seen["REMOTE_ADDR"] == "10.0.0.7"
+
+
+@pytest.fixture
+def relay_dir():
+    # короткий путь: sun_path ограничен ~108 байтами
+    path = tempfile.mkdtemp(prefix="wbrelay", dir="/tmp")
+    yield path
+    from services import sse_hub
+
+    sse_hub.stop_relay()
+    sse_hub._RELAY_DIR = None
+    sse_hub._RELAY_FOLLOWER = False
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.mark.timeout(10)
+class TestSseRelay:
+    def test_leader_broadcast_reaches_peer_sockets(self, relay_dir):
+        from services import sse_hub
+
+        peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        peer.bind(os.path.join(relay_dir, "peer.sock"))
+        peer.settimeout(2)
+        try:
+            sse_hub.start_relay(relay_dir, follower=False)
+            sse_hub.broadcast('{"zone_id": 1, "state": "on"}')
+            assert peer.recv(65536) == b'{"zone_id": 1, "state": "on"}'
+        finally:
+            peer.close()
+
+    def test_follower_delivers_relayed_events_locally_and_does_not_relay(self, relay_dir):
+        from services import sse_hub
+
+        path = sse_hub.start_relay(relay_dir, follower=True)
+        q = sse_hub.register_client()
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sender.sendto(b'{"zone_id": 2, "state": "off"}', path)
+            assert q.get(timeout=2) == '{"zone_id": 2, "state": "off"}'
+            with patch.object(sse_hub, "_start_server_client") as start_client:
+                sse_hub.ensure_hub_started()  # ведомый не подключается к MQTT
+            start_client.assert_not_called()
+        finally:
+            sender.close()
+            sse_hub.unregister_client(q)
+
+    def test_dead_peer_socket_is_removed(self, relay_dir):
+        from services import sse_hub
+
+        dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        dead_path = os.path.join(relay_dir, "dead.sock")
+        dead.bind(dead_path)
+        dead.close()
+        sse_hub.start_relay(relay_dir, follower=False)
+        sse_hub.broadcast("{}")
+        assert not os.path.exists(dead_path)
+
+
+class TestFollowerSideEffects:
+    def test_passive_rain_monitor_only_tracks_state(self):
+        from services.monitors.rain_monitor import RainMonitor
+
+        mon = RainMonitor()
+        mon.passive = True
+        mon._cfg = {"enabled": True, "type": "NO"}
+        with patch.object(mon, "_on_rain_start") as start, patch.object(mon, "_on_rain_stop") as stop:
+            mon._handle_payload("1")
+        assert mon.is_rain is True
+        start.assert_not_called()
+        stop.assert_not_called()
+
+    def test_follower_exit_leaves_zones_alone(self):
+        from services import shutdown
+
+        shutdown.reset_shutdown()
+        db = MagicMock()
+        try:
+            with patch("services.leader.is_leader", return_value=False):
+                shutdown.shutdown_all_zones_off(timeout_sec=1, db=db)
+        finally:
+            shutdown.reset_shutdown()
+        db.get_zones.assert_not_called()
+
+
+@pytest.mark.timeout(30)
+class TestLeaseLossDemotion:
+    """Real lease loss in a worker: _init_worker's callbacks driven by a LeaderElector."""
+
+    def _wait(self, cond, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not cond() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return cond()
+
+    def test_lost_lease_stops_leader_services_and_keeps_serving(self, test_db, lease_db, monkeypatch):
+        import irrigation_scheduler
+        from services import app_init, sse_hub
+        from services.monitors import rain_monitor
+
+        callbacks = {}
+        monkeypatch.setattr(
+            leader,
+            "start_election",
+            lambda path, on_elected, on_lost: callbacks.update(elected=on_elected, lost=on_lost),
+        )
+        monkeypatch.setattr(sse_hub, "start_relay", lambda *a, **kw: "")
+        monkeypatch.setattr(app_init, "_start_monitors", lambda *a, **kw: None)
+        monkeypatch.setattr(app_init, "_boot_sync", lambda *a, **kw: None)
+        monkeypatch.setattr(app_init, "_warm_mqtt_clients", lambda *a, **kw: None)
+        monkeypatch.setattr(rain_monitor, "passive", True)
+        monkeypatch.setattr(sse_hub, "_RELAY_FOLLOWER", True)
+        monkeypatch.setattr(sse_hub, "_SSE_HUB_STARTED", sse_hub._SSE_HUB_STARTED)
+        start_wd, stop_wd = MagicMock(), MagicMock()
+        app = MagicMock(wraps=lambda environ, start_response: [])
+        app_init._init_worker(app, test_db, start_wd, stop_wd)
+
+        # обёртки только сигнализируют о завершении колбэков воркера
+        elections, demoted = [], threading.Event()
+
+        def on_elected():
+            callbacks["elected"]()
+            elections.append(irrigation_scheduler.get_scheduler())
+
+        def on_lost():
+            callbacks["lost"]()
+            demoted.set()
+
+        elector = LeaderElector(LeaderLease(lease_db, ttl=5, holder="a"), on_elected, on_lost, interval=0.05)
+        monkeypatch.setattr(leader, "_elector", elector)
+        elector.start()
+        try:
+            assert self._wait(lambda: len(elections) == 1)
+            sched = elections[0]
+            port = leader._endpoint_server.server_port
+            assert sched.is_running and not rain_monitor.passive and not sse_hub._RELAY_FOLLOWER
+            mqtt_client = MagicMock()
+            sse_hub._SSE_HUB_MQTT[1] = mqtt_client
+            start_wd.assert_called_once()
+
+            # другой воркер перехватил аренду
+            LeaderLease(lease_db, ttl=5, holder="a").release()
+            other = LeaderLease(lease_db, ttl=5, holder="b")
+            assert other.try_acquire()
+            assert demoted.wait(5)
+
+            assert not leader.is_leader()
+            assert irrigation_scheduler.get_scheduler() is None
+            assert not sched.is_running
+            assert rain_monitor.passive and sse_hub._RELAY_FOLLOWER
+            stop_wd.assert_called_once()
+            mqtt_client.loop_stop.assert_called_once()
+            assert sse_hub._SSE_HUB_MQTT == {}
+            assert leader._endpoint_server is None
+            with pytest.raises(OSError):
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            assert elector.is_alive()
+
+            # аренда снова свободна — тот же процесс опять становится лидером
+            other.release()
+            assert self._wait(lambda: len(elections) == 2)
+            assert elections[1] is not sched and elections[1].is_running
+            assert start_wd.call_count == 2
+        finally:
+            elector.stop()
+            callbacks["lost"]()
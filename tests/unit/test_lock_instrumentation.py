@@ -0,0 +1,192 @@
+"""Lock contention instrumentation: owners, waiters, histograms, cycles (services/locks.py)."""
+
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services import locks
+from services.correlation import correlation_id_var
+
+
+@pytest.fixture(autouse=True)
+def _isolated_locks(monkeypatch):
+    monkeypatch.setattr(locks, "_group_locks", {})
+    monkeypatch.setattr(locks, "_zone_locks", {})
+    monkeypatch.setattr(locks, "_order_edges", set())
+
+
+def _hold_in_thread(lock, release: threading.Event, name: str) -> threading.Thread:
+    acquired = threading.Event()
+
+    def run():
+        token = correlation_id_var.set("req-holder-1")
+        with lock:
+            acquired.set()
+            release.wait(5)
+        correlation_id_var.reset(token)
+
+    t = threading.Thread(target=run, name=name)
+    t.start()
+    assert acquired.wait(5)
+    return t
+
+
+class TestRLockSemantics:
+    def test_reentrant_and_counted_once(self):
+        lk = locks.zone_lock(1)
+        with lk, lk:
+            assert lk.owner()["depth"] == 2
+        assert lk.owner() is None
+        assert lk.hold_hist.count == 1
+        assert lk.wait_hist.count == 1
+
+    def test_release_by_non_owner_raises(self):
+        lk = locks.zone_lock(1)
+        with pytest.raises(RuntimeError):
+            lk.release()
+
+    def test_nonblocking_and_timeout(self):
+        lk = locks.group_lock(1)
+        release = threading.Event()
+        t = _hold_in_thread(lk, release, "holder")
+        try:
+            assert lk.acquire(blocking=False) is False
+            assert lk.acquire(timeout=0.05) is False
+            assert lk.waiters() == []
+        finally:
+            release.set()
+            t.join(5)
+        assert lk.acquire(timeout=1) is True
+        lk.release()
+
+
+class TestDiagnostics:
+    def test_owner_has_thread_site_and_correlation_id(self, monkeypatch):
+        monkeypatch.setattr(locks, "_diagnostics", True)
+        lk = locks.group_lock(2)
+        release = threading.Event()
+        t = _hold_in_thread(lk, release, "zone-starter")
+        try:
+            [held] = locks.lock_diagnostics()["held"]
+        finally:
+            release.set()
+            t.join(5)
+        assert held["lock"] == "group:2"
+        assert held["thread"] == "zone-starter"
+        assert held["correlation_id"] == "req-holder-1"
+        assert held["site"].startswith("test_lock_instrumentation.py:")
+
+    def test_fast_path_skips_site_capture(self):
+        lk = locks.group_lock(6)
+        release = threading.Event()
+        t = _hold_in_thread(lk, release, "fast-holder")
+        try:
+            assert lk._where is None
+            [held] = locks.lock_diagnostics()["held"]
+        finally:
+            release.set()
+            t.join(5)
+        # место захвата не запоминалось — показываем, где поток-владелец сейчас
+        assert held["thread"] == "fast-holder"
+        assert held["correlation_id"] is None
+        assert held["site"].startswith("threading.py:")
+
+    def test_contended_acquire_captures_site(self):
+        lk = locks.zone_lock(7)
+        release = threading.Event()
+        t = _hold_in_thread(lk, release, "holder")
+        seen = []
+
+        def waiter():
+            token = correlation_id_var.set("req-waiter")
+            with lk:
+                seen.append(lk.owner())
+            correlation_id_var.reset(token)
+
+        w = threading.Thread(target=waiter, name="waiter")
+        w.start()
+        time.sleep(0.05)
+        release.set()
+        t.join(5)
+        w.join(5)
+        [owner] = seen
+        assert owner["correlation_id"] == "req-waiter"
+        assert owner["site"].startswith("test_lock_instrumentation.py:")
+        assert lk._where is None
+
+    def test_waiter_listed_and_wait_time_recorded(self):
+        lk = locks.zone_lock(3)
+        release = threading.Event()
+        t = _hold_in_thread(lk, release, "holder")
+        waiter = threading.Thread(target=lambda: lk.acquire() and lk.release(), name="waiter")
+        waiter.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not lk.waiters() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            [w] = locks.lock_diagnostics()["waiters"]
+            assert (w["lock"], w["thread"]) == ("zone:3", "waiter")
+        finally:
+            release.set()
+            t.join(5)
+            waiter.join(5)
+        assert lk.contended == 1
+        assert lk.wait_hist.total >= 0.05
+        assert locks.contention_stats()["zone"]["wait"]["count"] == 2
+
+    def test_deadlock_between_two_threads_is_detected(self):
+        a, b = locks.zone_lock(10), locks.zone_lock(11)
+        barrier = threading.Barrier(2)
+
+        def cross(first, second):
+            with first:
+                barrier.wait()
+                if second.acquire(timeout=1.0):
+                    second.release()
+
+        t1 = threading.Thread(target=cross, args=(a, b), name="t1")
+        t2 = threading.Thread(target=cross, args=(b, a), name="t2")
+        t1.start()
+        t2.start()
+        deadline = time.monotonic() + 5
+        while len(locks.lock_diagnostics()["waiters"]) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        diag = locks.lock_diagnostics()
+        t1.join(5)
+        t2.join(5)
+        [cycle] = diag["deadlocks"]
+        assert sorted(cycle[:-1]) == ["t1", "t2"]
+        assert sorted(diag["order_cycles"][0][:-1]) == ["zone:10", "zone:11"]
+
+    def test_consistent_order_has_no_cycles(self, monkeypatch):
+        monkeypatch.setattr(locks, "_diagnostics", True)
+        for _ in range(3):
+            with locks.group_lock(1), locks.zone_lock(1):
+                pass
+        diag = locks.lock_diagnostics()
+        assert diag["order_cycles"] == []
+        assert ("group:1", "zone:1") in locks._order_edges
+
+
+class TestSlowHold:
+    def test_slow_hold_is_logged(self, monkeypatch, caplog):
+        monkeypatch.setattr(locks, "SLOW_HOLD_SECONDS", 0.01)
+        lk = locks.group_lock(4)
+        with caplog.at_level(logging.WARNING, logger="services.locks"), lk:
+            time.sleep(0.02)
+        assert lk.slow_holds == 1
+        assert "lock group:4 held for" in caplog.text
+        assert "released at test_lock_instrumentation.py:" in caplog.text
+
+
+class TestOverhead:
+    def test_snapshot_does_not_touch_statistics(self):
+        lk = locks.zone_lock(5)
+        assert locks.snapshot_zone_locks() == {5: False}
+        assert lk.wait_hist.count == 0
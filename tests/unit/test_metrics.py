@@ -219,3 +219,18 @@ def test_init_metrics_seeds_log_level_labels(client, health_api):
     # Each of the 5 log levels must appear as a labeled series.
     for lvl in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
         assert f'wb_logging_records_total{{level="{lvl}"}}' in body, f"level {lvl} not seeded in metrics"
+
+
+# ── Lock contention histograms ─────────────────────────────────────────────
+
+
+def test_lock_histograms_exported_per_kind(client):
+    from services.locks import group_lock, zone_lock
+
+    with group_lock(9101), zone_lock(9101):
+        pass
+    body = client.get("/metrics").data.decode("utf-8")
+    for kind in ("group", "zone"):
+        assert f'wb_lock_wait_seconds_bucket{{le="+Inf",lock="{kind}"}}' in body
+        assert f'wb_lock_hold_seconds_count{{lock="{kind}"}}' in body
+        assert f'wb_lock_slow_holds_total{{lock="{kind}"}}' in body
@@ -0,0 +1,229 @@
+"""Tests for the shared MQTT topic discovery (services/mqtt_discovery.py).
+
+A fake paho client records subscriptions; messages are injected by calling
+the ``on_message`` callback the discovery installed.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import mqtt_discovery as md
+
+
+class FakeClient:
+    instances = []
+
+    def __init__(self, server):
+        self.server = server
+        self.subscribed = []
+        self.running = False
+        self.on_connect = None
+        self.on_message = None
+        FakeClient.instances.append(self)
+
+    def connect(self, host, port, keepalive):
+        self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+    def loop_start(self):
+        self.running = True
+
+    def loop_stop(self):
+        self.running = False
+
+    def disconnect(self):
+        pass
+
+    def publish(self, topic, payload):
+        self.on_message(self, None, SimpleNamespace(topic=topic, payload=payload.encode()))
+
+
+@pytest.fixture
+def disc(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setattr(md, "DELTA_INTERVAL_SEC", 0.05)
+    d = md.TopicDiscovery(1, {"host": "h", "port": 1883}, client_factory=FakeClient)
+    yield d
+    d.stop()
+
+
+def _client():
+    assert len(FakeClient.instances) == 1
+    return FakeClient.instances[0]
+
+
+class TestTrie:
+    @pytest.mark.parametrize(
+        "flt, expected",
+        [
+            ("#", ["/devices/a/controls/K1", "/devices/a/controls/K2", "/devices/b/controls/K1", "/other"]),
+            ("/devices/+/controls/K1", ["/devices/a/controls/K1", "/devices/b/controls/K1"]),
+            ("/devices/a/#", ["/devices/a/controls/K1", "/devices/a/controls/K2"]),
+            ("/devices/a/controls/K2", ["/devices/a/controls/K2"]),
+            ("/devices/a", []),
+        ],
+    )
+    def test_match(self, flt, expected):
+        trie = md.TopicTrie()
+        for t in ["/devices/a/controls/K1", "/devices/a/controls/K2", "/devices/b/controls/K1", "/other"]:
+            trie.update(t, "1", 0.0, 0.0)
+        assert sorted(n.topic for n in trie.match(flt)) == expected
+        for n in trie.match(flt):
+            assert md.filter_matches(md._levels(flt), md._levels(n.topic))
+
+    def test_counts_rate_and_seen(self):
+        trie = md.TopicTrie()
+        for i in range(10):
+            trie.update("/t", str(i), 100.0 + i, float(i))
+        node = trie.get("/t")
+        assert (node.payload, node.count, node.first_seen, node.last_seen) == ("9", 10, 100.0, 109.0)
+        assert 0.0 < node.rate(9.0) <= 1.0
+        assert node.rate(100.0) < node.rate(9.0)  # затухает без сообщений
+
+    def test_topic_cap(self):
+        trie = md.TopicTrie(max_topics=3)
+        for i in range(5):
+            trie.update(f"/t/{i}", "x", 0.0, 0.0)
+        assert trie.size == 3
+        assert trie.dropped == 2
+        trie.update("/t/0", "y", 0.0, 0.0)  # known topics still update
+        assert trie.get("/t/0").payload == "y"
+
+
+class TestSharedSubscription:
+    def test_many_viewers_one_subscription(self, disc):
+        viewers = [disc.open_viewer("/devices/#") for _ in range(5)]
+        client = _client()
+        assert client.subscribed == ["#"]
+        assert disc.refcount == 5
+        for v in viewers:
+            v.close()
+        assert disc.refcount == 0
+
+    def test_idle_stop_after_last_viewer(self, disc, monkeypatch):
+        monkeypatch.setattr(md, "IDLE_STOP_SEC", 0.05)
+        v = disc.open_viewer()
+        v.close()
+        assert disc.running
+        deadline = time.monotonic() + 2
+        while disc.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not disc.running
+        assert not _client().running
+
+    def test_new_viewer_cancels_idle_stop(self, disc, monkeypatch):
+        monkeypatch.setattr(md, "IDLE_STOP_SEC", 0.1)
+        disc.open_viewer().close()
+        v2 = disc.open_viewer()
+        time.sleep(0.2)
+        assert disc.running
+        assert len(FakeClient.instances) == 1
+        v2.close()
+
+
+class TestDeltas:
+    def test_updates_are_coalesced(self, disc):
+        v = disc.open_viewer("/devices/#")
+        client = _client()
+        for i in range(100):
+            client.publish("/devices/a/controls/K1", str(i))
+        client.publish("/other", "x")  # не подходит под фильтр
+        batch = v.next_delta(timeout=1)
+        assert [(e["topic"], e["payload"], e["count"]) for e in batch] == [("/devices/a/controls/K1", "99", 100)]
+        assert v.next_delta(timeout=0.1) == []
+        v.close()
+
+    def test_batches_are_rate_limited(self, disc, monkeypatch):
+        monkeypatch.setattr(md, "DELTA_INTERVAL_SEC", 0.2)
+        v = disc.open_viewer()
+        client = _client()
+        client.publish("/a", "1")
+        assert len(v.next_delta(timeout=1)) == 1
+        started = time.monotonic()
+        client.publish("/a", "2")
+        client.publish("/b", "1")
+        batch = v.next_delta(timeout=1)
+        assert time.monotonic() - started >= 0.15
+        assert sorted(e["topic"] for e in batch) == ["/a", "/b"]
+        v.close()
+
+    def test_batch_size_is_bounded(self, disc, monkeypatch):
+        monkeypatch.setattr(md, "MAX_DELTA_BATCH", 10)
+        v = disc.open_viewer()
+        client = _client()
+        for i in range(25):
+            client.publish(f"/t/{i}", "x")
+        sizes = [len(v.next_delta(timeout=1)) for _ in range(3)]
+        assert sizes == [10, 10, 5]
+        v.close()
+
+    def test_late_viewer_gets_known_topics_first(self, disc):
+        first = disc.open_viewer()
+        _client().publish("/retained", "42")
+        late = disc.open_viewer("/retained")
+        assert [e["payload"] for e in late.next_delta(timeout=1)] == ["42"]
+        first.close()
+        late.close()
+
+    def test_close_wakes_waiting_viewer(self, disc):
+        v = disc.open_viewer()
+        out = []
+        t = threading.Thread(target=lambda: out.append(v.next_delta(timeout=5)))
+        t.start()
+        time.sleep(0.05)
+        disc.stop()
+        t.join(2)
+        assert out == [[]]
+
+
+class TestSnapshotAndProbe:
+    def test_snapshot_filter_and_search(self, disc):
+        v = disc.open_viewer()
+        client = _client()
+        for t in ["/devices/wb-gpio/controls/K1", "/devices/wb-mr6c/controls/K1", "/devices/wb-mr6c/meta"]:
+            client.publish(t, "1")
+        assert [e["topic"] for e in disc.snapshot("/devices/+/controls/#")] == [
+            "/devices/wb-gpio/controls/K1",
+            "/devices/wb-mr6c/controls/K1",
+        ]
+        assert [e["topic"] for e in disc.snapshot("#", search="MR6C")] == [
+            "/devices/wb-mr6c/controls/K1",
+            "/devices/wb-mr6c/meta",
+        ]
+        assert len(disc.snapshot("#", limit=1)) == 1
+        v.close()
+
+    def test_warm_probe_answers_without_waiting(self, disc):
+        v = disc.open_viewer()
+        _client().publish("/x", "1")
+        disc.started_at -= 10
+        started = time.monotonic()
+        items = disc.probe("/x", duration=3)
+        assert time.monotonic() - started < 0.5
+        assert [(e["topic"], e["payload"]) for e in items] == [("/x", "1")]
+        assert disc.refcount == 1
+        v.close()
+
+    def test_cold_probe_waits_duration_and_releases(self, disc, monkeypatch):
+        monkeypatch.setattr(md, "IDLE_STOP_SEC", 60)
+        started = time.monotonic()
+        assert disc.probe("#", duration=0.1) == []
+        assert time.monotonic() - started >= 0.09
+        assert disc.refcount == 0
+
+
+class TestRegistry:
+    def test_one_discovery_per_server(self):
+        try:
+            a = md.get_discovery(7, {"host": "h"}, client_factory=FakeClient)
+            assert md.get_discovery(7, {"host": "other"}) is a
+            assert md.peek(7) is a
+            md.stop(7)
+            assert md.peek(7) is None
+        finally:
+            md.stop_all()
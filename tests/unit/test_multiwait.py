@@ -0,0 +1,50 @@
+"""services.multiwait — Signal + wait_any (multi-event wait without polling)."""
+
+import threading
+import time
+
+from services.multiwait import Signal, wait_any
+
+
+def test_returns_already_set_event_in_argument_order():
+    a, b = Signal(), Signal()
+    a.set()
+    b.set()
+    assert wait_any([b, a]) is b
+    assert wait_any([None, a], timeout=0) is a
+
+
+def test_timeout_returns_none():
+    started = time.monotonic()
+    assert wait_any([Signal(), Signal()], timeout=0.05) is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_signal_wakes_waiter_immediately():
+    a, b = Signal(), Signal()
+    got = []
+    t = threading.Thread(target=lambda: got.append(wait_any([a, b], timeout=5)))
+    t.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    b.set()
+    t.join(timeout=2)
+    assert got == [b]
+    # Event-driven: no poll interval between set() and wake-up.
+    assert time.monotonic() - started < 0.2
+    assert not a._listeners and not b._listeners
+
+
+def test_plain_event_falls_back_to_polling():
+    plain = threading.Event()
+    threading.Timer(0.05, plain.set).start()
+    assert wait_any([Signal(), plain], timeout=2, poll=0.02) is plain
+
+
+def test_signal_is_a_threading_event():
+    s = Signal()
+    assert isinstance(s, threading.Event)
+    s.set()
+    assert s.wait(0) is True
+    s.clear()
+    assert s.is_set() is False
@@ -0,0 +1,226 @@
+"""Outbound Telegram queue (services/notifications.py) against a local stub Bot API."""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services.notifications import NotificationQueue
+
+
+class _StubBotAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у api.telegram.org
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        srv = self.server
+        with srv.lock:
+            status, reply = srv.replies.pop(0) if srv.replies else (200, {"ok": True, "result": {}})
+            srv.calls.append((time.monotonic(), self.path, body, self.client_address[1], status))
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _StubBotAPI)
+    srv.lock = threading.Lock()
+    srv.calls = []
+    srv.replies = []
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _queue(stub, **kw):
+    opts = {"per_chat_interval": 0.0, "coalesce_window": 0.0, "global_rate": 1000.0}
+    opts.update(kw)
+    q = NotificationQueue(lambda: "TOKEN", api_base=f"http://127.0.0.1:{stub.server_address[1]}", **opts)
+    q.start()
+    return q
+
+
+@pytest.mark.timeout(15)
+class TestDelivery:
+    def test_messages_reuse_one_connection_in_order(self, stub):
+        q = _queue(stub)
+        try:
+            for i in range(5):
+                assert q.submit(42, f"m{i}")
+            assert q.flush(5)
+        finally:
+            q.close()
+        assert [c[2]["text"] for c in stub.calls] == [f"m{i}" for i in range(5)]
+        assert {c[1] for c in stub.calls} == {"/botTOKEN/sendMessage"}
+        assert len({c[3] for c in stub.calls}) == 1  # один и тот же клиентский порт
+        assert q.stats()["sent"] == 5
+
+    def test_per_chat_interval_does_not_block_other_chats(self, stub):
+        q = _queue(stub, per_chat_interval=0.3)
+        try:
+            q.submit(1, "a1")
+            q.submit(1, "a2")
+            q.submit(2, "b1")
+            assert q.flush(5)
+        finally:
+            q.close()
+        order = [c[2]["text"] for c in stub.calls]
+        assert order == ["a1", "b1", "a2"]
+        t = {c[2]["text"]: c[0] for c in stub.calls}
+        assert t["a2"] - t["a1"] >= 0.28
+
+    def test_queue_is_bounded(self, stub):
+        q = NotificationQueue(lambda: "TOKEN", api_base="http://127.0.0.1:9", maxsize=3)
+        assert all(q.submit(1, str(i)) for i in range(3))
+        assert q.alert(1, "x") is False
+        assert q.submit(1, "overflow") is False
+        assert q.stats()["dropped"] == 2
+
+
+@pytest.mark.timeout(15)
+class TestCoalescing:
+    def test_alert_storm_becomes_one_digest(self, stub):
+        q = _queue(stub, coalesce_window=0.3)
+        try:
+            for i in range(20):
+                q.alert(7, f"зона {i}")
+            q.alert(8, "одиночный")
+            assert q.flush(5)
+        finally:
+            q.close()
+        by_chat = {c[2]["chat_id"]: c[2]["text"] for c in stub.calls}
+        assert len(stub.calls) == 2
+        assert by_chat[7].startswith("⚠️ 20 уведомлений") and "зона 19" in by_chat[7]
+        assert by_chat[8] == "одиночный"
+        assert q.stats()["coalesced"] == 19
+
+
+@pytest.mark.timeout(15)
+class TestRetries:
+    def test_429_waits_retry_after_and_5xx_is_retried(self, stub):
+        stub.replies = [
+            (429, {"ok": False, "parameters": {"retry_after": 0.3}}),
+            (502, {"ok": False}),
+        ]
+        q = _queue(stub)
+        try:
+            q.submit(1, "hello")
+            assert q.flush(8)
+        finally:
+            q.close()
+        assert [c[4] for c in stub.calls] == [429, 502, 200]
+        assert stub.calls[1][0] - stub.calls[0][0] >= 0.28
+        assert q.stats()["sent"] == 1 and q.stats()["retried"] == 2
+
+    def test_retry_budget_limits_retries_during_outage(self, stub):
+        stub.replies = [(500, {"ok": False})] * 50
+        q = _queue(stub, retry_budget=2, max_attempts=5)
+        q_budget = []
+        try:
+            with patch("services.notifications.MAX_BACKOFF_SEC", 0.01):
+                for i in range(3):
+                    q.submit(1, f"m{i}")
+                assert q.flush(8)
+            q_budget.append(q.stats())
+        finally:
+            q.close()
+        # 3 первых попытки + 2 повтора из бюджета, дальше сдаёмся сразу
+        assert len(stub.calls) == 5
+        assert q_budget[0]["failed"] == 3 and q_budget[0]["retry_budget"] == 0
+
+    def test_client_error_is_not_retried(self, stub):
+        stub.replies = [(400, {"ok": False, "description": "chat not found"})]
+        q = _queue(stub)
+        try:
+            q.submit(1, "x")
+            assert q.flush(5)
+        finally:
+            q.close()
+        assert len(stub.calls) == 1 and q.stats()["failed"] == 1
+
+
+class TestSubscriptionDispatch:
+    SUBS = [
+        {"chat_id": 1, "type": "daily", "format": "brief"},
+        {"chat_id": 2, "type": "daily", "format": "brief"},
+        {"chat_id": 3, "type": "weekly", "format": "full"},
+    ]
+
+    @pytest.fixture(autouse=True)
+    def _fresh_report_cache(self):
+        from services import reports
+
+        reports.reset_report_cache()
+        yield
+        reports.reset_report_cache()
+
+    def _dispatch(self, runs):
+        """Run the dispatcher at each clock time in *runs*; return (build mock, notifier mock)."""
+        import irrigation_scheduler
+        from services.clock import SimClock, use_clock
+
+        fake_db = MagicMock()
+        fake_db.get_due_bot_subscriptions.return_value = self.SUBS
+        notifier = MagicMock()
+        with (
+            patch("database.db", fake_db),
+            patch("services.reports.build_report_text", side_effect=lambda period, fmt: f"{period}/{fmt}") as build,
+            patch("services.telegram_bot.notifier", notifier),
+        ):
+            for at in runs:
+                with use_clock(SimClock(at)):
+                    irrigation_scheduler.job_dispatch_bot_subscriptions()
+        return build, notifier
+
+    def test_report_built_once_per_period_and_format(self):
+        from datetime import datetime
+
+        build, notifier = self._dispatch([datetime(2026, 6, 1, 8, 0)])
+        assert build.call_count == 2
+        assert [c.args for c in notifier.notify.call_args_list] == [
+            (1, "today/brief"),
+            (2, "today/brief"),
+            (3, "7/full"),
+        ]
+
+    def test_consecutive_runs_reuse_reports(self):
+        from datetime import datetime
+
+        build, notifier = self._dispatch([datetime(2026, 6, 1, 8, 0), datetime(2026, 6, 1, 8, 1)])
+        assert sorted(c.kwargs["period"] + "/" + c.kwargs["fmt"] for c in build.call_args_list) == [
+            "7/full",
+            "today/brief",
+        ]
+        assert notifier.notify.call_count == 6
+
+    def test_cached_report_expires_with_its_period(self):
+        from datetime import datetime
+
+        from services.reports import REPORT_CACHE_TTL_SEC
+
+        ttl_min = REPORT_CACHE_TTL_SEC["today"] // 60
+        build, _ = self._dispatch(
+            [
+                datetime(2026, 6, 1, 8, 0),
+                datetime(2026, 6, 1, 8, ttl_min + 1),  # «today» устарел, «7» ещё свежий
+                datetime(2026, 6, 2, 0, 0),  # полночь: окно периода сдвинулось
+            ]
+        )
+        built = [c.kwargs["period"] for c in build.call_args_list]
+        assert built.count("today") == 3
+        assert built.count("7") == 2
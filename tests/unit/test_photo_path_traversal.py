@@ -130,6 +130,22 @@ class TestSafeZonePhotoPath:
             with pytest.raises(UnsafePathError):
                 safe_zone_photo_path(bad)
 
+    # Content-addressed names: optional 10-hex-digit hash before the extension.
+    def test_hashed_filename_accepted(self):
+        for good in ("media/zones/ZONE_5.0123456789.webp", "media/zones/ZONE_5_thumb.abcdef0123.webp"):
+            assert safe_zone_photo_path(good).endswith(os.path.basename(good))
+
+    def test_bad_hash_rejected(self):
+        for bad in (
+            "media/zones/ZONE_5.abc.webp",
+            "media/zones/ZONE_5.0123456789a.webp",
+            "media/zones/ZONE_5.012345678g.webp",
+            "media/zones/ZONE_5.0123456789.0123456789.webp",
+            "media/zones/ZONE_5.0123456789_thumb.webp",
+        ):
+            with pytest.raises(UnsafePathError):
+                safe_zone_photo_path(bad)
+
 
 # ── SEC-014: rotate_zone_photo angle handling ──────────────────────────────
 
@@ -0,0 +1,84 @@
+"""Sampling profiler: stack aggregation, thread roles, folded output (services/profiler.py)."""
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services import profiler
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(200))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    t = threading.Thread(target=_busy_loop, args=(stop,), name="sse-cleaner")
+    t.start()
+    yield t
+    stop.set()
+    t.join(5)
+
+
+class TestCapture:
+    def test_folded_stacks_per_thread_with_role(self, busy_thread):
+        cap = profiler.Capture(hz=200, duration_s=0.3, thread_ids={busy_thread.ident}).start()
+        cap._thread.join(5)
+        assert cap.samples > 5
+        lines = cap.folded().splitlines()
+        assert lines
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+            role, name, *frames = stack.split(";")
+            assert (role, name) == ("sse-hub", "sse-cleaner")
+        assert any("_busy_loop (tests/unit/test_profiler.py:" in line for line in lines)
+        assert cap.summary()["by_role"] == {"sse-hub": sum(int(x.rsplit(" ", 1)[1]) for x in lines)}
+
+    def test_window_is_bounded(self):
+        cap = profiler.Capture(hz=10_000, duration_s=10_000)
+        assert (cap.hz, cap.duration_s) == (profiler.MAX_HZ, profiler.MAX_DURATION_S)
+
+    def test_stack_based_roles(self):
+        assert profiler.thread_role("ThreadPoolExecutor-0_1", None, ("run (apscheduler/executors/base.py:1)",)) == (
+            "scheduler"
+        )
+        assert profiler.thread_role("Thread-7", None, ("wsgi_app (flask/app.py:1)",)) == "http"
+        assert profiler.thread_role("Thread-7", None, ("idle (x.py:1)",)) is None
+
+
+class TestGlobalCapture:
+    def test_single_capture_at_a_time(self):
+        cap = profiler.start(duration_s=5, hz=50)
+        try:
+            assert cap is not None
+            assert profiler.start(duration_s=5) is None
+            assert profiler.status()["capture"]["running"] is True
+        finally:
+            profiler.stop()
+        assert cap.running is False
+        assert profiler.start(duration_s=0.1) is not None
+        profiler.stop()
+
+
+class TestRequestCapture:
+    def test_profile_is_kept_under_request_id(self, monkeypatch):
+        monkeypatch.setattr(profiler, "_request_profiles", profiler.OrderedDict())
+        monkeypatch.setattr(profiler, "MAX_REQUEST_PROFILES", 2)
+        for rid in ("req-a", "req-b", "req-c"):
+            assert profiler.begin_request(rid, "GET", "/api/zones")
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                sum(range(100))
+            summary = profiler.end_request(rid, 200)
+            assert summary["samples"] > 0
+        assert [p["request_id"] for p in profiler.list_request_profiles()] == ["req-c", "req-b"]
+        assert profiler.request_profile("req-a") is None
+        assert "test_profile_is_kept_under_request_id" in profiler.request_profile("req-c")
+        assert profiler.end_request("req-c") is None
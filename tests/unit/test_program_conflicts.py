@@ -0,0 +1,119 @@
+"""Conflict engine (services/program_conflicts.py): interval index, schedule types, site report."""
+
+import os
+import random
+import time
+from datetime import datetime
+
+os.environ["TESTING"] = "1"
+
+from services.program_conflicts import ConflictEngine, IntervalIndex
+
+# Понедельник, 2 марта 2026
+NOW = datetime(2026, 3, 2, 0, 0)
+
+ZONES = [
+    {"id": 1, "duration": 30, "group_id": 1},
+    {"id": 2, "duration": 30, "group_id": 1},
+    {"id": 3, "duration": 20, "group_id": 2},
+]
+
+
+def _prog(pid, time_str, zones, **extra):
+    data = {"id": pid, "name": f"P{pid}", "time": time_str, "zones": zones, "days": [0, 2, 4]}
+    data.update(extra)
+    return data
+
+
+class TestIntervalIndex:
+    def test_matches_brute_force(self):
+        rnd = random.Random(7)
+        items = []
+        for i in range(300):
+            s = rnd.uniform(0, 1000)
+            items.append((s, s + rnd.uniform(0.5, 40), i))
+        index = IntervalIndex(items)
+        for _ in range(200):
+            a = rnd.uniform(-10, 1010)
+            b = a + rnd.uniform(0.1, 60)
+            expected = sorted(i for s, e, i in items if s < b and e > a)
+            assert sorted(index.overlapping(a, b)) == expected
+
+    def test_half_open_touching_intervals_do_not_overlap(self):
+        index = IntervalIndex([(0, 10, "a"), (10, 20, "b")])
+        assert index.overlapping(10, 15) == ["b"]
+        assert index.overlapping(5, 10) == ["a"]
+
+
+class TestEngine:
+    def test_same_group_overlap_and_parallel_groups(self):
+        engine = ConflictEngine([_prog(1, "06:00", [1, 2]), _prog(2, "06:00", [3])], ZONES, now=NOW)
+        hits = engine.check(_prog(None, "06:30", [1]))
+        assert [(c.other_program_id, c.group_id, c.level) for c in hits] == [(1, 1, "error")]
+        assert hits[0].overlap_minutes == 30
+        assert hits[0].days == {0, 2, 4}
+
+    def test_extra_times_are_checked(self):
+        engine = ConflictEngine([_prog(1, "05:00", [1], extra_times=["20:00"])], ZONES, now=NOW)
+        assert [c.other_program_id for c in engine.check(_prog(None, "20:10", [2]))] == [1]
+
+    def test_even_odd_and_interval_schedules(self):
+        even = _prog(1, "06:00", [1], schedule_type="even-odd", even_odd="even", days=[])
+        engine = ConflictEngine([even], ZONES, now=NOW)
+        # Вт 3 марта — нечётное, Вт 10 марта — чётное: конфликт только во второй вторник
+        (hit,) = engine.check(_prog(None, "06:10", [2], days=[1]))
+        assert hit.first_start == datetime(2026, 3, 10, 6, 10)
+        assert hit.occurrences == 1
+        interval = _prog(2, "21:00", [3], schedule_type="interval", interval_days=3, days=[])
+        engine = ConflictEngine([interval], ZONES, now=NOW)
+        assert engine.check(_prog(None, "21:05", [3], days=[0, 1, 2, 3, 4, 5, 6]))
+
+    def test_overlap_past_midnight(self):
+        engine = ConflictEngine([_prog(1, "23:50", [1, 2], days=[0])], ZONES, now=NOW)
+        assert [c.days for c in engine.check(_prog(None, "00:10", [1], days=[1]))] == [{1}]
+
+    def test_weather_factor_turns_gap_into_warning(self):
+        programs = [_prog(1, "06:00", [1, 2])]
+        candidate = _prog(None, "07:05", [1])
+        assert ConflictEngine(programs, ZONES, now=NOW).check(candidate) == []
+        hits = ConflictEngine(programs, ZONES, now=NOW, weather_factor=120).check(candidate)
+        assert [(c.level, round(c.overlap_minutes)) for c in hits] == [("warning", 7)]
+
+    def test_sequential_groups_offset_later_groups(self):
+        programs = [_prog(1, "06:00", [1, 2, 3])]
+        # параллельно группа 2 занята 06:00–06:20, последовательно — 07:00–07:20
+        candidate = _prog(None, "06:10", [3])
+        assert ConflictEngine(programs, ZONES, now=NOW).check(candidate)
+        assert ConflictEngine(programs, ZONES, now=NOW, sequential_groups=True).check(candidate) == []
+        late = _prog(None, "07:05", [3])
+        assert ConflictEngine(programs, ZONES, now=NOW).check(late) == []
+        assert ConflictEngine(programs, ZONES, now=NOW, sequential_groups=True).check(late)
+
+    def test_disabled_programs_are_ignored(self):
+        engine = ConflictEngine([_prog(1, "06:00", [1], enabled=False)], ZONES, now=NOW)
+        assert engine.check(_prog(None, "06:00", [1])) == []
+
+    def test_site_report_lists_each_pair_once(self):
+        programs = [_prog(1, "06:00", [1, 2]), _prog(2, "06:30", [1]), _prog(3, "06:45", [2]), _prog(4, "06:00", [3])]
+        report = ConflictEngine(programs, ZONES, now=NOW).site_report()
+        assert sorted((c.program_id, c.other_program_id) for c in report) == [(1, 2), (1, 3), (2, 3)]
+        assert all(c.occurrences == 6 for c in report)  # 3 дня × 2 недели горизонта
+
+    def test_site_report_100_programs_in_milliseconds(self):
+        zones = [{"id": z, "duration": 15, "group_id": z % 8} for z in range(1, 65)]
+        rnd = random.Random(1)
+        programs = [
+            _prog(
+                pid,
+                f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}",
+                rnd.sample(range(1, 65), 4),
+                days=rnd.sample(range(7), 3),
+                extra_times=[f"{rnd.randrange(24):02d}:00"],
+            )
+            for pid in range(1, 101)
+        ]
+        started = time.perf_counter()
+        report = ConflictEngine(programs, zones, now=NOW).site_report()
+        elapsed = time.perf_counter() - started
+        assert report
+        assert elapsed < 0.5, f"site report took {elapsed * 1000:.0f} ms"
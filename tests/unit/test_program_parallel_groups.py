@@ -0,0 +1,240 @@
+"""Parallel fan-out of multi-group programs (ProgramQueueManager.enqueue_program)."""
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services.program_queue import (
+    FlowBudget,
+    ProgramCompletionTracker,
+    ProgramQueueManager,
+    QueueEntryState,
+)
+
+ZONE_SECONDS = 0.3
+
+
+class _Recorder:
+    """zone_runner stub: sleeps, records peak concurrency and peak flow."""
+
+    def __init__(self, qm_ref, seconds=ZONE_SECONDS):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.peak_flow = 0.0
+        self.ran = []
+        self._qm_ref = qm_ref
+
+    def __call__(self, entry, zone_id, coeff):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.peak_flow = max(self.peak_flow, self._qm_ref[0]._flow.in_use)
+            self.ran.append((entry.group_id, zone_id))
+        time.sleep(self.seconds)
+        with self.lock:
+            self.active -= 1
+
+
+def _make_qm(**kwargs):
+    ref = []
+    runner = _Recorder(ref)
+    tracker = ProgramCompletionTracker()
+    qm = ProgramQueueManager(zone_runner=runner, completion_tracker=tracker, **kwargs)
+    ref.append(qm)
+    return qm, runner, tracker
+
+
+class TestFanOut:
+    @pytest.mark.timeout(10)
+    def test_six_groups_take_longest_group_not_sum(self):
+        qm, runner, tracker = _make_qm()
+        slices = [(gid, [gid * 10]) for gid in range(1, 7)]
+        try:
+            started = time.monotonic()
+            run_id, entries = qm.enqueue_program(1, "Утро", slices)
+            assert len(entries) == 6
+            assert tracker.wait(run_id, timeout=5.0)
+            elapsed = time.monotonic() - started
+        finally:
+            qm.shutdown()
+        assert elapsed < 6 * ZONE_SECONDS * 0.6, elapsed
+        assert runner.peak == 6
+        assert sorted(runner.ran) == sorted((g, z[0]) for g, z in slices)
+        assert all(e.state == QueueEntryState.COMPLETED for e in entries)
+
+    @pytest.mark.timeout(10)
+    def test_zones_within_group_stay_sequential(self):
+        qm, runner, tracker = _make_qm()
+        try:
+            run_id, _ = qm.enqueue_program(1, "P", [(1, [11, 12, 13])])
+            assert tracker.wait(run_id, timeout=5.0)
+        finally:
+            qm.shutdown()
+        assert runner.peak == 1
+        assert [z for _, z in runner.ran] == [11, 12, 13]
+
+    @pytest.mark.timeout(10)
+    def test_max_parallel_caps_running_groups(self):
+        qm, runner, tracker = _make_qm(max_parallel=2)
+        try:
+            run_id, _ = qm.enqueue_program(1, "P", [(gid, [gid]) for gid in range(1, 6)])
+            assert tracker.wait(run_id, timeout=5.0)
+        finally:
+            qm.shutdown()
+        assert runner.peak == 2
+        assert len(runner.ran) == 5
+
+    @pytest.mark.timeout(10)
+    def test_flow_budget_limits_open_zones(self):
+        qm, runner, tracker = _make_qm(flow_budget_lpm=50.0, zone_demand=lambda zid: 20.0)
+        try:
+            run_id, _ = qm.enqueue_program(1, "P", [(gid, [gid]) for gid in range(1, 5)])
+            assert tracker.wait(run_id, timeout=5.0)
+        finally:
+            qm.shutdown()
+        assert runner.peak == 2
+        assert runner.peak_flow <= 50.0
+
+    @pytest.mark.timeout(10)
+    def test_full_queue_slice_still_completes_run(self):
+        qm, _runner, tracker = _make_qm(max_queue_size=1)
+        blocker = qm.enqueue(99, "busy", 1, [1])
+        try:
+            run_id, entries = qm.enqueue_program(1, "P", [(1, [2]), (2, [3])])
+            assert [e.group_id for e in entries] == [2]
+            assert blocker is not None
+            assert tracker.wait(run_id, timeout=5.0)
+        finally:
+            qm.shutdown()
+
+    @pytest.mark.timeout(10)
+    def test_cancelled_program_completes_run(self):
+        qm, _runner, tracker = _make_qm(max_parallel=1)
+        try:
+            run_id, _ = qm.enqueue_program(7, "P", [(gid, [gid, gid + 100]) for gid in range(1, 4)])
+            time.sleep(0.05)
+            qm.cancel_program(7)
+            assert tracker.wait(run_id, timeout=3.0)
+        finally:
+            qm.shutdown()
+
+
+class TestFlowBudget:
+    def test_disabled_budget_never_blocks(self):
+        fb = FlowBudget(0)
+        assert fb.acquire(1000) and fb.acquire(1000)
+
+    def test_oversized_zone_runs_alone(self):
+        fb = FlowBudget(10)
+        assert fb.acquire(25)
+        cancel = threading.Event()
+        cancel.set()
+        assert fb.acquire(5, cancel_event=cancel) is False
+        fb.release(25)
+        assert fb.acquire(5)
+
+    def test_release_wakes_waiter(self):
+        fb = FlowBudget(30)
+        assert fb.acquire(20)
+        got = []
+        t = threading.Thread(target=lambda: got.append(fb.acquire(20, poll=0.05)))
+        t.start()
+        time.sleep(0.1)
+        assert got == []
+        fb.release(20)
+        t.join(timeout=2)
+        assert got == [True]
+        assert fb.in_use == 20
+
+
+class TestTrackerWait:
+    def test_wait_times_out_then_completes(self):
+        tracker = ProgramCompletionTracker()
+        tracker.register("r", ["a"])
+        assert tracker.wait("r", timeout=0.05) is False
+        threading.Timer(0.05, tracker.entry_finished, args=("r", "a")).start()
+        assert tracker.wait("r", timeout=2.0) is True
+
+
+class TestSchedulerFanOut:
+    @pytest.mark.timeout(20)
+    def test_multi_group_program_runs_groups_in_parallel(self, test_db, monkeypatch):
+        from irrigation_scheduler import IrrigationScheduler
+
+        zones = []
+        for i in range(3):
+            group = test_db.create_group(f"G{i}")
+            zones.append(test_db.create_zone({"name": f"Z{i}", "duration": 1, "group_id": group["id"]})["id"])
+        test_db.set_setting_value("program_max_parallel_groups", "4")
+        test_db.set_setting_value("program_flow_budget_lpm", "100")
+        sched = IrrigationScheduler(test_db)
+        calls = []
+
+        def fake_zone(program_id, program_name, zone_id, manual=False):
+            calls.append((zone_id, threading.current_thread().name))
+            time.sleep(ZONE_SECONDS)
+
+        monkeypatch.setattr(sched, "_run_program_zone", fake_zone)
+        try:
+            started = time.monotonic()
+            sched._run_program_threaded(1, zones, "Par", manual=True)
+            elapsed = time.monotonic() - started
+        finally:
+            if sched.program_queue is not None:
+                sched.program_queue.shutdown()
+        assert sorted(z for z, _ in calls) == sorted(zones)
+        assert all(name.startswith("queue-worker-") for _, name in calls)
+        assert elapsed < 3 * ZONE_SECONDS * 0.8, elapsed
+
+    @pytest.mark.timeout(20)
+    def test_parallel_limit_one_keeps_inline_sequence(self, test_db, monkeypatch):
+        from irrigation_scheduler import IrrigationScheduler
+
+        zones = []
+        for i in range(2):
+            group = test_db.create_group(f"S{i}")
+            zones.append(test_db.create_zone({"name": f"S{i}", "duration": 1, "group_id": group["id"]})["id"])
+        test_db.set_setting_value("program_max_parallel_groups", "1")
+        sched = IrrigationScheduler(test_db)
+        calls = []
+        monkeypatch.setattr(sched, "_run_program_zone", lambda pid, name, zid, manual=False: calls.append(zid))
+        sched._run_program_threaded(1, zones, "Seq", manual=True)
+        assert calls == zones
+        assert sched.program_queue is None
+
+    @pytest.mark.parametrize(
+        "settings, expected",
+        [
+            ({}, 1),
+            ({"program_max_parallel_groups": "4"}, 1),  # без бюджета насоса — последовательно
+            ({"program_flow_budget_lpm": "100"}, 1),
+            ({"program_max_parallel_groups": "3", "program_flow_budget_lpm": "100"}, 3),
+        ],
+    )
+    def test_parallel_groups_are_opt_in(self, test_db, settings, expected):
+        from irrigation_scheduler import IrrigationScheduler
+
+        for key, value in settings.items():
+            test_db.set_setting_value(key, value)
+        assert IrrigationScheduler(test_db)._program_parallel_limit() == expected
+
+    @pytest.mark.timeout(20)
+    def test_default_install_runs_groups_sequentially(self, test_db, monkeypatch):
+        from irrigation_scheduler import IrrigationScheduler
+
+        zones = []
+        for i in range(2):
+            group = test_db.create_group(f"D{i}")
+            zones.append(test_db.create_zone({"name": f"D{i}", "duration": 1, "group_id": group["id"]})["id"])
+        sched = IrrigationScheduler(test_db)
+        calls = []
+        monkeypatch.setattr(sched, "_run_program_zone", lambda pid, name, zid, manual=False: calls.append(zid))
+        sched._run_program_threaded(1, zones, "Default", manual=True)
+        assert calls == zones
+        assert sched.program_queue is None
@@ -0,0 +1,195 @@
+"""Compiled program timeline + single program_dispatch job."""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from scheduler.timeline import PROGRAM_DISPATCH_JOB_ID, ProgramTimeline, Slot, compile_program_slots
+from services.clock import SimClock, use_clock
+
+# Понедельник
+MON = datetime(2026, 3, 2, 12, 0)
+
+
+class TestSlotFiring:
+    def test_weekday_same_day_and_next_week(self):
+        slot = Slot("k", 1, 6, 30, "weekdays", day=0)
+        assert slot.first_at_or_after(MON.replace(hour=5)) == MON.replace(hour=6, minute=30)
+        assert slot.first_at_or_after(MON) == MON.replace(hour=6, minute=30) + timedelta(days=7)
+
+    def test_even_odd_skips_month_boundary(self):
+        slot = Slot("k", 1, 6, 0, "even-odd", parity=0)
+        # 31 марта (нечётное) → 1 апреля (нечётное) → 2 апреля
+        assert slot.first_at_or_after(datetime(2026, 3, 30, 7, 0)) == datetime(2026, 4, 2, 6, 0)
+        odd = Slot("k", 1, 6, 0, "even-odd", parity=1)
+        assert odd.first_at_or_after(datetime(2026, 3, 31, 5, 0)) == datetime(2026, 3, 31, 6, 0)
+
+    def test_interval_steps_from_anchor(self):
+        anchor = datetime(2026, 3, 2, 6, 0)
+        slot = Slot("k", 1, 6, 0, "interval", anchor=anchor, interval_days=3)
+        assert slot.first_at_or_after(anchor - timedelta(days=5)) == anchor
+        assert slot.first_at_or_after(anchor + timedelta(seconds=1)) == anchor + timedelta(days=3)
+        assert slot.first_at_or_after(anchor + timedelta(days=3)) == anchor + timedelta(days=3)
+
+
+class TestCompile:
+    def test_keys_and_extra_times(self):
+        slots = compile_program_slots(7, {"time": "06:00", "days": [0, 3], "extra_times": '["19:30", "bad"]'}, now=MON)
+        assert [s.key for s in slots] == [
+            "program:7:main:d0",
+            "program:7:main:d3",
+            "program:7:extra:0:d0",
+            "program:7:extra:0:d3",
+        ]
+
+    def test_interval_anchor_is_tomorrow_when_time_passed(self):
+        (slot,) = compile_program_slots(1, {"time": "06:00", "schedule_type": "interval", "interval_days": 2}, MON)
+        assert slot.anchor == datetime(2026, 3, 3, 6, 0)
+
+
+class TestTimeline:
+    def test_pop_due_rearms_slot(self):
+        tl = ProgramTimeline()
+        tl.set_program(1, [Slot("a", 1, 6, 0, "weekdays", day=0)], since=MON.replace(hour=0))
+        assert tl.peek() == MON.replace(hour=6)
+        due = tl.pop_due(MON)
+        assert [(at, s.key) for at, s in due] == [(MON.replace(hour=6), "a")]
+        assert tl.peek() == MON.replace(hour=6) + timedelta(days=7)
+        assert tl.pop_due(MON) == []
+
+    def test_replaced_program_drops_stale_entries(self):
+        tl = ProgramTimeline()
+        since = MON.replace(hour=0)
+        tl.set_program(1, [Slot("a", 1, 6, 0, "weekdays", day=0)], since)
+        tl.set_program(1, [Slot("a", 1, 8, 0, "weekdays", day=0)], since)
+        tl.set_program(2, [Slot("b", 2, 7, 0, "weekdays", day=0)], since)
+        assert len(tl) == 2
+        assert [s.key for _, s in tl.pop_due(MON)] == ["b", "a"]
+        assert tl.next_for_program(1) == MON.replace(hour=8) + timedelta(days=7)
+        tl.remove_program(1)
+        tl.remove_program(2)
+        assert tl.peek() is None
+
+
+@pytest.fixture
+def sched(test_db):
+    from irrigation_scheduler import IrrigationScheduler
+
+    s = IrrigationScheduler(test_db)
+    s.start()
+    yield s
+    s.stop()
+
+
+def _program(db, name, days, time="06:00"):
+    return db.create_program({"name": name, "time": time, "days": days, "zones": [1], "enabled": 1})
+
+
+class TestSchedulerDispatch:
+    def test_many_programs_share_one_job(self, sched):
+        sched.db.create_zone({"name": "Z1", "duration": 10, "group_id": 1})
+        for i in range(5):
+            prog = _program(sched.db, f"P{i}", [0, 1, 2, 3, 4, 5, 6], time=f"0{i}:15")
+            sched.schedule_program(prog["id"], prog)
+        ids = [j.id for j in sched.scheduler.get_jobs()]
+        assert ids.count(PROGRAM_DISPATCH_JOB_ID) == 1
+        assert not any(i.startswith("program:") for i in ids)
+        assert len(sched.program_timeline) == 35
+        job = sched.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID)
+        assert job.next_run_time.replace(tzinfo=None) == sched.program_timeline.peek()
+
+    def test_dispatch_starts_due_runs(self, sched, monkeypatch):
+        sched.db.create_zone({"name": "Z1", "duration": 10, "group_id": 1})
+        prog = _program(sched.db, "Due", [0, 1, 2, 3, 4, 5, 6])
+        sched.schedule_program(prog["id"], prog)
+        fire_at = sched.program_timeline.peek()
+        added = []
+        monkeypatch.setattr(sched.scheduler, "add_job", lambda *a, **kw: added.append(kw["id"]))
+
+        with use_clock(SimClock(fire_at + timedelta(seconds=5))):
+            assert sched.dispatch_programs() == 1
+        assert f"program:{prog['id']}:main:d{fire_at.weekday()}@{fire_at:%Y%m%d%H%M}" in added
+        assert PROGRAM_DISPATCH_JOB_ID in added
+        assert sched.program_timeline.peek() == fire_at + timedelta(days=1)
+
+    def test_cancel_removes_dispatch_when_empty(self, sched):
+        sched.db.create_zone({"name": "Z1", "duration": 10, "group_id": 1})
+        prog = _program(sched.db, "Only", [2])
+        sched.schedule_program(prog["id"], prog)
+        assert sched.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID) is not None
+        sched.cancel_program(prog["id"])
+        assert sched.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID) is None
+        assert sched.program_jobs[prog["id"]] == []
+
+    def test_load_programs_removes_legacy_cron_jobs(self, sched):
+        sched.db.create_zone({"name": "Z1", "duration": 10, "group_id": 1})
+        _program(sched.db, "Legacy", [0, 3])
+        sched.scheduler.add_job(
+            "irrigation_scheduler:job_run_program", "interval", days=1, args=[99, [1], "Old"], id="program:99:main:d0"
+        )
+        sched.load_programs()
+        ids = [j.id for j in sched.scheduler.get_jobs()]
+        assert "program:99:main:d0" not in ids
+        assert PROGRAM_DISPATCH_JOB_ID in ids
+        assert sched._timeline_ready
+
+
+class TestDispatchRestart:
+    """Курсор program_dispatch переживает рестарт без повторного старта."""
+
+    @staticmethod
+    def _restart(test_db, cursor, now, monkeypatch):
+        from irrigation_scheduler import IrrigationScheduler
+
+        fresh = IrrigationScheduler(test_db)
+        added = []
+        monkeypatch.setattr(fresh.scheduler, "add_job", lambda *a, **kw: added.append(kw["id"]))
+        with use_clock(SimClock(now)):
+            started = fresh.dispatch_programs(cursor)
+        return started, [i for i in added if i.startswith("program:")]
+
+    def _schedule(self, sched):
+        sched.db.create_zone({"name": "Z1", "duration": 10, "group_id": 1})
+        prog = _program(sched.db, "Restart", [0, 1, 2, 3, 4, 5, 6])
+        sched.schedule_program(prog["id"], prog)
+        return sched.program_timeline.peek()
+
+    def test_dispatched_slot_is_not_refired_after_restart(self, sched, monkeypatch):
+        fire_at = self._schedule(sched)
+        persisted = []
+        real_add_job = sched.scheduler.add_job
+
+        def add_job(*a, **kw):
+            if kw["id"] == PROGRAM_DISPATCH_JOB_ID:
+                persisted.append(kw["args"][0])
+                return real_add_job(*a, **kw)
+            return None
+
+        monkeypatch.setattr(sched.scheduler, "add_job", add_job)
+        with use_clock(SimClock(fire_at + timedelta(milliseconds=300))):
+            assert sched.dispatch_programs() == 1
+        cursor = persisted[-1]
+        assert datetime.fromisoformat(cursor) == fire_at + timedelta(milliseconds=300)
+
+        started, added = self._restart(sched.db, cursor, fire_at + timedelta(seconds=30), monkeypatch)
+        assert (started, added) == (0, [])
+
+    def test_missed_slot_is_caught_up_after_restart(self, sched, monkeypatch):
+        fire_at = self._schedule(sched)
+        with use_clock(SimClock(fire_at - timedelta(minutes=1))):
+            sched._arm_program_dispatch()
+        cursor = sched.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID).args[0]
+
+        started, added = self._restart(sched.db, cursor, fire_at + timedelta(minutes=10), monkeypatch)
+        assert started == 1
+        assert added == [f"program:1:main:d{fire_at.weekday()}@{fire_at:%Y%m%d%H%M}"]
+
+    def test_due_but_undispatched_slot_stays_pending(self, sched):
+        fire_at = self._schedule(sched)
+        with use_clock(SimClock(fire_at + timedelta(seconds=5))):
+            sched._arm_program_dispatch()
+        cursor = datetime.fromisoformat(sched.scheduler.get_job(PROGRAM_DISPATCH_JOB_ID).args[0])
+        assert cursor < fire_at
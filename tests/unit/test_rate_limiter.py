@@ -2,7 +2,7 @@
 
 import time
 
-from services.rate_limiter import LoginRateLimiter
+from services.rate_limiter import LoginRateLimiter, SlidingWindowLimiter
 
 
 class TestLoginRateLimiter:
@@ -63,3 +63,75 @@ class TestLoginRateLimiter:
         allowed, retry = rl.check("10.0.0.1")
         assert allowed is False
         assert retry > 0
+
+
+class TestSlidingWindowLimiter:
+    def test_allows_exactly_limit_in_first_window(self):
+        rl = SlidingWindowLimiter("t", shards=2)
+        results = [rl.hit("k", 5, 60, now=1000.0)[0] for _ in range(6)]
+        assert results == [True] * 5 + [False]
+
+    def test_rejected_hits_not_counted(self):
+        rl = SlidingWindowLimiter("t")
+        for _ in range(3):
+            rl.hit("k", 3, 60, now=1000.0)
+        for _ in range(10):
+            rl.hit("k", 3, 60, now=1001.0)
+        assert rl.count("k", 60, now=1001.0) == 3
+
+    def test_previous_window_decays_linearly(self):
+        rl = SlidingWindowLimiter("t")
+        # Window [960, 1020): 4 hits
+        for _ in range(4):
+            rl.hit("k", 4, 60, now=970.0)
+        # Half-way through the next window the estimate is 4 * 0.5 = 2
+        assert rl.count("k", 60, now=1050.0) == 2.0
+        assert rl.hit("k", 4, 60, now=1050.0)[0] is True
+        assert rl.hit("k", 4, 60, now=1050.0)[0] is True
+        allowed, retry = rl.hit("k", 4, 60, now=1050.0)
+        assert allowed is False
+        # Next hit fits once prev weight drops to 1/4: (1 - e/60) * 4 + 2 <= 3 → e >= 45
+        assert retry == 15
+        assert rl.hit("k", 4, 60, now=1050.0 + retry)[0] is True
+
+    def test_retry_after_when_current_window_full(self):
+        rl = SlidingWindowLimiter("t")
+        for _ in range(2):
+            rl.hit("k", 2, 60, now=960.0)
+        allowed, retry = rl.hit("k", 2, 60, now=960.0)
+        assert allowed is False
+        # Roll at 1020, then prev=2 must decay to <= 1 → 30 s more.
+        assert retry == 90
+
+    def test_idle_keys_are_evicted(self):
+        rl = SlidingWindowLimiter("t", shards=1)
+        rl.hit("old", 5, 60, now=1000.0)
+        rl.hit("new", 5, 60, now=1000.0 + 121)
+        assert len(rl) == 1
+
+    def test_memory_bounded_by_max_keys(self):
+        rl = SlidingWindowLimiter("t", shards=4, max_keys=64)
+        for i in range(10_000):
+            rl.hit(f"10.0.{i // 256}.{i % 256}", 5, 60, now=1000.0)
+        assert len(rl) <= 64
+
+    def test_lru_keeps_recently_used_key(self):
+        rl = SlidingWindowLimiter("t", shards=1, max_keys=2)
+        rl.hit("a", 1, 60, now=1000.0)
+        rl.hit("b", 1, 60, now=1000.0)
+        rl.hit("a", 1, 60, now=1000.0)  # touch → most recently used
+        rl.hit("c", 1, 60, now=1000.0)  # evicts "b"
+        assert rl.hit("a", 1, 60, now=1000.0)[0] is False
+        assert rl.hit("b", 1, 60, now=1000.0)[0] is True
+
+    def test_throttled_requests_counted_in_metrics(self):
+        from routes.health_api import WB_RATE_LIMITED
+        from services.api_rate_limiter import _is_allowed, reset_all
+
+        reset_all()
+        sample = WB_RATE_LIMITED.labels(limiter="api", group="metrics_test")
+        before = sample._value.get()
+        for _ in range(3):
+            _is_allowed("10.9.9.9", "metrics_test", 2, 60)
+        assert sample._value.get() == before + 1
+        reset_all()
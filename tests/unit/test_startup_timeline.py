@@ -0,0 +1,59 @@
+"""Startup timeline (services/startup_timeline.py) and its health-details exposure."""
+
+import os
+import time
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from services import startup_timeline
+
+
+@pytest.fixture(autouse=True)
+def _clean_timeline():
+    startup_timeline.reset()
+    yield
+    startup_timeline.reset()
+
+
+class TestTimeline:
+    def test_phases_are_recorded_in_order_with_offsets(self):
+        with startup_timeline.phase("migrations"):
+            time.sleep(0.02)
+        with startup_timeline.phase("boot_sync"):
+            pass
+        phases = startup_timeline.report()["phases"]
+        assert [p["name"] for p in phases] == ["migrations", "boot_sync"]
+        assert phases[0]["duration_ms"] >= 15
+        assert phases[1]["start_ms"] >= phases[0]["start_ms"] + phases[0]["duration_ms"] - 0.2
+
+    def test_phase_is_recorded_when_step_fails(self):
+        with pytest.raises(RuntimeError), startup_timeline.phase("scheduler_load"):
+            raise RuntimeError("boom")
+        assert startup_timeline.report()["phases"][0]["name"] == "scheduler_load"
+
+    def test_imports_mark_starts_at_process_start(self):
+        startup_timeline.mark("imports")
+        imports = startup_timeline.report()["phases"][0]
+        assert imports["start_ms"] == 0
+        assert imports["duration_ms"] > 0
+
+    def test_ready_is_set_once(self):
+        assert startup_timeline.report()["ready_ms"] is None
+        startup_timeline.mark_ready()
+        first = startup_timeline.report()["ready_ms"]
+        time.sleep(0.01)
+        startup_timeline.mark_ready()
+        assert startup_timeline.report()["ready_ms"] == first > 0
+
+
+class TestHealthDetails:
+    def test_startup_section_exposed(self, admin_client):
+        with startup_timeline.phase("monitor_start"):
+            pass
+        resp = admin_client.get("/api/health-details")
+        assert resp.status_code == 200
+        startup = resp.get_json()["startup"]
+        assert "monitor_start" in [p["name"] for p in startup["phases"]]
+        assert "ready_ms" in startup
@@ -0,0 +1,172 @@
+"""Unit tests for services.static_assets (bundle build, minify, negotiation)."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from services import static_assets
+from services.static_assets import (
+    BUNDLES,
+    build,
+    bundle_urls,
+    minify_css,
+    minify_js,
+    negotiate_encoding,
+    precache_urls,
+    reset_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_manifest_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+@pytest.fixture
+def static_tree(tmp_path):
+    root = tmp_path / "static"
+    (root / "js").mkdir(parents=True)
+    (root / "css").mkdir()
+    (root / "js" / "a.js").write_text("// header\nvar a = 1\n", encoding="utf-8")
+    (root / "js" / "b.js").write_text("(function(){\n    a += 1; /* tail */\n})();\n", encoding="utf-8")
+    (root / "css" / "x.css").write_text("/* c */\nbody {\n  color : red ;\n}\n", encoding="utf-8")
+    return root
+
+
+_BUNDLES = {"app.js": ["js/a.js", "js/b.js"], "x.css": ["css/x.css"]}
+
+
+# ── minify_js ───────────────────────────────────────────────────────────────
+
+
+def test_minify_js_strips_comments_and_indentation():
+    src = "/**\n * doc\n */\nfunction f() {\n    // note\n    return 1; // trailing\n}\n\n\n"
+    assert minify_js(src) == "function f() {\nreturn 1;\n}\n"
+
+
+def test_minify_js_keeps_comment_markers_in_strings_and_regex():
+    src = "var u = 'http://x/*y*/';\nvar r = /\\/\\/[/]*/g;\nvar d = a / b / c;\n"
+    out = minify_js(src)
+    assert "'http://x/*y*/'" in out
+    assert "/\\/\\/[/]*/g" in out
+    assert "a / b / c" in out
+
+
+def test_minify_js_template_literal_copied_verbatim():
+    src = "var t = `\n    <div>// not a comment</div>\n    ${ {a: 1}.a + `${x}` }\n`;\n"
+    out = minify_js(src)
+    assert "`\n    <div>// not a comment</div>\n    ${ {a: 1}.a + `${x}` }\n`" in out
+
+
+def test_minify_js_keeps_license_comment():
+    assert minify_js("/*! MIT */\nvar a;\n").startswith("/*! MIT */")
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node not installed")
+def test_minified_repo_scripts_still_parse(tmp_path):
+    for rel in ("js/app.js", "js/status.js", "js/zones.js", "js/history.js"):
+        src = (static_assets.STATIC_ROOT / rel).read_text(encoding="utf-8")
+        out = tmp_path / rel.replace("/", "_")
+        out.write_text(minify_js(src), encoding="utf-8")
+        proc = subprocess.run(["node", "--check", str(out)], capture_output=True, text=True, check=False)
+        assert proc.returncode == 0, f"{rel}: {proc.stderr}"
+
+
+# ── minify_css ──────────────────────────────────────────────────────────────
+
+
+def test_minify_css_collapses_whitespace():
+    assert minify_css("a , b {\n  color:  red ;\n  margin: 0 ;\n}\n") == "a,b{color:red;margin:0}\n"
+
+
+def test_minify_css_preserves_descendant_pseudo_and_strings():
+    out = minify_css('.a :hover { content: "a  /* b */"; width: calc(1px + 2px) }')
+    assert ".a :hover" in out
+    assert '"a  /* b */"' in out
+    assert "calc(1px + 2px)" in out
+
+
+# ── build ───────────────────────────────────────────────────────────────────
+
+
+def test_build_writes_hashed_files_gzip_and_manifest(static_tree):
+    manifest = build(static_tree, _BUNDLES)
+    dist = static_tree / "dist"
+    entry = manifest["bundles"]["app.js"]
+    assert entry["file"].startswith("app.") and entry["file"].endswith(".js")
+    content = (dist / entry["file"]).read_bytes()
+    # ';' separator protects the IIFE in b.js from being called on `a`.
+    assert content == b"var a = 1\n;\n(function(){\na += 1;\n})();\n"
+    assert gzip.decompress((dist / (entry["file"] + ".gz")).read_bytes()) == content
+    on_disk = json.loads((dist / "manifest.json").read_text(encoding="utf-8"))
+    assert on_disk == manifest
+
+
+def test_build_is_deterministic(static_tree):
+    first = build(static_tree, _BUNDLES)
+    second = build(static_tree, _BUNDLES)
+    assert first == second
+
+
+def test_build_prunes_files_older_than_previous_generation(static_tree):
+    gen1 = build(static_tree, _BUNDLES)["bundles"]["app.js"]["file"]
+    (static_tree / "js" / "a.js").write_text("var a = 2\n", encoding="utf-8")
+    gen2 = build(static_tree, _BUNDLES)["bundles"]["app.js"]["file"]
+    dist = static_tree / "dist"
+    assert (dist / gen1).exists(), "previous generation must survive one build"
+    (static_tree / "js" / "a.js").write_text("var a = 3\n", encoding="utf-8")
+    gen3 = build(static_tree, _BUNDLES)["bundles"]["app.js"]["file"]
+    assert not (dist / gen1).exists()
+    assert not (dist / (gen1 + ".gz")).exists()
+    assert (dist / gen2).exists() and (dist / gen3).exists()
+
+
+def test_repo_bundle_sources_exist():
+    for name, sources in BUNDLES.items():
+        for rel in sources:
+            assert (static_assets.STATIC_ROOT / rel).is_file(), f"{name}: missing {rel}"
+
+
+# ── runtime lookups ─────────────────────────────────────────────────────────
+
+
+def test_bundle_urls_fall_back_to_sources_without_manifest(monkeypatch, tmp_path):
+    monkeypatch.setattr(static_assets, "STATIC_ROOT", tmp_path)
+    assert bundle_urls("base.css", "2.1") == ["/static/css/base.css?v=2.1", "/static/css/history.css?v=2.1"]
+    assert static_assets.asset_url("/static/js/app.js", "2.1") == "/static/js/app.js?v=2.1"
+    assert precache_urls() == []
+
+
+def test_bundle_urls_use_manifest(monkeypatch, static_tree):
+    monkeypatch.setattr(static_assets, "STATIC_ROOT", static_tree)
+    manifest = build(static_tree, _BUNDLES)
+    hashed = manifest["bundles"]["x.css"]["file"]
+    assert bundle_urls("x.css", "2.1") == [f"/static/dist/{hashed}"]
+    assert static_assets.asset_url("static/css/x.css", "2.1") == f"/static/dist/{hashed}"
+    assert f"/static/dist/{hashed}" in precache_urls()
+
+
+# ── Accept-Encoding negotiation ─────────────────────────────────────────────
+
+
+@pytest.mark.parametrize(
+    "header,available,expected",
+    [
+        ("gzip, deflate, br", {"br", "gzip"}, "br"),
+        ("gzip, deflate, br", {"gzip"}, "gzip"),
+        ("gzip;q=1.0, br;q=0.5", {"br", "gzip"}, "gzip"),
+        ("br;q=0, gzip", {"br", "gzip"}, "gzip"),
+        ("identity", {"br", "gzip"}, None),
+        ("*", {"gzip"}, "gzip"),
+        ("", {"br", "gzip"}, None),
+    ],
+)
+def test_negotiate_encoding(header, available, expected):
+    assert negotiate_encoding(header, available) == expected
@@ -0,0 +1,164 @@
+"""Durable one-shot timer store (scheduler/timers.py) and its scheduler wiring."""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+os.environ["TESTING"] = "1"
+
+from scheduler.timers import TimerStore
+from services.clock import SimClock, use_clock
+
+
+def _log_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT op, timer_id FROM timer_log ORDER BY seq").fetchall()
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "timers.db")
+
+
+class TestReplay:
+    def test_arm_and_cancel_survive_reopen(self, store_path):
+        st = TimerStore(store_path, {})
+        st.open()
+        later = datetime.now() + timedelta(hours=1)
+        st.arm("zone_stop:1:a", "stop_zone", 1, later)
+        st.arm("zone_stop:2:b", "stop_zone", 2, later)
+        st.arm("master_cap_close:1", "close_master_valve", 1, later, misfire_grace=600)
+        st.cancel("zone_stop:2:b")
+        st.close()
+
+        st2 = TimerStore(store_path, {})
+        assert st2.open() == 2
+        assert [t.timer_id for t in st2.timers()] == ["master_cap_close:1", "zone_stop:1:a"]
+        cap = st2.get("master_cap_close:1")
+        assert cap.misfire_grace == 600 and int(cap.run_at) == int(later.timestamp())
+        # Журнал сжат до живых таймеров
+        assert sorted(_log_rows(store_path)) == [("arm", "master_cap_close:1"), ("arm", "zone_stop:1:a")]
+        st2.close()
+
+    def test_rearm_replaces_deadline(self, store_path):
+        st = TimerStore(store_path, {})
+        st.open()
+        st.arm("t", "stop_zone", 1, datetime.now() + timedelta(hours=1))
+        st.arm("t", "stop_zone", 1, datetime.now() + timedelta(hours=2))
+        st.close()
+        st2 = TimerStore(store_path, {})
+        st2.open()
+        assert st2.get("t").run_at > time.time() + 3600 + 60
+        st2.close()
+
+
+class TestBatching:
+    def test_worker_commits_arms_in_batches(self, store_path):
+        st = TimerStore(store_path, {}, flush_interval=0.2)
+        st.open()
+        st.start()
+        commits = []
+        st._conn.set_trace_callback(lambda sql: commits.append(sql) if sql == "COMMIT" else None)
+        try:
+            later = datetime.now() + timedelta(hours=1)
+            started = time.perf_counter()
+            for i in range(500):
+                st.arm(f"zone_stop:{i}:x", "stop_zone", i, later)
+            per_arm = (time.perf_counter() - started) / 500
+            assert _log_rows(store_path) == []  # ещё в буфере
+            st.flush()
+        finally:
+            st.close()
+        assert len(commits) == 1
+        assert len(_log_rows(store_path)) == 500
+        assert per_arm < 0.001, f"arm took {per_arm * 1e6:.0f} us"
+
+
+class TestFiring:
+    @pytest.mark.timeout(10)
+    def test_due_timer_fires_once_and_is_logged(self, store_path):
+        fired = []
+        done = threading.Event()
+        st = TimerStore(store_path, {"stop_zone": lambda zid: (fired.append(zid), done.set())})
+        st.open()
+        st.start()
+        try:
+            st.arm("zone_stop:5:x", "stop_zone", 5, datetime.now() + timedelta(seconds=0.2))
+            st.arm("zone_stop:6:x", "stop_zone", 6, datetime.now() + timedelta(seconds=0.2))
+            st.cancel("zone_stop:6:x")
+            assert done.wait(3.0)
+            time.sleep(0.2)
+        finally:
+            st.close()
+        assert fired == [5]
+        assert st.timers() == []
+        assert ("fire", "zone_stop:5:x") in _log_rows(store_path)
+
+    @pytest.mark.timeout(10)
+    def test_misfired_timer_is_dropped(self, store_path):
+        fired = []
+        st = TimerStore(store_path, {"stop_zone": fired.append})
+        st.open()
+        st.arm("zone_cap_stop:1", "stop_zone", 1, datetime.now() - timedelta(seconds=30), misfire_grace=10)
+        st.start()
+        time.sleep(0.3)
+        st.close()
+        assert fired == []
+        assert st.get("zone_cap_stop:1") is None
+
+    def test_fire_due_runs_inline_on_virtual_clock(self, store_path):
+        fired = []
+        st = TimerStore(store_path, {"stop_zone": fired.append})
+        st.open()
+        sim = SimClock(datetime(2026, 5, 1, 6, 0))
+        with use_clock(sim):
+            st.arm("zone_hard_stop:1", "stop_zone", 1, sim.now() + timedelta(minutes=15))
+            st.arm("zone_hard_stop:2", "stop_zone", 2, sim.now() + timedelta(minutes=30))
+            assert st.fire_due() == 0
+            sim.advance(15 * 60)
+            assert st.fire_due() == 1
+            assert fired == [1]
+        st.close()
+        assert [t.timer_id for t in st.timers()] == ["zone_hard_stop:2"]
+
+
+class TestSchedulerTimers:
+    def test_caps_survive_restart_zone_stops_cleared_on_boot(self, test_db):
+        from irrigation_scheduler import IrrigationScheduler
+
+        a = IrrigationScheduler(test_db)
+        a.start()
+        try:
+            a.schedule_zone_stop(1, 10, command_id="c1")
+            a.schedule_zone_cap(1, cap_minutes=120)
+            a.schedule_master_valve_cap(2, hours=24)
+            assert not any(j.id.startswith(("zone_", "master_")) for j in a.scheduler.get_jobs())
+        finally:
+            a.stop()
+
+        b = IrrigationScheduler(test_db)
+        try:
+            ids = {t.timer_id for t in b.timers.timers()}
+            assert ids == {"zone_stop:1:c1", "zone_cap_stop:1", "master_cap_close:2"}
+            b.cleanup_jobs_on_boot()
+            assert {t.timer_id for t in b.timers.timers()} == {"zone_cap_stop:1", "master_cap_close:2"}
+        finally:
+            b.timers.close()
+
+    def test_cancel_zone_jobs_removes_stop_and_hard_stop(self, test_db):
+        from irrigation_scheduler import IrrigationScheduler
+
+        s = IrrigationScheduler(test_db)
+        try:
+            s.schedule_zone_stop(3, 10, command_id="c")
+            s.schedule_zone_hard_stop(3, datetime.now() + timedelta(minutes=10))
+            s.schedule_zone_cap(3)
+            s.cancel_zone_jobs(3)
+            assert [t.timer_id for t in s.timers.timers()] == ["zone_cap_stop:3"]
+            assert 3 not in s.active_zones
+        finally:
+            s.timers.close()
@@ -8,13 +8,14 @@ job idempotency, interception, the H1 regression guard, and norm/zero-div.
 
 import os
 import sqlite3
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from unittest.mock import patch
 
 import pytest
 
 os.environ["TESTING"] = "1"
 
+from services.clock import SimClock, use_clock
 from services.weather import balance as wb
 
 # ---------------------------------------------------------------------------
@@ -340,3 +341,55 @@ class TestIdempotencyAndDays:
         assert result is None
         # previous coef untouched
         assert wb.read_cached_coef(bal_db) == 100
+
+
+# ---------------------------------------------------------------------------
+# Incremental history store (weather_history_daily)
+# ---------------------------------------------------------------------------
+
+
+class TestHistoryStore:
+    @pytest.fixture
+    def store_db(self, bal_db):
+        conn = sqlite3.connect(bal_db)
+        conn.execute("""CREATE TABLE weather_history_daily (
+            latitude REAL NOT NULL, longitude REAL NOT NULL, day TEXT NOT NULL,
+            et0 REAL NOT NULL, precip REAL NOT NULL, fetched_at REAL NOT NULL,
+            PRIMARY KEY (latitude, longitude, day)
+        ) WITHOUT ROWID""")
+        conn.commit()
+        conn.close()
+        return bal_db
+
+    @staticmethod
+    def _recalc(db_path, days, now=None):
+        calls = []
+
+        def _fetch(lat, lon, past_days):
+            calls.append(past_days)
+            return _history_payload(days)
+
+        with use_clock(SimClock(now or datetime.now())), patch("services.weather.client.fetch_history", _fetch):
+            return wb.recalc_balance(db_path), calls
+
+    def test_next_night_fetches_only_missing_day(self, store_db):
+        days = _days_back(35, 5.0, 0.0)
+        first, calls = self._recalc(store_db, days)
+        assert calls == [35]
+        # следующая ночь: в хранилище 35 дней, недостаёт только вчерашнего
+        today_days = [*days, (date.today().isoformat(), 6.5, 0.0)]
+        second, calls = self._recalc(store_db, today_days[-2:], now=datetime.now() + timedelta(days=1))
+        assert calls == [1]
+        assert second["history_days"] == 35
+        assert second["deficit_buffer"][-1] == {"date": date.today().isoformat(), "deficit": 6.5}
+
+    def test_nothing_missing_makes_no_request(self, store_db):
+        days = _days_back(35, 5.0, 0.0)
+        first, _ = self._recalc(store_db, days)
+        conn = sqlite3.connect(store_db)
+        conn.execute("DELETE FROM settings WHERE key = 'weather.balance.last_recalc_date'")
+        conn.commit()
+        conn.close()
+        second, calls = self._recalc(store_db, days)
+        assert calls == []
+        assert second["coefficient"] == first["coefficient"]
@@ -117,7 +117,7 @@ class TestForecastRegressionGuard:
             captured["params"] = params
             return _ok_response({"daily": {"time": ["2026-06-26"]}})
 
-        with patch("requests.get", side_effect=_capture):
+        with patch("requests.Session.get", side_effect=_capture):
             wc.fetch_api(42.6531, 77.0822)
         assert "past_days" not in captured["params"]
         assert captured["params"]["forecast_days"] == 3
@@ -131,7 +131,7 @@ class TestForecastRegressionGuard:
             captured["params"] = params
             return _ok_response({"daily": {"time": []}})
 
-        with patch("requests.get", side_effect=_capture):
+        with patch("requests.Session.get", side_effect=_capture):
             wc.fetch_history(42.6531, 77.0822, past_days=35)
         assert captured["params"]["past_days"] == 35
         # forecast keeps today so the caller can drop the partial current day
@@ -149,7 +149,7 @@ class TestForecastRegressionGuard:
         )
         conn.commit()
         conn.close()
-        with patch("requests.get", side_effect=lambda *a, **k: _ok_response({"daily": {"time": []}})):
+        with patch("requests.Session.get", side_effect=lambda *a, **k: _ok_response({"daily": {"time": []}})):
             wc.fetch_history(42.6531, 77.0822, past_days=35)
         conn = sqlite3.connect(db_path)
         n = conn.execute("SELECT COUNT(*) FROM weather_cache").fetchone()[0]
@@ -3,10 +3,13 @@
 import json
 import os
 import sqlite3
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from services.clock import SimClock, use_clock
+
 os.environ["TESTING"] = "1"
 
 
@@ -494,9 +497,10 @@ class TestApiDownAlert:
 
         adj = WeatherAdjustment(adj_db)
         with patch("services.telegram_bot.notifier") as mock_notifier:
-            with patch("services.weather.adjustment.time.time", return_value=1000.0):
+            sim = SimClock(datetime.fromtimestamp(1000.0))
+            with use_clock(sim):
                 adj._maybe_alert_api_down("weather=None")
-            with patch("services.weather.adjustment.time.time", return_value=1000.0 + 1801):
+                sim.advance(1801)
                 adj._maybe_alert_api_down("weather=None")
             assert mock_notifier.send_text.call_count == 2
 
@@ -3,7 +3,8 @@
 Phase 3 (issue #29): retry once with 1s backoff on transient errors
 (timeout, ConnectionError, HTTP 429/5xx). Other errors must not retry.
 
-We mock ``requests.get`` directly via ``unittest.mock`` rather than
+We mock ``requests.Session.get`` (the pooled session in
+``services.weather.transport``) via ``unittest.mock`` rather than
 ``respx`` (respx targets httpx, not requests). ``time.sleep`` is patched
 so the test suite stays fast.
 """
@@ -15,6 +16,7 @@ import pytest
 import requests
 
 from services.weather import client as wc
+from services.weather import transport
 
 
 def _ok_response(payload=None):
@@ -36,12 +38,12 @@ def _http_error_response(status):
 
 @pytest.fixture(autouse=True)
 def _no_sleep():
-    with patch.object(wc.time, "sleep") as m:
+    with patch.object(transport.time, "sleep") as m:
         yield m
 
 
 def test_retries_once_on_timeout():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [
             requests.exceptions.Timeout("boom"),
             _ok_response({"data": "fresh"}),
@@ -52,7 +54,7 @@ def test_retries_once_on_timeout():
 
 
 def test_retries_once_on_connection_error():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [
             requests.exceptions.ConnectionError("reset"),
             _ok_response({"data": "fresh"}),
@@ -63,7 +65,7 @@ def test_retries_once_on_connection_error():
 
 
 def test_retry_on_429():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [
             _http_error_response(429),
             _ok_response({"data": "fresh"}),
@@ -74,7 +76,7 @@ def test_retry_on_429():
 
 
 def test_retry_on_503():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [
             _http_error_response(503),
             _ok_response({"data": "fresh"}),
@@ -85,7 +87,7 @@ def test_retry_on_503():
 
 
 def test_no_retry_on_404():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [_http_error_response(404)]
         result = wc.fetch_api(55.7, 37.6)
     assert result is None
@@ -94,7 +96,7 @@ def test_no_retry_on_404():
 
 def test_returns_none_after_max_attempts(caplog):
     caplog.set_level(logging.WARNING, logger=wc.logger.name)
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [_http_error_response(503), _http_error_response(503)]
         result = wc.fetch_api(55.7, 37.6)
     assert result is None
@@ -109,7 +111,7 @@ def test_no_retry_on_value_error():
     bad_resp.status_code = 200
     bad_resp.raise_for_status = MagicMock(return_value=None)
     bad_resp.json = MagicMock(side_effect=ValueError("bad json"))
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.return_value = bad_resp
         result = wc.fetch_api(55.7, 37.6)
     assert result is None
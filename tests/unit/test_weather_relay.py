@@ -2,7 +2,7 @@
 
 Covers:
 - ``client.fetch_relay`` — auth/raw headers (private) vs no-auth (public), retry
-  semantics (mirrors fetch_api), error handling. ``requests.get`` mocked
+  semantics (mirrors fetch_api), error handling. ``requests.Session.get`` mocked
   directly (same approach as ``test_weather_client_retry``); ``time.sleep``
   patched for speed.
 - ``WeatherService._fetch_api`` routing on the live ``weather.source_mode``
@@ -21,6 +21,7 @@ import pytest
 import requests
 
 from services.weather import client as wc
+from services.weather import transport
 from services.weather.service import WeatherService, _relay_payload_is_current
 
 
@@ -52,7 +53,7 @@ _STALE_PAYLOAD = {"utc_offset_seconds": 18000, "hourly": {"time": ["2020-01-01T0
 
 @pytest.fixture(autouse=True)
 def _no_sleep():
-    with patch.object(wc.time, "sleep") as m:
+    with patch.object(transport.time, "sleep") as m:
         yield m
 
 
@@ -62,7 +63,7 @@ def _no_sleep():
 
 
 def test_fetch_relay_sends_bearer_and_raw_accept():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.return_value = _ok_response({"hourly": {"temperature_2m": [1]}})
         result = wc.fetch_relay("https://api.github.com/repos/o/r/contents/gub.json", "mytoken")
     assert result == {"hourly": {"temperature_2m": [1]}}
@@ -73,7 +74,7 @@ def test_fetch_relay_sends_bearer_and_raw_accept():
 
 
 def test_fetch_relay_public_omits_auth_header():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.return_value = _ok_response({"hourly": {"temperature_2m": [2]}})
         result = wc.fetch_relay("https://raw.githubusercontent.com/o/r/main/gub.json")
     assert result == {"hourly": {"temperature_2m": [2]}}
@@ -84,7 +85,7 @@ def test_fetch_relay_public_omits_auth_header():
 
 
 def test_fetch_relay_retries_once_on_timeout():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [requests.exceptions.Timeout("boom"), _ok_response({"data": "fresh"})]
         result = wc.fetch_relay("https://api.github.com/x", "t")
     assert result == {"data": "fresh"}
@@ -92,7 +93,7 @@ def test_fetch_relay_retries_once_on_timeout():
 
 
 def test_fetch_relay_retry_on_503():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [_http_error_response(503), _ok_response({"data": "fresh"})]
         result = wc.fetch_relay("https://api.github.com/x", "t")
     assert result == {"data": "fresh"}
@@ -100,7 +101,7 @@ def test_fetch_relay_retry_on_503():
 
 
 def test_fetch_relay_no_retry_on_404():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [_http_error_response(404)]
         result = wc.fetch_relay("https://api.github.com/x", "t")
     assert result is None
@@ -108,7 +109,7 @@ def test_fetch_relay_no_retry_on_404():
 
 
 def test_fetch_relay_returns_none_after_max_attempts():
-    with patch("requests.get") as get:
+    with patch("requests.Session.get") as get:
         get.side_effect = [_http_error_response(503), _http_error_response(503)]
         result = wc.fetch_relay("https://api.github.com/x", "t")
     assert result is None
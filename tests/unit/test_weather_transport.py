@@ -0,0 +1,139 @@
+"""Tests for the pooled weather transport against a local fixture HTTP server.
+
+Covers connection reuse (keep-alive), conditional requests (ETag → 304 served
+from the remembered payload), single-flight de-duplication of concurrent
+identical requests, and the client builders going through the transport.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.weather import client as wc
+from services.weather import transport
+
+
+class _Upstream:
+    def __init__(self):
+        self.requests = []
+        self.connections = set()
+        self.delay = 0.0
+        self.etag = None
+        self.payload = {"daily": {"time": ["2026-06-01"]}}
+        self.lock = threading.Lock()
+
+
+def _handler(state: _Upstream):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with state.lock:
+                state.requests.append((self.path, dict(self.headers)))
+                state.connections.add(self.client_address)
+            if state.delay:
+                time.sleep(state.delay)
+            if state.etag and self.headers.get("If-None-Match") == state.etag:
+                self.send_response(304)
+                self.send_header("ETag", state.etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(state.payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if state.etag:
+                self.send_header("ETag", state.etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def upstream():
+    transport.reset()
+    state = _Upstream()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+    yield state
+    server.shutdown()
+    server.server_close()
+    transport.reset()
+
+
+def test_session_reuses_one_connection(upstream):
+    for _ in range(3):
+        assert transport.get_json(upstream.url, params={"a": 1}) == upstream.payload
+    assert len(upstream.requests) == 3
+    assert len(upstream.connections) == 1
+
+
+def test_etag_turns_repeat_into_304(upstream):
+    upstream.etag = '"v1"'
+    first = transport.get_json(upstream.url)
+    second = transport.get_json(upstream.url)
+    assert first == second == upstream.payload
+    assert upstream.requests[1][1].get("If-None-Match") == '"v1"'
+    st = transport.stats()
+    assert st["requests"] == 2
+    assert st["not_modified"] == 1
+    assert st["bytes"] == len(json.dumps(upstream.payload).encode())
+
+
+def test_changed_resource_is_downloaded_again(upstream):
+    upstream.etag = '"v1"'
+    transport.get_json(upstream.url)
+    upstream.etag, upstream.payload = '"v2"', {"daily": {"time": ["2026-06-02"]}}
+    assert transport.get_json(upstream.url) == {"daily": {"time": ["2026-06-02"]}}
+
+
+def test_concurrent_identical_requests_share_one_call(upstream):
+    upstream.delay = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(transport.get_json(upstream.url))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(upstream.requests) == 1
+    assert results == [upstream.payload] * 5
+    # у каждого вызывающего своя копия
+    assert len({id(r) for r in results}) == 5
+    assert transport.stats()["coalesced"] == 4
+
+
+def test_different_params_are_not_coalesced(upstream):
+    upstream.delay = 0.2
+    threads = [
+        threading.Thread(target=transport.get_json, args=(upstream.url,), kwargs={"params": {"past_days": n}})
+        for n in (1, 2)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(upstream.requests) == 2
+
+
+def test_relay_token_sent_and_payload_returned(upstream):
+    assert wc.fetch_relay(upstream.url, "tok") == upstream.payload
+    headers = upstream.requests[0][1]
+    assert headers["Authorization"] == "Bearer tok"
+    assert headers["User-Agent"] == transport.USER_AGENT
+
+
+def test_unreachable_upstream_returns_none(monkeypatch):
+    transport.reset()
+    monkeypatch.setattr(transport, "RETRY_BACKOFF_SEC", 0.0)
+    assert transport.get_json("http://127.0.0.1:9/never") is None
+    assert transport.stats()["failures"] == 1
@@ -0,0 +1,126 @@
+"""Unit tests for services.zones_bulk (incremental parsers, validation, export)."""
+
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from services import zones_bulk
+from services.zones_bulk import (
+    ImportFormatError,
+    export_csv,
+    export_json,
+    iter_csv_rows,
+    iter_json_rows,
+    validate_row,
+)
+
+
+class _TrickleStream(io.BytesIO):
+    """Hands out at most `n` bytes per read — exercises chunk boundaries."""
+
+    def __init__(self, data: bytes, n: int = 3) -> None:
+        super().__init__(data)
+        self.n = n
+
+    def read(self, size=-1):
+        return super().read(self.n)
+
+
+# ── JSON ────────────────────────────────────────────────────────────────────
+
+
+@pytest.mark.parametrize("n", [1, 3, 7, 4096])
+def test_json_array_parsed_across_chunk_boundaries(n):
+    rows = [{"id": i, "name": f"Зона {i}", "duration": 12345} for i in range(1, 30)]
+    body = json.dumps(rows, ensure_ascii=False).encode("utf-8")
+    assert list(iter_json_rows(_TrickleStream(body, n))) == rows
+
+
+def test_json_zones_wrapper_and_bare_numbers():
+    body = b'  {"zones": [ {"id": 1}, 12, {"id": 2} ] }'
+    assert list(iter_json_rows(_TrickleStream(body, 2))) == [{"id": 1}, 12, {"id": 2}]
+
+
+def test_json_empty_array():
+    assert list(iter_json_rows(io.BytesIO(b"[]"))) == []
+    assert list(iter_json_rows(io.BytesIO(b'{"zones": []}'))) == []
+
+
+def test_json_wrapper_with_other_keys_falls_back_to_full_parse():
+    body = b'{"version": 1, "zones": [{"id": 5}]}'
+    assert list(iter_json_rows(io.BytesIO(body))) == [{"id": 5}]
+
+
+@pytest.mark.parametrize("body", [b"", b"[{", b"[1 2]", b"[1,]", b'{"x": 1}', b"\xff\xfe"])
+def test_json_malformed_raises_format_error(body):
+    with pytest.raises(ImportFormatError):
+        list(iter_json_rows(io.BytesIO(body)))
+
+
+# ── CSV ─────────────────────────────────────────────────────────────────────
+
+
+def test_csv_rows_with_bom_quotes_and_empty_cells():
+    body = '﻿id,Name,duration,topic\r\n1,"Газон, юг",10,\r\n2,"Клумба ""А""",,/t/2\r\n'.encode()
+    rows = list(iter_csv_rows(_TrickleStream(body, 5)))
+    assert rows == [
+        {"id": "1", "name": "Газон, юг", "duration": "10"},
+        {"id": "2", "name": 'Клумба "А"', "topic": "/t/2"},
+    ]
+
+
+def test_csv_requires_id_or_name_column():
+    with pytest.raises(ImportFormatError):
+        list(iter_csv_rows(io.BytesIO(b"duration,topic\n10,/a\n")))
+
+
+# ── validate_row ────────────────────────────────────────────────────────────
+
+
+def test_validate_row_normalises_and_drops_unknown_keys():
+    row = validate_row({"id": "7", "name": " A ", "duration": "15", "group": 2, "state": "on", "evil": 1})
+    assert row == {"id": 7, "name": "A", "duration": 15, "group_id": 2}
+
+
+@pytest.mark.parametrize(
+    "raw,msg",
+    [
+        ({"id": 1, "duration": 0}, "duration"),
+        ({"id": 1, "duration": 3601}, "duration"),
+        ({"id": "x"}, "id"),
+        ({"id": 1, "name": "  "}, "name"),
+        ({"duration": 5}, "id"),
+        ({"id": 1, "group_id": 1.5}, "group_id"),
+        ([1, 2], "object"),
+    ],
+)
+def test_validate_row_rejects(raw, msg):
+    with pytest.raises(ValueError, match=msg):
+        validate_row(raw)
+
+
+def test_import_rejects_oversized_batch(monkeypatch):
+    monkeypatch.setattr(zones_bulk, "MAX_IMPORT_ROWS", 2)
+    with pytest.raises(zones_bulk.ImportTooLargeError, match="too many rows"):
+        zones_bulk.import_zones(({"name": "z"} for _ in range(3)), db=None)
+
+
+# ── export ──────────────────────────────────────────────────────────────────
+
+
+def test_export_csv_round_trips_through_parser():
+    zones = [{"id": 1, "name": "A, b", "icon": "🌿", "duration": 5, "group_id": 1, "state": "off", "topic": None}]
+    text = "".join(export_csv(zones))
+    assert text.splitlines()[0] == ",".join(zones_bulk.EXPORT_COLUMNS)
+    rows = list(iter_csv_rows(io.BytesIO(text.encode("utf-8"))))
+    assert validate_row(rows[0]) == {"id": 1, "name": "A, b", "icon": "🌿", "duration": 5, "group_id": 1}
+
+
+def test_export_json_is_reimportable():
+    zones = [{"id": 1, "name": "A", "duration": 5}, {"id": 2, "name": "B", "duration": 6}]
+    body = "".join(export_json(zones)).encode("utf-8")
+    parsed = list(iter_json_rows(io.BytesIO(body)))
+    assert [validate_row(r)["id"] for r in parsed] == [1, 2]
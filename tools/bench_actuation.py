@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""End-to-end zone actuation latency benchmark.
+
+Measures what the in-process performance tests cannot: the full path
+
+    HTTP POST → exclusive_start_zone → QoS 2 publish → broker
+      → relay echo (MQTT emulator) → sse_hub._on_message → SSE push
+
+against real processes:
+
+  * mosquitto on a free local port (or an existing broker via ``--broker``),
+  * ``tools/MQTT_emulator/mqtt_relay_emulator.py`` with N relays × 6 channels,
+  * the app itself via ``run.py`` (Hypercorn) in a throw-away work dir with
+    a freshly seeded ``irrigation.db``: one group per relay, one zone per channel.
+
+While scenarios run, ``--sse-clients`` connections (20 by default, the hub
+cap) stay open on ``/api/mqtt/zones-sse``. A command counts as observed when
+the first SSE client sees the zone's state event; the spread until the last
+client sees it is reported as ``fanout``. A zone is not restarted within
+``RESTART_GUARD_S`` of its stop (the hub suppresses such "on" echoes); that
+pause is excluded from both latency and throughput.
+
+Scenarios:
+  manual     — sequential /api/zones/<id>/start and /stop, one at a time
+  burst      — one start per group fired concurrently, then stops
+  group      — /api/groups/<id>/start-from-first until the first zone is on
+  emergency  — /api/emergency-stop with every group's first zone running
+               (latency until the last zone reports off), then resume
+
+Results (p50/p90/p99/max in ms, throughput in commands/s) are written as
+JSON with the git revision, so runs can be compared across commits::
+
+    python tools/bench_actuation.py --relays 4 --out bench/$(git rev-parse --short HEAD).json
+    python tools/bench_actuation.py --compare bench/old.json bench/new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+EMULATOR = ROOT / "tools" / "MQTT_emulator" / "mqtt_relay_emulator.py"
+FIRST_DEVICE_ID = 101
+CHANNELS = 6
+SCENARIOS = ("manual", "burst", "group", "emergency")
+RESTART_GUARD_S = 5.5  # > окна services.sse_hub.recently_stopped
+
+
+# ---- statistics ----
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Linear-interpolated percentile (p in 0..100); None for an empty list."""
+    if not values:
+        return None
+    data = sorted(values)
+    k = (len(data) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (k - lo)
+
+
+def summarize(latencies_s: list[float], wall_s: float, timeouts: int = 0, fanout_s: list[float] | None = None) -> dict:
+    """Per-scenario summary; latencies in milliseconds, throughput in commands/s."""
+
+    def ms(v):
+        return None if v is None else round(v * 1000.0, 2)
+
+    out = {
+        "count": len(latencies_s),
+        "timeouts": timeouts,
+        "p50_ms": ms(percentile(latencies_s, 50)),
+        "p90_ms": ms(percentile(latencies_s, 90)),
+        "p99_ms": ms(percentile(latencies_s, 99)),
+        "max_ms": ms(max(latencies_s)) if latencies_s else None,
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(len(latencies_s) / wall_s, 2) if wall_s > 0 else None,
+    }
+    if fanout_s:
+        out["fanout_p50_ms"] = ms(percentile(fanout_s, 50))
+        out["fanout_p99_ms"] = ms(percentile(fanout_s, 99))
+    return out
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """Human-readable per-scenario diff of two result files."""
+    lines = [
+        f"{'scenario':<12}{'metric':<18}{old.get('git_rev') or 'old':>12}{new.get('git_rev') or 'new':>12}{'Δ%':>9}"
+    ]
+    for name in sorted(set(old.get("scenarios", {})) | set(new.get("scenarios", {}))):
+        a = old.get("scenarios", {}).get(name, {})
+        b = new.get("scenarios", {}).get(name, {})
+        for metric in ("p50_ms", "p99_ms", "throughput_per_s", "timeouts"):
+            va, vb = a.get(metric), b.get(metric)
+            delta = f"{(vb - va) / va * 100:+.1f}" if va and vb is not None else "-"
+            lines.append(f"{name:<12}{metric:<18}{_fmt(va):>12}{_fmt(vb):>12}{delta:>9}")
+    return lines
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else str(v)
+
+
+# ---- processes ----
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(host: str, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection((host, port), timeout=0.5):
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f"{host}:{port} did not come up in {timeout:.0f}s")
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Stack:
+    """Broker + relay emulator + app, torn down in reverse order."""
+
+    def __init__(self, relays: int, broker: str | None, echo_delay: float, workdir: str, keep_logs: bool):
+        self.relays = relays
+        self.echo_delay = echo_delay
+        self.workdir = workdir
+        self.keep_logs = keep_logs
+        self.procs: list[subprocess.Popen] = []
+        self.logs: list = []
+        if broker:
+            host, _, port = broker.partition(":")
+            self.broker_host, self.broker_port, self.own_broker = host, int(port or 1883), False
+        else:
+            self.broker_host, self.broker_port, self.own_broker = "127.0.0.1", _free_port(), True
+        self.app_port = _free_port()
+
+    def _spawn(self, name: str, cmd: list[str], env: dict | None = None, cwd: str | None = None):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "wb")  # noqa: SIM115 — закрывается в stop()
+        self.logs.append(log)
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env, cwd=cwd or self.workdir)
+        self.procs.append(proc)
+        return proc
+
+    def seed(self) -> dict[int, list[int]]:
+        """Seed MQTT server, groups and zones; returns {group_id: [zone_ids]}."""
+        sys.path.insert(0, str(ROOT))
+        from database import IrrigationDB
+
+        db = IrrigationDB(os.path.join(self.workdir, "irrigation.db"))
+        server = db.create_mqtt_server(
+            {"name": "bench", "host": self.broker_host, "port": self.broker_port, "enabled": True}
+        )
+        groups: dict[int, list[int]] = {}
+        for i in range(self.relays):
+            dev = FIRST_DEVICE_ID + i
+            group = db.create_group(f"Relay {dev}")
+            zones = groups.setdefault(int(group["id"]), [])
+            for ch in range(1, CHANNELS + 1):
+                zone = db.create_zone(
+                    {
+                        "name": f"R{dev} K{ch}",
+                        "icon": "🌿",
+                        "duration": 1,
+                        "group_id": group["id"],
+                        "topic": f"/devices/wb-mr6cv3_{dev}/controls/K{ch}",
+                        "mqtt_server_id": server["id"],
+                    }
+                )
+                zones.append(int(zone["id"]))
+        return groups
+
+    def start(self) -> None:
+        if self.own_broker:
+            mosquitto = shutil.which("mosquitto")
+            if not mosquitto:
+                raise RuntimeError("mosquitto not found in PATH; install it or pass --broker host:port")
+            conf = os.path.join(self.workdir, "mosquitto.conf")
+            with open(conf, "w") as f:
+                f.write(f"listener {self.broker_port} 127.0.0.1\nallow_anonymous true\npersistence false\n")
+            self._spawn("mosquitto", [mosquitto, "-c", conf])
+        _wait_port(self.broker_host, self.broker_port, 10)
+
+        env = {
+            **os.environ,
+            "TEST_MQTT_HOST": self.broker_host,
+            "TEST_MQTT_PORT": str(self.broker_port),
+            "EMULATOR_HTTP_HOST": "127.0.0.1",
+            "EMULATOR_HTTP_PORT": str(_free_port()),
+            "EMULATOR_DEVICE_IDS": ",".join(str(FIRST_DEVICE_ID + i) for i in range(self.relays)),
+            "EMULATOR_CHANNELS": str(CHANNELS),
+            "EMULATOR_ECHO_DELAY_SECONDS": str(self.echo_delay),
+            "EMULATOR_ECHO_SUPPRESS_WINDOW": "0",
+            "EMULATOR_WATER_ENABLED": "0",
+            "EMULATOR_MSW_AUTO_ENABLED": "0",
+            "EMULATOR_LOG_RX": "0",
+            "EMULATOR_LOG_TX": "0",
+        }
+        self._spawn("emulator", [sys.executable, str(EMULATOR)], env=env)
+        _wait_port("127.0.0.1", int(env["EMULATOR_HTTP_PORT"]), 30)
+
+        app_env = {k: v for k, v in os.environ.items() if k not in ("TESTING", "PYTEST_CURRENT_TEST")}
+        app_env.update({"PORT": str(self.app_port), "PYTHONPATH": str(ROOT), "WB_WORKERS": "1"})
+        self._spawn("app", [sys.executable, str(ROOT / "run.py")], env=app_env)
+        _wait_port("127.0.0.1", self.app_port, 90)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            with contextlib.suppress(OSError, http.client.HTTPException):
+                if self.request("GET", "/health")[0] == 200:
+                    return
+            time.sleep(0.5)
+        raise RuntimeError("app /health did not return 200")
+
+    def request(self, method: str, path: str, body: dict | None = None) -> tuple[int, bytes]:
+        conn = http.client.HTTPConnection("127.0.0.1", self.app_port, timeout=30)
+        try:
+            payload = json.dumps(body or {}).encode() if method != "GET" else None
+            conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        for proc in reversed(self.procs):
+            if proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        for log in self.logs:
+            log.close()
+
+
+# ---- SSE observation ----
+
+
+class Expectation:
+    __slots__ = ("done", "seen", "sent_at", "state", "zone_id")
+
+    def __init__(self, zone_id: int, state: str):
+        self.zone_id = zone_id
+        self.state = state
+        self.sent_at = 0.0
+        self.seen: dict[int, float] = {}
+        self.done = threading.Event()
+
+
+class Observer:
+    """``--sse-clients`` readers of /api/mqtt/zones-sse matching events to expectations."""
+
+    def __init__(self, port: int, clients: int):
+        self.port = port
+        self.clients = clients
+        self._pending: list[Expectation] = []
+        self._lock = threading.Lock()
+        self._conns: list[http.client.HTTPConnection] = []
+        self._ready = threading.Barrier(clients + 1)
+        self.events = 0
+
+    def start(self) -> None:
+        for idx in range(self.clients):
+            threading.Thread(target=self._reader, args=(idx,), name=f"bench-sse-{idx}", daemon=True).start()
+        try:
+            self._ready.wait(30)
+        except threading.BrokenBarrierError:
+            raise RuntimeError(f"not all {self.clients} SSE clients connected within 30s") from None
+
+    def stop(self) -> None:
+        for conn in self._conns:
+            if conn.sock is not None:
+                with contextlib.suppress(OSError):
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+            conn.close()
+
+    def expect(self, zone_id: int, state: str) -> Expectation:
+        exp = Expectation(zone_id, state)
+        with self._lock:
+            self._pending.append(exp)
+        exp.sent_at = time.perf_counter()
+        return exp
+
+    def wait(self, exp: Expectation, timeout: float) -> float | None:
+        """Latency to the first client, or None on timeout."""
+        exp.done.wait(timeout)
+        with self._lock:
+            with contextlib.suppress(ValueError):
+                self._pending.remove(exp)
+            first = min(exp.seen.values()) if exp.seen else None
+        return None if first is None else first - exp.sent_at
+
+    def _reader(self, idx: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=None)
+        self._conns.append(conn)
+        try:
+            conn.request("GET", "/api/mqtt/zones-sse", headers={"Accept": "text/event-stream"})
+            resp = conn.getresponse()
+            resp.readline()  # ": connected"
+            self._ready.wait(30)
+            while True:
+                line = resp.readline()
+                if not line:
+                    return
+                if line.startswith(b"data: "):
+                    self._on_event(idx, line[6:], time.perf_counter())
+        except (OSError, AttributeError, http.client.HTTPException, threading.BrokenBarrierError, ValueError):
+            return
+
+    def _on_event(self, idx: int, raw: bytes, now: float) -> None:
+        try:
+            event = json.loads(raw)
+        except ValueError:
+            return
+        zone_id, state = event.get("zone_id"), event.get("state")
+        if zone_id is None:
+            return
+        with self._lock:
+            self.events += 1
+            for exp in self._pending:
+                if exp.zone_id == zone_id and exp.state == state and idx not in exp.seen and now >= exp.sent_at:
+                    exp.seen[idx] = now
+                    if len(exp.seen) == self.clients:
+                        exp.done.set()
+                    break
+
+    def fanout(self, exp: Expectation) -> float | None:
+        with self._lock:
+            if len(exp.seen) < 2:
+                return None
+            return max(exp.seen.values()) - min(exp.seen.values())
+
+
+# ---- scenarios ----
+
+
+class Bench:
+    def __init__(self, stack: Stack, observer: Observer, groups: dict[int, list[int]], timeout: float):
+        self.stack = stack
+        self.obs = observer
+        self.groups = groups
+        self.timeout = timeout
+        self._stopped_at: dict[int, float] = {}
+        self._paused = 0.0
+
+    def _cooldown(self, zone_ids) -> None:
+        """Let ``recently_stopped`` expire for the zones about to start (paused time is not benchmarked)."""
+        until = max((self._stopped_at.get(z, 0.0) + RESTART_GUARD_S for z in zone_ids), default=0.0)
+        pause = until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            self._paused += pause
+
+    def _command(self, path: str, zone_id: int, state: str) -> Expectation:
+        if state == "off":
+            self._stopped_at[zone_id] = time.monotonic()
+        exp = self.obs.expect(zone_id, state)
+        status, body = self.stack.request("POST", path)
+        if status >= 400:
+            print(f"  {path} -> HTTP {status}: {body[:200]!r}", file=sys.stderr)
+        return exp
+
+    def _wall(self, t0: float) -> float:
+        return time.perf_counter() - t0 - self._paused
+
+    def _collect(self, exps: list[Expectation], t0: float) -> dict:
+        lat, fan, timeouts = [], [], 0
+        for exp in exps:
+            v = self.obs.wait(exp, self.timeout)
+            if v is None:
+                timeouts += 1
+                continue
+            lat.append(v)
+            f = self.obs.fanout(exp)
+            if f is not None:
+                fan.append(f)
+        return summarize(lat, self._wall(t0), timeouts, fan)
+
+    def manual(self, iterations: int) -> dict:
+        zones = [z for zs in self.groups.values() for z in zs]
+        exps, t0, self._paused = [], time.perf_counter(), 0.0
+        for i in range(iterations):
+            zid = zones[i % len(zones)]
+            self._cooldown([zid])
+            for action, state in (("start", "on"), ("stop", "off")):
+                exp = self._command(f"/api/zones/{zid}/{action}", zid, state)
+                self.obs.wait(exp, self.timeout)
+                exps.append(exp)
+        return self._collect(exps, t0)
+
+    def burst(self, iterations: int) -> dict:
+        exps, t0, self._paused = [], time.perf_counter(), 0.0
+        for i in range(iterations):
+            picks = [zs[i % len(zs)] for zs in self.groups.values()]
+            self._cooldown(picks)
+            for action, state in (("start", "on"), ("stop", "off")):
+                batch: list[Expectation] = []
+                threads = [
+                    threading.Thread(
+                        target=lambda z=z: batch.append(self._command(f"/api/zones/{z}/{action}", z, state))
+                    )
+                    for z in picks
+                ]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                for exp in batch:
+                    self.obs.wait(exp, self.timeout)
+                exps.extend(batch)
+        return self._collect(exps, t0)
+
+    def group(self, iterations: int) -> dict:
+        exps, t0, self._paused = [], time.perf_counter(), 0.0
+        gids = list(self.groups)
+        for i in range(iterations):
+            gid = gids[i % len(gids)]
+            first = self.groups[gid][0]
+            self._cooldown([first])
+            exp = self._command(f"/api/groups/{gid}/start-from-first", first, "on")
+            self.obs.wait(exp, self.timeout)
+            exps.append(exp)
+            off = self._command(f"/api/groups/{gid}/stop", first, "off")
+            self.obs.wait(off, self.timeout)
+        return self._collect(exps, t0)
+
+    def emergency(self, iterations: int) -> dict:
+        """Latency until the *last* running zone reports off after emergency-stop."""
+        lat, timeouts, t0, self._paused = [], 0, time.perf_counter(), 0.0
+        # /api/emergency-* делят лимит 5 запросов в минуту
+        for _ in range(min(iterations, 2)):
+            firsts = [zs[0] for zs in self.groups.values()]
+            self._cooldown(firsts)
+            for z in firsts:
+                self.obs.wait(self._command(f"/api/zones/{z}/start", z, "on"), self.timeout)
+            offs = [self.obs.expect(z, "off") for z in firsts]
+            self.stack.request("POST", "/api/emergency-stop")
+            self._stopped_at.update(dict.fromkeys(firsts, time.monotonic()))
+            waited = [self.obs.wait(exp, self.timeout) for exp in offs]
+            if any(v is None for v in waited):
+                timeouts += 1
+            else:
+                lat.append(max(waited))
+            self.stack.request("POST", "/api/emergency-resume")
+        return summarize(lat, self._wall(t0), timeouts)
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="wb-bench-")
+    stack = Stack(args.relays, args.broker, args.echo_delay, workdir, args.keep)
+    observer = None
+    try:
+        groups = stack.seed()
+        stack.start()
+        observer = Observer(stack.app_port, args.sse_clients)
+        observer.start()
+        bench = Bench(stack, observer, groups, args.timeout)
+        results = {}
+        for name in args.scenarios:
+            print(f"scenario {name} ...", file=sys.stderr)
+            results[name] = getattr(bench, name)(args.iterations)
+        return {
+            "git_rev": _git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+            "config": {
+                "relays": args.relays,
+                "zones": args.relays * CHANNELS,
+                "sse_clients": args.sse_clients,
+                "iterations": args.iterations,
+                "echo_delay_s": args.echo_delay,
+                "broker": "external" if args.broker else "mosquitto",
+            },
+            "sse_events": observer.events,
+            "scenarios": results,
+        }
+    finally:
+        if observer is not None:
+            observer.stop()
+        stack.stop()
+        if args.keep:
+            print(f"logs kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    p.add_argument("--relays", type=int, default=4, help="emulated wb-mr6cv3 relays (6 zones each)")
+    p.add_argument("--sse-clients", type=int, default=20)
+    p.add_argument("--iterations", type=int, default=30, help="commands per scenario step")
+    p.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    p.add_argument("--broker", help="use an existing broker host:port instead of spawning mosquitto")
+    p.add_argument("--echo-delay", type=float, default=0.0, help="emulator confirmation delay, seconds")
+    p.add_argument("--timeout", type=float, default=10.0, help="per-command observation timeout, seconds")
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+    p.add_argument("--keep", action="store_true", help="keep the work dir with process logs")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = p.parse_args(argv)
+
+    if args.compare:
+        old, new = (json.loads(Path(f).read_text()) for f in args.compare)
+        print("\n".join(compare(old, new)))
+        return 0
+
+    try:
+        result = run(args)
+    except RuntimeError as e:
+        print(f"bench_actuation: {e}", file=sys.stderr)
+        return 2
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n")
+        print(f"results written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
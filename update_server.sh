@@ -121,6 +121,15 @@ if [[ -f requirements-dev.txt ]]; then
 fi
 ok "Dependencies installed"
 
+# 3.1) Build hashed + precompressed static bundles (static/dist/manifest.json).
+# Non-fatal: without a manifest templates fall back to per-file ?v= URLs.
+info "Building static asset bundles..."
+if python -m services.static_assets build >/dev/null; then
+  ok "Static bundles built"
+else
+  warn "Static bundle build failed — serving unbundled assets"
+fi
+
 # 3.5) Update systemd unit if changed
 SERVICE_FILE="/etc/systemd/system/${SERVICE}.service"
 REPO_UNIT="${REPO_DIR}/wb-irrigation.service"
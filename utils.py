@@ -3,6 +3,7 @@ import logging
 import os
 import secrets
 import stat
+import threading
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -81,7 +82,16 @@ def _get_hostname_key() -> bytes:
     return (b * 4)[:32]
 
 
-def _get_secret_key() -> bytes:
+_SECRET_KEY_FILE = ".irrig_secret_key"
+_PREVIOUS_KEY_FILE = ".irrig_secret_key.prev"
+
+# Ключи держим в памяти: чтение файла на каждый encrypt/decrypt больше не нужно.
+# Сбрасывается reload_secret_key() (после ротации в другом процессе).
+_keys: dict[str, bytes | None] = {}
+_keys_lock = threading.Lock()
+
+
+def _load_secret_key() -> bytes:
     """Load or generate IRRIG_SECRET_KEY.
 
     Priority:
@@ -89,8 +99,6 @@ def _get_secret_key() -> bytes:
     2. File .irrig_secret_key (raw 32 bytes)
     3. Generate new random 32 bytes, persist to file
     """
-    _SECRET_KEY_FILE = ".irrig_secret_key"
-
     # 1. Check environment variable
     key = os.getenv("IRRIG_SECRET_KEY")
     if key:
@@ -116,14 +124,76 @@ def _get_secret_key() -> bytes:
     return new_key
 
 
-def encrypt_secret(plaintext: str | None) -> str | None:
+def _load_previous_key() -> bytes | None:
+    try:
+        with open(_PREVIOUS_KEY_FILE, "rb") as f:
+            data = f.read()
+        return data[:32] if len(data) >= 32 else None
+    except FileNotFoundError:
+        return None
+
+
+def _get_secret_key() -> bytes:
+    """Current secret key, loaded once per process (see :func:`_load_secret_key`)."""
+    key = _keys.get("current")
+    if key is None:
+        with _keys_lock:
+            key = _keys.get("current")
+            if key is None:
+                key = _keys["current"] = _load_secret_key()
+    return key
+
+
+def _get_previous_secret_key() -> bytes | None:
+    """Key the secrets were encrypted with before the last rotation, if any."""
+    if "previous" not in _keys:
+        with _keys_lock:
+            if "previous" not in _keys:
+                _keys["previous"] = _load_previous_key()
+    return _keys["previous"]
+
+
+def reload_secret_key() -> None:
+    """Forget the in-memory keys; the next use re-reads them."""
+    with _keys_lock:
+        _keys.clear()
+
+
+def secret_key_from_env() -> bool:
+    return bool(os.getenv("IRRIG_SECRET_KEY"))
+
+
+def store_secret_key(new_key: bytes) -> bytes:
+    """Make ``new_key`` the current key on disk and in memory; returns the replaced key.
+
+    The replaced key is kept in .irrig_secret_key.prev so that secrets written
+    with it (a crash mid-rotation, another worker that has not noticed the
+    rotation yet) still decrypt.
+    """
+    if len(new_key) < 32:
+        raise ValueError("secret key must be at least 32 bytes")
+    old_key = _get_secret_key()
+    for path, data in ((_PREVIOUS_KEY_FILE, old_key), (_SECRET_KEY_FILE, new_key[:32])):
+        tmp = path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IRUSR | stat.S_IWUSR)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    with _keys_lock:
+        _keys["current"], _keys["previous"] = new_key[:32], old_key
+    return old_key
+
+
+def encrypt_secret(plaintext: str | None, key: bytes | None = None) -> str | None:
     if plaintext is None:
         return None
     try:
         from Crypto.Cipher import AES  # pycryptodome
         from Crypto.Random import get_random_bytes
 
-        key = _get_secret_key()
+        key = key or _get_secret_key()
         iv = get_random_bytes(12)
         cipher = AES.new(key[:32], AES.MODE_GCM, nonce=iv)
         ct, tag = cipher.encrypt_and_digest(plaintext.encode("utf-8"))
@@ -133,33 +203,50 @@ def encrypt_secret(plaintext: str | None) -> str | None:
         logger.debug("Exception in encrypt_secret: %s", e)
         # xor fallback
         b = plaintext.encode("utf-8")
-        k = _get_secret_key()
+        k = key or _get_secret_key()
         x = bytes([b[i] ^ k[i % len(k)] for i in range(len(b))])
         return "xor:" + base64.urlsafe_b64encode(x).decode("utf-8")
 
 
-def decrypt_secret(ciphertext: str | None) -> str | None:
+def _aes_decrypt(raw: bytes, key: bytes) -> str:
+    from Crypto.Cipher import AES
+
+    iv, tag, ct = raw[:12], raw[12:28], raw[28:]
+    cipher = AES.new(key[:32], AES.MODE_GCM, nonce=iv)
+    return cipher.decrypt_and_verify(ct, tag).decode("utf-8")
+
+
+def decrypt_secret(ciphertext: str | None, key: bytes | None = None) -> str | None:
     if not ciphertext:
         return None
     # AES-GCM preferred
     try:
         raw = base64.urlsafe_b64decode(ciphertext)
         if raw.startswith(b"aes:"):
-            from Crypto.Cipher import AES
-
             raw = raw[4:]
-            iv, tag, ct = raw[:12], raw[12:28], raw[28:]
-            key = _get_secret_key()
-            cipher = AES.new(key[:32], AES.MODE_GCM, nonce=iv)
-            pt = cipher.decrypt_and_verify(ct, tag)
-            return pt.decode("utf-8")
+            if key is not None:
+                return _aes_decrypt(raw, key)
+            try:
+                return _aes_decrypt(raw, _get_secret_key())
+            except ValueError:
+                # Не тот ключ: ротация в другом процессе или секрет, записанный
+                # старым ключом, — перечитываем ключи и пробуем текущий и прежний.
+                reload_secret_key()
+                for k in (_get_secret_key(), _get_previous_secret_key()):
+                    if k is None:
+                        continue
+                    try:
+                        return _aes_decrypt(raw, k)
+                    except ValueError:
+                        continue
+                raise
     except ImportError as e:
         logger.debug("Handled exception in decrypt_secret: %s", e)
     # xor fallback
     try:
         if ciphertext.startswith("xor:"):
             x = base64.urlsafe_b64decode(ciphertext[4:])
-            k = _get_secret_key()
+            k = key or _get_secret_key()
             b = bytes([x[i] ^ k[i % len(k)] for i in range(len(x))])
             return b.decode("utf-8")
     except (KeyError, TypeError, ValueError) as e: